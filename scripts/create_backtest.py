@@ -3,12 +3,10 @@ import os
 # ==============================================================================
 # ファイル: create_backtest.py
 # 実行方法: python create_backtest.py
-# Ver. 00-07
+# Ver. 00-14
 # 変更点:
-#   - run_backtest.py (main):
-#     - メール通知のキューイング方式に対応するため、バックテスト開始時に
-#       notifier.start_notifier()を、終了時にnotifier.stop_notifier()を
-#       呼び出すように修正。
+#   - src/backtest/vectorized/indicators.py:
+#     - _kernel_adx の未使用の変数 (c) を削除。
 # ==============================================================================
 
 project_files = {
@@ -36,6 +34,18 @@ INITIAL_CAPITAL = 50000000000000 # 初期資金
 COMMISSION_PERC = 0.00 # 0.00%
 SLIPPAGE_PERC = 0.0002 # 0.02%
 
+# バックテストエンジン
+#   'backtrader': cerebro.run() によるバー単位の実行 (詳細分析向け)
+#   'vectorized': numpy配列演算による高速パス (スクリーニング向け)。
+#                 同じ取引リストを出力し、未対応の戦略定義は自動的に 'backtrader' で実行します。
+BACKTEST_ENGINE = 'backtrader'
+
+# --- ポートフォリオ・バックテスト設定 (python -m src.backtest.run_portfolio) ---
+# 全銘柄で共有する初期資金。(銘柄ごとの INITIAL_CAPITAL とは別)
+PORTFOLIO_INITIAL_CAPITAL = 10000000
+# 同時に保有 (発注中を含む) できる銘柄数の上限。None の場合は上限なし。
+PORTFOLIO_MAX_POSITIONS = 10
+
 # --- ロギング設定 ---
 # ▼▼▼【変更箇所】▼▼▼
 # バックテスト単体実行時のデフォルトログレベル。
@@ -114,9 +124,11 @@ from datetime import datetime
 
 from src.core.util import logger as logger_setup
 from src.core.data_preparer import prepare_historical_data_feeds
+from src.core import bar_store
 from . import config_backtest as config
 from . import report as report_generator
 from .strategy import BacktestStrategy # <-- [修正] 新しいストラテジーをインポート
+from .vectorized import run_vectorized_backtest_for_symbol, VectorizedUnsupportedError
 
 logger = logging.getLogger(__name__)
 
@@ -145,8 +157,9 @@ class TradeList(bt.Analyzer):
 
 def run_backtest_for_symbol(symbol, base_filepath, strategy_params):
     logger.info(f"▼▼▼ バックテスト実行中: {symbol} ▼▼▼")
-    df_for_dates = pd.read_csv(base_filepath, index_col='datetime', parse_dates=True)
-    start_date, end_date = df_for_dates.index[0], df_for_dates.index[-1]
+    # [修正] 期間の取得もバーストアのパース済みデータから行う (CSVの二重パースを回避)
+    base_bars = bar_store.load_bars(base_filepath)
+    start_date, end_date = base_bars.start, base_bars.end
     
     cerebro = bt.Cerebro(stdstats=False)
     
@@ -182,6 +195,67 @@ def run_backtest_for_symbol(symbol, base_filepath, strategy_params):
         'win_trades': trade_analysis.get('won', {}).get('total', 0)
     }, start_date, end_date, trade_list
 
+def run_symbol_backtest(symbol, base_filepath, strategy_params, engine='backtrader'):
+    \"\"\"
+    指定エンジンで1銘柄のバックテストを実行する。戻り値は run_backtest_for_symbol と同じ。
+    engine='vectorized' で戦略定義がベクトル化できない場合は cerebro 経路で実行する。
+    \"\"\"
+    if engine == 'vectorized':
+        try:
+            return run_vectorized_backtest_for_symbol(symbol, base_filepath, strategy_params)
+        except VectorizedUnsupportedError as e:
+            logger.info(f"[{symbol}] ベクトル化エンジン未対応のため backtrader で実行します: {e}")
+    return run_backtest_for_symbol(symbol, base_filepath, strategy_params)
+
+TRADE_HISTORY_COLUMNS = [
+    '銘柄', '方向', '数量', 'エントリー価格', 'エントリー日時', 'エントリー根拠',
+    '決済価格', '決済日時', '決済根拠',
+    '一株当たり損益', '損益', '損益(手数料込)',
+    'ストップロス価格', 'テイクプロフィット価格',
+    '許容損失幅', '目標利益幅'
+]
+
+def find_base_files(strategy_params, data_dir=None):
+    \"\"\"短期足の設定に一致するベースCSVファイルを銘柄順に返す。\"\"\"
+    data_dir = data_dir or config.DATA_DIR
+    short_tf_compression = strategy_params['timeframes']['short']['compression']
+    base_file_pattern = f"*_{short_tf_compression}m_*.csv"
+    return sorted(glob.glob(os.path.join(data_dir, base_file_pattern)))
+
+def build_detail_row(symbol, stats):
+    \"\"\"1銘柄分のバックテスト統計から詳細レポートの1行を生成する。\"\"\"
+    detail_data = {"銘柄": symbol, "純利益": "¥0.00", "総利益": "¥0.00", "総損失": "¥0.00", "PF": "0.00", "勝率": "0.00%", "総トレード数": 0, "勝トレード": 0, "負トレード": 0, "平均利益": "¥0.00", "平均損失": "¥0.00", "RR比": "0.00"}
+    if not stats: return detail_data
+    win_trades, total_trades = stats['win_trades'], stats['total_trades']; lost_trades = total_trades - win_trades
+    win_rate = (win_trades / total_trades) * 100 if total_trades > 0 else 0
+    pf = abs(stats['gross_won'] / stats['gross_lost']) if stats['gross_lost'] != 0 else float('inf')
+    avg_win = stats['gross_won'] / win_trades if win_trades > 0 else 0
+    avg_loss = stats['gross_lost'] / lost_trades if lost_trades > 0 else 0
+    rr = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
+    detail_data.update({"純利益": f"¥{stats['pnl_net']:,.2f}", "総利益": f"¥{stats['gross_won']:,.2f}", "総損失": f"¥{stats['gross_lost']:,.2f}", "PF": f"{pf:.2f}", "勝率": f"{win_rate:.2f}%", "総トレード数": total_trades, "勝トレード": win_trades, "負トレード": lost_trades, "平均利益": f"¥{avg_win:,.2f}", "平均損失": f"¥{avg_loss:,.2f}", "RR比": f"{rr:.2f}"})
+    return detail_data
+
+def build_report_frames(strategy_params, symbol_outputs):
+    \"\"\"
+    銘柄ごとの実行結果 (symbol, stats, start_date, end_date, trade_list) のリストから
+    summary / detail / trade_history の各DataFrameを生成する。
+    有効な期間が得られなかった場合、summaryはNoneとなる。
+    \"\"\"
+    all_results, all_trades, all_details, start_dates, end_dates = [], [], [], [], []
+    for symbol, stats, start_date, end_date, trade_list in symbol_outputs:
+        if stats:
+            all_results.append(stats)
+            if trade_list: all_trades.extend(trade_list)
+            if start_date is not None: start_dates.append(start_date)
+            if end_date is not None: end_dates.append(end_date)
+        all_details.append(build_detail_row(symbol, stats))
+    detail_df = pd.DataFrame(all_details)
+    summary_df = None
+    if start_dates and end_dates:
+        summary_df = report_generator.generate_report(all_results, strategy_params, min(start_dates), max(end_dates))
+    trade_history_df = pd.DataFrame(all_trades, columns=TRADE_HISTORY_COLUMNS) if all_trades else pd.DataFrame(columns=TRADE_HISTORY_COLUMNS)
+    return summary_df, detail_df, trade_history_df
+
 def main():
     try:
         logger_setup.setup_logging(config.LOG_DIR, log_prefix='backtest', level=config.LOG_LEVEL)
@@ -190,57 +264,32 @@ def main():
             if not os.path.exists(dir_path): os.makedirs(dir_path)
         strategy_file_path = os.path.join(config.BASE_DIR, 'config', 'strategy_base.yml')
         with open(strategy_file_path, 'r', encoding='utf-8') as f: strategy_params = yaml.safe_load(f)
-        short_tf_compression = strategy_params['timeframes']['short']['compression']
-        base_file_pattern = f"*_{short_tf_compression}m_*.csv"
-        base_csv_files = glob.glob(os.path.join(config.DATA_DIR, base_file_pattern))
+        base_csv_files = find_base_files(strategy_params)
         if not base_csv_files: logger.error(f"{config.DATA_DIR}にベースデータが見つかりません。"); return
-        all_results, all_trades, all_details, start_dates, end_dates = [], [], [], [], []
-        for filepath in sorted(base_csv_files):
+        symbol_outputs = []
+        for filepath in base_csv_files:
             symbol = os.path.basename(filepath).split('_')[0]
-            stats, start_date, end_date, trade_list = run_backtest_for_symbol(symbol, filepath, strategy_params)
-            detail_data = {"銘柄": symbol, "純利益": "¥0.00", "総利益": "¥0.00", "総損失": "¥0.00", "PF": "0.00", "勝率": "0.00%", "総トレード数": 0, "勝トレード": 0, "負トレード": 0, "平均利益": "¥0.00", "平均損失": "¥0.00", "RR比": "0.00"}
-            if stats:
-                all_results.append(stats);
-                if trade_list: all_trades.extend(trade_list)
-                if start_date: start_dates.append(start_date)
-                if end_date: end_dates.append(end_date)
-                win_trades, total_trades = stats['win_trades'], stats['total_trades']; lost_trades = total_trades - win_trades
-                win_rate = (win_trades / total_trades) * 100 if total_trades > 0 else 0
-                pf = abs(stats['gross_won'] / stats['gross_lost']) if stats['gross_lost'] != 0 else float('inf')
-                avg_win = stats['gross_won'] / win_trades if win_trades > 0 else 0
-                avg_loss = stats['gross_lost'] / lost_trades if lost_trades > 0 else 0
-                rr = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
-                detail_data.update({"純利益": f"¥{stats['pnl_net']:,.2f}", "総利益": f"¥{stats['gross_won']:,.2f}", "総損失": f"¥{stats['gross_lost']:,.2f}", "PF": f"{pf:.2f}", "勝率": f"{win_rate:.2f}%", "総トレード数": total_trades, "勝トレード": win_trades, "負トレード": lost_trades, "平均利益": f"¥{avg_win:,.2f}", "平均損失": f"¥{avg_loss:,.2f}", "RR比": f"{rr:.2f}"})
-            all_details.append(detail_data)
+            stats, start_date, end_date, trade_list = run_symbol_backtest(symbol, filepath, strategy_params, config.BACKTEST_ENGINE)
+            symbol_outputs.append((symbol, stats, start_date, end_date, trade_list))
+        summary_df, detail_df, trade_history_df = build_report_frames(strategy_params, symbol_outputs)
         timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
-        pd.DataFrame(all_details).to_csv(os.path.join(config.RESULTS_DIR, f"detail_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+        detail_df.to_csv(os.path.join(config.RESULTS_DIR, f"detail_{timestamp}.csv"), index=False, encoding='utf-8-sig')
         logger.info(f"詳細レポートを detail_{timestamp}.csv に保存しました。")
 
-        if start_dates and end_dates:
-            report_df = report_generator.generate_report(all_results, strategy_params, min(start_dates), max(end_dates))
-            report_df.to_csv(os.path.join(config.RESULTS_DIR, f"summary_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+        if summary_df is not None:
+            summary_df.to_csv(os.path.join(config.RESULTS_DIR, f"summary_{timestamp}.csv"), index=False, encoding='utf-8-sig')
             logger.info(f"サマリーレポートを summary_{timestamp}.csv に保存しました。")
-            logger.info("\\n\\n★★★ 全銘柄バックテストサマリー ★★★\\n" + report_df.to_string())
+            logger.info("\\n\\n★★★ 全銘柄バックテストサマリー ★★★\\n" + summary_df.to_string())
 
         else:
             logger.warning("バックテスト対象期間を特定できなかったため、サマリーレポートは生成されませんでした。")
 
         logger.info("取引履歴(trade_history.csv)の保存処理を開始...")
 
-        TRADE_HISTORY_COLUMNS = [
-            '銘柄', '方向', '数量', 'エントリー価格', 'エントリー日時', 'エントリー根拠',
-            '決済価格', '決済日時', '決済根拠',
-            '一株当たり損益', '損益', '損益(手数料込)',
-            'ストップロス価格', 'テイクプロフィット価格',
-            '許容損失幅', '目標利益幅'
-        ]
-
-        if not all_trades:
+        if trade_history_df.empty:
             logger.info("取引履歴が0件のため、ヘッダーのみのファイルを生成します。")
-            trade_history_df = pd.DataFrame(columns=TRADE_HISTORY_COLUMNS)
         else:
-            logger.info(f"{len(all_trades)}件の取引履歴を保存します。")
-            trade_history_df = pd.DataFrame(all_trades, columns=TRADE_HISTORY_COLUMNS)
+            logger.info(f"{len(trade_history_df)}件の取引履歴を保存します。")
 
         trade_history_df.to_csv(
             os.path.join(config.RESULTS_DIR, f"trade_history_{timestamp}.csv"),
@@ -377,7 +426,1057 @@ class BacktestStrategy(BaseStrategy):
             # statistics=None (バックテストでは統計情報なし)
         )
         self.exit_signal_generator = BacktestExitSignalGenerator(self, self.order_manager)
-    # === ▲▲▲ v2.0 変更 ▲▲▲ ==="""
+    # === ▲▲▲ v2.0 変更 ▲▲▲ ===""",
+
+    "src/backtest/vectorized/__init__.py": """from .indicators import VectorizedUnsupportedError, compute_indicator
+from .engine import VectorizedBacktest, build_indicators, load_feeds, run_vectorized_backtest_for_symbol""",
+
+    "src/backtest/vectorized/indicators.py": """import math
+import collections
+import numpy as np
+import backtrader as bt
+
+from src.core.indicators import SafeStochastic, VWAP, SafeADX, SafeRSI
+
+# ==============================================================================
+# ベクトル化インジケーター
+# Backtraderのインジケーター (once モード) と同一の計算順序で配列全体を計算する。
+# 浮動小数点の丸めまで一致させるため、移動平均の窓合計は math.fsum、
+# 再帰的な平滑化は逐次ループで計算する。 (クロス判定が1ulpの差で反転しないようにする)
+# 各カーネルは (line0の配列, minperiod) を返す。minperiod 未満の要素は NaN。
+# ==============================================================================
+
+
+class VectorizedUnsupportedError(Exception):
+    \"\"\"ベクトル化エンジンで再現できない戦略定義・データ。(呼び出し側は cerebro 経路にフォールバックする)\"\"\"
+
+
+class Feed:
+    \"\"\"1時間足分の価格配列。\"\"\"
+    __slots__ = ('datetime', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, bars):
+        self.datetime = np.asarray(bars.datetime, dtype=np.int64)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            setattr(self, name, np.asarray(bars.column(name), dtype=np.float64))
+
+    def __len__(self):
+        return len(self.datetime)
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+def sma(src, period, src_minperiod=1):
+    \"\"\"bt.indicators.SMA (Average.once) と同一。\"\"\"
+    src, out, mp = src.tolist(), _nan(len(src)), src_minperiod + period - 1
+    for i in range(mp - 1, len(src)):
+        out[i] = math.fsum(src[i - period + 1:i + 1]) / period
+    return out, mp
+
+def _smoothing(src, period, alpha, src_minperiod=1):
+    \"\"\"bt.indicators.ExponentialSmoothing と同一。(シードは期間平均)\"\"\"
+    alpha1 = 1.0 - alpha
+    values, out, mp = src.tolist(), _nan(len(src)), src_minperiod + period - 1
+    if mp > len(values): return out, mp
+    prev = math.fsum(values[mp - period:mp]) / period
+    out[mp - 1] = prev
+    for i in range(mp, len(values)):
+        out[i] = prev = prev * alpha1 + values[i] * alpha
+    return out, mp
+
+def ema(src, period, src_minperiod=1):
+    return _smoothing(src, period, 2.0 / (1.0 + period), src_minperiod)
+
+def smma(src, period, src_minperiod=1):
+    return _smoothing(src, period, 1.0 / period, src_minperiod)
+
+def _prev(arr):
+    \"\"\"arr(-1) に相当する配列。先頭要素は未定義 (NaN)。\"\"\"
+    out = np.empty_like(arr); out[0] = np.nan; out[1:] = arr[:-1]
+    return out
+
+
+def _kernel_sma(feed, period):
+    return sma(feed.close, period)
+
+def _kernel_ema(feed, period):
+    return ema(feed.close, period)
+
+def _kernel_bollinger(feed, period, devfactor):
+    # 比較に使われるのは line0 (mid) のみ
+    return sma(feed.close, period)
+
+def _kernel_macd(feed, period_me1, period_me2, period_signal):
+    me1, mp1 = ema(feed.close, period_me1)
+    me2, mp2 = ema(feed.close, period_me2)
+    return me1 - me2, max(mp1, mp2) + period_signal - 1
+
+def _kernel_atr(feed, period):
+    prev_close = _prev(feed.close)
+    tr = np.maximum(feed.high, prev_close) - np.minimum(feed.low, prev_close)
+    return smma(tr, period, src_minperiod=2)
+
+def _kernel_rsi(feed, period):
+    delta = feed.close - _prev(feed.close)
+    gain, loss = np.where(delta > 0, delta, 0.0), np.where(delta < 0, -delta, 0.0)
+    avg_gain, mp = ema(gain, period, src_minperiod=2)
+    avg_loss, _ = ema(loss, period, src_minperiod=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.where(avg_loss != 0, avg_gain / avg_loss, np.inf)
+        rsi = 100.0 - (100.0 / (1.0 + rs))
+    rsi[:mp - 1] = np.nan
+    return rsi, mp
+
+def _kernel_stochastic(feed, period, period_dfast, period_dslow):
+    high, low, close, n = feed.high.tolist(), feed.low.tolist(), feed.close, len(feed)
+    hh, ll = _nan(n), _nan(n)
+    for i in range(period - 1, n):
+        hh[i], ll[i] = max(high[i - period + 1:i + 1]), min(low[i - period + 1:i + 1])
+    price_range = hh - ll
+    safe_num = np.where(price_range > 1e-9, close - ll, 0.0)
+    safe_den = np.where(price_range > 1e-9, price_range, 1.0)
+    perc_k, mp_k = sma((100.0 * safe_num) / safe_den, period_dfast, src_minperiod=period)
+    return perc_k, mp_k + period_dslow - 1
+
+def _kernel_adx(feed, period):
+    \"\"\"SafeADX.next() の逐次計算をそのまま再現する。(先頭バーの [-1] は配列末尾を参照する)\"\"\"
+    high, low, close = feed.high.tolist(), feed.low.tolist(), feed.close.tolist()
+    out = np.zeros(len(high))
+    tr = plus_dm = minus_dm = adx = 0.0
+    dx_history = collections.deque(maxlen=period)
+    smooth = lambda prev, cur: prev - (prev / period) + cur
+    for i in range(len(high)):
+        h, l, ph, pl, pc = high[i], low[i], high[i - 1], low[i - 1], close[i - 1]
+        tr = smooth(tr, max(h - l, abs(h - pc), abs(l - pc)))
+        move_up, move_down = h - ph, pl - l
+        plus_dm = smooth(plus_dm, move_up if move_up > move_down and move_up > 0 else 0.0)
+        minus_dm = smooth(minus_dm, move_down if move_down > move_up and move_down > 0 else 0.0)
+        if tr > 1e-9: plus_di, minus_di = 100.0 * plus_dm / tr, 100.0 * minus_dm / tr
+        else: plus_di, minus_di = 0.0, 0.0
+        di_sum = plus_di + minus_di
+        dx = 100.0 * abs(plus_di - minus_di) / di_sum if di_sum > 1e-9 else 0.0
+        dx_history.append(dx)
+        if i + 1 == period: adx = sum(dx_history) / period
+        elif i + 1 > period: adx = (adx * (period - 1) + dx) / period
+        out[i] = adx
+    return out, 1
+
+def _kernel_vwap(feed):
+    \"\"\"VWAP.next() と同一。先頭バーは NaN で累積にも含めない。日付 (UTC) が変わると累積をリセットする。\"\"\"
+    tp = ((feed.high + feed.low) + feed.close) / 3.0
+    days = (feed.datetime // 86_400_000_000_000).tolist()
+    tp_list, volume = tp.tolist(), feed.volume.tolist()
+    out = _nan(len(tp_list))
+    cum_tpv = cum_vol = 0.0
+    for i in range(1, len(tp_list)):
+        if days[i] != days[i - 1]: cum_tpv = cum_vol = 0.0
+        cum_tpv += tp_list[i] * volume[i]
+        cum_vol += volume[i]
+        out[i] = cum_tpv / cum_vol if cum_vol > 0 else tp_list[i]
+    return out, 1
+
+
+# bt のインジケータークラス -> カーネル
+KERNELS = {
+    bt.indicators.SMA: _kernel_sma,
+    bt.indicators.EMA: _kernel_ema,
+    bt.indicators.BollingerBands: _kernel_bollinger,
+    bt.indicators.MACD: _kernel_macd,
+    bt.indicators.ATR: _kernel_atr,
+    SafeRSI: _kernel_rsi,
+    SafeStochastic: _kernel_stochastic,
+    SafeADX: _kernel_adx,
+    VWAP: _kernel_vwap,
+}
+
+def compute_indicator(ind_cls, feed, params):
+    \"\"\"
+    インジケータークラスとパラメータから line0 の配列と minperiod を計算する。
+    移動平均の種類 (movav) の変更など、カーネルが再現できない指定は VectorizedUnsupportedError。
+    \"\"\"
+    kernel = KERNELS.get(ind_cls)
+    if kernel is None:
+        raise VectorizedUnsupportedError(f"ベクトル化カーネルが未定義のインジケーター: {ind_cls.__name__}")
+    defaults = dict(ind_cls.params._getitems())
+    unknown = (set(params) - set(defaults)) | (set(params) & {'movav'})
+    if unknown:
+        raise VectorizedUnsupportedError(f"{ind_cls.__name__} の未対応パラメータ: {sorted(unknown)}")
+    defaults.pop('movav', None)
+    defaults.update(params)
+    return kernel(feed, **defaults)
+
+
+def crossover(values1, mp1, values2, mp2):
+    \"\"\"bt.indicators.CrossOver と同一。(上抜け: 1.0, 下抜け: -1.0)\"\"\"
+    d0, d1 = values1.tolist(), values2.tolist()
+    n, start = len(d0), max(mp1, mp2)
+    out = _nan(n)
+    if start > n: return out, start + 1
+    prev = d0[start - 1] - d1[start - 1]   # NonZeroDifference のシード値
+    for i in range(start, n):
+        a, b = d0[i], d1[i]
+        up, down = prev < 0.0 and a > b, prev > 0.0 and a < b
+        out[i] = float(up) - float(down)
+        d = a - b
+        prev = d if d else prev
+    return out, start + 1""",
+
+    "src/backtest/vectorized/engine.py": """import os
+import glob
+import logging
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from src.core import bar_store
+from src.core.strategy.strategy_initializer import StrategyInitializer
+from src.core.strategy.entry_signal_generator import EntrySignalGenerator
+from src.backtest import config_backtest as config
+from .indicators import Feed, VectorizedUnsupportedError, compute_indicator, crossover
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ベクトル化バックテスター (スクリーニング用の高速パス)
+# 戦略定義 (entry_conditions / exit_conditions) をnumpy配列演算に変換し、
+# cerebro.run() と同じ約定結果を得る。
+#
+# - 短期/中期/長期の全バーのタイムスタンプを合成した「ステップ」列を作り、
+#   各ステップで各時間足の確定済みバー位置を searchsorted で求める。(先読みなし)
+#   Backtrader (runonce) と同様、中長期足だけが進むステップでも注文処理と next() が走る。
+# - エントリー条件は配列全体で真偽マスクとして評価し、ポジションがない間は
+#   シグナルのあるステップ間を飛び越す。エントリー根拠の文字列は既存の
+#   EntrySignalGenerator を該当ステップでのみ呼び出して生成する。
+# - 決済は BacktestOrderManager.place_backtest_exit_orders と同じ StopTrail
+#   (+ 任意で Limit の利確) を、ステップのチャンク単位で配列評価する。
+#   Backtrader経路では Limit 注文が transmit=False のまま送信されないため、
+#   既定では利確 Limit を無効としている。(transmit_take_profit=True で有効化)
+# - 出力は TradeList と同じスキーマの取引リスト、TradeAnalyzer 相当の統計。
+# - window=(開始, 終了) を指定すると、全期間で計算済みのインジケーターを使ったまま
+#   その期間だけを初期資金から取引する。(ウォークフォワード評価用)
+# ==============================================================================
+
+TIMEFRAMES = ('short', 'medium', 'long')
+EXIT_SEARCH_CHUNK = 256
+
+
+class _Clock:
+    \"\"\"EntrySignalGenerator に渡すライン群が参照する現在ステップ。\"\"\"
+    __slots__ = ('step',)
+
+    def __init__(self): self.step = 0
+
+
+class _Line:
+    \"\"\"Backtraderのラインと同じく line[0] / len() でアクセスできる配列ビュー。\"\"\"
+    __slots__ = ('values', 'positions', 'clock')
+
+    def __init__(self, values, positions, clock):
+        self.values, self.positions, self.clock = values, positions, clock
+
+    def __getitem__(self, ago):
+        return float(self.values[self.positions[self.clock.step] + ago])
+
+    def __len__(self):
+        return int(self.positions[self.clock.step]) + 1
+
+
+class _FeedView(_Line):
+    \"\"\"データフィードのビュー。close/open/high/low/volume 属性を持つ。\"\"\"
+    __slots__ = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, feed, positions, clock):
+        super().__init__(feed.close, positions, clock)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            setattr(self, name, _Line(getattr(feed, name), positions, clock))
+
+
+def find_feed_files(symbol, base_filepath, strategy_params, data_dir=None):
+    \"\"\"prepare_historical_data_feeds と同じ規則で {時間足: CSVパス} を返す。見つからない場合はNone。\"\"\"
+    data_dir = data_dir or config.DATA_DIR
+    files = {'short': base_filepath}
+    for tf_name in ('medium', 'long'):
+        tf_config = strategy_params['timeframes'].get(tf_name)
+        if not tf_config:
+            raise VectorizedUnsupportedError(f"{tf_name} の時間足設定がありません。")
+        if tf_config.get('source_type', 'resample') != 'direct':
+            raise VectorizedUnsupportedError(f"{tf_name} のリサンプリング (source_type: resample) は未対応です。")
+        data_files = glob.glob(os.path.join(data_dir, tf_config.get('file_pattern').format(symbol=symbol)))
+        if not data_files:
+            logger.error(f"[{symbol}] {tf_name}用のデータファイルが見つかりません。")
+            return None
+        files[tf_name] = data_files[0]
+    return files
+
+
+def build_indicators(strategy_params, feeds, cache=None):
+    \"\"\"
+    StrategyInitializer.create_indicators と同じ規則でインジケーター配列を生成する。
+    戻り値: {インジケーターキー: (時間足, 値の配列, minperiod)}
+    cache: 同一銘柄で戦略をまたいで再利用する {キー: (値の配列, minperiod)} の辞書。(任意)
+    \"\"\"
+    si = StrategyInitializer(strategy_params)
+    cache = {} if cache is None else cache
+    unique_defs = {}
+
+    def add_def(timeframe, ind_def):
+        if not isinstance(ind_def, dict) or 'name' not in ind_def: return
+        unique_defs.setdefault(si._get_indicator_key(timeframe, **ind_def), (timeframe, ind_def))
+
+    entry_conditions = strategy_params.get('entry_conditions')
+    cond_lists = [l for l in entry_conditions.values() if isinstance(l, list)] if isinstance(entry_conditions, dict) else []
+    for cond_list in cond_lists:
+        for cond in cond_list:
+            if not isinstance(cond, dict) or not cond.get('timeframe'): continue
+            tf = cond['timeframe']
+            add_def(tf, cond.get('indicator')); add_def(tf, cond.get('indicator1')); add_def(tf, cond.get('indicator2'))
+            if cond.get('target', {}).get('type') == 'indicator': add_def(tf, cond['target']['indicator'])
+    if isinstance(strategy_params.get('exit_conditions'), dict):
+        for exit_type in ('take_profit', 'stop_loss'):
+            cond = strategy_params['exit_conditions'].get(exit_type, {})
+            if cond and cond.get('type') in ('atr_multiple', 'atr_stoptrail'):
+                atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
+                add_def(cond.get('timeframe'), {'name': 'atr', 'params': atr_params})
+
+    indicators = {}
+    for key, (timeframe, ind_def) in unique_defs.items():
+        ind_cls = si._find_indicator_class(ind_def['name'])
+        if ind_cls is None:
+            logger.error(f"インジケータークラス '{ind_def['name']}' が見つかりません。")
+            continue
+        if key not in cache:
+            cache[key] = compute_indicator(ind_cls, feeds[timeframe], ind_def.get('params', {}))
+        if cache[key][1] > len(feeds[timeframe]):
+            # データ不足時の挙動 (例外/シグナルなし) はインジケーターにより異なるため cerebro 経路に任せる
+            raise VectorizedUnsupportedError(f"{key} の計算に必要なバー数 ({cache[key][1]}) に対してデータが不足しています。")
+        indicators[key] = (timeframe,) + tuple(cache[key])
+
+    for cond_list in cond_lists:
+        for cond in cond_list:
+            if not isinstance(cond, dict) or cond.get('type') not in ('crossover', 'crossunder'): continue
+            k1 = si._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = si._get_indicator_key(cond['timeframe'], **cond['indicator2'])
+            cross_key = f"cross_{k1}_vs_{k2}"
+            if k1 in indicators and k2 in indicators and cross_key not in indicators:
+                if cross_key not in cache: cache[cross_key] = crossover(*indicators[k1][1:], *indicators[k2][1:])
+                indicators[cross_key] = (cond['timeframe'],) + tuple(cache[cross_key])
+    return indicators
+
+
+class VectorizedBacktest:
+    \"\"\"1銘柄 × 1戦略のベクトル化バックテスト。\"\"\"
+
+    def __init__(self, symbol, feeds, strategy_params, indicator_cache=None, transmit_take_profit=False, window=None):
+        self.symbol = symbol
+        self.params = strategy_params
+        self.feeds = feeds
+        self.transmit_take_profit = transmit_take_profit
+        self.window = window
+        self.initializer = StrategyInitializer(strategy_params)
+        try:
+            self.indicators = build_indicators(strategy_params, feeds, indicator_cache)
+            self._build_steps()
+            self._build_signals()
+            self._exit_atr_keys = {name: self._atr_key(name) for name in ('stop_loss', 'take_profit')}
+        except (KeyError, TypeError, IndexError, AttributeError) as e:
+            raise VectorizedUnsupportedError(f"戦略定義をベクトル化できません: {type(e).__name__}: {e}") from e
+
+        sizing = strategy_params.get('sizing', {})
+        self.sizing = sizing
+        self.method = sizing.get('backtest_method', 'risk_based')
+        self.cash = float(config.INITIAL_CAPITAL)
+        self.commission = config.COMMISSION_PERC
+        self.slippage = config.SLIPPAGE_PERC
+        self.tp_price, self.sl_price, self.risk_per_share = 0.0, 0.0, 0.0
+        self.trades, self.closed_pnlcomm, self.opened_count = [], [], 0
+
+    # --- 前処理 -----------------------------------------------------------------
+
+    def _build_steps(self):
+        for tf, feed in self.feeds.items():
+            if len(feed) > 1 and not np.all(np.diff(feed.datetime) > 0):
+                raise VectorizedUnsupportedError(f"{tf} のタイムスタンプが単調増加ではありません。")
+        self.steps = np.unique(np.concatenate([self.feeds[tf].datetime for tf in TIMEFRAMES]))
+        self.positions = {tf: np.searchsorted(self.feeds[tf].datetime, self.steps, side='right') - 1 for tf in TIMEFRAMES}
+        minperiods = {tf: 1 for tf in TIMEFRAMES}
+        for tf, _, minperiod in self.indicators.values():
+            minperiods[tf] = max(minperiods[tf], minperiod)
+        self.ready = np.logical_and.reduce([self.positions[tf] + 1 >= minperiods[tf] for tf in TIMEFRAMES])
+        # 取引するステップの範囲 [start_step, end_step)。window はUTCエポックナノ秒 (終了は含まない)
+        self.start_step, self.end_step = 0, len(self.steps)
+        if self.window is not None:
+            self.start_step, self.end_step = (int(i) for i in np.searchsorted(self.steps, self.window, side='left'))
+        self.bar0 = self.positions['short']
+        self.clock = _Clock()
+        views = {tf: _FeedView(self.feeds[tf], self.positions[tf], self.clock) for tf in TIMEFRAMES}
+        ind_views = {key: _Line(values, self.positions[tf], self.clock) for key, (tf, values, _) in self.indicators.items()}
+        self.signal_generator = EntrySignalGenerator(ind_views, views, self.params)
+
+    def _at_steps(self, tf, values):
+        \"\"\"時間足 tf のバー単位の配列を、ステップ単位に並べ替える。\"\"\"
+        positions = self.positions[tf]
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], False)
+
+    def _condition_mask(self, cond):
+        \"\"\"EntrySignalGenerator._compile_condition と同じ判定をステップ単位の配列で返す。\"\"\"
+        si, tf, cond_type = self.initializer, cond['timeframe'], cond.get('type')
+        feed, never = self.feeds[tf], np.zeros(len(self.steps), dtype=bool)
+        if cond_type in ('crossover', 'crossunder'):
+            k1 = si._get_indicator_key(tf, **cond['indicator1']); k2 = si._get_indicator_key(tf, **cond['indicator2'])
+            cross = self.indicators.get(f"cross_{k1}_vs_{k2}")
+            if cross is None: return never
+            return self._at_steps(tf, cross[1] > 0 if cond_type == 'crossover' else cross[1] < 0)
+
+        ind = self.indicators.get(si._get_indicator_key(tf, **cond['indicator']))
+        if ind is None: return never
+        values, compare, target = ind[1], cond['compare'], cond['target']
+        target_type = target.get('type')
+        if target_type == 'data':
+            if target['value'] not in ('open', 'high', 'low', 'close', 'volume'):
+                raise VectorizedUnsupportedError(f"未対応の比較対象データ: {target['value']}")
+            target_val = getattr(feed, target['value'])
+        elif target_type == 'indicator':
+            target_ind = self.indicators.get(si._get_indicator_key(tf, **target['indicator']))
+            if target_ind is None: return never
+            target_val = target_ind[1]
+        elif target_type == 'values':
+            target_val = target['value']
+        else:
+            return never
+
+        if compare in ('>', '<'):
+            if isinstance(target_val, list): target_val = target_val[0]
+            with np.errstate(invalid='ignore'):
+                mask = values > target_val if compare == '>' else values < target_val
+        elif compare == 'between':
+            if target_type != 'values':
+                raise VectorizedUnsupportedError("'between' は values との比較のみ対応しています。")
+            with np.errstate(invalid='ignore'):
+                mask = (target_val[0] < values) & (values < target_val[1])
+        else:
+            return never
+        return self._at_steps(tf, mask)
+
+    def _side_mask(self, trade_type):
+        if not self.params.get('trading_mode', {}).get(f"{trade_type}_enabled", True):
+            return np.zeros(len(self.steps), dtype=bool)
+        conditions = self.params.get('entry_conditions', {}).get(trade_type, [])
+        if not conditions: return np.zeros(len(self.steps), dtype=bool)
+        return np.logical_and.reduce([self._condition_mask(c) for c in conditions])
+
+    def _build_signals(self):
+        volume = self.feeds['short'].volume
+        tradable = self.ready & self._at_steps('short', volume != 0)
+        self.signal_steps = np.flatnonzero(tradable & (self._side_mask('long') | self._side_mask('short')))
+        if self.window is not None:
+            self.signal_steps = self.signal_steps[(self.signal_steps >= self.start_step) & (self.signal_steps < self.end_step)]
+
+    def _atr_key(self, exit_type):
+        cond = self.params.get('exit_conditions', {}).get(exit_type, {})
+        if not cond: return None
+        atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
+        key = self.initializer._get_indicator_key(cond.get('timeframe'), 'atr', atr_params)
+        if key not in self.indicators:
+            raise VectorizedUnsupportedError(f"{exit_type} のATRインジケーターがありません: {key}")
+        return key
+
+    # --- ブローカー相当の処理 ---------------------------------------------------
+
+    def _bar(self, step):
+        feed, b = self.feeds['short'], self.bar0[step]
+        return feed.open[b], feed.high[b], feed.low[b], feed.close[b]
+
+    def _slip_up(self, pmax, price):
+        if not self.slippage: return price
+        pslip = price * (1 + self.slippage)
+        return pslip if pslip <= pmax else pmax
+
+    def _slip_down(self, pmin, price):
+        if not self.slippage: return price
+        pslip = price * (1 - self.slippage)
+        return pslip if pslip >= pmin else pmin
+
+    def _cash_after_open(self, signed_size, price):
+        cash = self.cash - signed_size * price
+        return cash - abs(signed_size) * self.commission * price
+
+    def _indicator_value(self, key, step):
+        tf, values, _ = self.indicators[key]
+        return values[self.positions[tf][step]]
+
+    def _set_exit_prices(self, step, entry_price, is_long):
+        \"\"\"BaseExitSignalGenerator.calculate_and_set_exit_prices と同一。\"\"\"
+        exit_conditions = self.params.get('exit_conditions', {})
+        if self._exit_atr_keys['stop_loss']:
+            atr_val = self._indicator_value(self._exit_atr_keys['stop_loss'], step)
+            if atr_val > 1e-9:
+                self.risk_per_share = atr_val * exit_conditions['stop_loss'].get('params', {}).get('multiplier', 2.0)
+                self.sl_price = entry_price - self.risk_per_share if is_long else entry_price + self.risk_per_share
+        if self._exit_atr_keys['take_profit']:
+            atr_val = self._indicator_value(self._exit_atr_keys['take_profit'], step)
+            multiplier = exit_conditions['take_profit'].get('params', {}).get('multiplier', 5.0)
+            if atr_val > 1e-9:
+                self.tp_price = entry_price + atr_val * multiplier if is_long else entry_price - atr_val * multiplier
+
+    def _entry_size(self, step, is_long):
+        \"\"\"BaseOrderManager.place_entry_order と同じサイジング。エントリーしない場合は None。\"\"\"
+        entry_price = self._bar(step)[3]
+        self._set_exit_prices(step, entry_price, is_long)
+        if self.risk_per_share < 1e-9 and self.method == 'risk_based': return None
+        cash, max_investment = self.cash, self.sizing.get('max_investment_per_trade', 1e7)
+        if self.method == 'risk_based':
+            size1 = (cash * self.sizing.get('risk_based', {}).get('risk_per_trade', 0.01)) / self.risk_per_share
+        elif self.method == 'kelly_criterion':
+            # バックテストでは統計情報がないため、固定f値以外は f=0 (エントリーなし) となる
+            kelly_params = self.sizing.get('kelly_criterion', {})
+            f_value = kelly_params.get('fixed_f_value', 0.1) if kelly_params.get('f_value_source', 'adjusted') == 'fixed' else 0.0
+            max_f_value_cap = kelly_params.get('max_f_value_cap', 0.25)
+            if f_value > max_f_value_cap: f_value = max_f_value_cap
+            if f_value <= 0 or entry_price <= 0: return None
+            size1 = (cash * f_value) / entry_price
+        else:
+            return None
+        if entry_price <= 0: return None
+        size = min(size1, max_investment / entry_price)
+        return size if size > 0 else None
+
+    def _find_exit(self, fill_step, is_long):
+        \"\"\"
+        エントリー約定後の StopTrail (と任意の Limit) が約定するステップと価格を返す。
+        約定しない場合は (None, None)。ストップ価格の切り上げはチャンク内で累積最大/最小として評価する。
+        \"\"\"
+        n, feed = self.end_step, self.feeds['short']
+        trail = self.risk_per_share
+        stop = None
+        if trail > 0:
+            close = self._bar(fill_step)[3]
+            stop = close - trail if is_long else close + trail
+        limit = self.tp_price if self.transmit_take_profit and self.tp_price != 0 else None
+        if stop is None and limit is None: return None, None
+
+        start = fill_step + 1
+        while start < n:
+            end = min(n, start + EXIT_SEARCH_CHUNK)
+            bars = self.bar0[start:end]
+            o, h, l, c = feed.open[bars], feed.high[bars], feed.low[bars], feed.close[bars]
+            hit_limit = np.zeros(len(bars), dtype=bool)
+            hit_stop = np.zeros(len(bars), dtype=bool)
+            if limit is not None:
+                hit_limit = (limit <= o) | (limit <= h) if is_long else (limit >= o) | (limit >= l)
+            if stop is not None:
+                if is_long:
+                    levels = np.maximum.accumulate(np.concatenate(([stop], c - trail)))
+                    hit_stop = (o <= levels[:-1]) | (l <= levels[:-1])
+                else:
+                    levels = np.minimum.accumulate(np.concatenate(([stop], c + trail)))
+                    hit_stop = (o >= levels[:-1]) | (h >= levels[:-1])
+            hits = np.flatnonzero(hit_limit | hit_stop)
+            if len(hits):
+                i = hits[0]
+                po, ph, pl = o[i], h[i], l[i]
+                if hit_limit[i]:
+                    if is_long: price = self._slip_down(limit, po) if limit <= po else limit
+                    else: price = self._slip_up(min(ph, limit), po) if limit >= po else limit
+                else:
+                    level = levels[i]
+                    if is_long: price = self._slip_down(pl, po) if po <= level else self._slip_down(pl, level)
+                    else: price = self._slip_up(ph, po) if po >= level else self._slip_up(ph, level)
+                return start + i, price
+            if stop is not None: stop = levels[-1]
+            start = end
+        return None, None
+
+    # --- 実行 -------------------------------------------------------------------
+
+    def _timestamp(self, step):
+        \"\"\"Backtraderの日時 (float) を経由した naive datetime。TradeList と同じ丸めにする。\"\"\"
+        dt = pd.Timestamp(int(self.feeds['short'].datetime[self.bar0[step]])).to_pydatetime()
+        return bt.num2date(bt.date2num(dt)).replace(tzinfo=None)
+
+    def run(self):
+        n, step = self.end_step, self.start_step
+        while True:
+            k = np.searchsorted(self.signal_steps, step)
+            if k == len(self.signal_steps): break
+            signal_step = int(self.signal_steps[k])
+            self.clock.step = signal_step
+            trade_type, reason = self.signal_generator.check_entry_signal(self.params)
+            step = signal_step + 1
+            if not trade_type: continue
+            is_long = trade_type == 'long'
+            size = self._entry_size(signal_step, is_long)
+            if size is None: continue
+            signed_size = size if is_long else -size
+
+            # 発注の翌ステップで証拠金チェック (終値基準)、短期足が次のバーに進んだステップで始値約定
+            if step >= n: break
+            if self._cash_after_open(signed_size, self._bar(signal_step)[3]) < 0:
+                self.tp_price, self.sl_price = 0.0, 0.0
+                continue
+            fill_step = int(np.searchsorted(self.bar0, self.bar0[signal_step], side='right'))
+            if fill_step >= n: break
+            po, ph, pl, _ = self._bar(fill_step)
+            entry_price = self._slip_up(ph, po) if is_long else self._slip_down(pl, po)
+            cash = self._cash_after_open(signed_size, entry_price)
+            if cash < 0:
+                self.tp_price, self.sl_price, step = 0.0, 0.0, fill_step
+                continue
+            self.cash = cash
+            self.opened_count += 1
+            entry = {'reason': reason, 'step': fill_step, 'price': entry_price, 'size': signed_size,
+                     'tp_price': self.tp_price, 'sl_price': self.sl_price, 'risk_per_share': self.risk_per_share}
+
+            exit_step, exit_price = self._find_exit(fill_step, is_long)
+            if exit_step is None:
+                self._record_open_at_end(entry)
+                break
+            self._record_close(entry, exit_step, exit_price)
+            step = exit_step
+        return self.trades
+
+    def _record_close(self, entry, exit_step, exit_price):
+        signed_size, entry_price = entry['size'], entry['price']
+        # ブローカーの現金 (ポジション価格基準) と Trade の損益 (平均取得価格基準) をそれぞれ再現する
+        closed_value = signed_size * entry_price
+        self.cash += closed_value + signed_size * (exit_price - entry_price) * 1.0
+        self.cash -= abs(signed_size) * self.commission * exit_price
+        trade_price = (0.0 + signed_size * entry_price) / signed_size
+        pnl = signed_size * (exit_price - trade_price) * 1.0
+        commission = 0.0 + abs(signed_size) * self.commission * entry_price + abs(signed_size) * self.commission * exit_price
+        pnlcomm = pnl - commission
+        self.closed_pnlcomm.append(pnlcomm)
+
+        size = abs(signed_size)
+        tp_price = entry['tp_price']
+        self.trades.append({
+            '銘柄': self.symbol, '方向': 'BUY' if signed_size > 0 else 'SELL', '数量': size,
+            'エントリー価格': trade_price, 'エントリー日時': self._timestamp(entry['step']).isoformat(), 'エントリー根拠': entry['reason'],
+            '決済価格': trade_price + pnl / size, '決済日時': self._timestamp(exit_step).isoformat(),
+            '決済根拠': "Take Profit" if pnlcomm >= 0 else "Stop Loss",
+            '一株当たり損益': pnl / size, '損益': pnl, '損益(手数料込)': pnlcomm,
+            'ストップロス価格': entry['sl_price'], 'テイクプロフィット価格': tp_price, '許容損失幅': entry['risk_per_share'],
+            '目標利益幅': abs(tp_price - trade_price) if tp_price > 0 else 0.0})
+
+    def _record_open_at_end(self, entry):
+        \"\"\"TradeList.stop() と同じく、未決済ポジションを最終バーの終値で記録する。\"\"\"
+        signed_size, entry_price = entry['size'], entry['price']
+        last_step = self.end_step - 1
+        exit_price = self._bar(last_step)[3]
+        pnl = (exit_price - entry_price) * signed_size
+        commission = (abs(signed_size) * entry_price * self.commission) + (abs(signed_size) * exit_price * self.commission)
+        self.trades.append({
+            '銘柄': self.symbol, '方向': 'BUY' if signed_size > 0 else 'SELL', '数量': abs(signed_size),
+            'エントリー価格': entry_price, 'エントリー日時': self._timestamp(entry['step']).isoformat(), 'エントリー根拠': entry['reason'],
+            '決済価格': exit_price, '決済日時': self._timestamp(last_step).isoformat(), '決済根拠': "End of Backtest",
+            '一株当たり損益': (exit_price - entry_price) * (1 if signed_size > 0 else -1), '損益': pnl, '損益(手数料込)': pnl - commission,
+            'ストップロス価格': self.sl_price, 'テイクプロフィット価格': self.tp_price, '許容損失幅': self.risk_per_share,
+            '目標利益幅': abs(self.tp_price - entry_price) if self.tp_price > 0 else 0.0})
+
+    def stats(self):
+        \"\"\"run_backtest_for_symbol が返す統計 (TradeAnalyzer 相当) を生成する。\"\"\"
+        closed = self.closed_pnlcomm
+        won = [p for p in closed if p >= 0.0]
+        return {
+            'symbol': self.symbol,
+            'pnl_net': sum(closed, 0.0) if closed else 0,
+            'gross_won': sum(won, 0.0) if closed else 0,
+            'gross_lost': sum((p for p in closed if p < 0.0), 0.0) if closed else 0,
+            'total_trades': self.opened_count,
+            'win_trades': len(won)
+        }
+
+
+def load_feeds(symbol, base_filepath, strategy_params):
+    \"\"\"バーストアから {時間足: Feed} を生成する。ファイルがない・空の場合はNone。\"\"\"
+    try:
+        files = find_feed_files(symbol, base_filepath, strategy_params)
+    except (KeyError, AttributeError) as e:
+        raise VectorizedUnsupportedError(f"時間足の設定を解釈できません: {e}") from e
+    if files is None:
+        logger.error(f"[{symbol}] のデータフィード準備に失敗。")
+        return None
+    feeds = {}
+    for tf, filepath in files.items():
+        bars = bar_store.load_bars(filepath)
+        if len(bars) == 0:
+            logger.warning(f"データファイルが空です: {filepath}")
+            logger.error(f"[{symbol}] のデータフィード準備に失敗。")
+            return None
+        feeds[tf] = Feed(bars)
+    return feeds
+
+
+def run_vectorized_backtest_for_symbol(symbol, base_filepath, strategy_params, indicator_cache=None, transmit_take_profit=False):
+    \"\"\"
+    run_backtest_for_symbol と同じ戻り値 (stats, start_date, end_date, trade_list) を返す。
+    ベクトル化できない戦略定義・データの場合は VectorizedUnsupportedError を送出する。
+    \"\"\"
+    logger.info(f"▼▼▼ ベクトル化バックテスト実行中: {symbol} ▼▼▼")
+    base_bars = bar_store.load_bars(base_filepath)
+    start_date, end_date = base_bars.start, base_bars.end
+    feeds = load_feeds(symbol, base_filepath, strategy_params)
+    if feeds is None:
+        return None, None, None, None
+
+    backtest = VectorizedBacktest(symbol, feeds, strategy_params, indicator_cache, transmit_take_profit)
+    trade_list = backtest.run()
+    return backtest.stats(), start_date, end_date, trade_list""",
+
+    "src/backtest/portfolio.py": """import heapq
+import logging
+import numpy as np
+import pandas as pd
+
+from src.core import bar_store
+from . import config_backtest as config
+from . import report as report_generator
+from .run_backtest import TRADE_HISTORY_COLUMNS, build_detail_row
+from .vectorized import VectorizedBacktest, VectorizedUnsupportedError, load_feeds
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ポートフォリオ・バックテスト
+# 全銘柄を1つのブローカー (共有の資金・同時保有数の上限) で取引する。
+# リアルタイム取引 (RealtimeTrader) が Excel の1つの買付余力を全銘柄で共有するのと同じ条件で、
+# 資金の取り合いと同時保有数の上限を含めた成績を求める。
+#
+# - 銘柄ごとのシグナル・約定価格・決済 (StopTrail) はベクトル化エンジンと同じ計算を使い、
+#   銘柄ごとに Cerebro を作らない。
+# - 各銘柄は「シグナル → 証拠金チェック → 約定 → 決済」の状態を持ち、次に起きるイベントだけを
+#   タイムスタンプ順のヒープに積む。全銘柄のイベントを1本の時系列にマージして処理するため、
+#   バーごとではなくイベントの数に比例した時間で数百銘柄を処理できる。
+# - 同じ時刻のイベントは 決済 → 証拠金チェック → 約定 → シグナル の順 (同順位は銘柄順) に処理する。
+#   決済で戻った資金はその時刻の約定・サイジングから使える。
+# - 発注中の注文も保有数に含め、上限に達している間のシグナルは見送る。
+# - サイジング (risk_based / kelly_criterion の fixed) は共有資金の残高を基準にする。
+# - ベクトル化できない戦略定義の銘柄は対象外とする。(cerebro 経路はない)
+# ==============================================================================
+
+_EXIT, _SUBMIT, _FILL, _SIGNAL = range(4)
+
+
+class PortfolioBroker:
+    \"\"\"全銘柄で共有する資金と保有枠。\"\"\"
+
+    def __init__(self, cash, max_positions=None):
+        self.cash = float(cash)
+        self.max_positions = max_positions
+        self.slots_used = 0          # 保有中 + 発注中の銘柄数
+        self.open_cost = 0.0         # 保有中ポジションの取得価格ベースの建玉 (符号付き)
+        self.max_slots_used = 0
+        self.skipped_by_limit = 0
+        self.skipped_by_cash = 0
+
+    def has_slot(self):
+        return self.max_positions is None or self.slots_used < self.max_positions
+
+    def acquire(self):
+        self.slots_used += 1
+        self.max_slots_used = max(self.max_slots_used, self.slots_used)
+
+    def release(self):
+        self.slots_used -= 1
+
+    @property
+    def equity(self):
+        \"\"\"確定資産 (現金 + 保有ポジションの取得価格)。\"\"\"
+        return self.cash + self.open_cost
+
+
+class _SymbolBook(VectorizedBacktest):
+    \"\"\"共有ブローカーの資金で取引する1銘柄分の状態。cash の読み書きはブローカーに委譲する。\"\"\"
+
+    def __init__(self, broker, symbol, feeds, strategy_params):
+        self.broker = broker
+        self.open_entry = None
+        super().__init__(symbol, feeds, strategy_params)
+
+    @property
+    def cash(self):
+        return self.broker.cash
+
+    @cash.setter
+    def cash(self, value):
+        # 基底クラスの初期化で代入される INITIAL_CAPITAL は PortfolioBacktest が共有資金で上書きする
+        self.broker.cash = value
+
+    def next_signal(self, step):
+        \"\"\"step 以降で最初のシグナルのステップ。なければNone。\"\"\"
+        k = np.searchsorted(self.signal_steps, step)
+        return int(self.signal_steps[k]) if k < len(self.signal_steps) else None
+
+
+class PortfolioBacktest:
+    \"\"\"
+    全銘柄のイベントを時系列にマージし、共有ブローカーで取引する。
+    books: [(銘柄, 戦略パラメータ, {時間足: Feed})] を銘柄順に渡す。
+    \"\"\"
+
+    def __init__(self, books, initial_capital=None, max_positions=None):
+        self.initial_capital = float(config.PORTFOLIO_INITIAL_CAPITAL if initial_capital is None else initial_capital)
+        self.broker = PortfolioBroker(self.initial_capital, max_positions)
+        self.books, self.unsupported = [], []
+        for symbol, strategy_params, feeds in books:
+            try:
+                self.books.append(_SymbolBook(self.broker, symbol, feeds, strategy_params))
+            except VectorizedUnsupportedError as e:
+                logger.warning(f"[{symbol}] ベクトル化できないためポートフォリオから除外します: {e}")
+                self.unsupported.append(symbol)
+        self.broker.cash = self.initial_capital
+        self.equity_curve = []
+        self._heap = []
+
+    # --- イベント ---------------------------------------------------------------
+
+    def _push(self, kind, book_index, step, payload=None):
+        # 1銘柄につき予定イベントは常に1つなので (時刻, 種別, 銘柄番号) で順序が決まる
+        book = self.books[book_index]
+        heapq.heappush(self._heap, (int(book.steps[step]), kind, book_index, step, payload))
+
+    def _schedule_signal(self, book_index, step):
+        signal_step = self.books[book_index].next_signal(step)
+        if signal_step is not None and signal_step < self.books[book_index].end_step:
+            self._push(_SIGNAL, book_index, signal_step)
+
+    def _on_signal(self, i, book, step, _):
+        book.clock.step = step
+        trade_type, reason = book.signal_generator.check_entry_signal(book.params)
+        if not trade_type:
+            return self._schedule_signal(i, step + 1)
+        if not self.broker.has_slot():
+            self.broker.skipped_by_limit += 1
+            return self._schedule_signal(i, step + 1)
+        is_long = trade_type == 'long'
+        size = book._entry_size(step, is_long)
+        if size is None:
+            return self._schedule_signal(i, step + 1)
+        if step + 1 >= book.end_step: return
+        self.broker.acquire()
+        self._push(_SUBMIT, i, step + 1, (step, is_long, reason, size if is_long else -size))
+
+    def _reject(self, i, book, resume_step):
+        book.tp_price, book.sl_price = 0.0, 0.0
+        self.broker.release()
+        self.broker.skipped_by_cash += 1
+        self._schedule_signal(i, resume_step)
+
+    def _on_submit(self, i, book, step, order):
+        # 発注の翌ステップで証拠金チェック (シグナル足の終値基準)
+        signal_step, _, _, signed_size = order
+        if book._cash_after_open(signed_size, book._bar(signal_step)[3]) < 0:
+            return self._reject(i, book, step)
+        fill_step = int(np.searchsorted(book.bar0, book.bar0[signal_step], side='right'))
+        if fill_step >= book.end_step:
+            return self.broker.release()
+        self._push(_FILL, i, fill_step, order)
+
+    def _on_fill(self, i, book, step, order):
+        _, is_long, reason, signed_size = order
+        po, ph, pl, _ = book._bar(step)
+        entry_price = book._slip_up(ph, po) if is_long else book._slip_down(pl, po)
+        cash = book._cash_after_open(signed_size, entry_price)
+        if cash < 0:
+            return self._reject(i, book, step)
+        self.broker.cash = cash
+        self.broker.open_cost += signed_size * entry_price
+        book.opened_count += 1
+        entry = {'reason': reason, 'step': step, 'price': entry_price, 'size': signed_size,
+                 'tp_price': book.tp_price, 'sl_price': book.sl_price, 'risk_per_share': book.risk_per_share}
+        self._record_equity(book, step)
+
+        exit_step, exit_price = book._find_exit(step, is_long)
+        if exit_step is None:
+            book.open_entry = entry  # 終了時に最終バーの終値で評価する (保有枠も返さない)
+            return
+        self._push(_EXIT, i, exit_step, (entry, exit_price))
+
+    def _on_exit(self, i, book, step, payload):
+        entry, exit_price = payload
+        book._record_close(entry, step, exit_price)
+        self.broker.open_cost -= entry['size'] * entry['price']
+        self.broker.release()
+        self._record_equity(book, step)
+        self._schedule_signal(i, step)
+
+    def _record_equity(self, book, step):
+        self.equity_curve.append((book._timestamp(step), self.broker.cash, self.broker.equity, self.broker.slots_used))
+
+    # --- 実行 -------------------------------------------------------------------
+
+    def run(self):
+        \"\"\"全イベントを処理し、全銘柄の取引リスト (決済日時順) を返す。\"\"\"
+        handlers = {_EXIT: self._on_exit, _SUBMIT: self._on_submit, _FILL: self._on_fill, _SIGNAL: self._on_signal}
+        for i, book in enumerate(self.books):
+            self._schedule_signal(i, book.start_step)
+        processed = 0
+        while self._heap:
+            _, kind, i, step, payload = heapq.heappop(self._heap)
+            handlers[kind](i, self.books[i], step, payload)
+            processed += 1
+        for book in self.books:
+            if book.open_entry is not None: book._record_open_at_end(book.open_entry)
+        logger.info(f"ポートフォリオ: {len(self.books)}銘柄・{processed}イベントを処理しました。")
+
+        trades = [trade for book in self.books for trade in book.trades]
+        return sorted(trades, key=lambda t: (t['決済日時'], t['銘柄']))
+
+    def final_equity(self):
+        \"\"\"最終資産 (現金 + 未決済ポジションを各銘柄の最終バーの終値で評価)。\"\"\"
+        value = self.broker.cash
+        for book in self.books:
+            if book.open_entry is not None:
+                value += book.open_entry['size'] * book._bar(book.end_step - 1)[3]
+        return value
+
+    def max_drawdown(self):
+        \"\"\"確定資産の推移から求めた最大ドローダウン (割合)。\"\"\"
+        equity = np.array([self.initial_capital] + [e for _, _, e, _ in self.equity_curve])
+        peak = np.maximum.accumulate(equity)
+        return float(np.max((peak - equity) / peak)) if len(equity) else 0.0
+
+    # --- レポート ---------------------------------------------------------------
+
+    def build_summary(self, strategy_params, start_date, end_date):
+        \"\"\"generate_report と同じ項目に、ポートフォリオ全体の資金・保有数の項目を加える。\"\"\"
+        summary_df = report_generator.generate_report([book.stats() for book in self.books], strategy_params, start_date, end_date)
+        summary_df.loc[summary_df['項目'] == '初期資金', '結果'] = f"¥{self.initial_capital:,.0f}"
+        final_equity = self.final_equity()
+        max_positions = self.broker.max_positions
+        extra = pd.DataFrame({
+            '項目': ["---", "銘柄数", "最終資産", "リターン", "最大ドローダウン (確定資産)", "同時保有上限", "最大同時保有数",
+                     "見送り (同時保有上限)", "見送り (資金不足)"],
+            '結果': ["---", len(self.books), f"¥{final_equity:,.0f}", f"{final_equity / self.initial_capital - 1:.2%}",
+                     f"{self.max_drawdown():.2%}", max_positions if max_positions is not None else "なし", self.broker.max_slots_used,
+                     self.broker.skipped_by_limit, self.broker.skipped_by_cash]})
+        return pd.concat([summary_df, extra], ignore_index=True)
+
+    def build_detail(self):
+        return pd.DataFrame([build_detail_row(book.symbol, book.stats()) for book in self.books])
+
+    def build_trade_history(self, trades):
+        return pd.DataFrame(trades, columns=TRADE_HISTORY_COLUMNS)
+
+    def build_equity_curve(self):
+        return pd.DataFrame(self.equity_curve, columns=['日時', '現金', '確定資産', '保有数'])
+
+
+def build_books(symbol_params, data_dir=None):
+    \"\"\"
+    [(銘柄, ベースCSVパス, 戦略パラメータ)] からバーストア経由でフィードを読み込み、
+    PortfolioBacktest に渡す [(銘柄, 戦略パラメータ, フィード)] と分析期間を返す。
+    \"\"\"
+    books, start_dates, end_dates = [], [], []
+    for symbol, base_filepath, strategy_params in symbol_params:
+        try:
+            feeds = load_feeds(symbol, base_filepath, strategy_params)
+        except VectorizedUnsupportedError as e:
+            logger.warning(f"[{symbol}] ベクトル化できないためポートフォリオから除外します: {e}")
+            continue
+        if feeds is None: continue
+        base_bars = bar_store.load_bars(base_filepath)
+        start_dates.append(base_bars.start); end_dates.append(base_bars.end)
+        books.append((symbol, strategy_params, feeds))
+    period = (min(start_dates), max(end_dates)) if start_dates else (None, None)
+    return books, period""",
+
+    "src/backtest/run_portfolio.py": """import os
+import copy
+import glob
+import yaml
+import argparse
+import logging
+import pandas as pd
+from datetime import datetime
+
+from src.core.util import logger as logger_setup
+from . import config_backtest as config
+from .run_backtest import find_base_files
+from .portfolio import PortfolioBacktest, build_books
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+# 全銘柄を1つの資金で取引するポートフォリオ・バックテストを実行します。
+# `python -m src.backtest.run_portfolio [--capital N] [--max-positions N] [--recommend [FILE]]`
+# --recommend を指定すると、評価の all_recommend で銘柄ごとに選ばれた戦略で取引します。
+# (リアルタイム取引と同じ戦略の割り当て)
+# ------------------------------------------------------------------------------
+
+RECOMMEND_FILE_PATTERN = os.path.join(config.BASE_DIR, 'results', 'evaluation', '*', 'all_recommend_*.csv')
+
+
+def _load_yaml(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f: return yaml.safe_load(f)
+
+
+def load_symbol_params(strategy_params, recommend_file=None):
+    \"\"\"[(銘柄, ベースCSVパス, 戦略パラメータ)] を返す。recommend_file がなければ全銘柄で strategy_params を使う。\"\"\"
+    base_files = {os.path.basename(f).split('_')[0]: f for f in find_base_files(strategy_params)}
+    if recommend_file is None:
+        return [(symbol, filepath, strategy_params) for symbol, filepath in sorted(base_files.items())]
+
+    # CerebroFactory と同じく、ベース設定にカタログの戦略定義を重ねる
+    catalog = {item['name']: item for item in _load_yaml(os.path.join(config.BASE_DIR, 'config', 'strategy_catalog.yml'))}
+    recommend_df = pd.read_csv(recommend_file)
+    symbol_params = []
+    for _, row in recommend_df.iterrows():
+        symbol, strategy_name = str(row['銘柄']), row['戦略名']
+        if symbol not in base_files or strategy_name not in catalog:
+            logger.warning(f"[{symbol}] ベースデータまたは戦略 '{strategy_name}' の定義が見つからないためスキップします。")
+            continue
+        params = copy.deepcopy(strategy_params)
+        params.update(copy.deepcopy(catalog[strategy_name]))
+        params['strategy_name'] = strategy_name
+        symbol_params.append((symbol, base_files[symbol], params))
+    return sorted(symbol_params, key=lambda item: item[0])
+
+
+def main(capital=None, max_positions=None, recommend_file=None):
+    logger.info("--- ポートフォリオ・バックテスト開始 ---")
+    strategy_params = _load_yaml(os.path.join(config.BASE_DIR, 'config', 'strategy_base.yml'))
+    symbol_params = load_symbol_params(strategy_params, recommend_file)
+    books, (start_date, end_date) = build_books(symbol_params)
+    if not books:
+        logger.error(f"{config.DATA_DIR} に取引可能な銘柄がありません。")
+        return
+
+    portfolio = PortfolioBacktest(books, capital, max_positions)
+    trades = portfolio.run()
+    if recommend_file is not None:
+        strategy_params = dict(strategy_params, strategy_name=f"Portfolio (recommend: {os.path.basename(recommend_file)})")
+
+    output_dir = os.path.join(config.RESULTS_DIR, 'portfolio')
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    summary_df = portfolio.build_summary(strategy_params, start_date, end_date)
+    outputs = {
+        'summary': summary_df,
+        'detail': portfolio.build_detail(),
+        'trade_history': portfolio.build_trade_history(trades),
+        'equity': portfolio.build_equity_curve(),
+    }
+    for name, df in outputs.items():
+        df.to_csv(os.path.join(output_dir, f"portfolio_{name}_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+    logger.info(f"ポートフォリオ・バックテストの結果を '{output_dir}' に保存しました。")
+    logger.info("\\n\\n★★★ ポートフォリオ・バックテストサマリー ★★★\\n" + summary_df.to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='全銘柄を1つの資金で取引するポートフォリオ・バックテストを実行します。')
+    parser.add_argument('--capital', type=float, default=None, help=f"共有の初期資金 (既定: {config.PORTFOLIO_INITIAL_CAPITAL:,})")
+    parser.add_argument('--max-positions', type=int, default=config.PORTFOLIO_MAX_POSITIONS,
+                        help=f"同時保有数の上限。0 で上限なし (既定: {config.PORTFOLIO_MAX_POSITIONS})")
+    parser.add_argument('--recommend', nargs='?', const='latest', default=None, metavar='FILE',
+                        help='all_recommend の戦略割り当てで取引する。ファイル省略時は最新の評価結果を使用')
+    args = parser.parse_args()
+    logger_setup.setup_logging(config.LOG_DIR, log_prefix='portfolio', level=config.LOG_LEVEL)
+    recommend_file = args.recommend
+    if recommend_file == 'latest':
+        files = glob.glob(RECOMMEND_FILE_PATTERN)
+        if not files: raise FileNotFoundError(f"推奨戦略ファイルが見つかりません: {RECOMMEND_FILE_PATTERN}")
+        recommend_file = max(files, key=os.path.getctime)
+    main(args.capital, args.max_positions or None, recommend_file)"""
 }
 
 
@@ -3,14 +3,10 @@ import os
 # ==============================================================================
 # ファイル: create_core.py
 # 実行方法: python create_core.py
-# Ver. 00-46
+# Ver. 00-62
 # 変更点:
 #   - src/core/util/notifier.py:
-#     - メール送信をキューイング方式に変更。
-#     - 専用のワーカースレッドが一定間隔でメールを送信するロジックを実装。
-#       これにより、Gmailのレート制限エラーを完全に回避する。
-#   - src/core/strategy.py:
-#     - _send_notificationを、新しいキューイング方式のnotifierを呼び出すよう修正。
+#     - stop_notifier の不要な global 宣言 (_smtp_server) を削除。(接続のリセットは _close_server が行う)
 # ==============================================================================
 
 project_files = {
@@ -18,8 +14,10 @@ project_files = {
 
     "src/core/util/__init__.py": """""",
 
-    "src/core/indicators.py": """import backtrader as bt
+    "src/core/indicators.py": """import array
+import backtrader as bt
 import collections
+import numpy as np
 
 # ▼▼▼【変更箇所: SafeStochasticを完全に新しい堅牢な実装に置換】▼▼▼
 class SafeStochastic(bt.Indicator):
@@ -63,6 +61,25 @@ class SafeStochastic(bt.Indicator):
         self.lines.percK = self.p.movav(percK_raw, period=self.p.period_dfast)
         self.lines.percD = self.p.movav(self.lines.percK, period=self.p.period_dslow)
 
+# ▼▼▼【変更箇所: once() を追加し、runonce モードでも配列全体で計算する】▼▼▼
+# Backtrader は next() だけを持つインジケーターを runonce モードでも once_via_next で1バーずつ処理する。
+# once() を定義すると、Cerebro の once モードでは配列の範囲 [start, end) をまとめて計算できる。
+# (next() はライブ取引 (runonce=False) 用に残す。両者の出力は同一)
+# next モードでは、データ (上位足) が進んでいないバーでも next() が呼ばれる。Python 側に状態を持つため、
+# データが進んだバーだけを処理する。(once モード・ベクトル化エンジンと同じく、自分の時間足の1本につき1回)
+# 計算結果を next() と1ビットも違わないようにするため、要素ごとの演算は numpy で行い、
+# 前の値に依存する平滑化・累積は同じ順序の演算で計算する。
+
+def _line_array(line):
+    \"\"\"ラインのバッファを float64 の配列としてコピーする。\"\"\"
+    return np.array(line.array, dtype=np.float64)
+
+
+def _write_line(line, start, values):
+    \"\"\"values をラインのバッファの start 以降に書き込む。\"\"\"
+    line.array[start:start + len(values)] = array.array('d', np.asarray(values, dtype=np.float64).tobytes())
+
+
 class VWAP(bt.Indicator):
     lines = ('vwap',)
     plotinfo = dict(subplot=False)
@@ -71,8 +88,13 @@ class VWAP(bt.Indicator):
         self.tp = (self.data.high + self.data.low + self.data.close) / 3.0
         self.cumulative_tpv = 0.0
         self.cumulative_volume = 0.0
+        self._last_len = 0
 
     def next(self):
+        # next モードでは上位足のデータが進んでいないバーでも next() が呼ばれるため、同じバーを二重に累積しない
+        if len(self) == self._last_len:
+            return
+        self._last_len = len(self)
         if len(self) == 1:
             return
         if self.data.datetime.date(0) != self.data.datetime.date(-1):
@@ -87,6 +109,39 @@ class VWAP(bt.Indicator):
         else:
             self.lines.vwap[0] = self.tp[0]
 
+    def _day_keys(self):
+        \"\"\"各バーの日付を比較用のキーにする。(タイムゾーン指定がなければ日付番号の整数部 = 日付)\"\"\"
+        dt_line = self.data.datetime
+        if dt_line._tz is None:
+            return _line_array(dt_line).astype(np.int64)
+        return np.array([dt_line.date(i - dt_line.idx).toordinal() for i in range(len(dt_line.array))])
+
+    def once(self, start, end):
+        lo = max(start, 1)  # next() と同じく先頭バーは計算しない
+        if lo >= end:
+            return
+        tp = _line_array(self.tp)[lo:end]
+        volume = _line_array(self.data.volume)[lo:end]
+        days = self._day_keys()
+        tpv = tp * volume
+
+        # 日付が変わるバーで累積をリセットする。区間内の累積は np.cumsum (先頭から順に加算) で計算する
+        cuts = np.flatnonzero(days[lo:end] != days[lo - 1:end - 1]).tolist()
+        out = np.empty(end - lo)
+        cum_tpv, cum_volume = self.cumulative_tpv, self.cumulative_volume
+        for k, (a, b) in enumerate(zip([0] + cuts, cuts + [end - lo])):
+            if k > 0:
+                cum_tpv = cum_volume = 0.0
+            if a == b:
+                continue
+            seg_tpv = np.cumsum(np.r_[cum_tpv, tpv[a:b]])[1:]
+            seg_volume = np.cumsum(np.r_[cum_volume, volume[a:b]])[1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[a:b] = np.where(seg_volume > 0, seg_tpv / seg_volume, tp[a:b])
+            cum_tpv, cum_volume = seg_tpv[-1], seg_volume[-1]
+        self.cumulative_tpv, self.cumulative_volume = float(cum_tpv), float(cum_volume)
+        _write_line(self.lines.vwap, lo, out)
+
 class SafeADX(bt.Indicator):
     lines = ('adx', 'plusDI', 'minusDI',)
     params = (('period', 14),)
@@ -101,11 +156,16 @@ class SafeADX(bt.Indicator):
         self.minus_di = 0.0
         self.adx = 0.0
         self.dx_history = collections.deque(maxlen=self.p.period)
+        self._last_len = 0
 
     def _wilder_smooth(self, prev_val, current_val):
         return prev_val - (prev_val / self.p.period) + current_val
 
     def next(self):
+        # データが進んでいないバー (上位足の途中) では平滑化を重ねない
+        if len(self) == self._last_len:
+            return
+        self._last_len = len(self)
         high, low, close = self.data.high[0], self.data.low[0], self.data.close[0]
         prev_high, prev_low, prev_close = self.data.high[-1], self.data.low[-1], self.data.close[-1]
 
@@ -138,6 +198,60 @@ class SafeADX(bt.Indicator):
                 self.adx = (self.adx * (self.p.period - 1) + dx) / self.p.period
         self.lines.adx[0] = self.adx
 
+    def _wilder_series(self, prev_val, values):
+        \"\"\"_wilder_smooth を values に順に適用した系列。\"\"\"
+        out, period = [], self.p.period
+        for current_val in values:
+            prev_val = prev_val - (prev_val / period) + current_val
+            out.append(prev_val)
+        return out
+
+    def once(self, start, end):
+        if start >= end:
+            return
+        period = self.p.period
+        high, low, close = (_line_array(line) for line in (self.data.high, self.data.low, self.data.close))
+        idx = np.arange(start, end)
+        h, l = high[idx], low[idx]
+        # next() と同じく [-1] は直前のバー (先頭バーではバッファ末尾) を参照する
+        prev_high, prev_low, prev_close = high[idx - 1], low[idx - 1], close[idx - 1]
+
+        # max(a, b, c) と同じ比較順序 (NaN の扱いも含めて一致させる)
+        current_tr = h - l
+        for candidate in (np.abs(h - prev_close), np.abs(l - prev_close)):
+            current_tr = np.where(candidate > current_tr, candidate, current_tr)
+        move_up, move_down = h - prev_high, prev_low - l
+        current_plus_dm = np.where((move_up > move_down) & (move_up > 0), move_up, 0.0)
+        current_minus_dm = np.where((move_down > move_up) & (move_down > 0), move_down, 0.0)
+
+        tr = np.array(self._wilder_series(self.tr, current_tr.tolist()))
+        plus_dm = np.array(self._wilder_series(self.plus_dm, current_plus_dm.tolist()))
+        minus_dm = np.array(self._wilder_series(self.minus_dm, current_minus_dm.tolist()))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plus_di = np.where(tr > 1e-9, 100.0 * plus_dm / tr, 0.0)
+            minus_di = np.where(tr > 1e-9, 100.0 * minus_dm / tr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum > 1e-9, 100.0 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+
+        # ADX: period 本目で DX の単純平均、以降は Wilder の平滑化
+        dx_list = dx.tolist()
+        history = list(self.dx_history) + dx_list
+        offset, adx, adx_out = len(self.dx_history), self.adx, []
+        for k, bar in enumerate(range(start + 1, end + 1)):  # bar は len(self) に相当
+            if bar == period:
+                adx = sum(history[offset + k - period + 1:offset + k + 1]) / period
+            elif bar > period:
+                adx = (adx * (period - 1) + dx_list[k]) / period
+            adx_out.append(adx)
+
+        self.tr, self.plus_dm, self.minus_dm = float(tr[-1]), float(plus_dm[-1]), float(minus_dm[-1])
+        self.plus_di, self.minus_di, self.adx = float(plus_di[-1]), float(minus_di[-1]), adx
+        self.dx_history.extend(dx_list)
+        _write_line(self.lines.plusDI, start, plus_di)
+        _write_line(self.lines.minusDI, start, minus_di)
+        _write_line(self.lines.adx, start, adx_out)
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 # ▼▼▼【変更箇所: SafeRSIを新規追加】▼▼▼
 class SafeRSI(bt.Indicator):
     \"\"\"
@@ -171,19 +285,20 @@ class SafeRSI(bt.Indicator):
     "src/core/data_preparer.py": """import os
 import glob
 import logging
-import pandas as pd
 import backtrader as bt
+from src.core import bar_store
 
 logger = logging.getLogger(__name__)
 
 def _load_csv_data(filepath, timeframe_str, compression):
     try:
-        df = pd.read_csv(filepath, index_col='datetime', parse_dates=True, encoding='utf-8-sig')
-        if df.empty:
+        # ▼▼▼【変更箇所】CSVの直接パースをやめ、バーストアのパース済みデータを使用 ▼▼▼
+        bars = bar_store.load_bars(filepath)
+        if len(bars) == 0:
             logger.warning(f"データファイルが空です: {filepath}")
             return None
-        df.columns = [x.lower() for x in df.columns]
-        return bt.feeds.PandasData(dataname=df, timeframe=bt.TimeFrame.TFrame(timeframe_str), compression=compression)
+        return bt.feeds.PandasData(dataname=bars.to_dataframe(), timeframe=bt.TimeFrame.TFrame(timeframe_str), compression=compression)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
     except Exception as e:
         logger.error(f"CSV読み込みまたはデータフィード作成で失敗: {filepath} - {e}")
         return None
@@ -272,9 +387,25 @@ import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from .notification_logger import NotificationLogger
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+import re
+from collections import deque
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 logger = logging.getLogger(__name__)
 
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+# --- 既定値 (email_config.yml の同名のキーで上書きできる) ---
+DIGEST_WINDOW = 60                # NORMAL の通知をまとめる時間 (秒)。0 でまとめずに1件ずつ送信する
+DIGEST_GROUP_BY = 'symbol'        # まとめる単位: 'symbol' (件名末尾の括弧内の銘柄) / 'event' (銘柄を除いた件名)
+METRICS_REPORT_INTERVAL = 300     # キューの長さ・配信遅延をログに出力する間隔 (秒)。0 で無効
+IDLE_CHECK_SECONDS = 60           # この秒数以上使っていない接続だけ、送信前に noop で生存を確認する
+MAX_RETRIES = 5                   # 一時的なエラー (4xx: レート制限など) の再試行回数
+BACKOFF_INITIAL, BACKOFF_MAX = 1.0, 60.0
+
+_SYMBOL_PATTERN = re.compile(r'^(.*?)\\s*\\(([^()]+)\\)\\s*$')
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 # --- グローバル変数 ---
 _notification_queue = queue.PriorityQueue()
 _worker_thread = None
@@ -282,70 +413,267 @@ _stop_event = threading.Event()
 _smtp_server = None
 _email_config = None
 _logger_instance = None
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+_last_used = 0.0
+_pending_digest = 0  # まとめ送信待ちの通知数 (ワーカースレッドが更新)
+
+
+class _DeliveryMetrics:
+    \"\"\"配信のメトリクス。遅延は送信リクエストからSMTPサーバーが受理するまでの秒数 (直近1000件)。\"\"\"
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'messages': 0, 'notifications': 0, 'digests': 0, 'failed': 0, 'retries': 0}
+        self.latency = {'URGENT': deque(maxlen=1000), 'NORMAL': deque(maxlen=1000)}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def record(self, priority, seconds):
+        with self._lock:
+            self.latency[priority].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latency = {priority: sorted(samples) for priority, samples in self.latency.items()}
+        stats = {}
+        for priority, samples in latency.items():
+            stats[priority] = None if not samples else {
+                'count': len(samples), 'mean': sum(samples) / len(samples),
+                'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))], 'max': samples[-1]}
+        return counters, stats
+
+
+_metrics = _DeliveryMetrics()
+
+
+def get_metrics():
+    \"\"\"
+    通知配信のメトリクスを返す。
+    - queue_depth: 未送信の通知数 (キュー内 + まとめ送信待ち)
+    - messages / notifications / digests: 送信したメール数 / それに含まれる通知数 / まとめメール数
+    - failed / retries: 送信に失敗した通知数 / 一時的なエラーによる再試行回数
+    - latency: 優先度ごとの配信遅延 {'count', 'mean', 'p99', 'max'} (秒)。送信がなければ None
+    \"\"\"
+    counters, latency = _metrics.snapshot()
+    return {'queue_depth': _notification_queue.qsize() + _pending_digest, **counters, 'latency': latency}
+
+
+def log_metrics():
+    metrics = get_metrics()
+    logger.info(f"Notifier: {metrics['queue_depth']} queued, {metrics['messages']} mails sent "
+                f"({metrics['notifications']} notifications, {metrics['digests']} digests), "
+                f"{metrics['failed']} failed, {metrics['retries']} retries")
+    for priority, stats in metrics['latency'].items():
+        if stats:
+            logger.info(f"Notifier delivery latency ({priority}): {stats['count']} notifications, mean {stats['mean']:.2f} s, "
+                        f"p99 {stats['p99']:.2f} s, max {stats['max']:.2f} s")
+
+
+def _config_value(name, default):
+    return (_email_config or {}).get(name, default)
+
+
+def _close_server():
+    global _smtp_server
+    if _smtp_server:
+        try:
+            _smtp_server.close()
+        except Exception:
+            pass
+    _smtp_server = None
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 def _get_server():
     global _smtp_server, _email_config
     if _email_config is None: _email_config = load_email_config()
     if not _email_config.get("ENABLED"): return None
+    # ▼▼▼【変更箇所: 接続の再利用 (送信ごとの noop をやめ、しばらく使っていない接続だけ確認する)】▼▼▼
     if _smtp_server:
+        if time.monotonic() - _last_used < IDLE_CHECK_SECONDS:
+            return _smtp_server
         try:
             if _smtp_server.noop()[0] == 250: return _smtp_server
-        except smtplib.SMTPServerDisconnected:
-            logger.warning("SMTPサーバーとの接続が切断されました。再接続します。")
-            _smtp_server = None
+        except smtplib.SMTPException:
+            pass
+        logger.warning("SMTPサーバーとの接続が切断されました。再接続します。")
+        _close_server()
     try:
         server_name, server_port = _email_config["SMTP_SERVER"], _email_config["SMTP_PORT"]
         logger.info(f"SMTPサーバーに新規接続します: {server_name}:{server_port}")
         server = smtplib.SMTP(server_name, server_port, timeout=20)
-        server.starttls()
-        server.login(_email_config["SMTP_USER"], _email_config["SMTP_PASSWORD"])
+        if _config_value("USE_TLS", True):
+            server.starttls()
+        if _email_config.get("SMTP_PASSWORD"):
+            server.login(_email_config["SMTP_USER"], _email_config["SMTP_PASSWORD"])
         _smtp_server = server
         return _smtp_server
     except Exception as e:
         logger.critical(f"SMTPサーバーへの接続/ログイン失敗: {e}", exc_info=True)
         return None
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
-def _email_worker():
-    while not _stop_event.is_set():
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+def _is_transient(error):
+    \"\"\"一時的なエラー (4xx: レート制限・一時的な受信拒否など) かどうか。\"\"\"
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+
+def _send_with_retry(msg):
+    \"\"\"
+    1つの接続を使い回して送信する。成功すれば None、失敗すればエラーメッセージを返す。
+    - 接続が切れていた場合は再接続して1回だけすぐに再送する
+    - 一時的なエラー (レート制限など) は BACKOFF_INITIAL 秒から倍々に待って MAX_RETRIES 回まで再送する
+    \"\"\"
+    global _last_used
+    delay, reconnected = BACKOFF_INITIAL, False
+    for attempt in range(MAX_RETRIES + 1):
+        server = _get_server()
+        if not server:
+            return "SMTP Server not available"
         try:
-            # <<< 変更点 1/3: タイムスタンプも受け取るようにアンパック処理を変更
-            priority, timestamp, item = _notification_queue.get(timeout=1)
-            if item is None: break
-
-            record_id = item['record_id']
-            server = _get_server()
-            if not server:
-                if _logger_instance:
-                    _logger_instance.update_status(record_id, "FAILED", "SMTP Server not available")
-                continue
-            
-            msg = MIMEMultipart()
-            msg['From'] = _email_config["SMTP_USER"]
-            msg['To'] = _email_config["RECIPIENT_EMAIL"]
-            msg['Subject'] = item['subject']
-            msg.attach(MIMEText(item['body'], 'plain', 'utf-8'))
+            server.send_message(msg)
+            _last_used = time.monotonic()
+            return None
+        except smtplib.SMTPServerDisconnected as e:
+            _close_server()
+            if reconnected:
+                return str(e)
+            reconnected = True
+            logger.warning(f"SMTPサーバーとの接続が切断されました。再接続して再送します: {e}")
+            continue
+        except Exception as e:
+            if not _is_transient(e):
+                _close_server()
+                return str(e)
+            if getattr(e, 'smtp_code', None) == 421:
+                # 421 の後はサーバーが接続を閉じる
+                _close_server()
+            if attempt == MAX_RETRIES:
+                return str(e)
+            logger.warning(f"SMTPサーバーが一時的に送信を拒否しました。{delay:.0f}秒後に再送します: {e}")
+            _metrics.count('retries')
+            if _stop_event.wait(delay):
+                return f"Retry aborted by shutdown: {e}"
+            delay = min(delay * 2, BACKOFF_MAX)
+    return "SMTP send failed"
+
+
+def _digest_key(subject):
+    \"\"\"まとめる単位のキー。件名が「... (銘柄)」の形でなければ件名そのもの。\"\"\"
+    match = _SYMBOL_PATTERN.match(subject)
+    if not match:
+        return subject
+    return match.group(2) if _config_value("DIGEST_GROUP_BY", DIGEST_GROUP_BY) == 'symbol' else match.group(1)
+
+
+def _build_message(items, digest_key=None):
+    msg = MIMEMultipart()
+    msg['From'] = _email_config["SMTP_USER"]
+    msg['To'] = _email_config["RECIPIENT_EMAIL"]
+    if len(items) == 1:
+        subject, body = items[0]['subject'], items[0]['body']
+    else:
+        subject = f"【まとめ】{digest_key} ({len(items)}件)"
+        separator = "\\n------------------------------------\\n"
+        body = separator.join(f"■ {item['subject']}\\n{item['body']}" for item in items)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    return msg
+
+
+def _deliver(items, digest_key=None):
+    \"\"\"通知 (まとめる場合は複数) を1通のメールで送信し、各通知のステータスを更新する。\"\"\"
+    if not load_email_config().get("ENABLED"):
+        error = "SMTP Server not available"
+    else:
+        logger.info(f"メールを送信中... To: {_email_config['RECIPIENT_EMAIL']} ({len(items)}件)")
+        error = _send_with_retry(_build_message(items, digest_key))
+    now = time.time()
+    for item in items:
+        if _logger_instance:
+            _logger_instance.update_status(item['record_id'], "FAILED" if error else "SUCCESS", error or "")
+        if not error:
+            _metrics.record(item['priority'], now - item['requested_at'])
+    if error:
+        _metrics.count('failed', len(items))
+        logger.critical(f"メール送信中にエラー: {error}")
+        return
+    _metrics.count('messages')
+    _metrics.count('notifications', len(items))
+    if len(items) > 1:
+        _metrics.count('digests')
+    logger.info("メールを正常に送信しました。")
+
+
+def _handle(item, digests):
+    \"\"\"URGENT はすぐに送信し、NORMAL はまとめ送信待ちに加える。\"\"\"
+    global _pending_digest
+    window = _config_value("DIGEST_WINDOW", DIGEST_WINDOW)
+    if item['priority'] == 'URGENT' or not window:
+        _deliver([item])
+        return
+    key = _digest_key(item['subject'])
+    digest = digests.setdefault(key, {'deadline': time.monotonic() + window, 'items': []})
+    digest['items'].append(item)
+    _pending_digest += 1
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
+def _email_worker():
+    # ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+    # 送信ごとの待機 (URGENT 0.1秒 / NORMAL 2秒) をやめ、キューに溜まった通知は同じ接続で続けて送信する。
+    # NORMAL の通知は最初の1件から DIGEST_WINDOW 秒の間、キー (銘柄またはイベント) ごとに1通にまとめる。
+    global _pending_digest
+    digests = {}
+    last_report = time.monotonic()
+    stopping = False
+    while not stopping:
+        timeout = 1.0
+        if digests:
+            timeout = max(0.0, min(timeout, min(d['deadline'] for d in digests.values()) - time.monotonic()))
+        try:
+            priority, timestamp, item = _notification_queue.get(timeout=timeout)
+            if item is None:
+                # 停止時はキューに残った通知とまとめ送信待ちの通知をすべて送信してから終了する
+                stopping = True
+                while True:
+                    try:
+                        _, _, rest = _notification_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if rest is not None:
+                        _handle(rest, digests)
+            else:
+                _handle(item, digests)
+        except queue.Empty:
+            pass
+        except Exception as e:
+            logger.error(f"通知の処理中にエラー: {e}", exc_info=True)
+
+        now = time.monotonic()
+        for key in [key for key, d in digests.items() if stopping or d['deadline'] <= now]:
+            items = digests.pop(key)['items']
+            _pending_digest -= len(items)
             try:
-                logger.info(f"メールを送信中... To: {_email_config['RECIPIENT_EMAIL']}")
-                server.send_message(msg)
-                if _logger_instance: _logger_instance.update_status(record_id, "SUCCESS")
-                logger.info("メールを正常に送信しました。")
+                _deliver(items, key)
             except Exception as e:
-                if _logger_instance: _logger_instance.update_status(record_id, "FAILED", str(e))
-                logger.critical(f"メール送信中にエラー: {e}", exc_info=True)
-                global _smtp_server
-                _smtp_server = None
-            
-            time.sleep(0.1 if priority == 0 else 2.0)
-        except queue.Empty:
-            continue
+                logger.error(f"通知の処理中にエラー: {e}", exc_info=True)
+        report_interval = _config_value("METRICS_REPORT_INTERVAL", METRICS_REPORT_INTERVAL)
+        if report_interval and now - last_report >= report_interval:
+            log_metrics()
+            last_report = now
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
-def start_notifier():
+# ▼▼▼【変更箇所: 通知履歴DBのパスを指定可能に】▼▼▼
+def start_notifier(db_path="log/notification_history.db"):
     global _worker_thread, _logger_instance
     if _logger_instance is None:
-        db_path = "log/notification_history.db"
         _logger_instance = NotificationLogger(db_path)
         logger.info(f"通知ロガーを初期化しました。DB: {db_path}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     if _worker_thread is None or not _worker_thread.is_alive():
         _stop_event.clear()
         _worker_thread = threading.Thread(target=_email_worker, daemon=True)
@@ -353,18 +681,32 @@ def start_notifier():
         logger.info("メール通知ワーカースレッドを開始しました。")
 
 def stop_notifier():
-    global _worker_thread, _smtp_server, _logger_instance
+    global _worker_thread, _logger_instance
     if _worker_thread and _worker_thread.is_alive():
         logger.info("メール通知ワーカースレッドを停止します...")
+        # ▼▼▼【変更箇所: 新規の受け付けを止め、再送の待機を打ち切る】▼▼▼
+        _stop_event.set()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         # <<< 変更点 2/3: 停止シグナルの形式をタプルに合わせる
         _notification_queue.put((-1, time.time(), None))
         _worker_thread.join(timeout=10)
     if _smtp_server:
-        _smtp_server.quit()
-        _smtp_server = None
+        # ▼▼▼【変更箇所: 切断済みの接続でも停止処理を続ける】▼▼▼
+        try:
+            _smtp_server.quit()
+        except smtplib.SMTPException:
+            pass
+        _close_server()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("SMTPサーバーとの接続を閉じました。")
+    # ▼▼▼【変更箇所: 終了時のメトリクス】▼▼▼
+    log_metrics()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     if _logger_instance:
         _logger_instance.close()
+        # ▼▼▼【変更箇所: 再起動時に通知ロガーを作り直す】▼▼▼
+        _logger_instance = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("通知ロガーの接続を閉じました。")
     _worker_thread = None
     logger.info("メール通知システムが正常に停止しました。")
@@ -401,7 +743,9 @@ def send_email(subject, body, immediate=False):
         
         # <<< 変更点 3/3: タイムスタンプをキューのタプルに追加
         timestamp = time.time()
-        item = {'record_id': record_id, 'subject': subject, 'body': body}
+        # ▼▼▼【変更箇所: 配信遅延の計測用に優先度とリクエスト時刻を保持】▼▼▼
+        item = {'record_id': record_id, 'subject': subject, 'body': body, 'priority': priority_str, 'requested_at': timestamp}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         _notification_queue.put((priority_val, timestamp, item))
 
     except Exception as e:
@@ -411,8 +755,37 @@ def send_email(subject, body, immediate=False):
 import threading
 from datetime import datetime
 import os
+# ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+import logging
+from . import db_writer
+
+logger = logging.getLogger(__name__)
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 class NotificationLogger:
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    CREATE_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS notification_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            recipient TEXT,
+            subject TEXT,
+            body TEXT,
+            status TEXT NOT NULL,
+            error_message TEXT
+        )
+    '''
+    INSERT_SQL = '''
+        INSERT INTO notification_history (id, timestamp, priority, recipient, subject, body, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
+    '''
+    INSERT_AUTO_ID_SQL = '''
+        INSERT INTO notification_history (timestamp, priority, recipient, subject, body, status)
+        VALUES (?, ?, ?, ?, ?, 'PENDING')
+    '''
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def __init__(self, db_path: str):
         \"\"\"
         データベースへの接続とテーブルの初期化を行う。
@@ -424,29 +797,36 @@ class NotificationLogger:
 
         self._db_path = db_path
         self._lock = threading.Lock() # スレッドセーフな操作のためのロック
-        # check_same_thread=False は、複数スレッドからのアクセスを許可するために必要
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self._create_table()
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # 書き込みは共有の書き込みスレッド (db_writer) のキューに積むだけで、呼び出し元 (ストラテジーのスレッド) を待たせない
+        self.db = db_writer.open_database(db_path, schema=(self.CREATE_TABLE_SQL,))
+        # log_request はIDを即座に返す必要があるため、IDは書き込み前にこのプロセスで採番する
+        self._next_id = self.db.call(self._max_id).result() + 1
+        # 他のプロセスが同じIDを先に使っていた場合の {採番したID: 実際のID}
+        self._remap = {}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
-    def _create_table(self):
-        \"\"\"
-        通知履歴を保存するテーブルを作成する。
-        \"\"\"
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    @staticmethod
+    def _max_id(conn) -> int:
+        \"\"\"使用済みの最大ID (削除済みの行を含む AUTOINCREMENT の採番値) を返す。\"\"\"
+        max_id = conn.execute("SELECT MAX(id) FROM notification_history").fetchone()[0] or 0
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'notification_history'").fetchone()
+        except sqlite3.Error:
+            row = None
+        return max(max_id, row[0] if row else 0)
+
+    def _on_insert_error(self, conn, params, error):
+        \"\"\"採番したIDが使用済みだった場合は、IDを自動採番させて挿入し直す。\"\"\"
+        if not isinstance(error, sqlite3.IntegrityError):
+            raise error
+        cursor = conn.execute(self.INSERT_AUTO_ID_SQL, params[1:])
         with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS notification_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    priority TEXT NOT NULL,
-                    recipient TEXT,
-                    subject TEXT,
-                    body TEXT,
-                    status TEXT NOT NULL,
-                    error_message TEXT
-                )
-            ''')
-            self.conn.commit()
+            self._remap[params[0]] = cursor.lastrowid
+            self._next_id = max(self._next_id, cursor.lastrowid + 1)
+        logger.warning(f"Notification id {params[0]} was already used; recorded as {cursor.lastrowid}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def log_request(self, priority: str, recipient: str, subject: str, body: str) -> int:
         \"\"\"
@@ -454,16 +834,14 @@ class NotificationLogger:
         - statusは 'PENDING' として記録される。
         - 戻り値: 作成されたレコードのID (rowid)
         \"\"\"
-        sql = '''
-            INSERT INTO notification_history (timestamp, priority, recipient, subject, body, status)
-            VALUES (?, ?, ?, ?, ?, 'PENDING')
-        '''
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
         with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (timestamp, priority, recipient, subject, body))
-            self.conn.commit()
-            return cursor.lastrowid
+            record_id = self._next_id
+            self._next_id += 1
+        self.db.execute(self.INSERT_SQL, (record_id, timestamp, priority, recipient, subject, body), on_error=self._on_insert_error)
+        return record_id
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def update_status(self, record_id: int, status: str, error_message: str = ""):
         \"\"\"
@@ -475,18 +853,21 @@ class NotificationLogger:
             SET status = ?, error_message = ?
             WHERE id = ?
         '''
-        with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (status, error_message, record_id))
-            self.conn.commit()
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # IDの読み替えは挿入の後に書き込みスレッドで行う
+        self.db.execute(sql, lambda: (status, error_message, self._remap.get(record_id, record_id)))
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def close(self):
         \"\"\"
         データベース接続を閉じる。
         \"\"\"
-        if self.conn:
-            self.conn.close()
-""",
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # 積まれた書き込みをコミットしてから閉じる
+        if self.db:
+            self.db.close()
+            self.db = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲""",
 
     "src/core/strategy/__init__.py": """
 # strategy パッケージ
@@ -568,8 +949,10 @@ class BaseStrategy(bt.Strategy):
         self.data_feeds = {
             'short': self.datas[0], 'medium': self.datas[1], 'long': self.datas[2]
         }
-        self.indicators = self.initializer.create_indicators(self.data_feeds)
-        self.entry_signal_generator = EntrySignalGenerator(self.indicators, self.data_feeds)
+        # ▼▼▼【変更箇所: インジケーターの生成を派生クラスで差し替え可能に】▼▼▼
+        self.indicators = self._create_indicators()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        self.entry_signal_generator = EntrySignalGenerator(self.indicators, self.data_feeds, p)
 
         # --- [リファクタリング] モード別コンポーネントのセットアップを抽象メソッドに委譲 ---
         self._setup_components(p, components)
@@ -579,6 +962,10 @@ class BaseStrategy(bt.Strategy):
         self.exit_orders = []
         self.live_trading_started = False
 
+    def _create_indicators(self):
+        \"\"\"インジケーター群 ({キー: インジケーター}) を生成する。既定は Backtrader のインジケーター。\"\"\"
+        return self.initializer.create_indicators(self.data_feeds)
+
     def _setup_components(self, params, components):
         \"\"\"[抽象メソッド] 派生クラスがモード専用コンポーネントを初期化するために実装する\"\"\"
         raise NotImplementedError("This method must be implemented by a subclass")
@@ -621,6 +1008,7 @@ import logging
 # ▼▼▼【変更箇所: SafeRSIをインポートリストに追加】▼▼▼
 from ..indicators import SafeStochastic, VWAP, SafeADX, SafeRSI
 # ▲▲▲【変更箇所ここまで】▲▲▲
+from ..streaming import StreamingIndicatorSet, StreamingUnsupportedError, CrossOver, create_streaming_indicator
 
 class StrategyInitializer:
     \"\"\"
@@ -635,9 +1023,13 @@ class StrategyInitializer:
         param_str = "_".join(f"{k}_{v}" for k, v in sorted(params.items()))
         return f"{timeframe}_{name}_{param_str}"
 
-    def create_indicators(self, data_feeds):
-        \"\"\"設定に基づき、Backtraderのインジケーターオブジェクトを動的に生成する\"\"\"
-        indicators, unique_defs = {}, {}
+    # ▼▼▼【変更箇所: インジケーター定義の収集を分離し、ストリーミング版の生成を追加】▼▼▼
+    def _collect_indicator_defs(self):
+        \"\"\"
+        エントリー/決済条件が参照するインジケーター定義を集める。
+        ({キー: (時間足, 定義)}, [(クロスキー, 時間足, キー1, キー2)]) を返す。
+        \"\"\"
+        unique_defs, cross_defs = {}, []
 
         def add_def(timeframe, ind_def):
             if not isinstance(ind_def, dict) or 'name' not in ind_def: return
@@ -663,6 +1055,23 @@ class StrategyInitializer:
                     atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
                     add_def(cond.get('timeframe'), {'name': 'atr', 'params': atr_params})
 
+        # クロスオーバー条件
+        if isinstance(self.strategy_params.get('entry_conditions'), dict):
+            for cond_list in self.strategy_params['entry_conditions'].values():
+                if not isinstance(cond_list, list): continue
+                for cond in cond_list:
+                    if not isinstance(cond, dict) or cond.get('type') not in ['crossover', 'crossunder']: continue
+                    k1 = self._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = self._get_indicator_key(cond['timeframe'], **cond['indicator2'])
+                    cross_key = f"cross_{k1}_vs_{k2}"
+                    if all(cross_key != c[0] for c in cross_defs): cross_defs.append((cross_key, cond['timeframe'], k1, k2))
+
+        return unique_defs, cross_defs
+
+    def create_indicators(self, data_feeds):
+        \"\"\"設定に基づき、Backtraderのインジケーターオブジェクトを動的に生成する\"\"\"
+        indicators = {}
+        unique_defs, cross_defs = self._collect_indicator_defs()
+
         # 収集した定義に基づき、インジケーターをインスタンス化
         for key, (timeframe, ind_def) in unique_defs.items():
             name, params = ind_def['name'], ind_def.get('params', {})
@@ -675,18 +1084,53 @@ class StrategyInitializer:
                 self.logger.error(f"インジケータークラス '{name}' が見つかりません。")
 
         # クロスオーバー用のインジケーターを追加
-        if isinstance(self.strategy_params.get('entry_conditions'), dict):
-            for cond_list in self.strategy_params['entry_conditions'].values():
-                if not isinstance(cond_list, list): continue
-                for cond in cond_list:
-                    if not isinstance(cond, dict) or cond.get('type') not in ['crossover', 'crossunder']: continue
-                    k1 = self._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = self._get_indicator_key(cond['timeframe'], **cond['indicator2'])
-                    if k1 in indicators and k2 in indicators:
-                        cross_key = f"cross_{k1}_vs_{k2}"
-                        if cross_key not in indicators: indicators[cross_key] = bt.indicators.CrossOver(indicators[k1], indicators[k2], plot=False)
+        for cross_key, _, k1, k2 in cross_defs:
+            if k1 in indicators and k2 in indicators:
+                indicators[cross_key] = bt.indicators.CrossOver(indicators[k1], indicators[k2], plot=False)
 
         return indicators
 
+    def create_streaming_indicators(self):
+        \"\"\"
+        create_indicators と同じキー・同じ計算のストリーミング・インジケーター群 (StreamingIndicatorSet) を生成する。
+        ライブ取引用。再現できない定義が1つでもあれば StreamingUnsupportedError。
+        \"\"\"
+        indicators = StreamingIndicatorSet()
+        unique_defs, cross_defs = self._collect_indicator_defs()
+        for key, (timeframe, ind_def) in unique_defs.items():
+            ind_cls = self._find_indicator_class(ind_def['name'])
+            if ind_cls is None:
+                self.logger.error(f"インジケータークラス '{ind_def['name']}' が見つかりません。")
+                continue
+            indicators.add(key, timeframe, create_streaming_indicator(ind_cls, ind_def.get('params', {})))
+        for cross_key, timeframe, k1, k2 in cross_defs:
+            if k1 in indicators and k2 in indicators:
+                indicators.add_cross(cross_key, timeframe, CrossOver(indicators[k1], indicators[k2]))
+        return indicators
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: インジケーターのパラメータから必要な過去バー数を算出】▼▼▼
+    def required_lookback(self):
+        \"\"\"
+        時間足ごとに、インジケーターが値を出すまでに必要なバー数 (minperiod の最大値) を返す。{時間足: バー数}
+        minperiod はストリーミング版の定義 (Backtrader と同じ値) から求める。ライン・バッファを制限する際の下限に使う。
+        \"\"\"
+        lookback, minperiods = {}, {}
+        unique_defs, cross_defs = self._collect_indicator_defs()
+        for key, (timeframe, ind_def) in unique_defs.items():
+            ind_cls = self._find_indicator_class(ind_def['name'])
+            if ind_cls is None: continue
+            try:
+                minperiods[key] = create_streaming_indicator(ind_cls, ind_def.get('params', {})).minperiod
+            except StreamingUnsupportedError:
+                continue  # Backtrader のインジケーターは qbuffer で自身の minperiod を確保する
+            lookback[timeframe] = max(lookback.get(timeframe, 1), minperiods[key])
+        for _, timeframe, k1, k2 in cross_defs:
+            if k1 in minperiods and k2 in minperiods:
+                lookback[timeframe] = max(lookback.get(timeframe, 1), max(minperiods[k1], minperiods[k2]) + 1)
+        return lookback
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _find_indicator_class(self, name):
         \"\"\"文字列からBacktraderのインジケータークラスを見つける\"\"\"
         # ▼▼▼【変更箇所: SafeRSIをカスタムインジケーターとして登録】▼▼▼
@@ -701,108 +1145,209 @@ class StrategyInitializer:
                 return cls_candidate
         return None""",
 
-    "src/core/strategy/entry_signal_generator.py": """
+    "src/core/strategy/entry_signal_generator.py": """import operator
+from .strategy_initializer import StrategyInitializer
+
+
+def _first_line(obj):
+    \"\"\"インジケーターの先頭ライン。(Backtraderのインジケーターは lines[0]、ライン・配列ビューはそのまま)\"\"\"
+    lines = getattr(obj, 'lines', None)
+    return lines[0] if lines is not None else obj
+
+
+def _never():
+    return False
+
+
+_NEVER = (_never, None)
+_COMPARE_OPS = {'>': operator.gt, '<': operator.lt}
+
+
 class EntrySignalGenerator:
     \"\"\"
     責務：価格やインジケーターの情報に基づき、新規エントリーのシグナル（買い/売り）を生成する。
     このクラスは状態を持たない（stateless）。
+
+    [高速化] エントリー条件は最初の評価時 (strategy_params を渡した場合は初期化時) に
+    (判定関数, 根拠関数) のリストにコンパイルする。判定関数はラインの参照と閾値を保持し、
+    バーごとのキー生成・辞書検索・分岐を行わない。根拠の文字列は AND 条件がすべて成立した時だけ生成する。
+    strategy_params の内容は実行中に変わらない前提とし、別の辞書が渡された場合のみコンパイルし直す。
     \"\"\"
-    def __init__(self, indicators, data_feeds):
+    def __init__(self, indicators, data_feeds, strategy_params=None):
         self.indicators = indicators
         self.data_feeds = data_feeds
+        self._compiled_params = None
+        self._compiled = []
+        if strategy_params is not None:
+            self.compile(strategy_params)
+
+    def compile(self, strategy_params):
+        \"\"\"ロング/ショートの条件を [(trade_type, [(判定関数, 根拠関数), ...])] に変換して保持する。\"\"\"
+        trading_mode = strategy_params.get('trading_mode', {})
+        key_builder = StrategyInitializer({}) # キー生成のヘルパーとしてのみ使用
+        compiled = []
+        for trade_type in ('long', 'short'):
+            if not trading_mode.get(f"{trade_type}_enabled", True): continue
+            conditions = strategy_params.get('entry_conditions', {}).get(trade_type, [])
+            if not conditions: continue
+            compiled.append((trade_type, [self._compile_condition(c, key_builder) for c in conditions]))
+        self._compiled_params, self._compiled = strategy_params, compiled
 
     def check_entry_signal(self, strategy_params):
         \"\"\"ロングとショート、両方のエントリー条件をチェックし、シグナルを返す\"\"\"
-        trading_mode = strategy_params.get('trading_mode', {})
-        
-        if trading_mode.get('long_enabled', True):
-            is_met, reason = self._check_all_conditions('long', strategy_params)
-            if is_met:
-                return 'long', reason
-
-        if trading_mode.get('short_enabled', True):
-            is_met, reason = self._check_all_conditions('short', strategy_params)
-            if is_met:
-                return 'short', reason
-        
+        if strategy_params is not self._compiled_params:
+            self.compile(strategy_params)
+        for trade_type, conditions in self._compiled:
+            for is_met, _ in conditions:
+                if not is_met(): break
+            else:
+                return trade_type, " / ".join(reason() for _, reason in conditions)
         return None, None
 
-    def _check_all_conditions(self, trade_type, strategy_params):
-        \"\"\"指定されたタイプの全エントリー条件が満たされているか評価する\"\"\"
-        conditions = strategy_params.get('entry_conditions', {}).get(trade_type, [])
-        if not conditions:
-            return False, ""
-
-        reason_details = []
-        all_conditions_met = True
-        for c in conditions:
-            is_met, reason_str = self._evaluate_condition(c)
-            if not is_met:
-                all_conditions_met = False
-                break
-            reason_details.append(reason_str)
-
-        return (all_conditions_met, " / ".join(reason_details)) if all_conditions_met else (False, "")
-
-    def _evaluate_condition(self, cond):
-        \"\"\"単一の条件式を評価する\"\"\"
+    # --- コンパイル ---------------------------------------------------------------
+
+    def _compile_condition(self, cond, key_builder):
+        \"\"\"単一の条件式を (判定関数, 根拠関数) に変換する。参照先のインジケーターがない条件は常に不成立。\"\"\"
         tf, cond_type = cond['timeframe'], cond.get('type')
         data_feed = self.data_feeds[tf]
-        if len(data_feed) == 0:
-            return False, ""
 
-        # クロスオーバー/クロスアンダー条件の評価
+        # クロスオーバー/クロスアンダー条件
         if cond_type in ['crossover', 'crossunder']:
-            from .strategy_initializer import StrategyInitializer
-            si = StrategyInitializer({}) # ヘルパーメソッドのためだけにインスタンス化
-            k1 = si._get_indicator_key(tf, **cond['indicator1'])
-            k2 = si._get_indicator_key(tf, **cond['indicator2'])
+            k1 = key_builder._get_indicator_key(tf, **cond['indicator1'])
+            k2 = key_builder._get_indicator_key(tf, **cond['indicator2'])
             cross_indicator = self.indicators.get(f"cross_{k1}_vs_{k2}")
-            
-            if cross_indicator is None or len(cross_indicator) == 0: return False, ""
+            if cross_indicator is None: return _NEVER
+            cross = _first_line(cross_indicator)
+
+            if cond_type == 'crossover':
+                def is_met(): return len(data_feed) != 0 and len(cross) != 0 and cross[0] > 0
+            else:
+                def is_met(): return len(data_feed) != 0 and len(cross) != 0 and cross[0] < 0
 
-            is_met = (cross_indicator[0] > 0 and cond_type == 'crossover') or \\
-                     (cross_indicator[0] < 0 and cond_type == 'crossunder')
-            
             p1 = ",".join(map(str, cond['indicator1'].get('params', {}).values()))
             p2 = ",".join(map(str, cond['indicator2'].get('params', {}).values()))
-            reason = f"{tf[0].upper()}: {cond_type}({cond['indicator1']['name']}({p1}),{cond['indicator2']['name']}({p2})) [{is_met}]"
-            return is_met, reason
-
-        # 通常の比較条件の評価
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer({}) # ヘルパーメソッドのためだけにインスタンス化
-        ind = self.indicators.get(si._get_indicator_key(tf, **cond['indicator']))
-        if ind is None or len(ind) == 0: return False, ""
+            reason_str = f"{tf[0].upper()}: {cond_type}({cond['indicator1']['name']}({p1}),{cond['indicator2']['name']}({p2})) [True]"
+            return is_met, lambda: reason_str
+
+        # 通常の比較条件
+        ind = self.indicators.get(key_builder._get_indicator_key(tf, **cond['indicator']))
+        if ind is None: return _NEVER
+        line = _first_line(ind)
+        compare, target = cond['compare'], cond['target']
+        target_type = target.get('type')
+        params_str = ",".join(map(str, cond['indicator'].get('params', {}).values()))
+        prefix = f"{tf[0].upper()}: {cond['indicator']['name']}({params_str})"
 
-        val, compare, target = ind[0], cond['compare'], cond['target']
-        target_type, target_val, target_val_str = target.get('type'), None, ""
+        if target_type == 'values':
+            target_val = target['value']
+            if target_val is None: return _NEVER
+            if compare == 'between':
+                low, high = target_val[0], target_val[1]
+                def is_met(): return len(data_feed) != 0 and len(line) != 0 and low < line[0] < high
+                target_val_str = f"[{low},{high}]"
+            elif compare in _COMPARE_OPS:
+                threshold, op = (target_val[0] if isinstance(target_val, list) else target_val), _COMPARE_OPS[compare]
+                def is_met(): return len(data_feed) != 0 and len(line) != 0 and op(line[0], threshold)
+                target_val_str = f"[{target_val}]"
+            else:
+                return _NEVER
+            return is_met, lambda: f"{prefix} [{line[0]:.2f}] {compare} {target_val_str}"
 
+        # 'between' は値のリストとの比較のみ
+        if compare not in _COMPARE_OPS: return _NEVER
+        op = _COMPARE_OPS[compare]
         if target_type == 'data':
-            target_val = getattr(data_feed, target['value'])[0]
-            target_val_str = f"{target['value']} [{target_val:.2f}]"
+            target_line, target_name = getattr(data_feed, target['value']), target['value']
+            def is_met(): return len(data_feed) != 0 and len(line) != 0 and op(line[0], target_line[0])
         elif target_type == 'indicator':
-            target_ind = self.indicators.get(si._get_indicator_key(tf, **target['indicator']))
-            if target_ind is None or len(target_ind) == 0: return False, ""
-            target_val = target_ind[0]
-            target_val_str = f"{target['indicator']['name']}(...) [{target_val:.2f}]"
-        elif target_type == 'values':
-            target_val = target['value']
-            target_val_str = f"[{target_val[0]},{target_val[1]}]" if compare == 'between' else f"[{target_val}]"
+            target_ind = self.indicators.get(key_builder._get_indicator_key(tf, **target['indicator']))
+            if target_ind is None: return _NEVER
+            target_line, target_name = _first_line(target_ind), f"{target['indicator']['name']}(...)"
+            def is_met(): return len(data_feed) != 0 and len(line) != 0 and len(target_line) != 0 and op(line[0], target_line[0])
+        else:
+            return _NEVER
+        return is_met, lambda: f"{prefix} [{line[0]:.2f}] {compare} {target_name} [{target_line[0]:.2f}]\"""",
+
+    "src/core/strategy/exit_signal_generator.py": """import logging
+from .strategy_initializer import StrategyInitializer
 
-        if target_val is None: return False, ""
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 決済条件の仕様 (ExitSpec)
+# exit_conditions の take_profit / stop_loss は戦略の初期化時に1回だけ解決し、
+# インジケーターのラインと倍率を保持する小さなオブジェクトにする。
+# 決済価格の計算はバーごとの辞書解析・キー生成を行わず、数回の浮動小数点演算で済む。
+#
+# 新しい決済タイプ (固定%、シャンデリア、時間決済など) は、is_ready() / distance() を持つ
+# 仕様クラスと、それを生成する関数を register_exit_type で登録して追加する。
+#   @register_exit_type('fixed_percent')
+#   def _build_percent_spec(exit_type, cond, indicators, default_multiplier): ...
+# ==============================================================================
+
+# 倍率の既定値 (exit_conditions に multiplier がない場合)
+DEFAULT_MULTIPLIERS = {'stop_loss': 2.0, 'take_profit': 5.0}
+
+EXIT_SPEC_BUILDERS = {}
+
+
+def register_exit_type(*type_names):
+    \"\"\"決済タイプ名に仕様の生成関数 (exit_type, cond, indicators, default_multiplier) -> spec を登録する。\"\"\"
+    def decorator(builder):
+        for type_name in type_names:
+            EXIT_SPEC_BUILDERS[type_name] = builder
+        return builder
+    return decorator
 
-        is_met = False
-        if compare == '>': is_met = val > (target_val[0] if isinstance(target_val, list) else target_val)
-        elif compare == '<': is_met = val < (target_val[0] if isinstance(target_val, list) else target_val)
-        elif compare == 'between': is_met = target_val[0] < val < target_val[1]
-        
-        params_str = ",".join(map(str, cond['indicator'].get('params', {}).values()))
-        reason = f"{tf[0].upper()}: {cond['indicator']['name']}({params_str}) [{val:.2f}] {compare} {target_val_str}"
-        return is_met, reason
-""",
 
-    "src/core/strategy/exit_signal_generator.py": """class BaseExitSignalGenerator:
+class AtrExitSpec:
+    \"\"\"ATR x 倍率 を値幅とする決済条件。(atr_multiple / atr_stoptrail)\"\"\"
+    __slots__ = ('exit_type', 'atr', 'multiplier')
+
+    def __init__(self, exit_type, atr, multiplier):
+        self.exit_type = exit_type
+        self.atr = atr
+        self.multiplier = multiplier
+
+    def is_ready(self):
+        return len(self.atr) > 0
+
+    def distance(self):
+        \"\"\"現在バーでのエントリー価格からの値幅。ATRが0の場合はNone。\"\"\"
+        atr_val = self.atr[0]
+        return atr_val * self.multiplier if atr_val > 1e-9 else None
+
+
+@register_exit_type('atr_multiple', 'atr_stoptrail')
+def _build_atr_spec(exit_type, cond, indicators, default_multiplier):
+    params = cond.get('params', {})
+    atr_params = {k: v for k, v in params.items() if k != 'multiplier'}
+    atr_key = StrategyInitializer({})._get_indicator_key(cond.get('timeframe'), 'atr', atr_params)
+    atr_indicator = indicators.get(atr_key)
+    if atr_indicator is None:
+        logger.warning(f"{exit_type} のATRインジケーターが見つかりません: {atr_key}")
+        return None
+    atr = atr_indicator.lines[0] if hasattr(atr_indicator, 'lines') else atr_indicator
+    return AtrExitSpec(exit_type, atr, params.get('multiplier', default_multiplier))
+
+
+def resolve_exit_specs(strategy_params, indicators):
+    \"\"\"{'stop_loss': spec or None, 'take_profit': spec or None} を返す。\"\"\"
+    exit_conditions = strategy_params.get('exit_conditions') or {}
+    specs = {}
+    for exit_type, default_multiplier in DEFAULT_MULTIPLIERS.items():
+        cond, spec = exit_conditions.get(exit_type) or {}, None
+        if cond:
+            builder = EXIT_SPEC_BUILDERS.get(cond.get('type'))
+            if builder is None:
+                logger.warning(f"未対応の決済タイプのため {exit_type} を無視します: {cond.get('type')}")
+            else:
+                spec = builder(exit_type, cond, indicators, default_multiplier)
+        specs[exit_type] = spec
+    return specs
+
+
+class BaseExitSignalGenerator:
     \"\"\"
     [リファクタリング]
     決済価格の計算など、モード共通のロジックを提供する基底クラス。
@@ -815,37 +1360,24 @@ class EntrySignalGenerator:
         self.tp_price = 0.0
         self.sl_price = 0.0
         self.risk_per_share = 0.0
+        # ▼▼▼【変更箇所: 決済条件を初期化時に解決】▼▼▼
+        specs = resolve_exit_specs(strategy.p.strategy_params, self.indicators)
+        self.sl_spec, self.tp_spec = specs['stop_loss'], specs['take_profit']
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def are_indicators_ready(self):
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer(self.strategy.p.strategy_params)
-        sl_cond = self.strategy.p.strategy_params.get('exit_conditions', {}).get('stop_loss', {})
-        if not sl_cond: return False
-        atr_params = {k: v for k, v in sl_cond.get('params', {}).items() if k != 'multiplier'}
-        atr_key = si._get_indicator_key(sl_cond.get('timeframe'), 'atr', atr_params)
-        atr_indicator = self.indicators.get(atr_key)
-        return atr_indicator and len(atr_indicator) > 0
+        return self.sl_spec is not None and self.sl_spec.is_ready()
 
     def calculate_and_set_exit_prices(self, entry_price, is_long):
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer(self.strategy.p.strategy_params)
-        p = self.strategy.p.strategy_params
-        exit_conditions = p.get('exit_conditions', {})
-        sl_cond = exit_conditions.get('stop_loss', {})
-        tp_cond = exit_conditions.get('take_profit', {})
-        if sl_cond:
-            atr_params = {k: v for k, v in sl_cond.get('params', {}).items() if k != 'multiplier'}
-            atr_key = si._get_indicator_key(sl_cond.get('timeframe'), 'atr', atr_params)
-            atr_val = self.indicators[atr_key][0]
-            if atr_val > 1e-9:
-                self.risk_per_share = atr_val * sl_cond.get('params', {}).get('multiplier', 2.0)
-                self.sl_price = entry_price - self.risk_per_share if is_long else entry_price + self.risk_per_share
-        if tp_cond:
-            atr_params = {k: v for k, v in tp_cond.get('params', {}).items() if k != 'multiplier'}
-            atr_key = si._get_indicator_key(tp_cond.get('timeframe'), 'atr', atr_params)
-            atr_val = self.indicators[atr_key][0]
-            if atr_val > 1e-9:
-                self.tp_price = entry_price + atr_val * tp_cond.get('params', {}).get('multiplier', 5.0) if is_long else entry_price - atr_val * tp_cond.get('params', {}).get('multiplier', 5.0)
+        if self.sl_spec is not None:
+            distance = self.sl_spec.distance()
+            if distance is not None:
+                self.risk_per_share = distance
+                self.sl_price = entry_price - distance if is_long else entry_price + distance
+        if self.tp_spec is not None:
+            distance = self.tp_spec.distance()
+            if distance is not None:
+                self.tp_price = entry_price + distance if is_long else entry_price - distance
 
     def check_exit_conditions(self):
         \"\"\"[抽象メソッド] 決済条件を監視する方法\"\"\"
@@ -934,6 +1466,15 @@ class EntrySignalGenerator:
                 if f_value < 0: f_value = 0.0 # マイナスf値は0に丸める
                 self.strategy.logger.log(f"ケリー基準 (生): 統計 'Kelly_Raw'={self.statistics.get('Kelly_Raw')} -> f={f_value:.4f}")
 
+            # ▼▼▼【変更箇所】▼▼▼
+            elif f_source == 'monte_carlo':
+                # モンテカルロで求めたf値の信頼下限。取引数が少ない銘柄は 'N/A' (NaN) になるため f=0 とする
+                try: f_value = float(self.statistics.get('Kelly_MC', 0.0))
+                except (ValueError, TypeError): f_value = 0.0
+                if not f_value > 0: f_value = 0.0 # マイナス・NaNは0に丸める
+                self.strategy.logger.log(f"ケリー基準 (モンテカルロ): 統計 'Kelly_MC'={self.statistics.get('Kelly_MC')} -> f={f_value:.4f}")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             else:
                 self.strategy.logger.log(f"警告: 不明なケリー方式 '{f_source}'。f=0でスキップします。")
                 f_value = 0.0
@@ -1020,6 +1561,35 @@ class PositionManager:
         )
         self.is_restoring = False
 
+    # ▼▼▼【変更箇所: ウォームスタート用のスナップショット】▼▼▼
+    def snapshot_state(self, strategy, exit_signal_generator):
+        \"\"\"ポジションと決済価格 (トレーリングストップの現在位置を含む) を辞書で返す。ポジションがなければ None。\"\"\"
+        if not strategy.position:
+            return None
+        return {
+            'size': strategy.position.size, 'price': strategy.position.price,
+            'entry_datetime': self.current_position_entry_dt.isoformat() if self.current_position_entry_dt else None,
+            'entry_reason': self.entry_reason_for_trade, 'executed_size': self.executed_size,
+            'tp_price': exit_signal_generator.tp_price, 'sl_price': exit_signal_generator.sl_price,
+            'risk_per_share': exit_signal_generator.risk_per_share,
+        }
+
+    def restore_snapshot_state(self, state, strategy, exit_signal_generator):
+        \"\"\"snapshot_state の内容を復元する。決済価格は再計算せず、保存時の値 (引き上げ済みのSL) を引き継ぐ。\"\"\"
+        strategy.position.size = state['size']
+        strategy.position.price = state['price']
+        self.current_position_entry_dt = datetime.fromisoformat(state['entry_datetime']) if state['entry_datetime'] else None
+        self.entry_reason_for_trade = state['entry_reason']
+        self.executed_size = state['executed_size']
+        exit_signal_generator.tp_price = state['tp_price']
+        exit_signal_generator.sl_price = state['sl_price']
+        exit_signal_generator.risk_per_share = state['risk_per_share']
+        strategy.logger.log(
+            f"スナップショットからポジションを復元。Size: {state['size']}, Price: {state['price']}, "
+            f"SL: {state['sl_price']:.2f}, TP: {state['tp_price']:.2f}"
+        )
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def on_trade_update(self, trade, strategy):
         \"\"\"トレードの開始/終了イベントを処理する\"\"\"
         if trade.isopen:
@@ -1138,7 +1708,12 @@ class StrategyLogger:
         for key in sorted(indicators.keys()):
             indicator = indicators[key]
             if len(indicator) > 0 and indicator[0] is not None:
-                values = [f"{alias}: {getattr(indicator.lines, alias)[0]:.4f}" for alias in indicator.lines.getlinealiases() if len(getattr(indicator.lines, alias)) > 0]
+                # ▼▼▼【変更箇所: ストリーミング・インジケーター (ライン名と現在値のみ保持) に対応】▼▼▼
+                if hasattr(indicator, 'line_values'):
+                    values = [f"{alias}: {value:.4f}" for alias, value in indicator.line_values().items()]
+                else:
+                    values = [f"{alias}: {getattr(indicator.lines, alias)[0]:.4f}" for alias in indicator.lines.getlinealiases() if len(getattr(indicator.lines, alias)) > 0]
+                # ▲▲▲【変更箇所ここまで】▲▲▲
                 if values: log_msg += f"  [{key}]: {', '.join(values)}\\n"
         self.logger.debug(log_msg)""",
 
@@ -1152,7 +1727,1385 @@ class StrategyLogger:
 
     def send(self, subject, body, immediate=False):
         \"\"\"[抽象メソッド] 通知を送信する方法\"\"\"
-        raise NotImplementedError"""
+        raise NotImplementedError""",
+
+    "src/core/bar_store.py": """import os
+import json
+import logging
+import threading
+import numpy as np
+from src.core.data_cache import Bars, read_bars
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# バーストア
+# {symbol}_{tf}_{date}.csv を1ファイルにつき1回だけ読み込み (data_cache 経由)、
+# datetime / OHLCV を numpy 配列として保持する。
+# 評価エンジンでは親プロセスでパースした配列を .npy に書き出し、
+# ワーカープロセスはメモリマップで同じバッファを参照する。
+# ==============================================================================
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class BarStore:
+    \"\"\"ファイルパスをキーにBarsを保持するストア。未登録のファイルは初回アクセス時に読み込む。\"\"\"
+    def __init__(self):
+        self._bars = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.abspath(filepath)
+
+    def __contains__(self, filepath):
+        return self._key(filepath) in self._bars
+
+    def __len__(self):
+        return len(self._bars)
+
+    def get(self, filepath):
+        key = self._key(filepath)
+        bars = self._bars.get(key)
+        if bars is not None: return bars
+        bars = read_bars(filepath)
+        with self._lock:
+            self.load_count += 1
+            return self._bars.setdefault(key, bars)
+
+    def preload(self, filepaths):
+        \"\"\"指定ファイルを事前に読み込む。失敗したファイルはログを出してスキップする。\"\"\"
+        loaded = 0
+        for filepath in filepaths:
+            try:
+                self.get(filepath); loaded += 1
+            except Exception as e:
+                logger.warning(f"バーデータの事前読み込みに失敗: {filepath} - {e}")
+        return loaded
+
+    def clear(self):
+        with self._lock: self._bars.clear()
+
+    def export(self, directory):
+        \"\"\"保持している全Barsを .npy として書き出し、attach() で読める形にする。\"\"\"
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        with self._lock: items = list(self._bars.items())
+        for i, (key, bars) in enumerate(items):
+            stem = f"{i:05d}"
+            np.save(os.path.join(directory, f"{stem}_dt.npy"), bars.datetime)
+            np.save(os.path.join(directory, f"{stem}_values.npy"), bars.values)
+            manifest[key] = {'stem': stem, 'columns': list(bars.columns), 'tz': bars.tz}
+        with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        return directory
+
+    @classmethod
+    def attach(cls, directory):
+        \"\"\"export() で書き出したディレクトリをメモリマップで読み込んだストアを返す。\"\"\"
+        store = cls()
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for key, meta in manifest.items():
+            dt = np.load(os.path.join(directory, f"{meta['stem']}_dt.npy"), mmap_mode='r')
+            values = np.load(os.path.join(directory, f"{meta['stem']}_values.npy"), mmap_mode='r')
+            store._bars[key] = Bars(dt, values, meta['columns'], meta['tz'], key)
+        return store
+
+
+_default_store = BarStore()
+
+def get_store():
+    return _default_store
+
+def set_store(store):
+    \"\"\"プロセス全体で使用するストアを差し替える。(ワーカープロセスの初期化で使用)\"\"\"
+    global _default_store
+    _default_store = store
+
+def load_bars(filepath):
+    return _default_store.get(filepath)""",
+
+    "src/core/data_cache.py": """import io
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# データキャッシュ
+# data/ 配下の {symbol}_{tf}_{date}.csv に対し、パース済みのバイナリ (.npy) を
+# data/.cache/ に保持する。CSVが正 (人が読める一次データ) であり、
+# キャッシュは CSV のパス + 更新時刻 + サイズが一致する場合のみ使用する。
+# CSVを読み込む箇所はすべて read_bars / read_ohlcv を経由する。
+# ==============================================================================
+
+CACHE_DIR_NAME = '.cache'
+CACHE_VERSION = 1
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+
+
+class Bars:
+    \"\"\"1ファイル分のバーデータ。datetimeはUTCのエポックナノ秒(int64)で保持する。\"\"\"
+    __slots__ = ('datetime', 'values', 'columns', 'tz', 'source')
+
+    def __init__(self, datetime, values, columns, tz=None, source=None):
+        self.datetime = datetime      # shape (n,) int64
+        self.values = values          # shape (len(columns), n) float64
+        self.columns = tuple(columns)
+        self.tz = tz
+        self.source = source
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def column(self, name):
+        return self.values[self.columns.index(name)]
+
+    def index(self):
+        idx = pd.DatetimeIndex(self.datetime.view('datetime64[ns]'), name='datetime')
+        return idx.tz_localize('UTC').tz_convert(self.tz) if self.tz else idx
+
+    @property
+    def start(self):
+        return self.index()[0] if len(self) else None
+
+    @property
+    def end(self):
+        return self.index()[-1] if len(self) else None
+
+    def to_dataframe(self):
+        \"\"\"バックテスト用のDataFrame (小文字カラム, datetimeインデックス) を生成する。\"\"\"
+        return pd.DataFrame({name: self.values[i] for i, name in enumerate(self.columns)}, index=self.index())
+
+    @classmethod
+    def from_dataframe(cls, df, source=None):
+        if df.empty: df = df.set_axis(pd.DatetimeIndex([], name='datetime'))
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise ValueError(f"datetimeインデックスを解釈できません: {source}")
+        df = df.rename(columns=str.lower)
+        columns = [c for c in PRICE_COLUMNS if c in df.columns]
+        tz = str(df.index.tz) if df.index.tz is not None else None
+        index = df.index.tz_convert('UTC').tz_localize(None) if tz else df.index
+        dt = np.ascontiguousarray(index.as_unit('ns').asi8, dtype=np.int64)
+        values = np.empty((len(columns), len(df)), dtype=np.float64)
+        for i, name in enumerate(columns):
+            values[i] = df[name].to_numpy(dtype=np.float64)
+        return cls(dt, values, columns, tz, source)
+
+
+def parse_csv(filepath):
+    \"\"\"CSVをパースしてBarsを返す。(キャッシュを使用しない)\"\"\"
+    df = pd.read_csv(filepath, index_col='datetime', parse_dates=True, encoding='utf-8-sig')
+    return Bars.from_dataframe(df, source=filepath)
+
+
+def _twin_paths(filepath):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIR_NAME)
+    stem = os.path.join(cache_dir, os.path.splitext(os.path.basename(filepath))[0])
+    return cache_dir, f"{stem}.json", f"{stem}_dt.npy", f"{stem}_values.npy"
+
+def _fingerprint(filepath):
+    st = os.stat(filepath)
+    return {'version': CACHE_VERSION, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+def _load_twin(filepath, fingerprint, mmap):
+    _, meta_path, dt_path, values_path = _twin_paths(filepath)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f: meta = json.load(f)
+        if meta.get('fingerprint') != fingerprint: return None
+        mode = 'r' if mmap else None
+        dt, values = np.load(dt_path, mmap_mode=mode), np.load(values_path, mmap_mode=mode)
+        if dt.shape != (meta['rows'],) or values.shape != (len(meta['columns']), meta['rows']): return None
+        return Bars(dt, values, meta['columns'], meta['tz'], filepath)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _atomic_save(path, writer):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f: writer(f)
+    os.replace(tmp_path, path)
+
+def _store_twin(filepath, fingerprint, bars):
+    cache_dir, meta_path, dt_path, values_path = _twin_paths(filepath)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _atomic_save(dt_path, lambda f: np.save(f, bars.datetime))
+        _atomic_save(values_path, lambda f: np.save(f, bars.values))
+        meta = {'fingerprint': fingerprint, 'rows': len(bars), 'columns': list(bars.columns), 'tz': bars.tz}
+        _atomic_save(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    except OSError as e:
+        # 読み取り専用ディレクトリ・他プロセスが使用中などの場合はキャッシュせずに続行する
+        logger.debug(f"キャッシュの書き込みをスキップ: {filepath} - {e}")
+
+
+def read_bars(filepath, mmap=True):
+    \"\"\"
+    CSVに対応するBarsを返す。キャッシュが有効ならバイナリから読み込み、
+    無効 (未作成・CSV更新済み) ならCSVをパースしてキャッシュを作り直す。
+    mmap=True の場合、配列はメモリマップ (読み取り専用) となる。
+    \"\"\"
+    fingerprint = _fingerprint(filepath)
+    bars = _load_twin(filepath, fingerprint, mmap)
+    if bars is not None: return bars
+    bars = parse_csv(filepath)
+    _store_twin(filepath, fingerprint, bars)
+    return bars
+
+def read_ohlcv(filepath, tz_naive=False):
+    \"\"\"
+    CSVに対応するOHLCVのDataFrame (小文字カラム, datetimeインデックス) を返す。
+    tz_naive=True の場合、タイムゾーン付きインデックスは現地時刻のままタイムゾーン情報を除去する。
+    \"\"\"
+    df = read_bars(filepath, mmap=False).to_dataframe()
+    if tz_naive and df.index.tz is not None: df.index = df.index.tz_localize(None)
+    return df
+
+def append_rows(filepath, df):
+    \"\"\"
+    既存のCSVの末尾に df (datetimeインデックス) の行を追記する。列はCSVのヘッダーに合わせる。
+    追記前のキャッシュが有効だった場合は、追記した行だけをパースして連結したキャッシュに更新する
+    (CSV全体をパースし直した場合と同じ内容になる)。df の日時はCSVの最終行より後であること。
+    \"\"\"
+    with open(filepath, 'r', encoding='utf-8-sig') as f: header = f.readline().rstrip('\\r\\n').split(',')
+    with open(filepath, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size: f.seek(-1, os.SEEK_END)
+        needs_newline = bool(size) and f.read(1) not in (b'\\n', b'\\r')
+    index_name, columns = header[0], header[1:]
+    rows = df.reindex(columns=columns).to_csv(header=False)
+    fingerprint = _fingerprint(filepath)
+    bars = _load_twin(filepath, fingerprint, mmap=False)
+    with open(filepath, 'a', encoding='utf-8', newline='') as f: f.write(('\\n' if needs_newline else '') + rows)
+    if bars is None: return
+    added = pd.read_csv(io.StringIO(','.join(header) + '\\n' + rows), index_col=index_name, parse_dates=True)
+    added = Bars.from_dataframe(added, source=filepath)
+    if added.columns != bars.columns or added.tz != bars.tz:
+        invalidate(filepath)
+        return
+    merged = Bars(np.concatenate([bars.datetime, added.datetime]), np.concatenate([bars.values, added.values], axis=1), bars.columns, bars.tz, filepath)
+    _store_twin(filepath, _fingerprint(filepath), merged)
+
+def copy_csv(src, dst):
+    \"\"\"CSVをコピーする。コピー元のキャッシュが有効なら、コピー先のキャッシュとして複製する。\"\"\"
+    bars = _load_twin(src, _fingerprint(src), mmap=True)
+    shutil.copyfile(src, dst)
+    if bars is not None: _store_twin(dst, _fingerprint(dst), bars)
+
+def invalidate(filepath):
+    \"\"\"CSVに対応するキャッシュを削除する。\"\"\"
+    for path in _twin_paths(filepath)[1:]:
+        try: os.remove(path)
+        except FileNotFoundError: pass""",
+
+    "src/core/util/monte_carlo.py": """# src/core/util/monte_carlo.py
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# モンテカルロ (トレードのブートストラップ)
+# 銘柄ごとの取引履歴から、同じ件数のトレードを復元抽出したパスを多数生成し、
+#   - ケリーf値 (calculate_raw_kelly と同じ式) の分布 -> 信頼下限を Kelly_MC とする
+#   - 1トレードごとに全資金を投じた場合の最大ドローダウン・最終資産倍率の分布
+# を numpy の配列演算でまとめて計算する。
+# ケリー基準方式は「資金 x f値」を投資するため、各トレードは投資額に対するリターン
+# (損益(手数料込) / (数量 x エントリー価格)) として扱い、勝ち負けは評価の統計と同じく
+# リターン >= 0 を勝ちとする。
+# 抽出インデックスは (トレード, パス) の順に並べ、累積系の計算はトレード方向に
+# パス全体のベクトルをまとめて更新する。(パス数 >> トレード数 のため高速)
+# ==============================================================================
+
+MC_COLUMNS = ['Kelly_MC', 'Kelly_MC_Median', 'MC_DD_Median', 'MC_DD_Worst', 'MC_Equity_Median', 'MC_Equity_Worst']
+
+# 1回に生成するサンプル数 (パス数 x トレード数) の上限。メモリ使用量を抑えるためパスを分割する
+_MAX_CHUNK_ELEMENTS = 1 << 22
+
+
+def trade_returns(history_df):
+    \"\"\"取引履歴のDataFrameから投資額に対するリターンの配列を返す。未決済のまま終了した取引は除外する。\"\"\"
+    if '決済根拠' in history_df.columns:
+        history_df = history_df[history_df['決済根拠'] != "End of Backtest"]
+    pnl = pd.to_numeric(history_df['損益(手数料込)'], errors='coerce').to_numpy(dtype=np.float64)
+    notional = (pd.to_numeric(history_df['数量'], errors='coerce') * pd.to_numeric(history_df['エントリー価格'], errors='coerce')).to_numpy(dtype=np.float64)
+    valid = np.isfinite(pnl) & np.isfinite(notional) & (notional > 0)
+    return pnl[valid] / notional[valid]
+
+
+def kelly_fraction(wins, n, gross_won, gross_lost):
+    \"\"\"
+    calculate_raw_kelly と同じ式 f = (p*R - (1-p)) / R をパスごとの配列で計算し、[-1, 1] に丸める。
+    負けなし (R = inf) は f = p、勝ちがない・平均利益が0の場合は下限 (-1) とする。
+    \"\"\"
+    losses = n - wins
+    p = wins / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rr = (gross_won / np.maximum(wins, 1)) / (gross_lost / np.maximum(losses, 1))
+        f = (p * rr - (1 - p)) / rr
+    f = np.where(losses == 0, p, f)
+    f = np.where((wins == 0) | ~np.isfinite(f), -1.0, f)
+    return np.clip(f, -1.0, 1.0)
+
+
+def _simulate_chunk(r, lr, pos, first_win, horizon, n_paths, rng):
+    idx = rng.integers(0, len(r), size=(horizon, n_paths), dtype=np.int32)
+    # ドローダウン: 対数資産・ピーク・ピークからの最大下落をトレードごとに更新
+    log_equity, peak = np.zeros(n_paths, np.float32), np.zeros(n_paths, np.float32)
+    worst, tmp = np.zeros(n_paths, np.float32), np.empty(n_paths, np.float32)
+    for step in lr[idx]:
+        log_equity += step
+        np.maximum(peak, log_equity, out=peak)
+        np.subtract(log_equity, peak, out=tmp)
+        np.minimum(worst, tmp, out=worst)
+    # ケリーf値: r は昇順に並べてあるため、勝ちトレードは first_win 以降のインデックス
+    wins = np.add.reduce(idx >= first_win, axis=0, dtype=np.int32)
+    gross_won = pos[idx].sum(axis=0, dtype=np.float64)
+    gross_lost = gross_won - r[idx].sum(axis=0, dtype=np.float64)
+    return kelly_fraction(wins, horizon, gross_won, gross_lost), 1.0 - np.exp(worst.astype(np.float64)), np.exp(log_equity.astype(np.float64))
+
+
+def simulate(returns, n_paths=10000, confidence=0.95, horizon=None, rng=None):
+    \"\"\"
+    1銘柄分のトレードリターンをブートストラップし、MC_COLUMNS の値を辞書で返す。
+    horizon: 1パスあたりのトレード数 (省略時は元の取引件数)
+    \"\"\"
+    r = np.sort(np.asarray(returns, dtype=np.float64)).astype(np.float32)
+    horizon = horizon or len(r)
+    rng = rng if rng is not None else np.random.default_rng()
+    lr = np.log1p(np.clip(r, -0.999999, None))
+    pos = np.maximum(r, 0)
+    first_win = int(np.searchsorted(r, 0.0, side='left'))
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // horizon)
+
+    parts = [_simulate_chunk(r, lr, pos, first_win, horizon, min(chunk, n_paths - start), rng) for start in range(0, n_paths, chunk)]
+    kelly, drawdown, equity = (np.concatenate(arrays) for arrays in zip(*parts))
+
+    lower, upper = (1.0 - confidence) * 100, confidence * 100
+    return {
+        'Kelly_MC': float(np.percentile(kelly, lower)),
+        'Kelly_MC_Median': float(np.median(kelly)),
+        'MC_DD_Median': float(np.median(drawdown)),
+        'MC_DD_Worst': float(np.percentile(drawdown, upper)),
+        'MC_Equity_Median': float(np.median(equity)),
+        'MC_Equity_Worst': float(np.percentile(equity, lower)),
+    }
+
+
+def simulate_trade_history(history_df, n_paths=10000, confidence=0.95, min_trades=5, horizon=None, seed=None, group_column='銘柄'):
+    \"\"\"
+    取引履歴を group_column (既定: 銘柄) ごとにブートストラップし、
+    group_column + MC_COLUMNS のDataFrameを返す。取引が min_trades 件未満のグループは NaN。
+    \"\"\"
+    rng = np.random.default_rng(seed)
+    rows = []
+    for key, group in history_df.groupby(history_df[group_column].astype(str), sort=True):
+        returns = trade_returns(group)
+        row = {group_column: key}
+        if len(returns) >= max(min_trades, 1):
+            row.update(simulate(returns, n_paths, confidence, horizon, rng))
+        else:
+            row.update({col: np.nan for col in MC_COLUMNS})
+        rows.append(row)
+    return pd.DataFrame(rows, columns=[group_column] + MC_COLUMNS)""",
+
+    "src/core/streaming/__init__.py": """from .ring_buffer import RingBuffer
+from .indicators import (Bars, StreamingIndicator, StreamingUnsupportedError, SMA, EMA, RSI, ATR, ADX, Stochastic,
+                         BollingerBands, MACD, VWAP, CrossOver)
+from .indicator_set import STREAMING_CLASSES, StreamingIndicatorSet, create_streaming_indicator, bars_from_feed""",
+
+    "src/core/streaming/ring_buffer.py": """class RingBuffer:
+    \"\"\"
+    固定長のリングバッファ。古い値から上書きし、メモリは size 要素で一定。
+    合計 (math.fsum) ・最大・最小のように順序に依存しない集計は items をそのまま使える。
+    \"\"\"
+    __slots__ = ('items', 'size', '_pos', '_count')
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f"RingBuffer のサイズは1以上が必要です: {size}")
+        self.items = []
+        self.size = size
+        self._pos = 0
+        self._count = 0
+
+    def append(self, value):
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            self.items[self._pos] = value
+        self._pos = (self._pos + 1) % self.size
+        self._count += 1
+
+    def extend(self, values):
+        \"\"\"values の末尾 size 件だけを保持する。(append を繰り返した場合と同じ状態)\"\"\"
+        values = list(values)
+        for value in values[-self.size:]:
+            self.append(value)
+        self._count += max(0, len(values) - self.size)
+
+    @property
+    def full(self):
+        return len(self.items) == self.size
+
+    @property
+    def count(self):
+        \"\"\"これまでに追加された値の総数。\"\"\"
+        return self._count
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, ago):
+        \"\"\"Backtrader と同じく 0 が最新、-1 が1つ前の値。\"\"\"
+        if not -len(self.items) < ago <= 0:
+            raise IndexError(f"RingBuffer の範囲外です: {ago}")
+        return self.items[(self._pos - 1 + ago) % len(self.items)]
+
+    def values(self):
+        \"\"\"古い順の値のリスト。\"\"\"
+        if not self.full:
+            return list(self.items)
+        return self.items[self._pos:] + self.items[:self._pos]""",
+
+    "src/core/streaming/indicators.py": """import math
+import collections
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ring_buffer import RingBuffer
+
+# ==============================================================================
+# ストリーミング・インジケーター
+# 1本のバーごとに update() で更新し、計算量・メモリは履歴の長さに依存しない。
+# (窓の集計は期間分のリングバッファ、平滑化は直前の値だけを保持する)
+# 計算式・演算順序は Backtrader の next() (runonce=False、ライブ取引と同じ) と同一で、値は1ビットも違わない。
+#
+# seed(bars) は過去のバー配列から「update() を1本ずつ呼んだ場合と同じ状態」を1回の走査で作る。
+# 要素ごとの演算は numpy、窓の合計と再帰的な平滑化は同じ演算順序のループで計算する。
+#
+# 値の参照は Backtrader のラインと同じく ind[0] / len(ind)。ready は Backtrader の minperiod に達したかどうか。
+# ==============================================================================
+
+NAN = float('nan')
+
+# seed() に渡すバー配列 (datetime は Backtrader の日付番号)
+Bars = collections.namedtuple('Bars', ['datetime', 'open', 'high', 'low', 'close', 'volume'])
+
+
+class StreamingUnsupportedError(Exception):
+    \"\"\"ストリーミング・インジケーターで再現できないインジケーター定義。(呼び出し側は Backtrader のインジケーターを使う)\"\"\"
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+
+class _Average:
+    \"\"\"bt.indicators.SMA (math.fsum による窓合計) と同一の値ストリーム。\"\"\"
+    __slots__ = ('period', 'window', 'value')
+
+    def __init__(self, period):
+        self.period, self.window, self.value = period, RingBuffer(period), NAN
+
+    @property
+    def ready(self):
+        return self.window.full
+
+    def push(self, x):
+        self.window.append(x)
+        if self.window.full:
+            self.value = math.fsum(self.window.items) / self.period
+        return self.value
+
+    def seed(self, values):
+        \"\"\"values を順に push した場合と同じ状態にし、各時点の値の配列を返す。\"\"\"
+        values, p = np.asarray(values, dtype=np.float64).tolist(), self.period
+        out = [NAN] * min(p - 1, len(values)) + [math.fsum(values[i - p + 1:i + 1]) / p for i in range(p - 1, len(values))]
+        self.window.extend(values)
+        if out: self.value = out[-1]
+        return np.array(out)
+
+
+class _Smoothing:
+    \"\"\"bt.indicators.ExponentialSmoothing (シードは期間平均) と同一の値ストリーム。\"\"\"
+    __slots__ = ('period', 'alpha', 'alpha1', 'value', 'count', '_seed')
+
+    def __init__(self, period, alpha):
+        self.period, self.alpha, self.alpha1 = period, alpha, 1.0 - alpha
+        self.value, self.count, self._seed = NAN, 0, []
+
+    @property
+    def ready(self):
+        return self.count >= self.period
+
+    def push(self, x):
+        self.count += 1
+        if self.count > self.period:
+            self.value = self.value * self.alpha1 + x * self.alpha
+        else:
+            self._seed.append(x)
+            if self.count == self.period:
+                self.value, self._seed = math.fsum(self._seed) / self.period, None
+        return self.value
+
+    def seed(self, values):
+        \"\"\"values を順に push した場合と同じ状態にし、各時点の値の配列を返す。\"\"\"
+        values, p = np.asarray(values, dtype=np.float64).tolist(), self.period
+        self.count = len(values)
+        if len(values) < p:
+            self._seed = values
+            return _nan(len(values))
+        prev, alpha, alpha1 = math.fsum(values[:p]) / p, self.alpha, self.alpha1
+        out = [NAN] * (p - 1) + [prev]
+        for x in values[p:]:
+            prev = prev * alpha1 + x * alpha
+            out.append(prev)
+        self.value, self._seed = prev, None
+        return np.array(out)
+
+
+class StreamingIndicator:
+    \"\"\"
+    バー単位で更新するインジケーターの基底クラス。
+    update(dt, open, high, low, close, volume) で1本分を更新し、line0 の値を返す。
+    \"\"\"
+    __slots__ = ('value', 'bars', 'minperiod')
+    line_names = ('value',)
+
+    def __init__(self, minperiod):
+        self.value, self.bars, self.minperiod = NAN, 0, minperiod
+
+    @property
+    def ready(self):
+        return self.bars >= self.minperiod
+
+    def __len__(self):
+        return self.bars
+
+    def __getitem__(self, ago):
+        if ago != 0:
+            raise IndexError("ストリーミング・インジケーターは現在値 [0] のみ参照できます。")
+        return self.value
+
+    def line_values(self):
+        \"\"\"{ライン名: 現在値}。(ログ出力用)\"\"\"
+        return {name: getattr(self, name) for name in self.line_names}
+
+    def retained_values(self):
+        \"\"\"保持している過去値の数 (リングバッファの要素数の合計)。period で決まり、履歴の長さに依存しない。\"\"\"
+        total = 0
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                state = getattr(self, name, None)
+                if isinstance(state, _Average): state = state.window
+                if isinstance(state, RingBuffer): total += len(state)
+        return total
+
+    def update(self, dt, open_, high, low, close, volume):
+        raise NotImplementedError
+
+    def seed(self, bars):
+        \"\"\"bars (Bars) の全バーで update() を呼んだ場合と同じ状態にし、line0 の配列を返す。\"\"\"
+        if self.bars:
+            raise ValueError(f"{type(self).__name__} は更新済みのため seed できません。")
+        self.bars = len(bars.close)
+        return self._seed(bars)
+
+    def _seed(self, bars):
+        raise NotImplementedError
+
+
+class SMA(StreamingIndicator):
+    __slots__ = ('_avg',)
+
+    def __init__(self, period=30):
+        super().__init__(period)
+        self._avg = _Average(period)
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self.value = self._avg.push(close)
+        return self.value
+
+    def _seed(self, bars):
+        out = self._avg.seed(bars.close)
+        self.value = self._avg.value
+        return out
+
+
+class EMA(StreamingIndicator):
+    __slots__ = ('_smooth',)
+
+    def __init__(self, period=30):
+        super().__init__(period)
+        self._smooth = _Smoothing(period, 2.0 / (1.0 + period))
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self.value = self._smooth.push(close)
+        return self.value
+
+    def _seed(self, bars):
+        out = self._smooth.seed(bars.close)
+        self.value = self._smooth.value
+        return out
+
+
+class RSI(StreamingIndicator):
+    \"\"\"SafeRSI と同一。(EMA で平滑化し、平均損失が0なら RS = inf)\"\"\"
+    __slots__ = ('_gain', '_loss', '_prev_close')
+
+    def __init__(self, period=14):
+        super().__init__(period + 1)
+        self._gain, self._loss = _Smoothing(period, 2.0 / (1.0 + period)), _Smoothing(period, 2.0 / (1.0 + period))
+        self._prev_close = NAN
+
+    def update(self, dt, open_, high, low, close, volume):
+        if self.bars:
+            delta = close - self._prev_close
+            avg_gain = self._gain.push(delta if delta > 0 else 0.0)
+            avg_loss = self._loss.push(-delta if delta < 0 else 0.0)
+            if self._loss.ready:
+                rs = avg_gain / avg_loss if avg_loss else math.inf
+                self.value = 100.0 - (100.0 / (1.0 + rs))
+        self.bars += 1
+        self._prev_close = close
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = _nan(len(close))
+        if len(close):
+            self._prev_close = float(close[-1])
+        delta = close[1:] - close[:-1]
+        avg_gain = self._gain.seed(np.where(delta > 0, delta, 0.0))
+        avg_loss = self._loss.seed(np.where(delta < 0, -delta, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.where(avg_loss != 0, avg_gain / avg_loss, np.inf)
+            out[1:] = 100.0 - (100.0 / (1.0 + rs))
+        out[:self.minperiod - 1] = np.nan
+        if self.ready: self.value = float(out[-1])
+        return out
+
+
+class ATR(StreamingIndicator):
+    \"\"\"bt.indicators.ATR と同一。(TrueRange の SMMA)\"\"\"
+    __slots__ = ('_smooth', '_prev_close')
+
+    def __init__(self, period=14):
+        super().__init__(period + 1)
+        self._smooth, self._prev_close = _Smoothing(period, 1.0 / period), NAN
+
+    def update(self, dt, open_, high, low, close, volume):
+        if self.bars:
+            prev_close = self._prev_close
+            self.value = self._smooth.push(max(high, prev_close) - min(low, prev_close))
+        self.bars += 1
+        self._prev_close = close
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        out = _nan(len(close))
+        if len(close):
+            self._prev_close = float(close[-1])
+        prev_close, high, low = close[:-1], high[1:], low[1:]
+        # max(high, prev_close) / min(low, prev_close) と同じ比較
+        true_high = np.where(prev_close > high, prev_close, high)
+        true_low = np.where(prev_close < low, prev_close, low)
+        out[1:] = self._smooth.seed(true_high - true_low)
+        self.value = self._smooth.value
+        return out
+
+
+class ADX(StreamingIndicator):
+    \"\"\"
+    SafeADX と同一。(TR・DM の Wilder 平滑化、ADX は period 本目で DX の単純平均)
+    先頭バーの「前のバー」は先頭バー自身とする。(プリロードしないライブのデータフィードと同じ)
+    \"\"\"
+    __slots__ = ('period', 'adx', 'plusDI', 'minusDI', '_tr', '_plus_dm', '_minus_dm', '_dx', '_prev')
+    line_names = ('adx', 'plusDI', 'minusDI')
+
+    def __init__(self, period=14):
+        super().__init__(1)
+        self.period = period
+        self.value = self.adx = self.plusDI = self.minusDI = 0.0
+        self._tr = self._plus_dm = self._minus_dm = 0.0
+        self._dx = RingBuffer(period)
+        self._prev = None
+
+    def update(self, dt, open_, high, low, close, volume):
+        period = self.period
+        prev_high, prev_low, prev_close = self._prev or (high, low, close)
+        current_tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self._tr = self._tr - (self._tr / period) + current_tr
+
+        move_up, move_down = high - prev_high, prev_low - low
+        current_plus_dm = move_up if move_up > move_down and move_up > 0 else 0.0
+        current_minus_dm = move_down if move_down > move_up and move_down > 0 else 0.0
+        self._plus_dm = self._plus_dm - (self._plus_dm / period) + current_plus_dm
+        self._minus_dm = self._minus_dm - (self._minus_dm / period) + current_minus_dm
+
+        if self._tr > 1e-9:
+            self.plusDI, self.minusDI = 100.0 * self._plus_dm / self._tr, 100.0 * self._minus_dm / self._tr
+        else:
+            self.plusDI, self.minusDI = 0.0, 0.0
+        di_sum = self.plusDI + self.minusDI
+        dx = 100.0 * abs(self.plusDI - self.minusDI) / di_sum if di_sum > 1e-9 else 0.0
+        self._dx.append(dx)
+
+        self.bars += 1
+        if self.bars == period:
+            self.adx = sum(self._dx.values()) / period
+        elif self.bars > period:
+            self.adx = (self.adx * (period - 1) + dx) / period
+        self.value = self.adx
+        self._prev = (high, low, close)
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        period, n = self.period, len(close)
+        if n == 0:
+            return _nan(0)
+        prev_high, prev_low, prev_close = (np.r_[a[0], a[:-1]] for a in (high, low, close))
+
+        # max(a, b, c) と同じ比較順序
+        current_tr = high - low
+        for candidate in (np.abs(high - prev_close), np.abs(low - prev_close)):
+            current_tr = np.where(candidate > current_tr, candidate, current_tr)
+        move_up, move_down = high - prev_high, prev_low - low
+        current_plus_dm = np.where((move_up > move_down) & (move_up > 0), move_up, 0.0)
+        current_minus_dm = np.where((move_down > move_up) & (move_down > 0), move_down, 0.0)
+
+        def wilder(values):
+            out, prev_val = [], 0.0
+            for current_val in values.tolist():
+                prev_val = prev_val - (prev_val / period) + current_val
+                out.append(prev_val)
+            return np.array(out)
+
+        tr, plus_dm, minus_dm = wilder(current_tr), wilder(current_plus_dm), wilder(current_minus_dm)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plus_di = np.where(tr > 1e-9, 100.0 * plus_dm / tr, 0.0)
+            minus_di = np.where(tr > 1e-9, 100.0 * minus_dm / tr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum > 1e-9, 100.0 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+
+        dx_list, adx, out = dx.tolist(), 0.0, []
+        for i, dx_val in enumerate(dx_list):
+            if i + 1 == period:
+                adx = sum(dx_list[:period]) / period
+            elif i + 1 > period:
+                adx = (adx * (period - 1) + dx_val) / period
+            out.append(adx)
+
+        self._tr, self._plus_dm, self._minus_dm = float(tr[-1]), float(plus_dm[-1]), float(minus_dm[-1])
+        self.plusDI, self.minusDI = float(plus_di[-1]), float(minus_di[-1])
+        self._dx.extend(dx_list)
+        self.value = self.adx = adx
+        self._prev = (float(high[-1]), float(low[-1]), float(close[-1]))
+        return np.array(out)
+
+
+class Stochastic(StreamingIndicator):
+    \"\"\"SafeStochastic と同一。(値幅ゼロの期間は %K の素値を0とする)\"\"\"
+    __slots__ = ('percK', 'percD', '_highs', '_lows', '_k', '_d')
+    line_names = ('percK', 'percD')
+
+    def __init__(self, period=14, period_dfast=3, period_dslow=3):
+        super().__init__(period + period_dfast - 1 + period_dslow - 1)
+        self.percK = self.percD = NAN
+        self._highs, self._lows = RingBuffer(period), RingBuffer(period)
+        self._k, self._d = _Average(period_dfast), _Average(period_dslow)
+
+    @staticmethod
+    def _raw_k(close, highest_high, lowest_low):
+        price_range = highest_high - lowest_low
+        safe_num = close - lowest_low if price_range > 1e-9 else 0.0
+        safe_den = price_range if price_range > 1e-9 else 1.0
+        return 100.0 * safe_num / safe_den
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self._highs.append(high)
+        self._lows.append(low)
+        if self._highs.full:
+            self.percK = self._k.push(self._raw_k(close, max(self._highs.items), min(self._lows.items)))
+            if self._k.ready:
+                self.percD = self._d.push(self.percK)
+        self.value = self.percK
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        period, n = self._highs.size, len(close)
+        out = _nan(n)
+        self._highs.extend(high.tolist())
+        self._lows.extend(low.tolist())
+        if n < period:
+            return out
+        highest_high = sliding_window_view(high, period).max(axis=1)
+        lowest_low = sliding_window_view(low, period).min(axis=1)
+        price_range = highest_high - lowest_low
+        safe_num = np.where(price_range > 1e-9, close[period - 1:] - lowest_low, 0.0)
+        safe_den = np.where(price_range > 1e-9, price_range, 1.0)
+        perc_k = self._k.seed((100.0 * safe_num) / safe_den)
+        out[period - 1:] = perc_k
+        self.value = self.percK = self._k.value
+        k_start = self._k.period - 1
+        if len(perc_k) > k_start:
+            self._d.seed(perc_k[k_start:])
+            self.percD = self._d.value
+        return out
+
+
+class BollingerBands(StreamingIndicator):
+    \"\"\"bt.indicators.BollingerBands (SMA、標準偏差は pow(abs(E[x^2] - E[x]^2), 0.5)) と同一。\"\"\"
+    __slots__ = ('devfactor', 'mid', 'top', 'bot', '_mid', '_meansq')
+    line_names = ('mid', 'top', 'bot')
+
+    def __init__(self, period=20, devfactor=2.0):
+        super().__init__(period)
+        self.devfactor = devfactor
+        self.mid = self.top = self.bot = NAN
+        self._mid, self._meansq = _Average(period), _Average(period)
+
+    def _set_bands(self, mid, meansq):
+        stddev = self.devfactor * pow(abs(meansq - pow(mid, 2)), 0.5)
+        self.value = self.mid = mid
+        self.top, self.bot = mid + stddev, mid - stddev
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        mid, meansq = self._mid.push(close), self._meansq.push(pow(close, 2))
+        if self._mid.ready:
+            self._set_bands(mid, meansq)
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = self._mid.seed(close)
+        self._meansq.seed([pow(x, 2) for x in close.tolist()])
+        if self._mid.ready:
+            self._set_bands(self._mid.value, self._meansq.value)
+        return out
+
+
+class MACD(StreamingIndicator):
+    \"\"\"bt.indicators.MACD と同一。(macd = EMA(me1) - EMA(me2)、signal = EMA(macd))\"\"\"
+    __slots__ = ('macd', 'signal', '_me1', '_me2', '_signal')
+    line_names = ('macd', 'signal')
+
+    def __init__(self, period_me1=12, period_me2=26, period_signal=9):
+        super().__init__(max(period_me1, period_me2) + period_signal - 1)
+        self.macd = self.signal = NAN
+        self._me1 = _Smoothing(period_me1, 2.0 / (1.0 + period_me1))
+        self._me2 = _Smoothing(period_me2, 2.0 / (1.0 + period_me2))
+        self._signal = _Smoothing(period_signal, 2.0 / (1.0 + period_signal))
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        me1, me2 = self._me1.push(close), self._me2.push(close)
+        if self._me1.ready and self._me2.ready:
+            self.value = self.macd = me1 - me2
+            self.signal = self._signal.push(self.macd)
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = self._me1.seed(close) - self._me2.seed(close)
+        start = max(self._me1.period, self._me2.period) - 1
+        if len(out) > start:
+            self._signal.seed(out[start:])
+            self.value = self.macd = float(out[-1])
+            self.signal = self._signal.value
+        return out
+
+
+class VWAP(StreamingIndicator):
+    \"\"\"
+    VWAP インジケーター (src.core.indicators.VWAP) と同一。先頭バーは計算せず、日付が変わると累積をリセットする。
+    日付は Backtrader の日付番号の整数部で判定する。(タイムゾーンを指定しないデータフィードの date() と同じ)
+    \"\"\"
+    __slots__ = ('vwap', '_cum_tpv', '_cum_volume', '_day')
+    line_names = ('vwap',)
+
+    def __init__(self):
+        super().__init__(1)
+        self.vwap, self._cum_tpv, self._cum_volume, self._day = NAN, 0.0, 0.0, None
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        day = int(dt)
+        if self.bars > 1:
+            if day != self._day:
+                self._cum_tpv = self._cum_volume = 0.0
+            tp = (high + low + close) / 3.0
+            self._cum_tpv += tp * volume
+            self._cum_volume += volume
+            self.value = self.vwap = self._cum_tpv / self._cum_volume if self._cum_volume > 0 else tp
+        self._day = day
+        return self.value
+
+    def _seed(self, bars):
+        n = len(bars.close)
+        out = _nan(n)
+        if n == 0:
+            return out
+        days = np.asarray(bars.datetime, dtype=np.float64).astype(np.int64)
+        self._day = int(days[-1])
+        if n == 1:
+            return out
+        high, low, close, volume = (np.asarray(a, dtype=np.float64)[1:] for a in (bars.high, bars.low, bars.close, bars.volume))
+        tp = ((high + low) + close) / 3.0
+        tpv = tp * volume
+        # 日付が変わる位置で区切り、区間ごとに先頭から順に累積する
+        cuts = (np.flatnonzero(days[1:] != days[:-1])).tolist()
+        cum_tpv = cum_volume = 0.0
+        for a, b in zip([0] + cuts, cuts + [n - 1]):
+            if a == b:
+                continue
+            seg_tpv = np.cumsum(np.r_[0.0, tpv[a:b]])[1:]
+            seg_volume = np.cumsum(np.r_[0.0, volume[a:b]])[1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[1 + a:1 + b] = np.where(seg_volume > 0, seg_tpv / seg_volume, tp[a:b])
+            cum_tpv, cum_volume = float(seg_tpv[-1]), float(seg_volume[-1])
+        self._cum_tpv, self._cum_volume = cum_tpv, cum_volume
+        self.value = self.vwap = float(out[-1])
+        return out
+
+
+class CrossOver(StreamingIndicator):
+    \"\"\"
+    bt.indicators.CrossOver と同一。(上抜け: 1.0、下抜け: -1.0、それ以外: 0.0)
+    2つのストリーミング・インジケーターの line0 を比較する。両者の更新後に update() を呼ぶ。
+    \"\"\"
+    __slots__ = ('ind1', 'ind2', '_prev_diff')
+
+    def __init__(self, ind1, ind2):
+        super().__init__(max(ind1.minperiod, ind2.minperiod) + 1)
+        self.ind1, self.ind2, self._prev_diff = ind1, ind2, None
+
+    def update(self, *_):
+        self.bars += 1
+        if not (self.ind1.ready and self.ind2.ready):
+            return self.value
+        a, b = self.ind1.value, self.ind2.value
+        prev = self._prev_diff
+        if prev is not None:  # 最初の1本は直前の差のシードのみ
+            self.value = float(prev < 0.0 and a > b) - float(prev > 0.0 and a < b)
+        diff = a - b
+        self._prev_diff = diff if diff or prev is None else prev
+        return self.value
+
+    def seed(self, values1, values2):
+        \"\"\"2つの line0 の配列 (各インジケーターの seed() の戻り値) から状態を作り、クロスの配列を返す。\"\"\"
+        if self.bars:
+            raise ValueError("CrossOver は更新済みのため seed できません。")
+        values1, values2 = np.asarray(values1, dtype=np.float64), np.asarray(values2, dtype=np.float64)
+        n, start = len(values1), self.minperiod - 2  # start: 両インジケーターが揃う最初のバー
+        self.bars = n
+        out = _nan(n)
+        if n <= start:
+            return out
+        diff = values1[start:] - values2[start:]
+        # 直前の「ゼロでない差」(NonZeroDifference): 差がゼロのバーは直前の値を引き継ぐ
+        positions = np.arange(len(diff))
+        prev_diff = diff[np.maximum.accumulate(np.where(diff != 0, positions, 0))]
+        up = (prev_diff[:-1] < 0.0) & (values1[start + 1:] > values2[start + 1:])
+        down = (prev_diff[:-1] > 0.0) & (values1[start + 1:] < values2[start + 1:])
+        out[start + 1:] = up.astype(np.float64) - down.astype(np.float64)
+        self._prev_diff = float(prev_diff[-1])
+        self.value = float(out[-1])
+        return out""",
+
+    "src/core/streaming/indicator_set.py": """import numpy as np
+import backtrader as bt
+
+from ..indicators import SafeStochastic, VWAP as BtVWAP, SafeADX, SafeRSI
+from .indicators import (Bars, StreamingUnsupportedError, SMA, EMA, RSI, ATR, ADX, Stochastic,
+                         BollingerBands, MACD, VWAP)
+
+# Backtrader のインジケータークラス (StrategyInitializer._find_indicator_class の解決結果) -> ストリーミング版
+STREAMING_CLASSES = {
+    bt.indicators.SMA: SMA,
+    bt.indicators.EMA: EMA,
+    bt.indicators.BollingerBands: BollingerBands,
+    bt.indicators.MACD: MACD,
+    bt.indicators.ATR: ATR,
+    SafeRSI: RSI,
+    SafeStochastic: Stochastic,
+    SafeADX: ADX,
+    BtVWAP: VWAP,
+}
+
+
+def create_streaming_indicator(ind_cls, params):
+    \"\"\"
+    Backtrader のインジケータークラスとパラメータから、同じ計算のストリーミング・インジケーターを生成する。
+    パラメータの既定値は Backtrader 側の定義を使う。移動平均の種類 (movav) の変更など、
+    再現できない指定は StreamingUnsupportedError。
+    \"\"\"
+    streaming_cls = STREAMING_CLASSES.get(ind_cls)
+    if streaming_cls is None:
+        raise StreamingUnsupportedError(f"ストリーミング版が未定義のインジケーター: {ind_cls.__name__}")
+    defaults = dict(ind_cls.params._getitems())
+    unknown = (set(params) - set(defaults)) | (set(params) & {'movav'})
+    if unknown:
+        raise StreamingUnsupportedError(f"{ind_cls.__name__} の未対応パラメータ: {sorted(unknown)}")
+    defaults.pop('movav', None)
+    defaults.update(params)
+    return streaming_cls(**defaults)
+
+
+def bars_from_feed(data_feed, size):
+    \"\"\"データフィードの直近 size 本を Bars (numpy 配列) にする。\"\"\"
+    return Bars(*(np.array(getattr(data_feed, name).get(size=size), dtype=np.float64)
+                  for name in Bars._fields))
+
+
+class StreamingIndicatorSet(dict):
+    \"\"\"
+    {インジケーターキー: ストリーミング・インジケーター}。キーは StrategyInitializer.create_indicators と同じ。
+    update(data_feeds) を呼ぶと、前回以降に各時間足のフィードへ追加されたバーを反映する。
+    初回に複数本のバーがある場合は seed() で履歴全体を1回の走査で取り込み、以降は1本ずつ定数時間で更新する。
+    (seed はフィードが全履歴を保持している必要がある。ライン・バッファを制限する場合 (exactbars) は毎バー呼ぶこと)
+    \"\"\"
+
+    def __init__(self):
+        super().__init__()
+        self._by_timeframe = {}   # 時間足 -> [インジケーター]
+        self._crosses = {}        # 時間足 -> [CrossOver]
+        self._seen = {}           # 時間足 -> 反映済みのバー数
+        self._absorbed = {}       # 時間足 -> 反映済みの最終バーの日時 (Backtrader の日時数値)
+        self._resume_after = {}   # 時間足 -> 復元時に読み飛ばす最終バーの日時 (resume)
+
+    def add(self, key, timeframe, indicator):
+        self[key] = indicator
+        self._by_timeframe.setdefault(timeframe, []).append(indicator)
+        self._crosses.setdefault(timeframe, [])
+        self._seen.setdefault(timeframe, 0)
+
+    def add_cross(self, key, timeframe, cross):
+        self[key] = cross
+        self._crosses.setdefault(timeframe, []).append(cross)
+
+    @property
+    def ready(self):
+        \"\"\"全インジケーターが Backtrader の minperiod に達したか。(未達の間はストラテジーの prenext に相当)\"\"\"
+        return all(indicator.ready for indicator in self.values())
+
+    def retained_values(self):
+        \"\"\"全インジケーターが保持している過去値の数。(メモリ使用量の報告用)\"\"\"
+        return sum(indicator.retained_values() for indicator in self.values())
+
+    def seed(self, timeframe, bars):
+        \"\"\"時間足 timeframe のインジケーターを過去のバー配列で初期化する。\"\"\"
+        line0 = {id(indicator): indicator.seed(bars) for indicator in self._by_timeframe[timeframe]}
+        for cross in self._crosses[timeframe]:
+            cross.seed(line0[id(cross.ind1)], line0[id(cross.ind2)])
+        self._seen[timeframe] = len(bars.close)
+        if len(bars.close): self._absorbed[timeframe] = float(bars.datetime[-1])
+
+    @property
+    def timeframes(self):
+        return tuple(self._by_timeframe)
+
+    @property
+    def absorbed(self):
+        \"\"\"{時間足: 反映済みの最終バーの日時}。スナップショットに保存し、復元時に resume に渡す。\"\"\"
+        return dict(self._absorbed)
+
+    def resume(self, last_datetimes):
+        \"\"\"
+        スナップショット (pickle) から復元したインジケーター群を新しいフィードに接続する。
+        last_datetimes ({時間足: 反映済みの最終バーの日時 (Backtrader の日時数値)}) 以前のバーは
+        フィードが再供給しても反映済みとして読み飛ばし、それより新しいバーから更新を再開する。
+        \"\"\"
+        self._seen = dict.fromkeys(self._seen, 0)
+        self._resume_after = dict(last_datetimes)
+
+    def update(self, data_feeds):
+        for timeframe, indicators in self._by_timeframe.items():
+            data_feed = data_feeds[timeframe]
+            total, seen = len(data_feed), self._seen[timeframe]
+            if total <= seen:
+                continue
+            resume_after = self._resume_after.get(timeframe)
+            if seen == 0 and total > 1 and resume_after is None:
+                self.seed(timeframe, bars_from_feed(data_feed, total))
+                continue
+            crosses = self._crosses[timeframe]
+            lines = (data_feed.datetime, data_feed.open, data_feed.high, data_feed.low, data_feed.close, data_feed.volume)
+            for ago in range(seen - total + 1, 1):
+                if resume_after is not None:
+                    if data_feed.datetime[ago] <= resume_after:
+                        continue
+                    del self._resume_after[timeframe]
+                    resume_after = None
+                bar = [line[ago] for line in lines]
+                for indicator in indicators:
+                    indicator.update(*bar)
+                for cross in crosses:
+                    cross.update()
+                self._absorbed[timeframe] = bar[0]
+            self._seen[timeframe] = total""",
+
+    "src/core/util/db_writer.py": """import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# SQLite 書き込みスレッド
+# 全データベースへの書き込みを1つの専用スレッドでまとめて行う。
+#   - 呼び出し側 (ストラテジーのスレッドなど) はキューに積むだけで、ディスクI/Oを待たない
+#   - WAL モードで開くため、読み取り (モニター等の別プロセス) と書き込みは互いを待たない
+#   - キューに積まれた書き込みを最大 MAX_DELAY 秒・MAX_BATCH 件ごとに1回のトランザクションでコミットする
+#   - 同じSQL文の連続する書き込みは executemany でまとめて実行する (コンパイル済みの文が再利用される)
+# ==============================================================================
+
+MAX_DELAY = 0.05
+MAX_BATCH = 500
+
+
+class _Write:
+    __slots__ = ('path', 'sql', 'params', 'on_error')
+
+    def __init__(self, path, sql, params, on_error):
+        self.path, self.sql, self.params, self.on_error = path, sql, params, on_error
+
+
+class _Call:
+    __slots__ = ('path', 'fn', 'future')
+
+    def __init__(self, path, fn):
+        self.path, self.fn, self.future = path, fn, Future()
+
+
+class Database:
+    \"\"\"DBWriter 上の1つのデータベースへの書き込み窓口。\"\"\"
+    def __init__(self, writer, path):
+        self._writer = writer
+        self.path = path
+
+    def execute(self, sql, params=(), on_error=None):
+        \"\"\"
+        書き込みをキューに積む (待たない)。
+        params に呼び出し可能オブジェクトを渡すと、書き込みスレッドで実行直前に評価する。
+        on_error(conn, params, error) を渡すと、この書き込みが失敗した場合に書き込みスレッドで呼び出す。
+        \"\"\"
+        self._writer.put(_Write(self.path, sql, params, on_error))
+
+    def call(self, fn) -> Future:
+        \"\"\"それまでに積まれた書き込みをコミットした後、書き込みスレッドで fn(conn) を実行する。戻り値は Future。\"\"\"
+        item = _Call(self.path, fn)
+        self._writer.put(item)
+        return item.future
+
+    def flush(self, timeout=None):
+        \"\"\"それまでに積まれた書き込みがコミットされるまで待つ。\"\"\"
+        self.call(lambda conn: None).result(timeout)
+
+    def close(self, timeout=10):
+        \"\"\"積まれた書き込みをコミットして接続を閉じる。\"\"\"
+        self._writer.close_database(self.path, timeout)
+
+
+class DBWriter(threading.Thread):
+    \"\"\"書き込みキューを処理する専用スレッド。接続はこのスレッドだけが使う。\"\"\"
+    def __init__(self, max_delay=MAX_DELAY, max_batch=MAX_BATCH):
+        super().__init__(name="DBWriter", daemon=True)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._connections = {}
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def open_database(self, path, schema=()) -> Database:
+        \"\"\"データベースを WAL モードで開き (既に開いていれば共有し)、schema の文を実行する。\"\"\"
+        database = Database(self, path)
+
+        def _open(_):
+            conn = self._connections.get(path)
+            opened = conn is None
+            try:
+                if opened:
+                    conn = sqlite3.connect(path, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                for statement in schema:
+                    conn.execute(statement)
+            except sqlite3.Error:
+                if opened and conn is not None:
+                    conn.close()
+                raise
+            if opened:
+                self._connections[path] = conn
+
+        with self._lock:
+            if not self.is_alive():
+                self.start()
+        # 接続・スキーマの作成に失敗した場合は、呼び出し元へ sqlite3.Error を送出する
+        item = _Call(None, _open)
+        self.put(item)
+        item.future.result()
+        return database
+
+    def close_database(self, path, timeout=10):
+        def _close(_):
+            conn = self._connections.pop(path, None)
+            if conn is not None:
+                conn.close()
+        item = _Call(None, _close)
+        self.put(item)
+        item.future.result(timeout)
+
+    def flush_all(self, timeout=10):
+        item = _Call(None, lambda conn: None)
+        self.put(item)
+        item.future.result(timeout)
+
+    def run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            # 呼び出し (flush・読み取り等) は待たせずにすぐ処理する
+            while len(batch) < self.max_batch and not isinstance(batch[-1], _Call):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"DB writer error: {e}", exc_info=True)
+
+    def _process(self, batch):
+        open_transactions = set()
+        i = 0
+        while i < len(batch):
+            item = batch[i]
+            if isinstance(item, _Call):
+                self._commit(open_transactions)
+                # 呼び出しは自動コミットモードで実行する
+                conn = self._connections.get(item.path)
+                try:
+                    if item.path is not None and conn is None:
+                        raise sqlite3.OperationalError(f"Database is not open: {item.path}")
+                    item.future.set_result(item.fn(conn))
+                except Exception as e:
+                    item.future.set_exception(e)
+                i += 1
+                continue
+
+            # 同じデータベース・同じSQL文の連続する書き込みをまとめる
+            j = i + 1
+            while j < len(batch) and isinstance(batch[j], _Write) and batch[j].path == item.path and batch[j].sql == item.sql:
+                j += 1
+            conn = self._connections.get(item.path)
+            if conn is None:
+                logger.error(f"Database is not open: {item.path} (dropped {j - i} writes)")
+            else:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                open_transactions.add(item.path)
+                self._execute_run(conn, batch[i:j])
+            i = j
+        self._commit(open_transactions)
+
+    def _execute_run(self, conn, writes):
+        rows = []
+        for write in writes:
+            try:
+                rows.append(write.params() if callable(write.params) else write.params)
+            except Exception as e:
+                logger.error(f"DB write dropped ({write.path}): failed to build parameters: {e}")
+                rows.append(None)
+        writes = [w for w, params in zip(writes, rows) if params is not None]
+        rows = [params for params in rows if params is not None]
+        if not writes:
+            return
+        conn.execute("SAVEPOINT run")
+        try:
+            conn.executemany(writes[0].sql, rows)
+            conn.execute("RELEASE run")
+            self.writes += len(writes)
+            return
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO run")
+            conn.execute("RELEASE run")
+        # 失敗した書き込みを特定するため1件ずつ実行する
+        for write, params in zip(writes, rows):
+            try:
+                conn.execute(write.sql, params)
+                self.writes += 1
+            except sqlite3.Error as e:
+                if write.on_error is None:
+                    logger.error(f"DB write failed ({write.path}): {e} / SQL: {' '.join(write.sql.split())[:80]}")
+                    continue
+                try:
+                    write.on_error(conn, params, e)
+                except Exception as handler_error:
+                    logger.error(f"DB write failed ({write.path}): {handler_error} / SQL: {' '.join(write.sql.split())[:80]}")
+
+    def _commit(self, open_transactions):
+        for path in open_transactions:
+            conn = self._connections.get(path)
+            try:
+                conn.execute("COMMIT")
+                self.commits += 1
+            except sqlite3.Error as e:
+                logger.error(f"DB commit failed ({path}): {e}")
+        open_transactions.clear()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DBWriter:
+    \"\"\"プロセス共有の書き込みスレッドを返す。\"\"\"
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBWriter()
+            atexit.register(_flush_at_exit)
+        return _writer
+
+
+def open_database(path, schema=()) -> Database:
+    return get_writer().open_database(path, schema)
+
+
+def _flush_at_exit():
+    if _writer is not None and _writer.is_alive():
+        try:
+            _writer.flush_all(timeout=5)
+        except Exception as e:
+            logger.error(f"Failed to flush DB writes at exit: {e}")"""
 }
 
 
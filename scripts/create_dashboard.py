@@ -77,8 +77,7 @@ if __name__ == '__main__':
     app.run(debug=True, port=5002)
 """,
 
-    "src/dashboard/chart_generator.py": """
-import os
+    "src/dashboard/chart_generator.py": """import os
 import glob
 import pandas as pd
 import plotly.graph_objects as go
@@ -88,6 +87,8 @@ import yaml
 import logging
 from collections import defaultdict
 
+from src.core import data_cache
+
 logger = logging.getLogger(__name__)
 
 # --- 定数定義 (新しいディレクトリ構造に対応) ---
@@ -154,9 +155,7 @@ def load_data():
 
                 if data_files:
                     try:
-                        df = pd.read_csv(data_files[0], index_col='datetime', parse_dates=True)
-                        df.columns = [x.lower() for x in df.columns]
-                        if df.index.tz is not None: df.index = df.index.tz_localize(None)
+                        df = data_cache.read_ohlcv(data_files[0], tz_naive=True)
                         price_data_cache[symbol][tf_name] = df
                     except Exception as e:
                         logger.error(f"[{symbol}] {tf_name}のデータ読み込みに失敗: {data_files[0]} - {e}")
@@ -376,8 +375,7 @@ def generate_chart_json(symbol, timeframe_name, indicator_params):
     if timeframe_name != 'long': fig.update_xaxes(rangebreaks=[dict(bounds=["sat", "mon"]), dict(bounds=[15, 9], pattern="hour"), dict(bounds=[11.5, 12.5], pattern="hour")])
     else: fig.update_xaxes(rangebreaks=[dict(bounds=["sat", "mon"])])
     
-    return pio.to_json(fig)
-""",
+    return pio.to_json(fig)""",
 
     "src/dashboard/templates/index.html": """
 <!DOCTYPE html>
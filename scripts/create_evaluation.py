@@ -6,7 +6,12 @@ import sys
 # 説明: リファクタリング計画に基づき、全戦略の評価と集計を行う`evaluation`パッケージを生成します。
 #       このスクリプトは、リファクタリングのフェーズ2.2で一度だけ実行することを想定しています。
 # 実行方法: python create_evaluation.py
-# Ver. 00-03
+# Ver. 00-12
+# 変更点:
+#   - result_cache.py:
+#     - キャッシュのキーにバックテストエンジン (backtrader / vectorized) を含めるようにした。(エンジンの異なる結果を再利用しない)
+#   - engine.py:
+#     - job_key にバックテストエンジンを渡すようにした。
 # ==============================================================================
 
 project_files = {
@@ -14,10 +19,11 @@ project_files = {
 
     "src/evaluation/run_evaluation.py": """import sys
 import os
+import argparse
 
 # ------------------------------------------------------------------------------
 # このスクリプトを直接実行することで、全戦略の評価プロセスを開始します。
-# `python -m src.evaluation.run_evaluation`
+# `python -m src.evaluation.run_evaluation [--force] [--resume <結果ディレクトリ>]`
 # ------------------------------------------------------------------------------
 
 # プロジェクトのルートディレクトリをPythonのパスに追加
@@ -32,155 +38,88 @@ from src.core.util import logger as logger_setup
 from . import config_evaluation as config
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略カタログの全戦略を評価します。')
+    parser.add_argument('--force', action='store_true', help='評価結果キャッシュを使用せず、全ジョブを再計算する')
+    parser.add_argument('--resume', metavar='RUN_DIR', default=None, help='中断した評価の結果ディレクトリを指定し、未完了のジョブだけを実行する')
+    args = parser.parse_args()
     # evaluationモジュール自体のロガーを、設定ファイルに基づいてセットアップ
     logger_setup.setup_logging('log', log_prefix='evaluation', level=config.LOG_LEVEL)
-    main()
+    main(force=args.force, resume_dir=args.resume)
 # ▲▲▲【変更箇所ここまで】▲▲▲""",
 
     "src/evaluation/orchestrator.py": """import os
 import re
-import sys
 import yaml
-import subprocess
-import shutil
-import glob
 from datetime import datetime
-import pandas as pd
 import logging
-import time
 
 # ▼▼▼【変更箇所】▼▼▼
 # [リファクタリング] 新しいパッケージ構造に合わせてインポートを変更
 from . import aggregator
 from . import config_evaluation as config # evaluation専用設定をインポート
+from .engine import EvaluationEngine
+from .result_cache import ResultCache
+from .checkpoint import RunManifest
 # ▲▲▲【変更箇所ここまで】▲▲▲
 
 # --- 定数定義 ---
 STRATEGY_CATALOG_FILE = 'config/strategy_catalog.yml'
 BASE_STRATEGY_FILE = 'config/strategy_base.yml'
-BACKTEST_CONFIG_FILE = 'src/backtest/config_backtest.py' # <-- [追加]
 RESULTS_ROOT_DIR = 'results/evaluation'
-BACKTEST_REPORT_DIR = 'results/backtest'
 
 
-def run_single_backtest(strategy_def, base_config):
-    \"\"\"
-    単一の戦略でバックテストを実行します。
-    設定ファイルを一時的に書き換え、実行後に必ず元の状態に戻します。
-    \"\"\"
-    strategy_name = strategy_def.get('name', 'Unnamed Strategy')
-    logging.info(f"--- 戦略 '{strategy_name}' のバックテストを開始 ---")
+def get_strategy_result_dir(results_dir, strategy_index, strategy_name):
+    \"\"\"戦略ごとの結果ディレクトリのパスを返す。\"\"\"
+    sanitized_name = re.sub(r'[^\\w\\s-]', '', strategy_name).strip().replace(' ', '_')
+    return os.path.join(results_dir, f"strategy_{strategy_index+1:02d}_{sanitized_name}")
 
-    if strategy_def.get('unsupported'):
-        logging.warning(f"戦略 '{strategy_name}' は未サポートのためスキップします。理由: {strategy_def.get('reason', 'N/A')}")
-        return False
 
-    # ▼▼▼【変更箇所: 全面的なロジック変更】▼▼▼
-    original_strategy_content = None
-    original_backtest_config_content = None
+def load_inputs():
+    \"\"\"戦略カタログとベース設定を読み込む。失敗した場合は (None, None)。\"\"\"
+    try:
+        with open(STRATEGY_CATALOG_FILE, 'r', encoding='utf-8') as f:
+            strategies = yaml.safe_load(f)
+        logging.info(f"{len(strategies)} 件の戦略を '{STRATEGY_CATALOG_FILE}' から正常に読み込みました。")
+    except Exception as e:
+        logging.error(f"'{STRATEGY_CATALOG_FILE}' の読み込みに失敗しました: {e}")
+        return None, None
 
     try:
-        # --- 1. 元の設定ファイルを読み込んで保持 ---
-        # a) 戦略ファイル
         with open(BASE_STRATEGY_FILE, 'r', encoding='utf-8') as f:
-            original_strategy_content = f.read()
-        # b) バックテスト設定ファイル
-        with open(BACKTEST_CONFIG_FILE, 'r', encoding='utf-8') as f:
-            original_backtest_config_content = f.readlines()
-
-        # --- 2. 設定ファイルを一時的に上書き ---
-        # a) 戦略ファイルを今回の戦略内容で上書き
-        current_config = base_config.copy()
-        current_config['strategy_name'] = strategy_name
-        current_config['entry_conditions'] = strategy_def.get('entry_conditions')
-        with open(BASE_STRATEGY_FILE, 'w', encoding='utf-8') as f:
-            yaml.dump(current_config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
-        
-        # b) バックテスト設定ファイルのログレベルを上書き
-        level_override = config.BACKTEST_LOG_LEVEL_OVERRIDE
-        new_line = f"LOG_LEVEL = None\\n" if level_override == 'NONE' else f"LOG_LEVEL = logging.{level_override}\\n"
-        
-        modified_config = []
-        for line in original_backtest_config_content:
-            if line.strip().startswith('LOG_LEVEL ='):
-                modified_config.append(new_line)
-            else:
-                modified_config.append(line)
-        
-        with open(BACKTEST_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            f.writelines(modified_config)
-        logging.info(f"バックテストのログレベルを '{level_override}' に一時変更しました。")
-
-        # --- 3. バックテストのサブプロセスを実行 ---
-        logging.info("'run_backtest'モジュールを実行します...")
-        python_executable = sys.executable
-        result = subprocess.run(
-            [python_executable, '-m', 'src.backtest.run_backtest'],
-            check=True, text=True, encoding=sys.stdout.encoding, errors='replace',
-            capture_output=True
-        )
-
-        if result.stdout: logging.info(f"--- 'run_backtest' の出力 ---\\n{result.stdout.strip()}")
-        logging.info("'run_backtest' が正常に完了しました。")
-        return True
-
+            base_config = yaml.safe_load(f)
     except Exception as e:
-        logging.error(f"バックテスト実行中にエラーが発生: {e}", exc_info=True)
-        if isinstance(e, subprocess.CalledProcessError):
-            if e.stdout: logging.error(f"--- STDOUT ---\\n{e.stdout.strip()}")
-            if e.stderr: logging.error(f"--- STDERR ---\\n{e.stderr.strip()}")
-        return False
-    
-    finally:
-        # --- 4. 必ず元のファイル内容に復元 ---
-        if original_strategy_content is not None:
-            with open(BASE_STRATEGY_FILE, 'w', encoding='utf-8') as f:
-                f.write(original_strategy_content)
-        if original_backtest_config_content is not None:
-            with open(BACKTEST_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                f.writelines(original_backtest_config_content)
-            logging.info(f"'{BACKTEST_CONFIG_FILE}' を元の状態に復元しました。")
-    # ▲▲▲【変更箇所ここまで】▲▲▲
-
-
-def move_and_rename_reports(strategy_result_dir):
-    \"\"\"
-    生成された最新のレポートファイルを戦略ごとのディレクトリに移動・リネームします。
-    \"\"\"
-    report_types = ['summary', 'detail', 'trade_history']
-    for report_type in report_types:
-        try:
-            search_pattern = os.path.join(BACKTEST_REPORT_DIR, f"{report_type}_*.csv")
-            list_of_files = glob.glob(search_pattern)
-            if not list_of_files:
-                logging.warning(f"警告: '{report_type}' のレポートファイルが見つかりません。")
-                continue
-
-            latest_file = max(list_of_files, key=os.path.getctime)
-            destination_path = os.path.join(strategy_result_dir, f"{report_type}.csv")
-
-            for _ in range(3):
-                try:
-                    shutil.move(latest_file, destination_path)
-                    logging.info(f"'{os.path.basename(latest_file)}' を '{destination_path}' に移動しました。")
-                    break
-                except PermissionError:
-                    logging.warning(f"'{latest_file}' の移動に失敗しました。0.5秒待機してリトライします。")
-                    time.sleep(0.5)
-            else:
-                logging.error(f"'{latest_file}' の移動に失敗しました。")
-
-        except Exception as e:
-            logging.error(f"レポートファイル '{report_type}' の移動中に予期せぬエラーが発生しました: {e}")
+        logging.error(f"'{BASE_STRATEGY_FILE}' の読み込みに失敗しました: {e}")
+        return None, None
+    return base_config, strategies
 
 
-def main():
+def main(force=False, resume_dir=None):
     \"\"\"
     スクリプトのメイン処理。
+    force: True の場合、評価結果キャッシュを使用せずに全ジョブを再計算する。(結果はキャッシュに保存)
+    resume_dir: 中断した実行の結果ディレクトリ。指定した場合は同じ入力で未完了のジョブだけを実行する。
     \"\"\"
-    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
-    current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
-    os.makedirs(current_results_dir, exist_ok=True)
+    # ▼▼▼【変更箇所: 完了したジョブを manifest.jsonl にチェックポイントし、--resume で再開可能に】▼▼▼
+    completed = {}
+    if resume_dir:
+        current_results_dir = resume_dir.rstrip('/\\\\')
+        timestamp = os.path.basename(current_results_dir)
+        manifest = RunManifest(current_results_dir)
+        try:
+            base_config, strategies = manifest.load_run_config()
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"'{current_results_dir}' は再開できる評価結果ディレクトリではありません: {e}")
+            return
+        completed = manifest.load_completed()
+        logging.info(f"'{current_results_dir}' の評価を再開します。(完了済み: {len(completed)} ジョブ)")
+    else:
+        timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+        current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
+        base_config, strategies = load_inputs()
+        if strategies is None: return
+        manifest = RunManifest(current_results_dir)
+        manifest.save_run_config(base_config, strategies)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     
     # ▼▼▼【変更箇所: ロガー初期化呼び出しを削除】▼▼▼
     # logger_setup.setup_logging('log', log_prefix='evaluation') # この行はrun_evaluation.pyに移動
@@ -188,35 +127,27 @@ def main():
 
     logging.info(f"結果保存ディレクトリ: '{current_results_dir}'")
 
+    # ▼▼▼【変更箇所: 設定ファイル書き換え + サブプロセス実行を、インプロセスの並列評価エンジンに置換】▼▼▼
+    def save_strategy_result(strategy_result):
+        strategy_result_dir = get_strategy_result_dir(current_results_dir, strategy_result.index, strategy_result.name)
+        strategy_result.save(strategy_result_dir)
+        logging.info(f"戦略 '{strategy_result.name}' のレポートを '{strategy_result_dir}' に保存しました。")
+
+    result_cache = ResultCache(config.RESULT_CACHE_DIR, read=not force) if config.USE_RESULT_CACHE else None
+    engine = EvaluationEngine(
+        base_config, strategies,
+        max_workers=config.MAX_WORKERS,
+        log_level_override=config.BACKTEST_LOG_LEVEL_OVERRIDE,
+        backtest_engine=config.BACKTEST_ENGINE,
+        result_cache=result_cache
+    )
     try:
-        with open(STRATEGY_CATALOG_FILE, 'r', encoding='utf-8') as f:
-            strategies = yaml.safe_load(f)
-        logging.info(f"{len(strategies)} 件の戦略を '{STRATEGY_CATALOG_FILE}' から正常に読み込みました。")
-    except Exception as e:
-        logging.error(f"'{STRATEGY_CATALOG_FILE}' の読み込みに失敗しました: {e}")
-        return
-
-    try:
-        with open(BASE_STRATEGY_FILE, 'r', encoding='utf-8') as f:
-            base_config = yaml.safe_load(f)
-    except Exception as e:
-        logging.error(f"'{BASE_STRATEGY_FILE}' の読み込みに失敗しました: {e}")
-        return
-
-    # [修正] strategy_base.ymlの復元ロジックはrun_single_backtestに移動したため、ここからは削除
-    total_strategies = len(strategies)
-    for i, strategy_def in enumerate(strategies):
-        strategy_name = strategy_def.get('name', f"Strategy_{i+1}")
-        sanitized_name = re.sub(r'[^\\w\\s-]', '', strategy_name).strip().replace(' ', '_')
-        strategy_result_dir = os.path.join(current_results_dir, f"strategy_{i+1:02d}_{sanitized_name}")
-        os.makedirs(strategy_result_dir, exist_ok=True)
-
-        logging.info(f"===== 戦略 {i+1}/{total_strategies}: '{strategy_name}' を処理中 =====")
-        success = run_single_backtest(strategy_def, base_config)
-        if success:
-            move_and_rename_reports(strategy_result_dir)
-        else:
-            logging.error(f"戦略 '{strategy_name}' のバックテストに失敗したため、結果の移動をスキップします。")
+        engine.run(on_strategy_complete=save_strategy_result, on_job_complete=manifest.record, completed=completed)
+    finally:
+        manifest.close()
+    if result_cache is not None:
+        logging.info(f"評価結果キャッシュ: ヒット {result_cache.hits} 件 / 再計算 {result_cache.misses} 件")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     
     aggregator.aggregate_all(current_results_dir, timestamp)
     logging.info("全ての戦略の評価が完了しました。")""",
@@ -231,6 +162,8 @@ import re
 from datetime import datetime
 import numpy as np # <-- [追加]
 from src.core.util.kelly_criterion import calculate_raw_kelly # <-- [追加]
+from src.core.util.monte_carlo import MC_COLUMNS, simulate_trade_history
+from . import config_evaluation
 
 logger = logging.getLogger(__name__)
 
@@ -244,6 +177,33 @@ def get_strategy_name_from_summary(summary_file_path, default_name="Unknown"):
         logger.error(f"サマリーファイル '{summary_file_path}' の読み込み中にエラー: {e}")
     return default_name
 
+# ▼▼▼【変更箇所: 列の抽出・数値変換・並べ替えを build_summary_table に分離 (パラメータスイープでも使用)】▼▼▼
+SUMMARY_COLUMNS = [
+    "戦略名", "純利益", "総利益", "総損失", "PF", "勝率",
+    "総トレード数", "勝トレード", "負トレード", "平均利益", "平均損失", "RR比"
+]
+
+def build_summary_table(summary_series_list, extra_rows=None):
+    \"\"\"
+    戦略ごとのサマリー (項目 -> 結果 のSeries) のリストから、統合サマリー形式のDataFrameを生成します。
+    extra_rows: 各行に追加する列の辞書のリスト (任意、summary_series_list と同じ順序)。
+    \"\"\"
+    all_summaries = []
+    for i, series in enumerate(summary_series_list):
+        summary_data = {col: series.get(col, "N/A") for col in SUMMARY_COLUMNS}
+        if extra_rows: summary_data.update(extra_rows[i])
+        all_summaries.append(summary_data)
+
+    summary_df = pd.DataFrame(all_summaries)
+    numeric_cols = [col for col in SUMMARY_COLUMNS if col != "戦略名"]
+    for col in numeric_cols:
+        if col in summary_df.columns:
+            summary_df[col] = summary_df[col].astype(str).str.replace(r'[¥,%]', '', regex=True)
+            summary_df[col] = pd.to_numeric(summary_df[col], errors='coerce')
+
+    return summary_df.sort_values(by="純利益", ascending=False).reset_index(drop=True)
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 def aggregate_summaries(results_dir, timestamp):
     \"\"\"
     全戦略のサマリーレポートを一つのファイルに統合します。
@@ -256,17 +216,10 @@ def aggregate_summaries(results_dir, timestamp):
         return
 
     all_summaries = []
-    report_columns = [
-        "戦略名", "純利益", "総利益", "総損失", "PF", "勝率",
-        "総トレード数", "勝トレード", "負トレード", "平均利益", "平均損失", "RR比"
-    ]
-
     for f in summary_files:
         try:
             df = pd.read_csv(f)
-            series = df.set_index('項目')['結果']
-            summary_data = {col: series.get(col, "N/A") for col in report_columns}
-            all_summaries.append(summary_data)
+            all_summaries.append(df.set_index('項目')['結果'])
         except Exception as e:
             logging.error(f"ファイル '{f}' の処理中にエラー: {e}")
 
@@ -274,14 +227,7 @@ def aggregate_summaries(results_dir, timestamp):
         logging.warning("有効なサマリーデータがありませんでした。")
         return
 
-    summary_df = pd.DataFrame(all_summaries)
-    numeric_cols = [col for col in report_columns if col != "戦略名"]
-    for col in numeric_cols:
-        if col in summary_df.columns:
-            summary_df[col] = summary_df[col].astype(str).str.replace(r'[¥,%]', '', regex=True)
-            summary_df[col] = pd.to_numeric(summary_df[col], errors='coerce')
-
-    summary_df = summary_df.sort_values(by="純利益", ascending=False).reset_index(drop=True)
+    summary_df = build_summary_table(all_summaries)
     
     output_filename = f"all_summary_{timestamp}.csv"
     output_path = os.path.join(results_dir, output_filename)
@@ -296,6 +242,7 @@ def aggregate_details(results_dir, timestamp):
     \"\"\"
     全戦略の銘柄別詳細レポートを一つのファイルに統合します。
     [修正] ケリー基準 (Raw / Adj) を計算して追加します。
+    [追加] 銘柄ごとの取引履歴のモンテカルロ (Kelly_MC / MC_*) を追加します。
     \"\"\"
     logging.info("--- 全銘柄別詳細レポートの生成を開始 ---")
     strategy_dirs = [d for d in glob.glob(os.path.join(results_dir, "strategy_*")) if os.path.isdir(d)]
@@ -362,6 +309,17 @@ def aggregate_details(results_dir, timestamp):
                             detailed_symbols = set(detail_df['銘柄'].astype(str))
                         
                         missing_symbols = traded_symbols - detailed_symbols
+
+                        # ▼▼▼【変更箇所: 取引履歴のブートストラップ結果を銘柄ごとに結合】▼▼▼
+                        if config_evaluation.MONTE_CARLO_PATHS > 0 and not detail_df.empty:
+                            mc_df = simulate_trade_history(
+                                history_df, n_paths=config_evaluation.MONTE_CARLO_PATHS,
+                                confidence=config_evaluation.MONTE_CARLO_CONFIDENCE,
+                                min_trades=config_evaluation.MONTE_CARLO_MIN_TRADES,
+                                seed=config_evaluation.MONTE_CARLO_SEED)
+                            detail_df['銘柄'] = detail_df['銘柄'].astype(str)
+                            detail_df = detail_df.merge(mc_df, on='銘柄', how='left')
+                        # ▲▲▲【変更箇所ここまで】▲▲▲
                         
                         if missing_symbols:
                             logging.warning(f"戦略 '{strategy_name}' で集計漏れの銘柄を検出: {missing_symbols}")
@@ -404,6 +362,11 @@ def aggregate_details(results_dir, timestamp):
             lambda x: f"{x:.4f}" if pd.notna(x) else "N/A"
         )
     # --- ▲▲▲ 挿入ブロック END ▲▲▲ ---
+    # ▼▼▼【変更箇所】▼▼▼
+    for col in MC_COLUMNS:
+        if col in combined_details_df.columns:
+            combined_details_df[col] = combined_details_df[col].apply(lambda x: f"{x:.4f}" if pd.notna(x) else "N/A")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     output_filename = f"all_detail_{timestamp}.csv"
     output_path = os.path.join(results_dir, output_filename)
@@ -508,6 +471,52 @@ def aggregate_all(results_dir, timestamp):
 # 説明: evaluationパッケージ全体の設定を管理します。
 # ==============================================================================
 
+# --- 並列実行設定 ---
+
+# (戦略, 銘柄) 単位のバックテストを実行するワーカープロセス数。
+# None の場合はマシンのCPUコア数を使用します。
+MAX_WORKERS = None
+
+# 各ジョブのバックテストエンジン ('backtrader' または 'vectorized')。
+# 'vectorized' は cerebro.run() と同じ取引結果をはるかに高速に算出します。(未対応の戦略は自動的に 'backtrader')
+BACKTEST_ENGINE = 'backtrader'
+
+# --- 評価結果キャッシュ ---
+
+# True の場合、(戦略, 銘柄) ごとの結果を保存し、戦略パラメータ・バックテスト設定・CSVの内容が
+# 前回と同じジョブはバックテストを省略します。`--force` オプションで常に再計算できます。
+USE_RESULT_CACHE = True
+RESULT_CACHE_DIR = 'results/evaluation_cache'
+
+# --- モンテカルロ (all_detail の Kelly_MC / MC_* 列) ---
+
+# 銘柄ごとの取引履歴をブートストラップするパス数。0 の場合はモンテカルロ列を出力しません。
+MONTE_CARLO_PATHS = 10000
+# Kelly_MC (f値の下限)・MC_DD_Worst・MC_Equity_Worst に使う信頼水準
+MONTE_CARLO_CONFIDENCE = 0.95
+# 取引数がこれ未満の銘柄は N/A とします。
+MONTE_CARLO_MIN_TRADES = 5
+# 乱数シード (同じ結果を再現するため)。None の場合は毎回異なります。
+MONTE_CARLO_SEED = 0
+
+# --- ウォークフォワード評価 (python -m src.evaluation.run_walkforward) ---
+
+# 学習ウィンドウ・検証ウィンドウの営業日数。学習ウィンドウで銘柄ごとに最も純利益の高い戦略を選び、
+# 直後の検証ウィンドウでの成績をアウトオブサンプルの成績として集計します。
+WALKFORWARD_TRAIN_DAYS = 60
+WALKFORWARD_TEST_DAYS = 20
+# ウィンドウをずらす営業日数。None の場合は検証ウィンドウと同じ (検証期間が重ならない)。
+WALKFORWARD_STEP_DAYS = None
+
+# --- パラメータスイープ設定 (python -m src.evaluation.run_sweep) ---
+
+# スイープのワーカープロセス数。None の場合は MAX_WORKERS と同じ。
+SWEEP_MAX_WORKERS = None
+
+# 1ジョブで実行するグリッド点の数。None の場合はワーカー数とグリッドの大きさから自動で決めます。
+# 同じジョブ内のグリッド点はインジケーター配列を共有するため、大きいほど再計算が減ります。
+SWEEP_CHUNK_SIZE = None
+
 # --- ロギング設定 ---
 
 # evaluationモジュール自体のログレベル (INFO, DEBUG など)
@@ -518,7 +527,1149 @@ LOG_LEVEL = logging.INFO
 # 個別バックテストの詳細ログを確認したい場合は 'INFO' や 'DEBUG' に変更してください。
 # BACKTEST_LOG_LEVEL_OVERRIDE = 'DEBUG'
 # BACKTEST_LOG_LEVEL_OVERRIDE = 'INFO'
-BACKTEST_LOG_LEVEL_OVERRIDE = 'NONE'"""
+BACKTEST_LOG_LEVEL_OVERRIDE = 'NONE'""",
+
+    "src/evaluation/engine.py": """import os
+import copy
+import glob
+import logging
+import tempfile
+import collections
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.core import bar_store
+from src.backtest import config_backtest
+from src.backtest.run_backtest import run_symbol_backtest, build_report_frames, find_base_files
+
+logger = logging.getLogger(__name__)
+
+# ワーカーごとにインジケーターキャッシュを保持する銘柄数 (スイープ・ウォークフォワード)
+INDICATOR_CACHE_SYMBOLS = 4
+
+# ==============================================================================
+# 評価エンジン
+# 戦略カタログの各戦略 × 全銘柄を (strategy, symbol) 単位のジョブに分解し、
+# プロセスプールで並列にバックテストする。
+# 設定ファイルの書き換えやサブプロセス起動は行わず、戦略パラメータはメモリ上で受け渡す。
+# CSVは親プロセスで1回だけパースし、ワーカーはバーストアをメモリマップで共有する。
+# ==============================================================================
+
+
+@dataclass
+class SymbolResult:
+    \"\"\"1つの (戦略, 銘柄) ジョブの実行結果。\"\"\"
+    strategy_index: int
+    symbol: str
+    stats: dict = None
+    start_date: object = None
+    end_date: object = None
+    trades: list = field(default_factory=list)
+    error: str = None
+
+    def as_output(self):
+        \"\"\"build_report_frames が受け取る形式のタプルを返す。\"\"\"
+        return (self.symbol, self.stats, self.start_date, self.end_date, self.trades)
+
+
+@dataclass
+class StrategyResult:
+    \"\"\"1戦略分の全銘柄の実行結果。\"\"\"
+    index: int
+    name: str
+    params: dict
+    symbol_results: list = field(default_factory=list)
+
+    @property
+    def failed_symbols(self):
+        return [r.symbol for r in self.symbol_results if r.error]
+
+    def to_frames(self):
+        \"\"\"summary / detail / trade_history のDataFrameを生成する。\"\"\"
+        ordered = sorted(self.symbol_results, key=lambda r: r.symbol)
+        return build_report_frames(self.params, [r.as_output() for r in ordered])
+
+    def save(self, output_dir):
+        \"\"\"従来の評価結果と同じファイル名 (summary.csv 等) でレポートを保存する。\"\"\"
+        os.makedirs(output_dir, exist_ok=True)
+        summary_df, detail_df, trade_history_df = self.to_frames()
+        if summary_df is not None:
+            summary_df.to_csv(os.path.join(output_dir, 'summary.csv'), index=False, encoding='utf-8-sig')
+        else:
+            logger.warning(f"戦略 '{self.name}' は有効な分析期間がないため、summary.csv を生成しません。")
+        detail_df.to_csv(os.path.join(output_dir, 'detail.csv'), index=False, encoding='utf-8-sig')
+        trade_history_df.to_csv(os.path.join(output_dir, 'trade_history.csv'), index=False, encoding='utf-8-sig')
+
+
+def build_strategy_params(base_config, strategy_def):
+    \"\"\"ベース設定にカタログの戦略定義を重ね、1戦略分のパラメータを生成する。\"\"\"
+    params = copy.deepcopy(base_config)
+    params['strategy_name'] = strategy_def.get('name', 'Unnamed Strategy')
+    params['entry_conditions'] = copy.deepcopy(strategy_def.get('entry_conditions'))
+    return params
+
+
+def _init_worker(log_level_override, bar_store_dir=None):
+    \"\"\"ワーカープロセスのロギングとバーストアを初期化する。\"\"\"
+    if bar_store_dir:
+        bar_store.set_store(bar_store.BarStore.attach(bar_store_dir))
+    if log_level_override == 'NONE':
+        logging.disable(logging.CRITICAL)
+        return
+    level = getattr(logging, log_level_override, logging.INFO)
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
+    root.setLevel(level)
+
+
+_indicator_caches = collections.OrderedDict()
+
+def worker_indicator_cache(symbol):
+    \"\"\"
+    [ワーカー] 銘柄ごとのベクトル化インジケーターキャッシュ (build_indicators の cache)。
+    直近 INDICATOR_CACHE_SYMBOLS 銘柄分を保持し、同じ銘柄のジョブ間で計算済みの配列を共有する。
+    \"\"\"
+    cache = _indicator_caches.pop(symbol, None)
+    if cache is None: cache = {}
+    _indicator_caches[symbol] = cache
+    while len(_indicator_caches) > INDICATOR_CACHE_SYMBOLS:
+        _indicator_caches.popitem(last=False)
+    return cache
+
+
+def _run_job(strategy_index, strategy_params, symbol, base_filepath, backtest_engine='backtrader'):
+    \"\"\"[ワーカー] 1銘柄分のバックテストを実行し、SymbolResultを返す。\"\"\"
+    try:
+        stats, start_date, end_date, trade_list = run_symbol_backtest(symbol, base_filepath, strategy_params, backtest_engine)
+        if stats is None:
+            return SymbolResult(strategy_index, symbol, error="データフィードの準備に失敗しました。")
+        return SymbolResult(strategy_index, symbol, stats, start_date, end_date, trade_list or [])
+    except Exception as e:
+        logging.getLogger(__name__).error(f"[{symbol}] バックテスト中にエラー: {e}", exc_info=True)
+        return SymbolResult(strategy_index, symbol, error=f"{type(e).__name__}: {e}")
+
+
+class EvaluationEngine:
+    \"\"\"
+    戦略カタログ全体を (strategy, symbol) ジョブとしてプロセスプールで実行する。
+    結果はファイルではなく StrategyResult オブジェクトとして返す。
+    \"\"\"
+    def __init__(self, base_config, strategies, data_dir=None, max_workers=None, log_level_override='NONE', backtest_engine='backtrader', result_cache=None):
+        self.base_config = base_config
+        self.strategies = strategies
+        self.data_dir = data_dir or config_backtest.DATA_DIR
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log_level_override = log_level_override
+        self.backtest_engine = backtest_engine
+        self.result_cache = result_cache
+
+    def build_strategy_results(self):
+        \"\"\"未サポートの戦略を除外し、空のStrategyResultを戦略順に生成する。\"\"\"
+        results = []
+        for i, strategy_def in enumerate(self.strategies):
+            name = strategy_def.get('name', f"Strategy_{i+1}")
+            if strategy_def.get('unsupported'):
+                logger.warning(f"戦略 '{name}' は未サポートのためスキップします。理由: {strategy_def.get('reason', 'N/A')}")
+                continue
+            results.append(StrategyResult(i, name, build_strategy_params(self.base_config, strategy_def)))
+        return results
+
+    def find_symbols(self):
+        \"\"\"ベースファイルから (銘柄コード, ファイルパス) のリストを返す。\"\"\"
+        files = find_base_files(self.base_config, self.data_dir)
+        return [(os.path.basename(f).split('_')[0], f) for f in files]
+
+    def find_data_files(self, symbols):
+        \"\"\"全ジョブで参照されるCSV (ベースファイル + 'direct' 指定の中長期足) を列挙する。\"\"\"
+        files = [filepath for _, filepath in symbols]
+        for tf_config in self.base_config.get('timeframes', {}).values():
+            if tf_config.get('source_type') != 'direct' or not tf_config.get('file_pattern'): continue
+            for symbol, _ in symbols:
+                files.extend(glob.glob(os.path.join(self.data_dir, tf_config['file_pattern'].format(symbol=symbol))))
+        return files
+
+    def preload_bars(self, symbols):
+        \"\"\"CSVを1回だけパースしたバーストアを生成する。\"\"\"
+        store = bar_store.BarStore()
+        loaded = store.preload(self.find_data_files(symbols))
+        logger.info(f"バーストアに {loaded} ファイルを読み込みました。")
+        return store
+
+    def run(self, on_strategy_complete=None, on_job_complete=None, completed=None):
+        \"\"\"
+        全ジョブを実行する。
+        on_strategy_complete: 戦略の全銘柄が完了するたびに StrategyResult を受け取るコールバック。
+        on_job_complete: ジョブが完了するたびに SymbolResult を受け取るコールバック。(チェックポイント用)
+        completed: 前回の実行で完了済みの {(戦略番号, 銘柄): SymbolResult}。該当ジョブは実行しない。
+        result_cache が設定されている場合、入力が変わっていないジョブはキャッシュした結果を使用する。
+        \"\"\"
+        strategy_results = self.build_strategy_results()
+        symbols = self.find_symbols()
+        if not strategy_results or not symbols:
+            logger.warning(f"実行対象がありません。(戦略: {len(strategy_results)}件, 銘柄: {len(symbols)}件)")
+            return strategy_results
+
+        by_index = {r.index: r for r in strategy_results}
+        remaining = {r.index: len(symbols) for r in strategy_results}
+        total_jobs = len(strategy_results) * len(symbols)
+        done_count = 0
+
+        def complete(symbol_result, resumed=False):
+            nonlocal done_count
+            done_count += 1
+            if on_job_complete and not resumed:
+                on_job_complete(symbol_result)
+            strategy_result = by_index[symbol_result.strategy_index]
+            strategy_result.symbol_results.append(symbol_result)
+            remaining[strategy_result.index] -= 1
+            if remaining[strategy_result.index] == 0:
+                failed = strategy_result.failed_symbols
+                if failed:
+                    logger.warning(f"戦略 '{strategy_result.name}' で {len(failed)} 銘柄が失敗しました: {failed}")
+                logger.info(f"戦略 '{strategy_result.name}' の全銘柄が完了しました。({done_count}/{total_jobs} ジョブ)")
+                if on_strategy_complete:
+                    on_strategy_complete(strategy_result)
+
+        # 完了済み・キャッシュに結果があるジョブは実行せずに完了扱いとする
+        pending, cache_keys, completed = [], {}, completed or {}
+        for strategy_result in strategy_results:
+            for symbol, filepath in symbols:
+                if (strategy_result.index, symbol) in completed:
+                    complete(completed[(strategy_result.index, symbol)], resumed=True)
+                    continue
+                if self.result_cache is not None:
+                    key = self.result_cache.job_key(symbol, filepath, strategy_result.params, self.data_dir, self.backtest_engine)
+                    cached = self.result_cache.get(key)
+                    if cached is not None:
+                        stats, start_date, end_date, trades = cached
+                        complete(SymbolResult(strategy_result.index, symbol, stats, start_date, end_date, trades))
+                        continue
+                    cache_keys[(strategy_result.index, symbol)] = key
+                pending.append((strategy_result, symbol, filepath))
+        resumed_count = sum(1 for key in completed if key[0] in by_index)
+        if resumed_count:
+            logger.info(f"前回の実行で完了済みの {resumed_count}/{total_jobs} ジョブをスキップします。")
+        if self.result_cache is not None:
+            self.result_cache.save_digests()
+            logger.info(f"評価結果キャッシュ: {total_jobs - resumed_count - len(pending)}/{total_jobs} ジョブを再利用します。")
+        if not pending:
+            return strategy_results
+
+        logger.info(f"{len(strategy_results)}戦略 x {len(symbols)}銘柄のうち {len(pending)}ジョブを {self.max_workers} プロセスで実行します。(エンジン: {self.backtest_engine})")
+
+        pending_symbols = sorted({(symbol, filepath) for _, symbol, filepath in pending})
+        store = self.preload_bars(pending_symbols)
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \\
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            futures = {}
+            for strategy_result, symbol, filepath in pending:
+                future = executor.submit(_run_job, strategy_result.index, strategy_result.params, symbol, filepath, self.backtest_engine)
+                futures[future] = (strategy_result.index, symbol)
+
+            for future in as_completed(futures):
+                strategy_index, symbol = futures[future]
+                try:
+                    symbol_result = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({strategy_index}, {symbol}) の実行プロセスが異常終了しました: {e}")
+                    symbol_result = SymbolResult(strategy_index, symbol, error=f"{type(e).__name__}: {e}")
+                if self.result_cache is not None and not symbol_result.error:
+                    self.result_cache.put(cache_keys[(strategy_index, symbol)], symbol_result.stats,
+                                          symbol_result.start_date, symbol_result.end_date, symbol_result.trades)
+                complete(symbol_result)
+
+        return strategy_results""",
+
+    "src/evaluation/sweep.py": """import copy
+import math
+import logging
+import tempfile
+import itertools
+import collections
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.backtest import config_backtest
+from src.backtest import report as report_generator
+from src.backtest.run_backtest import run_backtest_for_symbol
+from src.backtest.vectorized import run_vectorized_backtest_for_symbol, VectorizedUnsupportedError
+from . import aggregator
+from .engine import EvaluationEngine, _init_worker, worker_indicator_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# パラメータスイープ (グリッドサーチ)
+# 戦略テンプレート内の { sweep: ... } プレースホルダーを展開し、全グリッド点を
+# 全銘柄でバックテストして、all_summary 形式のランキング表を生成する。
+#
+# - ジョブは (銘柄, グリッド点のチャンク) 単位。ワーカーはベクトル化エンジンで実行し、
+#   StrategyInitializer._get_indicator_key をキーとするインジケーター配列を
+#   銘柄ごとにキャッシュして、同じキーを持つグリッド点間で共有する。
+#   (ATRの multiplier や RSI の閾値だけが異なる点はインジケーターを再計算しない)
+# - ベクトル化できないグリッド点は cerebro 経路で実行する。
+# - 取引リストは集計に不要なため、ワーカーからは統計のみを返す。
+#
+# プレースホルダーの書式:
+#   period: { sweep: [10, 20, 30] }                     # 値のリスト
+#   multiplier: { sweep: { start: 1.5, stop: 3.0, step: 0.5 } }   # 範囲 (stop を含む)
+#   period: { sweep: [10, 20], name: "ema_fast" }       # 同じ name のプレースホルダーは同じ値をとる
+# ==============================================================================
+
+SWEEP_KEY = 'sweep'
+
+
+@dataclass
+class GridPoint:
+    \"\"\"1つのグリッド点。values は {軸名: 値}。\"\"\"
+    index: int
+    name: str
+    values: dict
+    params: dict
+
+
+@dataclass
+class PointResult:
+    \"\"\"1つのグリッド点の全銘柄分の統計。\"\"\"
+    point: GridPoint
+    stats: list = field(default_factory=list)
+    start_dates: list = field(default_factory=list)
+    end_dates: list = field(default_factory=list)
+    failed_symbols: list = field(default_factory=list)
+
+    def summary(self):
+        \"\"\"report.generate_report と同じ形式の 項目 -> 結果 のSeries。有効な期間がない場合はNone。\"\"\"
+        if not self.start_dates or not self.end_dates: return None
+        summary_df = report_generator.generate_report(self.stats, self.point.params, min(self.start_dates), max(self.end_dates))
+        return summary_df.set_index('項目')['結果']
+
+
+def _is_placeholder(node):
+    return isinstance(node, dict) and SWEEP_KEY in node and set(node) <= {SWEEP_KEY, 'name'}
+
+def expand_values(spec):
+    \"\"\"プレースホルダーの sweep 指定を値のリストに展開する。\"\"\"
+    if isinstance(spec, list):
+        if not spec: raise ValueError("sweep の値リストが空です。")
+        return list(spec)
+    if isinstance(spec, dict) and {'start', 'stop', 'step'} <= set(spec):
+        start, stop, step = spec['start'], spec['stop'], spec['step']
+        if step <= 0 or stop < start: raise ValueError(f"sweep の範囲指定が不正です: {spec}")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        is_int = all(isinstance(v, int) for v in (start, stop, step))
+        # 浮動小数点の累積誤差が出ないよう、ステップ数から各値を求めて丸める
+        return [start + i * step if is_int else round(start + i * step, 10) for i in range(count)]
+    raise ValueError(f"sweep には値のリストか {{start, stop, step}} を指定してください: {spec}")
+
+def find_placeholders(node, path=()):
+    \"\"\"テンプレート内のプレースホルダーを (パス, プレースホルダー) のリストで返す。\"\"\"
+    if _is_placeholder(node):
+        return [(path, node)]
+    found = []
+    if isinstance(node, dict):
+        for key, value in node.items(): found.extend(find_placeholders(value, path + (key,)))
+    elif isinstance(node, list):
+        for i, value in enumerate(node): found.extend(find_placeholders(value, path + (i,)))
+    return found
+
+def _substitute(node, values_by_path):
+    if _is_placeholder(node): return values_by_path[id(node)]
+    if isinstance(node, dict): return {k: _substitute(v, values_by_path) for k, v in node.items()}
+    if isinstance(node, list): return [_substitute(v, values_by_path) for v in node]
+    return node
+
+def _merge(base, override):
+    \"\"\"辞書を再帰的に重ねる。(リストと値は置き換え)\"\"\"
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and not _is_placeholder(value):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def _default_axis_name(path):
+    return '.'.join(str(p) for p in path)
+
+def expand_grid(base_config, template):
+    \"\"\"
+    ベース設定にテンプレートを重ね、全グリッド点 (GridPoint のリスト) と軸名のリストを返す。
+    テンプレートの 'name' 以外のキーはベース設定を上書きする。(辞書は再帰的にマージ)
+    \"\"\"
+    template = dict(template)
+    base_name = template.pop('name', 'Sweep')
+    merged = _merge(base_config, template)
+    merged['strategy_name'] = base_name
+
+    axes = collections.OrderedDict()
+    placeholders_by_axis = collections.defaultdict(list)
+    for path, placeholder in find_placeholders(merged):
+        axis = placeholder.get('name') or _default_axis_name(path)
+        values = expand_values(placeholder[SWEEP_KEY])
+        if axis in axes and axes[axis] != values:
+            raise ValueError(f"軸 '{axis}' に異なる値リストが指定されています: {axes[axis]} / {values}")
+        axes[axis] = values
+        placeholders_by_axis[axis].append(placeholder)
+
+    points = []
+    for index, combo in enumerate(itertools.product(*axes.values())):
+        values = dict(zip(axes, combo))
+        values_by_path = {id(ph): values[axis] for axis, phs in placeholders_by_axis.items() for ph in phs}
+        params = _substitute(merged, values_by_path)
+        label = ", ".join(f"{axis}={value}" for axis, value in values.items())
+        params['strategy_name'] = f"{base_name} [{label}]" if label else base_name
+        points.append(GridPoint(index, params['strategy_name'], values, params))
+    return points, list(axes)
+
+
+def _run_sweep_job(symbol, base_filepath, points):
+    \"\"\"
+    [ワーカー] 1銘柄でグリッド点のチャンクを実行する。
+    points: (グリッド点番号, 戦略パラメータ) のリスト
+    戻り値: (グリッド点番号, stats, start_date, end_date, エラー) のリスト
+    \"\"\"
+    cache = worker_indicator_cache(symbol)
+    outputs = []
+    for index, params in points:
+        try:
+            try:
+                stats, start_date, end_date, _ = run_vectorized_backtest_for_symbol(symbol, base_filepath, params, indicator_cache=cache)
+            except VectorizedUnsupportedError as e:
+                logging.getLogger(__name__).info(f"[{symbol}] ベクトル化できないため cerebro で実行します: {e}")
+                stats, start_date, end_date, _ = run_backtest_for_symbol(symbol, base_filepath, params)
+            if stats is None:
+                outputs.append((index, None, None, None, "データフィードの準備に失敗しました。"))
+            else:
+                outputs.append((index, stats, start_date, end_date, None))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"[{symbol}] グリッド点 {index} のバックテスト中にエラー: {e}", exc_info=True)
+            outputs.append((index, None, None, None, f"{type(e).__name__}: {e}"))
+    return outputs
+
+
+class SweepEngine(EvaluationEngine):
+    \"\"\"
+    テンプレートを展開した全グリッド点 × 全銘柄を、(銘柄, グリッド点チャンク) ジョブとして並列実行する。
+    銘柄の列挙・バーストアの事前読み込みは EvaluationEngine と共通。
+    \"\"\"
+    def __init__(self, base_config, template, data_dir=None, max_workers=None, log_level_override='NONE', chunk_size=None):
+        super().__init__(base_config, [], data_dir or config_backtest.DATA_DIR, max_workers, log_level_override, backtest_engine='vectorized')
+        self.template = template
+        self.chunk_size = chunk_size
+        self.points, self.axes = expand_grid(base_config, template)
+
+    def _chunks(self, n_symbols):
+        \"\"\"グリッド点を分割する。指定がなければ全ワーカーに行き渡る程度の大きさにする。\"\"\"
+        size = self.chunk_size or max(1, math.ceil(len(self.points) * n_symbols / (self.max_workers * 4)))
+        size = min(size, len(self.points))
+        return [self.points[i:i + size] for i in range(0, len(self.points), size)]
+
+    def run(self):
+        \"\"\"全グリッド点を実行し、グリッド点順の PointResult のリストを返す。\"\"\"
+        symbols = self.find_symbols()
+        results = [PointResult(point) for point in self.points]
+        if not self.points or not symbols:
+            logger.warning(f"実行対象がありません。(グリッド点: {len(self.points)}件, 銘柄: {len(symbols)}件)")
+            return results
+
+        chunks = self._chunks(len(symbols))
+        total_jobs = len(chunks) * len(symbols)
+        logger.info(f"{len(self.points)}グリッド点 ({', '.join(self.axes) or '軸なし'}) x {len(symbols)}銘柄を "
+                    f"{total_jobs}ジョブに分割し、{self.max_workers} プロセスで実行します。")
+
+        store = self.preload_bars(symbols)
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \\
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            # 同じ銘柄のチャンクを続けて投入し、ワーカー内のインジケーターキャッシュが効きやすくする
+            futures = {}
+            for symbol, filepath in symbols:
+                for chunk in chunks:
+                    future = executor.submit(_run_sweep_job, symbol, filepath, [(p.index, p.params) for p in chunk])
+                    futures[future] = (symbol, chunk)
+
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                symbol, chunk = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({symbol}, {len(chunk)}点) の実行プロセスが異常終了しました: {e}")
+                    outputs = [(p.index, None, None, None, f"{type(e).__name__}: {e}") for p in chunk]
+                for index, stats, start_date, end_date, error in outputs:
+                    result = results[index]
+                    if error:
+                        result.failed_symbols.append(symbol); continue
+                    result.stats.append(stats)
+                    if start_date is not None: result.start_dates.append(start_date)
+                    if end_date is not None: result.end_dates.append(end_date)
+                if done_count % max(1, total_jobs // 10) == 0 or done_count == total_jobs:
+                    logger.info(f"スイープ進捗: {done_count}/{total_jobs} ジョブ")
+
+        failed = [r for r in results if r.failed_symbols]
+        if failed:
+            logger.warning(f"{len(failed)} グリッド点で失敗した銘柄があります。(例: '{failed[0].point.name}' -> {failed[0].failed_symbols})")
+        return results
+
+    def build_summary(self, results):
+        \"\"\"all_summary 形式のランキング表 (純利益の降順) を生成する。軸ごとの値を列として追加する。\"\"\"
+        series_list, extra_rows = [], []
+        for result in results:
+            summary = result.summary()
+            if summary is None:
+                logger.warning(f"グリッド点 '{result.point.name}' は有効な分析期間がないため、ランキングから除外します。")
+                continue
+            series_list.append(summary)
+            extra_rows.append(dict(result.point.values))
+        if not series_list:
+            return None
+        return aggregator.build_summary_table(series_list, extra_rows)""",
+
+    "src/evaluation/run_sweep.py": """import sys
+import os
+import argparse
+import logging
+from datetime import datetime
+
+import yaml
+
+# ------------------------------------------------------------------------------
+# 戦略テンプレートのパラメータスイープ (グリッドサーチ) を実行します。
+# `python -m src.evaluation.run_sweep [テンプレートファイル]`
+# ------------------------------------------------------------------------------
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.util import logger as logger_setup
+from src.evaluation import config_evaluation as config
+from src.evaluation.orchestrator import BASE_STRATEGY_FILE
+from src.evaluation.sweep import SweepEngine
+
+SWEEP_TEMPLATE_FILE = 'config/strategy_sweep.yml'
+RESULTS_ROOT_DIR = 'results/sweep'
+
+
+def main(template_file=SWEEP_TEMPLATE_FILE, max_workers=None, chunk_size=None):
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
+
+    try:
+        with open(BASE_STRATEGY_FILE, 'r', encoding='utf-8') as f:
+            base_config = yaml.safe_load(f)
+        with open(template_file, 'r', encoding='utf-8') as f:
+            template = yaml.safe_load(f)
+    except Exception as e:
+        logging.error(f"設定ファイルの読み込みに失敗しました: {e}")
+        return None
+
+    try:
+        engine = SweepEngine(
+            base_config, template,
+            max_workers=max_workers or config.SWEEP_MAX_WORKERS or config.MAX_WORKERS,
+            log_level_override=config.BACKTEST_LOG_LEVEL_OVERRIDE,
+            chunk_size=chunk_size or config.SWEEP_CHUNK_SIZE
+        )
+    except ValueError as e:
+        logging.error(f"スイープテンプレート '{template_file}' が不正です: {e}")
+        return None
+
+    summary_df = engine.build_summary(engine.run())
+    if summary_df is None:
+        logging.warning("有効なサマリーデータがありませんでした。")
+        return None
+
+    os.makedirs(current_results_dir, exist_ok=True)
+    output_path = os.path.join(current_results_dir, f"all_summary_{timestamp}.csv")
+    summary_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    logging.info(f"スイープ結果 ({len(summary_df)} グリッド点) を '{output_path}' に保存しました。")
+    logging.info(f"純利益の上位:\\n{summary_df.head(10).to_string(index=False)}")
+    return output_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略テンプレートのパラメータスイープを実行します。')
+    parser.add_argument('template', nargs='?', default=SWEEP_TEMPLATE_FILE, help=f"スイープテンプレート (既定: {SWEEP_TEMPLATE_FILE})")
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    parser.add_argument('--chunk-size', type=int, default=None, help='1ジョブあたりのグリッド点数')
+    args = parser.parse_args()
+    logger_setup.setup_logging('log', log_prefix='sweep', level=config.LOG_LEVEL)
+    main(args.template, args.workers, args.chunk_size)""",
+
+    "config/strategy_sweep.yml": """# パラメータスイープ用の戦略テンプレート (python -m src.evaluation.run_sweep)
+# strategy_base.yml に重ねて使用します。('name' 以外のキーはベース設定を上書き)
+#
+# { sweep: [...] } が値のリスト、{ sweep: { start, stop, step } } が範囲 (stop を含む) です。
+# name を付けたプレースホルダーは同じ軸として同じ値をとります。(ロング/ショートで同じ期間を使う場合など)
+# 全ての軸の組み合わせ (直積) がグリッド点になります。
+
+name: "EMA Cross Sweep"
+
+entry_conditions:
+  long:
+    - { timeframe: "long", indicator: { name: "ema", params: { period: { sweep: [20, 50], name: "ema_trend" } } }, compare: ">", target: { type: "data", value: "close" } }
+    - { timeframe: "medium", indicator: { name: "rsi", params: { period: 14 } }, compare: "<", target: { type: "values", value: [{ sweep: [40, 50, 60], name: "rsi_long" }] } }
+    - { timeframe: "short", type: "crossover", indicator1: { name: "ema", params: { period: { sweep: [5, 10], name: "ema_fast" } } }, indicator2: { name: "ema", params: { period: { sweep: [20, 25, 30], name: "ema_slow" } } } }
+  short:
+    - { timeframe: "long", indicator: { name: "ema", params: { period: { sweep: [20, 50], name: "ema_trend" } } }, compare: "<", target: { type: "data", value: "close" } }
+    - { timeframe: "medium", indicator: { name: "rsi", params: { period: 14 } }, compare: ">", target: { type: "values", value: [{ sweep: [60, 50, 40], name: "rsi_short" }] } }
+    - { timeframe: "short", type: "crossunder", indicator1: { name: "ema", params: { period: { sweep: [5, 10], name: "ema_fast" } } }, indicator2: { name: "ema", params: { period: { sweep: [20, 25, 30], name: "ema_slow" } } } }
+
+exit_conditions:
+  stop_loss:
+    params: { multiplier: { sweep: { start: 2.0, stop: 3.0, step: 0.5 }, name: "sl_mult" } }""",
+
+    "src/evaluation/result_cache.py": """import os
+import glob
+import json
+import pickle
+import hashlib
+import logging
+import threading
+
+from src.backtest import config_backtest
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 評価結果キャッシュ
+# (戦略, 銘柄) ジョブの実行結果 (stats / 期間 / 取引リスト) をディスクに保存し、
+# 次回以降の評価で入力が変わっていないジョブのバックテストを省略する。
+#
+# キーは次の内容の SHA-256:
+#   - マージ済みの戦略パラメータ (戦略名を除く)
+#   - バックテストエンジン (backtrader / vectorized) とバックテスト設定 (初期資金・手数料・スリッページ)
+#   - 銘柄コードと、ジョブが参照する全CSVの内容ハッシュ
+#   - CACHE_VERSION (バックテストの計算ロジックを変更したら上げる)
+# CSVの内容ハッシュは (更新時刻, サイズ) が変わった場合のみ計算し直す。
+# summary / detail / trade_history はキャッシュした銘柄結果から従来どおり生成する。
+# ==============================================================================
+
+CACHE_VERSION = 1
+DIGESTS_FILE = 'file_digests.json'
+_HASH_CHUNK = 1 << 20
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f: f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ResultCache:
+    \"\"\"ジョブ単位の評価結果キャッシュ。read=False の場合は読み込みを行わず、書き込みのみ行う。(--force)\"\"\"
+
+    def __init__(self, cache_dir, read=True):
+        self.cache_dir = cache_dir
+        self.read = read
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._digests_path = os.path.join(cache_dir, DIGESTS_FILE)
+        self._digests = self._load_digests()
+        self._digests_dirty = False
+
+    # --- データファイルのハッシュ -----------------------------------------------
+
+    def _load_digests(self):
+        try:
+            with open(self._digests_path, 'r', encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def file_digest(self, filepath):
+        \"\"\"CSVの内容ハッシュ。更新時刻・サイズが前回と同じなら保存済みの値を返す。\"\"\"
+        key = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        entry = self._digests.get(key)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry['sha256']
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''): h.update(chunk)
+        with self._lock:
+            self._digests[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': h.hexdigest()}
+            self._digests_dirty = True
+        return h.hexdigest()
+
+    def save_digests(self):
+        if not self._digests_dirty: return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _atomic_write(self._digests_path, json.dumps(self._digests).encode('utf-8'))
+            self._digests_dirty = False
+        except OSError as e:
+            logger.warning(f"データファイルのハッシュの保存に失敗しました: {e}")
+
+    # --- キー -------------------------------------------------------------------
+
+    @staticmethod
+    def job_data_files(symbol, base_filepath, strategy_params, data_dir):
+        \"\"\"ジョブが参照するCSV (ベースファイル + 'direct' 指定の中長期足) を列挙する。\"\"\"
+        files = [base_filepath]
+        for tf_name in ('medium', 'long'):
+            tf_config = (strategy_params.get('timeframes') or {}).get(tf_name) or {}
+            if tf_config.get('source_type') != 'direct' or not tf_config.get('file_pattern'): continue
+            files.extend(sorted(glob.glob(os.path.join(data_dir, tf_config['file_pattern'].format(symbol=symbol)))))
+        return files
+
+    def job_key(self, symbol, base_filepath, strategy_params, data_dir, backtest_engine):
+        params = {k: v for k, v in strategy_params.items() if k != 'strategy_name'}
+        payload = {
+            'version': CACHE_VERSION,
+            'params': params,
+            'backtest': {'engine': backtest_engine,
+                         'initial_capital': config_backtest.INITIAL_CAPITAL,
+                         'commission': config_backtest.COMMISSION_PERC,
+                         'slippage': config_backtest.SLIPPAGE_PERC},
+            'symbol': symbol,
+            'files': [(os.path.basename(f), self.file_digest(f))
+                      for f in self.job_data_files(symbol, base_filepath, strategy_params, data_dir)],
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    # --- 読み書き ---------------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        \"\"\"キャッシュ済みの (stats, start_date, end_date, trades) を返す。ない場合はNone。\"\"\"
+        if not self.read:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key), 'rb') as f: entry = pickle.load(f)
+            self.hits += 1
+            return entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"評価結果キャッシュの読み込みに失敗したため再計算します: {key} - {e}")
+        self.misses += 1
+        return None
+
+    def put(self, key, stats, start_date, end_date, trades):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, pickle.dumps((stats, start_date, end_date, trades), protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            logger.warning(f"評価結果キャッシュの書き込みに失敗しました: {key} - {e}")""",
+
+    "src/evaluation/checkpoint.py": """import os
+import json
+import logging
+import pandas as pd
+
+from .engine import SymbolResult
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 評価実行のチェックポイント
+# 完了した (戦略, 銘柄) ジョブの結果を結果ディレクトリの manifest.jsonl に1行ずつ追記する。
+# 実行開始時の入力 (ベース設定・戦略カタログ) は run_config.json に保存し、
+# `run_evaluation --resume <結果ディレクトリ>` では同じ入力で未完了のジョブだけを実行する。
+# 書き込み途中で中断された末尾の行は読み込み時に無視する。
+# ==============================================================================
+
+MANIFEST_FILE = 'manifest.jsonl'
+RUN_CONFIG_FILE = 'run_config.json'
+
+
+def _encode_date(value):
+    return value.isoformat() if value is not None else None
+
+def _decode_date(value):
+    return pd.Timestamp(value) if value is not None else None
+
+
+class RunManifest:
+    \"\"\"1回の評価実行 (結果ディレクトリ) のチェックポイント。\"\"\"
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.manifest_path = os.path.join(run_dir, MANIFEST_FILE)
+        self.run_config_path = os.path.join(run_dir, RUN_CONFIG_FILE)
+        self._file = None
+
+    def save_run_config(self, base_config, strategies):
+        os.makedirs(self.run_dir, exist_ok=True)
+        with open(self.run_config_path, 'w', encoding='utf-8') as f:
+            json.dump({'base_config': base_config, 'strategies': strategies}, f, ensure_ascii=False, default=str)
+
+    def load_run_config(self):
+        \"\"\"保存済みの (base_config, strategies) を返す。\"\"\"
+        with open(self.run_config_path, 'r', encoding='utf-8') as f:
+            run_config = json.load(f)
+        return run_config['base_config'], run_config['strategies']
+
+    def load_completed(self):
+        \"\"\"完了済みジョブの {(戦略番号, 銘柄): SymbolResult} を返す。\"\"\"
+        completed = {}
+        if not os.path.exists(self.manifest_path): return completed
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                    result = SymbolResult(record['strategy_index'], record['symbol'], record['stats'],
+                                          _decode_date(record['start_date']), _decode_date(record['end_date']), record['trades'])
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"マニフェストの {line_no} 行目を読み込めないためスキップします: {e}")
+                    continue
+                completed[(result.strategy_index, result.symbol)] = result
+        return completed
+
+    def record(self, symbol_result):
+        \"\"\"成功したジョブの結果を1行追記し、ディスクに書き出す。(失敗したジョブは再開時に再実行する)\"\"\"
+        if symbol_result.error: return
+        if self._file is None:
+            os.makedirs(self.run_dir, exist_ok=True)
+            # 中断で改行が書かれなかった末尾の行に続けて書かないようにする
+            needs_newline = False
+            if os.path.exists(self.manifest_path) and os.path.getsize(self.manifest_path) > 0:
+                with open(self.manifest_path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\\n'
+            self._file = open(self.manifest_path, 'a', encoding='utf-8')
+            if needs_newline: self._file.write('\\n')
+        record = {'strategy_index': symbol_result.strategy_index, 'symbol': symbol_result.symbol, 'stats': symbol_result.stats,
+                  'start_date': _encode_date(symbol_result.start_date), 'end_date': _encode_date(symbol_result.end_date),
+                  'trades': symbol_result.trades}
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None""",
+
+    "src/evaluation/walkforward.py": """import logging
+import tempfile
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.backtest.run_backtest import TRADE_HISTORY_COLUMNS
+from src.backtest.vectorized import VectorizedBacktest, VectorizedUnsupportedError, load_feeds
+from .engine import EvaluationEngine, _init_worker, worker_indicator_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ウォークフォワード評価
+# 全銘柄の営業日をローリングの 学習/検証 ウィンドウに分割し、銘柄ごとに
+# 学習ウィンドウで純利益が最大の戦略を選び (all_recommend と同じ基準)、
+# その戦略を直後の検証ウィンドウで取引した結果をアウトオブサンプルの成績として集計する。
+#
+# - ジョブは (銘柄, ウィンドウ) 単位でプロセスプールで並列実行する。
+# - 各ウィンドウはベクトル化エンジンの window 指定で実行する。インジケーターは
+#   全期間の配列を銘柄ごとにワーカー内でキャッシュし、ウィンドウ・戦略間で共有するため、
+#   ウィンドウ開始時点でウォームアップ済みの状態になる。CSVはバーストア経由で1回だけパースする。
+# - 学習・検証ウィンドウはそれぞれ初期資金から取引し、終了時の未決済ポジションは
+#   ウィンドウ最終バーの終値で評価する。
+# - ベクトル化できない戦略はウォークフォワードの選択対象から除外する。
+# ==============================================================================
+
+
+@dataclass
+class Window:
+    \"\"\"1つの 学習/検証 ウィンドウ。境界はバーと同じタイムゾーンの日付の開始時刻。(終了は含まない)\"\"\"
+    index: int
+    train_start: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+
+    @property
+    def label(self):
+        return f"W{self.index + 1:02d}"
+
+    @property
+    def train_range(self):
+        return (self.train_start.value, self.test_start.value)
+
+    @property
+    def test_range(self):
+        return (self.test_start.value, self.test_end.value)
+
+    @staticmethod
+    def _period(start, end):
+        return f"{start.strftime('%y/%m/%d')}-{(end - pd.Timedelta(days=1)).strftime('%y/%m/%d')}"
+
+    @property
+    def train_period(self):
+        return self._period(self.train_start, self.test_start)
+
+    @property
+    def test_period(self):
+        return self._period(self.test_start, self.test_end)
+
+
+@dataclass
+class WindowResult:
+    \"\"\"1つの (銘柄, ウィンドウ) ジョブの結果。selected は学習ウィンドウで選ばれた戦略番号。\"\"\"
+    symbol: str
+    window_index: int
+    train_stats: dict = field(default_factory=dict)
+    selected: int = None
+    test_stats: dict = None
+    test_trades: list = field(default_factory=list)
+    unsupported: list = field(default_factory=list)
+    error: str = None
+
+
+def build_windows(trading_days, train_days, test_days, step_days=None):
+    \"\"\"
+    営業日 (日付の開始時刻のリスト) からローリングウィンドウを生成する。
+    step_days を省略した場合は検証期間と同じ日数ずつずらす。(検証期間が重ならない)
+    \"\"\"
+    step_days = step_days or test_days
+    if train_days <= 0 or test_days <= 0 or step_days <= 0:
+        raise ValueError("学習・検証・ステップの日数は1以上を指定してください。")
+    days = sorted(set(trading_days))
+    windows = []
+    for i in range(0, len(days) - train_days - test_days + 1, step_days):
+        end = i + train_days + test_days
+        test_end = days[end] if end < len(days) else days[-1] + pd.Timedelta(days=1)
+        windows.append(Window(len(windows), days[i], days[i + train_days], test_end))
+    return windows
+
+
+def trading_days_of(bars):
+    \"\"\"バーがある日付 (バーのタイムゾーンでの日付の開始時刻)。\"\"\"
+    return list(bars.index().normalize().unique())
+
+
+def _run_window(symbol, base_filepath, strategy_params, cache, window_range):
+    feeds = load_feeds(symbol, base_filepath, strategy_params)
+    if feeds is None: raise ValueError("データフィードの準備に失敗しました。")
+    backtest = VectorizedBacktest(symbol, feeds, strategy_params, cache, window=window_range)
+    trades = backtest.run()
+    return backtest.stats(), trades
+
+def _run_window_job(symbol, base_filepath, window, strategies):
+    \"\"\"
+    [ワーカー] 1銘柄 × 1ウィンドウ。全戦略を学習ウィンドウで実行して戦略を選び、検証ウィンドウで実行する。
+    strategies: (戦略番号, 戦略パラメータ) のリスト
+    \"\"\"
+    log = logging.getLogger(__name__)
+    result = WindowResult(symbol, window.index)
+    try:
+        cache = worker_indicator_cache(symbol)
+        for index, params in strategies:
+            try:
+                stats, _ = _run_window(symbol, base_filepath, params, cache, window.train_range)
+            except VectorizedUnsupportedError as e:
+                log.info(f"[{symbol}] 戦略 {index} はベクトル化できないため選択対象から除外します: {e}")
+                result.unsupported.append(index); continue
+            result.train_stats[index] = stats
+
+        candidates = [(stats['pnl_net'], -index) for index, stats in result.train_stats.items() if stats['total_trades'] > 0]
+        if not candidates: return result
+        result.selected = -max(candidates)[1]
+        params = dict(strategies)[result.selected]
+        result.test_stats, result.test_trades = _run_window(symbol, base_filepath, params, cache, window.test_range)
+    except Exception as e:
+        log.error(f"[{symbol}] ウィンドウ {window.label} の評価中にエラー: {e}", exc_info=True)
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def performance(stats_list):
+    \"\"\"report.generate_report と同じ計算式の成績 (数値)。\"\"\"
+    total_net = sum(s['pnl_net'] for s in stats_list)
+    total_won = sum(s['gross_won'] for s in stats_list)
+    total_lost = sum(s['gross_lost'] for s in stats_list)
+    total_trades = sum(s['total_trades'] for s in stats_list)
+    total_win = sum(s['win_trades'] for s in stats_list)
+    avg_profit = total_won / total_win if total_win > 0 else 0
+    avg_loss = total_lost / (total_trades - total_win) if (total_trades - total_win) > 0 else 0
+    return {
+        "純利益": total_net, "総利益": total_won, "総損失": total_lost,
+        "PF": abs(total_won / total_lost) if total_lost != 0 else float('inf'),
+        "勝率": (total_win / total_trades) * 100 if total_trades > 0 else 0,
+        "総トレード数": total_trades, "勝トレード": total_win, "負トレード": total_trades - total_win,
+        "平均利益": avg_profit, "平均損失": avg_loss,
+        "RR比": abs(avg_profit / avg_loss) if avg_loss != 0 else float('inf'),
+    }
+
+
+class WalkForwardEngine(EvaluationEngine):
+    \"\"\"戦略カタログ全体のウォークフォワード評価を (銘柄, ウィンドウ) ジョブとして並列実行する。\"\"\"
+
+    def __init__(self, base_config, strategies, train_days, test_days, step_days=None, data_dir=None, max_workers=None, log_level_override='NONE'):
+        super().__init__(base_config, strategies, data_dir, max_workers, log_level_override, backtest_engine='vectorized')
+        self.train_days, self.test_days, self.step_days = train_days, test_days, step_days
+        self.windows = []
+        self.strategy_names = {}
+
+    def run(self):
+        \"\"\"全ジョブを実行し、WindowResult のリストを返す。\"\"\"
+        strategy_results = self.build_strategy_results()
+        symbols = self.find_symbols()
+        if not strategy_results or not symbols:
+            logger.warning(f"実行対象がありません。(戦略: {len(strategy_results)}件, 銘柄: {len(symbols)}件)")
+            return []
+        self.strategy_names = {r.index: r.name for r in strategy_results}
+        strategies = [(r.index, r.params) for r in strategy_results]
+
+        # 親プロセスでCSVを1回だけパースし、営業日の算出とワーカーの共有に使う
+        store = self.preload_bars(symbols)
+        trading_days = [day for _, filepath in symbols for day in trading_days_of(store.get(filepath))]
+        self.windows = build_windows(trading_days, self.train_days, self.test_days, self.step_days)
+        if not self.windows:
+            logger.warning(f"学習 {self.train_days}日 + 検証 {self.test_days}日 のウィンドウを作れるだけのデータがありません。")
+            return []
+
+        total_jobs = len(symbols) * len(self.windows)
+        logger.info(f"{len(strategy_results)}戦略 x {len(symbols)}銘柄 x {len(self.windows)}ウィンドウ "
+                    f"(学習 {self.train_days}日 / 検証 {self.test_days}日) を {total_jobs}ジョブとして {self.max_workers} プロセスで実行します。")
+
+        results = []
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \\
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            # 同じ銘柄のウィンドウを続けて投入し、ワーカー内のインジケーターキャッシュが効きやすくする
+            futures = {}
+            for symbol, filepath in symbols:
+                for window in self.windows:
+                    futures[executor.submit(_run_window_job, symbol, filepath, window, strategies)] = (symbol, window)
+
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                symbol, window = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({symbol}, {window.label}) の実行プロセスが異常終了しました: {e}")
+                    result = WindowResult(symbol, window.index, error=f"{type(e).__name__}: {e}")
+                results.append(result)
+                if done_count % max(1, total_jobs // 10) == 0 or done_count == total_jobs:
+                    logger.info(f"ウォークフォワード進捗: {done_count}/{total_jobs} ジョブ")
+
+        unsupported = sorted({i for r in results for i in r.unsupported})
+        if unsupported:
+            logger.warning(f"ベクトル化できないため選択対象から除外した戦略: {[self.strategy_names[i] for i in unsupported]}")
+        failed = [r for r in results if r.error]
+        if failed:
+            logger.warning(f"{len(failed)} ジョブが失敗しました。(例: {failed[0].symbol} {self.windows[failed[0].window_index].label} - {failed[0].error})")
+        return sorted(results, key=lambda r: (r.window_index, r.symbol))
+
+    # --- レポート ---------------------------------------------------------------
+
+    def build_detail(self, results):
+        \"\"\"(銘柄, ウィンドウ) ごとの選択戦略と学習/検証の成績。\"\"\"
+        rows = []
+        for r in results:
+            window = self.windows[r.window_index]
+            train = r.train_stats.get(r.selected) if r.selected is not None else None
+            test = r.test_stats
+            rows.append({
+                '銘柄': r.symbol, 'ウィンドウ': window.label, '学習期間': window.train_period, '検証期間': window.test_period,
+                '選択戦略': self.strategy_names.get(r.selected, 'N/A') if r.selected is not None else 'N/A',
+                '学習純利益': train['pnl_net'] if train else None, '学習トレード数': train['total_trades'] if train else None,
+                '検証純利益': test['pnl_net'] if test else None, '検証総利益': test['gross_won'] if test else None,
+                '検証総損失': test['gross_lost'] if test else None, '検証トレード数': test['total_trades'] if test else None,
+                '検証勝トレード': test['win_trades'] if test else None, 'エラー': r.error})
+        return pd.DataFrame(rows)
+
+    def build_summary(self, results):
+        \"\"\"ウィンドウごと + 全体のアウトオブサンプル成績。学習純利益は選択された戦略の学習ウィンドウでの値。\"\"\"
+        rows = []
+        groups = [(self.windows[i].label, self.windows[i].test_period, [r for r in results if r.window_index == i]) for i in range(len(self.windows))]
+        if self.windows:
+            groups.append(("全体", f"{self.windows[0].test_period.split('-')[0]}-{self.windows[-1].test_period.split('-')[1]}", results))
+        for label, period, group in groups:
+            selected = [r for r in group if r.test_stats]
+            row = {'ウィンドウ': label, '検証期間': period, '選択銘柄数': len(selected),
+                   '学習純利益': sum(r.train_stats[r.selected]['pnl_net'] for r in selected)}
+            row.update(performance([r.test_stats for r in selected]))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def build_trade_history(self, results):
+        \"\"\"検証ウィンドウで選択戦略が行った取引。\"\"\"
+        trades = []
+        for r in results:
+            for trade in r.test_trades:
+                trades.append({'ウィンドウ': self.windows[r.window_index].label, '戦略名': self.strategy_names[r.selected], **trade})
+        return pd.DataFrame(trades, columns=['ウィンドウ', '戦略名'] + TRADE_HISTORY_COLUMNS)""",
+
+    "src/evaluation/run_walkforward.py": """import sys
+import os
+import argparse
+import logging
+from datetime import datetime
+
+# ------------------------------------------------------------------------------
+# 戦略カタログのウォークフォワード評価を実行します。
+# `python -m src.evaluation.run_walkforward [--train-days N] [--test-days N] [--step-days N]`
+# ------------------------------------------------------------------------------
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.util import logger as logger_setup
+from src.evaluation import config_evaluation as config
+from src.evaluation.orchestrator import load_inputs
+from src.evaluation.walkforward import WalkForwardEngine
+
+RESULTS_ROOT_DIR = 'results/walkforward'
+
+
+def main(train_days=None, test_days=None, step_days=None, max_workers=None):
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
+
+    base_config, strategies = load_inputs()
+    if strategies is None: return None
+
+    try:
+        engine = WalkForwardEngine(
+            base_config, strategies,
+            train_days=train_days or config.WALKFORWARD_TRAIN_DAYS,
+            test_days=test_days or config.WALKFORWARD_TEST_DAYS,
+            step_days=step_days or config.WALKFORWARD_STEP_DAYS,
+            max_workers=max_workers or config.MAX_WORKERS,
+            log_level_override=config.BACKTEST_LOG_LEVEL_OVERRIDE
+        )
+        results = engine.run()
+    except ValueError as e:
+        logging.error(f"ウォークフォワード評価の設定が不正です: {e}")
+        return None
+    if not results:
+        return None
+
+    os.makedirs(current_results_dir, exist_ok=True)
+    summary_df = engine.build_summary(results)
+    outputs = {
+        f"walkforward_summary_{timestamp}.csv": summary_df,
+        f"walkforward_detail_{timestamp}.csv": engine.build_detail(results),
+        f"walkforward_trade_history_{timestamp}.csv": engine.build_trade_history(results),
+    }
+    for filename, df in outputs.items():
+        df.to_csv(os.path.join(current_results_dir, filename), index=False, encoding='utf-8-sig')
+    logging.info(f"ウォークフォワード評価の結果を '{current_results_dir}' に保存しました。")
+    overall = summary_df.iloc[-1]
+    logging.info(f"学習期間の純利益 (選択戦略): {overall['学習純利益']:,.0f} / 検証期間の純利益: {overall['純利益']:,.0f} "
+                 f"(PF {overall['PF']:.2f}, 勝率 {overall['勝率']:.2f}%, {overall['総トレード数']} トレード)")
+    return current_results_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略カタログのウォークフォワード評価を実行します。')
+    parser.add_argument('--train-days', type=int, default=None, help=f"学習ウィンドウの営業日数 (既定: {config.WALKFORWARD_TRAIN_DAYS})")
+    parser.add_argument('--test-days', type=int, default=None, help=f"検証ウィンドウの営業日数 (既定: {config.WALKFORWARD_TEST_DAYS})")
+    parser.add_argument('--step-days', type=int, default=None, help='ウィンドウをずらす営業日数 (既定: 検証ウィンドウと同じ)')
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    args = parser.parse_args()
+    logger_setup.setup_logging('log', log_prefix='walkforward', level=config.LOG_LEVEL)
+    main(args.train_days, args.test_days, args.step_days, args.workers)"""
 }
 
 
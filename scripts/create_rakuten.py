@@ -3,12 +3,10 @@ import os
 # ==============================================================================
 # ファイル: create_rakuten.py
 # 実行方法: python create_rakuten.py
-# Ver. 00-03
+# Ver. 00-14
 # 変更点:
-#   - src/realtrade/rakuten/rakuten_data.py (_populate_lines):
-#     - self.last_dt の設定を `pd.to_datetime(row.name).to_pydatetime()` に
-#       変更し、タイムスタンプの型が`pandas.Timestamp`でも`datetime.datetime`
-#       でもエラーにならないように堅牢化。
+#   - rakuten/rakuten_data.py:
+#     - 未使用の import (os) を削除。
 # ==============================================================================
 
 project_files = {
@@ -23,6 +21,7 @@ import pythoncom
 import os
 
 from .excel_reader import ExcelReader
+from .tick_publisher import TickPublisher
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +32,7 @@ class ExcelConnector:
     \"\"\"
     POLLING_INTERVAL = 1.0  # 1秒ごとにExcelをポーリング
 
-    def __init__(self, workbook_path: str):
+    def __init__(self, workbook_path: str, polling_interval: float = None, update_cell: str = None):
         if not os.path.isabs(workbook_path):
             self.workbook_path = os.path.abspath(workbook_path)
         else:
@@ -45,6 +44,15 @@ class ExcelConnector:
         self.lock = threading.Lock()
         self.is_running = False
         self.data_thread = None
+        # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+        # 読み取りのたびに前回と比較し、値の変わった銘柄だけを購読者へ配信する
+        self.publisher = TickPublisher()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        if polling_interval is not None:
+            self.POLLING_INTERVAL = polling_interval
+        self.update_cell = update_cell
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info(f"ExcelConnector initialized for workbook: {self.workbook_path}")
 
     def start(self):
@@ -64,6 +72,15 @@ class ExcelConnector:
             self.data_thread.join(timeout=5)
         logger.info("Excel data listener thread stopped.")
 
+    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+    def subscribe(self, symbol, callback):
+        \"\"\"銘柄の値が変わるたびに callback(tick) を呼ぶ。(Tick: 銘柄コード・読み取りの通し番号・読み取り完了時刻・値)\"\"\"
+        self.publisher.subscribe(symbol, callback)
+
+    def unsubscribe(self, symbol, callback):
+        self.publisher.unsubscribe(symbol, callback)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _data_loop(self):
         \"\"\"
         バックグラウンドで実行され、ExcelReader を使って定期的にデータを更新する。
@@ -73,7 +90,7 @@ class ExcelConnector:
         try:
             # xlwingsでBookオブジェクトを取得（既存のExcelプロセスに接続、なければ開く）
             book = xw.Book(self.workbook_path)
-            self.reader = ExcelReader(book.sheets)
+            self.reader = ExcelReader(book.sheets, update_cell=self.update_cell)
             logger.info("Data monitoring thread established connection to Excel.")
 
             while self.is_running:
@@ -81,11 +98,19 @@ class ExcelConnector:
                     # データ取得と解析はReaderに委譲
                     market_data = self.reader.read_market_data()
                     positions = self.reader.read_positions()
+                    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+                    read_at = time.perf_counter()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
 
                     # 取得したデータをスレッドセーフに格納
                     with self.lock:
                         self.latest_data = market_data
                         self.latest_positions = positions
+
+                    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+                    # ロックの外で配信する (購読者は get_latest_data を経由せずに Tick の値を使う)
+                    self.publisher.publish(market_data, read_at)
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
                         
                 except Exception as e:
                     logger.error(f"Error during data read loop: {e}", exc_info=True)
@@ -117,10 +142,10 @@ class ExcelConnector:
     def get_positions(self) -> dict:
         \"\"\"最新の建玉情報を取得する。\"\"\"
         with self.lock:
-            return self.latest_positions.copy()
-""",
+            return self.latest_positions.copy()""",
 
     "src/realtrade/bridge/excel_reader.py": """import logging
+import numpy as np
 try:
     import xlwings as xw
 except ImportError:
@@ -132,9 +157,21 @@ class ExcelReader:
     \"\"\"
     Excelシートの構造を熟知し、指定されたセルのデータを読み取って
     Pythonで扱える形式に変換・整形する責務を持つ。
-    このクラスは状態を持たない (Stateless)。
+    COM 呼び出し (プロセス間通信) を減らすため、シートごとに1回の範囲読み取りで全データを取得する。
+    前回の読み取り結果を保持し、変化のない部分は再変換しない:
+      - 銘柄コード列 -> 行の対応は、列の内容が変わった時だけ作り直す
+      - 値の変わった行だけを事前確保した numpy 配列 (数値列) に変換し、その行の辞書を作り直す
+      - 範囲全体が前回と同じなら変換せず、前回と同じ辞書オブジェクトを返す (呼び出し側は `is` で判定できる)
+      - update_cell (RSS の更新時刻などを表示するセル) を指定すると、その値が前回と同じ場合は範囲の読み取り自体を省略する
     \"\"\"
-    def __init__(self, sheets: 'xw.Sheets'):
+    # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+    MARKET_RANGE = 'A2:I226'    # A-F列: 銘柄コード・現在値・始値・高値・安値・出来高 / I2: 現金残高
+    CASH_COLUMN = 8
+    POSITION_RANGE = 'A3:J203'
+    MARKET_FIELDS = ('close', 'open', 'high', 'low', 'volume')
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    def __init__(self, sheets: 'xw.Sheets', update_cell: str = None):
         if xw is None:
             raise ImportError("xlwings is not installed. Please install it with 'pip install xlwings'")
             
@@ -146,44 +183,119 @@ class ExcelReader:
             logger.error(f"Failed to find required sheets ('リアルタイムデータ', 'position'). Error: {e}")
             raise
 
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        self.update_cell = update_cell
+        self._update_stamp = None
+        self._symbol_column = None      # 前回の銘柄コード列 (シート上の値)
+        self._rows = []                 # [(範囲内の行番号, 銘柄コード)]
+        self._block = np.empty((0, len(self.MARKET_FIELDS)))   # 行ごとの数値 (self._rows と同じ順序)
+        self._records = []              # 行ごとの値の辞書 (self._rows と同じ順序)
+        self._market_values = None      # 前回の範囲読み取りの値
+        self._market_data = None
+        self._position_values = None
+        self._positions = {}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def read_market_data(self) -> dict:
         \"\"\"
         市場データと現金残高を読み取り、整形された辞書を返す。
         \"\"\"
         try:
-            market_data_range = self.data_sheet.range('A2:F226').value
-            cash_value = self.data_sheet.range('I2').value
-
-            current_market_data = {}
-            if market_data_range:
-                for row in market_data_range:
-                    symbol = row[0]
-                    if symbol is not None:
-                        try:
-                            # 銘柄コード、株価、出来高などを辞書に格納
-                            symbol_str = str(int(symbol))
-                            current_market_data[symbol_str] = {
-                                'close': row[1], 'open': row[2],
-                                'high': row[3], 'low': row[4], 'volume': row[5]
-                            }
-                        except (ValueError, TypeError):
-                            # 不正なデータが含まれる行はスキップ
-                            continue
-            
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            if self.update_cell is not None:
+                stamp = self.data_sheet.range(self.update_cell).value
+                if self._market_data is not None and stamp == self._update_stamp:
+                    return self._market_data
+                self._update_stamp = stamp
+
+            values = self.data_sheet.range(self.MARKET_RANGE).value
+            # 範囲全体が前回と同じなら変換を省略する
+            if self._market_data is not None and values == self._market_values:
+                return self._market_data
+            if not values:
+                self._market_values, self._market_data = values, {'account': {'cash': None}}
+                return self._market_data
+
+            symbol_column = [row[0] for row in values]
+            if symbol_column != self._symbol_column:
+                self._map_symbols(symbol_column)
+                self._market_values = None
+            self._convert_rows(values)
+            self._market_values = values
+            cash_value = values[0][self.CASH_COLUMN]
+
+            current_market_data = {symbol: record for (_, symbol), record in zip(self._rows, self._records)}
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # 口座情報（現金）を辞書に格納
             current_market_data['account'] = {'cash': cash_value}
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            self._market_data = current_market_data
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return current_market_data
 
         except Exception as e:
             logger.error(f"Error reading market data from Excel: {e}", exc_info=True)
             return {'account': {'cash': 0.0}} # エラー発生時はデフォルト値を返す
 
+    # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+    def _map_symbols(self, symbol_column):
+        \"\"\"銘柄コード列から (行番号, 銘柄コード) の対応を作り直し、数値ブロックを確保する。\"\"\"
+        rows = []
+        for i, symbol in enumerate(symbol_column):
+            if symbol is None:
+                continue
+            try:
+                rows.append((i, str(int(symbol))))
+            except (ValueError, TypeError):
+                # 不正な銘柄コードの行はスキップ
+                continue
+        self._symbol_column = symbol_column
+        self._rows = rows
+        self._block = np.full((len(rows), len(self.MARKET_FIELDS)), np.nan)
+        self._records = [dict.fromkeys(self.MARKET_FIELDS) for _ in rows]
+
+    def _convert_rows(self, values):
+        \"\"\"
+        前回から値の変わった行だけを数値ブロック (numpy) に変換し、その行の辞書を作り直す。
+        空欄・数値でないセルは None として扱う。
+        \"\"\"
+        previous, width = self._market_values, len(self.MARKET_FIELDS)
+        if previous is None or len(previous) != len(values):
+            # 初回・銘柄の入れ替え時はブロック全体をまとめて変換する
+            if self._rows:
+                self._block[:] = [[self._to_float(v) for v in values[i][1:1 + width]] for i, _ in self._rows]
+            self._records = [{field: (None if v != v else v) for field, v in zip(self.MARKET_FIELDS, numbers)} for numbers in self._block.tolist()]
+            return
+        for k, (i, _) in enumerate(self._rows):
+            row = values[i]
+            if row == previous[i]:
+                continue
+            numbers = self._block[k]
+            numbers[:] = [self._to_float(v) for v in row[1:1 + width]]
+            self._records[k] = {field: (None if v != v else v) for field, v in zip(self.MARKET_FIELDS, numbers.tolist())}
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value) if value is not None else np.nan
+        except (ValueError, TypeError):
+            return np.nan
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def read_positions(self) -> dict:
         \"\"\"
         建玉情報を読み取り、整形された辞書を返す。
         \"\"\"
         try:
-            position_data_range = self.position_sheet.range('A3:J203').value
+            position_data_range = self.position_sheet.range(self.POSITION_RANGE).value
+
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            # 前回と同じ内容なら変換を省略する
+            if position_data_range is not None and position_data_range == self._position_values:
+                return self._positions
+            self._position_values = position_data_range
+            # ▲▲▲【変更箇所ここまで】▲▲▲
 
             current_positions = {}
             if not position_data_range:
@@ -210,6 +322,9 @@ class ExcelReader:
                     # 不正なデータが含まれる行はスキップ
                     continue
             
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            self._positions = current_positions
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return current_positions
 
         except Exception as e:
@@ -224,9 +339,12 @@ from datetime import datetime, timedelta, time
 import logging
 import pandas as pd
 import threading
-import os
 
 from ..bar_builder import BarBuilder
+from ..history_cursor import HistoryCursor
+# ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+from .. import bar_journal
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 logger = logging.getLogger(__name__)
 
@@ -238,6 +356,17 @@ class RakutenData(bt.feeds.PandasData):
         ('timeframe', bt.TimeFrame.Minutes),
         ('heartbeat', 1.0),
         ('save_file', None), # [新規] 保存先ファイルパス
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # True: CerebroScheduler が全銘柄のバーをまとめて構築し、notify_bar() で渡した確定足だけを供給する
+        # (ブリッジへの問い合わせ・ハートビートによる間引き・銘柄ごとの BarBuilder は不要)
+        ('scheduled', False),
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        # True: 確定したバーを当日のジャーナル ({save_file}.{YYYYMMDD}.journal) へ1本ずつ追記し、save_history ではジャーナルを差分マージする
+        ('journal', False),
+        # ジャーナルのディスクへの同期をまとめて行う JournalSyncer (None の場合は追記のたびに同期する)
+        ('journal_syncer', None),
+        # ▲▲▲【変更箇所ここまで】▲▲▲
     )
 
     def __init__(self):
@@ -249,6 +378,10 @@ class RakutenData(bt.feeds.PandasData):
         )
         empty_df = empty_df.set_index('datetime')
         self.p.dataname = empty_df
+        # ▼▼▼【変更箇所: 履歴の DataFrame を _hist_df 以外から参照させない】▼▼▼
+        # メタクラスが dataname を _dataname にも保持し、リサンプリング用のクローンに引き継ぐため差し替える
+        self._dataname = empty_df
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
         super(RakutenData, self).__init__()
         
@@ -264,24 +397,106 @@ class RakutenData(bt.feeds.PandasData):
         self._stopevent = threading.Event()
         
         # BarBuilderのインスタンスを生成
-        self.builder = BarBuilder(interval_minutes=self.p.compression)
+        # ▼▼▼【変更箇所: スケジューラー駆動ではスケジューラーがバーを構築する】▼▼▼
+        self.builder = None if self.p.scheduled else BarBuilder(interval_minutes=self.p.compression)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # [新規] データ保存用バッファと設定
         self.save_file = self.p.save_file
         self._new_bars = [] 
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        self.journal_date = datetime.now().strftime('%Y%m%d')
+        self.journal = None
+        if self.p.journal and self.save_file:
+            self.journal = bar_journal.BarJournal(bar_journal.journal_path(self.save_file, self.journal_date), syncer=self.p.journal_syncer)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # [追加] 累積出来高のキャッシュ (None/0判定用)
         self._last_valid_cumulative_volume = 0.0
 
         self.history_supplied = False if (self._hist_df is not None and not self._hist_df.empty) else True
+        # ▼▼▼【変更箇所: 履歴はカーソルで供給】▼▼▼
+        # 最初の _load で _hist_df を numpy 配列に変換する (フィードのタイムゾーンは start 後に確定するため)
+        self._history = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        self._bar = None
+        self.bars_built = 0  # リアルタイムで確定させたバーの数
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 供給終了フラグ】▼▼▼
+        # stop() 後に _load が False を返した時点で True。以降に届く上位足のバーは Backtrader が
+        # データ終了時に作りかけの足を確定させたもので、翌日の再生では同じ足にならない
+        self.ended = False
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def stop(self):
         self._stopevent.set()
 
+    # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+    def notify_bar(self, bar):
+        \"\"\"スケジューラーが構築した確定足 (None: 確定足なし) を受け取る。次の _load で1回だけ供給する。\"\"\"
+        self._bar = bar
+
+    def tick_values(self, latest_data, current_dt):
+        \"\"\"
+        Excel の値の辞書を、バーの構築に使う (現在値, 累計出来高) に変換する。
+        値がない・参照できる価格がない・取引時間外の場合は None (バーを更新しない)。
+        \"\"\"
+        if not latest_data:
+            return None
+
+        price = latest_data.get('close')
+        volume = latest_data.get('volume')
+
+        # 価格が None または 0（未決定）の場合の処理
+        is_price_invalid = (price is None) or (price <= 0)
+
+        if is_price_invalid:
+            # 既に過去データ（前日終値など）が読み込まれていればそれを使用
+            if len(self) > 0:
+                price = self.lines.close[0]
+                # 価格が無効な間は、出来高も「変化なし（Tick出来高0）」として扱うため
+                # 前回の有効な累積出来高を強制的に使用する
+                volume = self._last_valid_cumulative_volume
+            else:
+                # 参照できる価格が全くない場合は待機
+                return None
+        else:
+            # 出来高のハンドリング
+            if volume is None:
+                # Noneの場合は前回値を維持
+                volume = self._last_valid_cumulative_volume
+            else:
+                # 0 または 正の値の場合は有効な累積出来高として更新
+                self._last_valid_cumulative_volume = volume
+
+        # 取引時間外フィルター (09:00-11:30, 12:30-15:30)
+        current_time = current_dt.time()
+        is_morning = time(9, 0) <= current_time <= time(11, 30)
+        is_afternoon = time(12, 30) <= current_time <= time(15, 30)
+        if not (is_morning or is_afternoon):
+            return None
+        return price, volume
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def save_history(self):
         \"\"\"
         蓄積された当日の確定足をCSVに保存・マージする。
+        ジャーナル使用時は、マージした確定足の DataFrame を返す。
         \"\"\"
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        if self.journal is not None:
+            self.journal.close()
+            try:
+                new_df = bar_journal.compact(self.save_file, self.journal_date)
+                logger.info(f"[{self.symbol}] 履歴データを保存しました: {self.save_file} (+{len(new_df)} records)")
+                self._new_bars = []
+                return new_df
+            except Exception as e:
+                logger.error(f"[{self.symbol}] 履歴データの保存中にエラーが発生しました: {e}", exc_info=True)
+                return None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         if not self._new_bars:
             logger.info(f"[{self.symbol}] 保存すべき新規データはありません。")
             return
@@ -291,48 +506,12 @@ class RakutenData(bt.feeds.PandasData):
             return
 
         try:
-            # 1. 新規データをDataFrame化
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            # タイムゾーンの統一 (Asia/Tokyo)・既存データとのマージ・重複排除とソート・保存は bar_journal.merge_rewrite で行う
             new_df = pd.DataFrame(self._new_bars)
             new_df.rename(columns={'timestamp': 'datetime'}, inplace=True)
-            if 'openinterest' not in new_df.columns:
-                new_df['openinterest'] = 0
-
-            # タイムゾーンをJSTに統一 ('Asia/Tokyo')
-            if 'datetime' in new_df.columns:
-                new_df['datetime'] = pd.to_datetime(new_df['datetime'])
-                if new_df['datetime'].dt.tz is None:
-                    new_df['datetime'] = new_df['datetime'].dt.tz_localize('Asia/Tokyo')
-                else:
-                    new_df['datetime'] = new_df['datetime'].dt.tz_convert('Asia/Tokyo')
-
-            # 2. 既存データとのマージ
-            if os.path.exists(self.save_file):
-                try:
-                    # 既存CSV読み込み
-                    old_df = pd.read_csv(self.save_file, parse_dates=['datetime'])
-                    old_df.columns = [c.lower() for c in old_df.columns]
-                    
-                    # 既存データのタイムゾーン統一
-                    if 'datetime' in old_df.columns:
-                         if old_df['datetime'].dt.tz is None:
-                             old_df['datetime'] = old_df['datetime'].dt.tz_localize('Asia/Tokyo')
-                         else:
-                             old_df['datetime'] = old_df['datetime'].dt.tz_convert('Asia/Tokyo')
-
-                    merged_df = pd.concat([old_df, new_df])
-                except Exception as e:
-                    logger.error(f"[{self.symbol}] 既存CSV読み込み失敗。新規作成します: {e}")
-                    merged_df = new_df
-            else:
-                merged_df = new_df
-
-            # 3. 重複排除とソート
-            merged_df.drop_duplicates(subset=['datetime'], keep='last', inplace=True)
-            merged_df.sort_values(by='datetime', inplace=True)
-
-            # 4. 保存
-            os.makedirs(os.path.dirname(self.save_file), exist_ok=True)
-            merged_df.to_csv(self.save_file, index=False)
+            bar_journal.merge_rewrite(self.save_file, new_df)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             
             logger.info(f"[{self.symbol}] 履歴データを保存しました: {self.save_file} (+{len(self._new_bars)} records)")
             
@@ -344,25 +523,40 @@ class RakutenData(bt.feeds.PandasData):
 
     def _load(self):
         # 1. 過去データの供給
+        # ▼▼▼【変更箇所: 履歴を1度だけ配列に変換し、カーソルで1本ずつ供給】▼▼▼
+        # 毎バーの iloc による取り出し・スライスを避け、1本あたりの処理を履歴の長さに依存させない
         if self._hist_df is not None and not self._hist_df.empty:
-            row = self._hist_df.iloc[0]
-            self._hist_df = self._hist_df.iloc[1:]
-            self._populate_lines_from_series(row)
-            logger.debug(f"[{self.symbol}] 過去データを供給: {row.name}")
-            if self._hist_df.empty:
+            self._history = HistoryCursor(self._hist_df, tz=self._tz)
+            self._hist_df = None
+            logger.debug(f"[{self.symbol}] 過去データ {len(self._history)} 件を供給します。")
+        if self._history is not None:
+            self._history.populate(self.lines)
+            if self._history.exhausted:
                 self.history_supplied = True
+                self.last_dt = self._history.last_datetime
+                self._history = None
             return True
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 2. 停止判定
         if self._stopevent.is_set():
+            # ▼▼▼【変更箇所: 供給終了フラグ】▼▼▼
+            self.ended = True
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return False
 
         current_dt = datetime.now()
         
+        # ▼▼▼【変更箇所: スケジューラー駆動ではスケジューラーが構築した確定足を1回だけ供給する】▼▼▼
+        if self.p.scheduled:
+            bar, self._bar = self._bar, None
+            return None if bar is None else self._accept_bar(bar)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         # 3. ハートビート制御 (高頻度アクセス防止)
         if self.last_dt and (current_dt - self.last_dt) < timedelta(seconds=self.p.heartbeat):
             return None
-        
+
         # 4. データ取得
         latest_data = self.bridge.get_latest_data(self.symbol)
 
@@ -370,57 +564,28 @@ class RakutenData(bt.feeds.PandasData):
         if not latest_data:
             return self._load_heartbeat()
 
-        price = latest_data.get('close')
-        volume = latest_data.get('volume')
-
-        # --- ▼▼▼ 修正箇所 ▼▼▼ ---
-        
-        # 価格が None または 0（未決定）の場合の処理
-        is_price_invalid = (price is None) or (price <= 0)
-
-        if is_price_invalid:
-            # 既に過去データ（前日終値など）が読み込まれていればそれを使用
-            if len(self) > 0:
-                price = self.lines.close[0]
-                # 価格が無効な間は、出来高も「変化なし（Tick出来高0）」として扱うため
-                # 前回の有効な累積出来高を強制的に使用する
-                volume = self._last_valid_cumulative_volume
-            else:
-                # 参照できる価格が全くない場合は待機（Heartbeat）
-                return self._load_heartbeat()
-        else:
-            # 価格が有効な場合
-            
-            # 出来高のハンドリング
-            if volume is None:
-                # Noneの場合は前回値を維持
-                volume = self._last_valid_cumulative_volume
-            else:
-                # 0 または 正の値の場合は有効な累積出来高として更新
-                self._last_valid_cumulative_volume = volume
-
-        # --- ▲▲▲ 修正箇所ここまで ▲▲▲ ---
-
-        # 5. 取引時間外フィルター (09:00-11:30, 12:30-15:30)
-        current_time = current_dt.time()
-        is_morning = time(9, 0) <= current_time <= time(11, 30)
-        is_afternoon = time(12, 30) <= current_time <= time(15, 30)
-
-        if not (is_morning or is_afternoon):
-            # 取引時間外はTick処理しない
+        # ▼▼▼【変更箇所: 値の変換・取引時間外フィルターを tick_values に分離 (スケジューラーと共用)】▼▼▼
+        # 5. 価格・出来高の補完と取引時間外フィルター
+        values = self.tick_values(latest_data, current_dt)
+        if values is None:
+            # 参照できる価格がない場合のハートビートは履歴がないため常に None
             return None
 
         # 6. BarBuilder処理
-        completed_bar = self.builder.add_tick(current_dt, price, volume)
-
-        if completed_bar:
-            logger.info(f"[{self.symbol}] 新規5分足完成: {completed_bar['timestamp']}")
-            # 保存用バッファに追加
-            self._new_bars.append(completed_bar.copy())
-            self._populate_lines_from_dict(completed_bar)
-            return True
-        else:
-            return None
+        completed_bar = self.builder.add_tick(current_dt, *values)
+        return None if completed_bar is None else self._accept_bar(completed_bar)
+
+    def _accept_bar(self, completed_bar):
+        \"\"\"確定足を保存用バッファ・ジャーナルに追加し、ラインに供給する。\"\"\"
+        logger.info(f"[{self.symbol}] 新規5分足完成: {completed_bar['timestamp']}")
+        # 保存用バッファに追加
+        self._new_bars.append(completed_bar.copy())
+        if self.journal is not None:
+            self.journal.append(completed_bar)
+        self._populate_lines_from_dict(completed_bar)
+        self.bars_built += 1
+        return True
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def _load_heartbeat(self):
         if len(self.lines.close) == 0 or self.lines.close[0] is None:
@@ -447,21 +612,19 @@ class RakutenData(bt.feeds.PandasData):
         if not is_heartbeat:
             self.last_dt = dt
 
-    def _populate_lines_from_series(self, bar_series: pd.Series):
-        dt = pd.to_datetime(bar_series.name).to_pydatetime()
-        self.lines.datetime[0] = self.date2num(dt)
-        self.lines.open[0] = float(bar_series['open'])
-        self.lines.high[0] = float(bar_series['high'])
-        self.lines.low[0] = float(bar_series['low'])
-        self.lines.close[0] = float(bar_series['close'])
-        self.lines.volume[0] = float(bar_series.get('volume', 0))
-        self.lines.openinterest[0] = float(bar_series.get('openinterest', 0))
-        self.last_dt = dt
-        
     def flush(self):
-        final_bar = self.builder.flush()
+        # ▼▼▼【変更箇所: スケジューラー駆動では停止時にスケジューラーが渡した形成途中のバー】▼▼▼
+        if self.p.scheduled:
+            final_bar, self._bar = self._bar, None
+        else:
+            final_bar = self.builder.flush()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         if final_bar:
             self._new_bars.append(final_bar.copy())
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            if self.journal is not None:
+                self.journal.append(final_bar)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             self._populate_lines_from_dict(final_bar)
             logger.info(f"[{self.symbol}] 最終バーをフラッシュ供給: {final_bar['timestamp']}")""",
 
@@ -497,7 +660,85 @@ class RakutenBroker(bt.brokers.BackBroker):
     def cancel(self, order, **kwargs):
         logger.info("【手動発注モード】注文キャンセル。")
         return super().cancel(order, **kwargs)
-"""
+""",
+
+    "src/realtrade/bridge/tick_publisher.py": """import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Tick:
+    \"\"\"
+    1銘柄分の値の変化。
+    seq: 読み取りの通し番号 / read_at: 読み取り完了時刻 (time.perf_counter) / data: 銘柄の値 (行がなくなった場合は空の辞書)
+    \"\"\"
+    __slots__ = ('symbol', 'seq', 'read_at', 'data')
+
+    def __init__(self, symbol, seq, read_at, data):
+        self.symbol = symbol
+        self.seq = seq
+        self.read_at = read_at
+        self.data = data
+
+    def __repr__(self):
+        return f"Tick({self.symbol}, seq={self.seq}, data={self.data})"
+
+
+class TickPublisher:
+    \"\"\"
+    Excel から読み取ったスナップショット ({銘柄コード: 値の辞書}) を前回と比較し、
+    値の変わった銘柄だけを、その銘柄の購読者 (コールバック) へ Tick として配信する。
+    比較するのは購読されている銘柄だけで、値の変わらない銘柄は購読者を呼び出さない。
+    (時刻の経過だけでは配信しないため、値の変わらない銘柄のバーは CerebroScheduler が時間枠の境界で最後の値を再送して確定させる)
+    publish はデータ取得スレッドから呼ばれる。購読者の登録は別スレッドからでもよい (登録時に辞書を差し替えるため、配信側はロック不要)。
+    配信する値の辞書は購読者間で共有されるため、購読者は変更しないこと。
+    \"\"\"
+    def __init__(self):
+        self._subscribers = {}
+        self._subscribe_lock = threading.Lock()
+        self._previous = {}
+        self.seq = 0
+
+    def subscribe(self, symbol, callback):
+        \"\"\"callback(tick) を登録する。データ取得スレッドから呼ばれるため、処理は短く保つこと。\"\"\"
+        symbol = str(symbol)
+        with self._subscribe_lock:
+            subscribers = dict(self._subscribers)
+            subscribers[symbol] = subscribers.get(symbol, ()) + (callback,)
+            self._subscribers = subscribers
+
+    def unsubscribe(self, symbol, callback):
+        symbol = str(symbol)
+        with self._subscribe_lock:
+            subscribers = dict(self._subscribers)
+            callbacks = tuple(c for c in subscribers.get(symbol, ()) if c != callback)  # バインドメソッドは取得のたびに別オブジェクトのため等価で比較する
+            if callbacks:
+                subscribers[symbol] = callbacks
+            else:
+                subscribers.pop(symbol, None)
+            self._subscribers = subscribers
+
+    def publish(self, snapshot, read_at):
+        \"\"\"スナップショットを前回と比較して配信し、配信した銘柄数を返す。\"\"\"
+        self.seq += 1
+        if snapshot is self._previous:
+            # ExcelReader は値が変わらなければ同じ辞書を返す
+            return 0
+        previous, self._previous = self._previous, snapshot
+        published = 0
+        for symbol, callbacks in self._subscribers.items():
+            data = snapshot.get(symbol)
+            if data == previous.get(symbol):
+                continue
+            tick = Tick(symbol, self.seq, read_at, data if data is not None else {})
+            for callback in callbacks:
+                try:
+                    callback(tick)
+                except Exception as e:
+                    logger.error(f"[{symbol}] Tick subscriber failed: {e}", exc_info=True)
+            published += 1
+        return published"""
 }
 
 
@@ -5,11 +5,11 @@ import copy
 # ==============================================================================
 # ファイル: create_realtrade.py
 # 実行方法: python create_realtrade.py
-# Ver. 00-47
+# Ver. 00-62
 # 変更点:
-#   - src/realtrade/run_realtrade.py:
-#     - カスタムCommissionInfoの適用方法を、正しいAPI呼び出しである
-#       `cerebro.broker.addcommissioninfo(...)` に修正。
+#   - scheduler.py:
+#     - 値の変わらない銘柄のバーも時間枠の境界で確定させるため、境界 (+ boundary_grace 秒) ごとに形成中のバーがある銘柄へ最後の値を再送するようにした。
+#     - Tick の待ち受け時間を次の境界までに制限した。
 # ==============================================================================
 
 project_files = {
@@ -42,6 +42,38 @@ if LIVE_TRADING:
 else:
     print("<<< シミュレーションモードで起動します (MockDataFetcher使用) >>>")
 
+# ライブ取引のインジケーターをストリーミング版 (src/core/streaming) で計算する。
+# False にすると Backtrader のインジケーターを使う。(定義がストリーミング版で再現できない戦略も Backtrader 版になる)
+STREAMING_INDICATORS = True
+
+# ライン・バッファをストラテジーが必要とする過去バー数に制限する (Backtrader の exactbars=1)。
+# 履歴の長さ・銘柄数に関わらず、セッション中のメモリ使用量が一定になる。False で全履歴を保持する。
+BOUNDED_LINE_BUFFERS = True
+# 全銘柄のメモリ使用量をログに出力する間隔 (秒)。0 で無効。
+MEMORY_REPORT_INTERVAL = 1800
+
+# 終了時に銘柄ごとの状態 (インジケーター・リサンプリング・ポジション) をスナップショットとして保存し、
+# 次回起動時は全履歴を再生せずに復元する。(STREAMING_INDICATORS が True の場合のみ有効)
+WARM_START = True
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshots')
+
+# 全銘柄の Cerebro を1つのスケジューラー・スレッド (src/realtrade/scheduler.py) で駆動する。
+# Excel の値が変わった銘柄だけを進めるため、ティックのない間はCPUをほぼ使わない。False で銘柄ごとにスレッドを起動する。
+EVENT_SCHEDULER = True
+# Excel の読み取りからストラテジーの処理完了までの遅延がこの秒数を超えたら警告する。
+DISPATCH_LATENCY_WARN = 0.5
+# ディスパッチ遅延の集計をログに出力する間隔 (秒)。0 で無効。
+DISPATCH_REPORT_INTERVAL = 300
+
+# 確定した5分足を銘柄ごと・日ごとのジャーナル ({5分足CSV}.{YYYYMMDD}.journal) へ1本ずつ追記し、異常終了しても失われないようにする。
+# 当日のうちに再起動した場合は履歴CSVに続けて当日のジャーナルを再生し、インジケーターを停止前の状態まで進める。
+# 終了時 (終了処理をせずに停止した日の分は次回起動時) にジャーナルを5分足CSVへ追記し、60分足・日足は新しいバーを含む期間だけを更新する。
+# False で従来どおり終了時に5分足CSV全体を書き直し、60分足・日足を全期間から再生成する。
+BAR_JOURNAL = True
+# ジャーナルをディスクへ同期 (fsync) する間隔 (秒)。追記はOSへの書き出しまでで、同期は別スレッドでまとめて行う。
+# (プロセスの異常終了ではバーは失われない。OSの停止・電源断ではこの秒数以内に確定したバーが失われうる)
+BAR_JOURNAL_SYNC_INTERVAL = 1.0
+
 INITIAL_CAPITAL = 5000000
 MAX_CONCURRENT_ORDERS = 5
 RECOMMEND_FILE_PATTERN = os.path.join(BASE_DIR, "results", "evaluation", "*", "all_recommend_*.csv")
@@ -52,66 +84,63 @@ LOG_DIR = os.path.join(BASE_DIR, 'log')
 
 # === Excel Bridge Settings ===
 # trading_hub.xlsmへの絶対パスまたは相対パスを指定
-EXCEL_WORKBOOK_PATH = os.path.join(BASE_DIR, "external", "trading_hub.xlsm")""",
+EXCEL_WORKBOOK_PATH = os.path.join(BASE_DIR, "external", "trading_hub.xlsm")
+# Excel の読み取り間隔 (秒)。読み取りはシートごとに1回の範囲読み取りで、値の変わらない行は再変換しないため 0.2 程度まで短縮できる。
+EXCEL_POLLING_INTERVAL = 1.0
+# RSS の更新時刻などを表示するセル (例: 'K2')。指定すると、その値が前回と同じ読み取りでは市場データの範囲を読まない。
+EXCEL_UPDATE_CELL = None""",
 
-    "src/realtrade/state_manager.py": """
-import sqlite3
+    "src/realtrade/state_manager.py": """import sqlite3
 import logging
 import os
 import threading
 
+# ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+from src.core.util import db_writer
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 logger = logging.getLogger(__name__)
 
 class StateManager:
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    # 書き込みは共有の書き込みスレッド (src/core/util/db_writer.py) のキューに積むだけで、呼び出し元はディスクI/Oを待たない
+    CREATE_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS positions (
+            symbol TEXT PRIMARY KEY, size REAL NOT NULL,
+            price REAL NOT NULL, entry_datetime TEXT NOT NULL)
+    '''
+    SAVE_SQL = "INSERT OR REPLACE INTO positions (symbol, size, price, entry_datetime) VALUES (?, ?, ?, ?)"
+    DELETE_SQL = "DELETE FROM positions WHERE symbol = ?"
+
     def __init__(self, db_path):
         self.db_path = db_path
-        self.conn = None
+        self.db = None
         self.lock = threading.Lock()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         try:
-            self.conn = sqlite3.connect(db_path, check_same_thread=False)
-            self._create_tables()
+            self.db = db_writer.open_database(db_path, schema=(self.CREATE_TABLE_SQL,))
             logger.info(f"データベースに接続しました: {db_path}")
         except sqlite3.Error as e:
             logger.critical(f"データベース接続エラー: {e}")
             raise
 
-    def _create_tables(self):
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS positions (
-                        symbol TEXT PRIMARY KEY, size REAL NOT NULL,
-                        price REAL NOT NULL, entry_datetime TEXT NOT NULL)
-                ''')
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"テーブル作成エラー: {e}")
-
     def close(self):
-        if self.conn:
-            self.conn.close()
+        if self.db:
+            self.db.close()
+            self.db = None
             logger.info("データベース接続をクローズしました。")
 
     def save_position(self, symbol, size, price, entry_datetime):
-        sql = "INSERT OR REPLACE INTO positions (symbol, size, price, entry_datetime) VALUES (?, ?, ?, ?)"
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute(sql, (str(symbol), size, price, entry_datetime))
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"ポジション保存エラー: {e}")
+        self.db.execute(self.SAVE_SQL, (str(symbol), size, price, entry_datetime))
 
     def load_positions(self):
         positions = {}
         sql = "SELECT symbol, size, price, entry_datetime FROM positions"
         try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                for row in cursor.execute(sql):
-                    positions[row[0]] = {'size': row[1], 'price': row[2], 'entry_datetime': row[3]}
+            # それまでに積まれた書き込みの後に読み取る
+            rows = self.db.call(lambda conn: conn.execute(sql).fetchall()).result()
+            for row in rows:
+                positions[row[0]] = {'size': row[1], 'price': row[2], 'entry_datetime': row[3]}
             logger.info(f"{len(positions)}件のポジションをDBからロードしました。")
             return positions
         except sqlite3.Error as e:
@@ -119,15 +148,8 @@ class StateManager:
             return {}
 
     def delete_position(self, symbol):
-        sql = "DELETE FROM positions WHERE symbol = ?"
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute(sql, (str(symbol),))
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"ポジション削除エラー: {e}")
-""",
+        self.db.execute(self.DELETE_SQL, (str(symbol),))
+    # ▲▲▲【変更箇所ここまで】▲▲▲""",
 
     "src/realtrade/analyzer.py": """import backtrader as bt
 import logging
@@ -159,8 +181,7 @@ class TradePersistenceAnalyzer(bt.Analyzer):
             self.state_manager.save_position(symbol, pos.size, pos.price, entry_dt)
             logger.info(f"StateManager: ポジションをDBに保存/更新: {symbol} (New Size: {pos.size})")""",
 
-    "src/realtrade/run_realtrade.py": """
-import logging
+    "src/realtrade/run_realtrade.py": """import logging
 import time as time_module
 import yaml
 import pandas as pd
@@ -177,10 +198,15 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from src.core.util import logger as logger_setup, notifier
+from src.core import data_cache
 from . import config_realtrade as config
 from .bridge.excel_connector import ExcelConnector
 from .position_synchronizer import PositionSynchronizer
 from .cerebro_factory import CerebroFactory
+from .memory_report import format_footprint
+from . import snapshot as warm_start
+from .scheduler import CerebroScheduler
+from . import bar_journal
 
 logger = logging.getLogger(__name__)
 
@@ -196,7 +222,7 @@ class RealtimeTrader:
         ).to_dict()
         
         self.statistics_map = {}
-        cols_to_load = ['Kelly_Adj', 'Kelly_Raw']
+        cols_to_load = ['Kelly_Adj', 'Kelly_Raw', 'Kelly_MC']
         for _, row in self.trade_data.iterrows():
             key = (row['戦略名'], str(row['銘柄']))
             stats = {col: row[col] for col in cols_to_load if col in row}
@@ -208,14 +234,27 @@ class RealtimeTrader:
         self.cerebro_instances = []
         self.strategy_instances = {}
         self.stop_event = threading.Event()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        self.scheduler = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
-        self.connector = ExcelConnector(workbook_path=config.EXCEL_WORKBOOK_PATH)
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        self.connector = ExcelConnector(workbook_path=config.EXCEL_WORKBOOK_PATH,
+                                        polling_interval=config.EXCEL_POLLING_INTERVAL,
+                                        update_cell=config.EXCEL_UPDATE_CELL)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        self.journal_syncer = bar_journal.JournalSyncer(config.BAR_JOURNAL_SYNC_INTERVAL, self.stop_event) if config.BAR_JOURNAL else None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         self.factory = CerebroFactory(
             self.strategy_catalog, 
             self.base_strategy_params, 
             config.DATA_DIR,
-            self.statistics_map
+            self.statistics_map,
+            # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+            journal_syncer=self.journal_syncer
+            # ▲▲▲【変更箇所ここまで】▲▲▲
         )
         self.synchronizer = PositionSynchronizer(self.connector, self.strategy_instances, self.stop_event)
 
@@ -279,6 +318,14 @@ class RealtimeTrader:
 
     def start(self):
         logger.info("Starting RealtimeTrader components...")
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        # 前日以前に終了処理をせずに停止して残ったジャーナルを、履歴の読み込み前にマージする
+        # (当日のジャーナルは CerebroFactory が履歴に続けて再生し、終了時にマージする)
+        if config.BAR_JOURNAL:
+            for symbol, save_file, new_bars in bar_journal.recover(config.DATA_DIR, datetime.now().strftime('%Y%m%d')):
+                self._update_resampled_csvs(symbol, save_file, new_bars)
+            self.journal_syncer.start()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         self.connector.start()
 
         logger.info(f"Initializing {len(self.symbols)} strategies in parallel...")
@@ -301,13 +348,25 @@ class RealtimeTrader:
                 except Exception as e:
                     logger.error(f"Exception during initialization for {symbol}: {e}")
 
-        logger.info("All strategies initialized. Starting threads...")
-
-        for cerebro in self.cerebro_instances:
-            symbol_name = cerebro.datas[0]._name 
-            t = threading.Thread(target=self._run_cerebro, args=(cerebro,), name=f"Cerebro-{symbol_name}", daemon=True)
-            self.threads.append(t)
-            t.start()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # 銘柄ごとのスレッドの代わりに、1つのスケジューラーが Excel の値が変わった銘柄だけを進める
+        if config.EVENT_SCHEDULER:
+            logger.info("All strategies initialized. Starting scheduler...")
+            self.scheduler = CerebroScheduler(
+                self.cerebro_instances, self.stop_event, start_time=time(9, 0),
+                latency_warn=config.DISPATCH_LATENCY_WARN, report_interval=config.DISPATCH_REPORT_INTERVAL
+            )
+            self.scheduler.subscribe(self.connector)
+            self.scheduler.start()
+        else:
+            logger.info("All strategies initialized. Starting threads...")
+
+            for cerebro in self.cerebro_instances:
+                symbol_name = cerebro.datas[0]._name 
+                t = threading.Thread(target=self._run_cerebro, args=(cerebro,), name=f"Cerebro-{symbol_name}", daemon=True)
+                self.threads.append(t)
+                t.start()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
         self.synchronizer.start()
         logger.info("RealtimeTrader started successfully.")
@@ -316,6 +375,13 @@ class RealtimeTrader:
         \"\"\"全コンポーネントを安全に停止し、データを確実に保存する。\"\"\"
         logger.info("Stopping RealtimeTrader...")
         self.stop_event.set()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # フィードへの書き込み (flush) と競合しないよう、先にスケジューラーを止める
+        if self.scheduler is not None:
+            self.scheduler.wake()
+            self.scheduler.join(timeout=30)
+            self.scheduler.log_latency()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 1. Primary Data (5分足) の保存
         logger.info("Saving primary history data (5m)...")
@@ -324,13 +390,17 @@ class RealtimeTrader:
             if cerebro.datas and hasattr(cerebro.datas[0], 'save_history'):
                 if hasattr(cerebro.datas[0], 'flush'):
                     cerebro.datas[0].flush()
-                cerebro.datas[0].save_history()
-                saved_symbols.append(cerebro.datas[0].symbol)
+                # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+                new_bars = cerebro.datas[0].save_history()
+                saved_symbols.append((cerebro.datas[0].symbol, cerebro.datas[0].save_file, new_bars))
+                # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 2. Resampled Data (60分足, 日足) の生成と保存
         logger.info("Generating and saving resampled data (60m, 1D)...")
         with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(self._regenerate_resampled_csvs, sym) for sym in saved_symbols]
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            futures = [executor.submit(self._update_resampled_csvs, *saved) for saved in saved_symbols]
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             for f in as_completed(futures):
                 pass 
 
@@ -342,14 +412,93 @@ class RealtimeTrader:
         # 4. スレッドの終了待機
         if self.synchronizer.is_alive():
             self.synchronizer.join(timeout=5)
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        if self.journal_syncer is not None and self.journal_syncer.is_alive():
+            self.journal_syncer.join(timeout=5)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         for t in self.threads:
             if t.is_alive():
                 t.join(timeout=5)
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # 停止済みのフィードで各 Cerebro のループを最後まで進める (スレッド方式の join に相当)
+        if self.scheduler is not None and not self.scheduler.is_alive():
+            self.scheduler.finish_all()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
+        # ▼▼▼【変更箇所: ウォームスタート用スナップショットの保存】▼▼▼
+        if config.WARM_START:
+            self._save_snapshots()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         # 5. Excelコネクタの停止
         self.connector.stop()
         logger.info("RealtimeTrader stopped.")
 
+    # ▼▼▼【変更箇所: メモリ使用量の報告】▼▼▼
+    @staticmethod
+    def _running_strategy(cerebro):
+        \"\"\"Cerebro が実行中 (または実行済み) のストラテジーのインスタンス。run() の開始前は None。\"\"\"
+        strategies = getattr(cerebro, 'runningstrats', None)
+        return strategies[0] if strategies else None
+
+    def log_memory_footprint(self):
+        \"\"\"全銘柄のライン・インジケーターの保持量を合計してログに出力する。(exactbars 使用時はセッション中一定)\"\"\"
+        count, total_values, total_bytes = 0, 0, 0
+        for cerebro in self.cerebro_instances:
+            strategy = self._running_strategy(cerebro)
+            if strategy is None: continue
+            footprint = strategy.memory_footprint()
+            count += 1; total_values += footprint['values']; total_bytes += footprint['bytes']
+            logger.debug(f"[{cerebro.datas[0].symbol}] Memory footprint: {format_footprint(footprint)}")
+        if count:
+            logger.info(f"Memory footprint: {count} symbols, {total_values:,} values, ~{total_bytes / 1024 / 1024:,.2f} MB")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: ウォームスタート用スナップショットの保存】▼▼▼
+    def _save_snapshots(self):
+        \"\"\"終了した各銘柄の状態を保存する。(ループが終了していない銘柄は状態が確定しないためスキップ)\"\"\"
+        saved = 0
+        if self.scheduler is not None:
+            running = [not cerebro.finished for cerebro in self.cerebro_instances]
+        else:
+            running = [thread.is_alive() for thread in self.threads]
+        for cerebro, is_running in zip(self.cerebro_instances, running):
+            primary = cerebro.datas[0]
+            strategy = self._running_strategy(cerebro)
+            if strategy is None or is_running:
+                logger.warning(f"[{primary.symbol}] Cerebro is not started or still running. Snapshot skipped.")
+                continue
+            try:
+                bars_df = data_cache.read_ohlcv(primary.save_file, tz_naive=True) if primary.save_file and os.path.exists(primary.save_file) else pd.DataFrame()
+                snapshot = strategy.build_snapshot(bars_df)
+                if snapshot is None:
+                    logger.info(f"[{primary.symbol}] State is not restorable. Snapshot skipped.")
+                    continue
+                warm_start.save_snapshot(config.SNAPSHOT_DIR, snapshot)
+                saved += 1
+            except Exception as e:
+                logger.error(f"[{primary.symbol}] Failed to save snapshot: {e}", exc_info=True)
+        logger.info(f"Saved {saved}/{len(self.cerebro_instances)} snapshots to {config.SNAPSHOT_DIR}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+    def _update_resampled_csvs(self, symbol, save_file, new_bars):
+        \"\"\"
+        ジャーナルからマージしたバー (new_bars) がある場合は、それを含む期間だけ60分足・日足を更新する。
+        ジャーナルを使わない場合・差分更新できない場合は全期間から再生成する。
+        \"\"\"
+        if new_bars is not None:
+            if new_bars.empty:
+                return
+            try:
+                date_str = datetime.now().strftime('%Y%m%d')
+                if bar_journal.update_resampled(symbol, config.DATA_DIR, save_file, new_bars, date_str):
+                    return
+            except Exception as e:
+                logger.error(f"[{symbol}] Incremental resampling failed. Regenerating from 5m: {e}", exc_info=True)
+        self._regenerate_resampled_csvs(symbol)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _regenerate_resampled_csvs(self, symbol):
         \"\"\"
         1. 5分足ファイル: glob検索で最新のファイルを特定して読み込む。
@@ -365,7 +514,7 @@ class RealtimeTrader:
         file_5m = max(files, key=os.path.getctime)
 
         try:
-            df = pd.read_csv(file_5m, parse_dates=['datetime'], index_col='datetime')
+            df = data_cache.read_ohlcv(file_5m)
         except Exception as e:
             logger.error(f"[{symbol}] Failed to read 5m file {file_5m}: {e}")
             return
@@ -422,11 +571,20 @@ def main():
                     logger.info(f"市場オープン準備 ({now.strftime('%H:%M')})。トレーダーを起動します。")
                     trader = RealtimeTrader()
                     trader.start()
+                    last_memory_report = time_module.monotonic()
                 else:
                     time_module.sleep(1)
+                    # ▼▼▼【変更箇所: メモリ使用量の定期報告】▼▼▼
+                    if config.MEMORY_REPORT_INTERVAL and time_module.monotonic() - last_memory_report >= config.MEMORY_REPORT_INTERVAL:
+                        trader.log_memory_footprint()
+                        last_memory_report = time_module.monotonic()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
             else:
                 if trader is not None:
                     logger.info(f"市場クローズ ({now.strftime('%H:%M')})。トレーダーを停止・データ保存します。")
+                    # ▼▼▼【変更箇所: 終了時のメモリ使用量 (セッション中の定期報告と比較用)】▼▼▼
+                    trader.log_memory_footprint()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
                     trader.stop()
                     trader = None
                     logger.info("トレーダーの停止が完了しました。")
@@ -540,18 +698,26 @@ import glob
 import pandas as pd
 from datetime import datetime
 
+from src.core import data_cache
+from . import config_realtrade as config
+from . import snapshot as warm_start
+from . import bar_journal
 from .strategy import RealTradeStrategy
 from .rakuten.rakuten_broker import RakutenBroker
 from .rakuten.rakuten_data import RakutenData
+from .scheduler import SteppedCerebro
 
 logger = logging.getLogger(__name__)
 
 class CerebroFactory:
-    def __init__(self, strategy_catalog, base_strategy_params, data_dir, statistics_map):
+    def __init__(self, strategy_catalog, base_strategy_params, data_dir, statistics_map, journal_syncer=None):
         self.strategy_catalog = strategy_catalog
         self.base_strategy_params = base_strategy_params
         self.data_dir = data_dir
         self.statistics_map = statistics_map
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        self.journal_syncer = journal_syncer
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("CerebroFactory initialized.")
 
     def create_instance(self, symbol: str, strategy_name: str, connector):
@@ -565,7 +731,12 @@ class CerebroFactory:
         strategy_params['strategy_name'] = strategy_name
 
         try:
-            cerebro = bt.Cerebro(runonce=False)
+            # ▼▼▼【変更箇所: ライン・バッファの制限・スケジューラー駆動】▼▼▼
+            # exactbars=1: データ・インジケーターの全ラインを必要な過去バー数だけ保持する (RealTradeStrategy.qbuffer)
+            # EVENT_SCHEDULER: CerebroScheduler が1ステップずつ駆動する SteppedCerebro を使う
+            cerebro_cls = SteppedCerebro if config.EVENT_SCHEDULER else bt.Cerebro
+            cerebro = cerebro_cls(runonce=False, exactbars=1 if config.BOUNDED_LINE_BUFFERS else False)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             cerebro.setbroker(RakutenBroker(bridge=connector))
             
             # 短期足設定
@@ -583,22 +754,41 @@ class CerebroFactory:
                 latest_file = max(files, key=os.path.getctime)
                 save_file_path = latest_file
                 try:
-                    df = pd.read_csv(latest_file, index_col='datetime', parse_dates=True)
+                    # [変更] バイナリキャッシュ経由で読み込み。タイムゾーン情報は除去してBacktraderに渡す(BT内部で処理するため)
+                    df = data_cache.read_ohlcv(latest_file, tz_naive=True)
                     if not df.empty:
-                        # タイムゾーン情報を除去してBacktraderに渡す(BT内部で処理するため)
-                        if df.index.tz is not None: df.index = df.index.tz_localize(None)
-                        df.columns = [x.lower() for x in df.columns]
                         hist_df = df
                         logger.info(f"[{symbol}] Loaded {len(hist_df)} bars from {latest_file}")
                 except Exception as e:
                     logger.warning(f"[{symbol}] Could not load historical data from {latest_file}: {e}")
             
+            # ▼▼▼【変更箇所: スナップショットからのウォームスタート】▼▼▼
+            # スナップショットが有効なら、全履歴ではなく直近の tail とスナップショット以降のバーだけを供給する
+            snapshot = None
+            if config.WARM_START and config.STREAMING_INDICATORS:
+                snapshot = warm_start.load_snapshot(config.SNAPSHOT_DIR, symbol, strategy_name, strategy_params)
+                if snapshot is not None:
+                    full_bars = len(hist_df)
+                    hist_df = warm_start.bars_to_replay(snapshot, hist_df)
+                    logger.info(f"[{symbol}] Warm start from snapshot (last bar {snapshot['last_bar']}): "
+                                f"replaying {len(hist_df)} of {full_bars} bars")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # ファイルが存在しない場合は新規作成パスを設定 (年単位)
             if not save_file_path:
                 year = datetime.now().year
                 save_file_path = os.path.join(self.data_dir, f"{symbol}_{compression}m_{year}.csv")
                 logger.info(f"[{symbol}] 新規保存先を設定: {save_file_path}")
 
+            # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+            # 当日のうちに再起動した場合、停止前に確定したバー (当日のジャーナル) を履歴に続けて供給する
+            if config.BAR_JOURNAL:
+                replayed = len(hist_df)
+                hist_df = bar_journal.replay(hist_df, save_file_path, datetime.now().strftime('%Y%m%d'))
+                if len(hist_df) > replayed:
+                    logger.info(f"[{symbol}] Replaying {len(hist_df) - replayed} bars from today's journal")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # [変更] RakutenDataにsave_fileを渡す
             primary_data = RakutenData(
                 dataname=hist_df,
@@ -606,7 +796,12 @@ class CerebroFactory:
                 symbol=symbol,
                 timeframe=bt.TimeFrame.TFrame(short_tf_config['timeframe']),
                 compression=short_tf_config['compression'],
-                save_file=save_file_path
+                save_file=save_file_path,
+                scheduled=config.EVENT_SCHEDULER,
+                # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+                journal=config.BAR_JOURNAL,
+                journal_syncer=self.journal_syncer
+                # ▲▲▲【変更箇所ここまで】▲▲▲
             )
             cerebro.adddata(primary_data, name=str(symbol))
 
@@ -623,7 +818,7 @@ class CerebroFactory:
             # 戦略追加
             stats_key = (strategy_name, str(symbol))
             symbol_statistics = self.statistics_map.get(stats_key, {})
-            strategy_components = { 'statistics': symbol_statistics }
+            strategy_components = { 'statistics': symbol_statistics, 'snapshot': snapshot }
             
             cerebro.addstrategy(
                 RealTradeStrategy, 
@@ -639,6 +834,8 @@ class CerebroFactory:
 
     "src/realtrade/bar_builder.py": """from datetime import datetime, timedelta
 
+import numpy as np
+
 class BarBuilder:
     \"\"\"
     リアルタイムのTickデータストリームを受け取り、定義された時間枠の
@@ -713,7 +910,134 @@ class BarBuilder:
             self._current_bar = None
             self._last_cumulative_volume = 0.0
             return final_bar
-        return None""",
+        return None
+
+
+class MultiBarBuilder:
+    \"\"\"
+    全銘柄のバーを、銘柄ごとのスロットで添字付けした numpy 配列でまとめて構築するクラス。
+    Excel のスナップショット1回分 (現在値・累計出来高のベクトル) を1回の呼び出しで処理し、
+    時間枠が切り替わった銘柄の完成バーを返す。
+    各銘柄のバーの内容 (差分出来高の扱いを含む) は銘柄ごとの BarBuilder と同じになる。
+    \"\"\"
+    def __init__(self, symbols, interval_minutes: int = 5):
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutes must be positive.")
+        self.interval_minutes = interval_minutes
+        self.symbols = [str(s) for s in symbols]
+        self.slots = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self._open = np.zeros(n)
+        self._high = np.zeros(n)
+        self._low = np.zeros(n)
+        self._close = np.zeros(n)
+        self._volume = np.zeros(n)
+        self._start = np.full(n, -1, dtype=np.int64)     # 形成中のバーの開始時刻のキー (-1: バーなし)
+        self._last_cumulative_volume = np.zeros(n)
+        self._start_times = {}                          # キー -> バーの開始時刻 (datetime)
+        self._last_bucket, self._last_key = None, None
+
+    def _bar_start(self, timestamp: datetime):
+        \"\"\"タイムスタンプが属するバーの開始時刻とそのキー (分単位の通し番号) を返す。分単位の時間枠ごとに1回だけ計算する。\"\"\"
+        bucket = (timestamp.toordinal(), timestamp.hour, timestamp.minute)
+        if bucket != self._last_bucket:
+            new_minute = timestamp.minute - (timestamp.minute % self.interval_minutes)
+            bar_start_time = timestamp.replace(minute=new_minute, second=0, microsecond=0)
+            key = (bucket[0] * 24 + bucket[1]) * 60 + new_minute
+            self._start_times.setdefault(key, bar_start_time)
+            self._last_bucket, self._last_key = bucket, key
+        return self._last_key
+
+    def add_snapshot(self, timestamp: datetime, prices, cumulative_volumes) -> dict:
+        \"\"\"
+        全銘柄分の現在値・累計出来高 (スロット順のベクトル, 欠損は NaN) を処理し、
+        完成したバーを {銘柄コード: バー(dict)} で返す。欠損のある銘柄の状態は変更しない。
+        \"\"\"
+        prices = np.asarray(prices, dtype=np.float64)
+        cumulative_volumes = np.asarray(cumulative_volumes, dtype=np.float64)
+        key = self._bar_start(timestamp)
+        valid = ~(np.isnan(prices) | np.isnan(cumulative_volumes))
+        has_bar = self._start >= 0
+
+        # 形成中のバーがあり、時間枠が切り替わった銘柄 -> バー完成
+        rolled = np.flatnonzero(valid & has_bar & (self._start != key))
+        completed = self._emit(rolled)
+        has_bar[rolled] = False
+
+        # 差分出来高 (セッション跨ぎやリセットを考慮)
+        last = self._last_cumulative_volume
+        continuous = (last > 0) & (cumulative_volumes >= last)
+        tick_volume = np.where(continuous, cumulative_volumes - last, cumulative_volumes)
+
+        # 新しいバーを開始
+        new = valid & ~has_bar
+        self._open[new] = self._high[new] = self._low[new] = self._close[new] = prices[new]
+        self._volume[new] = tick_volume[new]
+        self._start[new] = key
+
+        # 既存のバーを更新 (出来高がリセットされた Tick の出来高は加算しない)
+        update = valid & has_bar
+        np.maximum(self._high, prices, out=self._high, where=update)
+        np.minimum(self._low, prices, out=self._low, where=update)
+        self._close[update] = prices[update]
+        self._volume[update & continuous] += tick_volume[update & continuous]
+
+        # 最後に処理した累計出来高を更新
+        last[valid] = cumulative_volumes[valid]
+        if rolled.size:
+            self._prune_start_times()
+        return completed
+
+    def add_market_data(self, timestamp: datetime, market_data: dict) -> dict:
+        \"\"\"
+        ExcelReader.read_market_data と同じ形の辞書 ({銘柄コード: {'close', 'volume', ...}}) を処理する。
+        辞書にない銘柄 (値の変わっていない銘柄など) は欠損として扱い、状態を変更しない。
+        \"\"\"
+        n = len(self.symbols)
+        prices, volumes = np.full(n, np.nan), np.full(n, np.nan)
+        for symbol, data in market_data.items():
+            i = self.slots.get(symbol)
+            if i is not None and data:
+                price, volume = data.get('close'), data.get('volume')
+                if price is not None and volume is not None:
+                    prices[i], volumes[i] = price, volume
+        return self.add_snapshot(timestamp, prices, volumes)
+
+    def open_symbols(self) -> list:
+        \"\"\"形成中のバーがある銘柄コードのリスト。\"\"\"
+        return [self.symbols[i] for i in np.flatnonzero(self._start >= 0).tolist()]
+
+    def flush(self) -> dict:
+        \"\"\"
+        全銘柄の形成途中のバーを強制的に返し、内部状態をリセットする。
+        取引終了時などに使用する。
+        \"\"\"
+        completed = self._emit(np.flatnonzero(self._start >= 0))
+        self._last_cumulative_volume[:] = 0.0
+        self._start_times.clear()
+        self._last_bucket, self._last_key = None, None
+        return completed
+
+    def _emit(self, slots) -> dict:
+        \"\"\"指定スロットの形成中のバーを dict に変換して返し、そのスロットをバーなしにする。\"\"\"
+        if not slots.size:
+            return {}
+        starts = self._start[slots].tolist()
+        columns = zip(starts, self._open[slots].tolist(), self._high[slots].tolist(), self._low[slots].tolist(),
+                      self._close[slots].tolist(), self._volume[slots].tolist())
+        completed = {
+            self.symbols[i]: {'timestamp': self._start_times[start], 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for i, (start, o, h, l, c, v) in zip(slots.tolist(), columns)
+        }
+        self._start[slots] = -1
+        return completed
+
+    def _prune_start_times(self):
+        \"\"\"どのバーからも参照されなくなった開始時刻を削除する。\"\"\"
+        in_use = set(np.unique(self._start[self._start >= 0]).tolist())
+        in_use.add(self._last_key)
+        for key in [k for k in self._start_times if k not in in_use]:
+            del self._start_times[key]""",
 
     "src/realtrade/live/yahoo_store.py": """
 import logging; import yfinance as yf; import pandas as pd
@@ -753,8 +1077,7 @@ class YahooStore:
             return pd.DataFrame()
 """,
 
-    "src/realtrade/live/yahoo_data.py": """
-import backtrader as bt
+    "src/realtrade/live/yahoo_data.py": """import backtrader as bt
 from datetime import datetime
 import time
 import threading
@@ -763,6 +1086,8 @@ import yfinance as yf
 import pandas as pd
 from queue import Queue, Empty
 
+from ..history_cursor import HistoryCursor
+
 logger = logging.getLogger(__name__)
 
 class YahooData(bt.feeds.PandasData):
@@ -785,6 +1110,7 @@ class YahooData(bt.feeds.PandasData):
         
         self.q = Queue()
         self._hist_df = None
+        self._history = None
         self._load_historical_data()
 
         self._thread = None
@@ -814,11 +1140,18 @@ class YahooData(bt.feeds.PandasData):
         super(YahooData, self).stop()
 
     def _load(self):
+        # ▼▼▼【変更箇所: 履歴を1度だけ配列に変換し、カーソルで1本ずつ供給】▼▼▼
         if self._hist_df is not None and not self._hist_df.empty:
-            row = self._hist_df.iloc[0]
-            self._hist_df = self._hist_df.iloc[1:]
-            self._push_bar(row)
+            self._history = HistoryCursor(self._hist_df)
+            self._hist_df = None
+        if self._history is not None:
+            self._history.populate(self.lines)
+            if self._history.exhausted:
+                self.last_close_price = self._history.last_close
+                self.last_dt = self._history.last_datetime
+                self._history = None
             return True
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         while True:
             try:
@@ -896,8 +1229,7 @@ class YahooData(bt.feeds.PandasData):
             self.lines.close[0] = self.last_close_price
             self.lines.volume[0] = 0
             self.lines.openinterest[0] = 0
-            logger.debug(f"[{self.symbol_str}] データ更新なし、ハートビートを供給: {now}")
-""",
+            logger.debug(f"[{self.symbol_str}] データ更新なし、ハートビートを供給: {now}")""",
 
     "src/realtrade/mock/data_fetcher.py": """
 import backtrader as bt; import pandas as pd; from datetime import datetime; import numpy as np; import logging
@@ -1192,6 +1524,10 @@ class RealTradeStrategyNotifier(BaseStrategyNotifier):
 
     "src/realtrade/strategy.py": """import backtrader as bt
 from src.core.strategy.base import BaseStrategy
+from src.core.streaming import StreamingIndicatorSet, StreamingUnsupportedError
+from . import config_realtrade as config
+from .memory_report import strategy_footprint, format_footprint
+from . import snapshot as warm_start
 
 # 実装クラスのインポート
 from .implementations.order_manager import RealTradeOrderManager
@@ -1208,6 +1544,54 @@ class RealTradeStrategy(BaseStrategy):
         self.realtime_phase_started = False
         super().__init__()
 
+    # ▼▼▼【変更箇所: ストリーミング・インジケーターを使用】▼▼▼
+    def _create_indicators(self):
+        \"\"\"
+        ストリーミング・インジケーターを生成する。(バーごとの更新が定数時間で、履歴の長さに依存しない)
+        再現できない定義を含む戦略は Backtrader のインジケーターを使う。
+        \"\"\"
+        if not config.STREAMING_INDICATORS:
+            return super()._create_indicators()
+        # スナップショットから復元する場合は、保存時のインジケーター群を再供給されるフィードに接続する
+        snapshot = self.p.strategy_components.get('snapshot')
+        if snapshot is not None:
+            snapshot['indicators'].resume(snapshot['absorbed'])
+            return snapshot['indicators']
+        try:
+            return self.initializer.create_streaming_indicators()
+        except StreamingUnsupportedError as e:
+            self.logger.log(f"ストリーミング・インジケーターを使用できないため Backtrader のインジケーターを使用します: {e}")
+            return super()._create_indicators()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: ライン・バッファの制限 (exactbars=1)】▼▼▼
+    def qbuffer(self, savemem=0, replaying=False):
+        \"\"\"
+        Backtrader が各インジケーターの minperiod までラインを縮めた後、各時間足のデータフィードに
+        インジケーター定義のパラメータから求めた過去バー数 (StrategyInitializer.required_lookback) を確保する。
+        ストリーミング・インジケーターは Backtrader から見えないため、この下限がないとフィードは1本分になる。
+        \"\"\"
+        super().qbuffer(savemem=savemem, replaying=replaying)
+        if savemem > 0:
+            for timeframe, size in self.initializer.required_lookback().items():
+                self.data_feeds[timeframe].minbuffer(size)
+
+    def memory_footprint(self):
+        \"\"\"この銘柄が保持しているライン・インジケーターの値の数と概算メモリ。\"\"\"
+        return strategy_footprint(self)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: スナップショット】▼▼▼
+    def _restore_snapshot_position(self):
+        snapshot = self.p.strategy_components.get('snapshot')
+        if snapshot is not None and snapshot.get('position'):
+            self.position_manager.restore_snapshot_state(snapshot['position'], self, self.exit_signal_generator)
+
+    def build_snapshot(self, bars_df):
+        \"\"\"終了時の状態のスナップショット (src/realtrade/snapshot.py)。bars_df は保存済みの5分足。\"\"\"
+        return warm_start.build_snapshot(self.data0._name, self, bars_df)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _setup_components(self, params, components):
         \"\"\"
         リアルタイムトレード用のコンポーネントをセットアップする
@@ -1235,16 +1619,36 @@ class RealTradeStrategy(BaseStrategy):
         # 出口戦略ジェネレータの初期化
         self.exit_signal_generator = RealTradeExitSignalGenerator(self, self.order_manager)
 
+    # ▼▼▼【変更箇所: ストリーミング・インジケーターを履歴フェーズから毎バー更新】▼▼▼
+    # ライン・バッファを制限するとフィードは直近のバーしか保持しないため、リアルタイムフェーズ移行時の
+    # 一括取り込み (seed) はできない。prenext/next のたびに新しいバーを反映する。(1本あたり定数時間)
+    # フィードの供給終了後に届く上位足 (作りかけの足を確定させたもの) は反映しない。
+    # 終了時の状態をスナップショットに保存し、翌日は日の境界から再供給して同じ足を組み直すため。
+    def _update_streaming_indicators(self):
+        if isinstance(self.indicators, StreamingIndicatorSet) and not getattr(self.datas[0], 'ended', False):
+            self.indicators.update(self.data_feeds)
+
+    def prenext(self):
+        self._update_streaming_indicators()
+
     def next(self):
+        self._update_streaming_indicators()
+
         # 履歴データの供給完了を検知してフラグを立てる
         if not self.realtime_phase_started:
             if hasattr(self.datas[0], 'history_supplied') and self.datas[0].history_supplied:
                 self.logger.log("リアルタイムフェーズに移行しました。")
+                self.logger.log(f"メモリ使用量: {format_footprint(self.memory_footprint())}")
                 self.realtime_phase_started = True
+                self._restore_snapshot_position()
         
         # リアルタイムフェーズの場合のみ実行
         if self.realtime_phase_started:
+            # 全インジケーターが minperiod に達するまでは判定しない。(Backtrader の prenext に相当)
+            if isinstance(self.indicators, StreamingIndicatorSet) and not self.indicators.ready:
+                return
             super().next()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def notify_data(self, data, status, *args, **kwargs):
         self.event_handler.on_data_status(data, status)
@@ -1260,7 +1664,1033 @@ class RealTradeStrategy(BaseStrategy):
     def force_close_position(self):
         if not self.position: return
         self.logger.log(f"外部からの指示により内部ポジション({self.position.size})を決済します。")
-        self.close()"""
+        self.close()""",
+
+    "src/realtrade/memory_report.py": """import sys
+from array import array
+
+from src.core.streaming import StreamingIndicatorSet
+
+# ライン・バッファが保持している値のメモリ使用量の概算。
+#   - 無制限モードのラインは array('d') (1値8バイト)、制限モード (exactbars) は float オブジェクトの deque
+#   - ストリーミング・インジケーターはリングバッファ (float オブジェクトのリスト)
+_FLOAT_BYTES = sys.getsizeof(0.0)
+_POINTER_BYTES = 8
+
+
+def _line_bytes(line):
+    values = line.array
+    size = sys.getsizeof(values)
+    if not isinstance(values, array):
+        size += len(values) * _FLOAT_BYTES
+    return len(values), size
+
+
+def _lines_of(obj, seen):
+    \"\"\"obj (データフィード/ストラテジー/インジケーター) とその配下の全ラインを重複なく列挙する。\"\"\"
+    if id(obj) in seen: return
+    seen.add(id(obj))
+    for line in getattr(obj, 'lines', ()):
+        if id(line) not in seen and hasattr(line, 'array'):
+            seen.add(id(line))
+            yield line
+    for children in getattr(obj, '_lineiterators', {}).values():
+        for child in children:
+            yield from _lines_of(child, seen)
+
+
+def strategy_footprint(strategy):
+    \"\"\"
+    1銘柄分 (ストラテジーとそのデータフィード・インジケーター) が保持している値の数と概算バイト数を返す。
+    {'bars': {時間足: 保持バー数}, 'values': 値の数, 'bytes': バイト数}
+    \"\"\"
+    seen, values, size = set(), 0, 0
+    for data in strategy.datas:
+        for line in _lines_of(data, seen):
+            n, b = _line_bytes(line); values += n; size += b
+    for line in _lines_of(strategy, seen):
+        n, b = _line_bytes(line); values += n; size += b
+
+    if isinstance(strategy.indicators, StreamingIndicatorSet):
+        n = strategy.indicators.retained_values()
+        values += n; size += n * (_FLOAT_BYTES + _POINTER_BYTES)
+
+    bars = {tf: len(data.close.array) for tf, data in strategy.data_feeds.items()}
+    return {'bars': bars, 'values': values, 'bytes': size}
+
+
+def format_footprint(footprint):
+    bars = ", ".join(f"{tf}={n}" for tf, n in footprint['bars'].items())
+    return f"保持バー数 [{bars}] / 保持値 {footprint['values']:,} 個 / 約 {footprint['bytes'] / 1024:,.1f} KB\"""",
+
+    "src/realtrade/snapshot.py": """import os
+import json
+import pickle
+import hashlib
+import logging
+
+import pandas as pd
+import backtrader as bt
+
+from src.core.streaming import StreamingIndicatorSet
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ウォームスタート用のスナップショット
+# 取引終了時 (RealtimeTrader.stop) に銘柄ごとの状態を {SNAPSHOT_DIR}/{symbol}.pkl に保存し、
+# 翌朝はこれを復元して、スナップショット以降のバーだけを供給する。(全履歴の再生を省略する)
+#   - indicators: ストリーミング・インジケーター群 (StreamingIndicatorSet) そのもの
+#   - absorbed:   時間足ごとに、インジケーターへ反映済みの最終バーの日時
+#   - tail:       リサンプリング (60分足・日足) の状態を再構築するための直近2営業日分の5分足。
+#                 日の境界から再供給するため、途中の足も含めて前日と同じバーが組み上がる。
+#                 反映済みのバーは StreamingIndicatorSet.resume により読み飛ばされる。
+#   - position:   ポジションと決済価格 (PositionManager.snapshot_state)
+# 戦略定義 (パラメータ) が変わった場合や読み込めない場合は使用せず、全履歴の再生に戻る。
+# ==============================================================================
+
+SNAPSHOT_VERSION = 1
+TAIL_DAYS = 2
+
+
+def snapshot_path(snapshot_dir, symbol):
+    return os.path.join(snapshot_dir, f"{symbol}.pkl")
+
+
+def params_digest(strategy_params):
+    \"\"\"戦略パラメータの指紋。スナップショットの作成時と定義が変わっていないことの確認に使う。\"\"\"
+    return hashlib.sha1(json.dumps(strategy_params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def build_snapshot(symbol, strategy, bars_df):
+    \"\"\"
+    終了時のストラテジーと、保存済みの5分足 (bars_df: 当日分を含む全履歴) からスナップショットを作る。
+    復元に必要な条件 (ストリーミング・インジケーター使用、全時間足のバーを反映済み、直近2営業日で再構築できる)
+    を満たさない場合は None。
+    \"\"\"
+    if not isinstance(strategy.indicators, StreamingIndicatorSet) or not strategy.realtime_phase_started:
+        return None
+    absorbed = strategy.indicators.absorbed
+    if bars_df.empty or set(absorbed) != set(strategy.indicators.timeframes):
+        return None
+
+    days = bars_df.index.normalize().unique()
+    tail = bars_df[bars_df.index >= days[-min(TAIL_DAYS, len(days))]]
+    # 反映済みの最終バーが tail より前にある時間足は、tail の再供給では状態を再現できない
+    if min(absorbed.values()) < bt.date2num(tail.index[0].to_pydatetime()):
+        return None
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'symbol': str(symbol),
+        'strategy_name': strategy.p.strategy_params.get('strategy_name'),
+        'params_digest': params_digest(strategy.p.strategy_params),
+        'absorbed': absorbed,
+        'last_bar': tail.index[-1],
+        'tail': tail,
+        'indicators': strategy.indicators,
+        'position': strategy.position_manager.snapshot_state(strategy, strategy.exit_signal_generator),
+    }
+
+
+def save_snapshot(snapshot_dir, snapshot):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(snapshot_dir, snapshot['symbol'])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(snapshot_dir, symbol, strategy_name, strategy_params):
+    \"\"\"スナップショットを読み込み、現在の戦略定義と一致すれば返す。欠落・破損・不一致の場合は None。\"\"\"
+    path = snapshot_path(snapshot_dir, symbol)
+    if not os.path.exists(path):
+        logger.info(f"[{symbol}] No snapshot found. Falling back to full history replay.")
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"[{symbol}] Could not read snapshot {path}: {e}. Falling back to full history replay.")
+        return None
+
+    expected = {'version': SNAPSHOT_VERSION, 'symbol': str(symbol), 'strategy_name': strategy_name,
+                'params_digest': params_digest(strategy_params)}
+    mismatched = [key for key, value in expected.items() if not isinstance(snapshot, dict) or snapshot.get(key) != value]
+    if mismatched:
+        logger.warning(f"[{symbol}] Snapshot {path} does not match the current strategy ({', '.join(mismatched)}). "
+                       f"Falling back to full history replay.")
+        return None
+    return snapshot
+
+
+def bars_to_replay(snapshot, hist_df):
+    \"\"\"復元時にフィードへ供給するバー: スナップショットの tail と、履歴のうちスナップショットより新しいバー。\"\"\"
+    tail = snapshot['tail']
+    newer = hist_df[hist_df.index > snapshot['last_bar']] if not hist_df.empty else hist_df
+    if newer.empty:
+        return tail
+    columns = tail.columns.intersection(newer.columns)
+    return pd.concat([tail[columns], newer[columns]])""",
+
+    "src/realtrade/history_cursor.py": """import math
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+# ==============================================================================
+# 履歴バーの高速供給
+# 起動時の履歴を1度だけ連続した numpy 配列 (日時は date2num 済み) に変換し、
+# ライブフィードの _load からカーソルで1行ずつ取り出す。
+# DataFrame の iloc による1行取り出し・スライスを毎バー繰り返す方式と異なり、1本あたりの処理は
+# 配列の1行をスカラーに変換するだけで、起動時間は履歴の本数に比例する。
+# ==============================================================================
+
+_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+_ORDINAL_EPOCH = 719163  # date(1970, 1, 1).toordinal()
+_NS_PER_DAY = 86_400_000_000_000
+# この範囲 (1436〜2871年) の序数日は仮数部の指数が同じで、日内の端数の丸め方が日付に依存しない
+_ORDINAL_MIN, _ORDINAL_MAX = 2 ** 19, 2 ** 20 - 2
+_BASE = float(_ORDINAL_MIN)
+
+
+def _day_fraction(time_of_day_ns):
+    \"\"\"
+    日内の経過時間 (ns) を、bt.date2num が序数日に加算する端数に変換する。
+    bt.date2num は math.fsum で (序数日, 時/24, 分/1440, 秒/86400, マイクロ秒/86400e6) を1回だけ丸めるため、
+    同じ指数範囲の基準日で計算した結果から基準日を引けば、どの序数日にもそのまま加算できる値になる。
+    \"\"\"
+    us, _ = divmod(int(time_of_day_ns), 1000)
+    s, us = divmod(us, 1_000_000)
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return math.fsum((_BASE, h / 24, m / 1440, s / 86400, us / 86400e6)) - _BASE
+
+
+def date2num_array(index, tz=None):
+    \"\"\"
+    DatetimeIndex 全体を bt.date2num と (ビット単位で) 同じ値の float64 配列に変換する。
+    tz が指定された場合は、フィードの date2num と同様に naive な日時をそのタイムゾーンの時刻とみなす。
+    tz 付きの日時は UTC に換算する。
+    \"\"\"
+    index = pd.DatetimeIndex(index)
+    if tz is not None and index.tz is None:
+        index = index.tz_localize(tz)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    if len(index) == 0:
+        return np.empty(0)
+
+    ns = index.asi8
+    days, time_of_day = np.divmod(ns, _NS_PER_DAY)
+    ordinals = days + _ORDINAL_EPOCH
+    if ordinals.min() < _ORDINAL_MIN or ordinals.max() > _ORDINAL_MAX:
+        return np.array([bt.date2num(dt) for dt in index.to_pydatetime()])
+
+    # 日内の時刻の種類はバー数よりはるかに少ない (5分足なら1日66種類)
+    times, inverse = np.unique(time_of_day, return_inverse=True)
+    fractions = np.array([_day_fraction(t) for t in times])
+    return ordinals.astype(np.float64) + fractions[inverse.ravel()]
+
+
+class HistoryCursor:
+    \"\"\"
+    履歴の DataFrame (datetime インデックス, open/high/low/close/volume[/openinterest]) を
+    n×7 の float64 配列に変換して保持し、先頭から1本ずつフィードのラインへ書き込む。
+    \"\"\"
+    def __init__(self, hist_df, tz=None):
+        self._rows = np.zeros((len(hist_df), 1 + len(_COLUMNS)))
+        self._rows[:, 0] = date2num_array(hist_df.index, tz)
+        for j, column in enumerate(_COLUMNS, start=1):
+            if column in hist_df.columns:
+                self._rows[:, j] = hist_df[column].to_numpy(dtype=np.float64)
+        self._pos = 0
+        self.last_datetime = pd.Timestamp(hist_df.index[-1]).to_pydatetime() if len(hist_df) else None
+        self.last_close = float(self._rows[-1, 4]) if len(hist_df) else None
+
+    def __len__(self):
+        return len(self._rows) - self._pos
+
+    @property
+    def exhausted(self):
+        return self._pos >= len(self._rows)
+
+    def populate(self, lines):
+        \"\"\"次の1本をラインの現在位置 ([0]) に書き込む。\"\"\"
+        dt, o, h, l, c, v, oi = self._rows[self._pos].tolist()
+        self._pos += 1
+        lines.datetime[0] = dt
+        lines.open[0] = o
+        lines.high[0] = h
+        lines.low[0] = l
+        lines.close[0] = c
+        lines.volume[0] = v
+        lines.openinterest[0] = oi""",
+
+    "src/realtrade/scheduler.py": """import datetime
+import logging
+import queue
+import threading
+import time as time_module
+
+import backtrader as bt
+from backtrader.utils import num2date, date2num
+
+from .bar_builder import MultiBarBuilder
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# イベント駆動スケジューラー
+# 銘柄ごとにスレッドを起動して cerebro.run() のループを回す (各フィードが _load を空回りさせる) 代わりに、
+# 1つのスレッドで全銘柄の Cerebro を駆動する。
+#   - ExcelConnector が Excel を読み取るたびに、値の変わった銘柄の Tick を配信し、ディスパッチ・キューへ入れる。
+#   - スケジューラーはキューを待ち受け (ティックがない間はブロックしてCPUを使わない)、
+#     まとめて取り出した Tick から全銘柄一括でバーを構築し (MultiBarBuilder)、
+#     配信された銘柄の Cerebro だけに確定足を渡して、新しいデータがなくなるまで進める。
+#   - Excel の読み取りからストラテジーの処理完了までの遅延 (全ティック / バーが確定したティック) を計測し、
+#     定期的にログへ出力する。
+# ==============================================================================
+
+
+class _Suspend(Exception):
+    \"\"\"SteppedCerebro.begin: 起動処理の完了後に run() を抜けるための例外。\"\"\"
+
+
+class SteppedCerebro(bt.Cerebro):
+    \"\"\"
+    run() のメインループ (Cerebro._runnext) を、呼び出し側が1ステップずつ進められるようにした Cerebro。
+    begin() で起動処理 (ストラテジー生成・履歴の供給) を行い、以降は step() のたびに
+    新しいデータがなくなる (フィードの _load が None を返す) まで進めて制御を返す。
+    通常どおり run() を呼んだ場合は bt.Cerebro と同じ動作になる。
+    \"\"\"
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loop = None
+        self._stepping = False
+        self.finished = False
+
+    def begin(self):
+        \"\"\"起動処理を行い、最初の待機まで進める。False の場合は既に終了している。\"\"\"
+        self._stepping = True
+        try:
+            self.run()
+        except _Suspend:
+            return self.step()
+        finally:
+            self._stepping = False
+        self.finished = True
+        return False
+
+    def step(self):
+        \"\"\"新しいデータがなくなるまで進める。ループが終了した (データ供給の終了・停止要求) 場合は False。\"\"\"
+        if self.finished:
+            return False
+        try:
+            next(self._loop)
+            return True
+        except StopIteration:
+            self.finish()
+            return False
+
+    def finish(self):
+        \"\"\"ループを終了させ、run() の終了処理 (Cerebro.runstrategies の後半) を行う。\"\"\"
+        if self.finished:
+            return
+        self.finished = True
+        if self._loop is not None:
+            self._loop.close()
+        runstrats = self.runningstrats
+        for strat in runstrats:
+            strat._stop()
+        self._broker.stop()
+        for data in self.datas:
+            data.stop()
+        for feed in self.feeds:
+            feed.stop()
+        for store in self.stores:
+            store.stop()
+        self.stop_writers(runstrats)
+
+    def _runnext(self, runstrats):
+        if not self._stepping:
+            return super()._runnext(runstrats)
+        self._loop = self._runnext_steps(runstrats)
+        raise _Suspend()
+
+    def _runnext_steps(self, runstrats):
+        \"\"\"
+        Cerebro._runnext と同じ処理を行うジェネレーター。
+        どのデータもバーを返さなかった (None) 反復の終わりで yield し、次の step() まで待機する。
+        \"\"\"
+        datas = sorted(self.datas,
+                       key=lambda x: (x._timeframe, x._compression))
+        datas1 = datas[1:]
+        data0 = datas[0]
+        d0ret = True
+
+        rsonly = [i for i, x in enumerate(datas)
+                  if x.resampling and not x.replaying]
+        onlyresample = len(datas) == len(rsonly)
+        noresample = not rsonly
+
+        clonecount = sum(d._clone for d in datas)
+        ldatas = len(datas)
+        ldatas_noclones = ldatas - clonecount
+        dt0 = date2num(datetime.datetime.max) - 2  # default at max
+        while d0ret or d0ret is None:
+            newqcheck = not any(d.haslivedata() for d in datas)
+            if not newqcheck:
+                livecount = sum(d._laststatus == d.LIVE for d in datas)
+                newqcheck = not livecount or livecount == ldatas_noclones
+
+            lastret = False
+            self._storenotify()
+            if self._event_stop:
+                return
+            self._datanotify()
+            if self._event_stop:
+                return
+
+            drets = []
+            qstart = datetime.datetime.utcnow()
+            for d in datas:
+                qlapse = datetime.datetime.utcnow() - qstart
+                d.do_qcheck(newqcheck, qlapse.total_seconds())
+                drets.append(d.next(ticks=False))
+
+            d0ret = any((dret for dret in drets))
+            if not d0ret and any((dret is None for dret in drets)):
+                d0ret = None
+
+            if d0ret:
+                dts = []
+                for i, ret in enumerate(drets):
+                    dts.append(datas[i].datetime[0] if ret else None)
+
+                if onlyresample or noresample:
+                    dt0 = min((d for d in dts if d is not None))
+                else:
+                    dt0 = min((d for i, d in enumerate(dts)
+                               if d is not None and i not in rsonly))
+
+                dmaster = datas[dts.index(dt0)]
+                self._dtmaster = dmaster.num2date(dt0)
+                self._udtmaster = num2date(dt0)
+
+                for i, ret in enumerate(drets):
+                    if ret:
+                        continue
+                    d = datas[i]
+                    d._check(forcedata=dmaster)
+                    if d.next(datamaster=dmaster, ticks=False):
+                        dts[i] = d.datetime[0]
+
+                for i, dti in enumerate(dts):
+                    if dti is not None:
+                        di = datas[i]
+                        if dti > dt0:
+                            di.rewind()
+                        elif not di.replaying:
+                            di._tick_fill(force=True)
+
+            elif d0ret is None:
+                for data in datas:
+                    data._check()
+            else:
+                lastret = data0._last()
+                for data in datas1:
+                    lastret += data._last(datamaster=data0)
+
+                if not lastret:
+                    break
+
+            self._datanotify()
+            if self._event_stop:
+                return
+
+            if d0ret or lastret:
+                self._check_timers(runstrats, dt0, cheat=True)
+                if self.p.cheat_on_open:
+                    for strat in runstrats:
+                        strat._next_open()
+                        if self._event_stop:
+                            return
+
+            self._brokernotify()
+            if self._event_stop:
+                return
+
+            if d0ret or lastret:
+                self._check_timers(runstrats, dt0, cheat=False)
+                for strat in runstrats:
+                    strat._next()
+                    if self._event_stop:
+                        return
+
+                    self._next_writers(runstrats)
+
+            # 新しいデータがなく、フィルター (リサンプリング) が確定させたバーも残っていなければ次の通知まで待つ
+            if d0ret is None and not any(d._barstack or d._barstash for d in datas):
+                yield
+
+        self._datanotify()
+        if self._event_stop:
+            return
+        self._storenotify()
+        if self._event_stop:
+            return
+
+
+class DispatchLatency:
+    \"\"\"ディスパッチ遅延 (Excel の読み取り完了 -> 銘柄の Cerebro の処理完了) の集計。\"\"\"
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = []
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def flush(self):
+        \"\"\"前回の flush 以降の集計 {'count', 'mean', 'p99', 'max'} (秒) を返してリセットする。サンプルがなければ None。\"\"\"
+        with self._lock:
+            samples, self._samples = sorted(self._samples), []
+        if not samples:
+            return None
+        return {'count': len(samples), 'mean': sum(samples) / len(samples),
+                'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))], 'max': samples[-1]}
+
+
+class CerebroScheduler(threading.Thread):
+    \"\"\"
+    全銘柄の SteppedCerebro を1つのスレッドで駆動する。
+    dispatch() (ExcelConnector の購読者) に Tick が配信された銘柄だけを進める。
+    同じ銘柄の Tick は処理されるまで最新の1件にまとめるため、キューの長さは銘柄数を超えない。
+    (遅延は最初の Tick の読み取り時刻から計測する)
+    バーは時間枠ごとの MultiBarBuilder で構築し、まとめて取り出した Tick (通常は1回の読み取り分) を1回の呼び出しで処理する。
+    値の変わらない銘柄のバーも時間枠の境界 (+ boundary_grace 秒) で確定させるため、境界ごとに形成中のバーがある銘柄へ
+    最後の値を再送する (ポーリング方式で毎秒同じ値を処理していた場合と同じく、取引のない時間枠は出来高0のバーになる)。
+    \"\"\"
+    def __init__(self, cerebros, stop_event, start_time=None, latency_warn=0.5, report_interval=300,
+                 clock=datetime.datetime.now, boundary_grace=0.2, **kwargs):
+        super().__init__(daemon=True, name="CerebroScheduler", **kwargs)
+        self.cerebros = {str(cerebro.datas[0].symbol): cerebro for cerebro in cerebros}
+        self.stop_event = stop_event
+        self.start_time = start_time
+        self.latency_warn = latency_warn
+        self.report_interval = report_interval
+        self.clock = clock  # バーの時刻・取引時間の判定に使う現在時刻 (テスト用に差し替え可能)
+        self.boundary_grace = boundary_grace
+        self.latency = DispatchLatency()
+        self.bar_latency = DispatchLatency()
+        self.coalesced = 0
+        self.started = threading.Event()  # 全銘柄の起動処理 (履歴の供給) が完了した
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # 時間枠 (分) ごとの全銘柄一括のバー構築
+        symbols_by_interval = {}
+        for symbol, cerebro in self.cerebros.items():
+            symbols_by_interval.setdefault(cerebro.datas[0].p.compression, []).append(symbol)
+        self.builders = [MultiBarBuilder(symbols, interval_minutes=interval) for interval, symbols in symbols_by_interval.items()]
+        self._last_data = {}       # 銘柄ごとの最後に処理した Tick の値 (境界での再送用)
+        self._boundary_at = None   # 次に形成中のバーを確定させる時刻
+        logger.info(f"CerebroScheduler initialized for {len(self.cerebros)} symbols.")
+
+    def subscribe(self, connector):
+        \"\"\"全銘柄の Tick を購読する。\"\"\"
+        for symbol in self.cerebros:
+            connector.subscribe(symbol, self.dispatch)
+
+    def dispatch(self, tick):
+        \"\"\"Tick を受け取り、銘柄をキューに入れる。(データ取得スレッドから呼ばれる)\"\"\"
+        with self._pending_lock:
+            pending = self._pending.get(tick.symbol)
+            if pending is not None:
+                pending[1] = tick
+                self.coalesced += 1
+                return
+            self._pending[tick.symbol] = [tick.read_at, tick]
+        self._queue.put(tick.symbol)
+
+    def wake(self):
+        \"\"\"待ち受け中のスレッドを起こす。(停止時)\"\"\"
+        self._queue.put(None)
+
+    def run(self):
+        logger.info("Cerebro scheduler started.")
+        if not self._wait_for_start():
+            logger.info("Stop requested before market open. Cerebro scheduler exits.")
+            return
+
+        for symbol, cerebro in self.cerebros.items():
+            if self.stop_event.is_set(): break
+            try:
+                cerebro.begin()
+            except Exception as e:
+                logger.error(f"[{symbol}] Cerebro failed to start: {e}", exc_info=True)
+                cerebro.finished = True
+        self.started.set()
+        logger.info("All Cerebro instances started. Waiting for ticks...")
+
+        last_report = time_module.monotonic()
+        self._boundary_at = self._next_boundary(self.clock())
+        while not self.stop_event.is_set():
+            self.run_once(self._wait_timeout())
+            if self.report_interval and time_module.monotonic() - last_report >= self.report_interval:
+                self.log_latency()
+                last_report = time_module.monotonic()
+        self.flush_bars()
+        logger.info("Cerebro scheduler stopped.")
+
+    def run_once(self, timeout=None):
+        \"\"\"
+        Tick を待ち受け、届いていれば (まとめて取り出して) 処理する。時間枠の境界を過ぎていれば形成中のバーを確定させる。
+        timeout: 待ち受けの最大秒数 (None: 無期限)
+        \"\"\"
+        try:
+            symbol = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            symbols = []
+        else:
+            symbols = [] if symbol is None else [symbol]
+            # 処理待ちの Tick をまとめて取り出し、1回でバーを構築する
+            while True:
+                try:
+                    symbol = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if symbol is not None:
+                    symbols.append(symbol)
+        if symbols:
+            self._process(symbols)
+
+        now = self.clock()
+        if self._boundary_at is None:
+            self._boundary_at = self._next_boundary(now)
+        elif now >= self._boundary_at:
+            self._roll_open_bars(now)
+            self._boundary_at = self._next_boundary(now)
+
+    def _next_boundary(self, now):
+        \"\"\"now より後の最初の時間枠の境界 + boundary_grace 秒。\"\"\"
+        if not self.builders:
+            return None
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        minutes = now.hour * 60 + now.minute
+        boundary = min(midnight + datetime.timedelta(minutes=minutes - minutes % builder.interval_minutes + builder.interval_minutes)
+                       for builder in self.builders)
+        return boundary + datetime.timedelta(seconds=self.boundary_grace)
+
+    def _wait_timeout(self):
+        \"\"\"Tick の待ち受け時間: 次の境界、またはログ出力の間隔まで。\"\"\"
+        timeouts = [self.report_interval] if self.report_interval else []
+        if self._boundary_at is not None:
+            timeouts.append(max(0.0, (self._boundary_at - self.clock()).total_seconds()))
+        return min(timeouts) if timeouts else None
+
+    def _roll_open_bars(self, now):
+        \"\"\"形成中のバーがある銘柄に最後の値を再送し、時間枠が切り替わったバーを確定させる。\"\"\"
+        read_at = time_module.perf_counter()
+        market_data = {}
+        for builder in self.builders:
+            for symbol in builder.open_symbols():
+                cerebro = self.cerebros[symbol]
+                if cerebro.finished:
+                    continue
+                values = cerebro.datas[0].tick_values(self._last_data.get(symbol), now)
+                if values is not None:
+                    market_data[symbol] = {'close': values[0], 'volume': values[1]}
+        completed = {}
+        for builder in self.builders:
+            completed.update(builder.add_market_data(now, market_data))
+        for symbol, bar in completed.items():
+            self._step(symbol, bar, read_at, 'boundary')
+
+    def _process(self, symbols):
+        with self._pending_lock:
+            ticks = [self._pending.pop(symbol) for symbol in symbols]
+        now = self.clock()
+        market_data = {}
+        for read_at, tick in ticks:
+            cerebro = self.cerebros[tick.symbol]
+            if cerebro.finished:
+                continue
+            self._last_data[tick.symbol] = tick.data
+            values = cerebro.datas[0].tick_values(tick.data, now)
+            if values is not None:
+                market_data[tick.symbol] = {'close': values[0], 'volume': values[1]}
+        completed = {}
+        for builder in self.builders:
+            completed.update(builder.add_market_data(now, market_data))
+        for read_at, tick in ticks:
+            self._step(tick.symbol, completed.get(tick.symbol), read_at, tick.seq)
+
+    def flush_bars(self):
+        \"\"\"全銘柄の形成途中のバーをフィードに渡す。(停止時。フィードの flush で保存される)\"\"\"
+        for builder in self.builders:
+            for symbol, bar in builder.flush().items():
+                self.cerebros[symbol].datas[0].notify_bar(bar)
+
+    def _wait_for_start(self):
+        \"\"\"start_time (datetime.time) まで待機する。停止要求を受けた場合は False。\"\"\"
+        if self.start_time is None:
+            return not self.stop_event.is_set()
+        now = datetime.datetime.now()
+        start_at = datetime.datetime.combine(now.date(), self.start_time)
+        if now < start_at:
+            logger.info(f"Waiting until {self.start_time.strftime('%H:%M')} to start Cerebro instances.")
+            return not self.stop_event.wait((start_at - now).total_seconds())
+        return not self.stop_event.is_set()
+
+    def _step(self, symbol, bar, read_at, seq):
+        \"\"\"確定足 (None: なし) をフィードに渡して、銘柄の Cerebro を新しいデータがなくなるまで進める。\"\"\"
+        cerebro = self.cerebros[symbol]
+        if cerebro.finished:
+            return
+        feed = cerebro.datas[0]
+        bars_built = feed.bars_built
+        try:
+            feed.notify_bar(bar)
+            cerebro.step()
+        except Exception as e:
+            logger.error(f"[{symbol}] Cerebro crashed: {e}", exc_info=True)
+            cerebro.finished = True
+            return
+        latency = time_module.perf_counter() - read_at
+        self.latency.record(latency)
+        if feed.bars_built != bars_built:
+            self.bar_latency.record(latency)
+        if latency > self.latency_warn:
+            logger.warning(f"[{symbol}] Dispatch latency {latency * 1000:.0f} ms exceeds {self.latency_warn * 1000:.0f} ms (seq {seq})")
+
+    def log_latency(self):
+        for label, stats in (('Dispatch latency', self.latency.flush()), ('Tick-to-bar latency', self.bar_latency.flush())):
+            if stats:
+                logger.info(f"{label}: {stats['count']} steps, mean {stats['mean'] * 1000:.1f} ms, "
+                            f"p99 {stats['p99'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms")
+        logger.info(f"Dispatch queue: {self._queue.qsize()} queued, {self.coalesced} ticks coalesced")
+
+    def finish_all(self):
+        \"\"\"スケジューラー・スレッドの終了後に呼ぶ。停止済みのフィードで各 Cerebro のループを最後まで進めて終了処理を行う。\"\"\"
+        for symbol, cerebro in self.cerebros.items():
+            if cerebro.finished or cerebro._loop is None:
+                continue
+            try:
+                # フィードが停止済みなら1ステップでループが終わる。(終わらなければ終了処理だけを行う)
+                if cerebro.step():
+                    cerebro.finish()
+            except Exception as e:
+                logger.error(f"[{symbol}] Cerebro failed to stop: {e}", exc_info=True)
+                cerebro.finished = True""",
+
+    "src/realtrade/bar_journal.py": """import os
+import glob
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from src.core import data_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 確定足のジャーナルと履歴CSVへの差分マージ
+# 取引中に確定したバーを銘柄ごと・日ごとのジャーナル ({5分足CSV}.{YYYYMMDD}.journal) へ1本ずつ追記し、
+# 終了時にジャーナルを履歴CSVへマージ (compact) する。
+#   - 当日のうちに再起動した場合は、CerebroFactory が履歴CSVに続けて当日のジャーナルを再生する (replay)。
+#   - 前日以前のジャーナル (終了処理をせずに停止した日) は、次回起動時にマージする (recover)。
+# 追記はOSへの書き出し (flush) までで、ディスクへの同期 (fsync) は JournalSyncer がまとめて行う。
+#   - 5分足: ジャーナルのバーが全て既存の履歴より後なら、CSVの末尾へ追記しキャッシュ (.npy) も追記分だけ更新する。
+#            重複・順序の入れ替わりがある場合のみ、従来どおり全体を読み込んで書き直す。
+#   - 60分足・日足: マージしたバーが含まれる期間だけを5分足から集計し直し、集計ファイルの末尾を更新する。
+# ==============================================================================
+
+JOURNAL_SUFFIX = '.journal'
+TZ = 'Asia/Tokyo'
+_TZINFO = ZoneInfo(TZ)
+COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+RESAMPLE_TARGETS = (('60min', '60m'), ('D', '1D'))
+AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def journal_path(save_file, date_str):
+    return f"{save_file}.{date_str}{JOURNAL_SUFFIX}"
+
+
+def parse_journal_path(path):
+    \"\"\"ジャーナルのパスから (保存先の履歴CSV, 日付 YYYYMMDD) を返す。\"\"\"
+    save_file, date_str = path[:-len(JOURNAL_SUFFIX)].rsplit('.', 1)
+    return save_file, date_str
+
+
+class BarJournal:
+    \"\"\"
+    確定したバーを1本ずつ追記する銘柄ごと・日ごとのジャーナル (ヘッダーなしのCSV)。
+    追記のたびにOSへ書き出すため、プロセスが異常終了しても確定済みのバーは失われない。
+    syncer を指定した場合、ディスクへの同期 (fsync) は JournalSyncer がまとめて行う (追記する側のスレッドは待たない)。
+    指定しない場合は追記のたびに同期する。
+    \"\"\"
+    def __init__(self, path, syncer=None):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._syncer = syncer
+        if syncer is not None:
+            syncer.register(self)
+
+    def append(self, bar: dict):
+        timestamp = bar['timestamp']
+        if not isinstance(timestamp, datetime):
+            timestamp = pd.Timestamp(timestamp).to_pydatetime()
+        timestamp = timestamp.replace(tzinfo=_TZINFO) if timestamp.tzinfo is None else timestamp.astimezone(_TZINFO)
+        line = f"{timestamp.isoformat()},{','.join(repr(float(bar.get(column) or 0)) for column in COLUMNS)}\\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    self._file = open(self.path, 'a', encoding='utf-8', newline='')
+                self._file.write(line)
+                self._file.flush()
+                self._dirty = True
+            if self._syncer is None:
+                self.sync()
+        except OSError as e:
+            logger.error(f"Failed to append bar to journal {self.path}: {e}")
+
+    def sync(self):
+        \"\"\"
+        前回の同期以降に追記があればディスクへ同期する。
+        同期中も追記を待たせないよう、複製したファイル記述子でロックの外から同期する。
+        \"\"\"
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            fd = os.dup(self._file.fileno())
+            self._dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._syncer is not None:
+            self._syncer.unregister(self)
+
+
+class JournalSyncer(threading.Thread):
+    \"\"\"登録されたジャーナルのうち、追記のあったものを interval 秒ごとにまとめてディスクへ同期する。\"\"\"
+    def __init__(self, interval, stop_event):
+        super().__init__(name="JournalSyncer", daemon=True)
+        self.interval = interval
+        self.stop_event = stop_event
+        self._journals = set()
+        self._lock = threading.Lock()
+
+    def register(self, journal):
+        with self._lock:
+            self._journals.add(journal)
+
+    def unregister(self, journal):
+        with self._lock:
+            self._journals.discard(journal)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sync_all()
+        self.sync_all()
+
+    def sync_all(self):
+        with self._lock:
+            journals = list(self._journals)
+        for journal in journals:
+            try:
+                journal.sync()
+            except OSError as e:
+                logger.error(f"Failed to sync journal {journal.path}: {e}")
+
+
+def read_journal(path) -> pd.DataFrame:
+    \"\"\"
+    ジャーナルを読み込み、datetime 列 (Asia/Tokyo) と OHLCV 列の DataFrame を返す。
+    書き込み途中で終了した末尾の行 (改行のない行) は無視する。同じ日時のバーは後のものを残す。
+    \"\"\"
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = text.split('\\n')[:-1]  # 末尾は改行後の空文字列、または書き込み途中の行
+    rows = []
+    for line in lines:
+        fields = line.split(',')
+        if len(fields) != 1 + len(COLUMNS):
+            continue
+        try:
+            rows.append([pd.Timestamp(fields[0])] + [float(v) for v in fields[1:]])
+        except ValueError:
+            continue
+    df = pd.DataFrame(rows, columns=['datetime', *COLUMNS])
+    if df.empty:
+        return df
+    df['datetime'] = pd.to_datetime(df['datetime'], utc=True).dt.tz_convert(TZ)
+    df = df.drop_duplicates(subset=['datetime'], keep='last').sort_values(by='datetime')
+    return df.reset_index(drop=True)
+
+
+def _as_file_index(index, tz):
+    \"\"\"日時インデックスを、既存ファイルの書式 (tz なし: 日本時間の naive / tz あり: 日本時間) に合わせる。\"\"\"
+    index = pd.DatetimeIndex(index)
+    index = index.tz_localize(TZ) if index.tz is None else index.tz_convert(TZ)
+    return index.tz_localize(None) if tz is None else index
+
+
+def merge_rewrite(save_file, new_df):
+    \"\"\"
+    既存の履歴CSVを全て読み込んで new_df (datetime 列を持つ DataFrame) と結合し、重複排除・ソートして書き直す。
+    \"\"\"
+    new_df = new_df.copy()
+    if 'openinterest' not in new_df.columns:
+        new_df['openinterest'] = 0
+    new_df['datetime'] = pd.to_datetime(new_df['datetime'])
+    if new_df['datetime'].dt.tz is None:
+        new_df['datetime'] = new_df['datetime'].dt.tz_localize(TZ)
+    else:
+        new_df['datetime'] = new_df['datetime'].dt.tz_convert(TZ)
+
+    merged_df = new_df
+    if os.path.exists(save_file):
+        try:
+            old_df = pd.read_csv(save_file, parse_dates=['datetime'])
+            old_df.columns = [c.lower() for c in old_df.columns]
+            if 'datetime' in old_df.columns:
+                if old_df['datetime'].dt.tz is None:
+                    old_df['datetime'] = old_df['datetime'].dt.tz_localize(TZ)
+                else:
+                    old_df['datetime'] = old_df['datetime'].dt.tz_convert(TZ)
+            merged_df = pd.concat([old_df, new_df])
+        except Exception as e:
+            logger.error(f"Failed to read {save_file}. Creating a new file: {e}")
+
+    merged_df.drop_duplicates(subset=['datetime'], keep='last', inplace=True)
+    merged_df.sort_values(by='datetime', inplace=True)
+    os.makedirs(os.path.dirname(save_file), exist_ok=True)
+    merged_df.to_csv(save_file, index=False)
+
+
+def merge_bars(save_file, new_df):
+    \"\"\"
+    new_df のバーを履歴CSVへマージする。全て既存の最終行より後なら追記し、そうでなければ全体を書き直す。
+    \"\"\"
+    if os.path.exists(save_file):
+        history = data_cache.read_bars(save_file)
+        index = _as_file_index(new_df['datetime'], history.tz)
+        if len(history) and index.asi8[0] > int(history.datetime[-1]):
+            rows = new_df.set_index(index.rename('datetime')).drop(columns='datetime')
+            data_cache.append_rows(save_file, rows)
+            return
+    merge_rewrite(save_file, new_df)
+
+
+def replay(hist_df, save_file, date_str) -> pd.DataFrame:
+    \"\"\"
+    履歴 (CerebroFactory が読み込んだ tz なしの DataFrame) の後に、当日のジャーナルのうち履歴より新しいバーを続ける。
+    当日のうちに異常終了・再起動した場合に、インジケーターを停止前と同じ状態まで進めるために使う。
+    \"\"\"
+    path = journal_path(save_file, date_str)
+    if not os.path.exists(path):
+        return hist_df
+    journal_df = read_journal(path)
+    if journal_df.empty:
+        return hist_df
+    journal_df = journal_df.set_index(_as_file_index(journal_df['datetime'], None).rename('datetime')).drop(columns='datetime')
+    if not hist_df.empty:
+        journal_df = journal_df[journal_df.index > hist_df.index[-1]].reindex(columns=hist_df.columns)
+    return pd.concat([hist_df, journal_df]) if not hist_df.empty else journal_df
+
+
+def compact(save_file, date_str) -> pd.DataFrame:
+    \"\"\"ジャーナルを履歴CSVへマージしてジャーナルを削除し、マージしたバーを返す。\"\"\"
+    path = journal_path(save_file, date_str)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['datetime', *COLUMNS])
+    new_df = read_journal(path)
+    if not new_df.empty:
+        merge_bars(save_file, new_df)
+    os.remove(path)
+    return new_df
+
+
+def recover(data_dir, before_date):
+    \"\"\"
+    before_date (YYYYMMDD) より前の日のジャーナル (終了処理をせずに停止した日) を日付順に全てマージし、
+    [(銘柄コード, 保存先, マージしたバー)] を返す。当日のジャーナルは replay で再生するため対象外。
+    \"\"\"
+    recovered = []
+    paths = [(parse_journal_path(p), p) for p in glob.glob(os.path.join(data_dir, f"*{JOURNAL_SUFFIX}"))]
+    for (save_file, date_str), path in sorted(paths, key=lambda x: (x[0][1], x[0][0])):
+        if date_str >= before_date:
+            continue
+        symbol = os.path.basename(save_file).split('_')[0]
+        try:
+            new_df = compact(save_file, date_str)
+            logger.info(f"[{symbol}] Recovered {len(new_df)} bars from journal {path}")
+            recovered.append((symbol, save_file, new_df))
+        except Exception as e:
+            logger.error(f"[{symbol}] Failed to recover journal {path}: {e}", exc_info=True)
+    return recovered
+
+
+def update_resampled(symbol, data_dir, save_file, new_df, date_str) -> bool:
+    \"\"\"
+    マージしたバー (new_df) が含まれる期間だけを5分足の履歴から集計し直し、
+    60分足・日足の最新のCSVの末尾を置き換えて {symbol}_{suffix}_{date_str}.csv に保存する。
+    既存の集計ファイルがない場合は何もせず False を返す (呼び出し側で全体を再生成する)。
+    \"\"\"
+    latest_files = {}
+    for _, suffix in RESAMPLE_TARGETS:
+        files = glob.glob(os.path.join(data_dir, f"{symbol}_{suffix}_*.csv"))
+        if not files:
+            return False
+        latest_files[suffix] = max(files, key=os.path.getctime)
+
+    history = data_cache.read_bars(save_file)
+    first = pd.Timestamp(new_df['datetime'].min())
+    first = first.tz_localize(TZ) if first.tzinfo is None else first.tz_convert(TZ)
+    for rule, suffix in RESAMPLE_TARGETS:
+        period_start = first.floor(rule)
+        # 期間の開始以降の5分足だけを集計する (期間の途中から始まるジャーナルでも、期間内の既存のバーを含める)
+        k = int(history.datetime.searchsorted(_as_file_index([period_start], history.tz).asi8[0]))
+        tail = data_cache.Bars(history.datetime[k:], history.values[:, k:], history.columns, history.tz).to_dataframe()
+        tail.index = _as_file_index(tail.index, TZ)
+        resampled = tail.resample(rule, closed='left', label='left').agg(AGGREGATION).dropna()
+
+        latest = latest_files[suffix]
+        existing = data_cache.read_bars(latest)
+        resampled.index = _as_file_index(resampled.index, existing.tz).rename('datetime')
+        j = int(existing.datetime.searchsorted(_as_file_index([period_start], existing.tz).asi8[0]))
+        save_path = os.path.join(data_dir, f"{symbol}_{suffix}_{date_str}.csv")
+        if j == len(existing):
+            if os.path.abspath(save_path) != os.path.abspath(latest):
+                data_cache.copy_csv(latest, save_path)
+            data_cache.append_rows(save_path, resampled)
+        else:
+            # 集計済みの期間に重なる場合は、重なる行を置き換えて書き直す (集計ファイルは5分足より十分小さい)
+            kept = existing.to_dataframe().iloc[:j]
+            kept.index = _as_file_index(kept.index, existing.tz).rename('datetime')
+            pd.concat([kept, resampled]).to_csv(save_path)
+        logger.info(f"[{symbol}] {suffix} CSV updated: {save_path} (+{len(resampled)} rows from {period_start})")
+    return True"""
 }
 
 
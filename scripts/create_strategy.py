@@ -80,6 +80,7 @@ sizing:
     # f値（投資比率）のソースを指定
     # 'adjusted': 評価(evaluation)で算出した調整済みf値 (Kelly_Adj) を使用 (推奨)
     # 'raw': 評価(evaluation)で算出した生f値 (Kelly_Raw) を使用
+    # 'monte_carlo': 評価(evaluation)で取引履歴をブートストラップして求めたf値の信頼下限 (Kelly_MC) を使用
     # 'fixed': 下記の 'fixed_f_value' を使用 (バックテスト時や固定比率投資用)
     f_value_source: 'adjusted' 
     
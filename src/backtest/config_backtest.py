@@ -20,6 +20,18 @@ INITIAL_CAPITAL = 50000000000000 # 初期資金
 COMMISSION_PERC = 0.00 # 0.00%
 SLIPPAGE_PERC = 0.0002 # 0.02%
 
+# バックテストエンジン
+#   'backtrader': cerebro.run() によるバー単位の実行 (詳細分析向け)
+#   'vectorized': numpy配列演算による高速パス (スクリーニング向け)。
+#                 同じ取引リストを出力し、未対応の戦略定義は自動的に 'backtrader' で実行します。
+BACKTEST_ENGINE = 'backtrader'
+
+# --- ポートフォリオ・バックテスト設定 (python -m src.backtest.run_portfolio) ---
+# 全銘柄で共有する初期資金。(銘柄ごとの INITIAL_CAPITAL とは別)
+PORTFOLIO_INITIAL_CAPITAL = 10000000
+# 同時に保有 (発注中を含む) できる銘柄数の上限。None の場合は上限なし。
+PORTFOLIO_MAX_POSITIONS = 10
+
 # --- ロギング設定 ---
 # ▼▼▼【変更箇所】▼▼▼
 # バックテスト単体実行時のデフォルトログレベル。
@@ -0,0 +1,257 @@
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+
+from src.core import bar_store
+from . import config_backtest as config
+from . import report as report_generator
+from .run_backtest import TRADE_HISTORY_COLUMNS, build_detail_row
+from .vectorized import VectorizedBacktest, VectorizedUnsupportedError, load_feeds
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ポートフォリオ・バックテスト
+# 全銘柄を1つのブローカー (共有の資金・同時保有数の上限) で取引する。
+# リアルタイム取引 (RealtimeTrader) が Excel の1つの買付余力を全銘柄で共有するのと同じ条件で、
+# 資金の取り合いと同時保有数の上限を含めた成績を求める。
+#
+# - 銘柄ごとのシグナル・約定価格・決済 (StopTrail) はベクトル化エンジンと同じ計算を使い、
+#   銘柄ごとに Cerebro を作らない。
+# - 各銘柄は「シグナル → 証拠金チェック → 約定 → 決済」の状態を持ち、次に起きるイベントだけを
+#   タイムスタンプ順のヒープに積む。全銘柄のイベントを1本の時系列にマージして処理するため、
+#   バーごとではなくイベントの数に比例した時間で数百銘柄を処理できる。
+# - 同じ時刻のイベントは 決済 → 証拠金チェック → 約定 → シグナル の順 (同順位は銘柄順) に処理する。
+#   決済で戻った資金はその時刻の約定・サイジングから使える。
+# - 発注中の注文も保有数に含め、上限に達している間のシグナルは見送る。
+# - サイジング (risk_based / kelly_criterion の fixed) は共有資金の残高を基準にする。
+# - ベクトル化できない戦略定義の銘柄は対象外とする。(cerebro 経路はない)
+# ==============================================================================
+
+_EXIT, _SUBMIT, _FILL, _SIGNAL = range(4)
+
+
+class PortfolioBroker:
+    """全銘柄で共有する資金と保有枠。"""
+
+    def __init__(self, cash, max_positions=None):
+        self.cash = float(cash)
+        self.max_positions = max_positions
+        self.slots_used = 0          # 保有中 + 発注中の銘柄数
+        self.open_cost = 0.0         # 保有中ポジションの取得価格ベースの建玉 (符号付き)
+        self.max_slots_used = 0
+        self.skipped_by_limit = 0
+        self.skipped_by_cash = 0
+
+    def has_slot(self):
+        return self.max_positions is None or self.slots_used < self.max_positions
+
+    def acquire(self):
+        self.slots_used += 1
+        self.max_slots_used = max(self.max_slots_used, self.slots_used)
+
+    def release(self):
+        self.slots_used -= 1
+
+    @property
+    def equity(self):
+        """確定資産 (現金 + 保有ポジションの取得価格)。"""
+        return self.cash + self.open_cost
+
+
+class _SymbolBook(VectorizedBacktest):
+    """共有ブローカーの資金で取引する1銘柄分の状態。cash の読み書きはブローカーに委譲する。"""
+
+    def __init__(self, broker, symbol, feeds, strategy_params):
+        self.broker = broker
+        self.open_entry = None
+        super().__init__(symbol, feeds, strategy_params)
+
+    @property
+    def cash(self):
+        return self.broker.cash
+
+    @cash.setter
+    def cash(self, value):
+        # 基底クラスの初期化で代入される INITIAL_CAPITAL は PortfolioBacktest が共有資金で上書きする
+        self.broker.cash = value
+
+    def next_signal(self, step):
+        """step 以降で最初のシグナルのステップ。なければNone。"""
+        k = np.searchsorted(self.signal_steps, step)
+        return int(self.signal_steps[k]) if k < len(self.signal_steps) else None
+
+
+class PortfolioBacktest:
+    """
+    全銘柄のイベントを時系列にマージし、共有ブローカーで取引する。
+    books: [(銘柄, 戦略パラメータ, {時間足: Feed})] を銘柄順に渡す。
+    """
+
+    def __init__(self, books, initial_capital=None, max_positions=None):
+        self.initial_capital = float(config.PORTFOLIO_INITIAL_CAPITAL if initial_capital is None else initial_capital)
+        self.broker = PortfolioBroker(self.initial_capital, max_positions)
+        self.books, self.unsupported = [], []
+        for symbol, strategy_params, feeds in books:
+            try:
+                self.books.append(_SymbolBook(self.broker, symbol, feeds, strategy_params))
+            except VectorizedUnsupportedError as e:
+                logger.warning(f"[{symbol}] ベクトル化できないためポートフォリオから除外します: {e}")
+                self.unsupported.append(symbol)
+        self.broker.cash = self.initial_capital
+        self.equity_curve = []
+        self._heap = []
+
+    # --- イベント ---------------------------------------------------------------
+
+    def _push(self, kind, book_index, step, payload=None):
+        # 1銘柄につき予定イベントは常に1つなので (時刻, 種別, 銘柄番号) で順序が決まる
+        book = self.books[book_index]
+        heapq.heappush(self._heap, (int(book.steps[step]), kind, book_index, step, payload))
+
+    def _schedule_signal(self, book_index, step):
+        signal_step = self.books[book_index].next_signal(step)
+        if signal_step is not None and signal_step < self.books[book_index].end_step:
+            self._push(_SIGNAL, book_index, signal_step)
+
+    def _on_signal(self, i, book, step, _):
+        book.clock.step = step
+        trade_type, reason = book.signal_generator.check_entry_signal(book.params)
+        if not trade_type:
+            return self._schedule_signal(i, step + 1)
+        if not self.broker.has_slot():
+            self.broker.skipped_by_limit += 1
+            return self._schedule_signal(i, step + 1)
+        is_long = trade_type == 'long'
+        size = book._entry_size(step, is_long)
+        if size is None:
+            return self._schedule_signal(i, step + 1)
+        if step + 1 >= book.end_step: return
+        self.broker.acquire()
+        self._push(_SUBMIT, i, step + 1, (step, is_long, reason, size if is_long else -size))
+
+    def _reject(self, i, book, resume_step):
+        book.tp_price, book.sl_price = 0.0, 0.0
+        self.broker.release()
+        self.broker.skipped_by_cash += 1
+        self._schedule_signal(i, resume_step)
+
+    def _on_submit(self, i, book, step, order):
+        # 発注の翌ステップで証拠金チェック (シグナル足の終値基準)
+        signal_step, _, _, signed_size = order
+        if book._cash_after_open(signed_size, book._bar(signal_step)[3]) < 0:
+            return self._reject(i, book, step)
+        fill_step = int(np.searchsorted(book.bar0, book.bar0[signal_step], side='right'))
+        if fill_step >= book.end_step:
+            return self.broker.release()
+        self._push(_FILL, i, fill_step, order)
+
+    def _on_fill(self, i, book, step, order):
+        _, is_long, reason, signed_size = order
+        po, ph, pl, _ = book._bar(step)
+        entry_price = book._slip_up(ph, po) if is_long else book._slip_down(pl, po)
+        cash = book._cash_after_open(signed_size, entry_price)
+        if cash < 0:
+            return self._reject(i, book, step)
+        self.broker.cash = cash
+        self.broker.open_cost += signed_size * entry_price
+        book.opened_count += 1
+        entry = {'reason': reason, 'step': step, 'price': entry_price, 'size': signed_size,
+                 'tp_price': book.tp_price, 'sl_price': book.sl_price, 'risk_per_share': book.risk_per_share}
+        self._record_equity(book, step)
+
+        exit_step, exit_price = book._find_exit(step, is_long)
+        if exit_step is None:
+            book.open_entry = entry  # 終了時に最終バーの終値で評価する (保有枠も返さない)
+            return
+        self._push(_EXIT, i, exit_step, (entry, exit_price))
+
+    def _on_exit(self, i, book, step, payload):
+        entry, exit_price = payload
+        book._record_close(entry, step, exit_price)
+        self.broker.open_cost -= entry['size'] * entry['price']
+        self.broker.release()
+        self._record_equity(book, step)
+        self._schedule_signal(i, step)
+
+    def _record_equity(self, book, step):
+        self.equity_curve.append((book._timestamp(step), self.broker.cash, self.broker.equity, self.broker.slots_used))
+
+    # --- 実行 -------------------------------------------------------------------
+
+    def run(self):
+        """全イベントを処理し、全銘柄の取引リスト (決済日時順) を返す。"""
+        handlers = {_EXIT: self._on_exit, _SUBMIT: self._on_submit, _FILL: self._on_fill, _SIGNAL: self._on_signal}
+        for i, book in enumerate(self.books):
+            self._schedule_signal(i, book.start_step)
+        processed = 0
+        while self._heap:
+            _, kind, i, step, payload = heapq.heappop(self._heap)
+            handlers[kind](i, self.books[i], step, payload)
+            processed += 1
+        for book in self.books:
+            if book.open_entry is not None: book._record_open_at_end(book.open_entry)
+        logger.info(f"ポートフォリオ: {len(self.books)}銘柄・{processed}イベントを処理しました。")
+
+        trades = [trade for book in self.books for trade in book.trades]
+        return sorted(trades, key=lambda t: (t['決済日時'], t['銘柄']))
+
+    def final_equity(self):
+        """最終資産 (現金 + 未決済ポジションを各銘柄の最終バーの終値で評価)。"""
+        value = self.broker.cash
+        for book in self.books:
+            if book.open_entry is not None:
+                value += book.open_entry['size'] * book._bar(book.end_step - 1)[3]
+        return value
+
+    def max_drawdown(self):
+        """確定資産の推移から求めた最大ドローダウン (割合)。"""
+        equity = np.array([self.initial_capital] + [e for _, _, e, _ in self.equity_curve])
+        peak = np.maximum.accumulate(equity)
+        return float(np.max((peak - equity) / peak)) if len(equity) else 0.0
+
+    # --- レポート ---------------------------------------------------------------
+
+    def build_summary(self, strategy_params, start_date, end_date):
+        """generate_report と同じ項目に、ポートフォリオ全体の資金・保有数の項目を加える。"""
+        summary_df = report_generator.generate_report([book.stats() for book in self.books], strategy_params, start_date, end_date)
+        summary_df.loc[summary_df['項目'] == '初期資金', '結果'] = f"¥{self.initial_capital:,.0f}"
+        final_equity = self.final_equity()
+        max_positions = self.broker.max_positions
+        extra = pd.DataFrame({
+            '項目': ["---", "銘柄数", "最終資産", "リターン", "最大ドローダウン (確定資産)", "同時保有上限", "最大同時保有数",
+                     "見送り (同時保有上限)", "見送り (資金不足)"],
+            '結果': ["---", len(self.books), f"¥{final_equity:,.0f}", f"{final_equity / self.initial_capital - 1:.2%}",
+                     f"{self.max_drawdown():.2%}", max_positions if max_positions is not None else "なし", self.broker.max_slots_used,
+                     self.broker.skipped_by_limit, self.broker.skipped_by_cash]})
+        return pd.concat([summary_df, extra], ignore_index=True)
+
+    def build_detail(self):
+        return pd.DataFrame([build_detail_row(book.symbol, book.stats()) for book in self.books])
+
+    def build_trade_history(self, trades):
+        return pd.DataFrame(trades, columns=TRADE_HISTORY_COLUMNS)
+
+    def build_equity_curve(self):
+        return pd.DataFrame(self.equity_curve, columns=['日時', '現金', '確定資産', '保有数'])
+
+
+def build_books(symbol_params, data_dir=None):
+    """
+    [(銘柄, ベースCSVパス, 戦略パラメータ)] からバーストア経由でフィードを読み込み、
+    PortfolioBacktest に渡す [(銘柄, 戦略パラメータ, フィード)] と分析期間を返す。
+    """
+    books, start_dates, end_dates = [], [], []
+    for symbol, base_filepath, strategy_params in symbol_params:
+        try:
+            feeds = load_feeds(symbol, base_filepath, strategy_params)
+        except VectorizedUnsupportedError as e:
+            logger.warning(f"[{symbol}] ベクトル化できないためポートフォリオから除外します: {e}")
+            continue
+        if feeds is None: continue
+        base_bars = bar_store.load_bars(base_filepath)
+        start_dates.append(base_bars.start); end_dates.append(base_bars.end)
+        books.append((symbol, strategy_params, feeds))
+    period = (min(start_dates), max(end_dates)) if start_dates else (None, None)
+    return books, period
\ No newline at end of file
@@ -8,9 +8,11 @@ from datetime import datetime
 
 from src.core.util import logger as logger_setup
 from src.core.data_preparer import prepare_historical_data_feeds
+from src.core import bar_store
 from . import config_backtest as config
 from . import report as report_generator
 from .strategy import BacktestStrategy # <-- [修正] 新しいストラテジーをインポート
+from .vectorized import run_vectorized_backtest_for_symbol, VectorizedUnsupportedError
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +41,9 @@ class TradeList(bt.Analyzer):
 
 def run_backtest_for_symbol(symbol, base_filepath, strategy_params):
     logger.info(f"▼▼▼ バックテスト実行中: {symbol} ▼▼▼")
-    df_for_dates = pd.read_csv(base_filepath, index_col='datetime', parse_dates=True)
-    start_date, end_date = df_for_dates.index[0], df_for_dates.index[-1]
+    # [修正] 期間の取得もバーストアのパース済みデータから行う (CSVの二重パースを回避)
+    base_bars = bar_store.load_bars(base_filepath)
+    start_date, end_date = base_bars.start, base_bars.end
     
     cerebro = bt.Cerebro(stdstats=False)
     
@@ -76,6 +79,67 @@ def run_backtest_for_symbol(symbol, base_filepath, strategy_params):
         'win_trades': trade_analysis.get('won', {}).get('total', 0)
     }, start_date, end_date, trade_list
 
+def run_symbol_backtest(symbol, base_filepath, strategy_params, engine='backtrader'):
+    """
+    指定エンジンで1銘柄のバックテストを実行する。戻り値は run_backtest_for_symbol と同じ。
+    engine='vectorized' で戦略定義がベクトル化できない場合は cerebro 経路で実行する。
+    """
+    if engine == 'vectorized':
+        try:
+            return run_vectorized_backtest_for_symbol(symbol, base_filepath, strategy_params)
+        except VectorizedUnsupportedError as e:
+            logger.info(f"[{symbol}] ベクトル化エンジン未対応のため backtrader で実行します: {e}")
+    return run_backtest_for_symbol(symbol, base_filepath, strategy_params)
+
+TRADE_HISTORY_COLUMNS = [
+    '銘柄', '方向', '数量', 'エントリー価格', 'エントリー日時', 'エントリー根拠',
+    '決済価格', '決済日時', '決済根拠',
+    '一株当たり損益', '損益', '損益(手数料込)',
+    'ストップロス価格', 'テイクプロフィット価格',
+    '許容損失幅', '目標利益幅'
+]
+
+def find_base_files(strategy_params, data_dir=None):
+    """短期足の設定に一致するベースCSVファイルを銘柄順に返す。"""
+    data_dir = data_dir or config.DATA_DIR
+    short_tf_compression = strategy_params['timeframes']['short']['compression']
+    base_file_pattern = f"*_{short_tf_compression}m_*.csv"
+    return sorted(glob.glob(os.path.join(data_dir, base_file_pattern)))
+
+def build_detail_row(symbol, stats):
+    """1銘柄分のバックテスト統計から詳細レポートの1行を生成する。"""
+    detail_data = {"銘柄": symbol, "純利益": "¥0.00", "総利益": "¥0.00", "総損失": "¥0.00", "PF": "0.00", "勝率": "0.00%", "総トレード数": 0, "勝トレード": 0, "負トレード": 0, "平均利益": "¥0.00", "平均損失": "¥0.00", "RR比": "0.00"}
+    if not stats: return detail_data
+    win_trades, total_trades = stats['win_trades'], stats['total_trades']; lost_trades = total_trades - win_trades
+    win_rate = (win_trades / total_trades) * 100 if total_trades > 0 else 0
+    pf = abs(stats['gross_won'] / stats['gross_lost']) if stats['gross_lost'] != 0 else float('inf')
+    avg_win = stats['gross_won'] / win_trades if win_trades > 0 else 0
+    avg_loss = stats['gross_lost'] / lost_trades if lost_trades > 0 else 0
+    rr = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
+    detail_data.update({"純利益": f"¥{stats['pnl_net']:,.2f}", "総利益": f"¥{stats['gross_won']:,.2f}", "総損失": f"¥{stats['gross_lost']:,.2f}", "PF": f"{pf:.2f}", "勝率": f"{win_rate:.2f}%", "総トレード数": total_trades, "勝トレード": win_trades, "負トレード": lost_trades, "平均利益": f"¥{avg_win:,.2f}", "平均損失": f"¥{avg_loss:,.2f}", "RR比": f"{rr:.2f}"})
+    return detail_data
+
+def build_report_frames(strategy_params, symbol_outputs):
+    """
+    銘柄ごとの実行結果 (symbol, stats, start_date, end_date, trade_list) のリストから
+    summary / detail / trade_history の各DataFrameを生成する。
+    有効な期間が得られなかった場合、summaryはNoneとなる。
+    """
+    all_results, all_trades, all_details, start_dates, end_dates = [], [], [], [], []
+    for symbol, stats, start_date, end_date, trade_list in symbol_outputs:
+        if stats:
+            all_results.append(stats)
+            if trade_list: all_trades.extend(trade_list)
+            if start_date is not None: start_dates.append(start_date)
+            if end_date is not None: end_dates.append(end_date)
+        all_details.append(build_detail_row(symbol, stats))
+    detail_df = pd.DataFrame(all_details)
+    summary_df = None
+    if start_dates and end_dates:
+        summary_df = report_generator.generate_report(all_results, strategy_params, min(start_dates), max(end_dates))
+    trade_history_df = pd.DataFrame(all_trades, columns=TRADE_HISTORY_COLUMNS) if all_trades else pd.DataFrame(columns=TRADE_HISTORY_COLUMNS)
+    return summary_df, detail_df, trade_history_df
+
 def main():
     try:
         logger_setup.setup_logging(config.LOG_DIR, log_prefix='backtest', level=config.LOG_LEVEL)
@@ -84,57 +148,32 @@ def main():
             if not os.path.exists(dir_path): os.makedirs(dir_path)
         strategy_file_path = os.path.join(config.BASE_DIR, 'config', 'strategy_base.yml')
         with open(strategy_file_path, 'r', encoding='utf-8') as f: strategy_params = yaml.safe_load(f)
-        short_tf_compression = strategy_params['timeframes']['short']['compression']
-        base_file_pattern = f"*_{short_tf_compression}m_*.csv"
-        base_csv_files = glob.glob(os.path.join(config.DATA_DIR, base_file_pattern))
+        base_csv_files = find_base_files(strategy_params)
         if not base_csv_files: logger.error(f"{config.DATA_DIR}にベースデータが見つかりません。"); return
-        all_results, all_trades, all_details, start_dates, end_dates = [], [], [], [], []
-        for filepath in sorted(base_csv_files):
+        symbol_outputs = []
+        for filepath in base_csv_files:
             symbol = os.path.basename(filepath).split('_')[0]
-            stats, start_date, end_date, trade_list = run_backtest_for_symbol(symbol, filepath, strategy_params)
-            detail_data = {"銘柄": symbol, "純利益": "¥0.00", "総利益": "¥0.00", "総損失": "¥0.00", "PF": "0.00", "勝率": "0.00%", "総トレード数": 0, "勝トレード": 0, "負トレード": 0, "平均利益": "¥0.00", "平均損失": "¥0.00", "RR比": "0.00"}
-            if stats:
-                all_results.append(stats);
-                if trade_list: all_trades.extend(trade_list)
-                if start_date: start_dates.append(start_date)
-                if end_date: end_dates.append(end_date)
-                win_trades, total_trades = stats['win_trades'], stats['total_trades']; lost_trades = total_trades - win_trades
-                win_rate = (win_trades / total_trades) * 100 if total_trades > 0 else 0
-                pf = abs(stats['gross_won'] / stats['gross_lost']) if stats['gross_lost'] != 0 else float('inf')
-                avg_win = stats['gross_won'] / win_trades if win_trades > 0 else 0
-                avg_loss = stats['gross_lost'] / lost_trades if lost_trades > 0 else 0
-                rr = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
-                detail_data.update({"純利益": f"¥{stats['pnl_net']:,.2f}", "総利益": f"¥{stats['gross_won']:,.2f}", "総損失": f"¥{stats['gross_lost']:,.2f}", "PF": f"{pf:.2f}", "勝率": f"{win_rate:.2f}%", "総トレード数": total_trades, "勝トレード": win_trades, "負トレード": lost_trades, "平均利益": f"¥{avg_win:,.2f}", "平均損失": f"¥{avg_loss:,.2f}", "RR比": f"{rr:.2f}"})
-            all_details.append(detail_data)
+            stats, start_date, end_date, trade_list = run_symbol_backtest(symbol, filepath, strategy_params, config.BACKTEST_ENGINE)
+            symbol_outputs.append((symbol, stats, start_date, end_date, trade_list))
+        summary_df, detail_df, trade_history_df = build_report_frames(strategy_params, symbol_outputs)
         timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
-        pd.DataFrame(all_details).to_csv(os.path.join(config.RESULTS_DIR, f"detail_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+        detail_df.to_csv(os.path.join(config.RESULTS_DIR, f"detail_{timestamp}.csv"), index=False, encoding='utf-8-sig')
         logger.info(f"詳細レポートを detail_{timestamp}.csv に保存しました。")
 
-        if start_dates and end_dates:
-            report_df = report_generator.generate_report(all_results, strategy_params, min(start_dates), max(end_dates))
-            report_df.to_csv(os.path.join(config.RESULTS_DIR, f"summary_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+        if summary_df is not None:
+            summary_df.to_csv(os.path.join(config.RESULTS_DIR, f"summary_{timestamp}.csv"), index=False, encoding='utf-8-sig')
             logger.info(f"サマリーレポートを summary_{timestamp}.csv に保存しました。")
-            logger.info("\n\n★★★ 全銘柄バックテストサマリー ★★★\n" + report_df.to_string())
+            logger.info("\n\n★★★ 全銘柄バックテストサマリー ★★★\n" + summary_df.to_string())
 
         else:
             logger.warning("バックテスト対象期間を特定できなかったため、サマリーレポートは生成されませんでした。")
 
         logger.info("取引履歴(trade_history.csv)の保存処理を開始...")
 
-        TRADE_HISTORY_COLUMNS = [
-            '銘柄', '方向', '数量', 'エントリー価格', 'エントリー日時', 'エントリー根拠',
-            '決済価格', '決済日時', '決済根拠',
-            '一株当たり損益', '損益', '損益(手数料込)',
-            'ストップロス価格', 'テイクプロフィット価格',
-            '許容損失幅', '目標利益幅'
-        ]
-
-        if not all_trades:
+        if trade_history_df.empty:
             logger.info("取引履歴が0件のため、ヘッダーのみのファイルを生成します。")
-            trade_history_df = pd.DataFrame(columns=TRADE_HISTORY_COLUMNS)
         else:
-            logger.info(f"{len(all_trades)}件の取引履歴を保存します。")
-            trade_history_df = pd.DataFrame(all_trades, columns=TRADE_HISTORY_COLUMNS)
+            logger.info(f"{len(trade_history_df)}件の取引履歴を保存します。")
 
         trade_history_df.to_csv(
             os.path.join(config.RESULTS_DIR, f"trade_history_{timestamp}.csv"),
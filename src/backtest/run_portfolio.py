@@ -0,0 +1,97 @@
+import os
+import copy
+import glob
+import yaml
+import argparse
+import logging
+import pandas as pd
+from datetime import datetime
+
+from src.core.util import logger as logger_setup
+from . import config_backtest as config
+from .run_backtest import find_base_files
+from .portfolio import PortfolioBacktest, build_books
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+# 全銘柄を1つの資金で取引するポートフォリオ・バックテストを実行します。
+# `python -m src.backtest.run_portfolio [--capital N] [--max-positions N] [--recommend [FILE]]`
+# --recommend を指定すると、評価の all_recommend で銘柄ごとに選ばれた戦略で取引します。
+# (リアルタイム取引と同じ戦略の割り当て)
+# ------------------------------------------------------------------------------
+
+RECOMMEND_FILE_PATTERN = os.path.join(config.BASE_DIR, 'results', 'evaluation', '*', 'all_recommend_*.csv')
+
+
+def _load_yaml(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f: return yaml.safe_load(f)
+
+
+def load_symbol_params(strategy_params, recommend_file=None):
+    """[(銘柄, ベースCSVパス, 戦略パラメータ)] を返す。recommend_file がなければ全銘柄で strategy_params を使う。"""
+    base_files = {os.path.basename(f).split('_')[0]: f for f in find_base_files(strategy_params)}
+    if recommend_file is None:
+        return [(symbol, filepath, strategy_params) for symbol, filepath in sorted(base_files.items())]
+
+    # CerebroFactory と同じく、ベース設定にカタログの戦略定義を重ねる
+    catalog = {item['name']: item for item in _load_yaml(os.path.join(config.BASE_DIR, 'config', 'strategy_catalog.yml'))}
+    recommend_df = pd.read_csv(recommend_file)
+    symbol_params = []
+    for _, row in recommend_df.iterrows():
+        symbol, strategy_name = str(row['銘柄']), row['戦略名']
+        if symbol not in base_files or strategy_name not in catalog:
+            logger.warning(f"[{symbol}] ベースデータまたは戦略 '{strategy_name}' の定義が見つからないためスキップします。")
+            continue
+        params = copy.deepcopy(strategy_params)
+        params.update(copy.deepcopy(catalog[strategy_name]))
+        params['strategy_name'] = strategy_name
+        symbol_params.append((symbol, base_files[symbol], params))
+    return sorted(symbol_params, key=lambda item: item[0])
+
+
+def main(capital=None, max_positions=None, recommend_file=None):
+    logger.info("--- ポートフォリオ・バックテスト開始 ---")
+    strategy_params = _load_yaml(os.path.join(config.BASE_DIR, 'config', 'strategy_base.yml'))
+    symbol_params = load_symbol_params(strategy_params, recommend_file)
+    books, (start_date, end_date) = build_books(symbol_params)
+    if not books:
+        logger.error(f"{config.DATA_DIR} に取引可能な銘柄がありません。")
+        return
+
+    portfolio = PortfolioBacktest(books, capital, max_positions)
+    trades = portfolio.run()
+    if recommend_file is not None:
+        strategy_params = dict(strategy_params, strategy_name=f"Portfolio (recommend: {os.path.basename(recommend_file)})")
+
+    output_dir = os.path.join(config.RESULTS_DIR, 'portfolio')
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    summary_df = portfolio.build_summary(strategy_params, start_date, end_date)
+    outputs = {
+        'summary': summary_df,
+        'detail': portfolio.build_detail(),
+        'trade_history': portfolio.build_trade_history(trades),
+        'equity': portfolio.build_equity_curve(),
+    }
+    for name, df in outputs.items():
+        df.to_csv(os.path.join(output_dir, f"portfolio_{name}_{timestamp}.csv"), index=False, encoding='utf-8-sig')
+    logger.info(f"ポートフォリオ・バックテストの結果を '{output_dir}' に保存しました。")
+    logger.info("\n\n★★★ ポートフォリオ・バックテストサマリー ★★★\n" + summary_df.to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='全銘柄を1つの資金で取引するポートフォリオ・バックテストを実行します。')
+    parser.add_argument('--capital', type=float, default=None, help=f"共有の初期資金 (既定: {config.PORTFOLIO_INITIAL_CAPITAL:,})")
+    parser.add_argument('--max-positions', type=int, default=config.PORTFOLIO_MAX_POSITIONS,
+                        help=f"同時保有数の上限。0 で上限なし (既定: {config.PORTFOLIO_MAX_POSITIONS})")
+    parser.add_argument('--recommend', nargs='?', const='latest', default=None, metavar='FILE',
+                        help='all_recommend の戦略割り当てで取引する。ファイル省略時は最新の評価結果を使用')
+    args = parser.parse_args()
+    logger_setup.setup_logging(config.LOG_DIR, log_prefix='portfolio', level=config.LOG_LEVEL)
+    recommend_file = args.recommend
+    if recommend_file == 'latest':
+        files = glob.glob(RECOMMEND_FILE_PATTERN)
+        if not files: raise FileNotFoundError(f"推奨戦略ファイルが見つかりません: {RECOMMEND_FILE_PATTERN}")
+        recommend_file = max(files, key=os.path.getctime)
+    main(args.capital, args.max_positions or None, recommend_file)
\ No newline at end of file
@@ -0,0 +1,2 @@
+from .indicators import VectorizedUnsupportedError, compute_indicator
+from .engine import VectorizedBacktest, build_indicators, load_feeds, run_vectorized_backtest_for_symbol
\ No newline at end of file
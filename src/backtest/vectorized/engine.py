@@ -0,0 +1,499 @@
+import os
+import glob
+import logging
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from src.core import bar_store
+from src.core.strategy.strategy_initializer import StrategyInitializer
+from src.core.strategy.entry_signal_generator import EntrySignalGenerator
+from src.backtest import config_backtest as config
+from .indicators import Feed, VectorizedUnsupportedError, compute_indicator, crossover
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ベクトル化バックテスター (スクリーニング用の高速パス)
+# 戦略定義 (entry_conditions / exit_conditions) をnumpy配列演算に変換し、
+# cerebro.run() と同じ約定結果を得る。
+#
+# - 短期/中期/長期の全バーのタイムスタンプを合成した「ステップ」列を作り、
+#   各ステップで各時間足の確定済みバー位置を searchsorted で求める。(先読みなし)
+#   Backtrader (runonce) と同様、中長期足だけが進むステップでも注文処理と next() が走る。
+# - エントリー条件は配列全体で真偽マスクとして評価し、ポジションがない間は
+#   シグナルのあるステップ間を飛び越す。エントリー根拠の文字列は既存の
+#   EntrySignalGenerator を該当ステップでのみ呼び出して生成する。
+# - 決済は BacktestOrderManager.place_backtest_exit_orders と同じ StopTrail
+#   (+ 任意で Limit の利確) を、ステップのチャンク単位で配列評価する。
+#   Backtrader経路では Limit 注文が transmit=False のまま送信されないため、
+#   既定では利確 Limit を無効としている。(transmit_take_profit=True で有効化)
+# - 出力は TradeList と同じスキーマの取引リスト、TradeAnalyzer 相当の統計。
+# - window=(開始, 終了) を指定すると、全期間で計算済みのインジケーターを使ったまま
+#   その期間だけを初期資金から取引する。(ウォークフォワード評価用)
+# ==============================================================================
+
+TIMEFRAMES = ('short', 'medium', 'long')
+EXIT_SEARCH_CHUNK = 256
+
+
+class _Clock:
+    """EntrySignalGenerator に渡すライン群が参照する現在ステップ。"""
+    __slots__ = ('step',)
+
+    def __init__(self): self.step = 0
+
+
+class _Line:
+    """Backtraderのラインと同じく line[0] / len() でアクセスできる配列ビュー。"""
+    __slots__ = ('values', 'positions', 'clock')
+
+    def __init__(self, values, positions, clock):
+        self.values, self.positions, self.clock = values, positions, clock
+
+    def __getitem__(self, ago):
+        return float(self.values[self.positions[self.clock.step] + ago])
+
+    def __len__(self):
+        return int(self.positions[self.clock.step]) + 1
+
+
+class _FeedView(_Line):
+    """データフィードのビュー。close/open/high/low/volume 属性を持つ。"""
+    __slots__ = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, feed, positions, clock):
+        super().__init__(feed.close, positions, clock)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            setattr(self, name, _Line(getattr(feed, name), positions, clock))
+
+
+def find_feed_files(symbol, base_filepath, strategy_params, data_dir=None):
+    """prepare_historical_data_feeds と同じ規則で {時間足: CSVパス} を返す。見つからない場合はNone。"""
+    data_dir = data_dir or config.DATA_DIR
+    files = {'short': base_filepath}
+    for tf_name in ('medium', 'long'):
+        tf_config = strategy_params['timeframes'].get(tf_name)
+        if not tf_config:
+            raise VectorizedUnsupportedError(f"{tf_name} の時間足設定がありません。")
+        if tf_config.get('source_type', 'resample') != 'direct':
+            raise VectorizedUnsupportedError(f"{tf_name} のリサンプリング (source_type: resample) は未対応です。")
+        data_files = glob.glob(os.path.join(data_dir, tf_config.get('file_pattern').format(symbol=symbol)))
+        if not data_files:
+            logger.error(f"[{symbol}] {tf_name}用のデータファイルが見つかりません。")
+            return None
+        files[tf_name] = data_files[0]
+    return files
+
+
+def build_indicators(strategy_params, feeds, cache=None):
+    """
+    StrategyInitializer.create_indicators と同じ規則でインジケーター配列を生成する。
+    戻り値: {インジケーターキー: (時間足, 値の配列, minperiod)}
+    cache: 同一銘柄で戦略をまたいで再利用する {キー: (値の配列, minperiod)} の辞書。(任意)
+    """
+    si = StrategyInitializer(strategy_params)
+    cache = {} if cache is None else cache
+    unique_defs = {}
+
+    def add_def(timeframe, ind_def):
+        if not isinstance(ind_def, dict) or 'name' not in ind_def: return
+        unique_defs.setdefault(si._get_indicator_key(timeframe, **ind_def), (timeframe, ind_def))
+
+    entry_conditions = strategy_params.get('entry_conditions')
+    cond_lists = [l for l in entry_conditions.values() if isinstance(l, list)] if isinstance(entry_conditions, dict) else []
+    for cond_list in cond_lists:
+        for cond in cond_list:
+            if not isinstance(cond, dict) or not cond.get('timeframe'): continue
+            tf = cond['timeframe']
+            add_def(tf, cond.get('indicator')); add_def(tf, cond.get('indicator1')); add_def(tf, cond.get('indicator2'))
+            if cond.get('target', {}).get('type') == 'indicator': add_def(tf, cond['target']['indicator'])
+    if isinstance(strategy_params.get('exit_conditions'), dict):
+        for exit_type in ('take_profit', 'stop_loss'):
+            cond = strategy_params['exit_conditions'].get(exit_type, {})
+            if cond and cond.get('type') in ('atr_multiple', 'atr_stoptrail'):
+                atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
+                add_def(cond.get('timeframe'), {'name': 'atr', 'params': atr_params})
+
+    indicators = {}
+    for key, (timeframe, ind_def) in unique_defs.items():
+        ind_cls = si._find_indicator_class(ind_def['name'])
+        if ind_cls is None:
+            logger.error(f"インジケータークラス '{ind_def['name']}' が見つかりません。")
+            continue
+        if key not in cache:
+            cache[key] = compute_indicator(ind_cls, feeds[timeframe], ind_def.get('params', {}))
+        if cache[key][1] > len(feeds[timeframe]):
+            # データ不足時の挙動 (例外/シグナルなし) はインジケーターにより異なるため cerebro 経路に任せる
+            raise VectorizedUnsupportedError(f"{key} の計算に必要なバー数 ({cache[key][1]}) に対してデータが不足しています。")
+        indicators[key] = (timeframe,) + tuple(cache[key])
+
+    for cond_list in cond_lists:
+        for cond in cond_list:
+            if not isinstance(cond, dict) or cond.get('type') not in ('crossover', 'crossunder'): continue
+            k1 = si._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = si._get_indicator_key(cond['timeframe'], **cond['indicator2'])
+            cross_key = f"cross_{k1}_vs_{k2}"
+            if k1 in indicators and k2 in indicators and cross_key not in indicators:
+                if cross_key not in cache: cache[cross_key] = crossover(*indicators[k1][1:], *indicators[k2][1:])
+                indicators[cross_key] = (cond['timeframe'],) + tuple(cache[cross_key])
+    return indicators
+
+
+class VectorizedBacktest:
+    """1銘柄 × 1戦略のベクトル化バックテスト。"""
+
+    def __init__(self, symbol, feeds, strategy_params, indicator_cache=None, transmit_take_profit=False, window=None):
+        self.symbol = symbol
+        self.params = strategy_params
+        self.feeds = feeds
+        self.transmit_take_profit = transmit_take_profit
+        self.window = window
+        self.initializer = StrategyInitializer(strategy_params)
+        try:
+            self.indicators = build_indicators(strategy_params, feeds, indicator_cache)
+            self._build_steps()
+            self._build_signals()
+            self._exit_atr_keys = {name: self._atr_key(name) for name in ('stop_loss', 'take_profit')}
+        except (KeyError, TypeError, IndexError, AttributeError) as e:
+            raise VectorizedUnsupportedError(f"戦略定義をベクトル化できません: {type(e).__name__}: {e}") from e
+
+        sizing = strategy_params.get('sizing', {})
+        self.sizing = sizing
+        self.method = sizing.get('backtest_method', 'risk_based')
+        self.cash = float(config.INITIAL_CAPITAL)
+        self.commission = config.COMMISSION_PERC
+        self.slippage = config.SLIPPAGE_PERC
+        self.tp_price, self.sl_price, self.risk_per_share = 0.0, 0.0, 0.0
+        self.trades, self.closed_pnlcomm, self.opened_count = [], [], 0
+
+    # --- 前処理 -----------------------------------------------------------------
+
+    def _build_steps(self):
+        for tf, feed in self.feeds.items():
+            if len(feed) > 1 and not np.all(np.diff(feed.datetime) > 0):
+                raise VectorizedUnsupportedError(f"{tf} のタイムスタンプが単調増加ではありません。")
+        self.steps = np.unique(np.concatenate([self.feeds[tf].datetime for tf in TIMEFRAMES]))
+        self.positions = {tf: np.searchsorted(self.feeds[tf].datetime, self.steps, side='right') - 1 for tf in TIMEFRAMES}
+        minperiods = {tf: 1 for tf in TIMEFRAMES}
+        for tf, _, minperiod in self.indicators.values():
+            minperiods[tf] = max(minperiods[tf], minperiod)
+        self.ready = np.logical_and.reduce([self.positions[tf] + 1 >= minperiods[tf] for tf in TIMEFRAMES])
+        # 取引するステップの範囲 [start_step, end_step)。window はUTCエポックナノ秒 (終了は含まない)
+        self.start_step, self.end_step = 0, len(self.steps)
+        if self.window is not None:
+            self.start_step, self.end_step = (int(i) for i in np.searchsorted(self.steps, self.window, side='left'))
+        self.bar0 = self.positions['short']
+        self.clock = _Clock()
+        views = {tf: _FeedView(self.feeds[tf], self.positions[tf], self.clock) for tf in TIMEFRAMES}
+        ind_views = {key: _Line(values, self.positions[tf], self.clock) for key, (tf, values, _) in self.indicators.items()}
+        self.signal_generator = EntrySignalGenerator(ind_views, views, self.params)
+
+    def _at_steps(self, tf, values):
+        """時間足 tf のバー単位の配列を、ステップ単位に並べ替える。"""
+        positions = self.positions[tf]
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], False)
+
+    def _condition_mask(self, cond):
+        """EntrySignalGenerator._compile_condition と同じ判定をステップ単位の配列で返す。"""
+        si, tf, cond_type = self.initializer, cond['timeframe'], cond.get('type')
+        feed, never = self.feeds[tf], np.zeros(len(self.steps), dtype=bool)
+        if cond_type in ('crossover', 'crossunder'):
+            k1 = si._get_indicator_key(tf, **cond['indicator1']); k2 = si._get_indicator_key(tf, **cond['indicator2'])
+            cross = self.indicators.get(f"cross_{k1}_vs_{k2}")
+            if cross is None: return never
+            return self._at_steps(tf, cross[1] > 0 if cond_type == 'crossover' else cross[1] < 0)
+
+        ind = self.indicators.get(si._get_indicator_key(tf, **cond['indicator']))
+        if ind is None: return never
+        values, compare, target = ind[1], cond['compare'], cond['target']
+        target_type = target.get('type')
+        if target_type == 'data':
+            if target['value'] not in ('open', 'high', 'low', 'close', 'volume'):
+                raise VectorizedUnsupportedError(f"未対応の比較対象データ: {target['value']}")
+            target_val = getattr(feed, target['value'])
+        elif target_type == 'indicator':
+            target_ind = self.indicators.get(si._get_indicator_key(tf, **target['indicator']))
+            if target_ind is None: return never
+            target_val = target_ind[1]
+        elif target_type == 'values':
+            target_val = target['value']
+        else:
+            return never
+
+        if compare in ('>', '<'):
+            if isinstance(target_val, list): target_val = target_val[0]
+            with np.errstate(invalid='ignore'):
+                mask = values > target_val if compare == '>' else values < target_val
+        elif compare == 'between':
+            if target_type != 'values':
+                raise VectorizedUnsupportedError("'between' は values との比較のみ対応しています。")
+            with np.errstate(invalid='ignore'):
+                mask = (target_val[0] < values) & (values < target_val[1])
+        else:
+            return never
+        return self._at_steps(tf, mask)
+
+    def _side_mask(self, trade_type):
+        if not self.params.get('trading_mode', {}).get(f"{trade_type}_enabled", True):
+            return np.zeros(len(self.steps), dtype=bool)
+        conditions = self.params.get('entry_conditions', {}).get(trade_type, [])
+        if not conditions: return np.zeros(len(self.steps), dtype=bool)
+        return np.logical_and.reduce([self._condition_mask(c) for c in conditions])
+
+    def _build_signals(self):
+        volume = self.feeds['short'].volume
+        tradable = self.ready & self._at_steps('short', volume != 0)
+        self.signal_steps = np.flatnonzero(tradable & (self._side_mask('long') | self._side_mask('short')))
+        if self.window is not None:
+            self.signal_steps = self.signal_steps[(self.signal_steps >= self.start_step) & (self.signal_steps < self.end_step)]
+
+    def _atr_key(self, exit_type):
+        cond = self.params.get('exit_conditions', {}).get(exit_type, {})
+        if not cond: return None
+        atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
+        key = self.initializer._get_indicator_key(cond.get('timeframe'), 'atr', atr_params)
+        if key not in self.indicators:
+            raise VectorizedUnsupportedError(f"{exit_type} のATRインジケーターがありません: {key}")
+        return key
+
+    # --- ブローカー相当の処理 ---------------------------------------------------
+
+    def _bar(self, step):
+        feed, b = self.feeds['short'], self.bar0[step]
+        return feed.open[b], feed.high[b], feed.low[b], feed.close[b]
+
+    def _slip_up(self, pmax, price):
+        if not self.slippage: return price
+        pslip = price * (1 + self.slippage)
+        return pslip if pslip <= pmax else pmax
+
+    def _slip_down(self, pmin, price):
+        if not self.slippage: return price
+        pslip = price * (1 - self.slippage)
+        return pslip if pslip >= pmin else pmin
+
+    def _cash_after_open(self, signed_size, price):
+        cash = self.cash - signed_size * price
+        return cash - abs(signed_size) * self.commission * price
+
+    def _indicator_value(self, key, step):
+        tf, values, _ = self.indicators[key]
+        return values[self.positions[tf][step]]
+
+    def _set_exit_prices(self, step, entry_price, is_long):
+        """BaseExitSignalGenerator.calculate_and_set_exit_prices と同一。"""
+        exit_conditions = self.params.get('exit_conditions', {})
+        if self._exit_atr_keys['stop_loss']:
+            atr_val = self._indicator_value(self._exit_atr_keys['stop_loss'], step)
+            if atr_val > 1e-9:
+                self.risk_per_share = atr_val * exit_conditions['stop_loss'].get('params', {}).get('multiplier', 2.0)
+                self.sl_price = entry_price - self.risk_per_share if is_long else entry_price + self.risk_per_share
+        if self._exit_atr_keys['take_profit']:
+            atr_val = self._indicator_value(self._exit_atr_keys['take_profit'], step)
+            multiplier = exit_conditions['take_profit'].get('params', {}).get('multiplier', 5.0)
+            if atr_val > 1e-9:
+                self.tp_price = entry_price + atr_val * multiplier if is_long else entry_price - atr_val * multiplier
+
+    def _entry_size(self, step, is_long):
+        """BaseOrderManager.place_entry_order と同じサイジング。エントリーしない場合は None。"""
+        entry_price = self._bar(step)[3]
+        self._set_exit_prices(step, entry_price, is_long)
+        if self.risk_per_share < 1e-9 and self.method == 'risk_based': return None
+        cash, max_investment = self.cash, self.sizing.get('max_investment_per_trade', 1e7)
+        if self.method == 'risk_based':
+            size1 = (cash * self.sizing.get('risk_based', {}).get('risk_per_trade', 0.01)) / self.risk_per_share
+        elif self.method == 'kelly_criterion':
+            # バックテストでは統計情報がないため、固定f値以外は f=0 (エントリーなし) となる
+            kelly_params = self.sizing.get('kelly_criterion', {})
+            f_value = kelly_params.get('fixed_f_value', 0.1) if kelly_params.get('f_value_source', 'adjusted') == 'fixed' else 0.0
+            max_f_value_cap = kelly_params.get('max_f_value_cap', 0.25)
+            if f_value > max_f_value_cap: f_value = max_f_value_cap
+            if f_value <= 0 or entry_price <= 0: return None
+            size1 = (cash * f_value) / entry_price
+        else:
+            return None
+        if entry_price <= 0: return None
+        size = min(size1, max_investment / entry_price)
+        return size if size > 0 else None
+
+    def _find_exit(self, fill_step, is_long):
+        """
+        エントリー約定後の StopTrail (と任意の Limit) が約定するステップと価格を返す。
+        約定しない場合は (None, None)。ストップ価格の切り上げはチャンク内で累積最大/最小として評価する。
+        """
+        n, feed = self.end_step, self.feeds['short']
+        trail = self.risk_per_share
+        stop = None
+        if trail > 0:
+            close = self._bar(fill_step)[3]
+            stop = close - trail if is_long else close + trail
+        limit = self.tp_price if self.transmit_take_profit and self.tp_price != 0 else None
+        if stop is None and limit is None: return None, None
+
+        start = fill_step + 1
+        while start < n:
+            end = min(n, start + EXIT_SEARCH_CHUNK)
+            bars = self.bar0[start:end]
+            o, h, l, c = feed.open[bars], feed.high[bars], feed.low[bars], feed.close[bars]
+            hit_limit = np.zeros(len(bars), dtype=bool)
+            hit_stop = np.zeros(len(bars), dtype=bool)
+            if limit is not None:
+                hit_limit = (limit <= o) | (limit <= h) if is_long else (limit >= o) | (limit >= l)
+            if stop is not None:
+                if is_long:
+                    levels = np.maximum.accumulate(np.concatenate(([stop], c - trail)))
+                    hit_stop = (o <= levels[:-1]) | (l <= levels[:-1])
+                else:
+                    levels = np.minimum.accumulate(np.concatenate(([stop], c + trail)))
+                    hit_stop = (o >= levels[:-1]) | (h >= levels[:-1])
+            hits = np.flatnonzero(hit_limit | hit_stop)
+            if len(hits):
+                i = hits[0]
+                po, ph, pl = o[i], h[i], l[i]
+                if hit_limit[i]:
+                    if is_long: price = self._slip_down(limit, po) if limit <= po else limit
+                    else: price = self._slip_up(min(ph, limit), po) if limit >= po else limit
+                else:
+                    level = levels[i]
+                    if is_long: price = self._slip_down(pl, po) if po <= level else self._slip_down(pl, level)
+                    else: price = self._slip_up(ph, po) if po >= level else self._slip_up(ph, level)
+                return start + i, price
+            if stop is not None: stop = levels[-1]
+            start = end
+        return None, None
+
+    # --- 実行 -------------------------------------------------------------------
+
+    def _timestamp(self, step):
+        """Backtraderの日時 (float) を経由した naive datetime。TradeList と同じ丸めにする。"""
+        dt = pd.Timestamp(int(self.feeds['short'].datetime[self.bar0[step]])).to_pydatetime()
+        return bt.num2date(bt.date2num(dt)).replace(tzinfo=None)
+
+    def run(self):
+        n, step = self.end_step, self.start_step
+        while True:
+            k = np.searchsorted(self.signal_steps, step)
+            if k == len(self.signal_steps): break
+            signal_step = int(self.signal_steps[k])
+            self.clock.step = signal_step
+            trade_type, reason = self.signal_generator.check_entry_signal(self.params)
+            step = signal_step + 1
+            if not trade_type: continue
+            is_long = trade_type == 'long'
+            size = self._entry_size(signal_step, is_long)
+            if size is None: continue
+            signed_size = size if is_long else -size
+
+            # 発注の翌ステップで証拠金チェック (終値基準)、短期足が次のバーに進んだステップで始値約定
+            if step >= n: break
+            if self._cash_after_open(signed_size, self._bar(signal_step)[3]) < 0:
+                self.tp_price, self.sl_price = 0.0, 0.0
+                continue
+            fill_step = int(np.searchsorted(self.bar0, self.bar0[signal_step], side='right'))
+            if fill_step >= n: break
+            po, ph, pl, _ = self._bar(fill_step)
+            entry_price = self._slip_up(ph, po) if is_long else self._slip_down(pl, po)
+            cash = self._cash_after_open(signed_size, entry_price)
+            if cash < 0:
+                self.tp_price, self.sl_price, step = 0.0, 0.0, fill_step
+                continue
+            self.cash = cash
+            self.opened_count += 1
+            entry = {'reason': reason, 'step': fill_step, 'price': entry_price, 'size': signed_size,
+                     'tp_price': self.tp_price, 'sl_price': self.sl_price, 'risk_per_share': self.risk_per_share}
+
+            exit_step, exit_price = self._find_exit(fill_step, is_long)
+            if exit_step is None:
+                self._record_open_at_end(entry)
+                break
+            self._record_close(entry, exit_step, exit_price)
+            step = exit_step
+        return self.trades
+
+    def _record_close(self, entry, exit_step, exit_price):
+        signed_size, entry_price = entry['size'], entry['price']
+        # ブローカーの現金 (ポジション価格基準) と Trade の損益 (平均取得価格基準) をそれぞれ再現する
+        closed_value = signed_size * entry_price
+        self.cash += closed_value + signed_size * (exit_price - entry_price) * 1.0
+        self.cash -= abs(signed_size) * self.commission * exit_price
+        trade_price = (0.0 + signed_size * entry_price) / signed_size
+        pnl = signed_size * (exit_price - trade_price) * 1.0
+        commission = 0.0 + abs(signed_size) * self.commission * entry_price + abs(signed_size) * self.commission * exit_price
+        pnlcomm = pnl - commission
+        self.closed_pnlcomm.append(pnlcomm)
+
+        size = abs(signed_size)
+        tp_price = entry['tp_price']
+        self.trades.append({
+            '銘柄': self.symbol, '方向': 'BUY' if signed_size > 0 else 'SELL', '数量': size,
+            'エントリー価格': trade_price, 'エントリー日時': self._timestamp(entry['step']).isoformat(), 'エントリー根拠': entry['reason'],
+            '決済価格': trade_price + pnl / size, '決済日時': self._timestamp(exit_step).isoformat(),
+            '決済根拠': "Take Profit" if pnlcomm >= 0 else "Stop Loss",
+            '一株当たり損益': pnl / size, '損益': pnl, '損益(手数料込)': pnlcomm,
+            'ストップロス価格': entry['sl_price'], 'テイクプロフィット価格': tp_price, '許容損失幅': entry['risk_per_share'],
+            '目標利益幅': abs(tp_price - trade_price) if tp_price > 0 else 0.0})
+
+    def _record_open_at_end(self, entry):
+        """TradeList.stop() と同じく、未決済ポジションを最終バーの終値で記録する。"""
+        signed_size, entry_price = entry['size'], entry['price']
+        last_step = self.end_step - 1
+        exit_price = self._bar(last_step)[3]
+        pnl = (exit_price - entry_price) * signed_size
+        commission = (abs(signed_size) * entry_price * self.commission) + (abs(signed_size) * exit_price * self.commission)
+        self.trades.append({
+            '銘柄': self.symbol, '方向': 'BUY' if signed_size > 0 else 'SELL', '数量': abs(signed_size),
+            'エントリー価格': entry_price, 'エントリー日時': self._timestamp(entry['step']).isoformat(), 'エントリー根拠': entry['reason'],
+            '決済価格': exit_price, '決済日時': self._timestamp(last_step).isoformat(), '決済根拠': "End of Backtest",
+            '一株当たり損益': (exit_price - entry_price) * (1 if signed_size > 0 else -1), '損益': pnl, '損益(手数料込)': pnl - commission,
+            'ストップロス価格': self.sl_price, 'テイクプロフィット価格': self.tp_price, '許容損失幅': self.risk_per_share,
+            '目標利益幅': abs(self.tp_price - entry_price) if self.tp_price > 0 else 0.0})
+
+    def stats(self):
+        """run_backtest_for_symbol が返す統計 (TradeAnalyzer 相当) を生成する。"""
+        closed = self.closed_pnlcomm
+        won = [p for p in closed if p >= 0.0]
+        return {
+            'symbol': self.symbol,
+            'pnl_net': sum(closed, 0.0) if closed else 0,
+            'gross_won': sum(won, 0.0) if closed else 0,
+            'gross_lost': sum((p for p in closed if p < 0.0), 0.0) if closed else 0,
+            'total_trades': self.opened_count,
+            'win_trades': len(won)
+        }
+
+
+def load_feeds(symbol, base_filepath, strategy_params):
+    """バーストアから {時間足: Feed} を生成する。ファイルがない・空の場合はNone。"""
+    try:
+        files = find_feed_files(symbol, base_filepath, strategy_params)
+    except (KeyError, AttributeError) as e:
+        raise VectorizedUnsupportedError(f"時間足の設定を解釈できません: {e}") from e
+    if files is None:
+        logger.error(f"[{symbol}] のデータフィード準備に失敗。")
+        return None
+    feeds = {}
+    for tf, filepath in files.items():
+        bars = bar_store.load_bars(filepath)
+        if len(bars) == 0:
+            logger.warning(f"データファイルが空です: {filepath}")
+            logger.error(f"[{symbol}] のデータフィード準備に失敗。")
+            return None
+        feeds[tf] = Feed(bars)
+    return feeds
+
+
+def run_vectorized_backtest_for_symbol(symbol, base_filepath, strategy_params, indicator_cache=None, transmit_take_profit=False):
+    """
+    run_backtest_for_symbol と同じ戻り値 (stats, start_date, end_date, trade_list) を返す。
+    ベクトル化できない戦略定義・データの場合は VectorizedUnsupportedError を送出する。
+    """
+    logger.info(f"▼▼▼ ベクトル化バックテスト実行中: {symbol} ▼▼▼")
+    base_bars = bar_store.load_bars(base_filepath)
+    start_date, end_date = base_bars.start, base_bars.end
+    feeds = load_feeds(symbol, base_filepath, strategy_params)
+    if feeds is None:
+        return None, None, None, None
+
+    backtest = VectorizedBacktest(symbol, feeds, strategy_params, indicator_cache, transmit_take_profit)
+    trade_list = backtest.run()
+    return backtest.stats(), start_date, end_date, trade_list
\ No newline at end of file
@@ -0,0 +1,190 @@
+import math
+import collections
+import numpy as np
+import backtrader as bt
+
+from src.core.indicators import SafeStochastic, VWAP, SafeADX, SafeRSI
+
+# ==============================================================================
+# ベクトル化インジケーター
+# Backtraderのインジケーター (once モード) と同一の計算順序で配列全体を計算する。
+# 浮動小数点の丸めまで一致させるため、移動平均の窓合計は math.fsum、
+# 再帰的な平滑化は逐次ループで計算する。 (クロス判定が1ulpの差で反転しないようにする)
+# 各カーネルは (line0の配列, minperiod) を返す。minperiod 未満の要素は NaN。
+# ==============================================================================
+
+
+class VectorizedUnsupportedError(Exception):
+    """ベクトル化エンジンで再現できない戦略定義・データ。(呼び出し側は cerebro 経路にフォールバックする)"""
+
+
+class Feed:
+    """1時間足分の価格配列。"""
+    __slots__ = ('datetime', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, bars):
+        self.datetime = np.asarray(bars.datetime, dtype=np.int64)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            setattr(self, name, np.asarray(bars.column(name), dtype=np.float64))
+
+    def __len__(self):
+        return len(self.datetime)
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+def sma(src, period, src_minperiod=1):
+    """bt.indicators.SMA (Average.once) と同一。"""
+    src, out, mp = src.tolist(), _nan(len(src)), src_minperiod + period - 1
+    for i in range(mp - 1, len(src)):
+        out[i] = math.fsum(src[i - period + 1:i + 1]) / period
+    return out, mp
+
+def _smoothing(src, period, alpha, src_minperiod=1):
+    """bt.indicators.ExponentialSmoothing と同一。(シードは期間平均)"""
+    alpha1 = 1.0 - alpha
+    values, out, mp = src.tolist(), _nan(len(src)), src_minperiod + period - 1
+    if mp > len(values): return out, mp
+    prev = math.fsum(values[mp - period:mp]) / period
+    out[mp - 1] = prev
+    for i in range(mp, len(values)):
+        out[i] = prev = prev * alpha1 + values[i] * alpha
+    return out, mp
+
+def ema(src, period, src_minperiod=1):
+    return _smoothing(src, period, 2.0 / (1.0 + period), src_minperiod)
+
+def smma(src, period, src_minperiod=1):
+    return _smoothing(src, period, 1.0 / period, src_minperiod)
+
+def _prev(arr):
+    """arr(-1) に相当する配列。先頭要素は未定義 (NaN)。"""
+    out = np.empty_like(arr); out[0] = np.nan; out[1:] = arr[:-1]
+    return out
+
+
+def _kernel_sma(feed, period):
+    return sma(feed.close, period)
+
+def _kernel_ema(feed, period):
+    return ema(feed.close, period)
+
+def _kernel_bollinger(feed, period, devfactor):
+    # 比較に使われるのは line0 (mid) のみ
+    return sma(feed.close, period)
+
+def _kernel_macd(feed, period_me1, period_me2, period_signal):
+    me1, mp1 = ema(feed.close, period_me1)
+    me2, mp2 = ema(feed.close, period_me2)
+    return me1 - me2, max(mp1, mp2) + period_signal - 1
+
+def _kernel_atr(feed, period):
+    prev_close = _prev(feed.close)
+    tr = np.maximum(feed.high, prev_close) - np.minimum(feed.low, prev_close)
+    return smma(tr, period, src_minperiod=2)
+
+def _kernel_rsi(feed, period):
+    delta = feed.close - _prev(feed.close)
+    gain, loss = np.where(delta > 0, delta, 0.0), np.where(delta < 0, -delta, 0.0)
+    avg_gain, mp = ema(gain, period, src_minperiod=2)
+    avg_loss, _ = ema(loss, period, src_minperiod=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.where(avg_loss != 0, avg_gain / avg_loss, np.inf)
+        rsi = 100.0 - (100.0 / (1.0 + rs))
+    rsi[:mp - 1] = np.nan
+    return rsi, mp
+
+def _kernel_stochastic(feed, period, period_dfast, period_dslow):
+    high, low, close, n = feed.high.tolist(), feed.low.tolist(), feed.close, len(feed)
+    hh, ll = _nan(n), _nan(n)
+    for i in range(period - 1, n):
+        hh[i], ll[i] = max(high[i - period + 1:i + 1]), min(low[i - period + 1:i + 1])
+    price_range = hh - ll
+    safe_num = np.where(price_range > 1e-9, close - ll, 0.0)
+    safe_den = np.where(price_range > 1e-9, price_range, 1.0)
+    perc_k, mp_k = sma((100.0 * safe_num) / safe_den, period_dfast, src_minperiod=period)
+    return perc_k, mp_k + period_dslow - 1
+
+def _kernel_adx(feed, period):
+    """SafeADX.next() の逐次計算をそのまま再現する。(先頭バーの [-1] は配列末尾を参照する)"""
+    high, low, close = feed.high.tolist(), feed.low.tolist(), feed.close.tolist()
+    out = np.zeros(len(high))
+    tr = plus_dm = minus_dm = adx = 0.0
+    dx_history = collections.deque(maxlen=period)
+    smooth = lambda prev, cur: prev - (prev / period) + cur
+    for i in range(len(high)):
+        h, l, ph, pl, pc = high[i], low[i], high[i - 1], low[i - 1], close[i - 1]
+        tr = smooth(tr, max(h - l, abs(h - pc), abs(l - pc)))
+        move_up, move_down = h - ph, pl - l
+        plus_dm = smooth(plus_dm, move_up if move_up > move_down and move_up > 0 else 0.0)
+        minus_dm = smooth(minus_dm, move_down if move_down > move_up and move_down > 0 else 0.0)
+        if tr > 1e-9: plus_di, minus_di = 100.0 * plus_dm / tr, 100.0 * minus_dm / tr
+        else: plus_di, minus_di = 0.0, 0.0
+        di_sum = plus_di + minus_di
+        dx = 100.0 * abs(plus_di - minus_di) / di_sum if di_sum > 1e-9 else 0.0
+        dx_history.append(dx)
+        if i + 1 == period: adx = sum(dx_history) / period
+        elif i + 1 > period: adx = (adx * (period - 1) + dx) / period
+        out[i] = adx
+    return out, 1
+
+def _kernel_vwap(feed):
+    """VWAP.next() と同一。先頭バーは NaN で累積にも含めない。日付 (UTC) が変わると累積をリセットする。"""
+    tp = ((feed.high + feed.low) + feed.close) / 3.0
+    days = (feed.datetime // 86_400_000_000_000).tolist()
+    tp_list, volume = tp.tolist(), feed.volume.tolist()
+    out = _nan(len(tp_list))
+    cum_tpv = cum_vol = 0.0
+    for i in range(1, len(tp_list)):
+        if days[i] != days[i - 1]: cum_tpv = cum_vol = 0.0
+        cum_tpv += tp_list[i] * volume[i]
+        cum_vol += volume[i]
+        out[i] = cum_tpv / cum_vol if cum_vol > 0 else tp_list[i]
+    return out, 1
+
+
+# bt のインジケータークラス -> カーネル
+KERNELS = {
+    bt.indicators.SMA: _kernel_sma,
+    bt.indicators.EMA: _kernel_ema,
+    bt.indicators.BollingerBands: _kernel_bollinger,
+    bt.indicators.MACD: _kernel_macd,
+    bt.indicators.ATR: _kernel_atr,
+    SafeRSI: _kernel_rsi,
+    SafeStochastic: _kernel_stochastic,
+    SafeADX: _kernel_adx,
+    VWAP: _kernel_vwap,
+}
+
+def compute_indicator(ind_cls, feed, params):
+    """
+    インジケータークラスとパラメータから line0 の配列と minperiod を計算する。
+    移動平均の種類 (movav) の変更など、カーネルが再現できない指定は VectorizedUnsupportedError。
+    """
+    kernel = KERNELS.get(ind_cls)
+    if kernel is None:
+        raise VectorizedUnsupportedError(f"ベクトル化カーネルが未定義のインジケーター: {ind_cls.__name__}")
+    defaults = dict(ind_cls.params._getitems())
+    unknown = (set(params) - set(defaults)) | (set(params) & {'movav'})
+    if unknown:
+        raise VectorizedUnsupportedError(f"{ind_cls.__name__} の未対応パラメータ: {sorted(unknown)}")
+    defaults.pop('movav', None)
+    defaults.update(params)
+    return kernel(feed, **defaults)
+
+
+def crossover(values1, mp1, values2, mp2):
+    """bt.indicators.CrossOver と同一。(上抜け: 1.0, 下抜け: -1.0)"""
+    d0, d1 = values1.tolist(), values2.tolist()
+    n, start = len(d0), max(mp1, mp2)
+    out = _nan(n)
+    if start > n: return out, start + 1
+    prev = d0[start - 1] - d1[start - 1]   # NonZeroDifference のシード値
+    for i in range(start, n):
+        a, b = d0[i], d1[i]
+        up, down = prev < 0.0 and a > b, prev > 0.0 and a < b
+        out[i] = float(up) - float(down)
+        d = a - b
+        prev = d if d else prev
+    return out, start + 1
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+import json
+import logging
+import threading
+import numpy as np
+from src.core.data_cache import Bars, read_bars
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# バーストア
+# {symbol}_{tf}_{date}.csv を1ファイルにつき1回だけ読み込み (data_cache 経由)、
+# datetime / OHLCV を numpy 配列として保持する。
+# 評価エンジンでは親プロセスでパースした配列を .npy に書き出し、
+# ワーカープロセスはメモリマップで同じバッファを参照する。
+# ==============================================================================
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class BarStore:
+    """ファイルパスをキーにBarsを保持するストア。未登録のファイルは初回アクセス時に読み込む。"""
+    def __init__(self):
+        self._bars = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.abspath(filepath)
+
+    def __contains__(self, filepath):
+        return self._key(filepath) in self._bars
+
+    def __len__(self):
+        return len(self._bars)
+
+    def get(self, filepath):
+        key = self._key(filepath)
+        bars = self._bars.get(key)
+        if bars is not None: return bars
+        bars = read_bars(filepath)
+        with self._lock:
+            self.load_count += 1
+            return self._bars.setdefault(key, bars)
+
+    def preload(self, filepaths):
+        """指定ファイルを事前に読み込む。失敗したファイルはログを出してスキップする。"""
+        loaded = 0
+        for filepath in filepaths:
+            try:
+                self.get(filepath); loaded += 1
+            except Exception as e:
+                logger.warning(f"バーデータの事前読み込みに失敗: {filepath} - {e}")
+        return loaded
+
+    def clear(self):
+        with self._lock: self._bars.clear()
+
+    def export(self, directory):
+        """保持している全Barsを .npy として書き出し、attach() で読める形にする。"""
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        with self._lock: items = list(self._bars.items())
+        for i, (key, bars) in enumerate(items):
+            stem = f"{i:05d}"
+            np.save(os.path.join(directory, f"{stem}_dt.npy"), bars.datetime)
+            np.save(os.path.join(directory, f"{stem}_values.npy"), bars.values)
+            manifest[key] = {'stem': stem, 'columns': list(bars.columns), 'tz': bars.tz}
+        with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        return directory
+
+    @classmethod
+    def attach(cls, directory):
+        """export() で書き出したディレクトリをメモリマップで読み込んだストアを返す。"""
+        store = cls()
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for key, meta in manifest.items():
+            dt = np.load(os.path.join(directory, f"{meta['stem']}_dt.npy"), mmap_mode='r')
+            values = np.load(os.path.join(directory, f"{meta['stem']}_values.npy"), mmap_mode='r')
+            store._bars[key] = Bars(dt, values, meta['columns'], meta['tz'], key)
+        return store
+
+
+_default_store = BarStore()
+
+def get_store():
+    return _default_store
+
+def set_store(store):
+    """プロセス全体で使用するストアを差し替える。(ワーカープロセスの初期化で使用)"""
+    global _default_store
+    _default_store = store
+
+def load_bars(filepath):
+    return _default_store.get(filepath)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import io
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# データキャッシュ
+# data/ 配下の {symbol}_{tf}_{date}.csv に対し、パース済みのバイナリ (.npy) を
+# data/.cache/ に保持する。CSVが正 (人が読める一次データ) であり、
+# キャッシュは CSV のパス + 更新時刻 + サイズが一致する場合のみ使用する。
+# CSVを読み込む箇所はすべて read_bars / read_ohlcv を経由する。
+# ==============================================================================
+
+CACHE_DIR_NAME = '.cache'
+CACHE_VERSION = 1
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+
+
+class Bars:
+    """1ファイル分のバーデータ。datetimeはUTCのエポックナノ秒(int64)で保持する。"""
+    __slots__ = ('datetime', 'values', 'columns', 'tz', 'source')
+
+    def __init__(self, datetime, values, columns, tz=None, source=None):
+        self.datetime = datetime      # shape (n,) int64
+        self.values = values          # shape (len(columns), n) float64
+        self.columns = tuple(columns)
+        self.tz = tz
+        self.source = source
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def column(self, name):
+        return self.values[self.columns.index(name)]
+
+    def index(self):
+        idx = pd.DatetimeIndex(self.datetime.view('datetime64[ns]'), name='datetime')
+        return idx.tz_localize('UTC').tz_convert(self.tz) if self.tz else idx
+
+    @property
+    def start(self):
+        return self.index()[0] if len(self) else None
+
+    @property
+    def end(self):
+        return self.index()[-1] if len(self) else None
+
+    def to_dataframe(self):
+        """バックテスト用のDataFrame (小文字カラム, datetimeインデックス) を生成する。"""
+        return pd.DataFrame({name: self.values[i] for i, name in enumerate(self.columns)}, index=self.index())
+
+    @classmethod
+    def from_dataframe(cls, df, source=None):
+        if df.empty: df = df.set_axis(pd.DatetimeIndex([], name='datetime'))
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise ValueError(f"datetimeインデックスを解釈できません: {source}")
+        df = df.rename(columns=str.lower)
+        columns = [c for c in PRICE_COLUMNS if c in df.columns]
+        tz = str(df.index.tz) if df.index.tz is not None else None
+        index = df.index.tz_convert('UTC').tz_localize(None) if tz else df.index
+        dt = np.ascontiguousarray(index.as_unit('ns').asi8, dtype=np.int64)
+        values = np.empty((len(columns), len(df)), dtype=np.float64)
+        for i, name in enumerate(columns):
+            values[i] = df[name].to_numpy(dtype=np.float64)
+        return cls(dt, values, columns, tz, source)
+
+
+def parse_csv(filepath):
+    """CSVをパースしてBarsを返す。(キャッシュを使用しない)"""
+    df = pd.read_csv(filepath, index_col='datetime', parse_dates=True, encoding='utf-8-sig')
+    return Bars.from_dataframe(df, source=filepath)
+
+
+def _twin_paths(filepath):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIR_NAME)
+    stem = os.path.join(cache_dir, os.path.splitext(os.path.basename(filepath))[0])
+    return cache_dir, f"{stem}.json", f"{stem}_dt.npy", f"{stem}_values.npy"
+
+def _fingerprint(filepath):
+    st = os.stat(filepath)
+    return {'version': CACHE_VERSION, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+def _load_twin(filepath, fingerprint, mmap):
+    _, meta_path, dt_path, values_path = _twin_paths(filepath)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f: meta = json.load(f)
+        if meta.get('fingerprint') != fingerprint: return None
+        mode = 'r' if mmap else None
+        dt, values = np.load(dt_path, mmap_mode=mode), np.load(values_path, mmap_mode=mode)
+        if dt.shape != (meta['rows'],) or values.shape != (len(meta['columns']), meta['rows']): return None
+        return Bars(dt, values, meta['columns'], meta['tz'], filepath)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _atomic_save(path, writer):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f: writer(f)
+    os.replace(tmp_path, path)
+
+def _store_twin(filepath, fingerprint, bars):
+    cache_dir, meta_path, dt_path, values_path = _twin_paths(filepath)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _atomic_save(dt_path, lambda f: np.save(f, bars.datetime))
+        _atomic_save(values_path, lambda f: np.save(f, bars.values))
+        meta = {'fingerprint': fingerprint, 'rows': len(bars), 'columns': list(bars.columns), 'tz': bars.tz}
+        _atomic_save(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    except OSError as e:
+        # 読み取り専用ディレクトリ・他プロセスが使用中などの場合はキャッシュせずに続行する
+        logger.debug(f"キャッシュの書き込みをスキップ: {filepath} - {e}")
+
+
+def read_bars(filepath, mmap=True):
+    """
+    CSVに対応するBarsを返す。キャッシュが有効ならバイナリから読み込み、
+    無効 (未作成・CSV更新済み) ならCSVをパースしてキャッシュを作り直す。
+    mmap=True の場合、配列はメモリマップ (読み取り専用) となる。
+    """
+    fingerprint = _fingerprint(filepath)
+    bars = _load_twin(filepath, fingerprint, mmap)
+    if bars is not None: return bars
+    bars = parse_csv(filepath)
+    _store_twin(filepath, fingerprint, bars)
+    return bars
+
+def read_ohlcv(filepath, tz_naive=False):
+    """
+    CSVに対応するOHLCVのDataFrame (小文字カラム, datetimeインデックス) を返す。
+    tz_naive=True の場合、タイムゾーン付きインデックスは現地時刻のままタイムゾーン情報を除去する。
+    """
+    df = read_bars(filepath, mmap=False).to_dataframe()
+    if tz_naive and df.index.tz is not None: df.index = df.index.tz_localize(None)
+    return df
+
+def append_rows(filepath, df):
+    """
+    既存のCSVの末尾に df (datetimeインデックス) の行を追記する。列はCSVのヘッダーに合わせる。
+    追記前のキャッシュが有効だった場合は、追記した行だけをパースして連結したキャッシュに更新する
+    (CSV全体をパースし直した場合と同じ内容になる)。df の日時はCSVの最終行より後であること。
+    """
+    with open(filepath, 'r', encoding='utf-8-sig') as f: header = f.readline().rstrip('\r\n').split(',')
+    with open(filepath, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size: f.seek(-1, os.SEEK_END)
+        needs_newline = bool(size) and f.read(1) not in (b'\n', b'\r')
+    index_name, columns = header[0], header[1:]
+    rows = df.reindex(columns=columns).to_csv(header=False)
+    fingerprint = _fingerprint(filepath)
+    bars = _load_twin(filepath, fingerprint, mmap=False)
+    with open(filepath, 'a', encoding='utf-8', newline='') as f: f.write(('\n' if needs_newline else '') + rows)
+    if bars is None: return
+    added = pd.read_csv(io.StringIO(','.join(header) + '\n' + rows), index_col=index_name, parse_dates=True)
+    added = Bars.from_dataframe(added, source=filepath)
+    if added.columns != bars.columns or added.tz != bars.tz:
+        invalidate(filepath)
+        return
+    merged = Bars(np.concatenate([bars.datetime, added.datetime]), np.concatenate([bars.values, added.values], axis=1), bars.columns, bars.tz, filepath)
+    _store_twin(filepath, _fingerprint(filepath), merged)
+
+def copy_csv(src, dst):
+    """CSVをコピーする。コピー元のキャッシュが有効なら、コピー先のキャッシュとして複製する。"""
+    bars = _load_twin(src, _fingerprint(src), mmap=True)
+    shutil.copyfile(src, dst)
+    if bars is not None: _store_twin(dst, _fingerprint(dst), bars)
+
+def invalidate(filepath):
+    """CSVに対応するキャッシュを削除する。"""
+    for path in _twin_paths(filepath)[1:]:
+        try: os.remove(path)
+        except FileNotFoundError: pass
\ No newline at end of file
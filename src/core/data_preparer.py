@@ -1,19 +1,20 @@
 import os
 import glob
 import logging
-import pandas as pd
 import backtrader as bt
+from src.core import bar_store
 
 logger = logging.getLogger(__name__)
 
 def _load_csv_data(filepath, timeframe_str, compression):
     try:
-        df = pd.read_csv(filepath, index_col='datetime', parse_dates=True, encoding='utf-8-sig')
-        if df.empty:
+        # ▼▼▼【変更箇所】CSVの直接パースをやめ、バーストアのパース済みデータを使用 ▼▼▼
+        bars = bar_store.load_bars(filepath)
+        if len(bars) == 0:
             logger.warning(f"データファイルが空です: {filepath}")
             return None
-        df.columns = [x.lower() for x in df.columns]
-        return bt.feeds.PandasData(dataname=df, timeframe=bt.TimeFrame.TFrame(timeframe_str), compression=compression)
+        return bt.feeds.PandasData(dataname=bars.to_dataframe(), timeframe=bt.TimeFrame.TFrame(timeframe_str), compression=compression)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
     except Exception as e:
         logger.error(f"CSV読み込みまたはデータフィード作成で失敗: {filepath} - {e}")
         return None
@@ -1,5 +1,7 @@
+import array
 import backtrader as bt
 import collections
+import numpy as np
 
 # ▼▼▼【変更箇所: SafeStochasticを完全に新しい堅牢な実装に置換】▼▼▼
 class SafeStochastic(bt.Indicator):
@@ -43,6 +45,25 @@ class SafeStochastic(bt.Indicator):
         self.lines.percK = self.p.movav(percK_raw, period=self.p.period_dfast)
         self.lines.percD = self.p.movav(self.lines.percK, period=self.p.period_dslow)
 
+# ▼▼▼【変更箇所: once() を追加し、runonce モードでも配列全体で計算する】▼▼▼
+# Backtrader は next() だけを持つインジケーターを runonce モードでも once_via_next で1バーずつ処理する。
+# once() を定義すると、Cerebro の once モードでは配列の範囲 [start, end) をまとめて計算できる。
+# (next() はライブ取引 (runonce=False) 用に残す。両者の出力は同一)
+# next モードでは、データ (上位足) が進んでいないバーでも next() が呼ばれる。Python 側に状態を持つため、
+# データが進んだバーだけを処理する。(once モード・ベクトル化エンジンと同じく、自分の時間足の1本につき1回)
+# 計算結果を next() と1ビットも違わないようにするため、要素ごとの演算は numpy で行い、
+# 前の値に依存する平滑化・累積は同じ順序の演算で計算する。
+
+def _line_array(line):
+    """ラインのバッファを float64 の配列としてコピーする。"""
+    return np.array(line.array, dtype=np.float64)
+
+
+def _write_line(line, start, values):
+    """values をラインのバッファの start 以降に書き込む。"""
+    line.array[start:start + len(values)] = array.array('d', np.asarray(values, dtype=np.float64).tobytes())
+
+
 class VWAP(bt.Indicator):
     lines = ('vwap',)
     plotinfo = dict(subplot=False)
@@ -51,8 +72,13 @@ class VWAP(bt.Indicator):
         self.tp = (self.data.high + self.data.low + self.data.close) / 3.0
         self.cumulative_tpv = 0.0
         self.cumulative_volume = 0.0
+        self._last_len = 0
 
     def next(self):
+        # next モードでは上位足のデータが進んでいないバーでも next() が呼ばれるため、同じバーを二重に累積しない
+        if len(self) == self._last_len:
+            return
+        self._last_len = len(self)
         if len(self) == 1:
             return
         if self.data.datetime.date(0) != self.data.datetime.date(-1):
@@ -67,6 +93,39 @@ class VWAP(bt.Indicator):
         else:
             self.lines.vwap[0] = self.tp[0]
 
+    def _day_keys(self):
+        """各バーの日付を比較用のキーにする。(タイムゾーン指定がなければ日付番号の整数部 = 日付)"""
+        dt_line = self.data.datetime
+        if dt_line._tz is None:
+            return _line_array(dt_line).astype(np.int64)
+        return np.array([dt_line.date(i - dt_line.idx).toordinal() for i in range(len(dt_line.array))])
+
+    def once(self, start, end):
+        lo = max(start, 1)  # next() と同じく先頭バーは計算しない
+        if lo >= end:
+            return
+        tp = _line_array(self.tp)[lo:end]
+        volume = _line_array(self.data.volume)[lo:end]
+        days = self._day_keys()
+        tpv = tp * volume
+
+        # 日付が変わるバーで累積をリセットする。区間内の累積は np.cumsum (先頭から順に加算) で計算する
+        cuts = np.flatnonzero(days[lo:end] != days[lo - 1:end - 1]).tolist()
+        out = np.empty(end - lo)
+        cum_tpv, cum_volume = self.cumulative_tpv, self.cumulative_volume
+        for k, (a, b) in enumerate(zip([0] + cuts, cuts + [end - lo])):
+            if k > 0:
+                cum_tpv = cum_volume = 0.0
+            if a == b:
+                continue
+            seg_tpv = np.cumsum(np.r_[cum_tpv, tpv[a:b]])[1:]
+            seg_volume = np.cumsum(np.r_[cum_volume, volume[a:b]])[1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[a:b] = np.where(seg_volume > 0, seg_tpv / seg_volume, tp[a:b])
+            cum_tpv, cum_volume = seg_tpv[-1], seg_volume[-1]
+        self.cumulative_tpv, self.cumulative_volume = float(cum_tpv), float(cum_volume)
+        _write_line(self.lines.vwap, lo, out)
+
 class SafeADX(bt.Indicator):
     lines = ('adx', 'plusDI', 'minusDI',)
     params = (('period', 14),)
@@ -81,11 +140,16 @@ class SafeADX(bt.Indicator):
         self.minus_di = 0.0
         self.adx = 0.0
         self.dx_history = collections.deque(maxlen=self.p.period)
+        self._last_len = 0
 
     def _wilder_smooth(self, prev_val, current_val):
         return prev_val - (prev_val / self.p.period) + current_val
 
     def next(self):
+        # データが進んでいないバー (上位足の途中) では平滑化を重ねない
+        if len(self) == self._last_len:
+            return
+        self._last_len = len(self)
         high, low, close = self.data.high[0], self.data.low[0], self.data.close[0]
         prev_high, prev_low, prev_close = self.data.high[-1], self.data.low[-1], self.data.close[-1]
 
@@ -118,6 +182,60 @@ class SafeADX(bt.Indicator):
                 self.adx = (self.adx * (self.p.period - 1) + dx) / self.p.period
         self.lines.adx[0] = self.adx
 
+    def _wilder_series(self, prev_val, values):
+        """_wilder_smooth を values に順に適用した系列。"""
+        out, period = [], self.p.period
+        for current_val in values:
+            prev_val = prev_val - (prev_val / period) + current_val
+            out.append(prev_val)
+        return out
+
+    def once(self, start, end):
+        if start >= end:
+            return
+        period = self.p.period
+        high, low, close = (_line_array(line) for line in (self.data.high, self.data.low, self.data.close))
+        idx = np.arange(start, end)
+        h, l = high[idx], low[idx]
+        # next() と同じく [-1] は直前のバー (先頭バーではバッファ末尾) を参照する
+        prev_high, prev_low, prev_close = high[idx - 1], low[idx - 1], close[idx - 1]
+
+        # max(a, b, c) と同じ比較順序 (NaN の扱いも含めて一致させる)
+        current_tr = h - l
+        for candidate in (np.abs(h - prev_close), np.abs(l - prev_close)):
+            current_tr = np.where(candidate > current_tr, candidate, current_tr)
+        move_up, move_down = h - prev_high, prev_low - l
+        current_plus_dm = np.where((move_up > move_down) & (move_up > 0), move_up, 0.0)
+        current_minus_dm = np.where((move_down > move_up) & (move_down > 0), move_down, 0.0)
+
+        tr = np.array(self._wilder_series(self.tr, current_tr.tolist()))
+        plus_dm = np.array(self._wilder_series(self.plus_dm, current_plus_dm.tolist()))
+        minus_dm = np.array(self._wilder_series(self.minus_dm, current_minus_dm.tolist()))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plus_di = np.where(tr > 1e-9, 100.0 * plus_dm / tr, 0.0)
+            minus_di = np.where(tr > 1e-9, 100.0 * minus_dm / tr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum > 1e-9, 100.0 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+
+        # ADX: period 本目で DX の単純平均、以降は Wilder の平滑化
+        dx_list = dx.tolist()
+        history = list(self.dx_history) + dx_list
+        offset, adx, adx_out = len(self.dx_history), self.adx, []
+        for k, bar in enumerate(range(start + 1, end + 1)):  # bar は len(self) に相当
+            if bar == period:
+                adx = sum(history[offset + k - period + 1:offset + k + 1]) / period
+            elif bar > period:
+                adx = (adx * (period - 1) + dx_list[k]) / period
+            adx_out.append(adx)
+
+        self.tr, self.plus_dm, self.minus_dm = float(tr[-1]), float(plus_dm[-1]), float(minus_dm[-1])
+        self.plus_di, self.minus_di, self.adx = float(plus_di[-1]), float(minus_di[-1]), adx
+        self.dx_history.extend(dx_list)
+        _write_line(self.lines.plusDI, start, plus_di)
+        _write_line(self.lines.minusDI, start, minus_di)
+        _write_line(self.lines.adx, start, adx_out)
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 # ▼▼▼【変更箇所: SafeRSIを新規追加】▼▼▼
 class SafeRSI(bt.Indicator):
     """
@@ -26,8 +26,10 @@ class BaseStrategy(bt.Strategy):
         self.data_feeds = {
             'short': self.datas[0], 'medium': self.datas[1], 'long': self.datas[2]
         }
-        self.indicators = self.initializer.create_indicators(self.data_feeds)
-        self.entry_signal_generator = EntrySignalGenerator(self.indicators, self.data_feeds)
+        # ▼▼▼【変更箇所: インジケーターの生成を派生クラスで差し替え可能に】▼▼▼
+        self.indicators = self._create_indicators()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        self.entry_signal_generator = EntrySignalGenerator(self.indicators, self.data_feeds, p)
 
         # --- [リファクタリング] モード別コンポーネントのセットアップを抽象メソッドに委譲 ---
         self._setup_components(p, components)
@@ -37,6 +39,10 @@ class BaseStrategy(bt.Strategy):
         self.exit_orders = []
         self.live_trading_started = False
 
+    def _create_indicators(self):
+        """インジケーター群 ({キー: インジケーター}) を生成する。既定は Backtrader のインジケーター。"""
+        return self.initializer.create_indicators(self.data_feeds)
+
     def _setup_components(self, params, components):
         """[抽象メソッド] 派生クラスがモード専用コンポーネントを初期化するために実装する"""
         raise NotImplementedError("This method must be implemented by a subclass")
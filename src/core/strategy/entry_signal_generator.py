@@ -1,98 +1,122 @@
+import operator
+from .strategy_initializer import StrategyInitializer
+
+
+def _first_line(obj):
+    """インジケーターの先頭ライン。(Backtraderのインジケーターは lines[0]、ライン・配列ビューはそのまま)"""
+    lines = getattr(obj, 'lines', None)
+    return lines[0] if lines is not None else obj
+
+
+def _never():
+    return False
+
+
+_NEVER = (_never, None)
+_COMPARE_OPS = {'>': operator.gt, '<': operator.lt}
+
+
 class EntrySignalGenerator:
     """
     責務：価格やインジケーターの情報に基づき、新規エントリーのシグナル（買い/売り）を生成する。
     このクラスは状態を持たない（stateless）。
+
+    [高速化] エントリー条件は最初の評価時 (strategy_params を渡した場合は初期化時) に
+    (判定関数, 根拠関数) のリストにコンパイルする。判定関数はラインの参照と閾値を保持し、
+    バーごとのキー生成・辞書検索・分岐を行わない。根拠の文字列は AND 条件がすべて成立した時だけ生成する。
+    strategy_params の内容は実行中に変わらない前提とし、別の辞書が渡された場合のみコンパイルし直す。
     """
-    def __init__(self, indicators, data_feeds):
+    def __init__(self, indicators, data_feeds, strategy_params=None):
         self.indicators = indicators
         self.data_feeds = data_feeds
+        self._compiled_params = None
+        self._compiled = []
+        if strategy_params is not None:
+            self.compile(strategy_params)
+
+    def compile(self, strategy_params):
+        """ロング/ショートの条件を [(trade_type, [(判定関数, 根拠関数), ...])] に変換して保持する。"""
+        trading_mode = strategy_params.get('trading_mode', {})
+        key_builder = StrategyInitializer({}) # キー生成のヘルパーとしてのみ使用
+        compiled = []
+        for trade_type in ('long', 'short'):
+            if not trading_mode.get(f"{trade_type}_enabled", True): continue
+            conditions = strategy_params.get('entry_conditions', {}).get(trade_type, [])
+            if not conditions: continue
+            compiled.append((trade_type, [self._compile_condition(c, key_builder) for c in conditions]))
+        self._compiled_params, self._compiled = strategy_params, compiled
 
     def check_entry_signal(self, strategy_params):
         """ロングとショート、両方のエントリー条件をチェックし、シグナルを返す"""
-        trading_mode = strategy_params.get('trading_mode', {})
-        
-        if trading_mode.get('long_enabled', True):
-            is_met, reason = self._check_all_conditions('long', strategy_params)
-            if is_met:
-                return 'long', reason
-
-        if trading_mode.get('short_enabled', True):
-            is_met, reason = self._check_all_conditions('short', strategy_params)
-            if is_met:
-                return 'short', reason
-        
+        if strategy_params is not self._compiled_params:
+            self.compile(strategy_params)
+        for trade_type, conditions in self._compiled:
+            for is_met, _ in conditions:
+                if not is_met(): break
+            else:
+                return trade_type, " / ".join(reason() for _, reason in conditions)
         return None, None
 
-    def _check_all_conditions(self, trade_type, strategy_params):
-        """指定されたタイプの全エントリー条件が満たされているか評価する"""
-        conditions = strategy_params.get('entry_conditions', {}).get(trade_type, [])
-        if not conditions:
-            return False, ""
-
-        reason_details = []
-        all_conditions_met = True
-        for c in conditions:
-            is_met, reason_str = self._evaluate_condition(c)
-            if not is_met:
-                all_conditions_met = False
-                break
-            reason_details.append(reason_str)
-
-        return (all_conditions_met, " / ".join(reason_details)) if all_conditions_met else (False, "")
-
-    def _evaluate_condition(self, cond):
-        """単一の条件式を評価する"""
+    # --- コンパイル ---------------------------------------------------------------
+
+    def _compile_condition(self, cond, key_builder):
+        """単一の条件式を (判定関数, 根拠関数) に変換する。参照先のインジケーターがない条件は常に不成立。"""
         tf, cond_type = cond['timeframe'], cond.get('type')
         data_feed = self.data_feeds[tf]
-        if len(data_feed) == 0:
-            return False, ""
 
-        # クロスオーバー/クロスアンダー条件の評価
+        # クロスオーバー/クロスアンダー条件
         if cond_type in ['crossover', 'crossunder']:
-            from .strategy_initializer import StrategyInitializer
-            si = StrategyInitializer({}) # ヘルパーメソッドのためだけにインスタンス化
-            k1 = si._get_indicator_key(tf, **cond['indicator1'])
-            k2 = si._get_indicator_key(tf, **cond['indicator2'])
+            k1 = key_builder._get_indicator_key(tf, **cond['indicator1'])
+            k2 = key_builder._get_indicator_key(tf, **cond['indicator2'])
             cross_indicator = self.indicators.get(f"cross_{k1}_vs_{k2}")
-            
-            if cross_indicator is None or len(cross_indicator) == 0: return False, ""
+            if cross_indicator is None: return _NEVER
+            cross = _first_line(cross_indicator)
+
+            if cond_type == 'crossover':
+                def is_met(): return len(data_feed) != 0 and len(cross) != 0 and cross[0] > 0
+            else:
+                def is_met(): return len(data_feed) != 0 and len(cross) != 0 and cross[0] < 0
 
-            is_met = (cross_indicator[0] > 0 and cond_type == 'crossover') or \
-                     (cross_indicator[0] < 0 and cond_type == 'crossunder')
-            
             p1 = ",".join(map(str, cond['indicator1'].get('params', {}).values()))
             p2 = ",".join(map(str, cond['indicator2'].get('params', {}).values()))
-            reason = f"{tf[0].upper()}: {cond_type}({cond['indicator1']['name']}({p1}),{cond['indicator2']['name']}({p2})) [{is_met}]"
-            return is_met, reason
+            reason_str = f"{tf[0].upper()}: {cond_type}({cond['indicator1']['name']}({p1}),{cond['indicator2']['name']}({p2})) [True]"
+            return is_met, lambda: reason_str
 
-        # 通常の比較条件の評価
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer({}) # ヘルパーメソッドのためだけにインスタンス化
-        ind = self.indicators.get(si._get_indicator_key(tf, **cond['indicator']))
-        if ind is None or len(ind) == 0: return False, ""
+        # 通常の比較条件
+        ind = self.indicators.get(key_builder._get_indicator_key(tf, **cond['indicator']))
+        if ind is None: return _NEVER
+        line = _first_line(ind)
+        compare, target = cond['compare'], cond['target']
+        target_type = target.get('type')
+        params_str = ",".join(map(str, cond['indicator'].get('params', {}).values()))
+        prefix = f"{tf[0].upper()}: {cond['indicator']['name']}({params_str})"
 
-        val, compare, target = ind[0], cond['compare'], cond['target']
-        target_type, target_val, target_val_str = target.get('type'), None, ""
+        if target_type == 'values':
+            target_val = target['value']
+            if target_val is None: return _NEVER
+            if compare == 'between':
+                low, high = target_val[0], target_val[1]
+                def is_met(): return len(data_feed) != 0 and len(line) != 0 and low < line[0] < high
+                target_val_str = f"[{low},{high}]"
+            elif compare in _COMPARE_OPS:
+                threshold, op = (target_val[0] if isinstance(target_val, list) else target_val), _COMPARE_OPS[compare]
+                def is_met(): return len(data_feed) != 0 and len(line) != 0 and op(line[0], threshold)
+                target_val_str = f"[{target_val}]"
+            else:
+                return _NEVER
+            return is_met, lambda: f"{prefix} [{line[0]:.2f}] {compare} {target_val_str}"
 
+        # 'between' は値のリストとの比較のみ
+        if compare not in _COMPARE_OPS: return _NEVER
+        op = _COMPARE_OPS[compare]
         if target_type == 'data':
-            target_val = getattr(data_feed, target['value'])[0]
-            target_val_str = f"{target['value']} [{target_val:.2f}]"
+            target_line, target_name = getattr(data_feed, target['value']), target['value']
+            def is_met(): return len(data_feed) != 0 and len(line) != 0 and op(line[0], target_line[0])
         elif target_type == 'indicator':
-            target_ind = self.indicators.get(si._get_indicator_key(tf, **target['indicator']))
-            if target_ind is None or len(target_ind) == 0: return False, ""
-            target_val = target_ind[0]
-            target_val_str = f"{target['indicator']['name']}(...) [{target_val:.2f}]"
-        elif target_type == 'values':
-            target_val = target['value']
-            target_val_str = f"[{target_val[0]},{target_val[1]}]" if compare == 'between' else f"[{target_val}]"
-
-        if target_val is None: return False, ""
-
-        is_met = False
-        if compare == '>': is_met = val > (target_val[0] if isinstance(target_val, list) else target_val)
-        elif compare == '<': is_met = val < (target_val[0] if isinstance(target_val, list) else target_val)
-        elif compare == 'between': is_met = target_val[0] < val < target_val[1]
-        
-        params_str = ",".join(map(str, cond['indicator'].get('params', {}).values()))
-        reason = f"{tf[0].upper()}: {cond['indicator']['name']}({params_str}) [{val:.2f}] {compare} {target_val_str}"
-        return is_met, reason
\ No newline at end of file
+            target_ind = self.indicators.get(key_builder._get_indicator_key(tf, **target['indicator']))
+            if target_ind is None: return _NEVER
+            target_line, target_name = _first_line(target_ind), f"{target['indicator']['name']}(...)"
+            def is_met(): return len(data_feed) != 0 and len(line) != 0 and len(target_line) != 0 and op(line[0], target_line[0])
+        else:
+            return _NEVER
+        return is_met, lambda: f"{prefix} [{line[0]:.2f}] {compare} {target_name} [{target_line[0]:.2f}]"
\ No newline at end of file
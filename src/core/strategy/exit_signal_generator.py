@@ -1,3 +1,82 @@
+import logging
+from .strategy_initializer import StrategyInitializer
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 決済条件の仕様 (ExitSpec)
+# exit_conditions の take_profit / stop_loss は戦略の初期化時に1回だけ解決し、
+# インジケーターのラインと倍率を保持する小さなオブジェクトにする。
+# 決済価格の計算はバーごとの辞書解析・キー生成を行わず、数回の浮動小数点演算で済む。
+#
+# 新しい決済タイプ (固定%、シャンデリア、時間決済など) は、is_ready() / distance() を持つ
+# 仕様クラスと、それを生成する関数を register_exit_type で登録して追加する。
+#   @register_exit_type('fixed_percent')
+#   def _build_percent_spec(exit_type, cond, indicators, default_multiplier): ...
+# ==============================================================================
+
+# 倍率の既定値 (exit_conditions に multiplier がない場合)
+DEFAULT_MULTIPLIERS = {'stop_loss': 2.0, 'take_profit': 5.0}
+
+EXIT_SPEC_BUILDERS = {}
+
+
+def register_exit_type(*type_names):
+    """決済タイプ名に仕様の生成関数 (exit_type, cond, indicators, default_multiplier) -> spec を登録する。"""
+    def decorator(builder):
+        for type_name in type_names:
+            EXIT_SPEC_BUILDERS[type_name] = builder
+        return builder
+    return decorator
+
+
+class AtrExitSpec:
+    """ATR x 倍率 を値幅とする決済条件。(atr_multiple / atr_stoptrail)"""
+    __slots__ = ('exit_type', 'atr', 'multiplier')
+
+    def __init__(self, exit_type, atr, multiplier):
+        self.exit_type = exit_type
+        self.atr = atr
+        self.multiplier = multiplier
+
+    def is_ready(self):
+        return len(self.atr) > 0
+
+    def distance(self):
+        """現在バーでのエントリー価格からの値幅。ATRが0の場合はNone。"""
+        atr_val = self.atr[0]
+        return atr_val * self.multiplier if atr_val > 1e-9 else None
+
+
+@register_exit_type('atr_multiple', 'atr_stoptrail')
+def _build_atr_spec(exit_type, cond, indicators, default_multiplier):
+    params = cond.get('params', {})
+    atr_params = {k: v for k, v in params.items() if k != 'multiplier'}
+    atr_key = StrategyInitializer({})._get_indicator_key(cond.get('timeframe'), 'atr', atr_params)
+    atr_indicator = indicators.get(atr_key)
+    if atr_indicator is None:
+        logger.warning(f"{exit_type} のATRインジケーターが見つかりません: {atr_key}")
+        return None
+    atr = atr_indicator.lines[0] if hasattr(atr_indicator, 'lines') else atr_indicator
+    return AtrExitSpec(exit_type, atr, params.get('multiplier', default_multiplier))
+
+
+def resolve_exit_specs(strategy_params, indicators):
+    """{'stop_loss': spec or None, 'take_profit': spec or None} を返す。"""
+    exit_conditions = strategy_params.get('exit_conditions') or {}
+    specs = {}
+    for exit_type, default_multiplier in DEFAULT_MULTIPLIERS.items():
+        cond, spec = exit_conditions.get(exit_type) or {}, None
+        if cond:
+            builder = EXIT_SPEC_BUILDERS.get(cond.get('type'))
+            if builder is None:
+                logger.warning(f"未対応の決済タイプのため {exit_type} を無視します: {cond.get('type')}")
+            else:
+                spec = builder(exit_type, cond, indicators, default_multiplier)
+        specs[exit_type] = spec
+    return specs
+
+
 class BaseExitSignalGenerator:
     """
     [リファクタリング]
@@ -11,37 +90,24 @@ class BaseExitSignalGenerator:
         self.tp_price = 0.0
         self.sl_price = 0.0
         self.risk_per_share = 0.0
+        # ▼▼▼【変更箇所: 決済条件を初期化時に解決】▼▼▼
+        specs = resolve_exit_specs(strategy.p.strategy_params, self.indicators)
+        self.sl_spec, self.tp_spec = specs['stop_loss'], specs['take_profit']
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def are_indicators_ready(self):
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer(self.strategy.p.strategy_params)
-        sl_cond = self.strategy.p.strategy_params.get('exit_conditions', {}).get('stop_loss', {})
-        if not sl_cond: return False
-        atr_params = {k: v for k, v in sl_cond.get('params', {}).items() if k != 'multiplier'}
-        atr_key = si._get_indicator_key(sl_cond.get('timeframe'), 'atr', atr_params)
-        atr_indicator = self.indicators.get(atr_key)
-        return atr_indicator and len(atr_indicator) > 0
+        return self.sl_spec is not None and self.sl_spec.is_ready()
 
     def calculate_and_set_exit_prices(self, entry_price, is_long):
-        from .strategy_initializer import StrategyInitializer
-        si = StrategyInitializer(self.strategy.p.strategy_params)
-        p = self.strategy.p.strategy_params
-        exit_conditions = p.get('exit_conditions', {})
-        sl_cond = exit_conditions.get('stop_loss', {})
-        tp_cond = exit_conditions.get('take_profit', {})
-        if sl_cond:
-            atr_params = {k: v for k, v in sl_cond.get('params', {}).items() if k != 'multiplier'}
-            atr_key = si._get_indicator_key(sl_cond.get('timeframe'), 'atr', atr_params)
-            atr_val = self.indicators[atr_key][0]
-            if atr_val > 1e-9:
-                self.risk_per_share = atr_val * sl_cond.get('params', {}).get('multiplier', 2.0)
-                self.sl_price = entry_price - self.risk_per_share if is_long else entry_price + self.risk_per_share
-        if tp_cond:
-            atr_params = {k: v for k, v in tp_cond.get('params', {}).items() if k != 'multiplier'}
-            atr_key = si._get_indicator_key(tp_cond.get('timeframe'), 'atr', atr_params)
-            atr_val = self.indicators[atr_key][0]
-            if atr_val > 1e-9:
-                self.tp_price = entry_price + atr_val * tp_cond.get('params', {}).get('multiplier', 5.0) if is_long else entry_price - atr_val * tp_cond.get('params', {}).get('multiplier', 5.0)
+        if self.sl_spec is not None:
+            distance = self.sl_spec.distance()
+            if distance is not None:
+                self.risk_per_share = distance
+                self.sl_price = entry_price - distance if is_long else entry_price + distance
+        if self.tp_spec is not None:
+            distance = self.tp_spec.distance()
+            if distance is not None:
+                self.tp_price = entry_price + distance if is_long else entry_price - distance
 
     def check_exit_conditions(self):
         """[抽象メソッド] 決済条件を監視する方法"""
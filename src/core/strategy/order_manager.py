@@ -81,6 +81,15 @@ class BaseOrderManager:
                 if f_value < 0: f_value = 0.0 # マイナスf値は0に丸める
                 self.strategy.logger.log(f"ケリー基準 (生): 統計 'Kelly_Raw'={self.statistics.get('Kelly_Raw')} -> f={f_value:.4f}")
 
+            # ▼▼▼【変更箇所】▼▼▼
+            elif f_source == 'monte_carlo':
+                # モンテカルロで求めたf値の信頼下限。取引数が少ない銘柄は 'N/A' (NaN) になるため f=0 とする
+                try: f_value = float(self.statistics.get('Kelly_MC', 0.0))
+                except (ValueError, TypeError): f_value = 0.0
+                if not f_value > 0: f_value = 0.0 # マイナス・NaNは0に丸める
+                self.strategy.logger.log(f"ケリー基準 (モンテカルロ): 統計 'Kelly_MC'={self.statistics.get('Kelly_MC')} -> f={f_value:.4f}")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             else:
                 self.strategy.logger.log(f"警告: 不明なケリー方式 '{f_source}'。f=0でスキップします。")
                 f_value = 0.0
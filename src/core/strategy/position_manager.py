@@ -30,6 +30,35 @@ class PositionManager:
         )
         self.is_restoring = False
 
+    # ▼▼▼【変更箇所: ウォームスタート用のスナップショット】▼▼▼
+    def snapshot_state(self, strategy, exit_signal_generator):
+        """ポジションと決済価格 (トレーリングストップの現在位置を含む) を辞書で返す。ポジションがなければ None。"""
+        if not strategy.position:
+            return None
+        return {
+            'size': strategy.position.size, 'price': strategy.position.price,
+            'entry_datetime': self.current_position_entry_dt.isoformat() if self.current_position_entry_dt else None,
+            'entry_reason': self.entry_reason_for_trade, 'executed_size': self.executed_size,
+            'tp_price': exit_signal_generator.tp_price, 'sl_price': exit_signal_generator.sl_price,
+            'risk_per_share': exit_signal_generator.risk_per_share,
+        }
+
+    def restore_snapshot_state(self, state, strategy, exit_signal_generator):
+        """snapshot_state の内容を復元する。決済価格は再計算せず、保存時の値 (引き上げ済みのSL) を引き継ぐ。"""
+        strategy.position.size = state['size']
+        strategy.position.price = state['price']
+        self.current_position_entry_dt = datetime.fromisoformat(state['entry_datetime']) if state['entry_datetime'] else None
+        self.entry_reason_for_trade = state['entry_reason']
+        self.executed_size = state['executed_size']
+        exit_signal_generator.tp_price = state['tp_price']
+        exit_signal_generator.sl_price = state['sl_price']
+        exit_signal_generator.risk_per_share = state['risk_per_share']
+        strategy.logger.log(
+            f"スナップショットからポジションを復元。Size: {state['size']}, Price: {state['price']}, "
+            f"SL: {state['sl_price']:.2f}, TP: {state['tp_price']:.2f}"
+        )
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def on_trade_update(self, trade, strategy):
         """トレードの開始/終了イベントを処理する"""
         if trade.isopen:
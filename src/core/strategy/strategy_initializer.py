@@ -5,6 +5,7 @@ import logging
 # ▼▼▼【変更箇所: SafeRSIをインポートリストに追加】▼▼▼
 from ..indicators import SafeStochastic, VWAP, SafeADX, SafeRSI
 # ▲▲▲【変更箇所ここまで】▲▲▲
+from ..streaming import StreamingIndicatorSet, StreamingUnsupportedError, CrossOver, create_streaming_indicator
 
 class StrategyInitializer:
     """
@@ -19,9 +20,13 @@ class StrategyInitializer:
         param_str = "_".join(f"{k}_{v}" for k, v in sorted(params.items()))
         return f"{timeframe}_{name}_{param_str}"
 
-    def create_indicators(self, data_feeds):
-        """設定に基づき、Backtraderのインジケーターオブジェクトを動的に生成する"""
-        indicators, unique_defs = {}, {}
+    # ▼▼▼【変更箇所: インジケーター定義の収集を分離し、ストリーミング版の生成を追加】▼▼▼
+    def _collect_indicator_defs(self):
+        """
+        エントリー/決済条件が参照するインジケーター定義を集める。
+        ({キー: (時間足, 定義)}, [(クロスキー, 時間足, キー1, キー2)]) を返す。
+        """
+        unique_defs, cross_defs = {}, []
 
         def add_def(timeframe, ind_def):
             if not isinstance(ind_def, dict) or 'name' not in ind_def: return
@@ -47,6 +52,23 @@ class StrategyInitializer:
                     atr_params = {k: v for k, v in cond.get('params', {}).items() if k != 'multiplier'}
                     add_def(cond.get('timeframe'), {'name': 'atr', 'params': atr_params})
 
+        # クロスオーバー条件
+        if isinstance(self.strategy_params.get('entry_conditions'), dict):
+            for cond_list in self.strategy_params['entry_conditions'].values():
+                if not isinstance(cond_list, list): continue
+                for cond in cond_list:
+                    if not isinstance(cond, dict) or cond.get('type') not in ['crossover', 'crossunder']: continue
+                    k1 = self._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = self._get_indicator_key(cond['timeframe'], **cond['indicator2'])
+                    cross_key = f"cross_{k1}_vs_{k2}"
+                    if all(cross_key != c[0] for c in cross_defs): cross_defs.append((cross_key, cond['timeframe'], k1, k2))
+
+        return unique_defs, cross_defs
+
+    def create_indicators(self, data_feeds):
+        """設定に基づき、Backtraderのインジケーターオブジェクトを動的に生成する"""
+        indicators = {}
+        unique_defs, cross_defs = self._collect_indicator_defs()
+
         # 収集した定義に基づき、インジケーターをインスタンス化
         for key, (timeframe, ind_def) in unique_defs.items():
             name, params = ind_def['name'], ind_def.get('params', {})
@@ -59,17 +81,52 @@ class StrategyInitializer:
                 self.logger.error(f"インジケータークラス '{name}' が見つかりません。")
 
         # クロスオーバー用のインジケーターを追加
-        if isinstance(self.strategy_params.get('entry_conditions'), dict):
-            for cond_list in self.strategy_params['entry_conditions'].values():
-                if not isinstance(cond_list, list): continue
-                for cond in cond_list:
-                    if not isinstance(cond, dict) or cond.get('type') not in ['crossover', 'crossunder']: continue
-                    k1 = self._get_indicator_key(cond['timeframe'], **cond['indicator1']); k2 = self._get_indicator_key(cond['timeframe'], **cond['indicator2'])
-                    if k1 in indicators and k2 in indicators:
-                        cross_key = f"cross_{k1}_vs_{k2}"
-                        if cross_key not in indicators: indicators[cross_key] = bt.indicators.CrossOver(indicators[k1], indicators[k2], plot=False)
+        for cross_key, _, k1, k2 in cross_defs:
+            if k1 in indicators and k2 in indicators:
+                indicators[cross_key] = bt.indicators.CrossOver(indicators[k1], indicators[k2], plot=False)
+
+        return indicators
 
+    def create_streaming_indicators(self):
+        """
+        create_indicators と同じキー・同じ計算のストリーミング・インジケーター群 (StreamingIndicatorSet) を生成する。
+        ライブ取引用。再現できない定義が1つでもあれば StreamingUnsupportedError。
+        """
+        indicators = StreamingIndicatorSet()
+        unique_defs, cross_defs = self._collect_indicator_defs()
+        for key, (timeframe, ind_def) in unique_defs.items():
+            ind_cls = self._find_indicator_class(ind_def['name'])
+            if ind_cls is None:
+                self.logger.error(f"インジケータークラス '{ind_def['name']}' が見つかりません。")
+                continue
+            indicators.add(key, timeframe, create_streaming_indicator(ind_cls, ind_def.get('params', {})))
+        for cross_key, timeframe, k1, k2 in cross_defs:
+            if k1 in indicators and k2 in indicators:
+                indicators.add_cross(cross_key, timeframe, CrossOver(indicators[k1], indicators[k2]))
         return indicators
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: インジケーターのパラメータから必要な過去バー数を算出】▼▼▼
+    def required_lookback(self):
+        """
+        時間足ごとに、インジケーターが値を出すまでに必要なバー数 (minperiod の最大値) を返す。{時間足: バー数}
+        minperiod はストリーミング版の定義 (Backtrader と同じ値) から求める。ライン・バッファを制限する際の下限に使う。
+        """
+        lookback, minperiods = {}, {}
+        unique_defs, cross_defs = self._collect_indicator_defs()
+        for key, (timeframe, ind_def) in unique_defs.items():
+            ind_cls = self._find_indicator_class(ind_def['name'])
+            if ind_cls is None: continue
+            try:
+                minperiods[key] = create_streaming_indicator(ind_cls, ind_def.get('params', {})).minperiod
+            except StreamingUnsupportedError:
+                continue  # Backtrader のインジケーターは qbuffer で自身の minperiod を確保する
+            lookback[timeframe] = max(lookback.get(timeframe, 1), minperiods[key])
+        for _, timeframe, k1, k2 in cross_defs:
+            if k1 in minperiods and k2 in minperiods:
+                lookback[timeframe] = max(lookback.get(timeframe, 1), max(minperiods[k1], minperiods[k2]) + 1)
+        return lookback
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def _find_indicator_class(self, name):
         """文字列からBacktraderのインジケータークラスを見つける"""
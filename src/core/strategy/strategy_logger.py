@@ -45,6 +45,11 @@ class StrategyLogger:
         for key in sorted(indicators.keys()):
             indicator = indicators[key]
             if len(indicator) > 0 and indicator[0] is not None:
-                values = [f"{alias}: {getattr(indicator.lines, alias)[0]:.4f}" for alias in indicator.lines.getlinealiases() if len(getattr(indicator.lines, alias)) > 0]
+                # ▼▼▼【変更箇所: ストリーミング・インジケーター (ライン名と現在値のみ保持) に対応】▼▼▼
+                if hasattr(indicator, 'line_values'):
+                    values = [f"{alias}: {value:.4f}" for alias, value in indicator.line_values().items()]
+                else:
+                    values = [f"{alias}: {getattr(indicator.lines, alias)[0]:.4f}" for alias in indicator.lines.getlinealiases() if len(getattr(indicator.lines, alias)) > 0]
+                # ▲▲▲【変更箇所ここまで】▲▲▲
                 if values: log_msg += f"  [{key}]: {', '.join(values)}\n"
         self.logger.debug(log_msg)
\ No newline at end of file
@@ -0,0 +1,4 @@
+from .ring_buffer import RingBuffer
+from .indicators import (Bars, StreamingIndicator, StreamingUnsupportedError, SMA, EMA, RSI, ATR, ADX, Stochastic,
+                         BollingerBands, MACD, VWAP, CrossOver)
+from .indicator_set import STREAMING_CLASSES, StreamingIndicatorSet, create_streaming_indicator, bars_from_feed
\ No newline at end of file
@@ -0,0 +1,131 @@
+import numpy as np
+import backtrader as bt
+
+from ..indicators import SafeStochastic, VWAP as BtVWAP, SafeADX, SafeRSI
+from .indicators import (Bars, StreamingUnsupportedError, SMA, EMA, RSI, ATR, ADX, Stochastic,
+                         BollingerBands, MACD, VWAP)
+
+# Backtrader のインジケータークラス (StrategyInitializer._find_indicator_class の解決結果) -> ストリーミング版
+STREAMING_CLASSES = {
+    bt.indicators.SMA: SMA,
+    bt.indicators.EMA: EMA,
+    bt.indicators.BollingerBands: BollingerBands,
+    bt.indicators.MACD: MACD,
+    bt.indicators.ATR: ATR,
+    SafeRSI: RSI,
+    SafeStochastic: Stochastic,
+    SafeADX: ADX,
+    BtVWAP: VWAP,
+}
+
+
+def create_streaming_indicator(ind_cls, params):
+    """
+    Backtrader のインジケータークラスとパラメータから、同じ計算のストリーミング・インジケーターを生成する。
+    パラメータの既定値は Backtrader 側の定義を使う。移動平均の種類 (movav) の変更など、
+    再現できない指定は StreamingUnsupportedError。
+    """
+    streaming_cls = STREAMING_CLASSES.get(ind_cls)
+    if streaming_cls is None:
+        raise StreamingUnsupportedError(f"ストリーミング版が未定義のインジケーター: {ind_cls.__name__}")
+    defaults = dict(ind_cls.params._getitems())
+    unknown = (set(params) - set(defaults)) | (set(params) & {'movav'})
+    if unknown:
+        raise StreamingUnsupportedError(f"{ind_cls.__name__} の未対応パラメータ: {sorted(unknown)}")
+    defaults.pop('movav', None)
+    defaults.update(params)
+    return streaming_cls(**defaults)
+
+
+def bars_from_feed(data_feed, size):
+    """データフィードの直近 size 本を Bars (numpy 配列) にする。"""
+    return Bars(*(np.array(getattr(data_feed, name).get(size=size), dtype=np.float64)
+                  for name in Bars._fields))
+
+
+class StreamingIndicatorSet(dict):
+    """
+    {インジケーターキー: ストリーミング・インジケーター}。キーは StrategyInitializer.create_indicators と同じ。
+    update(data_feeds) を呼ぶと、前回以降に各時間足のフィードへ追加されたバーを反映する。
+    初回に複数本のバーがある場合は seed() で履歴全体を1回の走査で取り込み、以降は1本ずつ定数時間で更新する。
+    (seed はフィードが全履歴を保持している必要がある。ライン・バッファを制限する場合 (exactbars) は毎バー呼ぶこと)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._by_timeframe = {}   # 時間足 -> [インジケーター]
+        self._crosses = {}        # 時間足 -> [CrossOver]
+        self._seen = {}           # 時間足 -> 反映済みのバー数
+        self._absorbed = {}       # 時間足 -> 反映済みの最終バーの日時 (Backtrader の日時数値)
+        self._resume_after = {}   # 時間足 -> 復元時に読み飛ばす最終バーの日時 (resume)
+
+    def add(self, key, timeframe, indicator):
+        self[key] = indicator
+        self._by_timeframe.setdefault(timeframe, []).append(indicator)
+        self._crosses.setdefault(timeframe, [])
+        self._seen.setdefault(timeframe, 0)
+
+    def add_cross(self, key, timeframe, cross):
+        self[key] = cross
+        self._crosses.setdefault(timeframe, []).append(cross)
+
+    @property
+    def ready(self):
+        """全インジケーターが Backtrader の minperiod に達したか。(未達の間はストラテジーの prenext に相当)"""
+        return all(indicator.ready for indicator in self.values())
+
+    def retained_values(self):
+        """全インジケーターが保持している過去値の数。(メモリ使用量の報告用)"""
+        return sum(indicator.retained_values() for indicator in self.values())
+
+    def seed(self, timeframe, bars):
+        """時間足 timeframe のインジケーターを過去のバー配列で初期化する。"""
+        line0 = {id(indicator): indicator.seed(bars) for indicator in self._by_timeframe[timeframe]}
+        for cross in self._crosses[timeframe]:
+            cross.seed(line0[id(cross.ind1)], line0[id(cross.ind2)])
+        self._seen[timeframe] = len(bars.close)
+        if len(bars.close): self._absorbed[timeframe] = float(bars.datetime[-1])
+
+    @property
+    def timeframes(self):
+        return tuple(self._by_timeframe)
+
+    @property
+    def absorbed(self):
+        """{時間足: 反映済みの最終バーの日時}。スナップショットに保存し、復元時に resume に渡す。"""
+        return dict(self._absorbed)
+
+    def resume(self, last_datetimes):
+        """
+        スナップショット (pickle) から復元したインジケーター群を新しいフィードに接続する。
+        last_datetimes ({時間足: 反映済みの最終バーの日時 (Backtrader の日時数値)}) 以前のバーは
+        フィードが再供給しても反映済みとして読み飛ばし、それより新しいバーから更新を再開する。
+        """
+        self._seen = dict.fromkeys(self._seen, 0)
+        self._resume_after = dict(last_datetimes)
+
+    def update(self, data_feeds):
+        for timeframe, indicators in self._by_timeframe.items():
+            data_feed = data_feeds[timeframe]
+            total, seen = len(data_feed), self._seen[timeframe]
+            if total <= seen:
+                continue
+            resume_after = self._resume_after.get(timeframe)
+            if seen == 0 and total > 1 and resume_after is None:
+                self.seed(timeframe, bars_from_feed(data_feed, total))
+                continue
+            crosses = self._crosses[timeframe]
+            lines = (data_feed.datetime, data_feed.open, data_feed.high, data_feed.low, data_feed.close, data_feed.volume)
+            for ago in range(seen - total + 1, 1):
+                if resume_after is not None:
+                    if data_feed.datetime[ago] <= resume_after:
+                        continue
+                    del self._resume_after[timeframe]
+                    resume_after = None
+                bar = [line[ago] for line in lines]
+                for indicator in indicators:
+                    indicator.update(*bar)
+                for cross in crosses:
+                    cross.update()
+                self._absorbed[timeframe] = bar[0]
+            self._seen[timeframe] = total
\ No newline at end of file
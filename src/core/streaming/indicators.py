@@ -0,0 +1,552 @@
+import math
+import collections
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ring_buffer import RingBuffer
+
+# ==============================================================================
+# ストリーミング・インジケーター
+# 1本のバーごとに update() で更新し、計算量・メモリは履歴の長さに依存しない。
+# (窓の集計は期間分のリングバッファ、平滑化は直前の値だけを保持する)
+# 計算式・演算順序は Backtrader の next() (runonce=False、ライブ取引と同じ) と同一で、値は1ビットも違わない。
+#
+# seed(bars) は過去のバー配列から「update() を1本ずつ呼んだ場合と同じ状態」を1回の走査で作る。
+# 要素ごとの演算は numpy、窓の合計と再帰的な平滑化は同じ演算順序のループで計算する。
+#
+# 値の参照は Backtrader のラインと同じく ind[0] / len(ind)。ready は Backtrader の minperiod に達したかどうか。
+# ==============================================================================
+
+NAN = float('nan')
+
+# seed() に渡すバー配列 (datetime は Backtrader の日付番号)
+Bars = collections.namedtuple('Bars', ['datetime', 'open', 'high', 'low', 'close', 'volume'])
+
+
+class StreamingUnsupportedError(Exception):
+    """ストリーミング・インジケーターで再現できないインジケーター定義。(呼び出し側は Backtrader のインジケーターを使う)"""
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+
+class _Average:
+    """bt.indicators.SMA (math.fsum による窓合計) と同一の値ストリーム。"""
+    __slots__ = ('period', 'window', 'value')
+
+    def __init__(self, period):
+        self.period, self.window, self.value = period, RingBuffer(period), NAN
+
+    @property
+    def ready(self):
+        return self.window.full
+
+    def push(self, x):
+        self.window.append(x)
+        if self.window.full:
+            self.value = math.fsum(self.window.items) / self.period
+        return self.value
+
+    def seed(self, values):
+        """values を順に push した場合と同じ状態にし、各時点の値の配列を返す。"""
+        values, p = np.asarray(values, dtype=np.float64).tolist(), self.period
+        out = [NAN] * min(p - 1, len(values)) + [math.fsum(values[i - p + 1:i + 1]) / p for i in range(p - 1, len(values))]
+        self.window.extend(values)
+        if out: self.value = out[-1]
+        return np.array(out)
+
+
+class _Smoothing:
+    """bt.indicators.ExponentialSmoothing (シードは期間平均) と同一の値ストリーム。"""
+    __slots__ = ('period', 'alpha', 'alpha1', 'value', 'count', '_seed')
+
+    def __init__(self, period, alpha):
+        self.period, self.alpha, self.alpha1 = period, alpha, 1.0 - alpha
+        self.value, self.count, self._seed = NAN, 0, []
+
+    @property
+    def ready(self):
+        return self.count >= self.period
+
+    def push(self, x):
+        self.count += 1
+        if self.count > self.period:
+            self.value = self.value * self.alpha1 + x * self.alpha
+        else:
+            self._seed.append(x)
+            if self.count == self.period:
+                self.value, self._seed = math.fsum(self._seed) / self.period, None
+        return self.value
+
+    def seed(self, values):
+        """values を順に push した場合と同じ状態にし、各時点の値の配列を返す。"""
+        values, p = np.asarray(values, dtype=np.float64).tolist(), self.period
+        self.count = len(values)
+        if len(values) < p:
+            self._seed = values
+            return _nan(len(values))
+        prev, alpha, alpha1 = math.fsum(values[:p]) / p, self.alpha, self.alpha1
+        out = [NAN] * (p - 1) + [prev]
+        for x in values[p:]:
+            prev = prev * alpha1 + x * alpha
+            out.append(prev)
+        self.value, self._seed = prev, None
+        return np.array(out)
+
+
+class StreamingIndicator:
+    """
+    バー単位で更新するインジケーターの基底クラス。
+    update(dt, open, high, low, close, volume) で1本分を更新し、line0 の値を返す。
+    """
+    __slots__ = ('value', 'bars', 'minperiod')
+    line_names = ('value',)
+
+    def __init__(self, minperiod):
+        self.value, self.bars, self.minperiod = NAN, 0, minperiod
+
+    @property
+    def ready(self):
+        return self.bars >= self.minperiod
+
+    def __len__(self):
+        return self.bars
+
+    def __getitem__(self, ago):
+        if ago != 0:
+            raise IndexError("ストリーミング・インジケーターは現在値 [0] のみ参照できます。")
+        return self.value
+
+    def line_values(self):
+        """{ライン名: 現在値}。(ログ出力用)"""
+        return {name: getattr(self, name) for name in self.line_names}
+
+    def retained_values(self):
+        """保持している過去値の数 (リングバッファの要素数の合計)。period で決まり、履歴の長さに依存しない。"""
+        total = 0
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                state = getattr(self, name, None)
+                if isinstance(state, _Average): state = state.window
+                if isinstance(state, RingBuffer): total += len(state)
+        return total
+
+    def update(self, dt, open_, high, low, close, volume):
+        raise NotImplementedError
+
+    def seed(self, bars):
+        """bars (Bars) の全バーで update() を呼んだ場合と同じ状態にし、line0 の配列を返す。"""
+        if self.bars:
+            raise ValueError(f"{type(self).__name__} は更新済みのため seed できません。")
+        self.bars = len(bars.close)
+        return self._seed(bars)
+
+    def _seed(self, bars):
+        raise NotImplementedError
+
+
+class SMA(StreamingIndicator):
+    __slots__ = ('_avg',)
+
+    def __init__(self, period=30):
+        super().__init__(period)
+        self._avg = _Average(period)
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self.value = self._avg.push(close)
+        return self.value
+
+    def _seed(self, bars):
+        out = self._avg.seed(bars.close)
+        self.value = self._avg.value
+        return out
+
+
+class EMA(StreamingIndicator):
+    __slots__ = ('_smooth',)
+
+    def __init__(self, period=30):
+        super().__init__(period)
+        self._smooth = _Smoothing(period, 2.0 / (1.0 + period))
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self.value = self._smooth.push(close)
+        return self.value
+
+    def _seed(self, bars):
+        out = self._smooth.seed(bars.close)
+        self.value = self._smooth.value
+        return out
+
+
+class RSI(StreamingIndicator):
+    """SafeRSI と同一。(EMA で平滑化し、平均損失が0なら RS = inf)"""
+    __slots__ = ('_gain', '_loss', '_prev_close')
+
+    def __init__(self, period=14):
+        super().__init__(period + 1)
+        self._gain, self._loss = _Smoothing(period, 2.0 / (1.0 + period)), _Smoothing(period, 2.0 / (1.0 + period))
+        self._prev_close = NAN
+
+    def update(self, dt, open_, high, low, close, volume):
+        if self.bars:
+            delta = close - self._prev_close
+            avg_gain = self._gain.push(delta if delta > 0 else 0.0)
+            avg_loss = self._loss.push(-delta if delta < 0 else 0.0)
+            if self._loss.ready:
+                rs = avg_gain / avg_loss if avg_loss else math.inf
+                self.value = 100.0 - (100.0 / (1.0 + rs))
+        self.bars += 1
+        self._prev_close = close
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = _nan(len(close))
+        if len(close):
+            self._prev_close = float(close[-1])
+        delta = close[1:] - close[:-1]
+        avg_gain = self._gain.seed(np.where(delta > 0, delta, 0.0))
+        avg_loss = self._loss.seed(np.where(delta < 0, -delta, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.where(avg_loss != 0, avg_gain / avg_loss, np.inf)
+            out[1:] = 100.0 - (100.0 / (1.0 + rs))
+        out[:self.minperiod - 1] = np.nan
+        if self.ready: self.value = float(out[-1])
+        return out
+
+
+class ATR(StreamingIndicator):
+    """bt.indicators.ATR と同一。(TrueRange の SMMA)"""
+    __slots__ = ('_smooth', '_prev_close')
+
+    def __init__(self, period=14):
+        super().__init__(period + 1)
+        self._smooth, self._prev_close = _Smoothing(period, 1.0 / period), NAN
+
+    def update(self, dt, open_, high, low, close, volume):
+        if self.bars:
+            prev_close = self._prev_close
+            self.value = self._smooth.push(max(high, prev_close) - min(low, prev_close))
+        self.bars += 1
+        self._prev_close = close
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        out = _nan(len(close))
+        if len(close):
+            self._prev_close = float(close[-1])
+        prev_close, high, low = close[:-1], high[1:], low[1:]
+        # max(high, prev_close) / min(low, prev_close) と同じ比較
+        true_high = np.where(prev_close > high, prev_close, high)
+        true_low = np.where(prev_close < low, prev_close, low)
+        out[1:] = self._smooth.seed(true_high - true_low)
+        self.value = self._smooth.value
+        return out
+
+
+class ADX(StreamingIndicator):
+    """
+    SafeADX と同一。(TR・DM の Wilder 平滑化、ADX は period 本目で DX の単純平均)
+    先頭バーの「前のバー」は先頭バー自身とする。(プリロードしないライブのデータフィードと同じ)
+    """
+    __slots__ = ('period', 'adx', 'plusDI', 'minusDI', '_tr', '_plus_dm', '_minus_dm', '_dx', '_prev')
+    line_names = ('adx', 'plusDI', 'minusDI')
+
+    def __init__(self, period=14):
+        super().__init__(1)
+        self.period = period
+        self.value = self.adx = self.plusDI = self.minusDI = 0.0
+        self._tr = self._plus_dm = self._minus_dm = 0.0
+        self._dx = RingBuffer(period)
+        self._prev = None
+
+    def update(self, dt, open_, high, low, close, volume):
+        period = self.period
+        prev_high, prev_low, prev_close = self._prev or (high, low, close)
+        current_tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self._tr = self._tr - (self._tr / period) + current_tr
+
+        move_up, move_down = high - prev_high, prev_low - low
+        current_plus_dm = move_up if move_up > move_down and move_up > 0 else 0.0
+        current_minus_dm = move_down if move_down > move_up and move_down > 0 else 0.0
+        self._plus_dm = self._plus_dm - (self._plus_dm / period) + current_plus_dm
+        self._minus_dm = self._minus_dm - (self._minus_dm / period) + current_minus_dm
+
+        if self._tr > 1e-9:
+            self.plusDI, self.minusDI = 100.0 * self._plus_dm / self._tr, 100.0 * self._minus_dm / self._tr
+        else:
+            self.plusDI, self.minusDI = 0.0, 0.0
+        di_sum = self.plusDI + self.minusDI
+        dx = 100.0 * abs(self.plusDI - self.minusDI) / di_sum if di_sum > 1e-9 else 0.0
+        self._dx.append(dx)
+
+        self.bars += 1
+        if self.bars == period:
+            self.adx = sum(self._dx.values()) / period
+        elif self.bars > period:
+            self.adx = (self.adx * (period - 1) + dx) / period
+        self.value = self.adx
+        self._prev = (high, low, close)
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        period, n = self.period, len(close)
+        if n == 0:
+            return _nan(0)
+        prev_high, prev_low, prev_close = (np.r_[a[0], a[:-1]] for a in (high, low, close))
+
+        # max(a, b, c) と同じ比較順序
+        current_tr = high - low
+        for candidate in (np.abs(high - prev_close), np.abs(low - prev_close)):
+            current_tr = np.where(candidate > current_tr, candidate, current_tr)
+        move_up, move_down = high - prev_high, prev_low - low
+        current_plus_dm = np.where((move_up > move_down) & (move_up > 0), move_up, 0.0)
+        current_minus_dm = np.where((move_down > move_up) & (move_down > 0), move_down, 0.0)
+
+        def wilder(values):
+            out, prev_val = [], 0.0
+            for current_val in values.tolist():
+                prev_val = prev_val - (prev_val / period) + current_val
+                out.append(prev_val)
+            return np.array(out)
+
+        tr, plus_dm, minus_dm = wilder(current_tr), wilder(current_plus_dm), wilder(current_minus_dm)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plus_di = np.where(tr > 1e-9, 100.0 * plus_dm / tr, 0.0)
+            minus_di = np.where(tr > 1e-9, 100.0 * minus_dm / tr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum > 1e-9, 100.0 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+
+        dx_list, adx, out = dx.tolist(), 0.0, []
+        for i, dx_val in enumerate(dx_list):
+            if i + 1 == period:
+                adx = sum(dx_list[:period]) / period
+            elif i + 1 > period:
+                adx = (adx * (period - 1) + dx_val) / period
+            out.append(adx)
+
+        self._tr, self._plus_dm, self._minus_dm = float(tr[-1]), float(plus_dm[-1]), float(minus_dm[-1])
+        self.plusDI, self.minusDI = float(plus_di[-1]), float(minus_di[-1])
+        self._dx.extend(dx_list)
+        self.value = self.adx = adx
+        self._prev = (float(high[-1]), float(low[-1]), float(close[-1]))
+        return np.array(out)
+
+
+class Stochastic(StreamingIndicator):
+    """SafeStochastic と同一。(値幅ゼロの期間は %K の素値を0とする)"""
+    __slots__ = ('percK', 'percD', '_highs', '_lows', '_k', '_d')
+    line_names = ('percK', 'percD')
+
+    def __init__(self, period=14, period_dfast=3, period_dslow=3):
+        super().__init__(period + period_dfast - 1 + period_dslow - 1)
+        self.percK = self.percD = NAN
+        self._highs, self._lows = RingBuffer(period), RingBuffer(period)
+        self._k, self._d = _Average(period_dfast), _Average(period_dslow)
+
+    @staticmethod
+    def _raw_k(close, highest_high, lowest_low):
+        price_range = highest_high - lowest_low
+        safe_num = close - lowest_low if price_range > 1e-9 else 0.0
+        safe_den = price_range if price_range > 1e-9 else 1.0
+        return 100.0 * safe_num / safe_den
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        self._highs.append(high)
+        self._lows.append(low)
+        if self._highs.full:
+            self.percK = self._k.push(self._raw_k(close, max(self._highs.items), min(self._lows.items)))
+            if self._k.ready:
+                self.percD = self._d.push(self.percK)
+        self.value = self.percK
+        return self.value
+
+    def _seed(self, bars):
+        high, low, close = (np.asarray(a, dtype=np.float64) for a in (bars.high, bars.low, bars.close))
+        period, n = self._highs.size, len(close)
+        out = _nan(n)
+        self._highs.extend(high.tolist())
+        self._lows.extend(low.tolist())
+        if n < period:
+            return out
+        highest_high = sliding_window_view(high, period).max(axis=1)
+        lowest_low = sliding_window_view(low, period).min(axis=1)
+        price_range = highest_high - lowest_low
+        safe_num = np.where(price_range > 1e-9, close[period - 1:] - lowest_low, 0.0)
+        safe_den = np.where(price_range > 1e-9, price_range, 1.0)
+        perc_k = self._k.seed((100.0 * safe_num) / safe_den)
+        out[period - 1:] = perc_k
+        self.value = self.percK = self._k.value
+        k_start = self._k.period - 1
+        if len(perc_k) > k_start:
+            self._d.seed(perc_k[k_start:])
+            self.percD = self._d.value
+        return out
+
+
+class BollingerBands(StreamingIndicator):
+    """bt.indicators.BollingerBands (SMA、標準偏差は pow(abs(E[x^2] - E[x]^2), 0.5)) と同一。"""
+    __slots__ = ('devfactor', 'mid', 'top', 'bot', '_mid', '_meansq')
+    line_names = ('mid', 'top', 'bot')
+
+    def __init__(self, period=20, devfactor=2.0):
+        super().__init__(period)
+        self.devfactor = devfactor
+        self.mid = self.top = self.bot = NAN
+        self._mid, self._meansq = _Average(period), _Average(period)
+
+    def _set_bands(self, mid, meansq):
+        stddev = self.devfactor * pow(abs(meansq - pow(mid, 2)), 0.5)
+        self.value = self.mid = mid
+        self.top, self.bot = mid + stddev, mid - stddev
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        mid, meansq = self._mid.push(close), self._meansq.push(pow(close, 2))
+        if self._mid.ready:
+            self._set_bands(mid, meansq)
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = self._mid.seed(close)
+        self._meansq.seed([pow(x, 2) for x in close.tolist()])
+        if self._mid.ready:
+            self._set_bands(self._mid.value, self._meansq.value)
+        return out
+
+
+class MACD(StreamingIndicator):
+    """bt.indicators.MACD と同一。(macd = EMA(me1) - EMA(me2)、signal = EMA(macd))"""
+    __slots__ = ('macd', 'signal', '_me1', '_me2', '_signal')
+    line_names = ('macd', 'signal')
+
+    def __init__(self, period_me1=12, period_me2=26, period_signal=9):
+        super().__init__(max(period_me1, period_me2) + period_signal - 1)
+        self.macd = self.signal = NAN
+        self._me1 = _Smoothing(period_me1, 2.0 / (1.0 + period_me1))
+        self._me2 = _Smoothing(period_me2, 2.0 / (1.0 + period_me2))
+        self._signal = _Smoothing(period_signal, 2.0 / (1.0 + period_signal))
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        me1, me2 = self._me1.push(close), self._me2.push(close)
+        if self._me1.ready and self._me2.ready:
+            self.value = self.macd = me1 - me2
+            self.signal = self._signal.push(self.macd)
+        return self.value
+
+    def _seed(self, bars):
+        close = np.asarray(bars.close, dtype=np.float64)
+        out = self._me1.seed(close) - self._me2.seed(close)
+        start = max(self._me1.period, self._me2.period) - 1
+        if len(out) > start:
+            self._signal.seed(out[start:])
+            self.value = self.macd = float(out[-1])
+            self.signal = self._signal.value
+        return out
+
+
+class VWAP(StreamingIndicator):
+    """
+    VWAP インジケーター (src.core.indicators.VWAP) と同一。先頭バーは計算せず、日付が変わると累積をリセットする。
+    日付は Backtrader の日付番号の整数部で判定する。(タイムゾーンを指定しないデータフィードの date() と同じ)
+    """
+    __slots__ = ('vwap', '_cum_tpv', '_cum_volume', '_day')
+    line_names = ('vwap',)
+
+    def __init__(self):
+        super().__init__(1)
+        self.vwap, self._cum_tpv, self._cum_volume, self._day = NAN, 0.0, 0.0, None
+
+    def update(self, dt, open_, high, low, close, volume):
+        self.bars += 1
+        day = int(dt)
+        if self.bars > 1:
+            if day != self._day:
+                self._cum_tpv = self._cum_volume = 0.0
+            tp = (high + low + close) / 3.0
+            self._cum_tpv += tp * volume
+            self._cum_volume += volume
+            self.value = self.vwap = self._cum_tpv / self._cum_volume if self._cum_volume > 0 else tp
+        self._day = day
+        return self.value
+
+    def _seed(self, bars):
+        n = len(bars.close)
+        out = _nan(n)
+        if n == 0:
+            return out
+        days = np.asarray(bars.datetime, dtype=np.float64).astype(np.int64)
+        self._day = int(days[-1])
+        if n == 1:
+            return out
+        high, low, close, volume = (np.asarray(a, dtype=np.float64)[1:] for a in (bars.high, bars.low, bars.close, bars.volume))
+        tp = ((high + low) + close) / 3.0
+        tpv = tp * volume
+        # 日付が変わる位置で区切り、区間ごとに先頭から順に累積する
+        cuts = (np.flatnonzero(days[1:] != days[:-1])).tolist()
+        cum_tpv = cum_volume = 0.0
+        for a, b in zip([0] + cuts, cuts + [n - 1]):
+            if a == b:
+                continue
+            seg_tpv = np.cumsum(np.r_[0.0, tpv[a:b]])[1:]
+            seg_volume = np.cumsum(np.r_[0.0, volume[a:b]])[1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[1 + a:1 + b] = np.where(seg_volume > 0, seg_tpv / seg_volume, tp[a:b])
+            cum_tpv, cum_volume = float(seg_tpv[-1]), float(seg_volume[-1])
+        self._cum_tpv, self._cum_volume = cum_tpv, cum_volume
+        self.value = self.vwap = float(out[-1])
+        return out
+
+
+class CrossOver(StreamingIndicator):
+    """
+    bt.indicators.CrossOver と同一。(上抜け: 1.0、下抜け: -1.0、それ以外: 0.0)
+    2つのストリーミング・インジケーターの line0 を比較する。両者の更新後に update() を呼ぶ。
+    """
+    __slots__ = ('ind1', 'ind2', '_prev_diff')
+
+    def __init__(self, ind1, ind2):
+        super().__init__(max(ind1.minperiod, ind2.minperiod) + 1)
+        self.ind1, self.ind2, self._prev_diff = ind1, ind2, None
+
+    def update(self, *_):
+        self.bars += 1
+        if not (self.ind1.ready and self.ind2.ready):
+            return self.value
+        a, b = self.ind1.value, self.ind2.value
+        prev = self._prev_diff
+        if prev is not None:  # 最初の1本は直前の差のシードのみ
+            self.value = float(prev < 0.0 and a > b) - float(prev > 0.0 and a < b)
+        diff = a - b
+        self._prev_diff = diff if diff or prev is None else prev
+        return self.value
+
+    def seed(self, values1, values2):
+        """2つの line0 の配列 (各インジケーターの seed() の戻り値) から状態を作り、クロスの配列を返す。"""
+        if self.bars:
+            raise ValueError("CrossOver は更新済みのため seed できません。")
+        values1, values2 = np.asarray(values1, dtype=np.float64), np.asarray(values2, dtype=np.float64)
+        n, start = len(values1), self.minperiod - 2  # start: 両インジケーターが揃う最初のバー
+        self.bars = n
+        out = _nan(n)
+        if n <= start:
+            return out
+        diff = values1[start:] - values2[start:]
+        # 直前の「ゼロでない差」(NonZeroDifference): 差がゼロのバーは直前の値を引き継ぐ
+        positions = np.arange(len(diff))
+        prev_diff = diff[np.maximum.accumulate(np.where(diff != 0, positions, 0))]
+        up = (prev_diff[:-1] < 0.0) & (values1[start + 1:] > values2[start + 1:])
+        down = (prev_diff[:-1] > 0.0) & (values1[start + 1:] < values2[start + 1:])
+        out[start + 1:] = up.astype(np.float64) - down.astype(np.float64)
+        self._prev_diff = float(prev_diff[-1])
+        self.value = float(out[-1])
+        return out
\ No newline at end of file
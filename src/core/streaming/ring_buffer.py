@@ -0,0 +1,53 @@
+class RingBuffer:
+    """
+    固定長のリングバッファ。古い値から上書きし、メモリは size 要素で一定。
+    合計 (math.fsum) ・最大・最小のように順序に依存しない集計は items をそのまま使える。
+    """
+    __slots__ = ('items', 'size', '_pos', '_count')
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f"RingBuffer のサイズは1以上が必要です: {size}")
+        self.items = []
+        self.size = size
+        self._pos = 0
+        self._count = 0
+
+    def append(self, value):
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            self.items[self._pos] = value
+        self._pos = (self._pos + 1) % self.size
+        self._count += 1
+
+    def extend(self, values):
+        """values の末尾 size 件だけを保持する。(append を繰り返した場合と同じ状態)"""
+        values = list(values)
+        for value in values[-self.size:]:
+            self.append(value)
+        self._count += max(0, len(values) - self.size)
+
+    @property
+    def full(self):
+        return len(self.items) == self.size
+
+    @property
+    def count(self):
+        """これまでに追加された値の総数。"""
+        return self._count
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, ago):
+        """Backtrader と同じく 0 が最新、-1 が1つ前の値。"""
+        if not -len(self.items) < ago <= 0:
+            raise IndexError(f"RingBuffer の範囲外です: {ago}")
+        return self.items[(self._pos - 1 + ago) % len(self.items)]
+
+    def values(self):
+        """古い順の値のリスト。"""
+        if not self.full:
+            return list(self.items)
+        return self.items[self._pos:] + self.items[:self._pos]
\ No newline at end of file
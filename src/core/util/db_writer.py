@@ -0,0 +1,246 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# SQLite 書き込みスレッド
+# 全データベースへの書き込みを1つの専用スレッドでまとめて行う。
+#   - 呼び出し側 (ストラテジーのスレッドなど) はキューに積むだけで、ディスクI/Oを待たない
+#   - WAL モードで開くため、読み取り (モニター等の別プロセス) と書き込みは互いを待たない
+#   - キューに積まれた書き込みを最大 MAX_DELAY 秒・MAX_BATCH 件ごとに1回のトランザクションでコミットする
+#   - 同じSQL文の連続する書き込みは executemany でまとめて実行する (コンパイル済みの文が再利用される)
+# ==============================================================================
+
+MAX_DELAY = 0.05
+MAX_BATCH = 500
+
+
+class _Write:
+    __slots__ = ('path', 'sql', 'params', 'on_error')
+
+    def __init__(self, path, sql, params, on_error):
+        self.path, self.sql, self.params, self.on_error = path, sql, params, on_error
+
+
+class _Call:
+    __slots__ = ('path', 'fn', 'future')
+
+    def __init__(self, path, fn):
+        self.path, self.fn, self.future = path, fn, Future()
+
+
+class Database:
+    """DBWriter 上の1つのデータベースへの書き込み窓口。"""
+    def __init__(self, writer, path):
+        self._writer = writer
+        self.path = path
+
+    def execute(self, sql, params=(), on_error=None):
+        """
+        書き込みをキューに積む (待たない)。
+        params に呼び出し可能オブジェクトを渡すと、書き込みスレッドで実行直前に評価する。
+        on_error(conn, params, error) を渡すと、この書き込みが失敗した場合に書き込みスレッドで呼び出す。
+        """
+        self._writer.put(_Write(self.path, sql, params, on_error))
+
+    def call(self, fn) -> Future:
+        """それまでに積まれた書き込みをコミットした後、書き込みスレッドで fn(conn) を実行する。戻り値は Future。"""
+        item = _Call(self.path, fn)
+        self._writer.put(item)
+        return item.future
+
+    def flush(self, timeout=None):
+        """それまでに積まれた書き込みがコミットされるまで待つ。"""
+        self.call(lambda conn: None).result(timeout)
+
+    def close(self, timeout=10):
+        """積まれた書き込みをコミットして接続を閉じる。"""
+        self._writer.close_database(self.path, timeout)
+
+
+class DBWriter(threading.Thread):
+    """書き込みキューを処理する専用スレッド。接続はこのスレッドだけが使う。"""
+    def __init__(self, max_delay=MAX_DELAY, max_batch=MAX_BATCH):
+        super().__init__(name="DBWriter", daemon=True)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._connections = {}
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def open_database(self, path, schema=()) -> Database:
+        """データベースを WAL モードで開き (既に開いていれば共有し)、schema の文を実行する。"""
+        database = Database(self, path)
+
+        def _open(_):
+            conn = self._connections.get(path)
+            opened = conn is None
+            try:
+                if opened:
+                    conn = sqlite3.connect(path, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                for statement in schema:
+                    conn.execute(statement)
+            except sqlite3.Error:
+                if opened and conn is not None:
+                    conn.close()
+                raise
+            if opened:
+                self._connections[path] = conn
+
+        with self._lock:
+            if not self.is_alive():
+                self.start()
+        # 接続・スキーマの作成に失敗した場合は、呼び出し元へ sqlite3.Error を送出する
+        item = _Call(None, _open)
+        self.put(item)
+        item.future.result()
+        return database
+
+    def close_database(self, path, timeout=10):
+        def _close(_):
+            conn = self._connections.pop(path, None)
+            if conn is not None:
+                conn.close()
+        item = _Call(None, _close)
+        self.put(item)
+        item.future.result(timeout)
+
+    def flush_all(self, timeout=10):
+        item = _Call(None, lambda conn: None)
+        self.put(item)
+        item.future.result(timeout)
+
+    def run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            # 呼び出し (flush・読み取り等) は待たせずにすぐ処理する
+            while len(batch) < self.max_batch and not isinstance(batch[-1], _Call):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"DB writer error: {e}", exc_info=True)
+
+    def _process(self, batch):
+        open_transactions = set()
+        i = 0
+        while i < len(batch):
+            item = batch[i]
+            if isinstance(item, _Call):
+                self._commit(open_transactions)
+                # 呼び出しは自動コミットモードで実行する
+                conn = self._connections.get(item.path)
+                try:
+                    if item.path is not None and conn is None:
+                        raise sqlite3.OperationalError(f"Database is not open: {item.path}")
+                    item.future.set_result(item.fn(conn))
+                except Exception as e:
+                    item.future.set_exception(e)
+                i += 1
+                continue
+
+            # 同じデータベース・同じSQL文の連続する書き込みをまとめる
+            j = i + 1
+            while j < len(batch) and isinstance(batch[j], _Write) and batch[j].path == item.path and batch[j].sql == item.sql:
+                j += 1
+            conn = self._connections.get(item.path)
+            if conn is None:
+                logger.error(f"Database is not open: {item.path} (dropped {j - i} writes)")
+            else:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                open_transactions.add(item.path)
+                self._execute_run(conn, batch[i:j])
+            i = j
+        self._commit(open_transactions)
+
+    def _execute_run(self, conn, writes):
+        rows = []
+        for write in writes:
+            try:
+                rows.append(write.params() if callable(write.params) else write.params)
+            except Exception as e:
+                logger.error(f"DB write dropped ({write.path}): failed to build parameters: {e}")
+                rows.append(None)
+        writes = [w for w, params in zip(writes, rows) if params is not None]
+        rows = [params for params in rows if params is not None]
+        if not writes:
+            return
+        conn.execute("SAVEPOINT run")
+        try:
+            conn.executemany(writes[0].sql, rows)
+            conn.execute("RELEASE run")
+            self.writes += len(writes)
+            return
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO run")
+            conn.execute("RELEASE run")
+        # 失敗した書き込みを特定するため1件ずつ実行する
+        for write, params in zip(writes, rows):
+            try:
+                conn.execute(write.sql, params)
+                self.writes += 1
+            except sqlite3.Error as e:
+                if write.on_error is None:
+                    logger.error(f"DB write failed ({write.path}): {e} / SQL: {' '.join(write.sql.split())[:80]}")
+                    continue
+                try:
+                    write.on_error(conn, params, e)
+                except Exception as handler_error:
+                    logger.error(f"DB write failed ({write.path}): {handler_error} / SQL: {' '.join(write.sql.split())[:80]}")
+
+    def _commit(self, open_transactions):
+        for path in open_transactions:
+            conn = self._connections.get(path)
+            try:
+                conn.execute("COMMIT")
+                self.commits += 1
+            except sqlite3.Error as e:
+                logger.error(f"DB commit failed ({path}): {e}")
+        open_transactions.clear()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DBWriter:
+    """プロセス共有の書き込みスレッドを返す。"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBWriter()
+            atexit.register(_flush_at_exit)
+        return _writer
+
+
+def open_database(path, schema=()) -> Database:
+    return get_writer().open_database(path, schema)
+
+
+def _flush_at_exit():
+    if _writer is not None and _writer.is_alive():
+        try:
+            _writer.flush_all(timeout=5)
+        except Exception as e:
+            logger.error(f"Failed to flush DB writes at exit: {e}")
\ No newline at end of file
@@ -0,0 +1,111 @@
+# src/core/util/monte_carlo.py
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# モンテカルロ (トレードのブートストラップ)
+# 銘柄ごとの取引履歴から、同じ件数のトレードを復元抽出したパスを多数生成し、
+#   - ケリーf値 (calculate_raw_kelly と同じ式) の分布 -> 信頼下限を Kelly_MC とする
+#   - 1トレードごとに全資金を投じた場合の最大ドローダウン・最終資産倍率の分布
+# を numpy の配列演算でまとめて計算する。
+# ケリー基準方式は「資金 x f値」を投資するため、各トレードは投資額に対するリターン
+# (損益(手数料込) / (数量 x エントリー価格)) として扱い、勝ち負けは評価の統計と同じく
+# リターン >= 0 を勝ちとする。
+# 抽出インデックスは (トレード, パス) の順に並べ、累積系の計算はトレード方向に
+# パス全体のベクトルをまとめて更新する。(パス数 >> トレード数 のため高速)
+# ==============================================================================
+
+MC_COLUMNS = ['Kelly_MC', 'Kelly_MC_Median', 'MC_DD_Median', 'MC_DD_Worst', 'MC_Equity_Median', 'MC_Equity_Worst']
+
+# 1回に生成するサンプル数 (パス数 x トレード数) の上限。メモリ使用量を抑えるためパスを分割する
+_MAX_CHUNK_ELEMENTS = 1 << 22
+
+
+def trade_returns(history_df):
+    """取引履歴のDataFrameから投資額に対するリターンの配列を返す。未決済のまま終了した取引は除外する。"""
+    if '決済根拠' in history_df.columns:
+        history_df = history_df[history_df['決済根拠'] != "End of Backtest"]
+    pnl = pd.to_numeric(history_df['損益(手数料込)'], errors='coerce').to_numpy(dtype=np.float64)
+    notional = (pd.to_numeric(history_df['数量'], errors='coerce') * pd.to_numeric(history_df['エントリー価格'], errors='coerce')).to_numpy(dtype=np.float64)
+    valid = np.isfinite(pnl) & np.isfinite(notional) & (notional > 0)
+    return pnl[valid] / notional[valid]
+
+
+def kelly_fraction(wins, n, gross_won, gross_lost):
+    """
+    calculate_raw_kelly と同じ式 f = (p*R - (1-p)) / R をパスごとの配列で計算し、[-1, 1] に丸める。
+    負けなし (R = inf) は f = p、勝ちがない・平均利益が0の場合は下限 (-1) とする。
+    """
+    losses = n - wins
+    p = wins / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rr = (gross_won / np.maximum(wins, 1)) / (gross_lost / np.maximum(losses, 1))
+        f = (p * rr - (1 - p)) / rr
+    f = np.where(losses == 0, p, f)
+    f = np.where((wins == 0) | ~np.isfinite(f), -1.0, f)
+    return np.clip(f, -1.0, 1.0)
+
+
+def _simulate_chunk(r, lr, pos, first_win, horizon, n_paths, rng):
+    idx = rng.integers(0, len(r), size=(horizon, n_paths), dtype=np.int32)
+    # ドローダウン: 対数資産・ピーク・ピークからの最大下落をトレードごとに更新
+    log_equity, peak = np.zeros(n_paths, np.float32), np.zeros(n_paths, np.float32)
+    worst, tmp = np.zeros(n_paths, np.float32), np.empty(n_paths, np.float32)
+    for step in lr[idx]:
+        log_equity += step
+        np.maximum(peak, log_equity, out=peak)
+        np.subtract(log_equity, peak, out=tmp)
+        np.minimum(worst, tmp, out=worst)
+    # ケリーf値: r は昇順に並べてあるため、勝ちトレードは first_win 以降のインデックス
+    wins = np.add.reduce(idx >= first_win, axis=0, dtype=np.int32)
+    gross_won = pos[idx].sum(axis=0, dtype=np.float64)
+    gross_lost = gross_won - r[idx].sum(axis=0, dtype=np.float64)
+    return kelly_fraction(wins, horizon, gross_won, gross_lost), 1.0 - np.exp(worst.astype(np.float64)), np.exp(log_equity.astype(np.float64))
+
+
+def simulate(returns, n_paths=10000, confidence=0.95, horizon=None, rng=None):
+    """
+    1銘柄分のトレードリターンをブートストラップし、MC_COLUMNS の値を辞書で返す。
+    horizon: 1パスあたりのトレード数 (省略時は元の取引件数)
+    """
+    r = np.sort(np.asarray(returns, dtype=np.float64)).astype(np.float32)
+    horizon = horizon or len(r)
+    rng = rng if rng is not None else np.random.default_rng()
+    lr = np.log1p(np.clip(r, -0.999999, None))
+    pos = np.maximum(r, 0)
+    first_win = int(np.searchsorted(r, 0.0, side='left'))
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // horizon)
+
+    parts = [_simulate_chunk(r, lr, pos, first_win, horizon, min(chunk, n_paths - start), rng) for start in range(0, n_paths, chunk)]
+    kelly, drawdown, equity = (np.concatenate(arrays) for arrays in zip(*parts))
+
+    lower, upper = (1.0 - confidence) * 100, confidence * 100
+    return {
+        'Kelly_MC': float(np.percentile(kelly, lower)),
+        'Kelly_MC_Median': float(np.median(kelly)),
+        'MC_DD_Median': float(np.median(drawdown)),
+        'MC_DD_Worst': float(np.percentile(drawdown, upper)),
+        'MC_Equity_Median': float(np.median(equity)),
+        'MC_Equity_Worst': float(np.percentile(equity, lower)),
+    }
+
+
+def simulate_trade_history(history_df, n_paths=10000, confidence=0.95, min_trades=5, horizon=None, seed=None, group_column='銘柄'):
+    """
+    取引履歴を group_column (既定: 銘柄) ごとにブートストラップし、
+    group_column + MC_COLUMNS のDataFrameを返す。取引が min_trades 件未満のグループは NaN。
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for key, group in history_df.groupby(history_df[group_column].astype(str), sort=True):
+        returns = trade_returns(group)
+        row = {group_column: key}
+        if len(returns) >= max(min_trades, 1):
+            row.update(simulate(returns, n_paths, confidence, horizon, rng))
+        else:
+            row.update({col: np.nan for col in MC_COLUMNS})
+        rows.append(row)
+    return pd.DataFrame(rows, columns=[group_column] + MC_COLUMNS)
\ No newline at end of file
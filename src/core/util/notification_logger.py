@@ -2,8 +2,37 @@ import sqlite3
 import threading
 from datetime import datetime
 import os
+# ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+import logging
+from . import db_writer
+
+logger = logging.getLogger(__name__)
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 class NotificationLogger:
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    CREATE_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS notification_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            recipient TEXT,
+            subject TEXT,
+            body TEXT,
+            status TEXT NOT NULL,
+            error_message TEXT
+        )
+    '''
+    INSERT_SQL = '''
+        INSERT INTO notification_history (id, timestamp, priority, recipient, subject, body, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
+    '''
+    INSERT_AUTO_ID_SQL = '''
+        INSERT INTO notification_history (timestamp, priority, recipient, subject, body, status)
+        VALUES (?, ?, ?, ?, ?, 'PENDING')
+    '''
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def __init__(self, db_path: str):
         """
         データベースへの接続とテーブルの初期化を行う。
@@ -15,29 +44,36 @@ class NotificationLogger:
 
         self._db_path = db_path
         self._lock = threading.Lock() # スレッドセーフな操作のためのロック
-        # check_same_thread=False は、複数スレッドからのアクセスを許可するために必要
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self._create_table()
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # 書き込みは共有の書き込みスレッド (db_writer) のキューに積むだけで、呼び出し元 (ストラテジーのスレッド) を待たせない
+        self.db = db_writer.open_database(db_path, schema=(self.CREATE_TABLE_SQL,))
+        # log_request はIDを即座に返す必要があるため、IDは書き込み前にこのプロセスで採番する
+        self._next_id = self.db.call(self._max_id).result() + 1
+        # 他のプロセスが同じIDを先に使っていた場合の {採番したID: 実際のID}
+        self._remap = {}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
-    def _create_table(self):
-        """
-        通知履歴を保存するテーブルを作成する。
-        """
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    @staticmethod
+    def _max_id(conn) -> int:
+        """使用済みの最大ID (削除済みの行を含む AUTOINCREMENT の採番値) を返す。"""
+        max_id = conn.execute("SELECT MAX(id) FROM notification_history").fetchone()[0] or 0
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'notification_history'").fetchone()
+        except sqlite3.Error:
+            row = None
+        return max(max_id, row[0] if row else 0)
+
+    def _on_insert_error(self, conn, params, error):
+        """採番したIDが使用済みだった場合は、IDを自動採番させて挿入し直す。"""
+        if not isinstance(error, sqlite3.IntegrityError):
+            raise error
+        cursor = conn.execute(self.INSERT_AUTO_ID_SQL, params[1:])
         with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS notification_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    priority TEXT NOT NULL,
-                    recipient TEXT,
-                    subject TEXT,
-                    body TEXT,
-                    status TEXT NOT NULL,
-                    error_message TEXT
-                )
-            ''')
-            self.conn.commit()
+            self._remap[params[0]] = cursor.lastrowid
+            self._next_id = max(self._next_id, cursor.lastrowid + 1)
+        logger.warning(f"Notification id {params[0]} was already used; recorded as {cursor.lastrowid}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def log_request(self, priority: str, recipient: str, subject: str, body: str) -> int:
         """
@@ -45,16 +81,14 @@ class NotificationLogger:
         - statusは 'PENDING' として記録される。
         - 戻り値: 作成されたレコードのID (rowid)
         """
-        sql = '''
-            INSERT INTO notification_history (timestamp, priority, recipient, subject, body, status)
-            VALUES (?, ?, ?, ?, ?, 'PENDING')
-        '''
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
         with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (timestamp, priority, recipient, subject, body))
-            self.conn.commit()
-            return cursor.lastrowid
+            record_id = self._next_id
+            self._next_id += 1
+        self.db.execute(self.INSERT_SQL, (record_id, timestamp, priority, recipient, subject, body), on_error=self._on_insert_error)
+        return record_id
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def update_status(self, record_id: int, status: str, error_message: str = ""):
         """
@@ -66,14 +100,18 @@ class NotificationLogger:
             SET status = ?, error_message = ?
             WHERE id = ?
         '''
-        with self._lock:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (status, error_message, record_id))
-            self.conn.commit()
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # IDの読み替えは挿入の後に書き込みスレッドで行う
+        self.db.execute(sql, lambda: (status, error_message, self._remap.get(record_id, record_id)))
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def close(self):
         """
         データベース接続を閉じる。
         """
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+        # 積まれた書き込みをコミットしてから閉じる
+        if self.db:
+            self.db.close()
+            self.db = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
\ No newline at end of file
@@ -7,9 +7,25 @@ import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from .notification_logger import NotificationLogger
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+import re
+from collections import deque
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 logger = logging.getLogger(__name__)
 
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+# --- 既定値 (email_config.yml の同名のキーで上書きできる) ---
+DIGEST_WINDOW = 60                # NORMAL の通知をまとめる時間 (秒)。0 でまとめずに1件ずつ送信する
+DIGEST_GROUP_BY = 'symbol'        # まとめる単位: 'symbol' (件名末尾の括弧内の銘柄) / 'event' (銘柄を除いた件名)
+METRICS_REPORT_INTERVAL = 300     # キューの長さ・配信遅延をログに出力する間隔 (秒)。0 で無効
+IDLE_CHECK_SECONDS = 60           # この秒数以上使っていない接続だけ、送信前に noop で生存を確認する
+MAX_RETRIES = 5                   # 一時的なエラー (4xx: レート制限など) の再試行回数
+BACKOFF_INITIAL, BACKOFF_MAX = 1.0, 60.0
+
+_SYMBOL_PATTERN = re.compile(r'^(.*?)\s*\(([^()]+)\)\s*$')
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 # --- グローバル変数 ---
 _notification_queue = queue.PriorityQueue()
 _worker_thread = None
@@ -17,70 +33,267 @@ _stop_event = threading.Event()
 _smtp_server = None
 _email_config = None
 _logger_instance = None
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+_last_used = 0.0
+_pending_digest = 0  # まとめ送信待ちの通知数 (ワーカースレッドが更新)
+
+
+class _DeliveryMetrics:
+    """配信のメトリクス。遅延は送信リクエストからSMTPサーバーが受理するまでの秒数 (直近1000件)。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'messages': 0, 'notifications': 0, 'digests': 0, 'failed': 0, 'retries': 0}
+        self.latency = {'URGENT': deque(maxlen=1000), 'NORMAL': deque(maxlen=1000)}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def record(self, priority, seconds):
+        with self._lock:
+            self.latency[priority].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latency = {priority: sorted(samples) for priority, samples in self.latency.items()}
+        stats = {}
+        for priority, samples in latency.items():
+            stats[priority] = None if not samples else {
+                'count': len(samples), 'mean': sum(samples) / len(samples),
+                'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))], 'max': samples[-1]}
+        return counters, stats
+
+
+_metrics = _DeliveryMetrics()
+
+
+def get_metrics():
+    """
+    通知配信のメトリクスを返す。
+    - queue_depth: 未送信の通知数 (キュー内 + まとめ送信待ち)
+    - messages / notifications / digests: 送信したメール数 / それに含まれる通知数 / まとめメール数
+    - failed / retries: 送信に失敗した通知数 / 一時的なエラーによる再試行回数
+    - latency: 優先度ごとの配信遅延 {'count', 'mean', 'p99', 'max'} (秒)。送信がなければ None
+    """
+    counters, latency = _metrics.snapshot()
+    return {'queue_depth': _notification_queue.qsize() + _pending_digest, **counters, 'latency': latency}
+
+
+def log_metrics():
+    metrics = get_metrics()
+    logger.info(f"Notifier: {metrics['queue_depth']} queued, {metrics['messages']} mails sent "
+                f"({metrics['notifications']} notifications, {metrics['digests']} digests), "
+                f"{metrics['failed']} failed, {metrics['retries']} retries")
+    for priority, stats in metrics['latency'].items():
+        if stats:
+            logger.info(f"Notifier delivery latency ({priority}): {stats['count']} notifications, mean {stats['mean']:.2f} s, "
+                        f"p99 {stats['p99']:.2f} s, max {stats['max']:.2f} s")
+
+
+def _config_value(name, default):
+    return (_email_config or {}).get(name, default)
+
+
+def _close_server():
+    global _smtp_server
+    if _smtp_server:
+        try:
+            _smtp_server.close()
+        except Exception:
+            pass
+    _smtp_server = None
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 def _get_server():
     global _smtp_server, _email_config
     if _email_config is None: _email_config = load_email_config()
     if not _email_config.get("ENABLED"): return None
+    # ▼▼▼【変更箇所: 接続の再利用 (送信ごとの noop をやめ、しばらく使っていない接続だけ確認する)】▼▼▼
     if _smtp_server:
+        if time.monotonic() - _last_used < IDLE_CHECK_SECONDS:
+            return _smtp_server
         try:
             if _smtp_server.noop()[0] == 250: return _smtp_server
-        except smtplib.SMTPServerDisconnected:
-            logger.warning("SMTPサーバーとの接続が切断されました。再接続します。")
-            _smtp_server = None
+        except smtplib.SMTPException:
+            pass
+        logger.warning("SMTPサーバーとの接続が切断されました。再接続します。")
+        _close_server()
     try:
         server_name, server_port = _email_config["SMTP_SERVER"], _email_config["SMTP_PORT"]
         logger.info(f"SMTPサーバーに新規接続します: {server_name}:{server_port}")
         server = smtplib.SMTP(server_name, server_port, timeout=20)
-        server.starttls()
-        server.login(_email_config["SMTP_USER"], _email_config["SMTP_PASSWORD"])
+        if _config_value("USE_TLS", True):
+            server.starttls()
+        if _email_config.get("SMTP_PASSWORD"):
+            server.login(_email_config["SMTP_USER"], _email_config["SMTP_PASSWORD"])
         _smtp_server = server
         return _smtp_server
     except Exception as e:
         logger.critical(f"SMTPサーバーへの接続/ログイン失敗: {e}", exc_info=True)
         return None
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+# ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+def _is_transient(error):
+    """一時的なエラー (4xx: レート制限・一時的な受信拒否など) かどうか。"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+
+def _send_with_retry(msg):
+    """
+    1つの接続を使い回して送信する。成功すれば None、失敗すればエラーメッセージを返す。
+    - 接続が切れていた場合は再接続して1回だけすぐに再送する
+    - 一時的なエラー (レート制限など) は BACKOFF_INITIAL 秒から倍々に待って MAX_RETRIES 回まで再送する
+    """
+    global _last_used
+    delay, reconnected = BACKOFF_INITIAL, False
+    for attempt in range(MAX_RETRIES + 1):
+        server = _get_server()
+        if not server:
+            return "SMTP Server not available"
+        try:
+            server.send_message(msg)
+            _last_used = time.monotonic()
+            return None
+        except smtplib.SMTPServerDisconnected as e:
+            _close_server()
+            if reconnected:
+                return str(e)
+            reconnected = True
+            logger.warning(f"SMTPサーバーとの接続が切断されました。再接続して再送します: {e}")
+            continue
+        except Exception as e:
+            if not _is_transient(e):
+                _close_server()
+                return str(e)
+            if getattr(e, 'smtp_code', None) == 421:
+                # 421 の後はサーバーが接続を閉じる
+                _close_server()
+            if attempt == MAX_RETRIES:
+                return str(e)
+            logger.warning(f"SMTPサーバーが一時的に送信を拒否しました。{delay:.0f}秒後に再送します: {e}")
+            _metrics.count('retries')
+            if _stop_event.wait(delay):
+                return f"Retry aborted by shutdown: {e}"
+            delay = min(delay * 2, BACKOFF_MAX)
+    return "SMTP send failed"
+
+
+def _digest_key(subject):
+    """まとめる単位のキー。件名が「... (銘柄)」の形でなければ件名そのもの。"""
+    match = _SYMBOL_PATTERN.match(subject)
+    if not match:
+        return subject
+    return match.group(2) if _config_value("DIGEST_GROUP_BY", DIGEST_GROUP_BY) == 'symbol' else match.group(1)
+
+
+def _build_message(items, digest_key=None):
+    msg = MIMEMultipart()
+    msg['From'] = _email_config["SMTP_USER"]
+    msg['To'] = _email_config["RECIPIENT_EMAIL"]
+    if len(items) == 1:
+        subject, body = items[0]['subject'], items[0]['body']
+    else:
+        subject = f"【まとめ】{digest_key} ({len(items)}件)"
+        separator = "\n------------------------------------\n"
+        body = separator.join(f"■ {item['subject']}\n{item['body']}" for item in items)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    return msg
+
+
+def _deliver(items, digest_key=None):
+    """通知 (まとめる場合は複数) を1通のメールで送信し、各通知のステータスを更新する。"""
+    if not load_email_config().get("ENABLED"):
+        error = "SMTP Server not available"
+    else:
+        logger.info(f"メールを送信中... To: {_email_config['RECIPIENT_EMAIL']} ({len(items)}件)")
+        error = _send_with_retry(_build_message(items, digest_key))
+    now = time.time()
+    for item in items:
+        if _logger_instance:
+            _logger_instance.update_status(item['record_id'], "FAILED" if error else "SUCCESS", error or "")
+        if not error:
+            _metrics.record(item['priority'], now - item['requested_at'])
+    if error:
+        _metrics.count('failed', len(items))
+        logger.critical(f"メール送信中にエラー: {error}")
+        return
+    _metrics.count('messages')
+    _metrics.count('notifications', len(items))
+    if len(items) > 1:
+        _metrics.count('digests')
+    logger.info("メールを正常に送信しました。")
+
+
+def _handle(item, digests):
+    """URGENT はすぐに送信し、NORMAL はまとめ送信待ちに加える。"""
+    global _pending_digest
+    window = _config_value("DIGEST_WINDOW", DIGEST_WINDOW)
+    if item['priority'] == 'URGENT' or not window:
+        _deliver([item])
+        return
+    key = _digest_key(item['subject'])
+    digest = digests.setdefault(key, {'deadline': time.monotonic() + window, 'items': []})
+    digest['items'].append(item)
+    _pending_digest += 1
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 def _email_worker():
-    while not _stop_event.is_set():
+    # ▼▼▼【変更箇所: 通知のまとめ送信・接続の再利用・メトリクス】▼▼▼
+    # 送信ごとの待機 (URGENT 0.1秒 / NORMAL 2秒) をやめ、キューに溜まった通知は同じ接続で続けて送信する。
+    # NORMAL の通知は最初の1件から DIGEST_WINDOW 秒の間、キー (銘柄またはイベント) ごとに1通にまとめる。
+    global _pending_digest
+    digests = {}
+    last_report = time.monotonic()
+    stopping = False
+    while not stopping:
+        timeout = 1.0
+        if digests:
+            timeout = max(0.0, min(timeout, min(d['deadline'] for d in digests.values()) - time.monotonic()))
         try:
-            # <<< 変更点 1/3: タイムスタンプも受け取るようにアンパック処理を変更
-            priority, timestamp, item = _notification_queue.get(timeout=1)
-            if item is None: break
-
-            record_id = item['record_id']
-            server = _get_server()
-            if not server:
-                if _logger_instance:
-                    _logger_instance.update_status(record_id, "FAILED", "SMTP Server not available")
-                continue
-            
-            msg = MIMEMultipart()
-            msg['From'] = _email_config["SMTP_USER"]
-            msg['To'] = _email_config["RECIPIENT_EMAIL"]
-            msg['Subject'] = item['subject']
-            msg.attach(MIMEText(item['body'], 'plain', 'utf-8'))
+            priority, timestamp, item = _notification_queue.get(timeout=timeout)
+            if item is None:
+                # 停止時はキューに残った通知とまとめ送信待ちの通知をすべて送信してから終了する
+                stopping = True
+                while True:
+                    try:
+                        _, _, rest = _notification_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if rest is not None:
+                        _handle(rest, digests)
+            else:
+                _handle(item, digests)
+        except queue.Empty:
+            pass
+        except Exception as e:
+            logger.error(f"通知の処理中にエラー: {e}", exc_info=True)
 
+        now = time.monotonic()
+        for key in [key for key, d in digests.items() if stopping or d['deadline'] <= now]:
+            items = digests.pop(key)['items']
+            _pending_digest -= len(items)
             try:
-                logger.info(f"メールを送信中... To: {_email_config['RECIPIENT_EMAIL']}")
-                server.send_message(msg)
-                if _logger_instance: _logger_instance.update_status(record_id, "SUCCESS")
-                logger.info("メールを正常に送信しました。")
+                _deliver(items, key)
             except Exception as e:
-                if _logger_instance: _logger_instance.update_status(record_id, "FAILED", str(e))
-                logger.critical(f"メール送信中にエラー: {e}", exc_info=True)
-                global _smtp_server
-                _smtp_server = None
-            
-            time.sleep(0.1 if priority == 0 else 2.0)
-        except queue.Empty:
-            continue
+                logger.error(f"通知の処理中にエラー: {e}", exc_info=True)
+        report_interval = _config_value("METRICS_REPORT_INTERVAL", METRICS_REPORT_INTERVAL)
+        if report_interval and now - last_report >= report_interval:
+            log_metrics()
+            last_report = now
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
-def start_notifier():
+# ▼▼▼【変更箇所: 通知履歴DBのパスを指定可能に】▼▼▼
+def start_notifier(db_path="log/notification_history.db"):
     global _worker_thread, _logger_instance
     if _logger_instance is None:
-        db_path = "log/notification_history.db"
         _logger_instance = NotificationLogger(db_path)
         logger.info(f"通知ロガーを初期化しました。DB: {db_path}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     if _worker_thread is None or not _worker_thread.is_alive():
         _stop_event.clear()
         _worker_thread = threading.Thread(target=_email_worker, daemon=True)
@@ -88,18 +301,32 @@ def start_notifier():
         logger.info("メール通知ワーカースレッドを開始しました。")
 
 def stop_notifier():
-    global _worker_thread, _smtp_server, _logger_instance
+    global _worker_thread, _logger_instance
     if _worker_thread and _worker_thread.is_alive():
         logger.info("メール通知ワーカースレッドを停止します...")
+        # ▼▼▼【変更箇所: 新規の受け付けを止め、再送の待機を打ち切る】▼▼▼
+        _stop_event.set()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         # <<< 変更点 2/3: 停止シグナルの形式をタプルに合わせる
         _notification_queue.put((-1, time.time(), None))
         _worker_thread.join(timeout=10)
     if _smtp_server:
-        _smtp_server.quit()
-        _smtp_server = None
+        # ▼▼▼【変更箇所: 切断済みの接続でも停止処理を続ける】▼▼▼
+        try:
+            _smtp_server.quit()
+        except smtplib.SMTPException:
+            pass
+        _close_server()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("SMTPサーバーとの接続を閉じました。")
+    # ▼▼▼【変更箇所: 終了時のメトリクス】▼▼▼
+    log_metrics()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
     if _logger_instance:
         _logger_instance.close()
+        # ▼▼▼【変更箇所: 再起動時に通知ロガーを作り直す】▼▼▼
+        _logger_instance = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("通知ロガーの接続を閉じました。")
     _worker_thread = None
     logger.info("メール通知システムが正常に停止しました。")
@@ -136,7 +363,9 @@ def send_email(subject, body, immediate=False):
         
         # <<< 変更点 3/3: タイムスタンプをキューのタプルに追加
         timestamp = time.time()
-        item = {'record_id': record_id, 'subject': subject, 'body': body}
+        # ▼▼▼【変更箇所: 配信遅延の計測用に優先度とリクエスト時刻を保持】▼▼▼
+        item = {'record_id': record_id, 'subject': subject, 'body': body, 'priority': priority_str, 'requested_at': timestamp}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         _notification_queue.put((priority_val, timestamp, item))
 
     except Exception as e:
@@ -8,6 +8,8 @@ import yaml
 import logging
 from collections import defaultdict
 
+from src.core import data_cache
+
 logger = logging.getLogger(__name__)
 
 # --- 定数定義 (新しいディレクトリ構造に対応) ---
@@ -74,9 +76,7 @@ def load_data():
 
                 if data_files:
                     try:
-                        df = pd.read_csv(data_files[0], index_col='datetime', parse_dates=True)
-                        df.columns = [x.lower() for x in df.columns]
-                        if df.index.tz is not None: df.index = df.index.tz_localize(None)
+                        df = data_cache.read_ohlcv(data_files[0], tz_naive=True)
                         price_data_cache[symbol][tf_name] = df
                     except Exception as e:
                         logger.error(f"[{symbol}] {tf_name}のデータ読み込みに失敗: {data_files[0]} - {e}")
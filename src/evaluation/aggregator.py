@@ -8,6 +8,8 @@ import re
 from datetime import datetime
 import numpy as np # <-- [追加]
 from src.core.util.kelly_criterion import calculate_raw_kelly # <-- [追加]
+from src.core.util.monte_carlo import MC_COLUMNS, simulate_trade_history
+from . import config_evaluation
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,33 @@ def get_strategy_name_from_summary(summary_file_path, default_name="Unknown"):
         logger.error(f"サマリーファイル '{summary_file_path}' の読み込み中にエラー: {e}")
     return default_name
 
+# ▼▼▼【変更箇所: 列の抽出・数値変換・並べ替えを build_summary_table に分離 (パラメータスイープでも使用)】▼▼▼
+SUMMARY_COLUMNS = [
+    "戦略名", "純利益", "総利益", "総損失", "PF", "勝率",
+    "総トレード数", "勝トレード", "負トレード", "平均利益", "平均損失", "RR比"
+]
+
+def build_summary_table(summary_series_list, extra_rows=None):
+    """
+    戦略ごとのサマリー (項目 -> 結果 のSeries) のリストから、統合サマリー形式のDataFrameを生成します。
+    extra_rows: 各行に追加する列の辞書のリスト (任意、summary_series_list と同じ順序)。
+    """
+    all_summaries = []
+    for i, series in enumerate(summary_series_list):
+        summary_data = {col: series.get(col, "N/A") for col in SUMMARY_COLUMNS}
+        if extra_rows: summary_data.update(extra_rows[i])
+        all_summaries.append(summary_data)
+
+    summary_df = pd.DataFrame(all_summaries)
+    numeric_cols = [col for col in SUMMARY_COLUMNS if col != "戦略名"]
+    for col in numeric_cols:
+        if col in summary_df.columns:
+            summary_df[col] = summary_df[col].astype(str).str.replace(r'[¥,%]', '', regex=True)
+            summary_df[col] = pd.to_numeric(summary_df[col], errors='coerce')
+
+    return summary_df.sort_values(by="純利益", ascending=False).reset_index(drop=True)
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 def aggregate_summaries(results_dir, timestamp):
     """
     全戦略のサマリーレポートを一つのファイルに統合します。
@@ -33,17 +62,10 @@ def aggregate_summaries(results_dir, timestamp):
         return
 
     all_summaries = []
-    report_columns = [
-        "戦略名", "純利益", "総利益", "総損失", "PF", "勝率",
-        "総トレード数", "勝トレード", "負トレード", "平均利益", "平均損失", "RR比"
-    ]
-
     for f in summary_files:
         try:
             df = pd.read_csv(f)
-            series = df.set_index('項目')['結果']
-            summary_data = {col: series.get(col, "N/A") for col in report_columns}
-            all_summaries.append(summary_data)
+            all_summaries.append(df.set_index('項目')['結果'])
         except Exception as e:
             logging.error(f"ファイル '{f}' の処理中にエラー: {e}")
 
@@ -51,14 +73,7 @@ def aggregate_summaries(results_dir, timestamp):
         logging.warning("有効なサマリーデータがありませんでした。")
         return
 
-    summary_df = pd.DataFrame(all_summaries)
-    numeric_cols = [col for col in report_columns if col != "戦略名"]
-    for col in numeric_cols:
-        if col in summary_df.columns:
-            summary_df[col] = summary_df[col].astype(str).str.replace(r'[¥,%]', '', regex=True)
-            summary_df[col] = pd.to_numeric(summary_df[col], errors='coerce')
-
-    summary_df = summary_df.sort_values(by="純利益", ascending=False).reset_index(drop=True)
+    summary_df = build_summary_table(all_summaries)
     
     output_filename = f"all_summary_{timestamp}.csv"
     output_path = os.path.join(results_dir, output_filename)
@@ -73,6 +88,7 @@ def aggregate_details(results_dir, timestamp):
     """
     全戦略の銘柄別詳細レポートを一つのファイルに統合します。
     [修正] ケリー基準 (Raw / Adj) を計算して追加します。
+    [追加] 銘柄ごとの取引履歴のモンテカルロ (Kelly_MC / MC_*) を追加します。
     """
     logging.info("--- 全銘柄別詳細レポートの生成を開始 ---")
     strategy_dirs = [d for d in glob.glob(os.path.join(results_dir, "strategy_*")) if os.path.isdir(d)]
@@ -139,6 +155,17 @@ def aggregate_details(results_dir, timestamp):
                             detailed_symbols = set(detail_df['銘柄'].astype(str))
                         
                         missing_symbols = traded_symbols - detailed_symbols
+
+                        # ▼▼▼【変更箇所: 取引履歴のブートストラップ結果を銘柄ごとに結合】▼▼▼
+                        if config_evaluation.MONTE_CARLO_PATHS > 0 and not detail_df.empty:
+                            mc_df = simulate_trade_history(
+                                history_df, n_paths=config_evaluation.MONTE_CARLO_PATHS,
+                                confidence=config_evaluation.MONTE_CARLO_CONFIDENCE,
+                                min_trades=config_evaluation.MONTE_CARLO_MIN_TRADES,
+                                seed=config_evaluation.MONTE_CARLO_SEED)
+                            detail_df['銘柄'] = detail_df['銘柄'].astype(str)
+                            detail_df = detail_df.merge(mc_df, on='銘柄', how='left')
+                        # ▲▲▲【変更箇所ここまで】▲▲▲
                         
                         if missing_symbols:
                             logging.warning(f"戦略 '{strategy_name}' で集計漏れの銘柄を検出: {missing_symbols}")
@@ -181,6 +208,11 @@ def aggregate_details(results_dir, timestamp):
             lambda x: f"{x:.4f}" if pd.notna(x) else "N/A"
         )
     # --- ▲▲▲ 挿入ブロック END ▲▲▲ ---
+    # ▼▼▼【変更箇所】▼▼▼
+    for col in MC_COLUMNS:
+        if col in combined_details_df.columns:
+            combined_details_df[col] = combined_details_df[col].apply(lambda x: f"{x:.4f}" if pd.notna(x) else "N/A")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     output_filename = f"all_detail_{timestamp}.csv"
     output_path = os.path.join(results_dir, output_filename)
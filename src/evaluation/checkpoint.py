@@ -0,0 +1,88 @@
+import os
+import json
+import logging
+import pandas as pd
+
+from .engine import SymbolResult
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 評価実行のチェックポイント
+# 完了した (戦略, 銘柄) ジョブの結果を結果ディレクトリの manifest.jsonl に1行ずつ追記する。
+# 実行開始時の入力 (ベース設定・戦略カタログ) は run_config.json に保存し、
+# `run_evaluation --resume <結果ディレクトリ>` では同じ入力で未完了のジョブだけを実行する。
+# 書き込み途中で中断された末尾の行は読み込み時に無視する。
+# ==============================================================================
+
+MANIFEST_FILE = 'manifest.jsonl'
+RUN_CONFIG_FILE = 'run_config.json'
+
+
+def _encode_date(value):
+    return value.isoformat() if value is not None else None
+
+def _decode_date(value):
+    return pd.Timestamp(value) if value is not None else None
+
+
+class RunManifest:
+    """1回の評価実行 (結果ディレクトリ) のチェックポイント。"""
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.manifest_path = os.path.join(run_dir, MANIFEST_FILE)
+        self.run_config_path = os.path.join(run_dir, RUN_CONFIG_FILE)
+        self._file = None
+
+    def save_run_config(self, base_config, strategies):
+        os.makedirs(self.run_dir, exist_ok=True)
+        with open(self.run_config_path, 'w', encoding='utf-8') as f:
+            json.dump({'base_config': base_config, 'strategies': strategies}, f, ensure_ascii=False, default=str)
+
+    def load_run_config(self):
+        """保存済みの (base_config, strategies) を返す。"""
+        with open(self.run_config_path, 'r', encoding='utf-8') as f:
+            run_config = json.load(f)
+        return run_config['base_config'], run_config['strategies']
+
+    def load_completed(self):
+        """完了済みジョブの {(戦略番号, 銘柄): SymbolResult} を返す。"""
+        completed = {}
+        if not os.path.exists(self.manifest_path): return completed
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                    result = SymbolResult(record['strategy_index'], record['symbol'], record['stats'],
+                                          _decode_date(record['start_date']), _decode_date(record['end_date']), record['trades'])
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"マニフェストの {line_no} 行目を読み込めないためスキップします: {e}")
+                    continue
+                completed[(result.strategy_index, result.symbol)] = result
+        return completed
+
+    def record(self, symbol_result):
+        """成功したジョブの結果を1行追記し、ディスクに書き出す。(失敗したジョブは再開時に再実行する)"""
+        if symbol_result.error: return
+        if self._file is None:
+            os.makedirs(self.run_dir, exist_ok=True)
+            # 中断で改行が書かれなかった末尾の行に続けて書かないようにする
+            needs_newline = False
+            if os.path.exists(self.manifest_path) and os.path.getsize(self.manifest_path) > 0:
+                with open(self.manifest_path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\n'
+            self._file = open(self.manifest_path, 'a', encoding='utf-8')
+            if needs_newline: self._file.write('\n')
+        record = {'strategy_index': symbol_result.strategy_index, 'symbol': symbol_result.symbol, 'stats': symbol_result.stats,
+                  'start_date': _encode_date(symbol_result.start_date), 'end_date': _encode_date(symbol_result.end_date),
+                  'trades': symbol_result.trades}
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
\ No newline at end of file
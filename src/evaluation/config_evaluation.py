@@ -5,6 +5,52 @@ import logging
 # 説明: evaluationパッケージ全体の設定を管理します。
 # ==============================================================================
 
+# --- 並列実行設定 ---
+
+# (戦略, 銘柄) 単位のバックテストを実行するワーカープロセス数。
+# None の場合はマシンのCPUコア数を使用します。
+MAX_WORKERS = None
+
+# 各ジョブのバックテストエンジン ('backtrader' または 'vectorized')。
+# 'vectorized' は cerebro.run() と同じ取引結果をはるかに高速に算出します。(未対応の戦略は自動的に 'backtrader')
+BACKTEST_ENGINE = 'backtrader'
+
+# --- 評価結果キャッシュ ---
+
+# True の場合、(戦略, 銘柄) ごとの結果を保存し、戦略パラメータ・バックテスト設定・CSVの内容が
+# 前回と同じジョブはバックテストを省略します。`--force` オプションで常に再計算できます。
+USE_RESULT_CACHE = True
+RESULT_CACHE_DIR = 'results/evaluation_cache'
+
+# --- モンテカルロ (all_detail の Kelly_MC / MC_* 列) ---
+
+# 銘柄ごとの取引履歴をブートストラップするパス数。0 の場合はモンテカルロ列を出力しません。
+MONTE_CARLO_PATHS = 10000
+# Kelly_MC (f値の下限)・MC_DD_Worst・MC_Equity_Worst に使う信頼水準
+MONTE_CARLO_CONFIDENCE = 0.95
+# 取引数がこれ未満の銘柄は N/A とします。
+MONTE_CARLO_MIN_TRADES = 5
+# 乱数シード (同じ結果を再現するため)。None の場合は毎回異なります。
+MONTE_CARLO_SEED = 0
+
+# --- ウォークフォワード評価 (python -m src.evaluation.run_walkforward) ---
+
+# 学習ウィンドウ・検証ウィンドウの営業日数。学習ウィンドウで銘柄ごとに最も純利益の高い戦略を選び、
+# 直後の検証ウィンドウでの成績をアウトオブサンプルの成績として集計します。
+WALKFORWARD_TRAIN_DAYS = 60
+WALKFORWARD_TEST_DAYS = 20
+# ウィンドウをずらす営業日数。None の場合は検証ウィンドウと同じ (検証期間が重ならない)。
+WALKFORWARD_STEP_DAYS = None
+
+# --- パラメータスイープ設定 (python -m src.evaluation.run_sweep) ---
+
+# スイープのワーカープロセス数。None の場合は MAX_WORKERS と同じ。
+SWEEP_MAX_WORKERS = None
+
+# 1ジョブで実行するグリッド点の数。None の場合はワーカー数とグリッドの大きさから自動で決めます。
+# 同じジョブ内のグリッド点はインジケーター配列を共有するため、大きいほど再計算が減ります。
+SWEEP_CHUNK_SIZE = None
+
 # --- ロギング設定 ---
 
 # evaluationモジュール自体のログレベル (INFO, DEBUG など)
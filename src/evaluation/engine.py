@@ -0,0 +1,252 @@
+import os
+import copy
+import glob
+import logging
+import tempfile
+import collections
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.core import bar_store
+from src.backtest import config_backtest
+from src.backtest.run_backtest import run_symbol_backtest, build_report_frames, find_base_files
+
+logger = logging.getLogger(__name__)
+
+# ワーカーごとにインジケーターキャッシュを保持する銘柄数 (スイープ・ウォークフォワード)
+INDICATOR_CACHE_SYMBOLS = 4
+
+# ==============================================================================
+# 評価エンジン
+# 戦略カタログの各戦略 × 全銘柄を (strategy, symbol) 単位のジョブに分解し、
+# プロセスプールで並列にバックテストする。
+# 設定ファイルの書き換えやサブプロセス起動は行わず、戦略パラメータはメモリ上で受け渡す。
+# CSVは親プロセスで1回だけパースし、ワーカーはバーストアをメモリマップで共有する。
+# ==============================================================================
+
+
+@dataclass
+class SymbolResult:
+    """1つの (戦略, 銘柄) ジョブの実行結果。"""
+    strategy_index: int
+    symbol: str
+    stats: dict = None
+    start_date: object = None
+    end_date: object = None
+    trades: list = field(default_factory=list)
+    error: str = None
+
+    def as_output(self):
+        """build_report_frames が受け取る形式のタプルを返す。"""
+        return (self.symbol, self.stats, self.start_date, self.end_date, self.trades)
+
+
+@dataclass
+class StrategyResult:
+    """1戦略分の全銘柄の実行結果。"""
+    index: int
+    name: str
+    params: dict
+    symbol_results: list = field(default_factory=list)
+
+    @property
+    def failed_symbols(self):
+        return [r.symbol for r in self.symbol_results if r.error]
+
+    def to_frames(self):
+        """summary / detail / trade_history のDataFrameを生成する。"""
+        ordered = sorted(self.symbol_results, key=lambda r: r.symbol)
+        return build_report_frames(self.params, [r.as_output() for r in ordered])
+
+    def save(self, output_dir):
+        """従来の評価結果と同じファイル名 (summary.csv 等) でレポートを保存する。"""
+        os.makedirs(output_dir, exist_ok=True)
+        summary_df, detail_df, trade_history_df = self.to_frames()
+        if summary_df is not None:
+            summary_df.to_csv(os.path.join(output_dir, 'summary.csv'), index=False, encoding='utf-8-sig')
+        else:
+            logger.warning(f"戦略 '{self.name}' は有効な分析期間がないため、summary.csv を生成しません。")
+        detail_df.to_csv(os.path.join(output_dir, 'detail.csv'), index=False, encoding='utf-8-sig')
+        trade_history_df.to_csv(os.path.join(output_dir, 'trade_history.csv'), index=False, encoding='utf-8-sig')
+
+
+def build_strategy_params(base_config, strategy_def):
+    """ベース設定にカタログの戦略定義を重ね、1戦略分のパラメータを生成する。"""
+    params = copy.deepcopy(base_config)
+    params['strategy_name'] = strategy_def.get('name', 'Unnamed Strategy')
+    params['entry_conditions'] = copy.deepcopy(strategy_def.get('entry_conditions'))
+    return params
+
+
+def _init_worker(log_level_override, bar_store_dir=None):
+    """ワーカープロセスのロギングとバーストアを初期化する。"""
+    if bar_store_dir:
+        bar_store.set_store(bar_store.BarStore.attach(bar_store_dir))
+    if log_level_override == 'NONE':
+        logging.disable(logging.CRITICAL)
+        return
+    level = getattr(logging, log_level_override, logging.INFO)
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
+    root.setLevel(level)
+
+
+_indicator_caches = collections.OrderedDict()
+
+def worker_indicator_cache(symbol):
+    """
+    [ワーカー] 銘柄ごとのベクトル化インジケーターキャッシュ (build_indicators の cache)。
+    直近 INDICATOR_CACHE_SYMBOLS 銘柄分を保持し、同じ銘柄のジョブ間で計算済みの配列を共有する。
+    """
+    cache = _indicator_caches.pop(symbol, None)
+    if cache is None: cache = {}
+    _indicator_caches[symbol] = cache
+    while len(_indicator_caches) > INDICATOR_CACHE_SYMBOLS:
+        _indicator_caches.popitem(last=False)
+    return cache
+
+
+def _run_job(strategy_index, strategy_params, symbol, base_filepath, backtest_engine='backtrader'):
+    """[ワーカー] 1銘柄分のバックテストを実行し、SymbolResultを返す。"""
+    try:
+        stats, start_date, end_date, trade_list = run_symbol_backtest(symbol, base_filepath, strategy_params, backtest_engine)
+        if stats is None:
+            return SymbolResult(strategy_index, symbol, error="データフィードの準備に失敗しました。")
+        return SymbolResult(strategy_index, symbol, stats, start_date, end_date, trade_list or [])
+    except Exception as e:
+        logging.getLogger(__name__).error(f"[{symbol}] バックテスト中にエラー: {e}", exc_info=True)
+        return SymbolResult(strategy_index, symbol, error=f"{type(e).__name__}: {e}")
+
+
+class EvaluationEngine:
+    """
+    戦略カタログ全体を (strategy, symbol) ジョブとしてプロセスプールで実行する。
+    結果はファイルではなく StrategyResult オブジェクトとして返す。
+    """
+    def __init__(self, base_config, strategies, data_dir=None, max_workers=None, log_level_override='NONE', backtest_engine='backtrader', result_cache=None):
+        self.base_config = base_config
+        self.strategies = strategies
+        self.data_dir = data_dir or config_backtest.DATA_DIR
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log_level_override = log_level_override
+        self.backtest_engine = backtest_engine
+        self.result_cache = result_cache
+
+    def build_strategy_results(self):
+        """未サポートの戦略を除外し、空のStrategyResultを戦略順に生成する。"""
+        results = []
+        for i, strategy_def in enumerate(self.strategies):
+            name = strategy_def.get('name', f"Strategy_{i+1}")
+            if strategy_def.get('unsupported'):
+                logger.warning(f"戦略 '{name}' は未サポートのためスキップします。理由: {strategy_def.get('reason', 'N/A')}")
+                continue
+            results.append(StrategyResult(i, name, build_strategy_params(self.base_config, strategy_def)))
+        return results
+
+    def find_symbols(self):
+        """ベースファイルから (銘柄コード, ファイルパス) のリストを返す。"""
+        files = find_base_files(self.base_config, self.data_dir)
+        return [(os.path.basename(f).split('_')[0], f) for f in files]
+
+    def find_data_files(self, symbols):
+        """全ジョブで参照されるCSV (ベースファイル + 'direct' 指定の中長期足) を列挙する。"""
+        files = [filepath for _, filepath in symbols]
+        for tf_config in self.base_config.get('timeframes', {}).values():
+            if tf_config.get('source_type') != 'direct' or not tf_config.get('file_pattern'): continue
+            for symbol, _ in symbols:
+                files.extend(glob.glob(os.path.join(self.data_dir, tf_config['file_pattern'].format(symbol=symbol))))
+        return files
+
+    def preload_bars(self, symbols):
+        """CSVを1回だけパースしたバーストアを生成する。"""
+        store = bar_store.BarStore()
+        loaded = store.preload(self.find_data_files(symbols))
+        logger.info(f"バーストアに {loaded} ファイルを読み込みました。")
+        return store
+
+    def run(self, on_strategy_complete=None, on_job_complete=None, completed=None):
+        """
+        全ジョブを実行する。
+        on_strategy_complete: 戦略の全銘柄が完了するたびに StrategyResult を受け取るコールバック。
+        on_job_complete: ジョブが完了するたびに SymbolResult を受け取るコールバック。(チェックポイント用)
+        completed: 前回の実行で完了済みの {(戦略番号, 銘柄): SymbolResult}。該当ジョブは実行しない。
+        result_cache が設定されている場合、入力が変わっていないジョブはキャッシュした結果を使用する。
+        """
+        strategy_results = self.build_strategy_results()
+        symbols = self.find_symbols()
+        if not strategy_results or not symbols:
+            logger.warning(f"実行対象がありません。(戦略: {len(strategy_results)}件, 銘柄: {len(symbols)}件)")
+            return strategy_results
+
+        by_index = {r.index: r for r in strategy_results}
+        remaining = {r.index: len(symbols) for r in strategy_results}
+        total_jobs = len(strategy_results) * len(symbols)
+        done_count = 0
+
+        def complete(symbol_result, resumed=False):
+            nonlocal done_count
+            done_count += 1
+            if on_job_complete and not resumed:
+                on_job_complete(symbol_result)
+            strategy_result = by_index[symbol_result.strategy_index]
+            strategy_result.symbol_results.append(symbol_result)
+            remaining[strategy_result.index] -= 1
+            if remaining[strategy_result.index] == 0:
+                failed = strategy_result.failed_symbols
+                if failed:
+                    logger.warning(f"戦略 '{strategy_result.name}' で {len(failed)} 銘柄が失敗しました: {failed}")
+                logger.info(f"戦略 '{strategy_result.name}' の全銘柄が完了しました。({done_count}/{total_jobs} ジョブ)")
+                if on_strategy_complete:
+                    on_strategy_complete(strategy_result)
+
+        # 完了済み・キャッシュに結果があるジョブは実行せずに完了扱いとする
+        pending, cache_keys, completed = [], {}, completed or {}
+        for strategy_result in strategy_results:
+            for symbol, filepath in symbols:
+                if (strategy_result.index, symbol) in completed:
+                    complete(completed[(strategy_result.index, symbol)], resumed=True)
+                    continue
+                if self.result_cache is not None:
+                    key = self.result_cache.job_key(symbol, filepath, strategy_result.params, self.data_dir, self.backtest_engine)
+                    cached = self.result_cache.get(key)
+                    if cached is not None:
+                        stats, start_date, end_date, trades = cached
+                        complete(SymbolResult(strategy_result.index, symbol, stats, start_date, end_date, trades))
+                        continue
+                    cache_keys[(strategy_result.index, symbol)] = key
+                pending.append((strategy_result, symbol, filepath))
+        resumed_count = sum(1 for key in completed if key[0] in by_index)
+        if resumed_count:
+            logger.info(f"前回の実行で完了済みの {resumed_count}/{total_jobs} ジョブをスキップします。")
+        if self.result_cache is not None:
+            self.result_cache.save_digests()
+            logger.info(f"評価結果キャッシュ: {total_jobs - resumed_count - len(pending)}/{total_jobs} ジョブを再利用します。")
+        if not pending:
+            return strategy_results
+
+        logger.info(f"{len(strategy_results)}戦略 x {len(symbols)}銘柄のうち {len(pending)}ジョブを {self.max_workers} プロセスで実行します。(エンジン: {self.backtest_engine})")
+
+        pending_symbols = sorted({(symbol, filepath) for _, symbol, filepath in pending})
+        store = self.preload_bars(pending_symbols)
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            futures = {}
+            for strategy_result, symbol, filepath in pending:
+                future = executor.submit(_run_job, strategy_result.index, strategy_result.params, symbol, filepath, self.backtest_engine)
+                futures[future] = (strategy_result.index, symbol)
+
+            for future in as_completed(futures):
+                strategy_index, symbol = futures[future]
+                try:
+                    symbol_result = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({strategy_index}, {symbol}) の実行プロセスが異常終了しました: {e}")
+                    symbol_result = SymbolResult(strategy_index, symbol, error=f"{type(e).__name__}: {e}")
+                if self.result_cache is not None and not symbol_result.error:
+                    self.result_cache.put(cache_keys[(strategy_index, symbol)], symbol_result.stats,
+                                          symbol_result.start_date, symbol_result.end_date, symbol_result.trades)
+                complete(symbol_result)
+
+        return strategy_results
\ No newline at end of file
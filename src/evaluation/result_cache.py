@@ -0,0 +1,137 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import logging
+import threading
+
+from src.backtest import config_backtest
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 評価結果キャッシュ
+# (戦略, 銘柄) ジョブの実行結果 (stats / 期間 / 取引リスト) をディスクに保存し、
+# 次回以降の評価で入力が変わっていないジョブのバックテストを省略する。
+#
+# キーは次の内容の SHA-256:
+#   - マージ済みの戦略パラメータ (戦略名を除く)
+#   - バックテストエンジン (backtrader / vectorized) とバックテスト設定 (初期資金・手数料・スリッページ)
+#   - 銘柄コードと、ジョブが参照する全CSVの内容ハッシュ
+#   - CACHE_VERSION (バックテストの計算ロジックを変更したら上げる)
+# CSVの内容ハッシュは (更新時刻, サイズ) が変わった場合のみ計算し直す。
+# summary / detail / trade_history はキャッシュした銘柄結果から従来どおり生成する。
+# ==============================================================================
+
+CACHE_VERSION = 1
+DIGESTS_FILE = 'file_digests.json'
+_HASH_CHUNK = 1 << 20
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f: f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ResultCache:
+    """ジョブ単位の評価結果キャッシュ。read=False の場合は読み込みを行わず、書き込みのみ行う。(--force)"""
+
+    def __init__(self, cache_dir, read=True):
+        self.cache_dir = cache_dir
+        self.read = read
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._digests_path = os.path.join(cache_dir, DIGESTS_FILE)
+        self._digests = self._load_digests()
+        self._digests_dirty = False
+
+    # --- データファイルのハッシュ -----------------------------------------------
+
+    def _load_digests(self):
+        try:
+            with open(self._digests_path, 'r', encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def file_digest(self, filepath):
+        """CSVの内容ハッシュ。更新時刻・サイズが前回と同じなら保存済みの値を返す。"""
+        key = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        entry = self._digests.get(key)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry['sha256']
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''): h.update(chunk)
+        with self._lock:
+            self._digests[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': h.hexdigest()}
+            self._digests_dirty = True
+        return h.hexdigest()
+
+    def save_digests(self):
+        if not self._digests_dirty: return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _atomic_write(self._digests_path, json.dumps(self._digests).encode('utf-8'))
+            self._digests_dirty = False
+        except OSError as e:
+            logger.warning(f"データファイルのハッシュの保存に失敗しました: {e}")
+
+    # --- キー -------------------------------------------------------------------
+
+    @staticmethod
+    def job_data_files(symbol, base_filepath, strategy_params, data_dir):
+        """ジョブが参照するCSV (ベースファイル + 'direct' 指定の中長期足) を列挙する。"""
+        files = [base_filepath]
+        for tf_name in ('medium', 'long'):
+            tf_config = (strategy_params.get('timeframes') or {}).get(tf_name) or {}
+            if tf_config.get('source_type') != 'direct' or not tf_config.get('file_pattern'): continue
+            files.extend(sorted(glob.glob(os.path.join(data_dir, tf_config['file_pattern'].format(symbol=symbol)))))
+        return files
+
+    def job_key(self, symbol, base_filepath, strategy_params, data_dir, backtest_engine):
+        params = {k: v for k, v in strategy_params.items() if k != 'strategy_name'}
+        payload = {
+            'version': CACHE_VERSION,
+            'params': params,
+            'backtest': {'engine': backtest_engine,
+                         'initial_capital': config_backtest.INITIAL_CAPITAL,
+                         'commission': config_backtest.COMMISSION_PERC,
+                         'slippage': config_backtest.SLIPPAGE_PERC},
+            'symbol': symbol,
+            'files': [(os.path.basename(f), self.file_digest(f))
+                      for f in self.job_data_files(symbol, base_filepath, strategy_params, data_dir)],
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    # --- 読み書き ---------------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """キャッシュ済みの (stats, start_date, end_date, trades) を返す。ない場合はNone。"""
+        if not self.read:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key), 'rb') as f: entry = pickle.load(f)
+            self.hits += 1
+            return entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"評価結果キャッシュの読み込みに失敗したため再計算します: {key} - {e}")
+        self.misses += 1
+        return None
+
+    def put(self, key, stats, start_date, end_date, trades):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, pickle.dumps((stats, start_date, end_date, trades), protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            logger.warning(f"評価結果キャッシュの書き込みに失敗しました: {key} - {e}")
\ No newline at end of file
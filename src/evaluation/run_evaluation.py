@@ -1,9 +1,10 @@
 import sys
 import os
+import argparse
 
 # ------------------------------------------------------------------------------
 # このスクリプトを直接実行することで、全戦略の評価プロセスを開始します。
-# `python -m src.evaluation.run_evaluation`
+# `python -m src.evaluation.run_evaluation [--force] [--resume <結果ディレクトリ>]`
 # ------------------------------------------------------------------------------
 
 # プロジェクトのルートディレクトリをPythonのパスに追加
@@ -18,7 +19,11 @@ from src.core.util import logger as logger_setup
 from . import config_evaluation as config
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略カタログの全戦略を評価します。')
+    parser.add_argument('--force', action='store_true', help='評価結果キャッシュを使用せず、全ジョブを再計算する')
+    parser.add_argument('--resume', metavar='RUN_DIR', default=None, help='中断した評価の結果ディレクトリを指定し、未完了のジョブだけを実行する')
+    args = parser.parse_args()
     # evaluationモジュール自体のロガーを、設定ファイルに基づいてセットアップ
     logger_setup.setup_logging('log', log_prefix='evaluation', level=config.LOG_LEVEL)
-    main()
+    main(force=args.force, resume_dir=args.resume)
 # ▲▲▲【変更箇所ここまで】▲▲▲
\ No newline at end of file
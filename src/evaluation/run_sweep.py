@@ -0,0 +1,71 @@
+import sys
+import os
+import argparse
+import logging
+from datetime import datetime
+
+import yaml
+
+# ------------------------------------------------------------------------------
+# 戦略テンプレートのパラメータスイープ (グリッドサーチ) を実行します。
+# `python -m src.evaluation.run_sweep [テンプレートファイル]`
+# ------------------------------------------------------------------------------
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.util import logger as logger_setup
+from src.evaluation import config_evaluation as config
+from src.evaluation.orchestrator import BASE_STRATEGY_FILE
+from src.evaluation.sweep import SweepEngine
+
+SWEEP_TEMPLATE_FILE = 'config/strategy_sweep.yml'
+RESULTS_ROOT_DIR = 'results/sweep'
+
+
+def main(template_file=SWEEP_TEMPLATE_FILE, max_workers=None, chunk_size=None):
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
+
+    try:
+        with open(BASE_STRATEGY_FILE, 'r', encoding='utf-8') as f:
+            base_config = yaml.safe_load(f)
+        with open(template_file, 'r', encoding='utf-8') as f:
+            template = yaml.safe_load(f)
+    except Exception as e:
+        logging.error(f"設定ファイルの読み込みに失敗しました: {e}")
+        return None
+
+    try:
+        engine = SweepEngine(
+            base_config, template,
+            max_workers=max_workers or config.SWEEP_MAX_WORKERS or config.MAX_WORKERS,
+            log_level_override=config.BACKTEST_LOG_LEVEL_OVERRIDE,
+            chunk_size=chunk_size or config.SWEEP_CHUNK_SIZE
+        )
+    except ValueError as e:
+        logging.error(f"スイープテンプレート '{template_file}' が不正です: {e}")
+        return None
+
+    summary_df = engine.build_summary(engine.run())
+    if summary_df is None:
+        logging.warning("有効なサマリーデータがありませんでした。")
+        return None
+
+    os.makedirs(current_results_dir, exist_ok=True)
+    output_path = os.path.join(current_results_dir, f"all_summary_{timestamp}.csv")
+    summary_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    logging.info(f"スイープ結果 ({len(summary_df)} グリッド点) を '{output_path}' に保存しました。")
+    logging.info(f"純利益の上位:\n{summary_df.head(10).to_string(index=False)}")
+    return output_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略テンプレートのパラメータスイープを実行します。')
+    parser.add_argument('template', nargs='?', default=SWEEP_TEMPLATE_FILE, help=f"スイープテンプレート (既定: {SWEEP_TEMPLATE_FILE})")
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    parser.add_argument('--chunk-size', type=int, default=None, help='1ジョブあたりのグリッド点数')
+    args = parser.parse_args()
+    logger_setup.setup_logging('log', log_prefix='sweep', level=config.LOG_LEVEL)
+    main(args.template, args.workers, args.chunk_size)
\ No newline at end of file
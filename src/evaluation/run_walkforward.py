@@ -0,0 +1,71 @@
+import sys
+import os
+import argparse
+import logging
+from datetime import datetime
+
+# ------------------------------------------------------------------------------
+# 戦略カタログのウォークフォワード評価を実行します。
+# `python -m src.evaluation.run_walkforward [--train-days N] [--test-days N] [--step-days N]`
+# ------------------------------------------------------------------------------
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.util import logger as logger_setup
+from src.evaluation import config_evaluation as config
+from src.evaluation.orchestrator import load_inputs
+from src.evaluation.walkforward import WalkForwardEngine
+
+RESULTS_ROOT_DIR = 'results/walkforward'
+
+
+def main(train_days=None, test_days=None, step_days=None, max_workers=None):
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    current_results_dir = os.path.join(RESULTS_ROOT_DIR, timestamp)
+
+    base_config, strategies = load_inputs()
+    if strategies is None: return None
+
+    try:
+        engine = WalkForwardEngine(
+            base_config, strategies,
+            train_days=train_days or config.WALKFORWARD_TRAIN_DAYS,
+            test_days=test_days or config.WALKFORWARD_TEST_DAYS,
+            step_days=step_days or config.WALKFORWARD_STEP_DAYS,
+            max_workers=max_workers or config.MAX_WORKERS,
+            log_level_override=config.BACKTEST_LOG_LEVEL_OVERRIDE
+        )
+        results = engine.run()
+    except ValueError as e:
+        logging.error(f"ウォークフォワード評価の設定が不正です: {e}")
+        return None
+    if not results:
+        return None
+
+    os.makedirs(current_results_dir, exist_ok=True)
+    summary_df = engine.build_summary(results)
+    outputs = {
+        f"walkforward_summary_{timestamp}.csv": summary_df,
+        f"walkforward_detail_{timestamp}.csv": engine.build_detail(results),
+        f"walkforward_trade_history_{timestamp}.csv": engine.build_trade_history(results),
+    }
+    for filename, df in outputs.items():
+        df.to_csv(os.path.join(current_results_dir, filename), index=False, encoding='utf-8-sig')
+    logging.info(f"ウォークフォワード評価の結果を '{current_results_dir}' に保存しました。")
+    overall = summary_df.iloc[-1]
+    logging.info(f"学習期間の純利益 (選択戦略): {overall['学習純利益']:,.0f} / 検証期間の純利益: {overall['純利益']:,.0f} "
+                 f"(PF {overall['PF']:.2f}, 勝率 {overall['勝率']:.2f}%, {overall['総トレード数']} トレード)")
+    return current_results_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='戦略カタログのウォークフォワード評価を実行します。')
+    parser.add_argument('--train-days', type=int, default=None, help=f"学習ウィンドウの営業日数 (既定: {config.WALKFORWARD_TRAIN_DAYS})")
+    parser.add_argument('--test-days', type=int, default=None, help=f"検証ウィンドウの営業日数 (既定: {config.WALKFORWARD_TEST_DAYS})")
+    parser.add_argument('--step-days', type=int, default=None, help='ウィンドウをずらす営業日数 (既定: 検証ウィンドウと同じ)')
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    args = parser.parse_args()
+    logger_setup.setup_logging('log', log_prefix='walkforward', level=config.LOG_LEVEL)
+    main(args.train_days, args.test_days, args.step_days, args.workers)
\ No newline at end of file
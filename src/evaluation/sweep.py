@@ -0,0 +1,243 @@
+import copy
+import math
+import logging
+import tempfile
+import itertools
+import collections
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.backtest import config_backtest
+from src.backtest import report as report_generator
+from src.backtest.run_backtest import run_backtest_for_symbol
+from src.backtest.vectorized import run_vectorized_backtest_for_symbol, VectorizedUnsupportedError
+from . import aggregator
+from .engine import EvaluationEngine, _init_worker, worker_indicator_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# パラメータスイープ (グリッドサーチ)
+# 戦略テンプレート内の { sweep: ... } プレースホルダーを展開し、全グリッド点を
+# 全銘柄でバックテストして、all_summary 形式のランキング表を生成する。
+#
+# - ジョブは (銘柄, グリッド点のチャンク) 単位。ワーカーはベクトル化エンジンで実行し、
+#   StrategyInitializer._get_indicator_key をキーとするインジケーター配列を
+#   銘柄ごとにキャッシュして、同じキーを持つグリッド点間で共有する。
+#   (ATRの multiplier や RSI の閾値だけが異なる点はインジケーターを再計算しない)
+# - ベクトル化できないグリッド点は cerebro 経路で実行する。
+# - 取引リストは集計に不要なため、ワーカーからは統計のみを返す。
+#
+# プレースホルダーの書式:
+#   period: { sweep: [10, 20, 30] }                     # 値のリスト
+#   multiplier: { sweep: { start: 1.5, stop: 3.0, step: 0.5 } }   # 範囲 (stop を含む)
+#   period: { sweep: [10, 20], name: "ema_fast" }       # 同じ name のプレースホルダーは同じ値をとる
+# ==============================================================================
+
+SWEEP_KEY = 'sweep'
+
+
+@dataclass
+class GridPoint:
+    """1つのグリッド点。values は {軸名: 値}。"""
+    index: int
+    name: str
+    values: dict
+    params: dict
+
+
+@dataclass
+class PointResult:
+    """1つのグリッド点の全銘柄分の統計。"""
+    point: GridPoint
+    stats: list = field(default_factory=list)
+    start_dates: list = field(default_factory=list)
+    end_dates: list = field(default_factory=list)
+    failed_symbols: list = field(default_factory=list)
+
+    def summary(self):
+        """report.generate_report と同じ形式の 項目 -> 結果 のSeries。有効な期間がない場合はNone。"""
+        if not self.start_dates or not self.end_dates: return None
+        summary_df = report_generator.generate_report(self.stats, self.point.params, min(self.start_dates), max(self.end_dates))
+        return summary_df.set_index('項目')['結果']
+
+
+def _is_placeholder(node):
+    return isinstance(node, dict) and SWEEP_KEY in node and set(node) <= {SWEEP_KEY, 'name'}
+
+def expand_values(spec):
+    """プレースホルダーの sweep 指定を値のリストに展開する。"""
+    if isinstance(spec, list):
+        if not spec: raise ValueError("sweep の値リストが空です。")
+        return list(spec)
+    if isinstance(spec, dict) and {'start', 'stop', 'step'} <= set(spec):
+        start, stop, step = spec['start'], spec['stop'], spec['step']
+        if step <= 0 or stop < start: raise ValueError(f"sweep の範囲指定が不正です: {spec}")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        is_int = all(isinstance(v, int) for v in (start, stop, step))
+        # 浮動小数点の累積誤差が出ないよう、ステップ数から各値を求めて丸める
+        return [start + i * step if is_int else round(start + i * step, 10) for i in range(count)]
+    raise ValueError(f"sweep には値のリストか {{start, stop, step}} を指定してください: {spec}")
+
+def find_placeholders(node, path=()):
+    """テンプレート内のプレースホルダーを (パス, プレースホルダー) のリストで返す。"""
+    if _is_placeholder(node):
+        return [(path, node)]
+    found = []
+    if isinstance(node, dict):
+        for key, value in node.items(): found.extend(find_placeholders(value, path + (key,)))
+    elif isinstance(node, list):
+        for i, value in enumerate(node): found.extend(find_placeholders(value, path + (i,)))
+    return found
+
+def _substitute(node, values_by_path):
+    if _is_placeholder(node): return values_by_path[id(node)]
+    if isinstance(node, dict): return {k: _substitute(v, values_by_path) for k, v in node.items()}
+    if isinstance(node, list): return [_substitute(v, values_by_path) for v in node]
+    return node
+
+def _merge(base, override):
+    """辞書を再帰的に重ねる。(リストと値は置き換え)"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and not _is_placeholder(value):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def _default_axis_name(path):
+    return '.'.join(str(p) for p in path)
+
+def expand_grid(base_config, template):
+    """
+    ベース設定にテンプレートを重ね、全グリッド点 (GridPoint のリスト) と軸名のリストを返す。
+    テンプレートの 'name' 以外のキーはベース設定を上書きする。(辞書は再帰的にマージ)
+    """
+    template = dict(template)
+    base_name = template.pop('name', 'Sweep')
+    merged = _merge(base_config, template)
+    merged['strategy_name'] = base_name
+
+    axes = collections.OrderedDict()
+    placeholders_by_axis = collections.defaultdict(list)
+    for path, placeholder in find_placeholders(merged):
+        axis = placeholder.get('name') or _default_axis_name(path)
+        values = expand_values(placeholder[SWEEP_KEY])
+        if axis in axes and axes[axis] != values:
+            raise ValueError(f"軸 '{axis}' に異なる値リストが指定されています: {axes[axis]} / {values}")
+        axes[axis] = values
+        placeholders_by_axis[axis].append(placeholder)
+
+    points = []
+    for index, combo in enumerate(itertools.product(*axes.values())):
+        values = dict(zip(axes, combo))
+        values_by_path = {id(ph): values[axis] for axis, phs in placeholders_by_axis.items() for ph in phs}
+        params = _substitute(merged, values_by_path)
+        label = ", ".join(f"{axis}={value}" for axis, value in values.items())
+        params['strategy_name'] = f"{base_name} [{label}]" if label else base_name
+        points.append(GridPoint(index, params['strategy_name'], values, params))
+    return points, list(axes)
+
+
+def _run_sweep_job(symbol, base_filepath, points):
+    """
+    [ワーカー] 1銘柄でグリッド点のチャンクを実行する。
+    points: (グリッド点番号, 戦略パラメータ) のリスト
+    戻り値: (グリッド点番号, stats, start_date, end_date, エラー) のリスト
+    """
+    cache = worker_indicator_cache(symbol)
+    outputs = []
+    for index, params in points:
+        try:
+            try:
+                stats, start_date, end_date, _ = run_vectorized_backtest_for_symbol(symbol, base_filepath, params, indicator_cache=cache)
+            except VectorizedUnsupportedError as e:
+                logging.getLogger(__name__).info(f"[{symbol}] ベクトル化できないため cerebro で実行します: {e}")
+                stats, start_date, end_date, _ = run_backtest_for_symbol(symbol, base_filepath, params)
+            if stats is None:
+                outputs.append((index, None, None, None, "データフィードの準備に失敗しました。"))
+            else:
+                outputs.append((index, stats, start_date, end_date, None))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"[{symbol}] グリッド点 {index} のバックテスト中にエラー: {e}", exc_info=True)
+            outputs.append((index, None, None, None, f"{type(e).__name__}: {e}"))
+    return outputs
+
+
+class SweepEngine(EvaluationEngine):
+    """
+    テンプレートを展開した全グリッド点 × 全銘柄を、(銘柄, グリッド点チャンク) ジョブとして並列実行する。
+    銘柄の列挙・バーストアの事前読み込みは EvaluationEngine と共通。
+    """
+    def __init__(self, base_config, template, data_dir=None, max_workers=None, log_level_override='NONE', chunk_size=None):
+        super().__init__(base_config, [], data_dir or config_backtest.DATA_DIR, max_workers, log_level_override, backtest_engine='vectorized')
+        self.template = template
+        self.chunk_size = chunk_size
+        self.points, self.axes = expand_grid(base_config, template)
+
+    def _chunks(self, n_symbols):
+        """グリッド点を分割する。指定がなければ全ワーカーに行き渡る程度の大きさにする。"""
+        size = self.chunk_size or max(1, math.ceil(len(self.points) * n_symbols / (self.max_workers * 4)))
+        size = min(size, len(self.points))
+        return [self.points[i:i + size] for i in range(0, len(self.points), size)]
+
+    def run(self):
+        """全グリッド点を実行し、グリッド点順の PointResult のリストを返す。"""
+        symbols = self.find_symbols()
+        results = [PointResult(point) for point in self.points]
+        if not self.points or not symbols:
+            logger.warning(f"実行対象がありません。(グリッド点: {len(self.points)}件, 銘柄: {len(symbols)}件)")
+            return results
+
+        chunks = self._chunks(len(symbols))
+        total_jobs = len(chunks) * len(symbols)
+        logger.info(f"{len(self.points)}グリッド点 ({', '.join(self.axes) or '軸なし'}) x {len(symbols)}銘柄を "
+                    f"{total_jobs}ジョブに分割し、{self.max_workers} プロセスで実行します。")
+
+        store = self.preload_bars(symbols)
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            # 同じ銘柄のチャンクを続けて投入し、ワーカー内のインジケーターキャッシュが効きやすくする
+            futures = {}
+            for symbol, filepath in symbols:
+                for chunk in chunks:
+                    future = executor.submit(_run_sweep_job, symbol, filepath, [(p.index, p.params) for p in chunk])
+                    futures[future] = (symbol, chunk)
+
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                symbol, chunk = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({symbol}, {len(chunk)}点) の実行プロセスが異常終了しました: {e}")
+                    outputs = [(p.index, None, None, None, f"{type(e).__name__}: {e}") for p in chunk]
+                for index, stats, start_date, end_date, error in outputs:
+                    result = results[index]
+                    if error:
+                        result.failed_symbols.append(symbol); continue
+                    result.stats.append(stats)
+                    if start_date is not None: result.start_dates.append(start_date)
+                    if end_date is not None: result.end_dates.append(end_date)
+                if done_count % max(1, total_jobs // 10) == 0 or done_count == total_jobs:
+                    logger.info(f"スイープ進捗: {done_count}/{total_jobs} ジョブ")
+
+        failed = [r for r in results if r.failed_symbols]
+        if failed:
+            logger.warning(f"{len(failed)} グリッド点で失敗した銘柄があります。(例: '{failed[0].point.name}' -> {failed[0].failed_symbols})")
+        return results
+
+    def build_summary(self, results):
+        """all_summary 形式のランキング表 (純利益の降順) を生成する。軸ごとの値を列として追加する。"""
+        series_list, extra_rows = [], []
+        for result in results:
+            summary = result.summary()
+            if summary is None:
+                logger.warning(f"グリッド点 '{result.point.name}' は有効な分析期間がないため、ランキングから除外します。")
+                continue
+            series_list.append(summary)
+            extra_rows.append(dict(result.point.values))
+        if not series_list:
+            return None
+        return aggregator.build_summary_table(series_list, extra_rows)
\ No newline at end of file
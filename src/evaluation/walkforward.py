@@ -0,0 +1,250 @@
+import logging
+import tempfile
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.backtest.run_backtest import TRADE_HISTORY_COLUMNS
+from src.backtest.vectorized import VectorizedBacktest, VectorizedUnsupportedError, load_feeds
+from .engine import EvaluationEngine, _init_worker, worker_indicator_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ウォークフォワード評価
+# 全銘柄の営業日をローリングの 学習/検証 ウィンドウに分割し、銘柄ごとに
+# 学習ウィンドウで純利益が最大の戦略を選び (all_recommend と同じ基準)、
+# その戦略を直後の検証ウィンドウで取引した結果をアウトオブサンプルの成績として集計する。
+#
+# - ジョブは (銘柄, ウィンドウ) 単位でプロセスプールで並列実行する。
+# - 各ウィンドウはベクトル化エンジンの window 指定で実行する。インジケーターは
+#   全期間の配列を銘柄ごとにワーカー内でキャッシュし、ウィンドウ・戦略間で共有するため、
+#   ウィンドウ開始時点でウォームアップ済みの状態になる。CSVはバーストア経由で1回だけパースする。
+# - 学習・検証ウィンドウはそれぞれ初期資金から取引し、終了時の未決済ポジションは
+#   ウィンドウ最終バーの終値で評価する。
+# - ベクトル化できない戦略はウォークフォワードの選択対象から除外する。
+# ==============================================================================
+
+
+@dataclass
+class Window:
+    """1つの 学習/検証 ウィンドウ。境界はバーと同じタイムゾーンの日付の開始時刻。(終了は含まない)"""
+    index: int
+    train_start: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+
+    @property
+    def label(self):
+        return f"W{self.index + 1:02d}"
+
+    @property
+    def train_range(self):
+        return (self.train_start.value, self.test_start.value)
+
+    @property
+    def test_range(self):
+        return (self.test_start.value, self.test_end.value)
+
+    @staticmethod
+    def _period(start, end):
+        return f"{start.strftime('%y/%m/%d')}-{(end - pd.Timedelta(days=1)).strftime('%y/%m/%d')}"
+
+    @property
+    def train_period(self):
+        return self._period(self.train_start, self.test_start)
+
+    @property
+    def test_period(self):
+        return self._period(self.test_start, self.test_end)
+
+
+@dataclass
+class WindowResult:
+    """1つの (銘柄, ウィンドウ) ジョブの結果。selected は学習ウィンドウで選ばれた戦略番号。"""
+    symbol: str
+    window_index: int
+    train_stats: dict = field(default_factory=dict)
+    selected: int = None
+    test_stats: dict = None
+    test_trades: list = field(default_factory=list)
+    unsupported: list = field(default_factory=list)
+    error: str = None
+
+
+def build_windows(trading_days, train_days, test_days, step_days=None):
+    """
+    営業日 (日付の開始時刻のリスト) からローリングウィンドウを生成する。
+    step_days を省略した場合は検証期間と同じ日数ずつずらす。(検証期間が重ならない)
+    """
+    step_days = step_days or test_days
+    if train_days <= 0 or test_days <= 0 or step_days <= 0:
+        raise ValueError("学習・検証・ステップの日数は1以上を指定してください。")
+    days = sorted(set(trading_days))
+    windows = []
+    for i in range(0, len(days) - train_days - test_days + 1, step_days):
+        end = i + train_days + test_days
+        test_end = days[end] if end < len(days) else days[-1] + pd.Timedelta(days=1)
+        windows.append(Window(len(windows), days[i], days[i + train_days], test_end))
+    return windows
+
+
+def trading_days_of(bars):
+    """バーがある日付 (バーのタイムゾーンでの日付の開始時刻)。"""
+    return list(bars.index().normalize().unique())
+
+
+def _run_window(symbol, base_filepath, strategy_params, cache, window_range):
+    feeds = load_feeds(symbol, base_filepath, strategy_params)
+    if feeds is None: raise ValueError("データフィードの準備に失敗しました。")
+    backtest = VectorizedBacktest(symbol, feeds, strategy_params, cache, window=window_range)
+    trades = backtest.run()
+    return backtest.stats(), trades
+
+def _run_window_job(symbol, base_filepath, window, strategies):
+    """
+    [ワーカー] 1銘柄 × 1ウィンドウ。全戦略を学習ウィンドウで実行して戦略を選び、検証ウィンドウで実行する。
+    strategies: (戦略番号, 戦略パラメータ) のリスト
+    """
+    log = logging.getLogger(__name__)
+    result = WindowResult(symbol, window.index)
+    try:
+        cache = worker_indicator_cache(symbol)
+        for index, params in strategies:
+            try:
+                stats, _ = _run_window(symbol, base_filepath, params, cache, window.train_range)
+            except VectorizedUnsupportedError as e:
+                log.info(f"[{symbol}] 戦略 {index} はベクトル化できないため選択対象から除外します: {e}")
+                result.unsupported.append(index); continue
+            result.train_stats[index] = stats
+
+        candidates = [(stats['pnl_net'], -index) for index, stats in result.train_stats.items() if stats['total_trades'] > 0]
+        if not candidates: return result
+        result.selected = -max(candidates)[1]
+        params = dict(strategies)[result.selected]
+        result.test_stats, result.test_trades = _run_window(symbol, base_filepath, params, cache, window.test_range)
+    except Exception as e:
+        log.error(f"[{symbol}] ウィンドウ {window.label} の評価中にエラー: {e}", exc_info=True)
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def performance(stats_list):
+    """report.generate_report と同じ計算式の成績 (数値)。"""
+    total_net = sum(s['pnl_net'] for s in stats_list)
+    total_won = sum(s['gross_won'] for s in stats_list)
+    total_lost = sum(s['gross_lost'] for s in stats_list)
+    total_trades = sum(s['total_trades'] for s in stats_list)
+    total_win = sum(s['win_trades'] for s in stats_list)
+    avg_profit = total_won / total_win if total_win > 0 else 0
+    avg_loss = total_lost / (total_trades - total_win) if (total_trades - total_win) > 0 else 0
+    return {
+        "純利益": total_net, "総利益": total_won, "総損失": total_lost,
+        "PF": abs(total_won / total_lost) if total_lost != 0 else float('inf'),
+        "勝率": (total_win / total_trades) * 100 if total_trades > 0 else 0,
+        "総トレード数": total_trades, "勝トレード": total_win, "負トレード": total_trades - total_win,
+        "平均利益": avg_profit, "平均損失": avg_loss,
+        "RR比": abs(avg_profit / avg_loss) if avg_loss != 0 else float('inf'),
+    }
+
+
+class WalkForwardEngine(EvaluationEngine):
+    """戦略カタログ全体のウォークフォワード評価を (銘柄, ウィンドウ) ジョブとして並列実行する。"""
+
+    def __init__(self, base_config, strategies, train_days, test_days, step_days=None, data_dir=None, max_workers=None, log_level_override='NONE'):
+        super().__init__(base_config, strategies, data_dir, max_workers, log_level_override, backtest_engine='vectorized')
+        self.train_days, self.test_days, self.step_days = train_days, test_days, step_days
+        self.windows = []
+        self.strategy_names = {}
+
+    def run(self):
+        """全ジョブを実行し、WindowResult のリストを返す。"""
+        strategy_results = self.build_strategy_results()
+        symbols = self.find_symbols()
+        if not strategy_results or not symbols:
+            logger.warning(f"実行対象がありません。(戦略: {len(strategy_results)}件, 銘柄: {len(symbols)}件)")
+            return []
+        self.strategy_names = {r.index: r.name for r in strategy_results}
+        strategies = [(r.index, r.params) for r in strategy_results]
+
+        # 親プロセスでCSVを1回だけパースし、営業日の算出とワーカーの共有に使う
+        store = self.preload_bars(symbols)
+        trading_days = [day for _, filepath in symbols for day in trading_days_of(store.get(filepath))]
+        self.windows = build_windows(trading_days, self.train_days, self.test_days, self.step_days)
+        if not self.windows:
+            logger.warning(f"学習 {self.train_days}日 + 検証 {self.test_days}日 のウィンドウを作れるだけのデータがありません。")
+            return []
+
+        total_jobs = len(symbols) * len(self.windows)
+        logger.info(f"{len(strategy_results)}戦略 x {len(symbols)}銘柄 x {len(self.windows)}ウィンドウ "
+                    f"(学習 {self.train_days}日 / 検証 {self.test_days}日) を {total_jobs}ジョブとして {self.max_workers} プロセスで実行します。")
+
+        results = []
+        with tempfile.TemporaryDirectory(prefix='bar_store_') as bar_store_dir, \
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                    initargs=(self.log_level_override, store.export(bar_store_dir))) as executor:
+            # 同じ銘柄のウィンドウを続けて投入し、ワーカー内のインジケーターキャッシュが効きやすくする
+            futures = {}
+            for symbol, filepath in symbols:
+                for window in self.windows:
+                    futures[executor.submit(_run_window_job, symbol, filepath, window, strategies)] = (symbol, window)
+
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                symbol, window = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"ジョブ ({symbol}, {window.label}) の実行プロセスが異常終了しました: {e}")
+                    result = WindowResult(symbol, window.index, error=f"{type(e).__name__}: {e}")
+                results.append(result)
+                if done_count % max(1, total_jobs // 10) == 0 or done_count == total_jobs:
+                    logger.info(f"ウォークフォワード進捗: {done_count}/{total_jobs} ジョブ")
+
+        unsupported = sorted({i for r in results for i in r.unsupported})
+        if unsupported:
+            logger.warning(f"ベクトル化できないため選択対象から除外した戦略: {[self.strategy_names[i] for i in unsupported]}")
+        failed = [r for r in results if r.error]
+        if failed:
+            logger.warning(f"{len(failed)} ジョブが失敗しました。(例: {failed[0].symbol} {self.windows[failed[0].window_index].label} - {failed[0].error})")
+        return sorted(results, key=lambda r: (r.window_index, r.symbol))
+
+    # --- レポート ---------------------------------------------------------------
+
+    def build_detail(self, results):
+        """(銘柄, ウィンドウ) ごとの選択戦略と学習/検証の成績。"""
+        rows = []
+        for r in results:
+            window = self.windows[r.window_index]
+            train = r.train_stats.get(r.selected) if r.selected is not None else None
+            test = r.test_stats
+            rows.append({
+                '銘柄': r.symbol, 'ウィンドウ': window.label, '学習期間': window.train_period, '検証期間': window.test_period,
+                '選択戦略': self.strategy_names.get(r.selected, 'N/A') if r.selected is not None else 'N/A',
+                '学習純利益': train['pnl_net'] if train else None, '学習トレード数': train['total_trades'] if train else None,
+                '検証純利益': test['pnl_net'] if test else None, '検証総利益': test['gross_won'] if test else None,
+                '検証総損失': test['gross_lost'] if test else None, '検証トレード数': test['total_trades'] if test else None,
+                '検証勝トレード': test['win_trades'] if test else None, 'エラー': r.error})
+        return pd.DataFrame(rows)
+
+    def build_summary(self, results):
+        """ウィンドウごと + 全体のアウトオブサンプル成績。学習純利益は選択された戦略の学習ウィンドウでの値。"""
+        rows = []
+        groups = [(self.windows[i].label, self.windows[i].test_period, [r for r in results if r.window_index == i]) for i in range(len(self.windows))]
+        if self.windows:
+            groups.append(("全体", f"{self.windows[0].test_period.split('-')[0]}-{self.windows[-1].test_period.split('-')[1]}", results))
+        for label, period, group in groups:
+            selected = [r for r in group if r.test_stats]
+            row = {'ウィンドウ': label, '検証期間': period, '選択銘柄数': len(selected),
+                   '学習純利益': sum(r.train_stats[r.selected]['pnl_net'] for r in selected)}
+            row.update(performance([r.test_stats for r in selected]))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def build_trade_history(self, results):
+        """検証ウィンドウで選択戦略が行った取引。"""
+        trades = []
+        for r in results:
+            for trade in r.test_trades:
+                trades.append({'ウィンドウ': self.windows[r.window_index].label, '戦略名': self.strategy_names[r.selected], **trade})
+        return pd.DataFrame(trades, columns=['ウィンドウ', '戦略名'] + TRADE_HISTORY_COLUMNS)
\ No newline at end of file
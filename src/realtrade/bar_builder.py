@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta
 
+import numpy as np
+
 class BarBuilder:
     """
     リアルタイムのTickデータストリームを受け取り、定義された時間枠の
@@ -74,4 +76,131 @@ class BarBuilder:
             self._current_bar = None
             self._last_cumulative_volume = 0.0
             return final_bar
-        return None
\ No newline at end of file
+        return None
+
+
+class MultiBarBuilder:
+    """
+    全銘柄のバーを、銘柄ごとのスロットで添字付けした numpy 配列でまとめて構築するクラス。
+    Excel のスナップショット1回分 (現在値・累計出来高のベクトル) を1回の呼び出しで処理し、
+    時間枠が切り替わった銘柄の完成バーを返す。
+    各銘柄のバーの内容 (差分出来高の扱いを含む) は銘柄ごとの BarBuilder と同じになる。
+    """
+    def __init__(self, symbols, interval_minutes: int = 5):
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutes must be positive.")
+        self.interval_minutes = interval_minutes
+        self.symbols = [str(s) for s in symbols]
+        self.slots = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self._open = np.zeros(n)
+        self._high = np.zeros(n)
+        self._low = np.zeros(n)
+        self._close = np.zeros(n)
+        self._volume = np.zeros(n)
+        self._start = np.full(n, -1, dtype=np.int64)     # 形成中のバーの開始時刻のキー (-1: バーなし)
+        self._last_cumulative_volume = np.zeros(n)
+        self._start_times = {}                          # キー -> バーの開始時刻 (datetime)
+        self._last_bucket, self._last_key = None, None
+
+    def _bar_start(self, timestamp: datetime):
+        """タイムスタンプが属するバーの開始時刻とそのキー (分単位の通し番号) を返す。分単位の時間枠ごとに1回だけ計算する。"""
+        bucket = (timestamp.toordinal(), timestamp.hour, timestamp.minute)
+        if bucket != self._last_bucket:
+            new_minute = timestamp.minute - (timestamp.minute % self.interval_minutes)
+            bar_start_time = timestamp.replace(minute=new_minute, second=0, microsecond=0)
+            key = (bucket[0] * 24 + bucket[1]) * 60 + new_minute
+            self._start_times.setdefault(key, bar_start_time)
+            self._last_bucket, self._last_key = bucket, key
+        return self._last_key
+
+    def add_snapshot(self, timestamp: datetime, prices, cumulative_volumes) -> dict:
+        """
+        全銘柄分の現在値・累計出来高 (スロット順のベクトル, 欠損は NaN) を処理し、
+        完成したバーを {銘柄コード: バー(dict)} で返す。欠損のある銘柄の状態は変更しない。
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        cumulative_volumes = np.asarray(cumulative_volumes, dtype=np.float64)
+        key = self._bar_start(timestamp)
+        valid = ~(np.isnan(prices) | np.isnan(cumulative_volumes))
+        has_bar = self._start >= 0
+
+        # 形成中のバーがあり、時間枠が切り替わった銘柄 -> バー完成
+        rolled = np.flatnonzero(valid & has_bar & (self._start != key))
+        completed = self._emit(rolled)
+        has_bar[rolled] = False
+
+        # 差分出来高 (セッション跨ぎやリセットを考慮)
+        last = self._last_cumulative_volume
+        continuous = (last > 0) & (cumulative_volumes >= last)
+        tick_volume = np.where(continuous, cumulative_volumes - last, cumulative_volumes)
+
+        # 新しいバーを開始
+        new = valid & ~has_bar
+        self._open[new] = self._high[new] = self._low[new] = self._close[new] = prices[new]
+        self._volume[new] = tick_volume[new]
+        self._start[new] = key
+
+        # 既存のバーを更新 (出来高がリセットされた Tick の出来高は加算しない)
+        update = valid & has_bar
+        np.maximum(self._high, prices, out=self._high, where=update)
+        np.minimum(self._low, prices, out=self._low, where=update)
+        self._close[update] = prices[update]
+        self._volume[update & continuous] += tick_volume[update & continuous]
+
+        # 最後に処理した累計出来高を更新
+        last[valid] = cumulative_volumes[valid]
+        if rolled.size:
+            self._prune_start_times()
+        return completed
+
+    def add_market_data(self, timestamp: datetime, market_data: dict) -> dict:
+        """
+        ExcelReader.read_market_data と同じ形の辞書 ({銘柄コード: {'close', 'volume', ...}}) を処理する。
+        辞書にない銘柄 (値の変わっていない銘柄など) は欠損として扱い、状態を変更しない。
+        """
+        n = len(self.symbols)
+        prices, volumes = np.full(n, np.nan), np.full(n, np.nan)
+        for symbol, data in market_data.items():
+            i = self.slots.get(symbol)
+            if i is not None and data:
+                price, volume = data.get('close'), data.get('volume')
+                if price is not None and volume is not None:
+                    prices[i], volumes[i] = price, volume
+        return self.add_snapshot(timestamp, prices, volumes)
+
+    def open_symbols(self) -> list:
+        """形成中のバーがある銘柄コードのリスト。"""
+        return [self.symbols[i] for i in np.flatnonzero(self._start >= 0).tolist()]
+
+    def flush(self) -> dict:
+        """
+        全銘柄の形成途中のバーを強制的に返し、内部状態をリセットする。
+        取引終了時などに使用する。
+        """
+        completed = self._emit(np.flatnonzero(self._start >= 0))
+        self._last_cumulative_volume[:] = 0.0
+        self._start_times.clear()
+        self._last_bucket, self._last_key = None, None
+        return completed
+
+    def _emit(self, slots) -> dict:
+        """指定スロットの形成中のバーを dict に変換して返し、そのスロットをバーなしにする。"""
+        if not slots.size:
+            return {}
+        starts = self._start[slots].tolist()
+        columns = zip(starts, self._open[slots].tolist(), self._high[slots].tolist(), self._low[slots].tolist(),
+                      self._close[slots].tolist(), self._volume[slots].tolist())
+        completed = {
+            self.symbols[i]: {'timestamp': self._start_times[start], 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for i, (start, o, h, l, c, v) in zip(slots.tolist(), columns)
+        }
+        self._start[slots] = -1
+        return completed
+
+    def _prune_start_times(self):
+        """どのバーからも参照されなくなった開始時刻を削除する。"""
+        in_use = set(np.unique(self._start[self._start >= 0]).tolist())
+        in_use.add(self._last_key)
+        for key in [k for k in self._start_times if k not in in_use]:
+            del self._start_times[key]
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import glob
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from src.core import data_cache
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 確定足のジャーナルと履歴CSVへの差分マージ
+# 取引中に確定したバーを銘柄ごと・日ごとのジャーナル ({5分足CSV}.{YYYYMMDD}.journal) へ1本ずつ追記し、
+# 終了時にジャーナルを履歴CSVへマージ (compact) する。
+#   - 当日のうちに再起動した場合は、CerebroFactory が履歴CSVに続けて当日のジャーナルを再生する (replay)。
+#   - 前日以前のジャーナル (終了処理をせずに停止した日) は、次回起動時にマージする (recover)。
+# 追記はOSへの書き出し (flush) までで、ディスクへの同期 (fsync) は JournalSyncer がまとめて行う。
+#   - 5分足: ジャーナルのバーが全て既存の履歴より後なら、CSVの末尾へ追記しキャッシュ (.npy) も追記分だけ更新する。
+#            重複・順序の入れ替わりがある場合のみ、従来どおり全体を読み込んで書き直す。
+#   - 60分足・日足: マージしたバーが含まれる期間だけを5分足から集計し直し、集計ファイルの末尾を更新する。
+# ==============================================================================
+
+JOURNAL_SUFFIX = '.journal'
+TZ = 'Asia/Tokyo'
+_TZINFO = ZoneInfo(TZ)
+COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+RESAMPLE_TARGETS = (('60min', '60m'), ('D', '1D'))
+AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def journal_path(save_file, date_str):
+    return f"{save_file}.{date_str}{JOURNAL_SUFFIX}"
+
+
+def parse_journal_path(path):
+    """ジャーナルのパスから (保存先の履歴CSV, 日付 YYYYMMDD) を返す。"""
+    save_file, date_str = path[:-len(JOURNAL_SUFFIX)].rsplit('.', 1)
+    return save_file, date_str
+
+
+class BarJournal:
+    """
+    確定したバーを1本ずつ追記する銘柄ごと・日ごとのジャーナル (ヘッダーなしのCSV)。
+    追記のたびにOSへ書き出すため、プロセスが異常終了しても確定済みのバーは失われない。
+    syncer を指定した場合、ディスクへの同期 (fsync) は JournalSyncer がまとめて行う (追記する側のスレッドは待たない)。
+    指定しない場合は追記のたびに同期する。
+    """
+    def __init__(self, path, syncer=None):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._syncer = syncer
+        if syncer is not None:
+            syncer.register(self)
+
+    def append(self, bar: dict):
+        timestamp = bar['timestamp']
+        if not isinstance(timestamp, datetime):
+            timestamp = pd.Timestamp(timestamp).to_pydatetime()
+        timestamp = timestamp.replace(tzinfo=_TZINFO) if timestamp.tzinfo is None else timestamp.astimezone(_TZINFO)
+        line = f"{timestamp.isoformat()},{','.join(repr(float(bar.get(column) or 0)) for column in COLUMNS)}\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    self._file = open(self.path, 'a', encoding='utf-8', newline='')
+                self._file.write(line)
+                self._file.flush()
+                self._dirty = True
+            if self._syncer is None:
+                self.sync()
+        except OSError as e:
+            logger.error(f"Failed to append bar to journal {self.path}: {e}")
+
+    def sync(self):
+        """
+        前回の同期以降に追記があればディスクへ同期する。
+        同期中も追記を待たせないよう、複製したファイル記述子でロックの外から同期する。
+        """
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            fd = os.dup(self._file.fileno())
+            self._dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._syncer is not None:
+            self._syncer.unregister(self)
+
+
+class JournalSyncer(threading.Thread):
+    """登録されたジャーナルのうち、追記のあったものを interval 秒ごとにまとめてディスクへ同期する。"""
+    def __init__(self, interval, stop_event):
+        super().__init__(name="JournalSyncer", daemon=True)
+        self.interval = interval
+        self.stop_event = stop_event
+        self._journals = set()
+        self._lock = threading.Lock()
+
+    def register(self, journal):
+        with self._lock:
+            self._journals.add(journal)
+
+    def unregister(self, journal):
+        with self._lock:
+            self._journals.discard(journal)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sync_all()
+        self.sync_all()
+
+    def sync_all(self):
+        with self._lock:
+            journals = list(self._journals)
+        for journal in journals:
+            try:
+                journal.sync()
+            except OSError as e:
+                logger.error(f"Failed to sync journal {journal.path}: {e}")
+
+
+def read_journal(path) -> pd.DataFrame:
+    """
+    ジャーナルを読み込み、datetime 列 (Asia/Tokyo) と OHLCV 列の DataFrame を返す。
+    書き込み途中で終了した末尾の行 (改行のない行) は無視する。同じ日時のバーは後のものを残す。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = text.split('\n')[:-1]  # 末尾は改行後の空文字列、または書き込み途中の行
+    rows = []
+    for line in lines:
+        fields = line.split(',')
+        if len(fields) != 1 + len(COLUMNS):
+            continue
+        try:
+            rows.append([pd.Timestamp(fields[0])] + [float(v) for v in fields[1:]])
+        except ValueError:
+            continue
+    df = pd.DataFrame(rows, columns=['datetime', *COLUMNS])
+    if df.empty:
+        return df
+    df['datetime'] = pd.to_datetime(df['datetime'], utc=True).dt.tz_convert(TZ)
+    df = df.drop_duplicates(subset=['datetime'], keep='last').sort_values(by='datetime')
+    return df.reset_index(drop=True)
+
+
+def _as_file_index(index, tz):
+    """日時インデックスを、既存ファイルの書式 (tz なし: 日本時間の naive / tz あり: 日本時間) に合わせる。"""
+    index = pd.DatetimeIndex(index)
+    index = index.tz_localize(TZ) if index.tz is None else index.tz_convert(TZ)
+    return index.tz_localize(None) if tz is None else index
+
+
+def merge_rewrite(save_file, new_df):
+    """
+    既存の履歴CSVを全て読み込んで new_df (datetime 列を持つ DataFrame) と結合し、重複排除・ソートして書き直す。
+    """
+    new_df = new_df.copy()
+    if 'openinterest' not in new_df.columns:
+        new_df['openinterest'] = 0
+    new_df['datetime'] = pd.to_datetime(new_df['datetime'])
+    if new_df['datetime'].dt.tz is None:
+        new_df['datetime'] = new_df['datetime'].dt.tz_localize(TZ)
+    else:
+        new_df['datetime'] = new_df['datetime'].dt.tz_convert(TZ)
+
+    merged_df = new_df
+    if os.path.exists(save_file):
+        try:
+            old_df = pd.read_csv(save_file, parse_dates=['datetime'])
+            old_df.columns = [c.lower() for c in old_df.columns]
+            if 'datetime' in old_df.columns:
+                if old_df['datetime'].dt.tz is None:
+                    old_df['datetime'] = old_df['datetime'].dt.tz_localize(TZ)
+                else:
+                    old_df['datetime'] = old_df['datetime'].dt.tz_convert(TZ)
+            merged_df = pd.concat([old_df, new_df])
+        except Exception as e:
+            logger.error(f"Failed to read {save_file}. Creating a new file: {e}")
+
+    merged_df.drop_duplicates(subset=['datetime'], keep='last', inplace=True)
+    merged_df.sort_values(by='datetime', inplace=True)
+    os.makedirs(os.path.dirname(save_file), exist_ok=True)
+    merged_df.to_csv(save_file, index=False)
+
+
+def merge_bars(save_file, new_df):
+    """
+    new_df のバーを履歴CSVへマージする。全て既存の最終行より後なら追記し、そうでなければ全体を書き直す。
+    """
+    if os.path.exists(save_file):
+        history = data_cache.read_bars(save_file)
+        index = _as_file_index(new_df['datetime'], history.tz)
+        if len(history) and index.asi8[0] > int(history.datetime[-1]):
+            rows = new_df.set_index(index.rename('datetime')).drop(columns='datetime')
+            data_cache.append_rows(save_file, rows)
+            return
+    merge_rewrite(save_file, new_df)
+
+
+def replay(hist_df, save_file, date_str) -> pd.DataFrame:
+    """
+    履歴 (CerebroFactory が読み込んだ tz なしの DataFrame) の後に、当日のジャーナルのうち履歴より新しいバーを続ける。
+    当日のうちに異常終了・再起動した場合に、インジケーターを停止前と同じ状態まで進めるために使う。
+    """
+    path = journal_path(save_file, date_str)
+    if not os.path.exists(path):
+        return hist_df
+    journal_df = read_journal(path)
+    if journal_df.empty:
+        return hist_df
+    journal_df = journal_df.set_index(_as_file_index(journal_df['datetime'], None).rename('datetime')).drop(columns='datetime')
+    if not hist_df.empty:
+        journal_df = journal_df[journal_df.index > hist_df.index[-1]].reindex(columns=hist_df.columns)
+    return pd.concat([hist_df, journal_df]) if not hist_df.empty else journal_df
+
+
+def compact(save_file, date_str) -> pd.DataFrame:
+    """ジャーナルを履歴CSVへマージしてジャーナルを削除し、マージしたバーを返す。"""
+    path = journal_path(save_file, date_str)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['datetime', *COLUMNS])
+    new_df = read_journal(path)
+    if not new_df.empty:
+        merge_bars(save_file, new_df)
+    os.remove(path)
+    return new_df
+
+
+def recover(data_dir, before_date):
+    """
+    before_date (YYYYMMDD) より前の日のジャーナル (終了処理をせずに停止した日) を日付順に全てマージし、
+    [(銘柄コード, 保存先, マージしたバー)] を返す。当日のジャーナルは replay で再生するため対象外。
+    """
+    recovered = []
+    paths = [(parse_journal_path(p), p) for p in glob.glob(os.path.join(data_dir, f"*{JOURNAL_SUFFIX}"))]
+    for (save_file, date_str), path in sorted(paths, key=lambda x: (x[0][1], x[0][0])):
+        if date_str >= before_date:
+            continue
+        symbol = os.path.basename(save_file).split('_')[0]
+        try:
+            new_df = compact(save_file, date_str)
+            logger.info(f"[{symbol}] Recovered {len(new_df)} bars from journal {path}")
+            recovered.append((symbol, save_file, new_df))
+        except Exception as e:
+            logger.error(f"[{symbol}] Failed to recover journal {path}: {e}", exc_info=True)
+    return recovered
+
+
+def update_resampled(symbol, data_dir, save_file, new_df, date_str) -> bool:
+    """
+    マージしたバー (new_df) が含まれる期間だけを5分足の履歴から集計し直し、
+    60分足・日足の最新のCSVの末尾を置き換えて {symbol}_{suffix}_{date_str}.csv に保存する。
+    既存の集計ファイルがない場合は何もせず False を返す (呼び出し側で全体を再生成する)。
+    """
+    latest_files = {}
+    for _, suffix in RESAMPLE_TARGETS:
+        files = glob.glob(os.path.join(data_dir, f"{symbol}_{suffix}_*.csv"))
+        if not files:
+            return False
+        latest_files[suffix] = max(files, key=os.path.getctime)
+
+    history = data_cache.read_bars(save_file)
+    first = pd.Timestamp(new_df['datetime'].min())
+    first = first.tz_localize(TZ) if first.tzinfo is None else first.tz_convert(TZ)
+    for rule, suffix in RESAMPLE_TARGETS:
+        period_start = first.floor(rule)
+        # 期間の開始以降の5分足だけを集計する (期間の途中から始まるジャーナルでも、期間内の既存のバーを含める)
+        k = int(history.datetime.searchsorted(_as_file_index([period_start], history.tz).asi8[0]))
+        tail = data_cache.Bars(history.datetime[k:], history.values[:, k:], history.columns, history.tz).to_dataframe()
+        tail.index = _as_file_index(tail.index, TZ)
+        resampled = tail.resample(rule, closed='left', label='left').agg(AGGREGATION).dropna()
+
+        latest = latest_files[suffix]
+        existing = data_cache.read_bars(latest)
+        resampled.index = _as_file_index(resampled.index, existing.tz).rename('datetime')
+        j = int(existing.datetime.searchsorted(_as_file_index([period_start], existing.tz).asi8[0]))
+        save_path = os.path.join(data_dir, f"{symbol}_{suffix}_{date_str}.csv")
+        if j == len(existing):
+            if os.path.abspath(save_path) != os.path.abspath(latest):
+                data_cache.copy_csv(latest, save_path)
+            data_cache.append_rows(save_path, resampled)
+        else:
+            # 集計済みの期間に重なる場合は、重なる行を置き換えて書き直す (集計ファイルは5分足より十分小さい)
+            kept = existing.to_dataframe().iloc[:j]
+            kept.index = _as_file_index(kept.index, existing.tz).rename('datetime')
+            pd.concat([kept, resampled]).to_csv(save_path)
+        logger.info(f"[{symbol}] {suffix} CSV updated: {save_path} (+{len(resampled)} rows from {period_start})")
+    return True
\ No newline at end of file
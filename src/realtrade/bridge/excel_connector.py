@@ -6,6 +6,7 @@ import pythoncom
 import os
 
 from .excel_reader import ExcelReader
+from .tick_publisher import TickPublisher
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ class ExcelConnector:
     """
     POLLING_INTERVAL = 1.0  # 1秒ごとにExcelをポーリング
 
-    def __init__(self, workbook_path: str):
+    def __init__(self, workbook_path: str, polling_interval: float = None, update_cell: str = None):
         if not os.path.isabs(workbook_path):
             self.workbook_path = os.path.abspath(workbook_path)
         else:
@@ -28,6 +29,15 @@ class ExcelConnector:
         self.lock = threading.Lock()
         self.is_running = False
         self.data_thread = None
+        # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+        # 読み取りのたびに前回と比較し、値の変わった銘柄だけを購読者へ配信する
+        self.publisher = TickPublisher()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        if polling_interval is not None:
+            self.POLLING_INTERVAL = polling_interval
+        self.update_cell = update_cell
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info(f"ExcelConnector initialized for workbook: {self.workbook_path}")
 
     def start(self):
@@ -47,6 +57,15 @@ class ExcelConnector:
             self.data_thread.join(timeout=5)
         logger.info("Excel data listener thread stopped.")
 
+    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+    def subscribe(self, symbol, callback):
+        """銘柄の値が変わるたびに callback(tick) を呼ぶ。(Tick: 銘柄コード・読み取りの通し番号・読み取り完了時刻・値)"""
+        self.publisher.subscribe(symbol, callback)
+
+    def unsubscribe(self, symbol, callback):
+        self.publisher.unsubscribe(symbol, callback)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _data_loop(self):
         """
         バックグラウンドで実行され、ExcelReader を使って定期的にデータを更新する。
@@ -56,7 +75,7 @@ class ExcelConnector:
         try:
             # xlwingsでBookオブジェクトを取得（既存のExcelプロセスに接続、なければ開く）
             book = xw.Book(self.workbook_path)
-            self.reader = ExcelReader(book.sheets)
+            self.reader = ExcelReader(book.sheets, update_cell=self.update_cell)
             logger.info("Data monitoring thread established connection to Excel.")
 
             while self.is_running:
@@ -64,11 +83,19 @@ class ExcelConnector:
                     # データ取得と解析はReaderに委譲
                     market_data = self.reader.read_market_data()
                     positions = self.reader.read_positions()
+                    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+                    read_at = time.perf_counter()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
 
                     # 取得したデータをスレッドセーフに格納
                     with self.lock:
                         self.latest_data = market_data
                         self.latest_positions = positions
+
+                    # ▼▼▼【変更箇所: ティックの配信】▼▼▼
+                    # ロックの外で配信する (購読者は get_latest_data を経由せずに Tick の値を使う)
+                    self.publisher.publish(market_data, read_at)
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
                         
                 except Exception as e:
                     logger.error(f"Error during data read loop: {e}", exc_info=True)
@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 try:
     import xlwings as xw
 except ImportError:
@@ -10,9 +11,21 @@ class ExcelReader:
     """
     Excelシートの構造を熟知し、指定されたセルのデータを読み取って
     Pythonで扱える形式に変換・整形する責務を持つ。
-    このクラスは状態を持たない (Stateless)。
+    COM 呼び出し (プロセス間通信) を減らすため、シートごとに1回の範囲読み取りで全データを取得する。
+    前回の読み取り結果を保持し、変化のない部分は再変換しない:
+      - 銘柄コード列 -> 行の対応は、列の内容が変わった時だけ作り直す
+      - 値の変わった行だけを事前確保した numpy 配列 (数値列) に変換し、その行の辞書を作り直す
+      - 範囲全体が前回と同じなら変換せず、前回と同じ辞書オブジェクトを返す (呼び出し側は `is` で判定できる)
+      - update_cell (RSS の更新時刻などを表示するセル) を指定すると、その値が前回と同じ場合は範囲の読み取り自体を省略する
     """
-    def __init__(self, sheets: 'xw.Sheets'):
+    # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+    MARKET_RANGE = 'A2:I226'    # A-F列: 銘柄コード・現在値・始値・高値・安値・出来高 / I2: 現金残高
+    CASH_COLUMN = 8
+    POSITION_RANGE = 'A3:J203'
+    MARKET_FIELDS = ('close', 'open', 'high', 'low', 'volume')
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    def __init__(self, sheets: 'xw.Sheets', update_cell: str = None):
         if xw is None:
             raise ImportError("xlwings is not installed. Please install it with 'pip install xlwings'")
             
@@ -24,44 +37,119 @@ class ExcelReader:
             logger.error(f"Failed to find required sheets ('リアルタイムデータ', 'position'). Error: {e}")
             raise
 
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        self.update_cell = update_cell
+        self._update_stamp = None
+        self._symbol_column = None      # 前回の銘柄コード列 (シート上の値)
+        self._rows = []                 # [(範囲内の行番号, 銘柄コード)]
+        self._block = np.empty((0, len(self.MARKET_FIELDS)))   # 行ごとの数値 (self._rows と同じ順序)
+        self._records = []              # 行ごとの値の辞書 (self._rows と同じ順序)
+        self._market_values = None      # 前回の範囲読み取りの値
+        self._market_data = None
+        self._position_values = None
+        self._positions = {}
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def read_market_data(self) -> dict:
         """
         市場データと現金残高を読み取り、整形された辞書を返す。
         """
         try:
-            market_data_range = self.data_sheet.range('A2:F226').value
-            cash_value = self.data_sheet.range('I2').value
-
-            current_market_data = {}
-            if market_data_range:
-                for row in market_data_range:
-                    symbol = row[0]
-                    if symbol is not None:
-                        try:
-                            # 銘柄コード、株価、出来高などを辞書に格納
-                            symbol_str = str(int(symbol))
-                            current_market_data[symbol_str] = {
-                                'close': row[1], 'open': row[2],
-                                'high': row[3], 'low': row[4], 'volume': row[5]
-                            }
-                        except (ValueError, TypeError):
-                            # 不正なデータが含まれる行はスキップ
-                            continue
-            
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            if self.update_cell is not None:
+                stamp = self.data_sheet.range(self.update_cell).value
+                if self._market_data is not None and stamp == self._update_stamp:
+                    return self._market_data
+                self._update_stamp = stamp
+
+            values = self.data_sheet.range(self.MARKET_RANGE).value
+            # 範囲全体が前回と同じなら変換を省略する
+            if self._market_data is not None and values == self._market_values:
+                return self._market_data
+            if not values:
+                self._market_values, self._market_data = values, {'account': {'cash': None}}
+                return self._market_data
+
+            symbol_column = [row[0] for row in values]
+            if symbol_column != self._symbol_column:
+                self._map_symbols(symbol_column)
+                self._market_values = None
+            self._convert_rows(values)
+            self._market_values = values
+            cash_value = values[0][self.CASH_COLUMN]
+
+            current_market_data = {symbol: record for (_, symbol), record in zip(self._rows, self._records)}
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # 口座情報（現金）を辞書に格納
             current_market_data['account'] = {'cash': cash_value}
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            self._market_data = current_market_data
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return current_market_data
 
         except Exception as e:
             logger.error(f"Error reading market data from Excel: {e}", exc_info=True)
             return {'account': {'cash': 0.0}} # エラー発生時はデフォルト値を返す
 
+    # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+    def _map_symbols(self, symbol_column):
+        """銘柄コード列から (行番号, 銘柄コード) の対応を作り直し、数値ブロックを確保する。"""
+        rows = []
+        for i, symbol in enumerate(symbol_column):
+            if symbol is None:
+                continue
+            try:
+                rows.append((i, str(int(symbol))))
+            except (ValueError, TypeError):
+                # 不正な銘柄コードの行はスキップ
+                continue
+        self._symbol_column = symbol_column
+        self._rows = rows
+        self._block = np.full((len(rows), len(self.MARKET_FIELDS)), np.nan)
+        self._records = [dict.fromkeys(self.MARKET_FIELDS) for _ in rows]
+
+    def _convert_rows(self, values):
+        """
+        前回から値の変わった行だけを数値ブロック (numpy) に変換し、その行の辞書を作り直す。
+        空欄・数値でないセルは None として扱う。
+        """
+        previous, width = self._market_values, len(self.MARKET_FIELDS)
+        if previous is None or len(previous) != len(values):
+            # 初回・銘柄の入れ替え時はブロック全体をまとめて変換する
+            if self._rows:
+                self._block[:] = [[self._to_float(v) for v in values[i][1:1 + width]] for i, _ in self._rows]
+            self._records = [{field: (None if v != v else v) for field, v in zip(self.MARKET_FIELDS, numbers)} for numbers in self._block.tolist()]
+            return
+        for k, (i, _) in enumerate(self._rows):
+            row = values[i]
+            if row == previous[i]:
+                continue
+            numbers = self._block[k]
+            numbers[:] = [self._to_float(v) for v in row[1:1 + width]]
+            self._records[k] = {field: (None if v != v else v) for field, v in zip(self.MARKET_FIELDS, numbers.tolist())}
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value) if value is not None else np.nan
+        except (ValueError, TypeError):
+            return np.nan
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def read_positions(self) -> dict:
         """
         建玉情報を読み取り、整形された辞書を返す。
         """
         try:
-            position_data_range = self.position_sheet.range('A3:J203').value
+            position_data_range = self.position_sheet.range(self.POSITION_RANGE).value
+
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            # 前回と同じ内容なら変換を省略する
+            if position_data_range is not None and position_data_range == self._position_values:
+                return self._positions
+            self._position_values = position_data_range
+            # ▲▲▲【変更箇所ここまで】▲▲▲
 
             current_positions = {}
             if not position_data_range:
@@ -88,6 +176,9 @@ class ExcelReader:
                     # 不正なデータが含まれる行はスキップ
                     continue
             
+            # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+            self._positions = current_positions
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return current_positions
 
         except Exception as e:
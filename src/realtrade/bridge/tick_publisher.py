@@ -0,0 +1,77 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Tick:
+    """
+    1銘柄分の値の変化。
+    seq: 読み取りの通し番号 / read_at: 読み取り完了時刻 (time.perf_counter) / data: 銘柄の値 (行がなくなった場合は空の辞書)
+    """
+    __slots__ = ('symbol', 'seq', 'read_at', 'data')
+
+    def __init__(self, symbol, seq, read_at, data):
+        self.symbol = symbol
+        self.seq = seq
+        self.read_at = read_at
+        self.data = data
+
+    def __repr__(self):
+        return f"Tick({self.symbol}, seq={self.seq}, data={self.data})"
+
+
+class TickPublisher:
+    """
+    Excel から読み取ったスナップショット ({銘柄コード: 値の辞書}) を前回と比較し、
+    値の変わった銘柄だけを、その銘柄の購読者 (コールバック) へ Tick として配信する。
+    比較するのは購読されている銘柄だけで、値の変わらない銘柄は購読者を呼び出さない。
+    (時刻の経過だけでは配信しないため、値の変わらない銘柄のバーは CerebroScheduler が時間枠の境界で最後の値を再送して確定させる)
+    publish はデータ取得スレッドから呼ばれる。購読者の登録は別スレッドからでもよい (登録時に辞書を差し替えるため、配信側はロック不要)。
+    配信する値の辞書は購読者間で共有されるため、購読者は変更しないこと。
+    """
+    def __init__(self):
+        self._subscribers = {}
+        self._subscribe_lock = threading.Lock()
+        self._previous = {}
+        self.seq = 0
+
+    def subscribe(self, symbol, callback):
+        """callback(tick) を登録する。データ取得スレッドから呼ばれるため、処理は短く保つこと。"""
+        symbol = str(symbol)
+        with self._subscribe_lock:
+            subscribers = dict(self._subscribers)
+            subscribers[symbol] = subscribers.get(symbol, ()) + (callback,)
+            self._subscribers = subscribers
+
+    def unsubscribe(self, symbol, callback):
+        symbol = str(symbol)
+        with self._subscribe_lock:
+            subscribers = dict(self._subscribers)
+            callbacks = tuple(c for c in subscribers.get(symbol, ()) if c != callback)  # バインドメソッドは取得のたびに別オブジェクトのため等価で比較する
+            if callbacks:
+                subscribers[symbol] = callbacks
+            else:
+                subscribers.pop(symbol, None)
+            self._subscribers = subscribers
+
+    def publish(self, snapshot, read_at):
+        """スナップショットを前回と比較して配信し、配信した銘柄数を返す。"""
+        self.seq += 1
+        if snapshot is self._previous:
+            # ExcelReader は値が変わらなければ同じ辞書を返す
+            return 0
+        previous, self._previous = self._previous, snapshot
+        published = 0
+        for symbol, callbacks in self._subscribers.items():
+            data = snapshot.get(symbol)
+            if data == previous.get(symbol):
+                continue
+            tick = Tick(symbol, self.seq, read_at, data if data is not None else {})
+            for callback in callbacks:
+                try:
+                    callback(tick)
+                except Exception as e:
+                    logger.error(f"[{symbol}] Tick subscriber failed: {e}", exc_info=True)
+            published += 1
+        return published
\ No newline at end of file
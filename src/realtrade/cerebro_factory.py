@@ -7,18 +7,26 @@ import glob
 import pandas as pd
 from datetime import datetime
 
+from src.core import data_cache
+from . import config_realtrade as config
+from . import snapshot as warm_start
+from . import bar_journal
 from .strategy import RealTradeStrategy
 from .rakuten.rakuten_broker import RakutenBroker
 from .rakuten.rakuten_data import RakutenData
+from .scheduler import SteppedCerebro
 
 logger = logging.getLogger(__name__)
 
 class CerebroFactory:
-    def __init__(self, strategy_catalog, base_strategy_params, data_dir, statistics_map):
+    def __init__(self, strategy_catalog, base_strategy_params, data_dir, statistics_map, journal_syncer=None):
         self.strategy_catalog = strategy_catalog
         self.base_strategy_params = base_strategy_params
         self.data_dir = data_dir
         self.statistics_map = statistics_map
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        self.journal_syncer = journal_syncer
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         logger.info("CerebroFactory initialized.")
 
     def create_instance(self, symbol: str, strategy_name: str, connector):
@@ -32,7 +40,12 @@ class CerebroFactory:
         strategy_params['strategy_name'] = strategy_name
 
         try:
-            cerebro = bt.Cerebro(runonce=False)
+            # ▼▼▼【変更箇所: ライン・バッファの制限・スケジューラー駆動】▼▼▼
+            # exactbars=1: データ・インジケーターの全ラインを必要な過去バー数だけ保持する (RealTradeStrategy.qbuffer)
+            # EVENT_SCHEDULER: CerebroScheduler が1ステップずつ駆動する SteppedCerebro を使う
+            cerebro_cls = SteppedCerebro if config.EVENT_SCHEDULER else bt.Cerebro
+            cerebro = cerebro_cls(runonce=False, exactbars=1 if config.BOUNDED_LINE_BUFFERS else False)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             cerebro.setbroker(RakutenBroker(bridge=connector))
             
             # 短期足設定
@@ -50,22 +63,41 @@ class CerebroFactory:
                 latest_file = max(files, key=os.path.getctime)
                 save_file_path = latest_file
                 try:
-                    df = pd.read_csv(latest_file, index_col='datetime', parse_dates=True)
+                    # [変更] バイナリキャッシュ経由で読み込み。タイムゾーン情報は除去してBacktraderに渡す(BT内部で処理するため)
+                    df = data_cache.read_ohlcv(latest_file, tz_naive=True)
                     if not df.empty:
-                        # タイムゾーン情報を除去してBacktraderに渡す(BT内部で処理するため)
-                        if df.index.tz is not None: df.index = df.index.tz_localize(None)
-                        df.columns = [x.lower() for x in df.columns]
                         hist_df = df
                         logger.info(f"[{symbol}] Loaded {len(hist_df)} bars from {latest_file}")
                 except Exception as e:
                     logger.warning(f"[{symbol}] Could not load historical data from {latest_file}: {e}")
             
+            # ▼▼▼【変更箇所: スナップショットからのウォームスタート】▼▼▼
+            # スナップショットが有効なら、全履歴ではなく直近の tail とスナップショット以降のバーだけを供給する
+            snapshot = None
+            if config.WARM_START and config.STREAMING_INDICATORS:
+                snapshot = warm_start.load_snapshot(config.SNAPSHOT_DIR, symbol, strategy_name, strategy_params)
+                if snapshot is not None:
+                    full_bars = len(hist_df)
+                    hist_df = warm_start.bars_to_replay(snapshot, hist_df)
+                    logger.info(f"[{symbol}] Warm start from snapshot (last bar {snapshot['last_bar']}): "
+                                f"replaying {len(hist_df)} of {full_bars} bars")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # ファイルが存在しない場合は新規作成パスを設定 (年単位)
             if not save_file_path:
                 year = datetime.now().year
                 save_file_path = os.path.join(self.data_dir, f"{symbol}_{compression}m_{year}.csv")
                 logger.info(f"[{symbol}] 新規保存先を設定: {save_file_path}")
 
+            # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+            # 当日のうちに再起動した場合、停止前に確定したバー (当日のジャーナル) を履歴に続けて供給する
+            if config.BAR_JOURNAL:
+                replayed = len(hist_df)
+                hist_df = bar_journal.replay(hist_df, save_file_path, datetime.now().strftime('%Y%m%d'))
+                if len(hist_df) > replayed:
+                    logger.info(f"[{symbol}] Replaying {len(hist_df) - replayed} bars from today's journal")
+            # ▲▲▲【変更箇所ここまで】▲▲▲
+
             # [変更] RakutenDataにsave_fileを渡す
             primary_data = RakutenData(
                 dataname=hist_df,
@@ -73,7 +105,12 @@ class CerebroFactory:
                 symbol=symbol,
                 timeframe=bt.TimeFrame.TFrame(short_tf_config['timeframe']),
                 compression=short_tf_config['compression'],
-                save_file=save_file_path
+                save_file=save_file_path,
+                scheduled=config.EVENT_SCHEDULER,
+                # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+                journal=config.BAR_JOURNAL,
+                journal_syncer=self.journal_syncer
+                # ▲▲▲【変更箇所ここまで】▲▲▲
             )
             cerebro.adddata(primary_data, name=str(symbol))
 
@@ -90,7 +127,7 @@ class CerebroFactory:
             # 戦略追加
             stats_key = (strategy_name, str(symbol))
             symbol_statistics = self.statistics_map.get(stats_key, {})
-            strategy_components = { 'statistics': symbol_statistics }
+            strategy_components = { 'statistics': symbol_statistics, 'snapshot': snapshot }
             
             cerebro.addstrategy(
                 RealTradeStrategy, 
@@ -21,6 +21,38 @@ if LIVE_TRADING:
 else:
     print("<<< シミュレーションモードで起動します (MockDataFetcher使用) >>>")
 
+# ライブ取引のインジケーターをストリーミング版 (src/core/streaming) で計算する。
+# False にすると Backtrader のインジケーターを使う。(定義がストリーミング版で再現できない戦略も Backtrader 版になる)
+STREAMING_INDICATORS = True
+
+# ライン・バッファをストラテジーが必要とする過去バー数に制限する (Backtrader の exactbars=1)。
+# 履歴の長さ・銘柄数に関わらず、セッション中のメモリ使用量が一定になる。False で全履歴を保持する。
+BOUNDED_LINE_BUFFERS = True
+# 全銘柄のメモリ使用量をログに出力する間隔 (秒)。0 で無効。
+MEMORY_REPORT_INTERVAL = 1800
+
+# 終了時に銘柄ごとの状態 (インジケーター・リサンプリング・ポジション) をスナップショットとして保存し、
+# 次回起動時は全履歴を再生せずに復元する。(STREAMING_INDICATORS が True の場合のみ有効)
+WARM_START = True
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshots')
+
+# 全銘柄の Cerebro を1つのスケジューラー・スレッド (src/realtrade/scheduler.py) で駆動する。
+# Excel の値が変わった銘柄だけを進めるため、ティックのない間はCPUをほぼ使わない。False で銘柄ごとにスレッドを起動する。
+EVENT_SCHEDULER = True
+# Excel の読み取りからストラテジーの処理完了までの遅延がこの秒数を超えたら警告する。
+DISPATCH_LATENCY_WARN = 0.5
+# ディスパッチ遅延の集計をログに出力する間隔 (秒)。0 で無効。
+DISPATCH_REPORT_INTERVAL = 300
+
+# 確定した5分足を銘柄ごと・日ごとのジャーナル ({5分足CSV}.{YYYYMMDD}.journal) へ1本ずつ追記し、異常終了しても失われないようにする。
+# 当日のうちに再起動した場合は履歴CSVに続けて当日のジャーナルを再生し、インジケーターを停止前の状態まで進める。
+# 終了時 (終了処理をせずに停止した日の分は次回起動時) にジャーナルを5分足CSVへ追記し、60分足・日足は新しいバーを含む期間だけを更新する。
+# False で従来どおり終了時に5分足CSV全体を書き直し、60分足・日足を全期間から再生成する。
+BAR_JOURNAL = True
+# ジャーナルをディスクへ同期 (fsync) する間隔 (秒)。追記はOSへの書き出しまでで、同期は別スレッドでまとめて行う。
+# (プロセスの異常終了ではバーは失われない。OSの停止・電源断ではこの秒数以内に確定したバーが失われうる)
+BAR_JOURNAL_SYNC_INTERVAL = 1.0
+
 INITIAL_CAPITAL = 5000000
 MAX_CONCURRENT_ORDERS = 5
 RECOMMEND_FILE_PATTERN = os.path.join(BASE_DIR, "results", "evaluation", "*", "all_recommend_*.csv")
@@ -31,4 +63,8 @@ LOG_DIR = os.path.join(BASE_DIR, 'log')
 
 # === Excel Bridge Settings ===
 # trading_hub.xlsmへの絶対パスまたは相対パスを指定
-EXCEL_WORKBOOK_PATH = os.path.join(BASE_DIR, "external", "trading_hub.xlsm")
\ No newline at end of file
+EXCEL_WORKBOOK_PATH = os.path.join(BASE_DIR, "external", "trading_hub.xlsm")
+# Excel の読み取り間隔 (秒)。読み取りはシートごとに1回の範囲読み取りで、値の変わらない行は再変換しないため 0.2 程度まで短縮できる。
+EXCEL_POLLING_INTERVAL = 1.0
+# RSS の更新時刻などを表示するセル (例: 'K2')。指定すると、その値が前回と同じ読み取りでは市場データの範囲を読まない。
+EXCEL_UPDATE_CELL = None
\ No newline at end of file
@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+# ==============================================================================
+# 履歴バーの高速供給
+# 起動時の履歴を1度だけ連続した numpy 配列 (日時は date2num 済み) に変換し、
+# ライブフィードの _load からカーソルで1行ずつ取り出す。
+# DataFrame の iloc による1行取り出し・スライスを毎バー繰り返す方式と異なり、1本あたりの処理は
+# 配列の1行をスカラーに変換するだけで、起動時間は履歴の本数に比例する。
+# ==============================================================================
+
+_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'openinterest')
+_ORDINAL_EPOCH = 719163  # date(1970, 1, 1).toordinal()
+_NS_PER_DAY = 86_400_000_000_000
+# この範囲 (1436〜2871年) の序数日は仮数部の指数が同じで、日内の端数の丸め方が日付に依存しない
+_ORDINAL_MIN, _ORDINAL_MAX = 2 ** 19, 2 ** 20 - 2
+_BASE = float(_ORDINAL_MIN)
+
+
+def _day_fraction(time_of_day_ns):
+    """
+    日内の経過時間 (ns) を、bt.date2num が序数日に加算する端数に変換する。
+    bt.date2num は math.fsum で (序数日, 時/24, 分/1440, 秒/86400, マイクロ秒/86400e6) を1回だけ丸めるため、
+    同じ指数範囲の基準日で計算した結果から基準日を引けば、どの序数日にもそのまま加算できる値になる。
+    """
+    us, _ = divmod(int(time_of_day_ns), 1000)
+    s, us = divmod(us, 1_000_000)
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return math.fsum((_BASE, h / 24, m / 1440, s / 86400, us / 86400e6)) - _BASE
+
+
+def date2num_array(index, tz=None):
+    """
+    DatetimeIndex 全体を bt.date2num と (ビット単位で) 同じ値の float64 配列に変換する。
+    tz が指定された場合は、フィードの date2num と同様に naive な日時をそのタイムゾーンの時刻とみなす。
+    tz 付きの日時は UTC に換算する。
+    """
+    index = pd.DatetimeIndex(index)
+    if tz is not None and index.tz is None:
+        index = index.tz_localize(tz)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    if len(index) == 0:
+        return np.empty(0)
+
+    ns = index.asi8
+    days, time_of_day = np.divmod(ns, _NS_PER_DAY)
+    ordinals = days + _ORDINAL_EPOCH
+    if ordinals.min() < _ORDINAL_MIN or ordinals.max() > _ORDINAL_MAX:
+        return np.array([bt.date2num(dt) for dt in index.to_pydatetime()])
+
+    # 日内の時刻の種類はバー数よりはるかに少ない (5分足なら1日66種類)
+    times, inverse = np.unique(time_of_day, return_inverse=True)
+    fractions = np.array([_day_fraction(t) for t in times])
+    return ordinals.astype(np.float64) + fractions[inverse.ravel()]
+
+
+class HistoryCursor:
+    """
+    履歴の DataFrame (datetime インデックス, open/high/low/close/volume[/openinterest]) を
+    n×7 の float64 配列に変換して保持し、先頭から1本ずつフィードのラインへ書き込む。
+    """
+    def __init__(self, hist_df, tz=None):
+        self._rows = np.zeros((len(hist_df), 1 + len(_COLUMNS)))
+        self._rows[:, 0] = date2num_array(hist_df.index, tz)
+        for j, column in enumerate(_COLUMNS, start=1):
+            if column in hist_df.columns:
+                self._rows[:, j] = hist_df[column].to_numpy(dtype=np.float64)
+        self._pos = 0
+        self.last_datetime = pd.Timestamp(hist_df.index[-1]).to_pydatetime() if len(hist_df) else None
+        self.last_close = float(self._rows[-1, 4]) if len(hist_df) else None
+
+    def __len__(self):
+        return len(self._rows) - self._pos
+
+    @property
+    def exhausted(self):
+        return self._pos >= len(self._rows)
+
+    def populate(self, lines):
+        """次の1本をラインの現在位置 ([0]) に書き込む。"""
+        dt, o, h, l, c, v, oi = self._rows[self._pos].tolist()
+        self._pos += 1
+        lines.datetime[0] = dt
+        lines.open[0] = o
+        lines.high[0] = h
+        lines.low[0] = l
+        lines.close[0] = c
+        lines.volume[0] = v
+        lines.openinterest[0] = oi
\ No newline at end of file
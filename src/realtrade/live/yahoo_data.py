@@ -7,6 +7,8 @@ import yfinance as yf
 import pandas as pd
 from queue import Queue, Empty
 
+from ..history_cursor import HistoryCursor
+
 logger = logging.getLogger(__name__)
 
 class YahooData(bt.feeds.PandasData):
@@ -29,6 +31,7 @@ class YahooData(bt.feeds.PandasData):
         
         self.q = Queue()
         self._hist_df = None
+        self._history = None
         self._load_historical_data()
 
         self._thread = None
@@ -58,11 +61,18 @@ class YahooData(bt.feeds.PandasData):
         super(YahooData, self).stop()
 
     def _load(self):
+        # ▼▼▼【変更箇所: 履歴を1度だけ配列に変換し、カーソルで1本ずつ供給】▼▼▼
         if self._hist_df is not None and not self._hist_df.empty:
-            row = self._hist_df.iloc[0]
-            self._hist_df = self._hist_df.iloc[1:]
-            self._push_bar(row)
+            self._history = HistoryCursor(self._hist_df)
+            self._hist_df = None
+        if self._history is not None:
+            self._history.populate(self.lines)
+            if self._history.exhausted:
+                self.last_close_price = self._history.last_close
+                self.last_dt = self._history.last_datetime
+                self._history = None
             return True
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         while True:
             try:
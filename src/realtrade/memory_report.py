@@ -0,0 +1,56 @@
+import sys
+from array import array
+
+from src.core.streaming import StreamingIndicatorSet
+
+# ライン・バッファが保持している値のメモリ使用量の概算。
+#   - 無制限モードのラインは array('d') (1値8バイト)、制限モード (exactbars) は float オブジェクトの deque
+#   - ストリーミング・インジケーターはリングバッファ (float オブジェクトのリスト)
+_FLOAT_BYTES = sys.getsizeof(0.0)
+_POINTER_BYTES = 8
+
+
+def _line_bytes(line):
+    values = line.array
+    size = sys.getsizeof(values)
+    if not isinstance(values, array):
+        size += len(values) * _FLOAT_BYTES
+    return len(values), size
+
+
+def _lines_of(obj, seen):
+    """obj (データフィード/ストラテジー/インジケーター) とその配下の全ラインを重複なく列挙する。"""
+    if id(obj) in seen: return
+    seen.add(id(obj))
+    for line in getattr(obj, 'lines', ()):
+        if id(line) not in seen and hasattr(line, 'array'):
+            seen.add(id(line))
+            yield line
+    for children in getattr(obj, '_lineiterators', {}).values():
+        for child in children:
+            yield from _lines_of(child, seen)
+
+
+def strategy_footprint(strategy):
+    """
+    1銘柄分 (ストラテジーとそのデータフィード・インジケーター) が保持している値の数と概算バイト数を返す。
+    {'bars': {時間足: 保持バー数}, 'values': 値の数, 'bytes': バイト数}
+    """
+    seen, values, size = set(), 0, 0
+    for data in strategy.datas:
+        for line in _lines_of(data, seen):
+            n, b = _line_bytes(line); values += n; size += b
+    for line in _lines_of(strategy, seen):
+        n, b = _line_bytes(line); values += n; size += b
+
+    if isinstance(strategy.indicators, StreamingIndicatorSet):
+        n = strategy.indicators.retained_values()
+        values += n; size += n * (_FLOAT_BYTES + _POINTER_BYTES)
+
+    bars = {tf: len(data.close.array) for tf, data in strategy.data_feeds.items()}
+    return {'bars': bars, 'values': values, 'bytes': size}
+
+
+def format_footprint(footprint):
+    bars = ", ".join(f"{tf}={n}" for tf, n in footprint['bars'].items())
+    return f"保持バー数 [{bars}] / 保持値 {footprint['values']:,} 個 / 約 {footprint['bytes'] / 1024:,.1f} KB"
\ No newline at end of file
@@ -3,9 +3,12 @@ from datetime import datetime, timedelta, time
 import logging
 import pandas as pd
 import threading
-import os
 
 from ..bar_builder import BarBuilder
+from ..history_cursor import HistoryCursor
+# ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+from .. import bar_journal
+# ▲▲▲【変更箇所ここまで】▲▲▲
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,17 @@ class RakutenData(bt.feeds.PandasData):
         ('timeframe', bt.TimeFrame.Minutes),
         ('heartbeat', 1.0),
         ('save_file', None), # [新規] 保存先ファイルパス
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # True: CerebroScheduler が全銘柄のバーをまとめて構築し、notify_bar() で渡した確定足だけを供給する
+        # (ブリッジへの問い合わせ・ハートビートによる間引き・銘柄ごとの BarBuilder は不要)
+        ('scheduled', False),
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        # True: 確定したバーを当日のジャーナル ({save_file}.{YYYYMMDD}.journal) へ1本ずつ追記し、save_history ではジャーナルを差分マージする
+        ('journal', False),
+        # ジャーナルのディスクへの同期をまとめて行う JournalSyncer (None の場合は追記のたびに同期する)
+        ('journal_syncer', None),
+        # ▲▲▲【変更箇所ここまで】▲▲▲
     )
 
     def __init__(self):
@@ -28,6 +42,10 @@ class RakutenData(bt.feeds.PandasData):
         )
         empty_df = empty_df.set_index('datetime')
         self.p.dataname = empty_df
+        # ▼▼▼【変更箇所: 履歴の DataFrame を _hist_df 以外から参照させない】▼▼▼
+        # メタクラスが dataname を _dataname にも保持し、リサンプリング用のクローンに引き継ぐため差し替える
+        self._dataname = empty_df
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
         super(RakutenData, self).__init__()
         
@@ -43,24 +61,106 @@ class RakutenData(bt.feeds.PandasData):
         self._stopevent = threading.Event()
         
         # BarBuilderのインスタンスを生成
-        self.builder = BarBuilder(interval_minutes=self.p.compression)
+        # ▼▼▼【変更箇所: スケジューラー駆動ではスケジューラーがバーを構築する】▼▼▼
+        self.builder = None if self.p.scheduled else BarBuilder(interval_minutes=self.p.compression)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # [新規] データ保存用バッファと設定
         self.save_file = self.p.save_file
         self._new_bars = [] 
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        self.journal_date = datetime.now().strftime('%Y%m%d')
+        self.journal = None
+        if self.p.journal and self.save_file:
+            self.journal = bar_journal.BarJournal(bar_journal.journal_path(self.save_file, self.journal_date), syncer=self.p.journal_syncer)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # [追加] 累積出来高のキャッシュ (None/0判定用)
         self._last_valid_cumulative_volume = 0.0
 
         self.history_supplied = False if (self._hist_df is not None and not self._hist_df.empty) else True
+        # ▼▼▼【変更箇所: 履歴はカーソルで供給】▼▼▼
+        # 最初の _load で _hist_df を numpy 配列に変換する (フィードのタイムゾーンは start 後に確定するため)
+        self._history = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        self._bar = None
+        self.bars_built = 0  # リアルタイムで確定させたバーの数
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+        # ▼▼▼【変更箇所: 供給終了フラグ】▼▼▼
+        # stop() 後に _load が False を返した時点で True。以降に届く上位足のバーは Backtrader が
+        # データ終了時に作りかけの足を確定させたもので、翌日の再生では同じ足にならない
+        self.ended = False
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def stop(self):
         self._stopevent.set()
 
+    # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+    def notify_bar(self, bar):
+        """スケジューラーが構築した確定足 (None: 確定足なし) を受け取る。次の _load で1回だけ供給する。"""
+        self._bar = bar
+
+    def tick_values(self, latest_data, current_dt):
+        """
+        Excel の値の辞書を、バーの構築に使う (現在値, 累計出来高) に変換する。
+        値がない・参照できる価格がない・取引時間外の場合は None (バーを更新しない)。
+        """
+        if not latest_data:
+            return None
+
+        price = latest_data.get('close')
+        volume = latest_data.get('volume')
+
+        # 価格が None または 0（未決定）の場合の処理
+        is_price_invalid = (price is None) or (price <= 0)
+
+        if is_price_invalid:
+            # 既に過去データ（前日終値など）が読み込まれていればそれを使用
+            if len(self) > 0:
+                price = self.lines.close[0]
+                # 価格が無効な間は、出来高も「変化なし（Tick出来高0）」として扱うため
+                # 前回の有効な累積出来高を強制的に使用する
+                volume = self._last_valid_cumulative_volume
+            else:
+                # 参照できる価格が全くない場合は待機
+                return None
+        else:
+            # 出来高のハンドリング
+            if volume is None:
+                # Noneの場合は前回値を維持
+                volume = self._last_valid_cumulative_volume
+            else:
+                # 0 または 正の値の場合は有効な累積出来高として更新
+                self._last_valid_cumulative_volume = volume
+
+        # 取引時間外フィルター (09:00-11:30, 12:30-15:30)
+        current_time = current_dt.time()
+        is_morning = time(9, 0) <= current_time <= time(11, 30)
+        is_afternoon = time(12, 30) <= current_time <= time(15, 30)
+        if not (is_morning or is_afternoon):
+            return None
+        return price, volume
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def save_history(self):
         """
         蓄積された当日の確定足をCSVに保存・マージする。
+        ジャーナル使用時は、マージした確定足の DataFrame を返す。
         """
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        if self.journal is not None:
+            self.journal.close()
+            try:
+                new_df = bar_journal.compact(self.save_file, self.journal_date)
+                logger.info(f"[{self.symbol}] 履歴データを保存しました: {self.save_file} (+{len(new_df)} records)")
+                self._new_bars = []
+                return new_df
+            except Exception as e:
+                logger.error(f"[{self.symbol}] 履歴データの保存中にエラーが発生しました: {e}", exc_info=True)
+                return None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         if not self._new_bars:
             logger.info(f"[{self.symbol}] 保存すべき新規データはありません。")
             return
@@ -70,48 +170,12 @@ class RakutenData(bt.feeds.PandasData):
             return
 
         try:
-            # 1. 新規データをDataFrame化
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            # タイムゾーンの統一 (Asia/Tokyo)・既存データとのマージ・重複排除とソート・保存は bar_journal.merge_rewrite で行う
             new_df = pd.DataFrame(self._new_bars)
             new_df.rename(columns={'timestamp': 'datetime'}, inplace=True)
-            if 'openinterest' not in new_df.columns:
-                new_df['openinterest'] = 0
-
-            # タイムゾーンをJSTに統一 ('Asia/Tokyo')
-            if 'datetime' in new_df.columns:
-                new_df['datetime'] = pd.to_datetime(new_df['datetime'])
-                if new_df['datetime'].dt.tz is None:
-                    new_df['datetime'] = new_df['datetime'].dt.tz_localize('Asia/Tokyo')
-                else:
-                    new_df['datetime'] = new_df['datetime'].dt.tz_convert('Asia/Tokyo')
-
-            # 2. 既存データとのマージ
-            if os.path.exists(self.save_file):
-                try:
-                    # 既存CSV読み込み
-                    old_df = pd.read_csv(self.save_file, parse_dates=['datetime'])
-                    old_df.columns = [c.lower() for c in old_df.columns]
-                    
-                    # 既存データのタイムゾーン統一
-                    if 'datetime' in old_df.columns:
-                         if old_df['datetime'].dt.tz is None:
-                             old_df['datetime'] = old_df['datetime'].dt.tz_localize('Asia/Tokyo')
-                         else:
-                             old_df['datetime'] = old_df['datetime'].dt.tz_convert('Asia/Tokyo')
-
-                    merged_df = pd.concat([old_df, new_df])
-                except Exception as e:
-                    logger.error(f"[{self.symbol}] 既存CSV読み込み失敗。新規作成します: {e}")
-                    merged_df = new_df
-            else:
-                merged_df = new_df
-
-            # 3. 重複排除とソート
-            merged_df.drop_duplicates(subset=['datetime'], keep='last', inplace=True)
-            merged_df.sort_values(by='datetime', inplace=True)
-
-            # 4. 保存
-            os.makedirs(os.path.dirname(self.save_file), exist_ok=True)
-            merged_df.to_csv(self.save_file, index=False)
+            bar_journal.merge_rewrite(self.save_file, new_df)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             
             logger.info(f"[{self.symbol}] 履歴データを保存しました: {self.save_file} (+{len(self._new_bars)} records)")
             
@@ -123,25 +187,40 @@ class RakutenData(bt.feeds.PandasData):
 
     def _load(self):
         # 1. 過去データの供給
+        # ▼▼▼【変更箇所: 履歴を1度だけ配列に変換し、カーソルで1本ずつ供給】▼▼▼
+        # 毎バーの iloc による取り出し・スライスを避け、1本あたりの処理を履歴の長さに依存させない
         if self._hist_df is not None and not self._hist_df.empty:
-            row = self._hist_df.iloc[0]
-            self._hist_df = self._hist_df.iloc[1:]
-            self._populate_lines_from_series(row)
-            logger.debug(f"[{self.symbol}] 過去データを供給: {row.name}")
-            if self._hist_df.empty:
+            self._history = HistoryCursor(self._hist_df, tz=self._tz)
+            self._hist_df = None
+            logger.debug(f"[{self.symbol}] 過去データ {len(self._history)} 件を供給します。")
+        if self._history is not None:
+            self._history.populate(self.lines)
+            if self._history.exhausted:
                 self.history_supplied = True
+                self.last_dt = self._history.last_datetime
+                self._history = None
             return True
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 2. 停止判定
         if self._stopevent.is_set():
+            # ▼▼▼【変更箇所: 供給終了フラグ】▼▼▼
+            self.ended = True
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             return False
 
         current_dt = datetime.now()
         
+        # ▼▼▼【変更箇所: スケジューラー駆動ではスケジューラーが構築した確定足を1回だけ供給する】▼▼▼
+        if self.p.scheduled:
+            bar, self._bar = self._bar, None
+            return None if bar is None else self._accept_bar(bar)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         # 3. ハートビート制御 (高頻度アクセス防止)
         if self.last_dt and (current_dt - self.last_dt) < timedelta(seconds=self.p.heartbeat):
             return None
-        
+
         # 4. データ取得
         latest_data = self.bridge.get_latest_data(self.symbol)
 
@@ -149,57 +228,28 @@ class RakutenData(bt.feeds.PandasData):
         if not latest_data:
             return self._load_heartbeat()
 
-        price = latest_data.get('close')
-        volume = latest_data.get('volume')
-
-        # --- ▼▼▼ 修正箇所 ▼▼▼ ---
-        
-        # 価格が None または 0（未決定）の場合の処理
-        is_price_invalid = (price is None) or (price <= 0)
-
-        if is_price_invalid:
-            # 既に過去データ（前日終値など）が読み込まれていればそれを使用
-            if len(self) > 0:
-                price = self.lines.close[0]
-                # 価格が無効な間は、出来高も「変化なし（Tick出来高0）」として扱うため
-                # 前回の有効な累積出来高を強制的に使用する
-                volume = self._last_valid_cumulative_volume
-            else:
-                # 参照できる価格が全くない場合は待機（Heartbeat）
-                return self._load_heartbeat()
-        else:
-            # 価格が有効な場合
-            
-            # 出来高のハンドリング
-            if volume is None:
-                # Noneの場合は前回値を維持
-                volume = self._last_valid_cumulative_volume
-            else:
-                # 0 または 正の値の場合は有効な累積出来高として更新
-                self._last_valid_cumulative_volume = volume
-
-        # --- ▲▲▲ 修正箇所ここまで ▲▲▲ ---
-
-        # 5. 取引時間外フィルター (09:00-11:30, 12:30-15:30)
-        current_time = current_dt.time()
-        is_morning = time(9, 0) <= current_time <= time(11, 30)
-        is_afternoon = time(12, 30) <= current_time <= time(15, 30)
-
-        if not (is_morning or is_afternoon):
-            # 取引時間外はTick処理しない
+        # ▼▼▼【変更箇所: 値の変換・取引時間外フィルターを tick_values に分離 (スケジューラーと共用)】▼▼▼
+        # 5. 価格・出来高の補完と取引時間外フィルター
+        values = self.tick_values(latest_data, current_dt)
+        if values is None:
+            # 参照できる価格がない場合のハートビートは履歴がないため常に None
             return None
 
         # 6. BarBuilder処理
-        completed_bar = self.builder.add_tick(current_dt, price, volume)
+        completed_bar = self.builder.add_tick(current_dt, *values)
+        return None if completed_bar is None else self._accept_bar(completed_bar)
 
-        if completed_bar:
-            logger.info(f"[{self.symbol}] 新規5分足完成: {completed_bar['timestamp']}")
-            # 保存用バッファに追加
-            self._new_bars.append(completed_bar.copy())
-            self._populate_lines_from_dict(completed_bar)
-            return True
-        else:
-            return None
+    def _accept_bar(self, completed_bar):
+        """確定足を保存用バッファ・ジャーナルに追加し、ラインに供給する。"""
+        logger.info(f"[{self.symbol}] 新規5分足完成: {completed_bar['timestamp']}")
+        # 保存用バッファに追加
+        self._new_bars.append(completed_bar.copy())
+        if self.journal is not None:
+            self.journal.append(completed_bar)
+        self._populate_lines_from_dict(completed_bar)
+        self.bars_built += 1
+        return True
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def _load_heartbeat(self):
         if len(self.lines.close) == 0 or self.lines.close[0] is None:
@@ -226,20 +276,18 @@ class RakutenData(bt.feeds.PandasData):
         if not is_heartbeat:
             self.last_dt = dt
 
-    def _populate_lines_from_series(self, bar_series: pd.Series):
-        dt = pd.to_datetime(bar_series.name).to_pydatetime()
-        self.lines.datetime[0] = self.date2num(dt)
-        self.lines.open[0] = float(bar_series['open'])
-        self.lines.high[0] = float(bar_series['high'])
-        self.lines.low[0] = float(bar_series['low'])
-        self.lines.close[0] = float(bar_series['close'])
-        self.lines.volume[0] = float(bar_series.get('volume', 0))
-        self.lines.openinterest[0] = float(bar_series.get('openinterest', 0))
-        self.last_dt = dt
-        
     def flush(self):
-        final_bar = self.builder.flush()
+        # ▼▼▼【変更箇所: スケジューラー駆動では停止時にスケジューラーが渡した形成途中のバー】▼▼▼
+        if self.p.scheduled:
+            final_bar, self._bar = self._bar, None
+        else:
+            final_bar = self.builder.flush()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         if final_bar:
             self._new_bars.append(final_bar.copy())
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            if self.journal is not None:
+                self.journal.append(final_bar)
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             self._populate_lines_from_dict(final_bar)
             logger.info(f"[{self.symbol}] 最終バーをフラッシュ供給: {final_bar['timestamp']}")
\ No newline at end of file
@@ -15,10 +15,15 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from src.core.util import logger as logger_setup, notifier
+from src.core import data_cache
 from . import config_realtrade as config
 from .bridge.excel_connector import ExcelConnector
 from .position_synchronizer import PositionSynchronizer
 from .cerebro_factory import CerebroFactory
+from .memory_report import format_footprint
+from . import snapshot as warm_start
+from .scheduler import CerebroScheduler
+from . import bar_journal
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +39,7 @@ class RealtimeTrader:
         ).to_dict()
         
         self.statistics_map = {}
-        cols_to_load = ['Kelly_Adj', 'Kelly_Raw']
+        cols_to_load = ['Kelly_Adj', 'Kelly_Raw', 'Kelly_MC']
         for _, row in self.trade_data.iterrows():
             key = (row['戦略名'], str(row['銘柄']))
             stats = {col: row[col] for col in cols_to_load if col in row}
@@ -46,14 +51,27 @@ class RealtimeTrader:
         self.cerebro_instances = []
         self.strategy_instances = {}
         self.stop_event = threading.Event()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        self.scheduler = None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
-        self.connector = ExcelConnector(workbook_path=config.EXCEL_WORKBOOK_PATH)
+        # ▼▼▼【変更箇所: 一括・差分読み取り】▼▼▼
+        self.connector = ExcelConnector(workbook_path=config.EXCEL_WORKBOOK_PATH,
+                                        polling_interval=config.EXCEL_POLLING_INTERVAL,
+                                        update_cell=config.EXCEL_UPDATE_CELL)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        self.journal_syncer = bar_journal.JournalSyncer(config.BAR_JOURNAL_SYNC_INTERVAL, self.stop_event) if config.BAR_JOURNAL else None
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         self.factory = CerebroFactory(
             self.strategy_catalog, 
             self.base_strategy_params, 
             config.DATA_DIR,
-            self.statistics_map
+            self.statistics_map,
+            # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+            journal_syncer=self.journal_syncer
+            # ▲▲▲【変更箇所ここまで】▲▲▲
         )
         self.synchronizer = PositionSynchronizer(self.connector, self.strategy_instances, self.stop_event)
 
@@ -117,6 +135,14 @@ class RealtimeTrader:
 
     def start(self):
         logger.info("Starting RealtimeTrader components...")
+        # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+        # 前日以前に終了処理をせずに停止して残ったジャーナルを、履歴の読み込み前にマージする
+        # (当日のジャーナルは CerebroFactory が履歴に続けて再生し、終了時にマージする)
+        if config.BAR_JOURNAL:
+            for symbol, save_file, new_bars in bar_journal.recover(config.DATA_DIR, datetime.now().strftime('%Y%m%d')):
+                self._update_resampled_csvs(symbol, save_file, new_bars)
+            self.journal_syncer.start()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         self.connector.start()
 
         logger.info(f"Initializing {len(self.symbols)} strategies in parallel...")
@@ -139,13 +165,25 @@ class RealtimeTrader:
                 except Exception as e:
                     logger.error(f"Exception during initialization for {symbol}: {e}")
 
-        logger.info("All strategies initialized. Starting threads...")
-
-        for cerebro in self.cerebro_instances:
-            symbol_name = cerebro.datas[0]._name 
-            t = threading.Thread(target=self._run_cerebro, args=(cerebro,), name=f"Cerebro-{symbol_name}", daemon=True)
-            self.threads.append(t)
-            t.start()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # 銘柄ごとのスレッドの代わりに、1つのスケジューラーが Excel の値が変わった銘柄だけを進める
+        if config.EVENT_SCHEDULER:
+            logger.info("All strategies initialized. Starting scheduler...")
+            self.scheduler = CerebroScheduler(
+                self.cerebro_instances, self.stop_event, start_time=time(9, 0),
+                latency_warn=config.DISPATCH_LATENCY_WARN, report_interval=config.DISPATCH_REPORT_INTERVAL
+            )
+            self.scheduler.subscribe(self.connector)
+            self.scheduler.start()
+        else:
+            logger.info("All strategies initialized. Starting threads...")
+
+            for cerebro in self.cerebro_instances:
+                symbol_name = cerebro.datas[0]._name 
+                t = threading.Thread(target=self._run_cerebro, args=(cerebro,), name=f"Cerebro-{symbol_name}", daemon=True)
+                self.threads.append(t)
+                t.start()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
         self.synchronizer.start()
         logger.info("RealtimeTrader started successfully.")
@@ -154,6 +192,13 @@ class RealtimeTrader:
         """全コンポーネントを安全に停止し、データを確実に保存する。"""
         logger.info("Stopping RealtimeTrader...")
         self.stop_event.set()
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # フィードへの書き込み (flush) と競合しないよう、先にスケジューラーを止める
+        if self.scheduler is not None:
+            self.scheduler.wake()
+            self.scheduler.join(timeout=30)
+            self.scheduler.log_latency()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 1. Primary Data (5分足) の保存
         logger.info("Saving primary history data (5m)...")
@@ -162,13 +207,17 @@ class RealtimeTrader:
             if cerebro.datas and hasattr(cerebro.datas[0], 'save_history'):
                 if hasattr(cerebro.datas[0], 'flush'):
                     cerebro.datas[0].flush()
-                cerebro.datas[0].save_history()
-                saved_symbols.append(cerebro.datas[0].symbol)
+                # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+                new_bars = cerebro.datas[0].save_history()
+                saved_symbols.append((cerebro.datas[0].symbol, cerebro.datas[0].save_file, new_bars))
+                # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # 2. Resampled Data (60分足, 日足) の生成と保存
         logger.info("Generating and saving resampled data (60m, 1D)...")
         with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(self._regenerate_resampled_csvs, sym) for sym in saved_symbols]
+            # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+            futures = [executor.submit(self._update_resampled_csvs, *saved) for saved in saved_symbols]
+            # ▲▲▲【変更箇所ここまで】▲▲▲
             for f in as_completed(futures):
                 pass 
 
@@ -180,14 +229,93 @@ class RealtimeTrader:
         # 4. スレッドの終了待機
         if self.synchronizer.is_alive():
             self.synchronizer.join(timeout=5)
+        # ▼▼▼【変更箇所: 当日のジャーナルの再生】▼▼▼
+        if self.journal_syncer is not None and self.journal_syncer.is_alive():
+            self.journal_syncer.join(timeout=5)
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         for t in self.threads:
             if t.is_alive():
                 t.join(timeout=5)
+        # ▼▼▼【変更箇所: スケジューラー駆動】▼▼▼
+        # 停止済みのフィードで各 Cerebro のループを最後まで進める (スレッド方式の join に相当)
+        if self.scheduler is not None and not self.scheduler.is_alive():
+            self.scheduler.finish_all()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
         
+        # ▼▼▼【変更箇所: ウォームスタート用スナップショットの保存】▼▼▼
+        if config.WARM_START:
+            self._save_snapshots()
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
         # 5. Excelコネクタの停止
         self.connector.stop()
         logger.info("RealtimeTrader stopped.")
 
+    # ▼▼▼【変更箇所: メモリ使用量の報告】▼▼▼
+    @staticmethod
+    def _running_strategy(cerebro):
+        """Cerebro が実行中 (または実行済み) のストラテジーのインスタンス。run() の開始前は None。"""
+        strategies = getattr(cerebro, 'runningstrats', None)
+        return strategies[0] if strategies else None
+
+    def log_memory_footprint(self):
+        """全銘柄のライン・インジケーターの保持量を合計してログに出力する。(exactbars 使用時はセッション中一定)"""
+        count, total_values, total_bytes = 0, 0, 0
+        for cerebro in self.cerebro_instances:
+            strategy = self._running_strategy(cerebro)
+            if strategy is None: continue
+            footprint = strategy.memory_footprint()
+            count += 1; total_values += footprint['values']; total_bytes += footprint['bytes']
+            logger.debug(f"[{cerebro.datas[0].symbol}] Memory footprint: {format_footprint(footprint)}")
+        if count:
+            logger.info(f"Memory footprint: {count} symbols, {total_values:,} values, ~{total_bytes / 1024 / 1024:,.2f} MB")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: ウォームスタート用スナップショットの保存】▼▼▼
+    def _save_snapshots(self):
+        """終了した各銘柄の状態を保存する。(ループが終了していない銘柄は状態が確定しないためスキップ)"""
+        saved = 0
+        if self.scheduler is not None:
+            running = [not cerebro.finished for cerebro in self.cerebro_instances]
+        else:
+            running = [thread.is_alive() for thread in self.threads]
+        for cerebro, is_running in zip(self.cerebro_instances, running):
+            primary = cerebro.datas[0]
+            strategy = self._running_strategy(cerebro)
+            if strategy is None or is_running:
+                logger.warning(f"[{primary.symbol}] Cerebro is not started or still running. Snapshot skipped.")
+                continue
+            try:
+                bars_df = data_cache.read_ohlcv(primary.save_file, tz_naive=True) if primary.save_file and os.path.exists(primary.save_file) else pd.DataFrame()
+                snapshot = strategy.build_snapshot(bars_df)
+                if snapshot is None:
+                    logger.info(f"[{primary.symbol}] State is not restorable. Snapshot skipped.")
+                    continue
+                warm_start.save_snapshot(config.SNAPSHOT_DIR, snapshot)
+                saved += 1
+            except Exception as e:
+                logger.error(f"[{primary.symbol}] Failed to save snapshot: {e}", exc_info=True)
+        logger.info(f"Saved {saved}/{len(self.cerebro_instances)} snapshots to {config.SNAPSHOT_DIR}")
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: 確定足のジャーナル】▼▼▼
+    def _update_resampled_csvs(self, symbol, save_file, new_bars):
+        """
+        ジャーナルからマージしたバー (new_bars) がある場合は、それを含む期間だけ60分足・日足を更新する。
+        ジャーナルを使わない場合・差分更新できない場合は全期間から再生成する。
+        """
+        if new_bars is not None:
+            if new_bars.empty:
+                return
+            try:
+                date_str = datetime.now().strftime('%Y%m%d')
+                if bar_journal.update_resampled(symbol, config.DATA_DIR, save_file, new_bars, date_str):
+                    return
+            except Exception as e:
+                logger.error(f"[{symbol}] Incremental resampling failed. Regenerating from 5m: {e}", exc_info=True)
+        self._regenerate_resampled_csvs(symbol)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _regenerate_resampled_csvs(self, symbol):
         """
         1. 5分足ファイル: glob検索で最新のファイルを特定して読み込む。
@@ -203,7 +331,7 @@ class RealtimeTrader:
         file_5m = max(files, key=os.path.getctime)
 
         try:
-            df = pd.read_csv(file_5m, parse_dates=['datetime'], index_col='datetime')
+            df = data_cache.read_ohlcv(file_5m)
         except Exception as e:
             logger.error(f"[{symbol}] Failed to read 5m file {file_5m}: {e}")
             return
@@ -260,11 +388,20 @@ def main():
                     logger.info(f"市場オープン準備 ({now.strftime('%H:%M')})。トレーダーを起動します。")
                     trader = RealtimeTrader()
                     trader.start()
+                    last_memory_report = time_module.monotonic()
                 else:
                     time_module.sleep(1)
+                    # ▼▼▼【変更箇所: メモリ使用量の定期報告】▼▼▼
+                    if config.MEMORY_REPORT_INTERVAL and time_module.monotonic() - last_memory_report >= config.MEMORY_REPORT_INTERVAL:
+                        trader.log_memory_footprint()
+                        last_memory_report = time_module.monotonic()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
             else:
                 if trader is not None:
                     logger.info(f"市場クローズ ({now.strftime('%H:%M')})。トレーダーを停止・データ保存します。")
+                    # ▼▼▼【変更箇所: 終了時のメモリ使用量 (セッション中の定期報告と比較用)】▼▼▼
+                    trader.log_memory_footprint()
+                    # ▲▲▲【変更箇所ここまで】▲▲▲
                     trader.stop()
                     trader = None
                     logger.info("トレーダーの停止が完了しました。")
@@ -0,0 +1,457 @@
+import datetime
+import logging
+import queue
+import threading
+import time as time_module
+
+import backtrader as bt
+from backtrader.utils import num2date, date2num
+
+from .bar_builder import MultiBarBuilder
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# イベント駆動スケジューラー
+# 銘柄ごとにスレッドを起動して cerebro.run() のループを回す (各フィードが _load を空回りさせる) 代わりに、
+# 1つのスレッドで全銘柄の Cerebro を駆動する。
+#   - ExcelConnector が Excel を読み取るたびに、値の変わった銘柄の Tick を配信し、ディスパッチ・キューへ入れる。
+#   - スケジューラーはキューを待ち受け (ティックがない間はブロックしてCPUを使わない)、
+#     まとめて取り出した Tick から全銘柄一括でバーを構築し (MultiBarBuilder)、
+#     配信された銘柄の Cerebro だけに確定足を渡して、新しいデータがなくなるまで進める。
+#   - Excel の読み取りからストラテジーの処理完了までの遅延 (全ティック / バーが確定したティック) を計測し、
+#     定期的にログへ出力する。
+# ==============================================================================
+
+
+class _Suspend(Exception):
+    """SteppedCerebro.begin: 起動処理の完了後に run() を抜けるための例外。"""
+
+
+class SteppedCerebro(bt.Cerebro):
+    """
+    run() のメインループ (Cerebro._runnext) を、呼び出し側が1ステップずつ進められるようにした Cerebro。
+    begin() で起動処理 (ストラテジー生成・履歴の供給) を行い、以降は step() のたびに
+    新しいデータがなくなる (フィードの _load が None を返す) まで進めて制御を返す。
+    通常どおり run() を呼んだ場合は bt.Cerebro と同じ動作になる。
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loop = None
+        self._stepping = False
+        self.finished = False
+
+    def begin(self):
+        """起動処理を行い、最初の待機まで進める。False の場合は既に終了している。"""
+        self._stepping = True
+        try:
+            self.run()
+        except _Suspend:
+            return self.step()
+        finally:
+            self._stepping = False
+        self.finished = True
+        return False
+
+    def step(self):
+        """新しいデータがなくなるまで進める。ループが終了した (データ供給の終了・停止要求) 場合は False。"""
+        if self.finished:
+            return False
+        try:
+            next(self._loop)
+            return True
+        except StopIteration:
+            self.finish()
+            return False
+
+    def finish(self):
+        """ループを終了させ、run() の終了処理 (Cerebro.runstrategies の後半) を行う。"""
+        if self.finished:
+            return
+        self.finished = True
+        if self._loop is not None:
+            self._loop.close()
+        runstrats = self.runningstrats
+        for strat in runstrats:
+            strat._stop()
+        self._broker.stop()
+        for data in self.datas:
+            data.stop()
+        for feed in self.feeds:
+            feed.stop()
+        for store in self.stores:
+            store.stop()
+        self.stop_writers(runstrats)
+
+    def _runnext(self, runstrats):
+        if not self._stepping:
+            return super()._runnext(runstrats)
+        self._loop = self._runnext_steps(runstrats)
+        raise _Suspend()
+
+    def _runnext_steps(self, runstrats):
+        """
+        Cerebro._runnext と同じ処理を行うジェネレーター。
+        どのデータもバーを返さなかった (None) 反復の終わりで yield し、次の step() まで待機する。
+        """
+        datas = sorted(self.datas,
+                       key=lambda x: (x._timeframe, x._compression))
+        datas1 = datas[1:]
+        data0 = datas[0]
+        d0ret = True
+
+        rsonly = [i for i, x in enumerate(datas)
+                  if x.resampling and not x.replaying]
+        onlyresample = len(datas) == len(rsonly)
+        noresample = not rsonly
+
+        clonecount = sum(d._clone for d in datas)
+        ldatas = len(datas)
+        ldatas_noclones = ldatas - clonecount
+        dt0 = date2num(datetime.datetime.max) - 2  # default at max
+        while d0ret or d0ret is None:
+            newqcheck = not any(d.haslivedata() for d in datas)
+            if not newqcheck:
+                livecount = sum(d._laststatus == d.LIVE for d in datas)
+                newqcheck = not livecount or livecount == ldatas_noclones
+
+            lastret = False
+            self._storenotify()
+            if self._event_stop:
+                return
+            self._datanotify()
+            if self._event_stop:
+                return
+
+            drets = []
+            qstart = datetime.datetime.utcnow()
+            for d in datas:
+                qlapse = datetime.datetime.utcnow() - qstart
+                d.do_qcheck(newqcheck, qlapse.total_seconds())
+                drets.append(d.next(ticks=False))
+
+            d0ret = any((dret for dret in drets))
+            if not d0ret and any((dret is None for dret in drets)):
+                d0ret = None
+
+            if d0ret:
+                dts = []
+                for i, ret in enumerate(drets):
+                    dts.append(datas[i].datetime[0] if ret else None)
+
+                if onlyresample or noresample:
+                    dt0 = min((d for d in dts if d is not None))
+                else:
+                    dt0 = min((d for i, d in enumerate(dts)
+                               if d is not None and i not in rsonly))
+
+                dmaster = datas[dts.index(dt0)]
+                self._dtmaster = dmaster.num2date(dt0)
+                self._udtmaster = num2date(dt0)
+
+                for i, ret in enumerate(drets):
+                    if ret:
+                        continue
+                    d = datas[i]
+                    d._check(forcedata=dmaster)
+                    if d.next(datamaster=dmaster, ticks=False):
+                        dts[i] = d.datetime[0]
+
+                for i, dti in enumerate(dts):
+                    if dti is not None:
+                        di = datas[i]
+                        if dti > dt0:
+                            di.rewind()
+                        elif not di.replaying:
+                            di._tick_fill(force=True)
+
+            elif d0ret is None:
+                for data in datas:
+                    data._check()
+            else:
+                lastret = data0._last()
+                for data in datas1:
+                    lastret += data._last(datamaster=data0)
+
+                if not lastret:
+                    break
+
+            self._datanotify()
+            if self._event_stop:
+                return
+
+            if d0ret or lastret:
+                self._check_timers(runstrats, dt0, cheat=True)
+                if self.p.cheat_on_open:
+                    for strat in runstrats:
+                        strat._next_open()
+                        if self._event_stop:
+                            return
+
+            self._brokernotify()
+            if self._event_stop:
+                return
+
+            if d0ret or lastret:
+                self._check_timers(runstrats, dt0, cheat=False)
+                for strat in runstrats:
+                    strat._next()
+                    if self._event_stop:
+                        return
+
+                    self._next_writers(runstrats)
+
+            # 新しいデータがなく、フィルター (リサンプリング) が確定させたバーも残っていなければ次の通知まで待つ
+            if d0ret is None and not any(d._barstack or d._barstash for d in datas):
+                yield
+
+        self._datanotify()
+        if self._event_stop:
+            return
+        self._storenotify()
+        if self._event_stop:
+            return
+
+
+class DispatchLatency:
+    """ディスパッチ遅延 (Excel の読み取り完了 -> 銘柄の Cerebro の処理完了) の集計。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = []
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def flush(self):
+        """前回の flush 以降の集計 {'count', 'mean', 'p99', 'max'} (秒) を返してリセットする。サンプルがなければ None。"""
+        with self._lock:
+            samples, self._samples = sorted(self._samples), []
+        if not samples:
+            return None
+        return {'count': len(samples), 'mean': sum(samples) / len(samples),
+                'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))], 'max': samples[-1]}
+
+
+class CerebroScheduler(threading.Thread):
+    """
+    全銘柄の SteppedCerebro を1つのスレッドで駆動する。
+    dispatch() (ExcelConnector の購読者) に Tick が配信された銘柄だけを進める。
+    同じ銘柄の Tick は処理されるまで最新の1件にまとめるため、キューの長さは銘柄数を超えない。
+    (遅延は最初の Tick の読み取り時刻から計測する)
+    バーは時間枠ごとの MultiBarBuilder で構築し、まとめて取り出した Tick (通常は1回の読み取り分) を1回の呼び出しで処理する。
+    値の変わらない銘柄のバーも時間枠の境界 (+ boundary_grace 秒) で確定させるため、境界ごとに形成中のバーがある銘柄へ
+    最後の値を再送する (ポーリング方式で毎秒同じ値を処理していた場合と同じく、取引のない時間枠は出来高0のバーになる)。
+    """
+    def __init__(self, cerebros, stop_event, start_time=None, latency_warn=0.5, report_interval=300,
+                 clock=datetime.datetime.now, boundary_grace=0.2, **kwargs):
+        super().__init__(daemon=True, name="CerebroScheduler", **kwargs)
+        self.cerebros = {str(cerebro.datas[0].symbol): cerebro for cerebro in cerebros}
+        self.stop_event = stop_event
+        self.start_time = start_time
+        self.latency_warn = latency_warn
+        self.report_interval = report_interval
+        self.clock = clock  # バーの時刻・取引時間の判定に使う現在時刻 (テスト用に差し替え可能)
+        self.boundary_grace = boundary_grace
+        self.latency = DispatchLatency()
+        self.bar_latency = DispatchLatency()
+        self.coalesced = 0
+        self.started = threading.Event()  # 全銘柄の起動処理 (履歴の供給) が完了した
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # 時間枠 (分) ごとの全銘柄一括のバー構築
+        symbols_by_interval = {}
+        for symbol, cerebro in self.cerebros.items():
+            symbols_by_interval.setdefault(cerebro.datas[0].p.compression, []).append(symbol)
+        self.builders = [MultiBarBuilder(symbols, interval_minutes=interval) for interval, symbols in symbols_by_interval.items()]
+        self._last_data = {}       # 銘柄ごとの最後に処理した Tick の値 (境界での再送用)
+        self._boundary_at = None   # 次に形成中のバーを確定させる時刻
+        logger.info(f"CerebroScheduler initialized for {len(self.cerebros)} symbols.")
+
+    def subscribe(self, connector):
+        """全銘柄の Tick を購読する。"""
+        for symbol in self.cerebros:
+            connector.subscribe(symbol, self.dispatch)
+
+    def dispatch(self, tick):
+        """Tick を受け取り、銘柄をキューに入れる。(データ取得スレッドから呼ばれる)"""
+        with self._pending_lock:
+            pending = self._pending.get(tick.symbol)
+            if pending is not None:
+                pending[1] = tick
+                self.coalesced += 1
+                return
+            self._pending[tick.symbol] = [tick.read_at, tick]
+        self._queue.put(tick.symbol)
+
+    def wake(self):
+        """待ち受け中のスレッドを起こす。(停止時)"""
+        self._queue.put(None)
+
+    def run(self):
+        logger.info("Cerebro scheduler started.")
+        if not self._wait_for_start():
+            logger.info("Stop requested before market open. Cerebro scheduler exits.")
+            return
+
+        for symbol, cerebro in self.cerebros.items():
+            if self.stop_event.is_set(): break
+            try:
+                cerebro.begin()
+            except Exception as e:
+                logger.error(f"[{symbol}] Cerebro failed to start: {e}", exc_info=True)
+                cerebro.finished = True
+        self.started.set()
+        logger.info("All Cerebro instances started. Waiting for ticks...")
+
+        last_report = time_module.monotonic()
+        self._boundary_at = self._next_boundary(self.clock())
+        while not self.stop_event.is_set():
+            self.run_once(self._wait_timeout())
+            if self.report_interval and time_module.monotonic() - last_report >= self.report_interval:
+                self.log_latency()
+                last_report = time_module.monotonic()
+        self.flush_bars()
+        logger.info("Cerebro scheduler stopped.")
+
+    def run_once(self, timeout=None):
+        """
+        Tick を待ち受け、届いていれば (まとめて取り出して) 処理する。時間枠の境界を過ぎていれば形成中のバーを確定させる。
+        timeout: 待ち受けの最大秒数 (None: 無期限)
+        """
+        try:
+            symbol = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            symbols = []
+        else:
+            symbols = [] if symbol is None else [symbol]
+            # 処理待ちの Tick をまとめて取り出し、1回でバーを構築する
+            while True:
+                try:
+                    symbol = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if symbol is not None:
+                    symbols.append(symbol)
+        if symbols:
+            self._process(symbols)
+
+        now = self.clock()
+        if self._boundary_at is None:
+            self._boundary_at = self._next_boundary(now)
+        elif now >= self._boundary_at:
+            self._roll_open_bars(now)
+            self._boundary_at = self._next_boundary(now)
+
+    def _next_boundary(self, now):
+        """now より後の最初の時間枠の境界 + boundary_grace 秒。"""
+        if not self.builders:
+            return None
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        minutes = now.hour * 60 + now.minute
+        boundary = min(midnight + datetime.timedelta(minutes=minutes - minutes % builder.interval_minutes + builder.interval_minutes)
+                       for builder in self.builders)
+        return boundary + datetime.timedelta(seconds=self.boundary_grace)
+
+    def _wait_timeout(self):
+        """Tick の待ち受け時間: 次の境界、またはログ出力の間隔まで。"""
+        timeouts = [self.report_interval] if self.report_interval else []
+        if self._boundary_at is not None:
+            timeouts.append(max(0.0, (self._boundary_at - self.clock()).total_seconds()))
+        return min(timeouts) if timeouts else None
+
+    def _roll_open_bars(self, now):
+        """形成中のバーがある銘柄に最後の値を再送し、時間枠が切り替わったバーを確定させる。"""
+        read_at = time_module.perf_counter()
+        market_data = {}
+        for builder in self.builders:
+            for symbol in builder.open_symbols():
+                cerebro = self.cerebros[symbol]
+                if cerebro.finished:
+                    continue
+                values = cerebro.datas[0].tick_values(self._last_data.get(symbol), now)
+                if values is not None:
+                    market_data[symbol] = {'close': values[0], 'volume': values[1]}
+        completed = {}
+        for builder in self.builders:
+            completed.update(builder.add_market_data(now, market_data))
+        for symbol, bar in completed.items():
+            self._step(symbol, bar, read_at, 'boundary')
+
+    def _process(self, symbols):
+        with self._pending_lock:
+            ticks = [self._pending.pop(symbol) for symbol in symbols]
+        now = self.clock()
+        market_data = {}
+        for read_at, tick in ticks:
+            cerebro = self.cerebros[tick.symbol]
+            if cerebro.finished:
+                continue
+            self._last_data[tick.symbol] = tick.data
+            values = cerebro.datas[0].tick_values(tick.data, now)
+            if values is not None:
+                market_data[tick.symbol] = {'close': values[0], 'volume': values[1]}
+        completed = {}
+        for builder in self.builders:
+            completed.update(builder.add_market_data(now, market_data))
+        for read_at, tick in ticks:
+            self._step(tick.symbol, completed.get(tick.symbol), read_at, tick.seq)
+
+    def flush_bars(self):
+        """全銘柄の形成途中のバーをフィードに渡す。(停止時。フィードの flush で保存される)"""
+        for builder in self.builders:
+            for symbol, bar in builder.flush().items():
+                self.cerebros[symbol].datas[0].notify_bar(bar)
+
+    def _wait_for_start(self):
+        """start_time (datetime.time) まで待機する。停止要求を受けた場合は False。"""
+        if self.start_time is None:
+            return not self.stop_event.is_set()
+        now = datetime.datetime.now()
+        start_at = datetime.datetime.combine(now.date(), self.start_time)
+        if now < start_at:
+            logger.info(f"Waiting until {self.start_time.strftime('%H:%M')} to start Cerebro instances.")
+            return not self.stop_event.wait((start_at - now).total_seconds())
+        return not self.stop_event.is_set()
+
+    def _step(self, symbol, bar, read_at, seq):
+        """確定足 (None: なし) をフィードに渡して、銘柄の Cerebro を新しいデータがなくなるまで進める。"""
+        cerebro = self.cerebros[symbol]
+        if cerebro.finished:
+            return
+        feed = cerebro.datas[0]
+        bars_built = feed.bars_built
+        try:
+            feed.notify_bar(bar)
+            cerebro.step()
+        except Exception as e:
+            logger.error(f"[{symbol}] Cerebro crashed: {e}", exc_info=True)
+            cerebro.finished = True
+            return
+        latency = time_module.perf_counter() - read_at
+        self.latency.record(latency)
+        if feed.bars_built != bars_built:
+            self.bar_latency.record(latency)
+        if latency > self.latency_warn:
+            logger.warning(f"[{symbol}] Dispatch latency {latency * 1000:.0f} ms exceeds {self.latency_warn * 1000:.0f} ms (seq {seq})")
+
+    def log_latency(self):
+        for label, stats in (('Dispatch latency', self.latency.flush()), ('Tick-to-bar latency', self.bar_latency.flush())):
+            if stats:
+                logger.info(f"{label}: {stats['count']} steps, mean {stats['mean'] * 1000:.1f} ms, "
+                            f"p99 {stats['p99'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms")
+        logger.info(f"Dispatch queue: {self._queue.qsize()} queued, {self.coalesced} ticks coalesced")
+
+    def finish_all(self):
+        """スケジューラー・スレッドの終了後に呼ぶ。停止済みのフィードで各 Cerebro のループを最後まで進めて終了処理を行う。"""
+        for symbol, cerebro in self.cerebros.items():
+            if cerebro.finished or cerebro._loop is None:
+                continue
+            try:
+                # フィードが停止済みなら1ステップでループが終わる。(終わらなければ終了処理だけを行う)
+                if cerebro.step():
+                    cerebro.finish()
+            except Exception as e:
+                logger.error(f"[{symbol}] Cerebro failed to stop: {e}", exc_info=True)
+                cerebro.finished = True
\ No newline at end of file
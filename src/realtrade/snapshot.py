@@ -0,0 +1,111 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+
+import pandas as pd
+import backtrader as bt
+
+from src.core.streaming import StreamingIndicatorSet
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ウォームスタート用のスナップショット
+# 取引終了時 (RealtimeTrader.stop) に銘柄ごとの状態を {SNAPSHOT_DIR}/{symbol}.pkl に保存し、
+# 翌朝はこれを復元して、スナップショット以降のバーだけを供給する。(全履歴の再生を省略する)
+#   - indicators: ストリーミング・インジケーター群 (StreamingIndicatorSet) そのもの
+#   - absorbed:   時間足ごとに、インジケーターへ反映済みの最終バーの日時
+#   - tail:       リサンプリング (60分足・日足) の状態を再構築するための直近2営業日分の5分足。
+#                 日の境界から再供給するため、途中の足も含めて前日と同じバーが組み上がる。
+#                 反映済みのバーは StreamingIndicatorSet.resume により読み飛ばされる。
+#   - position:   ポジションと決済価格 (PositionManager.snapshot_state)
+# 戦略定義 (パラメータ) が変わった場合や読み込めない場合は使用せず、全履歴の再生に戻る。
+# ==============================================================================
+
+SNAPSHOT_VERSION = 1
+TAIL_DAYS = 2
+
+
+def snapshot_path(snapshot_dir, symbol):
+    return os.path.join(snapshot_dir, f"{symbol}.pkl")
+
+
+def params_digest(strategy_params):
+    """戦略パラメータの指紋。スナップショットの作成時と定義が変わっていないことの確認に使う。"""
+    return hashlib.sha1(json.dumps(strategy_params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def build_snapshot(symbol, strategy, bars_df):
+    """
+    終了時のストラテジーと、保存済みの5分足 (bars_df: 当日分を含む全履歴) からスナップショットを作る。
+    復元に必要な条件 (ストリーミング・インジケーター使用、全時間足のバーを反映済み、直近2営業日で再構築できる)
+    を満たさない場合は None。
+    """
+    if not isinstance(strategy.indicators, StreamingIndicatorSet) or not strategy.realtime_phase_started:
+        return None
+    absorbed = strategy.indicators.absorbed
+    if bars_df.empty or set(absorbed) != set(strategy.indicators.timeframes):
+        return None
+
+    days = bars_df.index.normalize().unique()
+    tail = bars_df[bars_df.index >= days[-min(TAIL_DAYS, len(days))]]
+    # 反映済みの最終バーが tail より前にある時間足は、tail の再供給では状態を再現できない
+    if min(absorbed.values()) < bt.date2num(tail.index[0].to_pydatetime()):
+        return None
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'symbol': str(symbol),
+        'strategy_name': strategy.p.strategy_params.get('strategy_name'),
+        'params_digest': params_digest(strategy.p.strategy_params),
+        'absorbed': absorbed,
+        'last_bar': tail.index[-1],
+        'tail': tail,
+        'indicators': strategy.indicators,
+        'position': strategy.position_manager.snapshot_state(strategy, strategy.exit_signal_generator),
+    }
+
+
+def save_snapshot(snapshot_dir, snapshot):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(snapshot_dir, snapshot['symbol'])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(snapshot_dir, symbol, strategy_name, strategy_params):
+    """スナップショットを読み込み、現在の戦略定義と一致すれば返す。欠落・破損・不一致の場合は None。"""
+    path = snapshot_path(snapshot_dir, symbol)
+    if not os.path.exists(path):
+        logger.info(f"[{symbol}] No snapshot found. Falling back to full history replay.")
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"[{symbol}] Could not read snapshot {path}: {e}. Falling back to full history replay.")
+        return None
+
+    expected = {'version': SNAPSHOT_VERSION, 'symbol': str(symbol), 'strategy_name': strategy_name,
+                'params_digest': params_digest(strategy_params)}
+    mismatched = [key for key, value in expected.items() if not isinstance(snapshot, dict) or snapshot.get(key) != value]
+    if mismatched:
+        logger.warning(f"[{symbol}] Snapshot {path} does not match the current strategy ({', '.join(mismatched)}). "
+                       f"Falling back to full history replay.")
+        return None
+    return snapshot
+
+
+def bars_to_replay(snapshot, hist_df):
+    """復元時にフィードへ供給するバー: スナップショットの tail と、履歴のうちスナップショットより新しいバー。"""
+    tail = snapshot['tail']
+    newer = hist_df[hist_df.index > snapshot['last_bar']] if not hist_df.empty else hist_df
+    if newer.empty:
+        return tail
+    columns = tail.columns.intersection(newer.columns)
+    return pd.concat([tail[columns], newer[columns]])
\ No newline at end of file
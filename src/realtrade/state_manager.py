@@ -3,58 +3,52 @@ import logging
 import os
 import threading
 
+# ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+from src.core.util import db_writer
+# ▲▲▲【変更箇所ここまで】▲▲▲
+
 logger = logging.getLogger(__name__)
 
 class StateManager:
+    # ▼▼▼【変更箇所: 書き込みスレッド経由の書き込み】▼▼▼
+    # 書き込みは共有の書き込みスレッド (src/core/util/db_writer.py) のキューに積むだけで、呼び出し元はディスクI/Oを待たない
+    CREATE_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS positions (
+            symbol TEXT PRIMARY KEY, size REAL NOT NULL,
+            price REAL NOT NULL, entry_datetime TEXT NOT NULL)
+    '''
+    SAVE_SQL = "INSERT OR REPLACE INTO positions (symbol, size, price, entry_datetime) VALUES (?, ?, ?, ?)"
+    DELETE_SQL = "DELETE FROM positions WHERE symbol = ?"
+
     def __init__(self, db_path):
         self.db_path = db_path
-        self.conn = None
+        self.db = None
         self.lock = threading.Lock()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         try:
-            self.conn = sqlite3.connect(db_path, check_same_thread=False)
-            self._create_tables()
+            self.db = db_writer.open_database(db_path, schema=(self.CREATE_TABLE_SQL,))
             logger.info(f"データベースに接続しました: {db_path}")
         except sqlite3.Error as e:
             logger.critical(f"データベース接続エラー: {e}")
             raise
 
-    def _create_tables(self):
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS positions (
-                        symbol TEXT PRIMARY KEY, size REAL NOT NULL,
-                        price REAL NOT NULL, entry_datetime TEXT NOT NULL)
-                ''')
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"テーブル作成エラー: {e}")
-
     def close(self):
-        if self.conn:
-            self.conn.close()
+        if self.db:
+            self.db.close()
+            self.db = None
             logger.info("データベース接続をクローズしました。")
 
     def save_position(self, symbol, size, price, entry_datetime):
-        sql = "INSERT OR REPLACE INTO positions (symbol, size, price, entry_datetime) VALUES (?, ?, ?, ?)"
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute(sql, (str(symbol), size, price, entry_datetime))
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"ポジション保存エラー: {e}")
+        self.db.execute(self.SAVE_SQL, (str(symbol), size, price, entry_datetime))
 
     def load_positions(self):
         positions = {}
         sql = "SELECT symbol, size, price, entry_datetime FROM positions"
         try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                for row in cursor.execute(sql):
-                    positions[row[0]] = {'size': row[1], 'price': row[2], 'entry_datetime': row[3]}
+            # それまでに積まれた書き込みの後に読み取る
+            rows = self.db.call(lambda conn: conn.execute(sql).fetchall()).result()
+            for row in rows:
+                positions[row[0]] = {'size': row[1], 'price': row[2], 'entry_datetime': row[3]}
             logger.info(f"{len(positions)}件のポジションをDBからロードしました。")
             return positions
         except sqlite3.Error as e:
@@ -62,11 +56,5 @@ class StateManager:
             return {}
 
     def delete_position(self, symbol):
-        sql = "DELETE FROM positions WHERE symbol = ?"
-        try:
-            with self.lock:
-                cursor = self.conn.cursor()
-                cursor.execute(sql, (str(symbol),))
-                self.conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"ポジション削除エラー: {e}")
\ No newline at end of file
+        self.db.execute(self.DELETE_SQL, (str(symbol),))
+    # ▲▲▲【変更箇所ここまで】▲▲▲
\ No newline at end of file
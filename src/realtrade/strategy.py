@@ -1,5 +1,9 @@
 import backtrader as bt
 from src.core.strategy.base import BaseStrategy
+from src.core.streaming import StreamingIndicatorSet, StreamingUnsupportedError
+from . import config_realtrade as config
+from .memory_report import strategy_footprint, format_footprint
+from . import snapshot as warm_start
 
 # 実装クラスのインポート
 from .implementations.order_manager import RealTradeOrderManager
@@ -16,6 +20,54 @@ class RealTradeStrategy(BaseStrategy):
         self.realtime_phase_started = False
         super().__init__()
 
+    # ▼▼▼【変更箇所: ストリーミング・インジケーターを使用】▼▼▼
+    def _create_indicators(self):
+        """
+        ストリーミング・インジケーターを生成する。(バーごとの更新が定数時間で、履歴の長さに依存しない)
+        再現できない定義を含む戦略は Backtrader のインジケーターを使う。
+        """
+        if not config.STREAMING_INDICATORS:
+            return super()._create_indicators()
+        # スナップショットから復元する場合は、保存時のインジケーター群を再供給されるフィードに接続する
+        snapshot = self.p.strategy_components.get('snapshot')
+        if snapshot is not None:
+            snapshot['indicators'].resume(snapshot['absorbed'])
+            return snapshot['indicators']
+        try:
+            return self.initializer.create_streaming_indicators()
+        except StreamingUnsupportedError as e:
+            self.logger.log(f"ストリーミング・インジケーターを使用できないため Backtrader のインジケーターを使用します: {e}")
+            return super()._create_indicators()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: ライン・バッファの制限 (exactbars=1)】▼▼▼
+    def qbuffer(self, savemem=0, replaying=False):
+        """
+        Backtrader が各インジケーターの minperiod までラインを縮めた後、各時間足のデータフィードに
+        インジケーター定義のパラメータから求めた過去バー数 (StrategyInitializer.required_lookback) を確保する。
+        ストリーミング・インジケーターは Backtrader から見えないため、この下限がないとフィードは1本分になる。
+        """
+        super().qbuffer(savemem=savemem, replaying=replaying)
+        if savemem > 0:
+            for timeframe, size in self.initializer.required_lookback().items():
+                self.data_feeds[timeframe].minbuffer(size)
+
+    def memory_footprint(self):
+        """この銘柄が保持しているライン・インジケーターの値の数と概算メモリ。"""
+        return strategy_footprint(self)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: スナップショット】▼▼▼
+    def _restore_snapshot_position(self):
+        snapshot = self.p.strategy_components.get('snapshot')
+        if snapshot is not None and snapshot.get('position'):
+            self.position_manager.restore_snapshot_state(snapshot['position'], self, self.exit_signal_generator)
+
+    def build_snapshot(self, bars_df):
+        """終了時の状態のスナップショット (src/realtrade/snapshot.py)。bars_df は保存済みの5分足。"""
+        return warm_start.build_snapshot(self.data0._name, self, bars_df)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
+
     def _setup_components(self, params, components):
         """
         リアルタイムトレード用のコンポーネントをセットアップする
@@ -43,16 +95,36 @@ class RealTradeStrategy(BaseStrategy):
         # 出口戦略ジェネレータの初期化
         self.exit_signal_generator = RealTradeExitSignalGenerator(self, self.order_manager)
 
+    # ▼▼▼【変更箇所: ストリーミング・インジケーターを履歴フェーズから毎バー更新】▼▼▼
+    # ライン・バッファを制限するとフィードは直近のバーしか保持しないため、リアルタイムフェーズ移行時の
+    # 一括取り込み (seed) はできない。prenext/next のたびに新しいバーを反映する。(1本あたり定数時間)
+    # フィードの供給終了後に届く上位足 (作りかけの足を確定させたもの) は反映しない。
+    # 終了時の状態をスナップショットに保存し、翌日は日の境界から再供給して同じ足を組み直すため。
+    def _update_streaming_indicators(self):
+        if isinstance(self.indicators, StreamingIndicatorSet) and not getattr(self.datas[0], 'ended', False):
+            self.indicators.update(self.data_feeds)
+
+    def prenext(self):
+        self._update_streaming_indicators()
+
     def next(self):
+        self._update_streaming_indicators()
+
         # 履歴データの供給完了を検知してフラグを立てる
         if not self.realtime_phase_started:
             if hasattr(self.datas[0], 'history_supplied') and self.datas[0].history_supplied:
                 self.logger.log("リアルタイムフェーズに移行しました。")
+                self.logger.log(f"メモリ使用量: {format_footprint(self.memory_footprint())}")
                 self.realtime_phase_started = True
+                self._restore_snapshot_position()
         
         # リアルタイムフェーズの場合のみ実行
         if self.realtime_phase_started:
+            # 全インジケーターが minperiod に達するまでは判定しない。(Backtrader の prenext に相当)
+            if isinstance(self.indicators, StreamingIndicatorSet) and not self.indicators.ready:
+                return
             super().next()
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def notify_data(self, data, status, *args, **kwargs):
         self.event_handler.on_data_status(data, status)
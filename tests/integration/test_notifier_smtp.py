@@ -0,0 +1,123 @@
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+import unittest
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+from src.core.util import notifier
+
+
+class _Handler:
+    """ローカルのSMTPサーバーの受信処理。先頭の reject_count 通は 451 (レート制限) で拒否する。"""
+    def __init__(self, reject_count=0):
+        self.reject_count = reject_count
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        if self.reject_count > 0:
+            self.reject_count -= 1
+            return '451 4.7.1 Rate limit exceeded, try again later'
+        self.messages.append(message_from_bytes(envelope.content))
+        return '250 OK'
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestNotifierSmtp(unittest.TestCase):
+    """
+    ローカルのSMTPサーバー (aiosmtpd) に対して、通知の配信を検証する。
+    """
+    def _start(self, reject_count=0, digest_window=0.5):
+        self.handler = _Handler(reject_count)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, 'notification_history.db')
+
+        notifier._email_config = {
+            'ENABLED': True, 'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': port,
+            'SMTP_USER': 'bot@example.com', 'RECIPIENT_EMAIL': 'me@example.com', 'USE_TLS': False,
+            'DIGEST_WINDOW': digest_window, 'DIGEST_GROUP_BY': 'symbol'}
+        notifier._metrics = notifier._DeliveryMetrics()
+        self.addCleanup(setattr, notifier, '_email_config', None)
+        self.addCleanup(setattr, notifier, 'BACKOFF_INITIAL', notifier.BACKOFF_INITIAL)
+        notifier.BACKOFF_INITIAL = 0.05
+        notifier.start_notifier(db_path=self.db_path)
+        self.addCleanup(notifier.stop_notifier)
+
+    def _wait_for(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while len(self.handler.messages) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(len(self.handler.messages), count)
+
+    def _statuses(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT status FROM notification_history ORDER BY id")]
+
+    @staticmethod
+    def _subject(message):
+        return str(make_header(decode_header(message['Subject'])))
+
+    def test_normal_notifications_are_coalesced_per_symbol(self):
+        self._start()
+        for i in range(3):
+            notifier.send_email(f"【RT】シグナル{i} (7203)", f"本文{i}")
+        notifier.send_email("【RT】シグナル (9984)", "本文")
+        notifier.send_email("【RT】エントリー約定 (6758)", "約定", immediate=True)
+
+        self._wait_for(3)
+        notifier.stop_notifier()
+
+        subjects = [self._subject(m) for m in self.handler.messages]
+        # URGENT はまとめずにすぐ送信され、NORMAL は銘柄ごとに1通にまとまる
+        self.assertEqual(subjects[0], "【RT】エントリー約定 (6758)")
+        self.assertCountEqual(subjects[1:], ["【まとめ】7203 (3件)", "【RT】シグナル (9984)"])
+        self.assertEqual(len(self.handler.peers), 1)
+        self.assertEqual(self._statuses(), ['SUCCESS'] * 5)
+
+        metrics = notifier.get_metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['messages'], metrics['notifications'], metrics['digests']), (0, 3, 5, 1))
+        self.assertEqual(metrics['latency']['URGENT']['count'], 1)
+        self.assertEqual(metrics['latency']['NORMAL']['count'], 4)
+
+    def test_urgent_burst_is_sent_over_one_connection(self):
+        self._start()
+        for i in range(50):
+            notifier.send_email(f"【RT】新規注文発注 ({1000 + i})", "本文", immediate=True)
+
+        self._wait_for(50)
+        notifier.stop_notifier()
+
+        self.assertEqual(len(self.handler.peers), 1)
+        self.assertEqual(notifier.get_metrics()['digests'], 0)
+        self.assertEqual(self._statuses(), ['SUCCESS'] * 50)
+
+    def test_rate_limit_response_is_retried_with_backoff(self):
+        self._start(reject_count=2)
+        notifier.send_email("【RT】決済完了 - Take Profit (7203)", "本文", immediate=True)
+
+        self._wait_for(1)
+        notifier.stop_notifier()
+
+        metrics = notifier.get_metrics()
+        self.assertEqual((metrics['retries'], metrics['failed']), (2, 0))
+        self.assertEqual(self._statuses(), ['SUCCESS'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import copy
+import math
+import shutil
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.core import bar_store
+from src.backtest import config_backtest
+from src.backtest.run_backtest import run_backtest_for_symbol, run_symbol_backtest
+from src.backtest.vectorized import run_vectorized_backtest_for_symbol, VectorizedUnsupportedError
+
+BASE_PARAMS = {
+    'strategy_name': 'parity',
+    'trading_mode': {'long_enabled': True, 'short_enabled': True},
+    'timeframes': {
+        'long': {'source_type': 'direct', 'timeframe': 'Days', 'compression': 1, 'file_pattern': '{symbol}_D_*.csv'},
+        'medium': {'source_type': 'direct', 'timeframe': 'Minutes', 'compression': 60, 'file_pattern': '{symbol}_60m_*.csv'},
+        'short': {'timeframe': 'Minutes', 'compression': 5},
+    },
+    'exit_conditions': {
+        'take_profit': {'type': 'atr_multiple', 'timeframe': 'short', 'params': {'period': 14, 'multiplier': 5.0}},
+        'stop_loss': {'type': 'atr_stoptrail', 'timeframe': 'short', 'params': {'period': 14, 'multiplier': 2.5}},
+    },
+    'sizing': {'backtest_method': 'risk_based', 'risk_based': {'risk_per_trade': 0.01}, 'max_investment_per_trade': 10000000},
+}
+
+ENTRY_CONDITIONS = [
+    # 比較 (data) + 比較 (values) + クロスオーバー
+    {'long': [{'timeframe': 'long', 'indicator': {'name': 'sma', 'params': {'period': 5}}, 'compare': '<', 'target': {'type': 'data', 'value': 'close'}},
+              {'timeframe': 'medium', 'indicator': {'name': 'rsi', 'params': {'period': 14}}, 'compare': '<', 'target': {'type': 'values', 'value': 60}},
+              {'timeframe': 'short', 'type': 'crossover', 'indicator1': {'name': 'ema', 'params': {'period': 5}}, 'indicator2': {'name': 'ema', 'params': {'period': 20}}}],
+     'short': [{'timeframe': 'long', 'indicator': {'name': 'sma', 'params': {'period': 5}}, 'compare': '>', 'target': {'type': 'data', 'value': 'close'}},
+               {'timeframe': 'medium', 'indicator': {'name': 'rsi', 'params': {'period': 14}}, 'compare': '>', 'target': {'type': 'values', 'value': 40}},
+               {'timeframe': 'short', 'type': 'crossunder', 'indicator1': {'name': 'ema', 'params': {'period': 5}}, 'indicator2': {'name': 'ema', 'params': {'period': 20}}}]},
+    # インジケーター同士の比較 + between + カスタムインジケーター
+    {'long': [{'timeframe': 'long', 'indicator': {'name': 'adx', 'params': {'period': 5}}, 'compare': '>', 'target': {'type': 'values', 'value': [10]}},
+              {'timeframe': 'medium', 'indicator': {'name': 'ema', 'params': {'period': 1}}, 'compare': '>', 'target': {'type': 'indicator', 'indicator': {'name': 'vwap', 'params': {}}}},
+              {'timeframe': 'short', 'indicator': {'name': 'stochastic', 'params': {'period': 14, 'period_dfast': 3, 'period_dslow': 3}}, 'compare': 'between', 'target': {'type': 'values', 'value': [5, 35]}}],
+     'short': [{'timeframe': 'medium', 'indicator': {'name': 'macd', 'params': {'period_me1': 12, 'period_me2': 26, 'period_signal': 9}}, 'compare': '<', 'target': {'type': 'values', 'value': 0}},
+               {'timeframe': 'short', 'indicator': {'name': 'BollingerBands', 'params': {'period': 20, 'devfactor': 2.0}}, 'compare': '>', 'target': {'type': 'data', 'value': 'close'}}]},
+]
+
+
+def _write_symbol(data_dir, symbol, days, seed):
+    """5分足 (前場/後場) ・60分足 (12:00 の単独バーを含む) ・日足のCSVを生成する。"""
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2024-01-04', periods=days) for t in times], name='datetime')
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]] * np.exp(rng.normal(0, 0.001, len(index)))
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    df = pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                       'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+    df.to_csv(os.path.join(data_dir, f"{symbol}_5m_2024.csv"))
+    agg = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    df.resample('60min').agg(agg).dropna().to_csv(os.path.join(data_dir, f"{symbol}_60m_2024.csv"))
+    daily = df.resample('1D').agg(agg).dropna()
+    daily.index = daily.index.date
+    daily.rename_axis('datetime').to_csv(os.path.join(data_dir, f"{symbol}_D_2024.csv"))
+
+
+class TestVectorizedParity(unittest.TestCase):
+    """ベクトル化エンジンが cerebro.run() と同じ取引リスト・統計を出力することを検証する。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data_dir = tempfile.mkdtemp(prefix='vectorized_parity_')
+        for i, symbol in enumerate(['9001', '9002']):
+            _write_symbol(cls.data_dir, symbol, days=30, seed=i)
+        cls.patcher = mock.patch.object(config_backtest, 'DATA_DIR', cls.data_dir)
+        cls.patcher.start()
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        cls.patcher.stop()
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+
+    def setUp(self):
+        bar_store.set_store(bar_store.BarStore())
+
+    def _assert_same_output(self, expected, actual):
+        self.assertEqual(expected[0]['total_trades'], actual[0]['total_trades'])
+        self.assertEqual(expected[0]['win_trades'], actual[0]['win_trades'])
+        for key in ('pnl_net', 'gross_won', 'gross_lost'):
+            self.assertTrue(math.isclose(expected[0][key], actual[0][key], rel_tol=1e-12, abs_tol=1e-9), key)
+        self.assertEqual(expected[1:3], actual[1:3])
+        self.assertEqual(len(expected[3]), len(actual[3]))
+        for exp_trade, act_trade in zip(expected[3], actual[3]):
+            self.assertEqual(list(exp_trade), list(act_trade))
+            for key, value in exp_trade.items():
+                if isinstance(value, float):
+                    self.assertTrue(math.isclose(value, act_trade[key], rel_tol=1e-12, abs_tol=1e-9), f"{key}: {value} != {act_trade[key]}")
+                else:
+                    self.assertEqual(value, act_trade[key], key)
+
+    def test_trade_list_matches_backtrader(self):
+        total_trades = 0
+        for entry_conditions in ENTRY_CONDITIONS:
+            params = copy.deepcopy(BASE_PARAMS)
+            params['entry_conditions'] = entry_conditions
+            for symbol in ['9001', '9002']:
+                base_filepath = os.path.join(self.data_dir, f"{symbol}_5m_2024.csv")
+                with self.subTest(symbol=symbol, conditions=entry_conditions['long'][0]['indicator']['name']):
+                    expected = run_backtest_for_symbol(symbol, base_filepath, params)
+                    actual = run_vectorized_backtest_for_symbol(symbol, base_filepath, params)
+                    self._assert_same_output(expected, actual)
+                    total_trades += len(expected[3])
+        self.assertGreater(total_trades, 0)
+
+    def test_resample_falls_back_to_backtrader(self):
+        params = copy.deepcopy(BASE_PARAMS)
+        params['entry_conditions'] = ENTRY_CONDITIONS[0]
+        params['timeframes']['medium'] = {'source_type': 'resample', 'timeframe': 'Minutes', 'compression': 60}
+        base_filepath = os.path.join(self.data_dir, "9001_5m_2024.csv")
+        with self.assertRaises(VectorizedUnsupportedError):
+            run_vectorized_backtest_for_symbol('9001', base_filepath, params)
+        expected = run_backtest_for_symbol('9001', base_filepath, params)
+        self._assert_same_output(expected, run_symbol_backtest('9001', base_filepath, params, engine='vectorized'))
+
+
+if __name__ == '__main__':
+    unittest.main()
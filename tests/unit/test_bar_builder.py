@@ -0,0 +1,96 @@
+import math
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from src.realtrade.bar_builder import BarBuilder, MultiBarBuilder
+
+
+class TestMultiBarBuilder(unittest.TestCase):
+    """
+    MultiBarBuilder (全銘柄一括のバー構築) が、銘柄ごとの BarBuilder と同じバーを構築することを検証する。
+    """
+    SYMBOLS = ['1332', '7203', '9984']
+    START = datetime(2025, 1, 6, 9, 0, 0)
+
+    def _run_both(self, snapshots):
+        """snapshots: [(タイムスタンプ, {銘柄: (現在値, 累計出来高)})] を両方式に与え、完成したバーを返す。"""
+        singles = {symbol: BarBuilder(interval_minutes=5) for symbol in self.SYMBOLS}
+        multi = MultiBarBuilder(self.SYMBOLS, interval_minutes=5)
+        expected, actual = [], []
+        for timestamp, values in snapshots:
+            for symbol, builder in singles.items():
+                price, volume = values.get(symbol, (None, None))
+                bar = builder.add_tick(timestamp, price, volume)
+                if bar:
+                    expected.append((symbol, bar))
+            market_data = {symbol: {'close': price, 'volume': volume} for symbol, (price, volume) in values.items()}
+            actual.extend(multi.add_market_data(timestamp, market_data).items())
+        return expected, actual, singles, multi
+
+    @staticmethod
+    def _sorted(bars):
+        return sorted(bars, key=lambda b: (b[0], b[1]['timestamp']))
+
+    def test_random_walk_matches_bar_builder(self):
+        rng = random.Random(0)
+        prices = {symbol: 1000.0 for symbol in self.SYMBOLS}
+        volumes = {symbol: 0.0 for symbol in self.SYMBOLS}
+        snapshots = []
+        for second in range(30 * 60):
+            values = {}
+            for symbol in self.SYMBOLS:
+                prices[symbol] = round(prices[symbol] * math.exp(rng.gauss(0, 0.0005)), 1)
+                volumes[symbol] += rng.randint(0, 500)
+                if rng.random() < 0.002:
+                    volumes[symbol] = 0.0  # 累計出来高のリセット
+                if rng.random() < 0.02:
+                    continue  # 欠損
+                values[symbol] = (prices[symbol], volumes[symbol])
+            snapshots.append((self.START + timedelta(seconds=second), values))
+        expected, actual, singles, multi = self._run_both(snapshots)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(self._sorted(actual), self._sorted(expected))
+
+        flushed_expected = [(symbol, bar) for symbol, builder in singles.items() if (bar := builder.flush())]
+        self.assertEqual(self._sorted(multi.flush().items()), self._sorted(flushed_expected))
+
+    def test_volume_reset_within_bar(self):
+        """バーの途中で累計出来高がリセットされた Tick の出来高は加算せず、以降はリセット後の値からの差分を加算する。"""
+        snapshots = [
+            (self.START + timedelta(seconds=1), {'7203': (100.0, 5000.0)}),
+            (self.START + timedelta(seconds=2), {'7203': (101.0, 5300.0)}),
+            (self.START + timedelta(seconds=3), {'7203': (99.0, 200.0)}),
+            (self.START + timedelta(seconds=4), {'7203': (100.5, 260.0)}),
+            (self.START + timedelta(minutes=5), {'7203': (102.0, 300.0)}),
+        ]
+        expected, actual, _, _ = self._run_both(snapshots)
+        self.assertEqual(actual, expected)
+        self.assertEqual(actual, [('7203', {'timestamp': self.START, 'open': 100.0, 'high': 101.0, 'low': 99.0,
+                                            'close': 100.5, 'volume': 5000.0 + 300.0 + 60.0})])
+
+    def test_missing_rows_do_not_change_state(self):
+        """欠損 (値なし・NaN) の銘柄はバーを確定させず、状態も変更しない。"""
+        multi = MultiBarBuilder(self.SYMBOLS, interval_minutes=5)
+        multi.add_snapshot(self.START, [100.0, 200.0, 300.0], [10.0, 20.0, 30.0])
+        completed = multi.add_snapshot(self.START + timedelta(minutes=5), [float('nan'), 201.0, 301.0], [11.0, float('nan'), 35.0])
+        self.assertEqual(list(completed), ['9984'])
+        self.assertEqual(multi.open_symbols(), ['1332', '7203', '9984'])
+        # 欠損だった銘柄は、次に値が届いた時点で前の時間枠のバーが確定する
+        completed = multi.add_market_data(self.START + timedelta(minutes=5, seconds=1), {'1332': {'close': 101.0, 'volume': 15.0}})
+        self.assertEqual(completed['1332'], {'timestamp': self.START, 'open': 100.0, 'high': 100.0, 'low': 100.0, 'close': 100.0, 'volume': 10.0})
+
+    def test_flush_returns_open_bars_and_resets(self):
+        multi = MultiBarBuilder(self.SYMBOLS, interval_minutes=5)
+        multi.add_snapshot(self.START, [100.0, float('nan'), 300.0], [10.0, float('nan'), 30.0])
+        flushed = multi.flush()
+        self.assertEqual(sorted(flushed), ['1332', '9984'])
+        self.assertEqual(multi.open_symbols(), [])
+        self.assertEqual(multi.flush(), {})
+        # flush 後の最初の Tick は累計出来高をそのままバーの出来高とする (BarBuilder.flush と同じ)
+        multi.add_snapshot(self.START + timedelta(minutes=5), [100.0, 200.0, 300.0], [50.0, 60.0, 70.0])
+        self.assertEqual(multi.flush()['1332']['volume'], 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
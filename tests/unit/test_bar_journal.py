@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+
+from src.core import data_cache
+from src.realtrade import bar_journal
+
+
+class TestBarJournal(unittest.TestCase):
+    """
+    確定足のジャーナルの読み込み・再生・履歴CSVへのマージを、一時ディレクトリ上で検証する。
+    """
+    START = datetime(2025, 1, 6, 9, 0, 0)
+    DATE = '20250106'
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.data_dir = tmp_dir.name
+        self.save_file = os.path.join(self.data_dir, '7203_5m_20250101.csv')
+
+    def _bar(self, minutes, close, volume=100.0):
+        return {'timestamp': self.START + timedelta(minutes=minutes), 'open': close, 'high': close + 1,
+                'low': close - 1, 'close': close, 'volume': volume}
+
+    def _write_journal(self, bars, date_str=DATE, save_file=None):
+        journal = bar_journal.BarJournal(bar_journal.journal_path(save_file or self.save_file, date_str))
+        for bar in bars:
+            journal.append(bar)
+        journal.close()
+        return journal.path
+
+    def _write_history(self, minutes_list, save_file=None):
+        """5分足の履歴CSV (日本時間のタイムゾーン付き) を作成する。"""
+        index = pd.DatetimeIndex([self.START + timedelta(minutes=m) for m in minutes_list], name='datetime').tz_localize(bar_journal.TZ)
+        df = pd.DataFrame({'open': 900.0, 'high': 901.0, 'low': 899.0, 'close': 900.0, 'volume': 10.0, 'openinterest': 0.0}, index=index)
+        df.to_csv(save_file or self.save_file)
+
+    def _history(self, save_file=None):
+        df = data_cache.read_ohlcv(save_file or self.save_file, tz_naive=True)
+        return [(ts.to_pydatetime(), row['close']) for ts, row in df.iterrows()]
+
+    def test_read_journal_ignores_torn_last_line(self):
+        path = self._write_journal([self._bar(0, 1000.0), self._bar(5, 1001.0), self._bar(5, 1002.0)])
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(f"{(self.START + timedelta(minutes=10)).isoformat()}+09:00,1003.0,10")  # 書き込み途中で終了した行
+        df = bar_journal.read_journal(path)
+        self.assertEqual(list(df['datetime'].dt.tz_localize(None)), [pd.Timestamp(self.START), pd.Timestamp(self.START + timedelta(minutes=5))])
+        self.assertEqual(list(df['close']), [1000.0, 1002.0])  # 同じ日時のバーは後のものを残す
+
+    def test_replay_appends_only_bars_newer_than_history(self):
+        self._write_journal([self._bar(0, 1000.0), self._bar(5, 1001.0), self._bar(10, 1002.0)])
+        hist_df = pd.DataFrame({'open': [900.0, 901.0], 'high': [901.0, 902.0], 'low': [899.0, 900.0],
+                                'close': [900.0, 901.0], 'volume': [10.0, 20.0]},
+                               index=pd.DatetimeIndex([self.START, self.START + timedelta(minutes=5)], name='datetime'))
+        replayed = bar_journal.replay(hist_df, self.save_file, self.DATE)
+        self.assertEqual(list(replayed.index), [pd.Timestamp(self.START + timedelta(minutes=m)) for m in (0, 5, 10)])
+        self.assertEqual(list(replayed['close']), [900.0, 901.0, 1002.0])
+        self.assertEqual(list(replayed.columns), list(hist_df.columns))
+
+        # 当日のジャーナルがない場合は履歴をそのまま返す
+        self.assertIs(bar_journal.replay(hist_df, self.save_file, '20250107'), hist_df)
+
+    def test_merge_bars_appends_newer_bars(self):
+        self._write_history([0, 5])
+        data_cache.read_bars(self.save_file)  # キャッシュを作成しておく
+        new_df = bar_journal.read_journal(self._write_journal([self._bar(10, 1002.0), self._bar(15, 1003.0)]))
+        with mock.patch.object(bar_journal, 'merge_rewrite', wraps=bar_journal.merge_rewrite) as rewrite:
+            bar_journal.merge_bars(self.save_file, new_df)
+        rewrite.assert_not_called()
+        self.assertEqual(self._history(), [(self.START + timedelta(minutes=m), c) for m, c in ((0, 900.0), (5, 900.0), (10, 1002.0), (15, 1003.0))])
+        # 追記分だけ更新したキャッシュが、CSV全体をパースし直した結果と一致する
+        cached, parsed = data_cache.read_bars(self.save_file), data_cache.parse_csv(self.save_file)
+        self.assertEqual((cached.columns, cached.tz), (parsed.columns, parsed.tz))
+        self.assertEqual(cached.datetime.tolist(), parsed.datetime.tolist())
+        self.assertEqual(cached.values.tolist(), parsed.values.tolist())
+
+    def test_merge_bars_rewrites_on_overlap(self):
+        self._write_history([0, 5])
+        new_df = bar_journal.read_journal(self._write_journal([self._bar(5, 1001.0), self._bar(10, 1002.0)]))
+        with mock.patch.object(bar_journal, 'merge_rewrite', wraps=bar_journal.merge_rewrite) as rewrite:
+            bar_journal.merge_bars(self.save_file, new_df)
+        rewrite.assert_called_once()
+        self.assertEqual(self._history(), [(self.START + timedelta(minutes=m), c) for m, c in ((0, 900.0), (5, 1001.0), (10, 1002.0))])
+
+    def test_recover_skips_todays_journal(self):
+        self._write_history([0])
+        yesterday = self._write_journal([self._bar(5, 1001.0)], date_str='20250106')
+        today = self._write_journal([self._bar(24 * 60, 1100.0)], date_str='20250107')
+        recovered = bar_journal.recover(self.data_dir, '20250107')
+        self.assertEqual([(symbol, save_file, len(df)) for symbol, save_file, df in recovered], [('7203', self.save_file, 1)])
+        self.assertFalse(os.path.exists(yesterday))
+        self.assertTrue(os.path.exists(today))
+        self.assertEqual(self._history(), [(self.START, 900.0), (self.START + timedelta(minutes=5), 1001.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
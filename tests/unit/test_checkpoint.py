@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.evaluation.checkpoint import RunManifest
+from src.evaluation.engine import SymbolResult
+
+
+class TestRunManifest(unittest.TestCase):
+    """
+    評価実行のチェックポイント (manifest.jsonl) の再開と、中断で書き込み途中になった末尾の行の扱いを検証する。
+    """
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.run_dir = os.path.join(tmp_dir.name, 'run')
+
+    @staticmethod
+    def _result(strategy_index, symbol, pnl=1.0, error=None):
+        return SymbolResult(strategy_index, symbol, {'pnl': pnl, 'trades': 1}, pd.Timestamp('2025-01-06 09:00:00'),
+                            pd.Timestamp('2025-01-31 15:25:00'), [{'symbol': symbol, 'pnl': pnl}], error)
+
+    def _record(self, results):
+        manifest = RunManifest(self.run_dir)
+        for result in results:
+            manifest.record(result)
+        manifest.close()
+        return manifest
+
+    def test_resume_round_trip(self):
+        manifest = RunManifest(self.run_dir)
+        manifest.save_run_config({'strategy_name': 'base'}, [{'name': 's1'}, {'name': 's2'}])
+        self._record([self._result(0, '7203'), self._result(0, '9984', error='failed'), self._result(1, '7203', pnl=-2.0)])
+
+        self.assertEqual(manifest.load_run_config(), ({'strategy_name': 'base'}, [{'name': 's1'}, {'name': 's2'}]))
+        completed = manifest.load_completed()
+        # 失敗したジョブは記録せず、再開時に再実行する
+        self.assertEqual(sorted(completed), [(0, '7203'), (1, '7203')])
+        self.assertEqual(completed[(1, '7203')], self._result(1, '7203', pnl=-2.0))
+
+    def test_torn_last_line_is_ignored(self):
+        manifest = self._record([self._result(0, '7203'), self._result(0, '9984')])
+        with open(manifest.manifest_path, 'rb+') as f:
+            f.truncate(os.path.getsize(manifest.manifest_path) - 20)  # 2行目の書き込み途中で中断
+        with self.assertLogs('src.evaluation.checkpoint', level='WARNING'):
+            self.assertEqual(sorted(manifest.load_completed()), [(0, '7203')])
+
+        # 再開後の追記は中断された行に続けず、新しい行から書く
+        self._record([self._result(0, '9984'), self._result(1, '7203')])
+        with self.assertLogs('src.evaluation.checkpoint', level='WARNING'):
+            completed = RunManifest(self.run_dir).load_completed()
+        self.assertEqual(sorted(completed), [(0, '7203'), (0, '9984'), (1, '7203')])
+        self.assertEqual(completed[(0, '9984')], self._result(0, '9984'))
+
+    def test_missing_manifest(self):
+        self.assertEqual(RunManifest(self.run_dir).load_completed(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from src.core.util import db_writer
+from src.core.util.notification_logger import NotificationLogger
+from src.realtrade.state_manager import StateManager
+
+
+class TestDBWriter(unittest.TestCase):
+    """
+    書き込みスレッド (db_writer) のまとめ書き・失敗時の扱いを、一時ディレクトリ上の SQLite で検証する。
+    """
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)",)
+    INSERT_SQL = "INSERT INTO items (id, name) VALUES (?, ?)"
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    @staticmethod
+    def _rows(path, sql):
+        with sqlite3.connect(path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_bad_row_does_not_drop_rest_of_batch(self):
+        writer = db_writer.DBWriter(max_delay=0.5)
+        path = self._path('items.db')
+        db = writer.open_database(path, schema=self.SCHEMA)
+        self.addCleanup(db.close)
+        errors = []
+        commits = writer.commits
+        db.execute(self.INSERT_SQL, (1, 'a'))
+        db.execute(self.INSERT_SQL, (2, None), on_error=lambda conn, params, error: errors.append((params, type(error))))
+        db.execute(self.INSERT_SQL, (3, 'c'))
+        db.execute(self.INSERT_SQL, lambda: 1 / 0)  # パラメータの生成に失敗した書き込みは捨てる
+        db.execute(self.INSERT_SQL, (4, 'd'))
+        db.flush()
+        self.assertEqual(self._rows(path, "SELECT id, name FROM items ORDER BY id"), [(1, 'a'), (3, 'c'), (4, 'd')])
+        self.assertEqual(errors, [((2, None), sqlite3.IntegrityError)])
+        self.assertEqual(writer.commits - commits, 1)  # 1回のトランザクションでコミットする
+        self.assertEqual(writer.writes, 3)
+
+    def test_call_on_unopened_database_fails(self):
+        writer = db_writer.DBWriter()
+        writer.open_database(self._path('items.db'), schema=self.SCHEMA).close()
+        called = []
+        future = db_writer.Database(writer, self._path('missing.db')).call(called.append)
+        with self.assertRaises(sqlite3.OperationalError):
+            future.result(timeout=5)
+        self.assertEqual(called, [])
+
+    def test_open_failure_is_raised(self):
+        path = self._path('x.db')
+        os.mkdir(path)
+        with self.assertRaises(sqlite3.Error):
+            db_writer.DBWriter().open_database(path, schema=self.SCHEMA)
+        with self.assertLogs('src.realtrade.state_manager', level='CRITICAL'):
+            with self.assertRaises(sqlite3.Error):
+                StateManager(path)
+        with self.assertRaises(sqlite3.Error):
+            NotificationLogger(path)
+
+    def test_load_positions_sees_queued_writes(self):
+        state = StateManager(self._path('realtrade_state.db'))
+        self.addCleanup(state.close)
+        state.save_position('7203', 100.0, 2500.0, '2025-01-06T09:05:00')
+        state.save_position(9984, -200.0, 8000.0, '2025-01-06T09:10:00')
+        state.delete_position('7203')
+        self.assertEqual(state.load_positions(), {'9984': {'size': -200.0, 'price': 8000.0, 'entry_datetime': '2025-01-06T09:10:00'}})
+
+    def test_notification_id_collision_is_remapped(self):
+        path = self._path('notification_history.db')
+        notifications = NotificationLogger(path)
+        self.addCleanup(notifications.close)
+        first = notifications.log_request('NORMAL', 'to@example.com', 'first', 'body')
+        notifications.db.flush()
+        # 別のプロセスが次のIDを先に使った場合
+        with sqlite3.connect(path) as conn:
+            conn.execute("INSERT INTO notification_history (id, timestamp, priority, subject, status) "
+                         "VALUES (?, '2025-01-06 09:00:00', 'URGENT', 'other', 'SUCCESS')", (first + 1,))
+        with self.assertLogs('src.core.util.notification_logger', level='WARNING'):
+            second = notifications.log_request('NORMAL', 'to@example.com', 'second', 'body')
+            notifications.update_status(second, 'FAILED', 'timeout')
+            notifications.update_status(first, 'SUCCESS')
+            notifications.db.flush()
+        self.assertEqual(second, first + 1)
+        self.assertEqual(self._rows(path, "SELECT id, subject, status, error_message FROM notification_history ORDER BY id"),
+                         [(first, 'first', 'SUCCESS', ''), (first + 1, 'other', 'SUCCESS', None), (first + 2, 'second', 'FAILED', 'timeout')])
+        # 以降のIDは読み替え後のIDより後から採番する
+        self.assertEqual(notifications.log_request('NORMAL', 'to@example.com', 'third', 'body'), first + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,25 +25,23 @@ class TestExcelReader(unittest.TestCase):
     def test_read_market_data_successfully(self):
         """市場データの読み取りと解析が正常に行われることをテスト"""
         # Arrange: xlwingsが返すダミーデータを定義
+        # ▼▼▼【変更箇所: 一括読み取り (A-F列の銘柄データと I2 の現金残高を1回で読む)】▼▼▼
         dummy_market_data = [
-            [1332.0, 2500.5, 2490.0, 2510.0, 2485.0, 100000.0],
-            [1605.0, 3000.0, 3010.0, 3020.0, 2990.0, 250000.0],
-            [None, None, None, None, None, None]
+            [1332.0, 2500.5, 2490.0, 2510.0, 2485.0, 100000.0, None, None, 5000000.0],
+            [1605.0, 3000.0, 3010.0, 3020.0, 2990.0, 250000.0, None, None, None],
+            [None, None, None, None, None, None, None, None, None]
         ]
-        dummy_cash = 5000000.0
-        
-        # ▼▼▼ ここからが修正箇所 ▼▼▼
+
         # 呼び出される引数に応じて異なる値を返すside_effect関数を定義
         def range_side_effect(arg):
             mock_range = Mock()
-            if arg == 'A2:F10':
+            if arg == 'A2:I226':
                 mock_range.value = dummy_market_data
-            elif arg == 'B11':
-                mock_range.value = dummy_cash
             else:
                 # 想定外の引数で呼び出された場合
                 mock_range.value = None
             return mock_range
+        # ▲▲▲【変更箇所ここまで】▲▲▲
 
         # self.mock_data_sheet.range の挙動をside_effectで設定
         self.mock_data_sheet.range.side_effect = range_side_effect
@@ -60,6 +58,60 @@ class TestExcelReader(unittest.TestCase):
             'account': {'cash': 5000000.0}
         }
         self.assertEqual(result, expected)
+        # ▼▼▼【変更箇所: 一括読み取り】▼▼▼
+        self.mock_data_sheet.range.assert_called_once_with('A2:I226')
+        # ▲▲▲【変更箇所ここまで】▲▲▲
+
+    # ▼▼▼【変更箇所: 差分読み取り】▼▼▼
+    def _set_market_rows(self, rows, cash=5000000.0):
+        """A2:I226 の読み取り結果として、rows ([銘柄コード, 現在値, 始値, 高値, 安値, 出来高]) を返すよう設定する"""
+        values = [row + [None, None, None] for row in rows]
+        values[0][8] = cash
+        self.mock_data_sheet.range.return_value.value = values
+
+    def test_read_market_data_reuses_unchanged_rows(self):
+        """値の変わらない読み取りでは同じ辞書を返し、変わった行の辞書だけが作り直されることをテスト"""
+        reader = ExcelReader(self.mock_sheets)
+        self._set_market_rows([[1332.0, 2500.5, 2490.0, 2510.0, 2485.0, 100000.0],
+                               [1605.0, 3000.0, 3010.0, 3020.0, 2990.0, 250000.0]])
+        first = reader.read_market_data()
+        self.assertIs(reader.read_market_data(), first)
+
+        self._set_market_rows([[1332.0, 2500.5, 2490.0, 2510.0, 2485.0, 100000.0],
+                               [1605.0, 3005.0, 3010.0, 3020.0, 2990.0, 250100.0]])
+        second = reader.read_market_data()
+        self.assertIsNot(second, first)
+        self.assertIs(second['1332'], first['1332'])
+        self.assertEqual(second['1605'], {'close': 3005.0, 'open': 3010.0, 'high': 3020.0, 'low': 2990.0, 'volume': 250100.0})
+
+        # 銘柄の入れ替え・空欄や数値でないセル (None として扱う)
+        self._set_market_rows([[1605.0, 3005.0, 3010.0, 3020.0, 2990.0, 250100.0],
+                               ['ABC', 1.0, 1.0, 1.0, 1.0, 1.0],
+                               [7203.0, '-', None, None, None, 0.0]], cash=4000000.0)
+        third = reader.read_market_data()
+        self.assertEqual(third, {
+            '1605': {'close': 3005.0, 'open': 3010.0, 'high': 3020.0, 'low': 2990.0, 'volume': 250100.0},
+            '7203': {'close': None, 'open': None, 'high': None, 'low': None, 'volume': 0.0},
+            'account': {'cash': 4000000.0}
+        })
+
+    def test_read_market_data_skips_unchanged_update_cell(self):
+        """更新時刻セルが前回と同じ場合は、市場データの範囲を読まずに前回の結果を返すことをテスト"""
+        stamp = {'value': '09:00:01'}
+        market = Mock()
+        market.value = [[1332.0, 2500.5, 2490.0, 2510.0, 2485.0, 100000.0, None, None, 5000000.0]]
+        self.mock_data_sheet.range.side_effect = lambda arg: Mock(value=stamp['value']) if arg == 'K2' else market
+
+        reader = ExcelReader(self.mock_sheets, update_cell='K2')
+        first = reader.read_market_data()
+        self.assertIs(reader.read_market_data(), first)
+        market_reads = [c for c in self.mock_data_sheet.range.call_args_list if c.args == ('A2:I226',)]
+        self.assertEqual(len(market_reads), 1)
+
+        stamp['value'] = '09:00:02'
+        market.value = [[1332.0, 2501.0, 2490.0, 2510.0, 2485.0, 100100.0, None, None, 5000000.0]]
+        self.assertEqual(reader.read_market_data()['1332']['close'], 2501.0)
+    # ▲▲▲【変更箇所ここまで】▲▲▲
 
     def test_read_positions_successfully(self):
         """建玉情報の読み取りと解析が正常に行われることをテスト"""
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from src.core.indicators import SafeADX, VWAP
+
+
+def _make_bars(days=8, seed=0):
+    """前場/後場の5分足。値幅ゼロのバーと出来高ゼロの日を含む。"""
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2024-01-04', periods=days) for t in times])
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    df = pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                       'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+    df.iloc[10:40, :4] = df['close'].iloc[10]        # 値幅ゼロが続く区間 (TR = 0)
+    df.loc[df.index.normalize() == index[0].normalize() + pd.offsets.BDay(2), 'volume'] = 0.0  # 出来高ゼロの日
+    return df
+
+
+class _RecordStrategy(bt.Strategy):
+    params = (('adx_periods', (5, 14)), ('data_index', 0))
+
+    def __init__(self):
+        data = self.datas[self.p.data_index]
+        self.adx = [SafeADX(data, period=p) for p in self.p.adx_periods]
+        self.vwap = VWAP(data)
+
+    def stop(self):
+        self.result = {'vwap': list(self.vwap.lines.vwap.array)}
+        for p, ind in zip(self.p.adx_periods, self.adx):
+            for name in ('adx', 'plusDI', 'minusDI'):
+                self.result[f"{name}_{p}"] = list(getattr(ind.lines, name).array)
+
+
+class TestIndicatorOnce(unittest.TestCase):
+    """SafeADX / VWAP の once() (runonce モード) が next() と1ビットも違わない値を出力することを検証する。"""
+
+    def _run(self, df, runonce, higher_df=None):
+        cerebro = bt.Cerebro(stdstats=False, runonce=runonce)
+        cerebro.adddata(bt.feeds.PandasData(dataname=df))
+        if higher_df is not None:
+            cerebro.adddata(bt.feeds.PandasData(dataname=higher_df, timeframe=bt.TimeFrame.Minutes, compression=60))
+        cerebro.addstrategy(_RecordStrategy, data_index=0 if higher_df is None else 1)
+        return cerebro.run()[0].result
+
+    def _assert_same(self, expected, actual, min_values, **subtest):
+        for name, values in expected.items():
+            with self.subTest(line=name, **subtest):
+                # NaN 同士も一致として扱い、それ以外は完全一致を要求する
+                np.testing.assert_array_equal(np.array(values), np.array(actual[name]))
+                self.assertGreater(np.count_nonzero(~np.isnan(values)), min_values)
+
+    def test_once_matches_next(self):
+        for seed in range(3):
+            df = _make_bars(seed=seed)
+            expected, actual = self._run(df, runonce=False), self._run(df, runonce=True)
+            self._assert_same(expected, actual, len(df) // 2, seed=seed)
+
+    def test_higher_timeframe_next_matches_once(self):
+        """
+        上位足 (60分足) のインジケーターは、next モードでは上位足が進まないバーでも next() が呼ばれる。
+        同じバーを二重に処理せず、once モードと同じ値になることを検証する。
+        """
+        df = _make_bars(days=20)
+        higher_df = df.resample('60min', closed='left', label='left').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+        expected, actual = self._run(df, runonce=False, higher_df=higher_df), self._run(df, runonce=True, higher_df=higher_df)
+        self._assert_same(expected, actual, len(higher_df) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
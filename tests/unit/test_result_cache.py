@@ -0,0 +1,85 @@
+import os
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+from src.backtest import config_backtest
+from src.evaluation.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    評価結果キャッシュのキーが結果に影響する入力 (パラメータ・エンジン・バックテスト設定・データ) の変更で変わり、
+    破損したエントリーは再計算扱いになることを検証する。
+    """
+    SYMBOL = '7203'
+    PARAMS = {'strategy_name': 'sma_cross', 'sma_period': 20,
+              'timeframes': {'medium': {'source_type': 'direct', 'file_pattern': '{symbol}_60m_*.csv'}}}
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.data_dir = tmp_dir.name
+        self.base_file = self._write('7203_5m_20250101.csv', 'datetime,close\n2025-01-06 09:00:00,1000\n')
+        self.medium_file = self._write('7203_60m_20250101.csv', 'datetime,close\n2025-01-06 09:00:00,1000\n')
+        self.cache = ResultCache(os.path.join(self.data_dir, 'cache'))
+
+    def _write(self, name, text):
+        path = os.path.join(self.data_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def _key(self, params=PARAMS, engine='backtrader', cache=None):
+        return (cache or self.cache).job_key(self.SYMBOL, self.base_file, params, self.data_dir, engine)
+
+    def test_key_changes_with_inputs(self):
+        key = self._key()
+        self.assertEqual(self._key(), key)
+        self.assertEqual(self._key(dict(self.PARAMS, strategy_name='renamed')), key)  # 戦略名は結果に影響しない
+
+        self.assertNotEqual(self._key(dict(self.PARAMS, sma_period=21)), key)
+        self.assertNotEqual(self._key(engine='vectorized'), key)
+        for name, value in (('INITIAL_CAPITAL', 123456789), ('COMMISSION_PERC', 0.123), ('SLIPPAGE_PERC', 0.456)):
+            with self.subTest(setting=name), mock.patch.object(config_backtest, name, value):
+                self.assertNotEqual(self._key(), key)
+
+    def test_key_changes_with_data_contents(self):
+        key = self._key()
+        for path in (self.base_file, self.medium_file):
+            with self.subTest(file=os.path.basename(path)):
+                with open(path, 'r', encoding='utf-8') as f:
+                    original = f.read()
+                self._write(os.path.basename(path), original.replace('1000', '1001'))  # サイズが同じで内容だけが違う
+                os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+                self.assertNotEqual(self._key(), key)
+                self._write(os.path.basename(path), original)
+        # 'direct' 指定の中長期足のファイルが増えた場合
+        self._write('7203_60m_20250102.csv', 'datetime,close\n')
+        self.assertNotEqual(self._key(), key)
+
+    def test_file_digests_are_reused(self):
+        key = self._key()
+        self.cache.save_digests()
+        cache = ResultCache(self.cache.cache_dir)
+        with mock.patch('hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertEqual(self._key(cache=cache), key)
+        self.assertEqual(sha256.call_count, 1)  # キーのハッシュのみ (CSVは読み直さない)
+
+    def test_get_put_and_corrupt_entry(self):
+        key = self._key()
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {'pnl': 1.0}, '2025-01-06', '2025-01-31', [{'pnl': 1.0}])
+        self.assertEqual(self.cache.get(key), ({'pnl': 1.0}, '2025-01-06', '2025-01-31', [{'pnl': 1.0}]))
+        self.assertIsNone(ResultCache(self.cache.cache_dir, read=False).get(key))  # --force
+
+        with open(self.cache._path(key), 'wb') as f:
+            f.write(b'\x80\x05broken')
+        with self.assertLogs('src.evaluation.result_cache', level='WARNING'):
+            self.assertIsNone(self.cache.get(key))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
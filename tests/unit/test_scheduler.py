@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+import backtrader as bt
+import pandas as pd
+
+from src.realtrade.bridge.tick_publisher import Tick
+from src.realtrade.rakuten.rakuten_data import RakutenData
+from src.realtrade.scheduler import CerebroScheduler, SteppedCerebro
+
+
+class _RecordingStrategy(bt.Strategy):
+    """受け取ったバー (時刻, 終値, 出来高) を記録する。"""
+    def __init__(self):
+        self.bars = []
+
+    def next(self):
+        self.bars.append((self.data.datetime.datetime(0), self.data.close[0], self.data.volume[0]))
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCerebroSchedulerBoundary(unittest.TestCase):
+    """
+    値の変わらない銘柄のバーも、時間枠の境界で確定することを検証する。
+    """
+    START = datetime(2025, 1, 6, 9, 0, 0)
+
+    def setUp(self):
+        self.clock = _Clock(self.START)
+        self.strategies = {}
+        cerebros = []
+        for symbol in ('7203', '9984'):
+            cerebro = SteppedCerebro(stdstats=False, runonce=False, preload=False)
+            cerebro.adddata(RakutenData(dataname=pd.DataFrame(), bridge=object(), symbol=symbol,
+                                        timeframe=bt.TimeFrame.Minutes, compression=5, scheduled=True))
+            cerebro.addstrategy(_RecordingStrategy)
+            cerebros.append(cerebro)
+        self.scheduler = CerebroScheduler(cerebros, threading.Event(), clock=self.clock, report_interval=0)
+        for symbol, cerebro in self.scheduler.cerebros.items():
+            cerebro.begin()
+            self.strategies[symbol] = cerebro.runningstrats[0]
+        self.addCleanup(self.scheduler.finish_all)
+        self.seq = 0
+
+    def _tick(self, at, symbol, close, volume):
+        self.clock.now = at
+        self.seq += 1
+        self.scheduler.dispatch(Tick(symbol, self.seq, time.perf_counter(), {'close': close, 'volume': volume}))
+        self.scheduler.run_once(0)
+
+    def _advance(self, at):
+        self.clock.now = at
+        self.scheduler.run_once(0)
+
+    def test_unchanged_symbol_emits_bar_at_boundary(self):
+        self.scheduler.run_once(0)
+        self.assertEqual(self.scheduler._boundary_at, self.START + timedelta(minutes=5, seconds=0.2))
+
+        self._tick(self.START + timedelta(minutes=1), '7203', 1000.0, 100.0)
+        self._tick(self.START + timedelta(minutes=1), '9984', 2000.0, 50.0)
+        self._tick(self.START + timedelta(minutes=4, seconds=59), '9984', 2010.0, 80.0)
+        self._advance(self.START + timedelta(minutes=5, seconds=0.1))
+        self.assertEqual(self.strategies['7203'].bars, [])  # 境界 + grace までは確定しない
+
+        # 9984 は新しい時間枠の Tick で確定し、値の変わらない 7203 は境界で確定する
+        self._tick(self.START + timedelta(minutes=5, seconds=0.15), '9984', 2020.0, 90.0)
+        self.assertEqual(self.strategies['9984'].bars, [(self.START, 2010.0, 80.0)])
+        self._advance(self.START + timedelta(minutes=5, seconds=0.3))
+        self.assertEqual(self.strategies['7203'].bars, [(self.START, 1000.0, 100.0)])
+        self.assertEqual(len(self.strategies['9984'].bars), 1)  # 二重に確定しない
+        self.assertEqual(self.scheduler._boundary_at, self.START + timedelta(minutes=10, seconds=0.2))
+
+        # 取引のなかった時間枠は出来高0のバーになる
+        self._advance(self.START + timedelta(minutes=10, seconds=0.2))
+        self.assertEqual(self.strategies['7203'].bars[-1], (self.START + timedelta(minutes=5), 1000.0, 0.0))
+        self.assertEqual(self.strategies['9984'].bars[-1], (self.START + timedelta(minutes=5), 2020.0, 10.0))
+
+    def test_wait_timeout_stops_at_next_boundary(self):
+        self.clock.now = self.START + timedelta(minutes=3, seconds=30)
+        self.scheduler.run_once(0)
+        self.assertAlmostEqual(self.scheduler._wait_timeout(), 90.2)
+        self.scheduler.report_interval = 30
+        self.assertEqual(self.scheduler._wait_timeout(), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
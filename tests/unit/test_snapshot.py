@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from src.core.streaming import Bars, SMA, StreamingIndicatorSet
+from src.realtrade import snapshot as warm_start
+
+
+class _PositionManager:
+    def snapshot_state(self, strategy, exit_signal_generator):
+        return {'size': 100.0, 'price': 1000.0}
+
+
+class TestSnapshot(unittest.TestCase):
+    """
+    ウォームスタート用のスナップショットが、復元できない・定義が変わった場合に使われず (全履歴の再生に戻り)、
+    復元時には tail と新しいバーだけを供給することを検証する。
+    """
+    SYMBOL = '7203'
+    PARAMS = {'strategy_name': 'sma_cross', 'entry_conditions': {'long': [{'timeframe': 'short', 'indicator': {'name': 'sma', 'params': {'period': 3}}}]}}
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.snapshot_dir = os.path.join(tmp_dir.name, 'snapshots')
+        index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2025-01-06', periods=3)
+                                  for t in pd.date_range('09:00', '09:20', freq='5min').time], name='datetime')
+        close = np.arange(len(index), dtype=np.float64) + 1000.0
+        self.bars_df = pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 100.0}, index=index)
+
+    def _indicators(self, rows):
+        """短期足の5分足 rows 本を反映済みのインジケーター群。"""
+        indicators = StreamingIndicatorSet()
+        indicators.add('short_sma_period_3', 'short', SMA(period=3))
+        df = self.bars_df.iloc[:rows]
+        dt = np.array([bt.date2num(ts) for ts in df.index.to_pydatetime()])
+        indicators.seed('short', Bars(dt, *(df[c].to_numpy() for c in ('open', 'high', 'low', 'close', 'volume'))))
+        return indicators
+
+    def _strategy(self, indicators=None, realtime_phase_started=True, params=PARAMS):
+        return SimpleNamespace(indicators=indicators if indicators is not None else self._indicators(len(self.bars_df)),
+                               realtime_phase_started=realtime_phase_started, p=SimpleNamespace(strategy_params=params),
+                               position_manager=_PositionManager(), exit_signal_generator=None)
+
+    def _build(self, **kwargs):
+        return warm_start.build_snapshot(self.SYMBOL, self._strategy(**kwargs), self.bars_df)
+
+    def _load(self, symbol=SYMBOL, params=PARAMS):
+        return warm_start.load_snapshot(self.snapshot_dir, symbol, params['strategy_name'], params)
+
+    def test_build_snapshot_keeps_last_two_days(self):
+        snapshot = self._build()
+        self.assertEqual(snapshot['symbol'], self.SYMBOL)
+        self.assertEqual(snapshot['position'], {'size': 100.0, 'price': 1000.0})
+        self.assertEqual(snapshot['last_bar'], self.bars_df.index[-1])
+        self.assertEqual(sorted(snapshot['tail'].index.normalize().unique()), list(self.bars_df.index.normalize().unique()[-2:]))
+
+    def test_build_snapshot_rejects_unrestorable_state(self):
+        self.assertIsNone(self._build(indicators={'short_sma_period_3': None}))  # ストリーミング版でない
+        self.assertIsNone(self._build(realtime_phase_started=False))
+        unabsorbed = self._indicators(len(self.bars_df))
+        unabsorbed.add('medium_sma_period_3', 'medium', SMA(period=3))  # バーを反映していない時間足がある
+        self.assertIsNone(self._build(indicators=unabsorbed))
+        # 反映済みの最終バーが tail (直近2営業日) より前
+        self.assertIsNone(self._build(indicators=self._indicators(5)))
+
+    def test_load_snapshot_round_trip(self):
+        path = warm_start.save_snapshot(self.snapshot_dir, self._build())
+        self.assertEqual(path, warm_start.snapshot_path(self.snapshot_dir, self.SYMBOL))
+        loaded = self._load()
+        self.assertIsNotNone(loaded)
+        self.assertEqual(loaded['indicators']['short_sma_period_3'][0], self._indicators(len(self.bars_df))['short_sma_period_3'][0])
+        pd.testing.assert_frame_equal(loaded['tail'], self._build()['tail'])
+
+    def test_load_snapshot_rejects_mismatch(self):
+        self.assertIsNone(self._load())  # スナップショットなし
+        warm_start.save_snapshot(self.snapshot_dir, self._build())
+
+        changed = dict(self.PARAMS, entry_conditions={'long': []})
+        with self.assertLogs(warm_start.logger, level='WARNING') as logs:
+            self.assertIsNone(self._load(params=changed))
+        self.assertIn('params_digest', logs.output[0])
+
+        old_version = dict(self._build(), version=warm_start.SNAPSHOT_VERSION - 1)
+        warm_start.save_snapshot(self.snapshot_dir, old_version)
+        with self.assertLogs(warm_start.logger, level='WARNING') as logs:
+            self.assertIsNone(self._load())
+        self.assertIn('version', logs.output[0])
+
+        # 別の銘柄のスナップショット
+        warm_start.save_snapshot(self.snapshot_dir, self._build())
+        os.replace(warm_start.snapshot_path(self.snapshot_dir, self.SYMBOL), warm_start.snapshot_path(self.snapshot_dir, '9984'))
+        with self.assertLogs(warm_start.logger, level='WARNING') as logs:
+            self.assertIsNone(self._load(symbol='9984'))
+        self.assertIn('symbol', logs.output[0])
+
+    def test_load_snapshot_ignores_corrupt_file(self):
+        path = warm_start.save_snapshot(self.snapshot_dir, self._build())
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) // 2)
+        with self.assertLogs(warm_start.logger, level='WARNING'):
+            self.assertIsNone(self._load())
+        with open(path, 'wb') as f:
+            f.write(b'not a pickle')
+        with self.assertLogs(warm_start.logger, level='WARNING'):
+            self.assertIsNone(self._load())
+
+    def test_bars_to_replay(self):
+        snapshot = warm_start.build_snapshot(self.SYMBOL, self._strategy(), self.bars_df.iloc[:-2])
+        # 履歴にスナップショットより新しいバーがなければ tail だけを供給する
+        self.assertIs(warm_start.bars_to_replay(snapshot, self.bars_df.iloc[:-2]), snapshot['tail'])
+        self.assertIs(warm_start.bars_to_replay(snapshot, self.bars_df.iloc[0:0]), snapshot['tail'])
+        # 新しいバーは tail の後に続ける (列は共通の列に揃える)
+        hist_df = self.bars_df.assign(openinterest=0.0)
+        replayed = warm_start.bars_to_replay(snapshot, hist_df)
+        self.assertEqual(list(replayed.index), list(snapshot['tail'].index) + list(self.bars_df.index[-2:]))
+        self.assertEqual(list(replayed.columns), list(self.bars_df.columns))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from src.core.strategy.strategy_initializer import StrategyInitializer
+
+INDICATORS = [('sma', {'period': 20}), ('ema', {'period': 20}), ('rsi', {'period': 14}), ('atr', {'period': 14}),
+              ('adx', {'period': 14}), ('stochastic', {'period': 14, 'period_dfast': 3, 'period_dslow': 3}),
+              ('BollingerBands', {'period': 20, 'devfactor': 2.0}),
+              ('macd', {'period_me1': 12, 'period_me2': 26, 'period_signal': 9}), ('vwap', {})]
+
+
+def _conditions(timeframe, indicators):
+    return [{'timeframe': timeframe, 'indicator': {'name': name, 'params': params}, 'compare': '>', 'target': {'type': 'values', 'value': 0}}
+            for name, params in indicators]
+
+
+# 短期足は全インジケーター、中期足 (60分足) は上位足で next() が重複して呼ばれる系統を検証する
+STRATEGY_PARAMS = {'entry_conditions': {
+    'long': _conditions('short', INDICATORS) + _conditions('medium', [('atr', {'period': 5}), ('adx', {'period': 5}), ('vwap', {})]) + [
+        {'timeframe': 'short', 'type': 'crossover', 'indicator1': {'name': 'ema', 'params': {'period': 5}},
+         'indicator2': {'name': 'ema', 'params': {'period': 20}}}],
+}}
+
+
+def _make_bars(days=15, seed=0):
+    """前場/後場の5分足。"""
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2024-01-04', periods=days) for t in times])
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                         'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+
+
+class _ParityStrategy(bt.Strategy):
+    """Backtrader のインジケーターとストリーミング版を同じバーで動かし、全ラインの値を比較する。"""
+    def __init__(self):
+        self.data_feeds = {'short': self.datas[0], 'medium': self.datas[1], 'long': self.datas[1]}
+        initializer = StrategyInitializer(STRATEGY_PARAMS)
+        self.bt_indicators = initializer.create_indicators(self.data_feeds)
+        self.streaming = initializer.create_streaming_indicators()
+        self.seed_bars, self.updates, self.values, self.mismatches = None, 0, 0, []
+
+    def next(self):
+        if self.seed_bars is None:
+            self.seed_bars = len(self.datas[0])  # 最初の next() で履歴全体を seed する
+        else:
+            self.updates += 1
+        self.streaming.update(self.data_feeds)
+        for key, bt_ind in self.bt_indicators.items():
+            streaming_ind = self.streaming[key]
+            if hasattr(streaming_ind, 'line_values') and streaming_ind.line_names != ('value',):
+                pairs = [(name, getattr(bt_ind.lines, name)[0], value) for name, value in streaming_ind.line_values().items()]
+            else:
+                pairs = [(None, bt_ind.lines[0][0], streaming_ind[0])]
+            for name, expected, actual in pairs:
+                self.values += 1
+                if not (expected == actual or (math.isnan(expected) and math.isnan(actual))):
+                    self.mismatches.append((key, name, self.datas[0].datetime.datetime(0), expected, actual))
+
+
+class TestStreamingIndicatorParity(unittest.TestCase):
+    """
+    ストリーミング・インジケーター (seed のあと1本ずつ update) が、ライブ取引と同じ next モード (runonce=False) の
+    Backtrader のインジケーターと完全に一致することを検証する。
+    """
+    def test_streaming_matches_backtrader(self):
+        df = _make_bars()
+        higher_df = df.resample('60min', closed='left', label='left').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+        cerebro = bt.Cerebro(stdstats=False)
+        cerebro.adddata(bt.feeds.PandasData(dataname=df, timeframe=bt.TimeFrame.Minutes, compression=5))
+        cerebro.adddata(bt.feeds.PandasData(dataname=higher_df, timeframe=bt.TimeFrame.Minutes, compression=60))
+        cerebro.addstrategy(_ParityStrategy)
+        strat = cerebro.run(runonce=False, preload=False)[0]
+
+        self.assertGreater(strat.seed_bars, 1)
+        self.assertGreater(strat.updates, len(df) // 2)
+        self.assertEqual(len(strat.streaming), len(strat.bt_indicators))
+        self.assertGreater(strat.values, 10000)
+        self.assertEqual(strat.mismatches[:5], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
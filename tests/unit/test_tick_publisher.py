@@ -0,0 +1,71 @@
+import unittest
+
+from src.realtrade.bridge.tick_publisher import TickPublisher
+
+
+class TestTickPublisher(unittest.TestCase):
+    """
+    TickPublisher が、購読されている銘柄のうち値の変わった銘柄だけを配信することを検証する。
+    """
+    def setUp(self):
+        self.publisher = TickPublisher()
+        self.received = []
+        self.publisher.subscribe('7203', self.received.append)
+        self.publisher.subscribe(9984, self.received.append)
+
+    def _received(self):
+        received = [(t.symbol, t.seq, t.read_at, t.data) for t in self.received]
+        self.received.clear()
+        return received
+
+    def test_publishes_only_changed_symbols(self):
+        snapshot = {'7203': {'close': 1000.0, 'volume': 100.0}, '9984': {'close': 2000.0, 'volume': 50.0},
+                    '6758': {'close': 3000.0, 'volume': 10.0}}
+        self.assertEqual(self.publisher.publish(snapshot, 1.0), 2)  # 購読されていない銘柄は配信しない
+        self.assertCountEqual(self._received(), [('7203', 1, 1.0, snapshot['7203']), ('9984', 1, 1.0, snapshot['9984'])])
+
+        changed = dict(snapshot, **{'9984': {'close': 2001.0, 'volume': 60.0}, '6758': {'close': 3001.0, 'volume': 20.0}})
+        self.assertEqual(self.publisher.publish(changed, 2.0), 1)
+        self.assertEqual(self._received(), [('9984', 2, 2.0, changed['9984'])])
+
+        # 値が同じなら別の辞書でも配信しない
+        self.assertEqual(self.publisher.publish({k: dict(v) for k, v in changed.items()}, 3.0), 0)
+        self.assertEqual(self._received(), [])
+
+    def test_same_snapshot_is_skipped_but_advances_seq(self):
+        snapshot = {'7203': {'close': 1000.0, 'volume': 100.0}}
+        self.publisher.publish(snapshot, 1.0)
+        self._received()
+        self.assertEqual(self.publisher.publish(snapshot, 2.0), 0)
+        self.assertEqual(self.publisher.seq, 2)
+        self.assertEqual(self._received(), [])
+
+    def test_removed_row_is_published_as_empty_dict(self):
+        self.publisher.publish({'7203': {'close': 1000.0, 'volume': 100.0}}, 1.0)
+        self._received()
+        self.assertEqual(self.publisher.publish({}, 2.0), 1)
+        self.assertEqual(self._received(), [('7203', 2, 2.0, {})])
+
+    def test_unsubscribe(self):
+        other = []
+        self.publisher.subscribe('7203', other.append)
+        self.publisher.unsubscribe('7203', self.received.append)
+        self.publisher.unsubscribe('9984', self.received.append)
+        self.assertEqual(self.publisher.publish({'7203': {'close': 1000.0}, '9984': {'close': 2000.0}}, 1.0), 1)
+        self.assertEqual(self.received, [])
+        self.assertEqual([t.symbol for t in other], ['7203'])
+
+    def test_failing_subscriber_does_not_block_others(self):
+        def fail(tick):
+            raise RuntimeError("boom")
+        publisher = TickPublisher()
+        received = []
+        publisher.subscribe('7203', fail)
+        publisher.subscribe('7203', received.append)
+        with self.assertLogs('src.realtrade.bridge.tick_publisher', level='ERROR'):
+            self.assertEqual(publisher.publish({'7203': {'close': 1000.0}}, 1.0), 1)
+        self.assertEqual(len(received), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
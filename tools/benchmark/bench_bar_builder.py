@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# ==============================================================================
+# 全銘柄一括のバー構築 (MultiBarBuilder) のベンチマーク
+#   - 従来: 銘柄ごとの BarBuilder.add_tick を Tick ごとに呼び出す
+#   - 現行: MultiBarBuilder.add_snapshot に1回分のスナップショット (全銘柄のベクトル) を渡す
+# 疑似的な1秒間隔のスナップショット (値の欠損・累計出来高のリセットを含む) を両方式に与え、
+# 1スナップショットあたりの処理時間を比較する。(完成するバーの一致は tests/unit/test_bar_builder.py で検証する)
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_bar_builder.py [--symbols 225] [--minutes 60]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.realtrade.bar_builder import BarBuilder, MultiBarBuilder
+
+
+def _snapshots(n_symbols, minutes, seed=0):
+    """(タイムスタンプ, 現在値, 累計出来高) を1秒ごとに生成する。欠損は NaN。"""
+    rng = np.random.default_rng(seed)
+    prices = np.full(n_symbols, 1000.0)
+    volumes = np.zeros(n_symbols)
+    start = datetime(2025, 1, 6, 9, 0, 0)
+    for second in range(minutes * 60):
+        prices = np.round(prices * np.exp(rng.normal(0, 0.0005, n_symbols)), 1)
+        volumes = volumes + rng.integers(0, 500, n_symbols) * (rng.random(n_symbols) < 0.5)
+        # 累計出来高のリセット (セッション跨ぎなど) と値の欠損
+        volumes[rng.random(n_symbols) < 0.0005] = 0.0
+        price_view, volume_view = prices.copy(), volumes.copy()
+        price_view[rng.random(n_symbols) < 0.01] = np.nan
+        volume_view[rng.random(n_symbols) < 0.005] = np.nan
+        yield start + timedelta(seconds=second), price_view, volume_view
+
+
+def _legacy(snapshots, symbols):
+    builders = [BarBuilder(interval_minutes=5) for _ in symbols]
+    bars, elapsed = [], 0.0
+    for timestamp, prices, volumes in snapshots:
+        prices_list = [None if p != p else p for p in prices.tolist()]
+        volumes_list = [None if v != v else v for v in volumes.tolist()]
+        t0 = time.perf_counter()
+        for symbol, builder, price, volume in zip(symbols, builders, prices_list, volumes_list):
+            bar = builder.add_tick(timestamp, price, volume)
+            if bar:
+                bars.append((symbol, bar))
+        elapsed += time.perf_counter() - t0
+    bars.extend((symbol, bar) for symbol, builder in zip(symbols, builders) if (bar := builder.flush()))
+    return elapsed, bars
+
+
+def _multi(snapshots, symbols):
+    builder = MultiBarBuilder(symbols, interval_minutes=5)
+    bars, elapsed = [], 0.0
+    for timestamp, prices, volumes in snapshots:
+        t0 = time.perf_counter()
+        completed = builder.add_snapshot(timestamp, prices, volumes)
+        elapsed += time.perf_counter() - t0
+        bars.extend(completed.items())
+    bars.extend(builder.flush().items())
+    return elapsed, bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全銘柄一括のバー構築のベンチマーク')
+    parser.add_argument('--symbols', type=int, default=225, help='銘柄数')
+    parser.add_argument('--minutes', type=int, default=60, help='スナップショットを生成する時間 (分, 1秒間隔)')
+    args = parser.parse_args()
+
+    symbols = [str(1000 + i) for i in range(args.symbols)]
+    snapshots = list(_snapshots(args.symbols, args.minutes))
+    legacy_sec, legacy_bars = _legacy(snapshots, symbols)
+    multi_sec, multi_bars = _multi(snapshots, symbols)
+
+    n = len(snapshots)
+    print(f"銘柄数 {args.symbols} / スナップショット {n} 回 / 完成バー {len(legacy_bars)} 本")
+    print(f"{'方式':<16} | {'合計(s)':>9} {'µs/回':>9}")
+    print(f"{'BarBuilder':<16} | {legacy_sec:>9.3f} {legacy_sec / n * 1e6:>9.1f}")
+    print(f"{'MultiBarBuilder':<16} | {multi_sec:>9.3f} {multi_sec / n * 1e6:>9.1f}")
+    print(f"\n倍率 {legacy_sec / multi_sec:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
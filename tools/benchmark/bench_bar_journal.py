@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import yaml
+import numpy as np
+
+# ==============================================================================
+# 確定足のジャーナル (src/realtrade/bar_journal.py) の検証とベンチマーク
+#   1. 再起動後の再開: 当日の途中で停止した場合 (履歴CSVは前日まで + 当日のジャーナル) に
+#      CerebroFactory が生成した Cerebro のインジケーター値・各時間足のバーが、
+#      停止しなかった場合 (当日分まで履歴にある場合) と完全に一致することを検証する。
+#      全履歴の再生とウォームスタート (前日のスナップショット) の両方で確認する。
+#   2. 追記の処理時間: 全銘柄のバーが同時に確定した時の追記 (Tick を処理するスレッドでの処理時間) を、
+#      ディスクへの同期を JournalSyncer にまとめる方式と、追記のたびに同期する方式で比較する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_bar_journal.py [--strategies 3] [--days 80] [--symbols 225] [--dir data]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.core import data_cache
+from src.realtrade import config_realtrade as config
+from src.realtrade import snapshot as warm_start
+from src.realtrade import bar_journal
+from src.realtrade.cerebro_factory import CerebroFactory
+from bench_warm_start import SYMBOL, _synthetic_bars, _start, _state
+
+
+def resume(strategy_name, days, base, catalog):
+    """当日の途中 (昼休み) で停止・再起動した場合と、停止しなかった場合の状態を比較する。"""
+    today = datetime.now().strftime('%Y%m%d')
+    config.BAR_JOURNAL = True
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.SNAPSHOT_DIR = os.path.join(data_dir, 'snapshots')
+        factory = CerebroFactory(catalog, base, data_dir, {})
+        bars = _synthetic_bars(days + 1)
+        csv_path = os.path.join(data_dir, f"{SYMBOL}_5m_{bars.index[0].year}.csv")
+        last_day = bars.index.normalize() == bars.index.normalize()[-1]
+        morning = last_day & (bars.index.hour < 12)
+
+        # 前日の終了: 全履歴の再生 -> スナップショットの保存
+        bars[~last_day].to_csv(csv_path)
+        strategy, _ = _start(factory, strategy_name, warm=False)
+        snapshot = strategy.build_snapshot(data_cache.read_ohlcv(csv_path, tz_naive=True))
+        if snapshot is not None:
+            warm_start.save_snapshot(config.SNAPSHOT_DIR, snapshot)
+
+        # 停止しなかった場合: 当日の午前のバーまで履歴にある
+        bars[~last_day | morning].to_csv(csv_path)
+        expected = {warm: _state(_start(factory, strategy_name, warm)[0]) for warm in (False, True)}
+
+        # 停止・再起動した場合: 履歴は前日まで、当日の午前のバーはジャーナルにある
+        bars[~last_day].to_csv(csv_path)
+        journal = bar_journal.BarJournal(bar_journal.journal_path(csv_path, today))
+        for ts, row in bars[morning].iterrows():
+            journal.append({'timestamp': ts.to_pydatetime(), **row.to_dict()})
+        journal.close()
+        restarted = {warm: _state(_start(factory, strategy_name, warm)[0]) for warm in (False, True)}
+        return int(morning.sum()), expected[False] == restarted[False], expected[True] == restarted[True], snapshot is not None
+
+
+def append_latency(n_symbols, rounds, directory, batched):
+    """全銘柄のバーが同時に確定した場合の追記を rounds 回繰り返し、(1本あたりの平均・最大秒, 全銘柄分の平均秒) を返す。"""
+    with tempfile.TemporaryDirectory(dir=directory) as journal_dir:
+        stop_event = threading.Event()
+        syncer = bar_journal.JournalSyncer(1.0, stop_event) if batched else None
+        if syncer is not None:
+            syncer.start()
+        journals = [bar_journal.BarJournal(os.path.join(journal_dir, f"{1000 + i}_5m.csv.{i}.journal"), syncer=syncer) for i in range(n_symbols)]
+        bar = {'timestamp': datetime(2025, 1, 6, 9, 0), 'open': 1000.0, 'high': 1001.0, 'low': 999.0, 'close': 1000.5, 'volume': 1200.0}
+        per_append, per_burst = [], []
+        for _ in range(rounds):
+            burst0 = time.perf_counter()
+            for journal in journals:
+                t0 = time.perf_counter()
+                journal.append(bar)
+                per_append.append(time.perf_counter() - t0)
+            per_burst.append(time.perf_counter() - burst0)
+            time.sleep(0.05)
+        stop_event.set()
+        if syncer is not None:
+            syncer.join()
+        for journal in journals:
+            journal.close()
+        return float(np.mean(per_append)), float(np.max(per_append)), float(np.mean(per_burst))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='確定足のジャーナルの検証とベンチマーク')
+    parser.add_argument('--strategies', type=int, default=3, help='戦略カタログ先頭からの戦略数')
+    parser.add_argument('--days', type=int, default=80, help='履歴の日数')
+    parser.add_argument('--symbols', type=int, default=225, help='追記の計測の銘柄数')
+    parser.add_argument('--rounds', type=int, default=20, help='追記の計測の繰り返し回数')
+    parser.add_argument('--dir', default=None, help='追記の計測に使うディレクトリ (既定: 一時ディレクトリ。実運用と同じディスクで計測する場合は data を指定)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+
+    print("1. 当日の途中で再起動した場合の状態 (停止しなかった場合との一致)")
+    print(f"{'戦略':<40} {'再生本数':>8} | {'全履歴':>6} {'ウォーム':>8}")
+    mismatches = 0
+    for strategy_def in catalog[:args.strategies]:
+        n_bars, same_full, same_warm, has_snapshot = resume(strategy_def['name'], args.days, base, catalog)
+        mismatches += not (same_full and same_warm)
+        print(f"{strategy_def['name'][:40]:<40} {n_bars:>8} | {'OK' if same_full else 'NG':>6} "
+              f"{('OK' if same_warm else 'NG') if has_snapshot else '-':>8}")
+
+    print(f"\n2. 全 {args.symbols} 銘柄のバーが同時に確定した場合の追記 ({args.rounds} 回の平均)")
+    print(f"{'同期の方式':<20} | {'1本 平均(µs)':>12} {'1本 最大(µs)':>12} | {'全銘柄(ms)':>10}")
+    for batched, name in ((False, '追記のたびに fsync'), (True, 'JournalSyncer')):
+        mean, worst, burst = append_latency(args.symbols, args.rounds, args.dir, batched)
+        print(f"{name:<20} | {mean * 1e6:>12.1f} {worst * 1e6:>12.1f} | {burst * 1000:>10.2f}")
+
+    print(f"\n状態の不一致: {mismatches} 件")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+import tracemalloc
+
+import yaml
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# ライブ取引の Cerebro インスタンス (CerebroFactory.create_instance) のメモリ使用量ベンチマーク
+# 履歴の日数を変えて、ライン・バッファ無制限 (従来) と制限 (BOUNDED_LINE_BUFFERS, exactbars=1) で
+#   - 履歴の供給にかかる時間
+#   - 供給後に保持しているバー数・値の数 (memory_report.strategy_footprint)
+#   - Cerebro 全体が保持しているメモリ (tracemalloc)
+# を計測する。制限ありでは履歴の長さに関わらず一定になる。両者の最終的なインジケーター値が一致することも検証する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_bounded_buffers.py [--strategy 0] [--days 20,80,320]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.realtrade import config_realtrade as config
+from src.realtrade.cerebro_factory import CerebroFactory
+
+
+class IdleConnector:
+    """履歴の供給だけを行うための接続先。リアルタイムのデータは返さない。"""
+    def get_latest_data(self, symbol): return {}
+    def get_cash(self): return config.INITIAL_CAPITAL
+    def get_positions(self): return {}
+
+
+def _synthetic_bars(days, seed=0):
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2020-01-06', periods=days) for t in times], name='datetime')
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                         'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+
+
+def _run_history(factory, strategy_name, bounded):
+    """履歴を全て供給した時点のストラテジーを返す。(リアルタイムのデータは待たずに終了する)"""
+    config.BOUNDED_LINE_BUFFERS = bounded
+    cerebro = factory.create_instance('9999', strategy_name, IdleConnector())
+    cerebro.datas[0].stop()
+    return cerebro.run()[0]
+
+
+def _indicator_values(strategy):
+    values = {}
+    for key, indicator in strategy.indicators.items():
+        if hasattr(indicator, 'line_values'):
+            values[key] = list(indicator.line_values().values())
+        else:
+            values[key] = [getattr(indicator.lines, alias)[0] for alias in indicator.lines.getlinealiases()]
+    return values
+
+
+def _retained_mb(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del result
+    return mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ライブ取引の Cerebro インスタンスのメモリ使用量ベンチマーク')
+    parser.add_argument('--strategy', type=int, default=0, help='戦略カタログのインデックス')
+    parser.add_argument('--days', default='20,80,320', help='履歴の日数 (カンマ区切り)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+    strategy_name = catalog[args.strategy]['name']
+    print(f"戦略: {strategy_name} (ストリーミング・インジケーター: {config.STREAMING_INDICATORS})")
+    print(f"{'日数':>5} {'バー数':>7} {'バッファ':>6} | {'供給(s)':>8} {'保持バー数 (short/medium/long)':>30} {'保持値':>9} {'概算(KB)':>10} {'実測(MB)':>9}")
+
+    mismatches = 0
+    for days in (int(d) for d in args.days.split(',')):
+        with tempfile.TemporaryDirectory() as data_dir:
+            df = _synthetic_bars(days)
+            df.to_csv(os.path.join(data_dir, f"9999_5m_{df.index[0].year}.csv"))
+            factory = CerebroFactory(catalog, base, data_dir, {})
+            results = {}
+            for bounded in (False, True):
+                t0 = time.perf_counter()
+                strategy = _run_history(factory, strategy_name, bounded)
+                elapsed = time.perf_counter() - t0
+                footprint = strategy.memory_footprint()
+                results[bounded] = _indicator_values(strategy)
+                del strategy
+                retained = _retained_mb(_run_history, factory, strategy_name, bounded)
+                bars = "/".join(str(n) for n in footprint['bars'].values())
+                print(f"{days:>5} {len(df):>7} {'制限' if bounded else '無制限':>6} | {elapsed:>8.2f} {bars:>30} "
+                      f"{footprint['values']:>9,} {footprint['bytes'] / 1024:>10.1f} {retained:>9.2f}")
+            if results[False] != results[True]:
+                mismatches += 1
+                print(f"  不一致: 最終バーのインジケーター値が異なります ({days}日)")
+
+    print(f"\nインジケーター値の不一致: {mismatches} 件")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
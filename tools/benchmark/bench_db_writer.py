@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# ==============================================================================
+# SQLite 書き込みのベンチマーク
+#   - 従来: StateManager / NotificationLogger がロックを取り、書き込みのたびに同期コミットする
+#   - 現行: 書き込みスレッド (src/core/util/db_writer.py) のキューに積み、WAL モードでまとめてコミットする
+# 複数のストラテジースレッドがポジションの保存・削除と通知の記録・ステータス更新を同時に行い、
+# その間モニター (src/monitor/app.py) と同じ読み取り専用接続で通知履歴を 0.1 秒ごとに取得する。
+# 呼び出し元の待ち時間 (平均・p99・最大)、コミット回数、モニターの読み取り時間を比較し、
+# 最終的な DB の内容が両方式で一致することを確認する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_db_writer.py [--threads 8] [--ops 300] [--dir data]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.util import db_writer
+from src.core.util.notification_logger import NotificationLogger
+from src.realtrade.state_manager import StateManager
+
+
+class LegacyStateManager:
+    """比較用: 変更前の StateManager (ロック + 書き込みごとのコミット)"""
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS positions (
+                symbol TEXT PRIMARY KEY, size REAL NOT NULL,
+                price REAL NOT NULL, entry_datetime TEXT NOT NULL)
+        ''')
+        self.conn.commit()
+
+    def save_position(self, symbol, size, price, entry_datetime):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO positions (symbol, size, price, entry_datetime) VALUES (?, ?, ?, ?)",
+                              (str(symbol), size, price, entry_datetime))
+            self.conn.commit()
+
+    def delete_position(self, symbol):
+        with self.lock:
+            self.conn.execute("DELETE FROM positions WHERE symbol = ?", (str(symbol),))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class LegacyNotificationLogger:
+    """比較用: 変更前の NotificationLogger (ロック + 書き込みごとのコミット)"""
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(NotificationLogger.CREATE_TABLE_SQL)
+        self.conn.commit()
+
+    def log_request(self, priority, recipient, subject, body):
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("INSERT INTO notification_history (timestamp, priority, recipient, subject, body, status) "
+                           "VALUES (?, ?, ?, ?, ?, 'PENDING')", (timestamp, priority, recipient, subject, body))
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def update_status(self, record_id, status, error_message=""):
+        with self._lock:
+            self.conn.execute("UPDATE notification_history SET status = ?, error_message = ? WHERE id = ?",
+                              (status, error_message, record_id))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _strategy(thread_no, ops, state, notifications, latencies):
+    """1つのストラテジースレッド: 約定ごとにポジションを保存 (一部は決済で削除) し、通知を記録する。"""
+    for i in range(ops):
+        symbol = str(1000 + thread_no * 10 + i % 10)
+        t0 = time.perf_counter()
+        if i % 5 == 4:
+            state.delete_position(symbol)
+        else:
+            state.save_position(symbol, float(i % 7 + 1) * 100, 1000.0 + i, f"2025-01-06T09:{i % 60:02d}:00")
+        record_id = notifications.log_request('NORMAL', 'to@example.com', f"[{symbol}] 約定 {thread_no}-{i}", f"本文 {thread_no}-{i}")
+        notifications.update_status(record_id, 'SUCCESS' if i % 3 else 'FAILED', '' if i % 3 else 'timeout')
+        latencies.append(time.perf_counter() - t0)
+        time.sleep(0.001)
+
+
+def _monitor(db_path, stop_event, read_times):
+    """モニターの SSE と同じく、読み取り専用接続で新しい通知を取得し続ける。"""
+    conn, last_id = None, 0
+    while not stop_event.is_set():
+        try:
+            if conn is None:
+                conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            t0 = time.perf_counter()
+            rows = conn.execute("SELECT * FROM notification_history WHERE id > ? ORDER BY id ASC", (last_id,)).fetchall()
+            read_times.append(time.perf_counter() - t0)
+            if rows:
+                last_id = rows[-1][0]
+        except sqlite3.Error:
+            if conn is not None:
+                conn.close()
+            conn = None
+        time.sleep(0.1)
+    if conn is not None:
+        conn.close()
+
+
+def run(directory, n_threads, ops, legacy):
+    """(待ち時間の配列, モニターの読み取り時間の配列, コミット回数, ポジション, 通知履歴) を返す。"""
+    with tempfile.TemporaryDirectory(dir=directory) as db_dir:
+        state_path, notification_path = os.path.join(db_dir, 'realtrade_state.db'), os.path.join(db_dir, 'notification_history.db')
+        writer = db_writer.get_writer()
+        commits0 = writer.commits
+        state = LegacyStateManager(state_path) if legacy else StateManager(state_path)
+        notifications = LegacyNotificationLogger(notification_path) if legacy else NotificationLogger(notification_path)
+
+        stop_event, latencies, read_times = threading.Event(), [], []
+        monitor = threading.Thread(target=_monitor, args=(notification_path, stop_event, read_times))
+        monitor.start()
+        threads = [threading.Thread(target=_strategy, args=(n, ops, state, notifications, latencies)) for n in range(n_threads)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        state.close()
+        notifications.close()
+        stop_event.set()
+        monitor.join()
+
+        # 従来は書き込み 1回 = コミット 1回
+        commits = n_threads * ops * 3 if legacy else writer.commits - commits0
+        with sqlite3.connect(state_path) as conn:
+            positions = conn.execute("SELECT * FROM positions ORDER BY symbol").fetchall()
+        with sqlite3.connect(notification_path) as conn:
+            # スレッド間の順序は実行ごとに異なるため、IDとタイムスタンプを除いて比較する
+            history = sorted(conn.execute("SELECT priority, recipient, subject, body, status, error_message FROM notification_history").fetchall())
+        return np.array(latencies), np.array(read_times), commits, positions, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 書き込みのベンチマーク')
+    parser.add_argument('--threads', type=int, default=8, help='ストラテジースレッド数')
+    parser.add_argument('--ops', type=int, default=300, help='1スレッドあたりの約定数 (1約定 = 書き込み3回)')
+    parser.add_argument('--dir', default=None, help='DBを作成するディレクトリ (既定: 一時ディレクトリ。実運用と同じディスクで計測する場合は log を指定)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{args.threads} スレッド x {args.ops} 約定 (書き込み {args.threads * args.ops * 3} 回)")
+    print(f"{'方式':<14} | {'平均(µs)':>9} {'p99(µs)':>9} {'最大(ms)':>9} | {'コミット':>8} | {'読取 平均(ms)':>13} {'読取 最大(ms)':>13}")
+    results = {}
+    for legacy, name in ((True, '従来'), (False, '書き込みスレッド')):
+        latencies, read_times, commits, positions, history = run(args.dir, args.threads, args.ops, legacy)
+        results[name] = (positions, history)
+        print(f"{name:<14} | {latencies.mean() * 1e6:>9.1f} {np.percentile(latencies, 99) * 1e6:>9.1f} {latencies.max() * 1000:>9.2f} | "
+              f"{commits:>8} | {read_times.mean() * 1000:>13.2f} {read_times.max() * 1000:>13.2f}")
+
+    same = results['従来'] == results['書き込みスレッド']
+    print(f"\nDBの内容 (ポジション {len(results['従来'][0])} 件, 通知 {len(results['従来'][1])} 件): {'一致' if same else '不一致'}")
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import argparse
+import logging
+
+import yaml
+import backtrader as bt
+
+# ==============================================================================
+# EntrySignalGenerator のバー単位マイクロベンチマーク
+# 戦略カタログの各戦略で Backtrader の next() ごとに
+#   - 旧実装 (バーごとにキー生成・辞書検索・分岐・根拠文字列の生成を行う)
+#   - 現行実装 (初期化時にコンパイルした判定関数を呼ぶだけ)
+# の check_entry_signal を呼び、1バーあたりの時間を比較する。両者の戻り値が一致することも検証する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_entry_signal.py [--symbol 1000] [--data-dir data] [--strategies 5]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.data_preparer import prepare_historical_data_feeds
+from src.core.strategy.strategy_initializer import StrategyInitializer
+from src.core.strategy.entry_signal_generator import EntrySignalGenerator
+
+
+class LegacyEntrySignalGenerator:
+    """比較用: コンパイル導入前の EntrySignalGenerator (判定ロジックはそのまま)。"""
+    def __init__(self, indicators, data_feeds):
+        self.indicators = indicators
+        self.data_feeds = data_feeds
+
+    def check_entry_signal(self, strategy_params):
+        trading_mode = strategy_params.get('trading_mode', {})
+        if trading_mode.get('long_enabled', True):
+            is_met, reason = self._check_all_conditions('long', strategy_params)
+            if is_met: return 'long', reason
+        if trading_mode.get('short_enabled', True):
+            is_met, reason = self._check_all_conditions('short', strategy_params)
+            if is_met: return 'short', reason
+        return None, None
+
+    def _check_all_conditions(self, trade_type, strategy_params):
+        conditions = strategy_params.get('entry_conditions', {}).get(trade_type, [])
+        if not conditions: return False, ""
+        reason_details = []
+        for c in conditions:
+            is_met, reason_str = self._evaluate_condition(c)
+            if not is_met: return False, ""
+            reason_details.append(reason_str)
+        return True, " / ".join(reason_details)
+
+    def _evaluate_condition(self, cond):
+        tf, cond_type = cond['timeframe'], cond.get('type')
+        data_feed = self.data_feeds[tf]
+        if len(data_feed) == 0: return False, ""
+        if cond_type in ['crossover', 'crossunder']:
+            si = StrategyInitializer({})
+            k1 = si._get_indicator_key(tf, **cond['indicator1']); k2 = si._get_indicator_key(tf, **cond['indicator2'])
+            cross_indicator = self.indicators.get(f"cross_{k1}_vs_{k2}")
+            if cross_indicator is None or len(cross_indicator) == 0: return False, ""
+            is_met = (cross_indicator[0] > 0 and cond_type == 'crossover') or (cross_indicator[0] < 0 and cond_type == 'crossunder')
+            p1 = ",".join(map(str, cond['indicator1'].get('params', {}).values()))
+            p2 = ",".join(map(str, cond['indicator2'].get('params', {}).values()))
+            return is_met, f"{tf[0].upper()}: {cond_type}({cond['indicator1']['name']}({p1}),{cond['indicator2']['name']}({p2})) [{is_met}]"
+        si = StrategyInitializer({})
+        ind = self.indicators.get(si._get_indicator_key(tf, **cond['indicator']))
+        if ind is None or len(ind) == 0: return False, ""
+        val, compare, target = ind[0], cond['compare'], cond['target']
+        target_type, target_val, target_val_str = target.get('type'), None, ""
+        if target_type == 'data':
+            target_val = getattr(data_feed, target['value'])[0]
+            target_val_str = f"{target['value']} [{target_val:.2f}]"
+        elif target_type == 'indicator':
+            target_ind = self.indicators.get(si._get_indicator_key(tf, **target['indicator']))
+            if target_ind is None or len(target_ind) == 0: return False, ""
+            target_val = target_ind[0]
+            target_val_str = f"{target['indicator']['name']}(...) [{target_val:.2f}]"
+        elif target_type == 'values':
+            target_val = target['value']
+            target_val_str = f"[{target_val[0]},{target_val[1]}]" if compare == 'between' else f"[{target_val}]"
+        if target_val is None: return False, ""
+        is_met = False
+        if compare == '>': is_met = val > (target_val[0] if isinstance(target_val, list) else target_val)
+        elif compare == '<': is_met = val < (target_val[0] if isinstance(target_val, list) else target_val)
+        elif compare == 'between': is_met = target_val[0] < val < target_val[1]
+        params_str = ",".join(map(str, cond['indicator'].get('params', {}).values()))
+        return is_met, f"{tf[0].upper()}: {cond['indicator']['name']}({params_str}) [{val:.2f}] {compare} {target_val_str}"
+
+
+class BenchStrategy(bt.Strategy):
+    params = (('strategy_params', None),)
+
+    def __init__(self):
+        p = self.p.strategy_params
+        self.data_feeds = {'short': self.datas[0], 'medium': self.datas[1], 'long': self.datas[2]}
+        self.indicators = StrategyInitializer(p).create_indicators(self.data_feeds)
+        self.legacy = LegacyEntrySignalGenerator(self.indicators, self.data_feeds)
+        self.compiled = EntrySignalGenerator(self.indicators, self.data_feeds, p)
+        self.bars, self.signals, self.mismatches = 0, 0, 0
+        self.legacy_time = self.compiled_time = 0.0
+
+    def next(self):
+        p, clock = self.p.strategy_params, time.perf_counter
+        t0 = clock(); expected = self.legacy.check_entry_signal(p)
+        t1 = clock(); actual = self.compiled.check_entry_signal(p)
+        t2 = clock()
+        self.legacy_time += t1 - t0; self.compiled_time += t2 - t1
+        self.bars += 1
+        if expected[0]: self.signals += 1
+        if expected != actual: self.mismatches += 1
+
+
+def run_strategy(strategy_params, symbol, data_dir):
+    cerebro = bt.Cerebro(stdstats=False)
+    if not prepare_historical_data_feeds(cerebro, strategy_params, symbol, data_dir):
+        return None
+    cerebro.addstrategy(BenchStrategy, strategy_params=strategy_params)
+    return cerebro.run()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EntrySignalGenerator のバー単位マイクロベンチマーク')
+    parser.add_argument('--symbol', default='1000')
+    parser.add_argument('--data-dir', default=os.path.join(project_root, 'data'))
+    parser.add_argument('--strategies', type=int, default=None, help='カタログ先頭から計測する戦略数 (既定: 全戦略)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+
+    total_bars, total_legacy, total_compiled, total_mismatches = 0, 0.0, 0.0, 0
+    print(f"{'戦略':<44} {'バー数':>7} {'シグナル':>8} {'旧(us/bar)':>11} {'新(us/bar)':>11} {'倍率':>6}")
+    for strategy_def in catalog[:args.strategies]:
+        params = dict(base, strategy_name=strategy_def['name'], entry_conditions=strategy_def['entry_conditions'])
+        try:
+            strat = run_strategy(params, args.symbol, args.data_dir)
+        except Exception as e:
+            print(f"{strategy_def['name']:<44} スキップ ({type(e).__name__}: {e})")
+            continue
+        if strat is None or strat.bars == 0: continue
+        legacy_us, compiled_us = strat.legacy_time / strat.bars * 1e6, strat.compiled_time / strat.bars * 1e6
+        print(f"{strategy_def['name'][:44]:<44} {strat.bars:>7} {strat.signals:>8} {legacy_us:>11.2f} {compiled_us:>11.2f} {legacy_us / compiled_us:>5.1f}x")
+        total_bars += strat.bars; total_legacy += strat.legacy_time; total_compiled += strat.compiled_time
+        total_mismatches += strat.mismatches
+
+    if total_bars:
+        print(f"\n合計 {total_bars} バー: 旧 {total_legacy / total_bars * 1e6:.2f} us/bar -> 新 {total_compiled / total_bars * 1e6:.2f} us/bar "
+              f"({total_legacy / total_compiled:.1f}x)、戻り値の不一致 {total_mismatches} 件")
+    return 1 if total_mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+# ==============================================================================
+# ライブフィード (RakutenData) の起動時の履歴供給のベンチマーク
+#   - 従来: _load のたびに DataFrame.iloc[0] で1行取り出し、iloc[1:] で残りをスライスする
+#   - 現行: 履歴を1度だけ numpy 配列に変換し、カーソルで1本ずつ供給する (src/realtrade/history_cursor.py)
+# 履歴の本数を増やしながら供給にかかる時間を計測し、1本あたりの時間が一定 (= 線形) であることと、
+# 両方式でフィードのライン (日時・OHLCV) が完全に一致することを確認する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_history_feed.py [--bars 5000,20000,80000]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.realtrade.rakuten.rakuten_data import RakutenData
+
+LINES = ('datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest')
+
+
+class IdleBridge:
+    """履歴の供給だけを行うためのブリッジ。リアルタイムのデータは返さない。"""
+    def get_latest_data(self, symbol): return {}
+
+
+class LegacyRakutenData(RakutenData):
+    """比較用: 変更前の履歴供給 (iloc による1行ずつの取り出しとスライス)"""
+    def _load(self):
+        if self._hist_df is not None and not self._hist_df.empty:
+            row = self._hist_df.iloc[0]
+            self._hist_df = self._hist_df.iloc[1:]
+            dt = pd.to_datetime(row.name).to_pydatetime()
+            self.lines.datetime[0] = self.date2num(dt)
+            self.lines.open[0] = float(row['open'])
+            self.lines.high[0] = float(row['high'])
+            self.lines.low[0] = float(row['low'])
+            self.lines.close[0] = float(row['close'])
+            self.lines.volume[0] = float(row.get('volume', 0))
+            self.lines.openinterest[0] = float(row.get('openinterest', 0))
+            self.last_dt = dt
+            if self._hist_df.empty:
+                self.history_supplied = True
+                self._hist_df = None
+            return True
+        return super()._load()
+
+
+def _synthetic_bars(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    days = pd.bdate_range('2000-01-03', periods=n_bars // len(times) + 1)
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in days for t in times][:n_bars], name='datetime')
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                         'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+
+
+def _feed(feed_cls, hist_df):
+    """フィードに履歴を全て供給し、(供給秒数, ラインの値) を返す。"""
+    cerebro = bt.Cerebro(runonce=False, stdstats=False)
+    data = feed_cls(dataname=hist_df, bridge=IdleBridge(), symbol='9999',
+                    timeframe=bt.TimeFrame.Minutes, compression=5)
+    data.stop()
+    cerebro.adddata(data)
+    t0 = time.perf_counter()
+    cerebro.run()
+    elapsed = time.perf_counter() - t0
+    return elapsed, {name: np.asarray(getattr(data.lines, name).array) for name in LINES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ライブフィードの履歴供給のベンチマーク')
+    parser.add_argument('--bars', default='5000,20000,80000', help='履歴の本数 (カンマ区切り)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'バー数':>8} | {'従来(s)':>9} {'µs/本':>8} | {'現行(s)':>9} {'µs/本':>8} | {'倍率':>7} {'一致':>4}")
+    mismatches = 0
+    for n_bars in (int(n) for n in args.bars.split(',')):
+        hist_df = _synthetic_bars(n_bars)
+        legacy_sec, legacy_lines = _feed(LegacyRakutenData, hist_df)
+        cursor_sec, cursor_lines = _feed(RakutenData, hist_df)
+        same = all(np.array_equal(legacy_lines[name], cursor_lines[name]) for name in LINES)
+        mismatches += not same
+        print(f"{n_bars:>8} | {legacy_sec:>9.2f} {legacy_sec / n_bars * 1e6:>8.1f} | {cursor_sec:>9.2f} "
+              f"{cursor_sec / n_bars * 1e6:>8.1f} | {legacy_sec / cursor_sec:>6.1f}x {'OK' if same else 'NG':>4}")
+
+    print(f"\nラインの不一致: {mismatches} 件")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
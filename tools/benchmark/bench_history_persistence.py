@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# 終了時の履歴保存のベンチマーク
+#   - 従来: 5分足CSV全体を読み込んで当日分と結合・重複排除・ソートして書き直し、
+#           60分足・日足を5分足の全期間から再生成する
+#   - 現行: 当日分のジャーナルを5分足CSVへ追記し (キャッシュも追記分だけ更新)、
+#           60分足・日足は当日分を含む期間だけを集計し直す (src/realtrade/bar_journal.py)
+# 履歴の年数を変えて1銘柄あたりの保存時間を計測し、両方式の5分足・60分足・日足の内容が一致すること、
+# キャッシュがCSVをパースし直した結果と一致することを確認する。
+# 同じ日の2回目の保存 (再起動) と、履歴と重複するバーを含むジャーナル (全体の書き直しになる) も検証する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_history_persistence.py [--years 1,5]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.core import data_cache
+from src.realtrade import bar_journal
+from bench_history_feed import _synthetic_bars
+
+SYMBOL = '9999'
+DATE_STR = datetime.now().strftime('%Y%m%d')
+
+
+def _write_history(data_dir, hist_df, aware):
+    """履歴の5分足CSVと、従来の方法で生成した60分足・日足CSVを作成する。"""
+    df = hist_df.copy()
+    df.index = df.index.tz_localize('Asia/Tokyo') if aware else df.index
+    df['openinterest'] = 0.0
+    save_file = os.path.join(data_dir, f"{SYMBOL}_5m_2000.csv")
+    df.rename_axis('datetime').reset_index().to_csv(save_file, index=False)
+    _regenerate(data_dir)
+    for suffix in ('60m', '1D'):
+        os.replace(os.path.join(data_dir, f"{SYMBOL}_{suffix}_{DATE_STR}.csv"), os.path.join(data_dir, f"{SYMBOL}_{suffix}_20000101.csv"))
+    return save_file
+
+
+def _regenerate(data_dir):
+    """比較用: 変更前の RealtimeTrader._regenerate_resampled_csvs (5分足の全期間から60分足・日足を再生成)"""
+    files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.startswith(f"{SYMBOL}_5m_") and f.endswith('.csv')]
+    df = data_cache.read_ohlcv(max(files, key=os.path.getctime))
+    df.index = df.index.tz_localize('Asia/Tokyo') if df.index.tz is None else df.index.tz_convert('Asia/Tokyo')
+    for rule, suffix in bar_journal.RESAMPLE_TARGETS:
+        resampled_df = df.resample(rule, closed='left', label='left').agg(bar_journal.AGGREGATION)
+        resampled_df.dropna(inplace=True)
+        resampled_df.to_csv(os.path.join(data_dir, f"{SYMBOL}_{suffix}_{DATE_STR}.csv"))
+
+
+def _day_bars(hist_df, start, count):
+    """履歴の翌営業日の start 本目から count 本の確定足 (BarBuilder の出力と同じ dict) を返す。"""
+    times = sorted(set(hist_df.index.time))
+    day = hist_df.index[-1].normalize() + pd.offsets.BDay(1)
+    bars = _synthetic_bars(len(times), seed=1)
+    return [{'timestamp': pd.Timestamp.combine(day, t).to_pydatetime(), 'open': r.open, 'high': r.high, 'low': r.low,
+             'close': r.close, 'volume': r.volume} for t, r in list(zip(times, bars.itertuples()))[start:start + count]]
+
+
+def _legacy_save(data_dir, save_file, bars):
+    new_df = pd.DataFrame(bars).rename(columns={'timestamp': 'datetime'})
+    bar_journal.merge_rewrite(save_file, new_df)
+    _regenerate(data_dir)
+
+
+def _journal_save(data_dir, save_file, bars):
+    journal = bar_journal.BarJournal(bar_journal.journal_path(save_file, DATE_STR))
+    for bar in bars:
+        journal.append(bar)
+    journal.close()
+    t0 = time.perf_counter()
+    new_df = bar_journal.compact(save_file, DATE_STR)
+    if not bar_journal.update_resampled(SYMBOL, data_dir, save_file, new_df, DATE_STR):
+        _regenerate(data_dir)
+    return time.perf_counter() - t0
+
+
+def _frames(data_dir):
+    """保存結果 (5分足・60分足・日足) を、日本時間に揃えた DataFrame で返す。キャッシュとCSVのパース結果の一致も確認する。"""
+    frames, cache_ok = {}, True
+    for suffix in ('5m', '60m', '1D'):
+        path = max(
+            (os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.startswith(f"{SYMBOL}_{suffix}_") and f.endswith('.csv')),
+            key=os.path.getctime)
+        cached, parsed = data_cache.read_bars(path), data_cache.parse_csv(path)
+        cache_ok &= np.array_equal(cached.datetime, parsed.datetime) and np.array_equal(cached.values, parsed.values, equal_nan=True)
+        df = parsed.to_dataframe()
+        df.index = df.index.tz_localize('Asia/Tokyo') if df.index.tz is None else df.index.tz_convert('Asia/Tokyo')
+        df.index = df.index.tz_convert('UTC')
+        frames[suffix] = df[['open', 'high', 'low', 'close', 'volume']]
+    return frames, cache_ok
+
+
+def _same(a, b):
+    return all(a[k].index.equals(b[k].index) and np.array_equal(a[k].to_numpy(), b[k].to_numpy()) for k in a)
+
+
+def run(hist_df, aware, sessions):
+    """sessions: [(開始位置, 本数, 重複させる本数)] を順に保存し、(従来の合計秒, 現行の合計秒, 一致, キャッシュ一致) を返す。"""
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as journal_dir:
+        legacy_file = _write_history(legacy_dir, hist_df, aware)
+        for name in os.listdir(legacy_dir):
+            if name.endswith('.csv'):
+                shutil.copy2(os.path.join(legacy_dir, name), journal_dir)
+        journal_file = os.path.join(journal_dir, os.path.basename(legacy_file))
+        # 起動時・前日までの読み込みでキャッシュが作成済みの状態から計測する
+        for name in os.listdir(journal_dir):
+            data_cache.read_bars(os.path.join(journal_dir, name))
+
+        legacy_sec = journal_sec = 0.0
+        for start, count, overlap in sessions:
+            bars = _day_bars(hist_df, start, count)
+            if overlap:
+                last = data_cache.read_ohlcv(legacy_file).iloc[-overlap:]
+                bars = [{'timestamp': ts if ts.tzinfo is None else ts.tz_convert('Asia/Tokyo').tz_localize(None), **row} for ts, row in
+                        zip(last.index, last[['open', 'high', 'low', 'close', 'volume']].to_dict('records'))] + bars
+            t0 = time.perf_counter()
+            _legacy_save(legacy_dir, legacy_file, bars)
+            legacy_sec += time.perf_counter() - t0
+            journal_sec += _journal_save(journal_dir, journal_file, bars)
+
+        legacy_frames, _ = _frames(legacy_dir)
+        journal_frames, cache_ok = _frames(journal_dir)
+        return legacy_sec, journal_sec, _same(legacy_frames, journal_frames), cache_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='終了時の履歴保存のベンチマーク')
+    parser.add_argument('--years', default='1,5', help='履歴の年数 (カンマ区切り)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    cases = [
+        ('1日分', [(0, 66, 0)]),
+        ('再起動 (同日2回)', [(0, 20, 0), (20, 46, 0)]),
+        ('重複あり', [(0, 66, 3)]),
+    ]
+    print(f"{'年数':>4} {'書式':<6} {'ケース':<16} | {'従来(ms)':>9} {'現行(ms)':>9} {'倍率':>7} | {'一致':>4} {'キャッシュ':>6}")
+    failures = 0
+    for years in (int(y) for y in args.years.split(',')):
+        hist_df = _synthetic_bars(years * 245 * 66)
+        for aware in (True, False):
+            for name, sessions in cases:
+                legacy_sec, journal_sec, same, cache_ok = run(hist_df, aware, sessions)
+                failures += not (same and cache_ok)
+                print(f"{years:>4} {'tzあり' if aware else 'tzなし':<6} {name:<16} | {legacy_sec * 1000:>9.1f} {journal_sec * 1000:>9.1f} "
+                      f"{legacy_sec / journal_sec:>6.1f}x | {'OK' if same else 'NG':>4} {'OK' if cache_ok else 'NG':>6}")
+
+    print(f"\n不一致: {failures} 件")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
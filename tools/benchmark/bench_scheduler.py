@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import random
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import yaml
+
+# ==============================================================================
+# イベント駆動スケジューラー (src/realtrade/scheduler.py) のベンチマーク
+# Excel の代わりに、1秒ごとに一部の銘柄の値を更新する疑似コネクターを使い、
+#   - スレッド方式: 銘柄ごとのスレッドで cerebro.run() (フィードが _load を空回りさせる)
+#   - スケジューラー方式: 1つのスレッドが値の変わった銘柄の Cerebro だけを進める
+# の2通りで、一定時間のプロセスCPU時間と、スケジューラー方式のディスパッチ遅延
+# (疑似コネクターの読み取り完了 -> ストラテジーの処理完了) を計測する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_scheduler.py [--symbols 50,200] [--seconds 10] [--active 0.3]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.realtrade import config_realtrade as config
+from src.realtrade.cerebro_factory import CerebroFactory
+from src.realtrade.scheduler import CerebroScheduler
+from src.realtrade.bridge.tick_publisher import TickPublisher
+from bench_warm_start import _synthetic_bars
+
+
+class FakeConnector:
+    """ExcelConnector の代わり。1秒ごとに active の割合の銘柄の値を更新し、値の変わった銘柄の Tick を配信する。"""
+    POLLING_INTERVAL = 1.0
+
+    def __init__(self, symbols, active, seed=0):
+        self.symbols, self.active = list(symbols), active
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latest_data = {s: {'close': 1000.0, 'open': 1000.0, 'high': 1000.0, 'low': 1000.0, 'volume': 0.0} for s in self.symbols}
+        self.publisher = TickPublisher()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def subscribe(self, symbol, callback): self.publisher.subscribe(symbol, callback)
+    def get_latest_data(self, symbol):
+        with self.lock: return dict(self.latest_data.get(str(symbol), {}))
+    def get_cash(self): return config.INITIAL_CAPITAL
+    def get_positions(self): return {}
+    def start(self): self._thread.start()
+    def stop(self): self._stop.set(); self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.POLLING_INTERVAL):
+            changed = self.rng.sample(self.symbols, max(1, int(len(self.symbols) * self.active)))
+            snapshot = dict(self.latest_data)
+            for symbol in changed:
+                bar = dict(snapshot[symbol])
+                bar['close'] = round(bar['close'] * (1 + self.rng.gauss(0, 0.001)), 1)
+                bar['volume'] += self.rng.randint(100, 1000)
+                snapshot[symbol] = bar
+            read_at = time.perf_counter()
+            with self.lock:
+                self.latest_data = snapshot
+            self.publisher.publish(snapshot, read_at)
+
+
+def _create(factory, symbols, strategy_name, connector):
+    cerebros = [factory.create_instance(symbol, strategy_name, connector) for symbol in symbols]
+    return [c for c in cerebros if c is not None]
+
+
+def run(n_symbols, seconds, active, base, catalog, scheduled):
+    config.EVENT_SCHEDULER = scheduled
+    config.WARM_START = False
+    symbols = [str(1000 + i) for i in range(n_symbols)]
+    with tempfile.TemporaryDirectory() as data_dir:
+        bars = _synthetic_bars(5)
+        for symbol in symbols:
+            bars.to_csv(os.path.join(data_dir, f"{symbol}_5m_{bars.index[0].year}.csv"))
+        factory = CerebroFactory(catalog, base, data_dir, {})
+        connector = FakeConnector(symbols, active)
+        cerebros = _create(factory, symbols, catalog[0]['name'], connector)
+        stop_event = threading.Event()
+
+        if scheduled:
+            scheduler = CerebroScheduler(cerebros, stop_event, report_interval=0)
+            scheduler.subscribe(connector)
+            scheduler.start()
+            # 履歴の供給 (begin) が終わるまで待ってから計測する
+            scheduler.started.wait()
+        else:
+            threads = [threading.Thread(target=c.run, daemon=True) for c in cerebros]
+            for t in threads: t.start()
+            while any(c.datas[0]._history is not None or c.datas[0]._hist_df is not None for c in cerebros): time.sleep(0.1)
+
+        connector.start()
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        time.sleep(seconds)
+        cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+        connector.stop()
+
+        stop_event.set()
+        for c in cerebros: c.datas[0].stop()
+        if scheduled:
+            scheduler.wake(); scheduler.join()
+            latency = scheduler.latency.flush()
+            scheduler.finish_all()
+        else:
+            for t in threads: t.join(timeout=10)
+            latency = None
+        return len(cerebros), cpu / wall, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='イベント駆動スケジューラーのベンチマーク')
+    parser.add_argument('--symbols', default='50,200', help='銘柄数 (カンマ区切り)')
+    parser.add_argument('--seconds', type=float, default=10.0, help='計測時間 (秒)')
+    parser.add_argument('--active', type=float, default=0.3, help='1秒ごとに値が変わる銘柄の割合')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+
+    print(f"計測時刻 {datetime.now():%H:%M} (取引時間外はバーが確定しないため、ティックの読み取りとループの駆動のみ)")
+    print(f"{'銘柄数':>6} {'方式':<14} | {'CPU使用率':>9} | {'処理数':>7} {'平均(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9}")
+    for n_symbols in (int(n) for n in args.symbols.split(',')):
+        for scheduled in (False, True):
+            n, cpu, latency = run(n_symbols, args.seconds, args.active, base, catalog, scheduled)
+            line = f"{n:>6} {'スケジューラー' if scheduled else 'スレッド':<14} | {cpu * 100:>8.1f}% |"
+            if latency:
+                line += f" {latency['count']:>7} {latency['mean'] * 1000:>9.2f} {latency['p99'] * 1000:>9.2f} {latency['max'] * 1000:>9.2f}"
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
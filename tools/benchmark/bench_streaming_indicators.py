@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import tracemalloc
+
+import yaml
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+# ==============================================================================
+# ストリーミング・インジケーター (src/core/streaming) の検証とベンチマーク
+#   1. 一致検証: 戦略カタログの各戦略で、Backtrader のインジケーター (runonce=False、ライブ取引と同じ) と
+#      ストリーミング版を同じバーで動かし、全ラインの値が完全に一致することを確認する。
+#      (最初の next() で seed、以降は1本ずつ update)
+#   2. スケーリング: 履歴の日数を変えて、seed の時間・1本あたりの update 時間・保持メモリを計測し、
+#      Backtrader のインジケーター (next モード) と比較する。ストリーミング版は履歴の長さに依存しない。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_streaming_indicators.py [--symbol 1000] [--data-dir data] [--strategies 5] [--days 20,80,320]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core.data_preparer import prepare_historical_data_feeds
+from src.core.strategy.strategy_initializer import StrategyInitializer
+from src.core.streaming import Bars, StreamingUnsupportedError
+
+
+def _same(a, b):
+    return a == b or (a != a and b != b)
+
+
+class ParityStrategy(bt.Strategy):
+    params = (('strategy_params', None),)
+
+    def __init__(self):
+        self.data_feeds = {'short': self.datas[0], 'medium': self.datas[1], 'long': self.datas[2]}
+        initializer = StrategyInitializer(self.p.strategy_params)
+        self.bt_indicators = initializer.create_indicators(self.data_feeds)
+        self.streaming = initializer.create_streaming_indicators()
+        self.bars, self.values, self.mismatches = 0, 0, 0
+
+    def next(self):
+        self.streaming.update(self.data_feeds)
+        self.bars += 1
+        for key, bt_ind in self.bt_indicators.items():
+            streaming_ind = self.streaming[key]
+            if hasattr(streaming_ind, 'line_values') and streaming_ind.line_names != ('value',):
+                pairs = [(getattr(bt_ind.lines, name)[0], value) for name, value in streaming_ind.line_values().items()]
+            else:
+                pairs = [(bt_ind.lines[0][0], streaming_ind[0])]
+            for expected, actual in pairs:
+                self.values += 1
+                if not _same(expected, actual):
+                    self.mismatches += 1
+                    if self.mismatches <= 5:
+                        print(f"  不一致: {key} {self.datas[0].datetime.datetime(0)} bt={expected!r} streaming={actual!r}")
+
+
+def run_parity(base, catalog, symbol, data_dir, count):
+    total_values, total_mismatches = 0, 0
+    print(f"{'戦略':<44} {'バー数':>7} {'比較値数':>9} {'不一致':>6}")
+    for strategy_def in catalog[:count]:
+        params = dict(base, strategy_name=strategy_def['name'], entry_conditions=strategy_def['entry_conditions'])
+        cerebro = bt.Cerebro(stdstats=False)
+        try:
+            if not prepare_historical_data_feeds(cerebro, params, symbol, data_dir): continue
+            cerebro.addstrategy(ParityStrategy, strategy_params=params)
+            strat = cerebro.run(runonce=False, preload=False)[0]
+        except StreamingUnsupportedError as e:
+            print(f"{strategy_def['name'][:44]:<44} 対象外 ({e})")
+            continue
+        except Exception as e:
+            print(f"{strategy_def['name'][:44]:<44} スキップ ({type(e).__name__}: {e})")
+            continue
+        print(f"{strategy_def['name'][:44]:<44} {strat.bars:>7} {strat.values:>9} {strat.mismatches:>6}")
+        total_values += strat.values; total_mismatches += strat.mismatches
+    print(f"\n合計 {total_values} 値を比較、不一致 {total_mismatches} 件")
+    return total_mismatches
+
+
+# --- スケーリング ---------------------------------------------------------------
+
+SCALING_CONDITIONS = {'long': [
+    {'timeframe': 'short', 'indicator': {'name': name, 'params': params}, 'compare': '>', 'target': {'type': 'values', 'value': 0}}
+    for name, params in [('sma', {'period': 20}), ('ema', {'period': 20}), ('rsi', {'period': 14}), ('atr', {'period': 14}),
+                         ('adx', {'period': 14}), ('stochastic', {'period': 14, 'period_dfast': 3, 'period_dslow': 3}),
+                         ('BollingerBands', {'period': 20, 'devfactor': 2.0}),
+                         ('macd', {'period_me1': 12, 'period_me2': 26, 'period_signal': 9}), ('vwap', {})]
+] + [{'timeframe': 'short', 'type': 'crossover', 'indicator1': {'name': 'ema', 'params': {'period': 5}},
+      'indicator2': {'name': 'ema', 'params': {'period': 20}}}]}
+
+
+def _synthetic_bars(days, seed=0):
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2020-01-06', periods=days) for t in times])
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                         'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+
+
+class TimedStrategy(bt.Strategy):
+    params = (('strategy_params', None), ('tail', 500))
+
+    def __init__(self):
+        feed = self.datas[0]
+        self.indicators = StrategyInitializer(self.p.strategy_params).create_indicators({'short': feed, 'medium': feed, 'long': feed})
+        self.total, self.times, self.last = len(feed.p.dataname), [], None
+
+    def next(self):
+        now = time.perf_counter()
+        if self.last is not None and len(self) > self.total - self.p.tail:
+            self.times.append(now - self.last)
+        self.last = now
+
+
+def _run_streaming(params, head, tail_rows):
+    """履歴を seed し、末尾のバーを1本ずつ更新する。(インジケーター群, seed 時間(ms), 1本あたりの更新時間(us)) を返す。"""
+    indicators = StrategyInitializer(params).create_streaming_indicators()
+    t0 = time.perf_counter()
+    indicators.seed('short', head)
+    seed_ms = (time.perf_counter() - t0) * 1e3
+    members, crosses = indicators._by_timeframe['short'], indicators._crosses['short']
+    t0 = time.perf_counter()
+    for row in tail_rows:
+        for indicator in members: indicator.update(*row)
+        for cross in crosses: cross.update()
+    return indicators, seed_ms, (time.perf_counter() - t0) / max(len(tail_rows), 1) * 1e6
+
+
+def _run_backtrader(df, params, tail):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(TimedStrategy, strategy_params=params, tail=tail)
+    return cerebro.run(runonce=False, preload=False)[0]
+
+
+def _retained_kb(func, *args):
+    """func の戻り値が保持しているメモリ (tracemalloc で計測)。"""
+    tracemalloc.start()
+    result = func(*args)
+    kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    del result
+    return kb
+
+
+def run_scaling(days_list, tail=500):
+    params = {'entry_conditions': SCALING_CONDITIONS}
+    print(f"{'日数':>5} {'バー数':>7} | {'seed(ms)':>9} {'update(us/bar)':>15} {'保持メモリ(KB)':>15} | {'bt(us/bar)':>11} {'bt メモリ(KB)':>13}")
+    for days in days_list:
+        df = _synthetic_bars(days)
+        dt = np.array([bt.date2num(ts) for ts in df.index.to_pydatetime()])
+        arrays = [dt] + [df[c].to_numpy() for c in ('open', 'high', 'low', 'close', 'volume')]
+        head = Bars(*(a[:-tail] for a in arrays))
+        tail_rows = list(zip(*(a[-tail:].tolist() for a in arrays)))
+
+        _, seed_ms, update_us = _run_streaming(params, head, tail_rows)
+        streaming_kb = _retained_kb(lambda: _run_streaming(params, head, tail_rows)[0])
+        strat = _run_backtrader(df, params, tail)
+        bt_us = float(np.mean(strat.times)) * 1e6 if strat.times else float('nan')
+        bt_kb = _retained_kb(_run_backtrader, df, params, tail)
+        print(f"{days:>5} {len(df):>7} | {seed_ms:>9.1f} {update_us:>15.2f} {streaming_kb:>15.1f} | {bt_us:>11.2f} {bt_kb:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ストリーミング・インジケーターの一致検証とベンチマーク')
+    parser.add_argument('--symbol', default='1000')
+    parser.add_argument('--data-dir', default=os.path.join(project_root, 'data'))
+    parser.add_argument('--strategies', type=int, default=None, help='一致検証を行うカタログ先頭からの戦略数 (既定: 全戦略)')
+    parser.add_argument('--days', default='20,80,320', help='スケーリング計測の履歴日数 (カンマ区切り)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+
+    print("=== 一致検証 (Backtrader next モード vs ストリーミング) ===")
+    mismatches = run_parity(base, catalog, args.symbol, args.data_dir, args.strategies)
+    print("\n=== スケーリング (履歴の長さ vs 1本あたりの更新時間・メモリ) ===")
+    run_scaling([int(d) for d in args.days.split(',')])
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+
+import yaml
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# ウォームスタート (src/realtrade/snapshot.py) の検証とベンチマーク
+#   1. 履歴 N 日分で全履歴を再生し、終了時と同じ手順でスナップショットを保存する。
+#   2. 翌営業日の5分足を追加した履歴に対して、
+#        - 全履歴の再生 (従来)
+#        - スナップショット + それ以降のバーの供給 (ウォームスタート)
+#      の2通りで Cerebro を起動し、リアルタイムフェーズ移行までの時間を比較する。
+#      両者の最終バーのインジケーター値・各時間足のバーが完全に一致することを検証する。
+#
+# 実行方法 (プロジェクトルートから):
+#   python tools/benchmark/bench_warm_start.py [--strategies 3] [--days 20,80,320]
+# ==============================================================================
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.core import data_cache
+from src.realtrade import config_realtrade as config
+from src.realtrade import snapshot as warm_start
+from src.realtrade.cerebro_factory import CerebroFactory
+
+SYMBOL = '9999'
+
+
+class IdleConnector:
+    """履歴の供給だけを行うための接続先。リアルタイムのデータは返さない。"""
+    def get_latest_data(self, symbol): return {}
+    def get_cash(self): return config.INITIAL_CAPITAL
+    def get_positions(self): return {}
+
+
+def _synthetic_bars(days, seed=0):
+    rng = np.random.default_rng(seed)
+    times = [t for t in pd.date_range('09:00', '15:25', freq='5min').time if not (t > pd.Timestamp('11:25').time() and t < pd.Timestamp('12:30').time())]
+    index = pd.DatetimeIndex([pd.Timestamp.combine(d, t) for d in pd.bdate_range('2020-01-06', periods=days) for t in times], name='datetime')
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+                         'close': close, 'volume': rng.integers(0, 5000, len(index)).astype(float)}, index=index).round(2)
+
+
+def _start(factory, strategy_name, warm):
+    """Cerebro を生成して履歴を供給し、(ストラテジー, 生成からリアルタイムフェーズ移行までの秒数) を返す。"""
+    config.WARM_START = warm
+    t0 = time.perf_counter()
+    cerebro = factory.create_instance(SYMBOL, strategy_name, IdleConnector())
+    cerebro.datas[0].stop()
+    strategy = cerebro.run()[0]
+    return strategy, time.perf_counter() - t0
+
+
+def _state(strategy):
+    """比較用: 全インジケーターの現在値と、各時間足の最終バー。(NaN 同士は一致として扱うため文字列化する)"""
+    values = {key: list(indicator.line_values().values()) for key, indicator in strategy.indicators.items()}
+    for tf, data_feed in strategy.data_feeds.items():
+        values[tf] = [data_feed.datetime[0], data_feed.open[0], data_feed.high[0], data_feed.low[0], data_feed.close[0], data_feed.volume[0]]
+    return {key: [repr(v) for v in line] for key, line in values.items()}
+
+
+def run(strategy_name, days, base, catalog):
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.SNAPSHOT_DIR = os.path.join(data_dir, 'snapshots')
+        factory = CerebroFactory(catalog, base, data_dir, {})
+        bars = _synthetic_bars(days + 1)
+        csv_path = os.path.join(data_dir, f"{SYMBOL}_5m_{bars.index[0].year}.csv")
+
+        # 前日の終了: 全履歴の再生 -> スナップショットの保存
+        last_day = bars.index.normalize() == bars.index.normalize()[-1]
+        bars[~last_day].to_csv(csv_path)
+        strategy, _ = _start(factory, strategy_name, warm=False)
+        snapshot = strategy.build_snapshot(data_cache.read_ohlcv(csv_path, tz_naive=True))
+        if snapshot is None:
+            return None
+        warm_start.save_snapshot(config.SNAPSHOT_DIR, snapshot)
+
+        # 翌日の起動: 当日分の5分足が追加された履歴で比較
+        bars.to_csv(csv_path)
+        full, full_sec = _start(factory, strategy_name, warm=False)
+        warm, warm_sec = _start(factory, strategy_name, warm=True)
+        return len(bars), full_sec, warm_sec, _state(full) == _state(warm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ウォームスタートの検証とベンチマーク')
+    parser.add_argument('--strategies', type=int, default=3, help='戦略カタログ先頭からの戦略数')
+    parser.add_argument('--days', default='20,80,320', help='履歴の日数 (カンマ区切り)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with open(os.path.join(project_root, 'config', 'strategy_base.yml'), encoding='utf-8') as f: base = yaml.safe_load(f)
+    with open(os.path.join(project_root, 'config', 'strategy_catalog.yml'), encoding='utf-8') as f: catalog = yaml.safe_load(f)
+
+    print(f"{'戦略':<40} {'日数':>5} {'バー数':>7} | {'全履歴(s)':>10} {'ウォーム(s)':>11} {'倍率':>7} {'一致':>4}")
+    mismatches = 0
+    for strategy_def in catalog[:args.strategies]:
+        for days in (int(d) for d in args.days.split(',')):
+            result = run(strategy_def['name'], days, base, catalog)
+            if result is None:
+                print(f"{strategy_def['name'][:40]:<40} {days:>5} スナップショットを作成できません (リアルタイムフェーズ未到達)")
+                continue
+            n_bars, full_sec, warm_sec, same = result
+            mismatches += not same
+            print(f"{strategy_def['name'][:40]:<40} {days:>5} {n_bars:>7} | {full_sec:>10.2f} {warm_sec:>11.2f} "
+                  f"{full_sec / warm_sec:>6.1f}x {'OK' if same else 'NG':>4}")
+
+    print(f"\n状態の不一致: {mismatches} 件")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())